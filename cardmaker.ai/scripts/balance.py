@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Card balance analytics
+
+Loads a card set into columnar numpy arrays and computes power, energy cost,
+efficiency, rarity and curve metrics for every card at once. All balance
+formulas live here, in one place, driven by BalanceParams; the card generator
+(load_rows) and the balance report (analyze_balance.py) both use them. Because
+a full evaluation is a handful of array operations, what-if sweeps over a
+parameter, such as a new energy formula for every card, take milliseconds.
+"""
+
+import csv
+import json
+from dataclasses import dataclass, fields, replace
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+RARITIES = ('COMMON', 'RARE', 'EPIC', 'LEGENDARY')
+
+
+@dataclass(frozen=True)
+class BalanceParams:
+    # Power of heroes from their stats
+    creature_attack_weight: float = 1.0
+    creature_health_weight: float = 0.5
+    structure_defense_weight: float = 1.0
+    structure_health_weight: float = 0.6
+    # Power of actions, estimated from their effects and keywords
+    action_base_power: float = 1.0
+    action_effect_weight: float = 0.7
+    action_amount_weight: float = 0.05
+    action_keyword_weight: float = 0.10
+    # Energy cost of heroes: round((stat + health / health_divisor) / energy_divisor) plus nudges
+    creature_health_divisor: float = 4.0
+    creature_energy_divisor: float = 4.0
+    structure_health_divisor: float = 3.0
+    structure_energy_divisor: float = 3.0
+    high_mana_cost: int = 7
+    high_mana_energy: int = 1
+    epic_energy: int = 1
+    legendary_energy: int = 1
+    min_energy: int = 1
+    max_energy: int = 6
+    # Rarity spread by efficiency percentile; the rest are legendary
+    common_share: float = 0.60
+    rare_share: float = 0.25
+    epic_share: float = 0.10
+    # Robust z-score (median/MAD within rarity and colour) above which a card is an outlier
+    outlier_z: float = 3.5
+
+
+DEFAULT_PARAMS = BalanceParams()
+
+
+def parse_params(assignments: Iterable[str], base: BalanceParams = DEFAULT_PARAMS) -> BalanceParams:
+    """BalanceParams with name=value overrides, as given on the command line"""
+    types = {f.name: f.type for f in fields(BalanceParams)}
+    overrides = {}
+    for assignment in assignments:
+        name, _, value = assignment.partition('=')
+        name = name.strip()
+        if name not in types:
+            raise ValueError(f"Unknown balance parameter {name}")
+        overrides[name] = (int if types[name] in (int, 'int') else float)(value)
+    return replace(base, **overrides)
+
+
+def _action_effects(effects_json: str, keywords: str) -> Tuple[int, float, int]:
+    """(effect count, summed effect amounts, keyword count) of one card"""
+    keyword_count = len((keywords or '').split())
+    try:
+        data = json.loads(effects_json or '[]')
+    except (TypeError, ValueError):
+        return 0, 0.0, keyword_count
+    count = len(data) if isinstance(data, (list, dict)) else 0
+    amount = 0.0
+    if isinstance(data, list):
+        for effect in data:
+            if isinstance(effect, dict):
+                try:
+                    amount += float(effect.get('amount') or 0)
+                except (TypeError, ValueError):
+                    pass
+    return count, amount, keyword_count
+
+
+class CardTable:
+    """A card set as parallel column arrays, one entry per card"""
+
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        self.columns = columns
+        for name, values in columns.items():
+            setattr(self, name, values)
+        self._codes = {}
+        self._masks = {}
+
+    def __len__(self) -> int:
+        return len(self.name)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Mapping]) -> 'CardTable':
+        """
+        From gameplay CSV records (slug, name, category, rarity, legendary,
+        mana_color_code, mana_cost, ...); a repeated name replaces the earlier card,
+        as load_rows does
+        """
+        by_name = {}
+        for record in records:
+            by_name[record.get('name', '')] = record
+        records = list(by_name.values())
+
+        def ints(key):
+            return np.array([int(r.get(key) or 0) for r in records], dtype=np.int64)
+
+        def upper(key):
+            return np.array([(r.get(key) or '').upper() for r in records], dtype=str)
+
+        effects = [_action_effects(r.get('effects_json', '[]'), r.get('keywords', '')) for r in records]
+        legendary = [r.get('legendary') for r in records]
+        return cls({
+            'slug': np.array([r.get('slug', '') for r in records], dtype=str),
+            'name': np.array([r.get('name', '') for r in records], dtype=str),
+            'category': upper('category'),
+            'rarity': upper('rarity'),
+            'legendary': np.array([v is True or str(v).upper() == 'TRUE' for v in legendary], dtype=bool),
+            'color': upper('mana_color_code'),
+            'mana_cost': ints('mana_cost'),
+            'energy_cost': ints('energy_cost'),
+            'attack': ints('attack'),
+            'defense': ints('defense'),
+            'health': ints('health'),
+            'base_energy_per_turn': ints('base_energy_per_turn'),
+            'effect_count': np.array([e[0] for e in effects], dtype=np.int64),
+            'effect_amount': np.array([e[1] for e in effects], dtype=np.float64),
+            'keyword_count': np.array([e[2] for e in effects], dtype=np.int64),
+        })
+
+    @classmethod
+    def from_csv(cls, path: str) -> 'CardTable':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_records(csv.DictReader(f))
+
+    @classmethod
+    def from_rows(cls, rows: Iterable) -> 'CardTable':
+        """From GameplayRow objects"""
+        return cls.from_records({
+            'slug': r.slug, 'name': r.name, 'category': r.category, 'rarity': r.rarity,
+            'legendary': r.legendary, 'mana_color_code': r.color_code, 'mana_cost': r.mana_cost,
+            'energy_cost': r.energy_cost, 'attack': r.attack, 'defense': r.defense, 'health': r.health,
+            'base_energy_per_turn': r.base_energy_per_turn, 'keywords': r.keywords,
+            'effects_json': r.effects_json,
+        } for r in rows)
+
+    def replicate(self, times: int) -> 'CardTable':
+        """The set repeated, for benchmarks at scale"""
+        return CardTable({name: np.tile(values, times) for name, values in self.columns.items()})
+
+    def codes(self, column: str) -> Tuple[np.ndarray, Tuple[str, ...]]:
+        """Small-integer code per card for a text column, and the value of each code"""
+        if column not in self._codes:
+            vocab, codes = np.unique(self.columns[column], return_inverse=True)
+            self._codes[column] = (codes.astype(np.int16), tuple(vocab.tolist()))
+        return self._codes[column]
+
+    def mask(self, column: str, *values: str) -> np.ndarray:
+        """Cards whose text column holds one of values; cached, since sweeps ask again and again"""
+        key = (column, values)
+        if key not in self._masks:
+            codes, vocab = self.codes(column)
+            self._masks[key] = np.isin(codes, [vocab.index(v) for v in values if v in vocab])
+        return self._masks[key]
+
+    def is_category(self, *categories: str) -> np.ndarray:
+        return self.mask('category', *categories)
+
+
+def combine_groups(*groupings: Tuple[np.ndarray, Sequence]) -> Tuple[np.ndarray, List[Tuple]]:
+    """
+    Dense group code per card for a combination of (codes, values) groupings,
+    such as colour and rarity, and the key of each group
+    """
+    combined = np.zeros(len(groupings[0][0]), dtype=np.int64)
+    for codes, values in groupings:
+        combined = combined * len(values) + codes
+    size = int(np.prod([len(values) for _, values in groupings]))
+    present = np.bincount(combined, minlength=size) > 0
+    dense = np.cumsum(present) - 1
+    labels = []
+    for code in np.flatnonzero(present).tolist():
+        label = []
+        for _, values in reversed(groupings):
+            code, index = divmod(code, len(values))
+            label.append(values[index])
+        labels.append(tuple(reversed(label)))
+    return dense[combined].astype(np.int16), labels
+
+
+@dataclass
+class BalanceMetrics:
+    """Per-card results of one evaluation"""
+    energy_cost: np.ndarray
+    power: np.ndarray
+    efficiency: np.ndarray
+    rarity: np.ndarray  # Index into RARITIES, assigned by efficiency percentile
+    order: np.ndarray  # Stable ascending sort of efficiency, reused by quantiles and medians
+
+    @property
+    def rarity_names(self) -> np.ndarray:
+        return np.array(RARITIES)[self.rarity]
+
+
+def power_scores(table: CardTable, params: BalanceParams = DEFAULT_PARAMS) -> np.ndarray:
+    attack, defense, health = (np.maximum(0, table.attack), np.maximum(0, table.defense),
+                               np.maximum(0, table.health))
+    action = (params.action_base_power + params.action_effect_weight * table.effect_count
+              + params.action_amount_weight * table.effect_amount
+              + params.action_keyword_weight * table.keyword_count)
+    return np.select(
+        [table.mask('category', 'CREATURE'), table.mask('category', 'STRUCTURE'), table.mask('category', 'ACTION')],
+        [attack * params.creature_attack_weight + health * params.creature_health_weight,
+         defense * params.structure_defense_weight + health * params.structure_health_weight,
+         action],
+        default=1.0
+    )
+
+
+def energy_costs(table: CardTable, params: BalanceParams = DEFAULT_PARAMS, recompute: bool = False) -> np.ndarray:
+    """
+    Energy cost of every card. Heroes without a cost in the CSV (or all heroes,
+    with recompute) get the formula's cost; actions keep the cost they were
+    designed with.
+    """
+    health = np.maximum(0, table.health)
+    structure = table.mask('category', 'STRUCTURE')
+    stat = np.where(structure, np.maximum(0, table.defense), np.maximum(0, table.attack))
+    health_divisor = np.where(structure, params.structure_health_divisor, params.creature_health_divisor)
+    energy_divisor = np.where(structure, params.structure_energy_divisor, params.creature_energy_divisor)
+    # np.rint rounds half to even, as round() does
+    formula = np.rint((stat + health / health_divisor) / energy_divisor).astype(np.int64)
+    formula += np.where(table.mana_cost >= params.high_mana_cost, params.high_mana_energy, 0)
+    formula += np.where(table.mask('rarity', 'EPIC'), params.epic_energy, 0)
+    formula += np.where(table.legendary, params.legendary_energy, 0)
+    formula = np.clip(formula, params.min_energy, params.max_energy)
+
+    replace_cost = ~table.mask('category', 'ACTION') & ((table.energy_cost <= 0) | recompute)
+    return np.where(replace_cost, formula, table.energy_cost)
+
+
+def assign_rarities(scores: np.ndarray, params: BalanceParams = DEFAULT_PARAMS,
+                    order: Optional[np.ndarray] = None) -> np.ndarray:
+    """Rarity index per card from its score percentile; ties keep set order"""
+    total = len(scores)
+    idx_common = int(total * params.common_share)
+    idx_rare = idx_common + int(total * params.rare_share)
+    idx_epic = idx_rare + int(total * params.epic_share)
+    by_rank = np.searchsorted([idx_common, idx_rare, idx_epic], np.arange(total), side='right')
+    rarity = np.empty(total, dtype=np.int16)
+    rarity[np.argsort(scores, kind='stable') if order is None else order] = by_rank
+    return rarity
+
+
+def evaluate(table: CardTable, params: BalanceParams = DEFAULT_PARAMS, recompute_energy: bool = False) -> BalanceMetrics:
+    energy = energy_costs(table, params, recompute_energy)
+    power = power_scores(table, params)
+    efficiency = power / np.maximum(1, table.mana_cost + energy)
+    order = np.argsort(efficiency, kind='stable')
+    return BalanceMetrics(energy_cost=energy, power=power, efficiency=efficiency,
+                          rarity=assign_rarities(efficiency, params, order), order=order)
+
+
+def turns_needed(cost: np.ndarray, income: np.ndarray, bonus: int = 0) -> np.ndarray:
+    """Turns to afford cost at income (+bonus) per turn"""
+    income = np.maximum(1, income + bonus)
+    return (cost + income - 1) // income
+
+
+def summon_turns(mana_cost: np.ndarray, mana_per_turn, discount: int = 0) -> np.ndarray:
+    effective = np.maximum(1, mana_cost - discount)
+    return np.maximum(1, (effective + mana_per_turn - 1) // mana_per_turn)
+
+
+def quantiles(values: np.ndarray, qs: Sequence[float] = (0.1, 0.5, 0.9),
+              order: Optional[np.ndarray] = None) -> Tuple[float, ...]:
+    """Inclusive quantiles, as statistics.quantiles(method='inclusive') gives them"""
+    if len(values) == 0:
+        return tuple(0.0 for _ in qs)
+    ordered = np.sort(values) if order is None else values[order]
+    position = np.asarray(qs) * (len(ordered) - 1)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, len(ordered) - 1)
+    fraction = position - lower
+    return tuple(float(q) for q in ordered[lower] * (1 - fraction) + ordered[upper] * fraction)
+
+
+def curve(values: np.ndarray, top: int = 10) -> List[int]:
+    """Card counts at each cost 0..top, the last bucket holding top and above"""
+    return np.bincount(np.clip(values, 0, top), minlength=top + 1).tolist()
+
+
+def group_medians(values: np.ndarray, codes: np.ndarray, order: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Median of values within each dense group code. order, a sort of values,
+    is reused if given; grouping the sorted values by their small-integer code
+    is then a radix sort.
+    """
+    if order is None:
+        order = np.argsort(values, kind='stable')
+    grouped = values[order[np.argsort(codes[order], kind='stable')]]
+    counts = np.bincount(codes)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return (grouped[starts + (counts - 1) // 2] + grouped[starts + counts // 2]) / 2.0
+
+
+def robust_z(values: np.ndarray, codes: np.ndarray, order: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Distance of each value from its group's median in MADs, scaled to match a
+    normal z-score. Groups whose MAD is zero fall back to their standard
+    deviation; groups with no spread at all score zero.
+    """
+    values = values.astype(np.float64)
+    median = group_medians(values, codes, order)[codes]
+    deviation = np.abs(values - median)
+    mad = group_medians(deviation, codes)[codes] / 0.6745
+    counts = np.bincount(codes)
+    mean = np.bincount(codes, values) / counts
+    std = np.sqrt(np.bincount(codes, (values - mean[codes]) ** 2) / counts)[codes]
+    scale = np.where(mad > 0, mad, std)
+    return np.divide(values - median, scale, out=np.zeros_like(values), where=scale > 0)
+
+
+def _group_z(table: CardTable, metrics: BalanceMetrics, metric: str = 'efficiency') -> np.ndarray:
+    codes, _ = combine_groups(table.codes('color'), (metrics.rarity, RARITIES))
+    values = getattr(metrics, metric)
+    return robust_z(values, codes, metrics.order if metric == 'efficiency' else None)
+
+
+def outliers(table: CardTable, metrics: BalanceMetrics, params: BalanceParams = DEFAULT_PARAMS,
+             metric: str = 'efficiency', limit: Optional[int] = None) -> List[Dict]:
+    """Cards far from the others of their rarity and colour, most extreme first"""
+    values = getattr(metrics, metric)
+    z = _group_z(table, metrics, metric)
+    flagged = np.flatnonzero(np.abs(z) > params.outlier_z)
+    flagged = flagged[np.argsort(-np.abs(z[flagged]), kind='stable')][:limit]
+    rarity_names = metrics.rarity_names
+    return [{'name': table.name[i].item(), 'rarity': rarity_names[i].item(), 'color': table.color[i].item(),
+             'category': table.category[i].item(), metric: float(values[i]), 'z': round(float(z[i]), 2)}
+            for i in flagged]
+
+
+def summarize(table: CardTable, params: BalanceParams = DEFAULT_PARAMS, recompute_energy: bool = False) -> Dict:
+    """Headline numbers of one evaluation, as compared across a sweep"""
+    metrics = evaluate(table, params, recompute_energy)
+    heroes = table.is_category('CREATURE', 'STRUCTURE')
+    q10, q50, q90 = quantiles(metrics.efficiency, order=metrics.order)
+    affordable = turns_needed(metrics.energy_cost[heroes], np.maximum(1, table.base_energy_per_turn[heroes]))
+    return {
+        'energy_mean': round(float(metrics.energy_cost.mean()), 3) if len(table) else 0.0,
+        'energy_curve': curve(metrics.energy_cost),
+        'efficiency_mean': round(float(metrics.efficiency.mean()), 3) if len(table) else 0.0,
+        'efficiency_q10_q50_q90': (round(q10, 3), round(q50, 3), round(q90, 3)),
+        'hero_turns_to_afford': round(float(affordable.mean()), 3) if len(affordable) else 0.0,
+        'rarities': dict(zip(RARITIES, np.bincount(metrics.rarity, minlength=len(RARITIES)).tolist())),
+        'outliers': int(np.count_nonzero(np.abs(_group_z(table, metrics)) > params.outlier_z)),
+    }
+
+
+def sweep(table: CardTable, param: str, values: Sequence, base: BalanceParams = DEFAULT_PARAMS,
+          recompute_energy: bool = True) -> List[Dict]:
+    """summarize() for each value of one parameter, everything else held at base"""
+    return [{param: value, **summarize(table, replace(base, **{param: value}), recompute_energy)}
+            for value in values]
@@ -12,12 +12,14 @@ from PIL import Image, ImageDraw, ImageFont, ImageChops, ImageMath
 
 try:
     from .config import settings
+    from .balance import CardTable, evaluate
 except ImportError:
     import sys
     current_dir = os.path.dirname(os.path.abspath(__file__))
     if current_dir not in sys.path:
         sys.path.insert(0, current_dir)
     from config import settings
+    from balance import CardTable, evaluate
 
 
 @dataclass
@@ -74,76 +76,6 @@ def load_rows(art_csv: str, gp_csv: str) -> Tuple[Dict[str, ArtRow], Dict[str, G
 
     # Load gameplay first so we can derive art defaults (slug, color, etc.)
     gp_rows: Dict[str, GameplayRow] = {}
-    def _compute_energy_cost(category: str, mana_cost: int, attack: int, defense: int, health: int, rarity: str, legendary: bool) -> int:
-        cat = (category or '').upper()
-        rarity_u = (rarity or '').upper()
-        base_cost: int
-        if cat == 'ACTION':
-            # Already provided in CSV; ensure bounds 1-6
-            return 0  # actions will keep their provided cost
-        if cat == 'STRUCTURE':
-            # Defensive focus: scale more by health/defense
-            base_cost = int(round((max(0, defense) + max(0, health) / 3.0) / 3.0))
-        else:
-            # Creature: mix attack and health, lighter weight
-            base_cost = int(round((max(0, attack) + max(0, health) / 4.0) / 4.0))
-        # Nudge by mana curve
-        if mana_cost >= 7:
-            base_cost += 1
-        # Rarity/legendary adjustments
-        if rarity_u == 'EPIC':
-            base_cost += 1
-        if legendary:
-            base_cost += 1
-        # Clamp to 1..6
-        return max(1, min(6, base_cost))
-
-    def _compute_power_score(category: str, attack: int, defense: int, health: int) -> float:
-        cat = (category or '').upper()
-        if cat == 'CREATURE':
-            return max(0, attack) * 1.0 + max(0, health) * 0.5
-        if cat == 'STRUCTURE':
-            return max(0, defense) * 1.0 + max(0, health) * 0.6
-        # ACTION unknown power; return surrogate based on energy tier
-        return 1.0
-
-    def _estimate_action_power(effects_json: str, keywords: str) -> float:
-        try:
-            data = json.loads(effects_json or '[]')
-            length = 0
-            if isinstance(data, list):
-                length = len(data)
-            elif isinstance(data, dict):
-                # count number of effect entries if dict
-                length = len(data)
-            # Sum any numeric 'amount' fields lightly
-            amount_sum = 0.0
-            if isinstance(data, list):
-                for eff in data:
-                    if isinstance(eff, dict):
-                        amt = eff.get('amount')
-                        try:
-                            amount_sum += float(amt or 0)
-                        except Exception:
-                            pass
-            # Keywords add small weight
-            keyword_bonus = max(0, len((keywords or '').split())) * 0.10
-            # Base 1.0 + effect count and scaled amounts
-            return 1.0 + 0.7 * length + 0.05 * amount_sum + keyword_bonus
-        except Exception:
-            return 1.0
-
-    def _compute_rarity_score(category: str, mana_cost: int, energy_cost: int, attack: int, defense: int, health: int, effects_json: str, keywords: str) -> float:
-        cat = (category or '').upper()
-        total_cost = max(1, mana_cost + energy_cost)
-        if cat == 'ACTION':
-            # Efficiency-based rarity for actions: higher power at lower total cost => higher rarity
-            eff = _estimate_action_power(effects_json, keywords) / total_cost
-        else:
-            # Efficiency-based rarity for heroes
-            eff = _compute_power_score(category, attack, defense, health) / total_cost
-        return eff
-
     for r in read_csv(gp_csv):
         row = GameplayRow(
             slug=r['slug'],
@@ -165,50 +97,17 @@ def load_rows(art_csv: str, gp_csv: str) -> Tuple[Dict[str, ArtRow], Dict[str, G
             effects_json=r.get('effects_json', '[]'),
             abilities_json=r.get('abilities_json', '[]'),
         )
-        # Ensure every card has a non-zero energy_cost per design
-        if row.energy_cost <= 0:
-            row.energy_cost = _compute_energy_cost(
-                row.category,
-                row.mana_cost,
-                row.attack,
-                row.defense,
-                row.health,
-                row.rarity,
-                row.legendary,
-            )
         gp_rows[row.name] = row
-    # After building all rows, assign rarities by percentiles to ensure a healthy spread
-    # Compute rarity score for each
-    names = list(gp_rows.keys())
-    scores = []
-    for n in names:
-        r = gp_rows[n]
-        s = _compute_rarity_score(r.category, r.mana_cost, r.energy_cost, r.attack, r.defense, r.health, r.effects_json, r.keywords)
-        scores.append((n, s))
-    # Sort by score ascending
-    scores.sort(key=lambda x: x[1])
-    total = len(scores)
-    # Proportions: COMMON 60%, RARE 25%, EPIC 10%, LEGENDARY 5%
-    p_common = 0.60
-    p_rare = 0.25
-    p_epic = 0.10
-    # remaining -> legendary
-    idx_common = int(total * p_common)
-    idx_rare = idx_common + int(total * p_rare)
-    idx_epic = idx_rare + int(total * p_epic)
-    for i, (n, _) in enumerate(scores):
-        if i < idx_common:
-            rarity = 'COMMON'
-        elif i < idx_rare:
-            rarity = 'RARE'
-        elif i < idx_epic:
-            rarity = 'EPIC'
-        else:
-            rarity = 'LEGENDARY'
-        r = gp_rows[n]
-        r.rarity = rarity
-        r.legendary = (rarity == 'LEGENDARY')
-        gp_rows[n] = r
+    # Balance formulas are shared with the balance report (balance.py).
+    # Every card gets a non-zero energy_cost per design, and rarities are assigned
+    # by efficiency percentile to ensure a healthy spread:
+    # COMMON 60%, RARE 25%, EPIC 10%, LEGENDARY 5%
+    rows = list(gp_rows.values())
+    metrics = evaluate(CardTable.from_rows(rows))
+    for row, energy_cost, rarity in zip(rows, metrics.energy_cost.tolist(), metrics.rarity_names.tolist()):
+        row.energy_cost = energy_cost
+        row.rarity = rarity
+        row.legendary = (rarity == 'LEGENDARY')
     # Helper defaults derived from gameplay/color
     def _default_frame_path(color_code: str) -> str:
         # Expected conventional path; caller can override via CSV
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Console Command Agent
+Waits in the Deckport realtime service until a remote management command is
+queued for this console, then fetches it from the API and runs it, signed in with
+the console's device key. Every command arrives as an envelope signed with the
+server's command key, pinned at provisioning; envelopes that fail verification,
+name another console, or have expired are reported as failed and never run. Commands are acknowledged
+before they start and their results are saved locally before they are
+reported, so a redelivered command is answered from the saved result instead
+of being run twice.
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import random
+import signal
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from device_session import DEVICE_KEY_FILE, DeviceSession  # noqa: E402
+from game_updater import verify_signature  # noqa: E402
+
+# Agent configuration
+STATE_DIR = "/opt/deckport-console/command-agent"
+PUBLIC_KEY_FILE = "/etc/deckport-console/command-signing.pub"  # Pinned at provisioning, root-owned
+AGENT_DIR = "/usr/lib/deckport-console"  # Root-owned code installed at provisioning
+WAIT_SECONDS = 25  # Held by the realtime service, which answers as soon as a command is queued
+POLL_WAIT_SECONDS = 1  # API polls run on sync workers and are kept short
+FALLBACK_POLL_SECONDS = 10  # How often the API is polled while the realtime service is unreachable
+MAX_BACKOFF_SECONDS = 300
+MAX_OUTPUT_CHARS = 64 * 1024
+REMEMBERED_COMMANDS = 500
+
+
+def run_process(args, timeout):
+    """(success, exit_code, output) of a command run with a hard timeout"""
+    try:
+        completed = subprocess.run(args, capture_output=True, text=True, timeout=timeout)
+        output = (completed.stdout or "") + (completed.stderr or "")
+        return completed.returncode == 0, completed.returncode, output[-MAX_OUTPUT_CHARS:]
+    except subprocess.TimeoutExpired as e:
+        output = e.stdout.decode(errors="replace") if isinstance(e.stdout, bytes) else (e.stdout or "")
+        return False, 124, (output + f"\nTimed out after {timeout}s")[-MAX_OUTPUT_CHARS:]
+
+
+def default_handlers():
+    """
+    command type -> handler(payload, timeout) returning (success, exit_code, output, after)
+
+    after, if set, runs once the result is reported: used by commands that take the
+    console down, so their result is on the server before the power goes.
+    """
+    python = sys.executable or "/usr/bin/python3"
+
+    def system(*args):
+        return lambda payload, timeout: (True, 0, f"{args[-1]} scheduled", lambda: subprocess.run(list(args)))
+
+    def process(*args):
+        return lambda payload, timeout: (*run_process(list(args), timeout), None)
+
+    return {
+        "ping": lambda payload, timeout: (True, 0, "pong", None),
+        "reboot": system("sudo", "systemctl", "reboot"),
+        "shutdown": system("sudo", "systemctl", "poweroff"),
+        "restart_game": process("sudo", "systemctl", "restart", "deckport-kiosk.service"),
+        "update_game": process("sudo", python, os.path.join(AGENT_DIR, "game_updater.py")),
+        "upload_logs": process(python, os.path.join(AGENT_DIR, "console_log_streamer.py"), "upload"),
+        "run_script": lambda payload, timeout: (*run_process(["bash", "-c", payload["script"]], timeout), None),
+    }
+
+
+class ConsoleCommandAgent:
+    """Receives, verifies, runs and reports remote commands"""
+
+    def __init__(self, config_file="/opt/deckport-console/console.conf", state_dir=STATE_DIR,
+                 public_key_file=PUBLIC_KEY_FILE, session=None, handlers=None, wait_seconds=WAIT_SECONDS,
+                 fallback_seconds=FALLBACK_POLL_SECONDS):
+        self.config_file = config_file
+        self.api_server = "https://api.deckport.ai"
+        self.realtime_server = "https://ws.deckport.ai"
+        self.console_id = None
+        self.device_uid = None
+        self.device_key_file = DEVICE_KEY_FILE
+        self.public_key_file = public_key_file
+        self.session = session or requests.Session()
+        self.handlers = handlers if handlers is not None else default_handlers()
+        self.wait_seconds = wait_seconds
+        self.fallback_seconds = fallback_seconds
+        self.wake_token = None
+        self.wakeups_down = False
+        self.running = False
+        self.failures = 0
+
+        # Results of recent commands, kept to answer redeliveries without running them again
+        self.state_dir = Path(state_dir)
+        self.state_file = self.state_dir / "state.json"
+        self.state = {'results': {}, 'unreported': []}
+        self.executed = 0
+
+        self.load_config()
+        self.load_state()
+        self.device = DeviceSession(self.api_server, self.device_uid, self.device_key_file, self.session)
+
+    def load_config(self):
+        """Load console configuration"""
+        if not os.path.exists(self.config_file):
+            self.log("Console config file not found", "WARNING")
+            return
+        with open(self.config_file, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if '=' in line and not line.startswith('#'):
+                    key, value = line.split('=', 1)
+                    if key == 'CONSOLE_ID':
+                        self.console_id = int(value) if value.isdigit() else None
+                        self.device_uid = self.device_uid or value
+                    elif key == 'DEVICE_UID':
+                        self.device_uid = value
+                    elif key == 'DEVICE_KEY_FILE':
+                        self.device_key_file = value
+                    elif key == 'API_SERVER':
+                        self.api_server = value
+                    elif key == 'REALTIME_SERVER':
+                        self.realtime_server = value
+
+    def load_state(self):
+        try:
+            self.state_dir.mkdir(parents=True, exist_ok=True)
+            if self.state_file.exists():
+                self.state.update(json.loads(self.state_file.read_text()))
+        except (OSError, ValueError) as e:
+            self.log(f"Error loading command agent state, starting fresh: {e}", "ERROR")
+
+    def save_state(self):
+        results = self.state['results']
+        for command_id in sorted(results, key=int)[:-REMEMBERED_COMMANDS]:
+            del results[command_id]
+        tmp = self.state_file.with_suffix('.tmp')
+        tmp.write_text(json.dumps(self.state))
+        os.replace(tmp, self.state_file)
+
+    def log(self, message, level="INFO"):
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        print(f"[{timestamp}] [{level}] {message}")
+
+    def _url(self, path):
+        return f"{self.api_server}/v1/console-commands{path}"
+
+    def verify(self, delivery):
+        """Parsed envelope, or the reason it must not run"""
+        try:
+            signature = base64.b64decode(delivery.get('signature') or '')
+        except ValueError:
+            signature = b''
+        if not signature or not verify_signature(delivery['envelope'].encode(), signature, self.public_key_file):
+            return None, "Command signature verification failed"
+        envelope = json.loads(delivery['envelope'])
+        if envelope['id'] != delivery['id']:
+            return None, "Command id does not match its envelope"
+        console_id = self.console_id if self.console_id is not None else self.device.console_id
+        if console_id is not None and envelope['console_id'] != console_id:
+            return None, "Command is for another console"
+        if datetime.fromisoformat(envelope['expires_at']) <= datetime.now(timezone.utc):
+            return None, "Command has expired"
+        return envelope, None
+
+    def execute(self, envelope):
+        handler = self.handlers.get(envelope['type'])
+        if handler is None:
+            return {'success': False, 'exit_code': None, 'output': f"Unsupported command {envelope['type']}"}, None
+        started = time.monotonic()
+        try:
+            success, exit_code, output, after = handler(envelope['payload'], envelope['timeout_seconds'])
+        except Exception as e:
+            success, exit_code, output, after = False, None, f"{type(e).__name__}: {e}", None
+        self.executed += 1
+        return {'success': success, 'exit_code': exit_code, 'output': output,
+                'result': {'duration_ms': int((time.monotonic() - started) * 1000)}}, after
+
+    def report(self, command_id, result):
+        response = self.device.post(self._url(f"/{command_id}/result"), json=result, timeout=30)
+        return response.status_code < 500
+
+    def flush_unreported(self):
+        for command_id in list(self.state['unreported']):
+            try:
+                if not self.report(command_id, self.state['results'][str(command_id)]):
+                    return
+            except requests.RequestException:
+                return
+            self.state['unreported'].remove(command_id)
+            self.save_state()
+
+    def handle(self, delivery):
+        command_id = delivery['id']
+        saved = self.state['results'].get(str(command_id))
+        if saved is not None:
+            # Redelivered because our ack or report got lost: answer, do not run again
+            self.report(command_id, saved)
+            return
+
+        envelope, problem = self.verify(delivery)
+        if problem:
+            self.log(f"Refusing command {command_id}: {problem}", "WARNING")
+            result, after = {'success': False, 'exit_code': None, 'output': problem}, None
+        else:
+            self.device.post(self._url(f"/{command_id}/ack"), timeout=30)
+            self.log(f"Running command {command_id} ({envelope['type']})")
+            result, after = self.execute(envelope)
+
+        self.state['results'][str(command_id)] = result
+        self.state['unreported'].append(command_id)
+        self.save_state()
+        self.flush_unreported()
+        if after is not None:
+            after()
+
+    def run_once(self, wait=POLL_WAIT_SECONDS):
+        """One poll; returns the number of commands handled"""
+        self.flush_unreported()
+        response = self.device.get(self._url("/poll"), params={'wait': wait}, timeout=wait + 15)
+        response.raise_for_status()
+        deliveries = response.json().get('commands', [])
+        for delivery in deliveries:
+            self.handle(delivery)
+        return len(deliveries)
+
+    def wait_for_commands(self):
+        """
+        Hold in the realtime service until a command is queued for this console
+
+        The first wait returns at once with a token; later waits pass it back, so a
+        command queued while we were polling the API wakes the next wait
+        immediately. Returns False when the realtime service cannot be used.
+        """
+        try:
+            response = self.device.get(f"{self.realtime_server}/console-commands/wait",
+                                       params={'after': self.wake_token, 'timeout': self.wait_seconds},
+                                       timeout=self.wait_seconds + 15)
+            response.raise_for_status()
+            self.wake_token = response.json()['token']
+            if self.wakeups_down:
+                self.wakeups_down = False
+                self.log("Command wakeups available again")
+            return True
+        except (requests.RequestException, RuntimeError, ValueError, KeyError) as e:
+            self.wake_token = None
+            if not self.wakeups_down:
+                self.wakeups_down = True
+                self.log(f"Command wakeups unavailable, polling every {self.fallback_seconds}s: {e}", "WARNING")
+            return False
+
+    def next_delay(self):
+        """Backoff after failures; otherwise no delay, the wait for commands paces the loop"""
+        if not self.failures:
+            return 0
+        return min(2 ** self.failures, MAX_BACKOFF_SECONDS) * random.uniform(0.5, 1.0)
+
+    def run(self):
+        self.running = True
+        while self.running:
+            try:
+                self.run_once()
+                self.failures = 0
+            except Exception as e:
+                self.failures += 1
+                self.log(f"Command poll failed: {e}", "ERROR")
+            delay = self.next_delay()
+            if delay:
+                time.sleep(delay)
+            elif not self.wait_for_commands():
+                time.sleep(self.fallback_seconds)
+
+    def stop(self):
+        self.running = False
+
+
+agent = None
+
+
+def signal_handler(signum, frame):
+    if agent:
+        agent.stop()
+    sys.exit(0)
+
+
+def main():
+    global agent
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+
+    print("📟 Deckport Console Command Agent")
+    print("=" * 40)
+    agent = ConsoleCommandAgent()
+    if len(sys.argv) > 1 and sys.argv[1] == "once":
+        agent.run_once(wait=0)
+    else:
+        agent.run()
+
+
+if __name__ == "__main__":
+    main()
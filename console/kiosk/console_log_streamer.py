@@ -1,46 +1,126 @@
 #!/usr/bin/env python3
 """
 Console Log Streamer
-Monitors console log files and streams them to the Deckport server for debugging
+Ships console log files and the systemd journal to the Deckport server for
+debugging. Each file is read from a saved byte offset (following rotation by
+inode and truncation) and the journal from a saved cursor, so only new lines are
+sent, stamped with the time they were logged. New lines are cut into gzipped
+batches in an on-disk spool first and uploaded oldest first; while the server is
+unreachable the spool holds them (bounded, oldest dropped) and uploads retry
+with backoff. Uploads are signed in with the console's device key.
 """
 
 import os
+import re
 import sys
 import time
 import json
+import errno
+import fcntl
+import random
 import requests
 import gzip
 import base64
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 import subprocess
 import signal
 import threading
-from queue import Queue
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from device_session import DEVICE_KEY_FILE, DeviceSession  # noqa: E402
+
+# Shipping configuration
+STATE_DIR = "/opt/deckport-console/log-shipper"
+BATCH_MAX_ENTRIES = 1000
+MAX_READ_BYTES = 4 * 1024 * 1024       # Per file per cycle; the rest is read next cycle
+INITIAL_BACKLOG_BYTES = 64 * 1024      # How far back to start on a file never seen before
+JOURNAL_INITIAL_LINES = 200
+SPOOL_MAX_BYTES = 20 * 1024 * 1024
+SPOOL_MAX_FILES = 2000
+MAX_BACKOFF_SECONDS = 600
+
+ISO_TIMESTAMP = re.compile(r'^\[?(\d{4}-\d{2}-\d{2})[T ](\d{2}:\d{2}:\d{2})(?:[.,](\d+))?(Z|[+-]\d{2}:?\d{2})?')
+SYSLOG_TIMESTAMP = re.compile(r'^([A-Z][a-z]{2}) +(\d{1,2}) (\d{2}:\d{2}:\d{2})')
+MONTHS = {m: i for i, m in enumerate(['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+                                      'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], 1)}
+JOURNAL_LEVELS = {'0': 'CRITICAL', '1': 'CRITICAL', '2': 'CRITICAL', '3': 'ERROR', '4': 'WARNING'}
+
+
+def parse_line_timestamp(line, now=None):
+    """Timestamp a log line was written at, from ISO-8601 or syslog prefixes; None if it has none"""
+    match = ISO_TIMESTAMP.match(line)
+    if match:
+        date, clock, fraction, offset = match.groups()
+        # Spelled out for Python 3.10's fromisoformat: six-digit fraction, +HH:MM offset
+        text = f"{date}T{clock}.{(fraction or '0')[:6].ljust(6, '0')}"
+        if offset:
+            text += '+00:00' if offset == 'Z' else f"{offset[:3]}:{offset[-2:]}"
+        try:
+            stamp = datetime.fromisoformat(text)
+        except ValueError:
+            return None
+        return (stamp if stamp.tzinfo else stamp.astimezone()).astimezone(timezone.utc)
+
+    match = SYSLOG_TIMESTAMP.match(line)
+    if match and match.group(1) in MONTHS:
+        now = now or datetime.now().astimezone()
+        hour, minute, second = (int(part) for part in match.group(3).split(':'))
+        try:
+            stamp = now.replace(month=MONTHS[match.group(1)], day=int(match.group(2)), hour=hour,
+                                minute=minute, second=second, microsecond=0)
+        except ValueError:
+            return None
+        if stamp - now > timedelta(days=1):  # Syslog has no year: December lines read in January
+            stamp = stamp.replace(year=stamp.year - 1)
+        return stamp.astimezone(timezone.utc)
+    return None
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
 
 class ConsoleLogStreamer:
-    """Streams console logs to Deckport server in real-time"""
+    """Streams console logs to Deckport server"""
     
-    def __init__(self):
-        self.config_file = "/opt/deckport-console/console.conf"
+    def __init__(self, config_file="/opt/deckport-console/console.conf", state_dir=STATE_DIR, log_files=None,
+                 journal=True, session=None):
+        self.config_file = config_file
         self.api_server = "https://api.deckport.ai"
         self.console_id = None
         self.device_uid = None
-        self.log_queue = Queue()
+        self.device_key_file = DEVICE_KEY_FILE
         self.running = False
         self.upload_interval = 30  # Upload logs every 30 seconds
+        self.session = session or requests.Session()
         
-        # Log files to monitor
-        self.log_files = {
+        # Log files to monitor; the systemd journal is read with journalctl
+        self.log_files = log_files if log_files is not None else {
             'console': '/var/log/deckport-console.log',
             'syslog': '/var/log/syslog',
             'auth': '/var/log/auth.log',
             'kern': '/var/log/kern.log',
             'xorg': '/var/log/Xorg.0.log',
-            'systemd': None  # Will use journalctl
         }
+        self.journal = journal
+        
+        # Offsets, journal cursor and the upload spool
+        self.state_dir = Path(state_dir)
+        self.spool_dir = self.state_dir / "spool"
+        self.state_file = self.state_dir / "state.json"
+        self.state = {'files': {}, 'journal_cursor': None, 'dropped_batches': 0}
+        self.failures = 0
         
         self.load_config()
+        self.load_state()
+        self.device = DeviceSession(self.api_server, self.device_uid or self.console_id, self.device_key_file,
+                                    self.session)
     
     def load_config(self):
         """Load console configuration"""
@@ -55,7 +135,9 @@ class ConsoleLogStreamer:
                                 self.console_id = value
                             elif key == 'API_SERVER':
                                 self.api_server = value
-                            elif key.endswith('device_uid'):  # Handle device_uid variations
+                            elif key == 'DEVICE_KEY_FILE':
+                                self.device_key_file = value
+                            elif key == 'DEVICE_UID' or key.endswith('device_uid'):  # Handle device_uid variations
                                 self.device_uid = value
                 
                 print(f"📋 Config loaded: Console ID = {self.console_id}")
@@ -65,62 +147,237 @@ class ConsoleLogStreamer:
         except Exception as e:
             print(f"❌ Error loading config: {e}")
     
+    def load_state(self):
+        """Load saved offsets and journal cursor"""
+        try:
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+            if self.state_file.exists():
+                self.state.update(json.loads(self.state_file.read_text()))
+        except Exception as e:
+            self.log(f"Error loading shipper state, starting fresh: {e}", "ERROR")
+    
+    def save_state(self):
+        _write_atomic(self.state_file, json.dumps(self.state).encode())
+    
     def log(self, message, level="INFO"):
         """Log message with timestamp"""
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         print(f"[{timestamp}] [{level}] {message}")
     
-    def read_log_file(self, file_path, max_lines=100):
-        """Read last N lines from a log file"""
+    def _read_from(self, path, offset, limit=MAX_READ_BYTES):
+        """Complete lines from offset on; returns (lines, offset after the last complete line)"""
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            chunk = f.read(limit)
+        end = chunk.rfind(b'\n')
+        if end < 0:
+            return [], offset  # Nothing, or a line still being written
+        lines = chunk[:end].decode('utf-8', errors='replace').split('\n')
+        return lines, offset + end + 1
+    
+    def _fingerprint(self, path, offset, size=64):
+        """The bytes just before the offset; if they change, the file was rewritten under us"""
+        with open(path, 'rb') as f:
+            f.seek(max(0, offset - size))
+            return f.read(min(offset, size)).hex()
+    
+    def _rotated_file(self, path, inode):
+        """The file a watched log was rotated to (still uncompressed), by its inode"""
+        directory, name = os.path.split(path)
         try:
-            if not os.path.exists(file_path):
-                return []
-            
-            # Use tail to get last N lines efficiently
-            result = subprocess.run(
-                ['tail', '-n', str(max_lines), file_path],
-                capture_output=True, text=True
-            )
-            
-            if result.returncode == 0:
-                lines = result.stdout.strip().split('\n')
-                return [line for line in lines if line.strip()]
-            else:
-                return []
-                
-        except Exception as e:
-            self.log(f"Error reading {file_path}: {e}", "ERROR")
+            candidates = [os.path.join(directory, n) for n in os.listdir(directory or '.')
+                          if n.startswith(name + '.') and not n.endswith('.gz')]
+        except OSError:
+            return None
+        for candidate in sorted(candidates):
+            try:
+                if os.stat(candidate).st_ino == inode:
+                    return candidate
+            except OSError:
+                continue
+        return None
+    
+    def read_new_lines(self, name, path):
+        """Lines appended to a log file since the saved offset; advances the offset in self.state"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
             return []
+        
+        cursor = self.state['files'].get(name)
+        lines = []
+        if cursor is None:
+            # First sight of this file: ship a bounded tail, starting at a line boundary
+            offset = max(0, stat.st_size - INITIAL_BACKLOG_BYTES)
+            if offset:
+                with open(path, 'rb') as f:
+                    f.seek(offset - 1)
+                    offset += len(f.readline()) - 1
+            cursor = {'inode': stat.st_ino, 'offset': offset}
+        elif cursor['inode'] != stat.st_ino:
+            # Rotated: finish the old file where it now lives, then start the new one from the top
+            rotated = self._rotated_file(path, cursor['inode'])
+            if rotated:
+                lines, _ = self._read_from(rotated, cursor['offset'])
+                self.log(f"{name} rotated, read {len(lines)} lines from {rotated}")
+            cursor = {'inode': stat.st_ino, 'offset': 0}
+        elif stat.st_size < cursor['offset'] or self._fingerprint(path, cursor['offset']) != cursor.get('fingerprint'):
+            # Truncated in place (copytruncate), possibly already refilled past the old offset
+            self.log(f"{name} truncated, reading from the start")
+            cursor = {'inode': stat.st_ino, 'offset': 0}
+        
+        new_lines, cursor['offset'] = self._read_from(path, cursor['offset'])
+        cursor['fingerprint'] = self._fingerprint(path, cursor['offset'])
+        self.state['files'][name] = cursor
+        return [line for line in lines + new_lines if line.strip()]
+    
+    def file_entries(self, name, path, read_at):
+        entries = []
+        last_seen = None
+        for line in self.read_new_lines(name, path):
+            # Continuation lines (tracebacks...) inherit the time of the line they belong to
+            stamp = parse_line_timestamp(line) or last_seen
+            last_seen = stamp or last_seen
+            entries.append({
+                'level': 'INFO',
+                'message': line,
+                'source': name,
+                'timestamp': (stamp or read_at).isoformat(),
+                'data': {'file': path, 'timestamp_estimated': stamp is None}
+            })
+        return entries
     
-    def get_systemd_logs(self, max_lines=50):
-        """Get recent systemd logs"""
+    def journal_entries(self):
+        """Journal entries after the saved cursor"""
+        command = ['journalctl', '--no-pager', '--output', 'json']
+        cursor = self.state.get('journal_cursor')
+        if cursor:
+            command += ['--after-cursor', cursor]
+        else:
+            command += ['--lines', str(JOURNAL_INITIAL_LINES)]
         try:
-            result = subprocess.run([
-                'journalctl', '--no-pager', '--lines', str(max_lines), 
-                '--output', 'json', '--since', '1 hour ago'
-            ], capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                logs = []
-                for line in result.stdout.strip().split('\n'):
-                    if line.strip():
-                        try:
-                            log_entry = json.loads(line)
-                            logs.append({
-                                'timestamp': log_entry.get('__REALTIME_TIMESTAMP'),
-                                'unit': log_entry.get('_SYSTEMD_UNIT', 'unknown'),
-                                'message': log_entry.get('MESSAGE', ''),
-                                'priority': log_entry.get('PRIORITY', '6')
-                            })
-                        except:
-                            continue
-                return logs
-            else:
-                return []
-                
-        except Exception as e:
+            result = subprocess.run(command, capture_output=True, text=True, timeout=60)
+        except (OSError, subprocess.TimeoutExpired) as e:
             self.log(f"Error reading systemd logs: {e}", "ERROR")
             return []
+        if result.returncode != 0:
+            return []
+        
+        entries = []
+        for line in result.stdout.splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            message = entry.get('MESSAGE', '')
+            if isinstance(message, list):  # Non-UTF-8 messages come as byte arrays
+                message = bytes(message).decode('utf-8', errors='replace')
+            unit = entry.get('_SYSTEMD_UNIT', entry.get('SYSLOG_IDENTIFIER', 'unknown'))
+            realtime = int(entry.get('__REALTIME_TIMESTAMP', 0))
+            entries.append({
+                'level': JOURNAL_LEVELS.get(str(entry.get('PRIORITY', '6')), 'INFO'),
+                'message': message,
+                'source': f"systemd.{unit}",
+                'timestamp': datetime.fromtimestamp(realtime / 1e6, tz=timezone.utc).isoformat(),
+                'data': {'unit': unit, 'priority': entry.get('PRIORITY', '6')}
+            })
+            self.state['journal_cursor'] = entry.get('__CURSOR', self.state.get('journal_cursor'))
+        return entries
+    
+    def collect(self):
+        """Move everything new into the spool; returns the number of entries spooled"""
+        read_at = datetime.now(timezone.utc)
+        entries = []
+        for name, path in self.log_files.items():
+            try:
+                entries.extend(self.file_entries(name, path, read_at))
+            except Exception as e:
+                self.log(f"Error reading {path}: {e}", "ERROR")
+        if self.journal:
+            entries.extend(self.journal_entries())
+        
+        for start in range(0, len(entries), BATCH_MAX_ENTRIES):
+            self.spool(entries[start:start + BATCH_MAX_ENTRIES])
+        # Offsets move only once their lines are safely in the spool
+        self.save_state()
+        return len(entries)
+    
+    def spool(self, entries):
+        """Write one gzipped batch to the spool, dropping the oldest batches over the bounds"""
+        payload = json.dumps({'console_id': self.console_id, 'device_uid': self.device_uid, 'logs': entries})
+        _write_atomic(self.spool_dir / f"{time.time_ns()}.json.gz", gzip.compress(payload.encode('utf-8')))
+        
+        batches = self.spooled()
+        total = sum(os.path.getsize(batch) for batch in batches)
+        while batches and (len(batches) > SPOOL_MAX_FILES or total > SPOOL_MAX_BYTES):
+            oldest = batches.pop(0)
+            total -= os.path.getsize(oldest)
+            os.remove(oldest)
+            self.state['dropped_batches'] = self.state.get('dropped_batches', 0) + 1
+            self.log(f"Spool full, dropped oldest batch {oldest.name}", "WARNING")
+    
+    def spooled(self):
+        return sorted(self.spool_dir.glob("*.json.gz"), key=lambda batch: int(batch.name.split('.')[0]))
+    
+    def flush(self):
+        """Upload spooled batches oldest first; stops at the first failure. Returns the batches sent."""
+        headers = {'Content-Type': 'application/json', 'Content-Encoding': 'gzip'}
+        sent = 0
+        for batch in self.spooled():
+            try:
+                response = self.device.post(f"{self.api_server}/v1/console-logs/stream",
+                                            data=batch.read_bytes(), headers=headers, timeout=30)
+            except (requests.RequestException, RuntimeError) as e:
+                self.log(f"❌ Log upload failed, {len(self.spooled())} batches spooled: {e}", "ERROR")
+                return sent
+            if response.status_code in (400, 413):
+                # The server will never take this batch; keep it from blocking the rest
+                self.log(f"❌ Server rejected {batch.name} ({response.status_code}), dropping it", "ERROR")
+                batch.unlink()
+                continue
+            if response.status_code != 200:
+                self.log(f"❌ Log upload failed: {response.status_code}", "ERROR")
+                return sent
+            batch.unlink()
+            sent += 1
+        return sent
+    
+    def stream_logs(self):
+        """Spool new log lines and upload the spool; True once the spool is empty"""
+        lock = self._acquire_lock()
+        if lock is None:
+            self.log("Another log shipper is running", "WARNING")
+            return True
+        try:
+            collected = self.collect()
+            sent = self.flush()
+            if collected or sent:
+                self.log(f"✅ Spooled {collected} new log entries, uploaded {sent} batches", "SUCCESS")
+            return not self.spooled()
+        except Exception as e:
+            self.log(f"❌ Error streaming logs: {e}", "ERROR")
+            return False
+        finally:
+            lock.close()
+    
+    def _acquire_lock(self):
+        """Only one shipper (cron upload or daemon) may move the offsets at a time"""
+        lock = open(self.state_dir / "shipper.lock", 'w')
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return lock
+        except OSError as e:
+            lock.close()
+            if e.errno in (errno.EAGAIN, errno.EACCES):
+                return None
+            raise
+    
+    def next_delay(self):
+        """Upload interval, backing off exponentially (with jitter) while uploads fail"""
+        if not self.failures:
+            return self.upload_interval
+        delay = min(self.upload_interval * 2 ** self.failures, MAX_BACKOFF_SECONDS)
+        return delay * random.uniform(0.5, 1.0)
     
     def collect_system_state(self):
         """Collect current system state for debugging"""
@@ -141,66 +398,6 @@ class ConsoleLogStreamer:
             self.log(f"Error collecting system state: {e}", "ERROR")
             return {}
     
-    def stream_logs(self):
-        """Stream logs to server"""
-        try:
-            # Collect logs from all sources
-            all_logs = []
-            
-            for log_name, log_path in self.log_files.items():
-                if log_name == 'systemd':
-                    # Special handling for systemd logs
-                    systemd_logs = self.get_systemd_logs()
-                    for entry in systemd_logs:
-                        all_logs.append({
-                            'level': 'INFO',
-                            'message': entry['message'],
-                            'source': f"systemd.{entry['unit']}",
-                            'timestamp': datetime.now().isoformat(),
-                            'data': entry
-                        })
-                elif log_path and os.path.exists(log_path):
-                    # Read regular log files
-                    lines = self.read_log_file(log_path, 50)
-                    for line in lines:
-                        all_logs.append({
-                            'level': 'INFO',
-                            'message': line,
-                            'source': log_name,
-                            'timestamp': datetime.now().isoformat(),
-                            'data': {'file': log_path}
-                        })
-            
-            if not all_logs:
-                self.log("No logs to stream", "WARNING")
-                return True
-            
-            # Send logs to server
-            payload = {
-                'console_id': self.console_id,
-                'device_uid': self.device_uid,
-                'logs': all_logs
-            }
-            
-            response = requests.post(
-                f"{self.api_server}/v1/console-logs/stream",
-                json=payload,
-                headers={'Content-Type': 'application/json'},
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                self.log(f"✅ Streamed {result.get('processed_logs', 0)} log entries", "SUCCESS")
-                return True
-            else:
-                self.log(f"❌ Log streaming failed: {response.status_code}", "ERROR")
-                return False
-                
-        except Exception as e:
-            self.log(f"❌ Error streaming logs: {e}", "ERROR")
-            return False
-    
     def upload_crash_report(self, crash_type="unknown", error_message="", additional_logs=None):
         """Upload crash report with full system state"""
         try:
@@ -275,8 +472,8 @@ class ConsoleLogStreamer:
         
         while self.running:
             try:
-                self.stream_logs()
-                time.sleep(self.upload_interval)
+                self.failures = 0 if self.stream_logs() else self.failures + 1
+                time.sleep(self.next_delay())
             except KeyboardInterrupt:
                 self.log("🛑 Log streaming stopped by user", "INFO")
                 break
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Console Device Session
+Signs the console's agents in to the Deckport API the way the game does: a fresh
+nonce, signed with the console's device key, is exchanged at /v1/auth/device/login
+for a device token. Tokens expire, so a new one is fetched shortly before the old
+one runs out and whenever the API answers 401, and that request is sent again.
+"""
+
+import os
+import time
+import uuid
+import base64
+import subprocess
+
+import requests
+
+# Session configuration
+DEVICE_KEY_FILE = "/opt/deckport-console/keys/console_private.pem"  # Created and registered at provisioning
+DEFAULT_TOKEN_SECONDS = 3600
+REFRESH_MARGIN_SECONDS = 300
+
+
+def sign_nonce(nonce, private_key_file):
+    """RSA-SHA256 signature the device login checks; uses cryptography when installed, else the openssl CLI"""
+    try:
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import padding
+    except ImportError:
+        result = subprocess.run(["openssl", "dgst", "-sha256", "-sign", private_key_file], input=nonce,
+                                capture_output=True, check=True)
+        return result.stdout
+
+    with open(private_key_file, 'rb') as f:
+        key = serialization.load_pem_private_key(f.read(), password=None)
+    return key.sign(nonce, padding.PKCS1v15(), hashes.SHA256())
+
+
+class DeviceSession:
+    """API requests made with this console's device token, logging in again when it expires"""
+
+    def __init__(self, api_server, device_uid, key_file=DEVICE_KEY_FILE, session=None, clock=time.time):
+        self.api_server = api_server
+        self.device_uid = device_uid
+        self.key_file = key_file
+        self.session = session or requests.Session()
+        self.clock = clock
+        self.token = None
+        self.expires_at = 0
+        self.console_id = None
+
+    def login(self):
+        if not self.device_uid or not os.path.exists(self.key_file):
+            raise RuntimeError("Console has no device identity; re-provision it")
+        nonce = uuid.uuid4().hex
+        signature = base64.b64encode(sign_nonce(nonce.encode(), self.key_file)).decode()
+        response = self.session.post(f"{self.api_server}/v1/auth/device/login",
+                                     json={'device_uid': self.device_uid, 'nonce': nonce, 'signature': signature},
+                                     timeout=30)
+        response.raise_for_status()
+        data = response.json()
+        self.token = data['access_token']
+        self.expires_at = self.clock() + data.get('expires_in', DEFAULT_TOKEN_SECONDS) - REFRESH_MARGIN_SECONDS
+        self.console_id = data.get('device_id')
+        return self.token
+
+    def headers(self):
+        if self.token is None or self.clock() >= self.expires_at:
+            self.login()
+        return {'Authorization': f'Bearer {self.token}'}
+
+    def request(self, method, url, headers=None, **kwargs):
+        send = getattr(self.session, method)
+        response = send(url, headers={**(headers or {}), **self.headers()}, **kwargs)
+        if response.status_code == 401:
+            # Expired or revoked early: log in again and retry once
+            self.token = None
+            response = send(url, headers={**(headers or {}), **self.headers()}, **kwargs)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('get', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('post', url, **kwargs)
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Console Game Updater
+Updates the Godot game from the Deckport release server. The console reports the
+version it runs and downloads only what the server plans for it: a chain of
+binary deltas, or the full build when that is smaller. Every download is checked
+against the signed release manifest, the new build is assembled and verified
+file by file in a staging directory, and only then swapped in for the running
+game. A failed delta falls back to the full build; a failed swap keeps the old game.
+The updater runs as root from the root-owned copy installed at provisioning and
+signs in to the API with the console's device key.
+"""
+
+import os
+import sys
+import json
+import fcntl
+import shutil
+import hashlib
+import tempfile
+import subprocess
+from datetime import datetime
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from device_session import DEVICE_KEY_FILE, DeviceSession  # noqa: E402
+
+try:
+    import binary_delta  # Shipped next to this script on consoles
+except ImportError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from shared.utils import binary_delta
+
+# Updater configuration
+GAME_DIR = "/opt/godot-game"
+STATE_DIR = "/opt/deckport-console/game-updates"
+PUBLIC_KEY_FILE = "/etc/deckport-console/game-release.pub"  # Pinned at provisioning, root-owned
+KIOSK_SERVICE = "deckport-kiosk.service"
+DOWNLOAD_CHUNK = 1024 * 1024
+
+
+class UpdateError(Exception):
+    pass
+
+
+def verify_signature(manifest_bytes, signature, public_key_file):
+    """RSA-SHA256 manifest signature; uses cryptography when installed, else the openssl CLI"""
+    try:
+        from cryptography.exceptions import InvalidSignature
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import padding
+    except ImportError:
+        with tempfile.TemporaryDirectory() as tmp:
+            manifest_path, signature_path = os.path.join(tmp, "manifest"), os.path.join(tmp, "sig")
+            Path(manifest_path).write_bytes(manifest_bytes)
+            Path(signature_path).write_bytes(signature)
+            result = subprocess.run(
+                ["openssl", "dgst", "-sha256", "-verify", public_key_file, "-signature", signature_path, manifest_path],
+                capture_output=True)
+            return result.returncode == 0
+
+    key = serialization.load_pem_public_key(Path(public_key_file).read_bytes())
+    try:
+        key.verify(signature, manifest_bytes, padding.PKCS1v15(), hashes.SHA256())
+        return True
+    except InvalidSignature:
+        return False
+
+
+class GameUpdater:
+    """Checks for, downloads, verifies and installs game updates"""
+
+    def __init__(self, config_file="/opt/deckport-console/console.conf", game_dir=GAME_DIR, state_dir=STATE_DIR,
+                 public_key_file=PUBLIC_KEY_FILE, session=None, restart=True):
+        self.config_file = config_file
+        self.api_server = "https://api.deckport.ai"
+        self.device_uid = None
+        self.device_key_file = DEVICE_KEY_FILE
+        self.game_dir = Path(game_dir)
+        self.state_dir = Path(state_dir)
+        self.download_dir = self.state_dir / "downloads"
+        self.state_file = self.state_dir / "installed.json"
+        self.public_key_file = public_key_file
+        self.session = session or requests.Session()
+        self.restart = restart
+
+        self.load_config()
+        self.device = DeviceSession(self.api_server, self.device_uid, self.device_key_file, self.session)
+
+    def load_config(self):
+        """Load console configuration"""
+        if not os.path.exists(self.config_file):
+            self.log("Console config file not found", "WARNING")
+            return
+        with open(self.config_file, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if '=' in line and not line.startswith('#'):
+                    key, value = line.split('=', 1)
+                    if key == 'API_SERVER':
+                        self.api_server = value
+                    elif key == 'CONSOLE_ID':
+                        self.device_uid = self.device_uid or value
+                    elif key == 'DEVICE_UID':
+                        self.device_uid = value
+                    elif key == 'DEVICE_KEY_FILE':
+                        self.device_key_file = value
+
+    def log(self, message, level="INFO"):
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        print(f"[{timestamp}] [{level}] {message}")
+
+    def installed_version(self):
+        try:
+            return json.loads(self.state_file.read_text()).get('version')
+        except (OSError, ValueError):
+            return None
+
+    def check(self, version):
+        response = self.device.get(f"{self.api_server}/v1/game-updates/check", params={'version': version or ''},
+                                   timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+    def fetch_manifest(self):
+        """Release manifest, after checking its signature against the pinned release key"""
+        manifest = self.session.get(f"{self.api_server}/v1/game-updates/manifest", timeout=30)
+        signature = self.session.get(f"{self.api_server}/v1/game-updates/manifest.sig", timeout=30)
+        manifest.raise_for_status()
+        signature.raise_for_status()
+        if not verify_signature(manifest.content, signature.content, self.public_key_file):
+            raise UpdateError("Release manifest signature is invalid")
+        return json.loads(manifest.content)
+
+    def download(self, step):
+        """Artifact bytes, checked against the hash the signed manifest gives for it"""
+        self.download_dir.mkdir(parents=True, exist_ok=True)
+        path = self.download_dir / step['sha256']
+        if path.exists() and hashlib.sha256(path.read_bytes()).hexdigest() == step['sha256']:
+            return path.read_bytes()
+
+        digest = hashlib.sha256()
+        partial = path.with_suffix('.part')
+        with self.session.get(f"{self.api_server}{step['url']}", stream=True, timeout=60) as response:
+            response.raise_for_status()
+            with open(partial, 'wb') as f:
+                for chunk in response.iter_content(DOWNLOAD_CHUNK):
+                    digest.update(chunk)
+                    f.write(chunk)
+        if digest.hexdigest() != step['sha256']:
+            partial.unlink()
+            raise UpdateError(f"Download of {step['version']} is corrupt")
+        os.replace(partial, path)
+        return path.read_bytes()
+
+    def build(self, steps, manifest):
+        """Apply the planned steps to the installed game; returns the verified new tree"""
+        artifacts = {r['sha256'] for r in manifest['releases']} | {d['sha256'] for d in manifest['deltas']}
+        tree = None
+        for step in steps:
+            if step['sha256'] not in artifacts:
+                raise UpdateError(f"Artifact {step['sha256']} is not in the signed manifest")
+            data = self.download(step)
+            if step['kind'] == 'full':
+                tree = binary_delta.read_tarball(data)
+            else:
+                if tree is None:
+                    tree = binary_delta.read_tree(str(self.game_dir))
+                tree = binary_delta.apply_package_delta(tree, data)
+            self.log(f"Applied {step['kind']} {step['version']} ({step['size']} bytes)")
+
+        release = next(r for r in manifest['releases'] if r['version'] == steps[-1]['version'])
+        if binary_delta.tree_listing(tree) != release['files']:
+            raise UpdateError(f"Assembled build does not match release {release['version']}")
+        return tree
+
+    def install(self, tree, version):
+        """Write the build to a staging directory next to the game and swap it in"""
+        staging = self.game_dir.with_name(self.game_dir.name + '.staging')
+        backup = self.game_dir.with_name(self.game_dir.name + '.previous')
+        shutil.rmtree(staging, ignore_errors=True)
+        binary_delta.write_tree(tree, str(staging))
+
+        shutil.rmtree(backup, ignore_errors=True)
+        if self.game_dir.exists():
+            os.rename(self.game_dir, backup)
+        try:
+            os.rename(staging, self.game_dir)
+        except OSError:
+            if backup.exists():
+                os.rename(backup, self.game_dir)
+            raise
+
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_file.with_suffix('.tmp')
+        tmp.write_text(json.dumps({'version': version, 'installed_at': datetime.now().isoformat()}))
+        os.replace(tmp, self.state_file)
+
+    def report_installed(self, version):
+        try:
+            self.device.post(f"{self.api_server}/v1/game-updates/installed", json={'version': version}, timeout=30)
+        except (requests.RequestException, RuntimeError) as e:
+            self.log(f"Could not report installed version: {e}", "WARNING")
+
+    def update(self):
+        """Bring the game to the version the server assigns; returns the version installed, or None"""
+        current = self.installed_version()
+        plan = self.check(current)
+        if not plan.get('update_available'):
+            self.log(f"Game is up to date ({current})")
+            return None
+
+        manifest = self.fetch_manifest()
+        self.log(f"Updating {current} -> {plan['target']}: {plan['download_bytes']} bytes "
+                 f"(full build {plan['full_size']} bytes)")
+        try:
+            tree = self.build(plan['steps'], manifest)
+        except (UpdateError, binary_delta.DeltaError) as e:
+            if plan['steps'][0]['kind'] == 'full':
+                raise
+            # Installed files differ from the release the deltas expect; start over from the full build
+            self.log(f"Delta update failed ({e}), downloading the full build", "WARNING")
+            plan = self.check(None)
+            tree = self.build(plan['steps'], manifest)
+
+        self.install(tree, plan['target'])
+        if self.restart:
+            subprocess.run(["sudo", "systemctl", "restart", KIOSK_SERVICE], check=False)
+        self.report_installed(plan['target'])
+        shutil.rmtree(self.download_dir, ignore_errors=True)
+        self.log(f"Game updated to {plan['target']}")
+        return plan['target']
+
+    def run(self):
+        """update() under a lock so cron and manual runs never overlap"""
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.state_dir / "updater.lock", 'w') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self.log("Another update is running")
+                return None
+            return self.update()
+
+
+def main():
+    print("🎮 Deckport Console Game Updater")
+    print("=" * 40)
+    try:
+        GameUpdater().run()
+    except Exception as e:
+        print(f"❌ Game update failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
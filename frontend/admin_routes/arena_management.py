@@ -252,11 +252,19 @@ def create_arenas_batch():
         import sys
         sys.path.append('/home/jp/deckport.ai')
         from services.arena_creation_engine import ArenaCreationAPI
+        from shared.services.arena_pipeline import safe_name
+        
+        run_id = data.get('run_id')
+        if run_id is not None and not safe_name(run_id):
+            return jsonify({
+                'success': False,
+                'message': 'Invalid run id'
+            }), 400
         
         # Create arenas asynchronously
         import asyncio
         arena_api = ArenaCreationAPI()
-        result = asyncio.run(arena_api.create_arenas_endpoint(count, theme_preference))
+        result = asyncio.run(arena_api.create_arenas_endpoint(count, theme_preference, run_id))
         
         if result.get('success'):
             flash(f"Successfully created {result['total_created']} arenas!", 'success')
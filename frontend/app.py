@@ -6,7 +6,6 @@ import logging
 from functools import wraps
 from urllib.parse import urlencode
 
-import requests
 from flask import Flask, render_template, request, redirect, url_for, make_response, g
 
 # Load environment variables from .env file if it exists
@@ -31,6 +30,11 @@ import sys
 import os
 sys.path.append(os.path.dirname(__file__))
 
+# Pooled, circuit-broken client for all page calls to the API
+from services.api_client import APIClient
+api_client = APIClient(API_BASE)
+CATALOG_FILTERS_TTL = float(os.environ.get("CATALOG_FILTERS_TTL", "300"))
+
 # Register admin blueprint
 from admin_routes import admin_bp
 from console_deployment import deploy_bp
@@ -177,50 +181,21 @@ def _csrf_valid(form_token: str | None) -> bool:
     return form_token and form_token == request.cookies.get("csrf")
 
 
-def api_get(path: str, params: dict | None = None, headers: dict | None = None):
-    t0 = time.time()
-    rid = getattr(g, "request_id", str(uuid.uuid4()))
-    hdrs = {"X-Request-ID": rid, **(headers or {})}
-    url = f"{API_BASE}{path}"
-    try:
-        r = requests.get(url, params=params, headers=hdrs, timeout=5)
-        elapsed = int((time.time() - t0) * 1000)
-        logger.info(
-            "api.get",
-            extra={"request_id": rid, "url": url, "status": r.status_code, "duration_ms": elapsed},
-        )
-        r.raise_for_status()
-        return r.json()
-    except Exception as e:
-        elapsed = int((time.time() - t0) * 1000)
-        logger.exception(
-            "api.get.error",
-            extra={"request_id": rid, "url": url, "duration_ms": elapsed, "params": (params or {})},
-        )
-        return None
+def _request_id() -> str:
+    return getattr(g, "request_id", None) or str(uuid.uuid4())
+
+
+def api_get(path: str, params: dict | None = None, headers: dict | None = None, cache_ttl: float | None = None):
+    return api_client.get(path, params=params, headers=headers, request_id=_request_id(), cache_ttl=cache_ttl)
+
+
+def api_get_all(*calls: tuple[str, dict]):
+    """Fetch independent GETs concurrently, e.g. api_get_all(("/v1/a", {}), ("/v1/b", {"params": p}))"""
+    return api_client.get_all(calls, request_id=_request_id())
 
 
 def api_post(path: str, json: dict | None = None, headers: dict | None = None):
-    t0 = time.time()
-    rid = getattr(g, "request_id", str(uuid.uuid4()))
-    hdrs = {"X-Request-ID": rid, **(headers or {})}
-    url = f"{API_BASE}{path}"
-    try:
-        r = requests.post(url, json=json or {}, headers=hdrs, timeout=10)
-        elapsed = int((time.time() - t0) * 1000)
-        logger.info(
-            "api.post",
-            extra={"request_id": rid, "url": url, "status": r.status_code, "duration_ms": elapsed},
-        )
-        r.raise_for_status()
-        return r.json()
-    except Exception:
-        elapsed = int((time.time() - t0) * 1000)
-        logger.exception(
-            "api.post.error",
-            extra={"request_id": rid, "url": url, "duration_ms": elapsed, "json": (json or {})},
-        )
-        return None
+    return api_client.post(path, json=json, headers=headers, request_id=_request_id())
 
 
 @app.get("/")
@@ -270,8 +245,25 @@ def cards_list():
     has_artwork = request.args.get("has_artwork")
     has_video = request.args.get("has_video")
 
-    # Get filter options from API
-    filter_data = api_get("/v1/catalog/filters")
+    # Build API parameters with all filters and pagination
+    params = {
+        "q": q, "category": category, "color": color, "rarity": rarity, "card_set": card_set,
+        "mana_cost_min": mana_cost_min, "mana_cost_max": mana_cost_max,
+        "energy_cost_min": energy_cost_min, "energy_cost_max": energy_cost_max,
+        "attack_min": attack_min, "attack_max": attack_max,
+        "health_min": health_min, "health_max": health_max,
+        "has_artwork": has_artwork, "has_video": has_video,
+        "page": page, "page_size": page_size
+    }
+    
+    # Remove None values
+    params = {k: v for k, v in params.items() if v is not None and v != ""}
+    
+    # Filter options barely change; fetch them alongside the cards
+    filter_data, api_data = api_get_all(
+        ("/v1/catalog/filters", {"cache_ttl": CATALOG_FILTERS_TTL}),
+        ("/v1/catalog/cards", {"params": params}),
+    )
     if filter_data:
         categories = filter_data.get("categories", [])
         colors = filter_data.get("colors", [])
@@ -291,22 +283,6 @@ def cards_list():
             "health": {"min": 0, "max": 20}
         }
 
-    # Build API parameters with all filters and pagination
-    params = {
-        "q": q, "category": category, "color": color, "rarity": rarity, "card_set": card_set,
-        "mana_cost_min": mana_cost_min, "mana_cost_max": mana_cost_max,
-        "energy_cost_min": energy_cost_min, "energy_cost_max": energy_cost_max,
-        "attack_min": attack_min, "attack_max": attack_max,
-        "health_min": health_min, "health_max": health_max,
-        "has_artwork": has_artwork, "has_video": has_video,
-        "page": page, "page_size": page_size
-    }
-    
-    # Remove None values
-    params = {k: v for k, v in params.items() if v is not None and v != ""}
-    
-    # Get filtered cards from API
-    api_data = api_get("/v1/catalog/cards", params=params)
     items = api_data.get("items", []) if api_data else []
     
     # Extract pagination info
@@ -507,8 +483,9 @@ def shop_checkout():
 @app.get("/me")
 @require_auth
 def me_home():
-    profile = api_get("/v1/me", headers=_auth_headers()) or {"display_name": "Player", "elo_rating": 1000}
-    recent = api_get("/v1/me/matches", headers=_auth_headers()) or {"items": []}
+    profile, recent = api_get_all(("/v1/me", {"headers": _auth_headers()}), ("/v1/me/matches", {"headers": _auth_headers()}))
+    profile = profile or {"display_name": "Player", "elo_rating": 1000}
+    recent = recent or {"items": []}
     return render_template("me/index.html", profile=profile, recent=recent)
 
 
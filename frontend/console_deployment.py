@@ -78,6 +78,7 @@ NC='\\033[0m' # No Color
 # Configuration
 DEPLOYMENT_SERVER="https://deckport.ai"
 API_SERVER="https://deckport.ai"
+REALTIME_SERVER="https://ws.deckport.ai"  # Consoles wait here for remote commands
 CONSOLE_ID="{console_id}"
 GAME_VERSION="{game_version}"
 LOCATION_PROVIDED="{location}"
@@ -650,6 +651,7 @@ GAME_VERSION=$GAME_VERSION
 LOCATION=$LOCATION
 DEPLOYMENT_SERVER=$DEPLOYMENT_SERVER
 API_SERVER=$API_SERVER
+REALTIME_SERVER=$REALTIME_SERVER
 API_ENDPOINT=$API_SERVER/v1
 REGISTERED_AT=$(date -Iseconds)
 MAC_ADDRESS=$MAC_ADDRESS
@@ -658,13 +660,21 @@ HOSTNAME=$HOSTNAME
 REGISTRATION_STATUS=pending
 EOL
 
-# Try simple registration via curl (no Python dependencies)
+# Device key the console's agents sign in to the API with; kept across re-provisioning
+sudo mkdir -p /opt/deckport-console/keys
+if [[ ! -f /opt/deckport-console/keys/console_private.pem ]]; then
+    sudo openssl genrsa -out /opt/deckport-console/keys/console_private.pem 2048 2>/dev/null
+fi
+sudo chmod 600 /opt/deckport-console/keys/console_private.pem
+DEVICE_PUBLIC_KEY=$(sudo openssl rsa -in /opt/deckport-console/keys/console_private.pem -pubout 2>/dev/null | python3 -c 'import json, sys; print(json.dumps(sys.stdin.read()))')
+
+# Register the console and its device key via curl
 info "Attempting console registration..."
 REGISTRATION_RESPONSE=$(curl -s -X POST "https://api.deckport.ai/v1/auth/device/register" \\
     -H "Content-Type: application/json" \\
     -d "{{
         \\"device_uid\\": \\"$CONSOLE_ID\\",
-        \\"public_key\\": \\"placeholder-will-be-generated-later\\",
+        \\"public_key\\": $DEVICE_PUBLIC_KEY,
         \\"location\\": {{
             \\"name\\": \\"$LOCATION\\",
             \\"source\\": \\"manual\\"
@@ -796,6 +806,21 @@ sudo iwconfig wlp1s0 power on 2>/dev/null || true
 
 download_with_retry "$DEPLOYMENT_SERVER/deploy/assets/configs" "configs.tar.gz" "configuration files" || warning "Config download failed"
 
+# Game release manifests are verified against this key; it is pinned here once and never refreshed by game updates
+if ! download_with_retry "$DEPLOYMENT_SERVER/deploy/assets/game-release-key" "game-release.pub" "game release key"; then
+    warning "Game release key download failed - game updates will be refused until the console is re-provisioned"
+fi
+
+# Remote commands are verified against this key; pinned the same way
+if ! download_with_retry "$DEPLOYMENT_SERVER/deploy/assets/command-signing-key" "command-signing.pub" "command signing key"; then
+    warning "Command signing key download failed - remote commands will be refused until the console is re-provisioned"
+fi
+
+# Console agents run from a root-owned copy installed here; updates never download code
+for asset in command-agent:console_command_agent.py device-session:device_session.py game-updater:game_updater.py binary-delta:binary_delta.py log-streamer:console_log_streamer.py; do
+    download_with_retry "$DEPLOYMENT_SERVER/deploy/assets/${{asset%%:*}}" "${{asset#*:}}" "${{asset#*:}}" || warning "${{asset#*:}} download failed"
+done
+
 #################################################
 # PHASE 4: Install Components
 #################################################
@@ -823,6 +848,24 @@ sudo update-alternatives --set default.plymouth \\
 
 sudo update-initramfs -u
 
+# Pin the game release key outside /opt/deckport-console, which the kiosk user owns
+if [[ -f game-release.pub ]]; then
+    sudo install -D -o root -g root -m 0444 game-release.pub /etc/deckport-console/game-release.pub
+    success "Game release key pinned"
+fi
+if [[ -f command-signing.pub ]]; then
+    sudo install -D -o root -g root -m 0444 command-signing.pub /etc/deckport-console/command-signing.pub
+    success "Command signing key pinned"
+fi
+
+# Install the console agents root-owned, out of reach of the kiosk user they partly run as
+for agent_file in console_command_agent.py device_session.py game_updater.py binary_delta.py console_log_streamer.py; do
+    if [[ -f "$agent_file" ]]; then
+        sudo install -D -o root -g root -m 0644 "$agent_file" "/usr/lib/deckport-console/$agent_file"
+    fi
+done
+success "Console agents installed"
+
 # Install Godot game with enhanced error handling
 info "Installing Godot game..."
 deployment_log "🎮 CRITICAL: Starting Godot game installation"
@@ -1650,6 +1693,7 @@ GAME_VERSION=$GAME_VERSION
 LOCATION=$LOCATION
 DEPLOYMENT_SERVER=$DEPLOYMENT_SERVER
 API_ENDPOINT=$API_SERVER/v1
+REALTIME_SERVER=$REALTIME_SERVER
 REGISTERED_AT=$(date -Iseconds)
 MAC_ADDRESS=$MAC_ADDRESS
 IP_ADDRESS=$IP_ADDRESS
@@ -1866,11 +1910,10 @@ EOL
 
 chmod +x /opt/deckport-console/heartbeat.sh
 
-# Download log streaming system (optional - don't fail deployment if this fails)
+# Log streaming uses the root-owned copy installed in phase 4 (optional - don't fail deployment without it)
 info "Setting up log streaming..."
-if curl -s "$DEPLOYMENT_SERVER/deploy/assets/log-streamer" -o /opt/deckport-console/console_log_streamer.py; then
-    chmod +x /opt/deckport-console/console_log_streamer.py
-    success "Log streaming system downloaded"
+if [[ -f /usr/lib/deckport-console/console_log_streamer.py ]]; then
+    success "Log streaming system installed"
     
     # Test if Python requests is available for log streaming
     info "Testing Python dependencies..."
@@ -1893,7 +1936,7 @@ if curl -s "$DEPLOYMENT_SERVER/deploy/assets/log-streamer" -o /opt/deckport-cons
     # Add log streaming if available
     if [ "$LOG_STREAMING_ENABLED" = "true" ]; then
         CRONTAB_CONTENT="$CRONTAB_CONTENT
-*/5 * * * * /usr/bin/python3 /opt/deckport-console/console_log_streamer.py upload >/dev/null 2>&1 || true"
+*/5 * * * * /usr/bin/python3 /usr/lib/deckport-console/console_log_streamer.py upload >/dev/null 2>&1 || true"
     fi
     
     # Apply crontab safely
@@ -1905,7 +1948,7 @@ if curl -s "$DEPLOYMENT_SERVER/deploy/assets/log-streamer" -o /opt/deckport-cons
         echo "Cron setup failed, continuing deployment..." || true
     fi
 else
-    warning "Could not download log streaming system - continuing without it"
+    warning "Log streaming system not installed - continuing without it"
     # Set up basic heartbeat monitoring
     info "Setting up basic heartbeat monitoring..."
     BASIC_CRONTAB="# Deckport Console Basic Monitoring
@@ -2379,33 +2422,69 @@ def download_boot_theme():
 
 @deploy_bp.route('/console-command/<console_id>')
 def console_command(console_id):
-    """Simple endpoint for console to check for pending commands"""
+    """Bootstrap for consoles still polling here: install the command agent, which takes commands from the API queue"""
     from flask import jsonify
     
-    # Simple command system - console checks this endpoint
-    # For now, return update command if needed
-    return jsonify({{
-        "command": "update_game",
+    return jsonify({
+        "command": "install_command_agent",
         "script": """#!/bin/bash
-echo "🔄 UPDATING GAME WITH FIXED API URLS"
-sudo systemctl stop deckport-kiosk.service
-cd /tmp
-curl -L "https://deckport.ai/deploy/assets/godot-game/latest" -o game-update.tar.gz
-sudo tar -xzf game-update.tar.gz -C /opt/godot-game/
-sudo chmod +x /opt/godot-game/*.x86_64
-sudo chown -R kiosk:kiosk /opt/godot-game
-sudo systemctl start deckport-kiosk.service
-echo "✅ Game updated with fixed API URLs"
+if systemctl is-active --quiet deckport-command-agent.service; then
+    exit 0
+fi
+echo "📟 INSTALLING CONSOLE COMMAND AGENT"
+# The agent signs in with the device key registered at provisioning
+if [[ ! -f /opt/deckport-console/keys/console_private.pem ]]; then
+    echo "❌ No device key - re-provision this console"
+    exit 1
+fi
+# Consoles provisioned before the agents were installed root-owned get them once
+if [[ ! -f /usr/lib/deckport-console/console_command_agent.py ]]; then
+    for asset in command-agent:console_command_agent.py device-session:device_session.py game-updater:game_updater.py binary-delta:binary_delta.py log-streamer:console_log_streamer.py; do
+        sudo curl -fsSL "https://deckport.ai/deploy/assets/${asset%%:*}" -o "/tmp/${asset#*:}" || exit 1
+        sudo install -D -o root -g root -m 0644 "/tmp/${asset#*:}" "/usr/lib/deckport-console/${asset#*:}"
+        sudo rm -f "/tmp/${asset#*:}"
+    done
+fi
+# Consoles provisioned before the keys were pinned get them once; an existing pin is never replaced
+for key in game-release-key:game-release.pub command-signing-key:command-signing.pub; do
+    if [[ ! -f "/etc/deckport-console/${key#*:}" ]]; then
+        sudo curl -fsSL "https://deckport.ai/deploy/assets/${key%%:*}" -o "/tmp/${key#*:}" || exit 1
+        sudo install -D -o root -g root -m 0444 "/tmp/${key#*:}" "/etc/deckport-console/${key#*:}"
+        sudo rm -f "/tmp/${key#*:}"
+    fi
+done
+sudo tee /etc/systemd/system/deckport-command-agent.service > /dev/null << 'EOL'
+[Unit]
+Description=Deckport Console Command Agent
+After=network-online.target
+Wants=network-online.target
+
+[Service]
+User=kiosk
+ExecStart=/usr/bin/python3 /usr/lib/deckport-console/console_command_agent.py
+Restart=always
+RestartSec=10
+
+[Install]
+WantedBy=multi-user.target
+EOL
+sudo mkdir -p /opt/deckport-console/command-agent
+sudo chown -R kiosk:kiosk /opt/deckport-console/command-agent
+sudo systemctl daemon-reload
+sudo systemctl enable --now deckport-command-agent.service
+echo "✅ Command agent running"
 """,
-        "message": "Update game to fix API connectivity"
-    }})
+        "message": "Install the console command agent"
+    })
 
 @deploy_bp.route('/update-game')
 def update_game():
     """Game update script - updates game without full deployment"""
     from flask import Response
     
-    script = f"""#!/bin/bash
+    # The release server plans the download (binary deltas or the full build) and
+    # the updater verifies it against the signed manifest before swapping it in
+    script = """#!/bin/bash
 # Deckport Console Game Update Script
 # Updates only the game without full deployment
 
@@ -2419,47 +2498,28 @@ if [[ "$USER" != "kiosk" ]]; then
     exit 1
 fi
 
-# Stop the console service
-echo "⏸️ Stopping console service..."
-sudo systemctl stop deckport-kiosk.service
-
-# Backup current game
-echo "💾 Backing up current game..."
-sudo cp /opt/godot-game/game.x86_64 /opt/godot-game/game.x86_64.backup 2>/dev/null || true
-
-# Download new game
-echo "⬇️ Downloading latest game..."
-cd /tmp
-curl -L "https://deckport.ai/deploy/assets/godot-game/latest" -o game-update.tar.gz
-
-# Verify download
-if [[ ! -f "game-update.tar.gz" ]] || [[ ! -s "game-update.tar.gz" ]]; then
-    echo "❌ Game download failed"
+# The release key was pinned at provisioning; updates never fetch it, so a manifest
+# is only trusted if it was signed with that key. Rotating it means re-provisioning.
+if [[ ! -f /etc/deckport-console/game-release.pub ]]; then
+    echo "❌ No pinned game release key - re-provision this console"
     exit 1
 fi
 
-# Extract new game
-echo "📦 Installing new game..."
-sudo tar -xzf game-update.tar.gz -C /opt/godot-game/
-sudo chmod +x /opt/godot-game/*.x86_64
-sudo chown -R kiosk:kiosk /opt/godot-game
-
-# Verify installation
-if ls /opt/godot-game/*.x86_64 >/dev/null 2>&1; then
-    GAME_SIZE=$(stat -c%s /opt/godot-game/game.x86_64 2>/dev/null || echo "0")
-    echo "✅ Game updated successfully - size: $GAME_SIZE bytes"
-else
-    echo "❌ Game installation failed - restoring backup"
-    sudo cp /opt/godot-game/game.x86_64.backup /opt/godot-game/game.x86_64 2>/dev/null || true
+# The updater runs as root, so only the root-owned copy installed at provisioning is run;
+# its code is never downloaded here
+if [[ ! -f /usr/lib/deckport-console/game_updater.py ]]; then
+    echo "❌ No installed game updater - re-provision this console"
     exit 1
 fi
 
-# Clean up
-rm -f game-update.tar.gz
-
-# Restart console service
-echo "🚀 Starting console service..."
-sudo systemctl start deckport-kiosk.service
+# Download, verify and install the update; the updater restarts the console service
+echo "📦 Updating game..."
+if ! sudo /usr/bin/python3 /usr/lib/deckport-console/game_updater.py; then
+    echo "❌ Game update failed - current game left in place"
+    exit 1
+fi
+sudo chown -R kiosk:kiosk /opt/godot-game
+sudo chmod +x /opt/godot-game/*.x86_64 2>/dev/null || true
 
 echo "✅ Game update completed!"
 echo "🎮 Console should restart with new game version"
@@ -2468,7 +2528,7 @@ echo "🎮 Console should restart with new game version"
     return Response(
         script,
         mimetype='text/plain',
-        headers={{'Content-Disposition': 'attachment; filename=update-game.sh'}}
+        headers={'Content-Disposition': 'attachment; filename=update-game.sh'}
     )
 
 @deploy_bp.route('/assets/godot-test-game')
@@ -2531,6 +2591,66 @@ def download_log_streamer():
     return jsonify({"error": "Console log streamer script not found"}), 404
 
 
+@deploy_bp.route('/assets/device-session')
+def download_device_session():
+    """Download the device login helper the console agents share"""
+    from flask import send_file
+    script_path = '/home/jp/deckport.ai/console/kiosk/device_session.py'
+    if os.path.exists(script_path):
+        return send_file(script_path, as_attachment=True, download_name='device_session.py')
+    return jsonify({"error": "Device session script not found"}), 404
+
+
+@deploy_bp.route('/assets/game-updater')
+def download_game_updater():
+    """Download console game updater script"""
+    from flask import send_file
+    script_path = '/home/jp/deckport.ai/console/kiosk/game_updater.py'
+    if os.path.exists(script_path):
+        return send_file(script_path, as_attachment=True, download_name='game_updater.py')
+    return jsonify({"error": "Game updater script not found"}), 404
+
+
+@deploy_bp.route('/assets/binary-delta')
+def download_binary_delta():
+    """Download the delta library the game updater applies updates with"""
+    from flask import send_file
+    script_path = '/home/jp/deckport.ai/shared/utils/binary_delta.py'
+    if os.path.exists(script_path):
+        return send_file(script_path, as_attachment=True, download_name='binary_delta.py')
+    return jsonify({"error": "Binary delta library not found"}), 404
+
+
+@deploy_bp.route('/assets/game-release-key')
+def download_game_release_key():
+    """Download the public key game release manifests are signed with"""
+    from flask import send_file
+    key_path = os.environ.get('GAME_RELEASE_PUBLIC_KEY_FILE', '/home/jp/deckport.ai/static/deploy/game-release.pub')
+    if os.path.exists(key_path):
+        return send_file(key_path, as_attachment=True, download_name='game-release.pub')
+    return jsonify({"error": "Game release key not found"}), 404
+
+
+@deploy_bp.route('/assets/command-agent')
+def download_command_agent():
+    """Download console command agent script"""
+    from flask import send_file
+    script_path = '/home/jp/deckport.ai/console/kiosk/console_command_agent.py'
+    if os.path.exists(script_path):
+        return send_file(script_path, as_attachment=True, download_name='console_command_agent.py')
+    return jsonify({"error": "Console command agent script not found"}), 404
+
+
+@deploy_bp.route('/assets/command-signing-key')
+def download_command_signing_key():
+    """Download the public key console commands are signed with"""
+    from flask import send_file
+    key_path = os.environ.get('CONSOLE_COMMAND_PUBLIC_KEY_FILE', '/home/jp/deckport.ai/static/deploy/command-signing.pub')
+    if os.path.exists(key_path):
+        return send_file(key_path, as_attachment=True, download_name='command-signing.pub')
+    return jsonify({"error": "Command signing key not found"}), 404
+
+
 @deploy_bp.route('/assets/emergency-diagnostics')
 def download_emergency_diagnostics():
     """Download emergency diagnostics script"""
@@ -0,0 +1,211 @@
+"""
+API Client for page renders
+Keep-alive connection pool shared by all frontend workers' threads, a circuit
+breaker per upstream so a down API fails pages fast instead of stacking 5s
+timeouts, short-TTL caching for idempotent public GETs, and concurrent fetching
+of independent calls within one render. Every call is logged with the page's
+X-Request-ID and its own duration.
+"""
+
+import os
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlencode, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger("frontend")
+
+# Client configuration
+POOL_SIZE = int(os.environ.get("API_CLIENT_POOL_SIZE", "32"))
+PARALLEL_WORKERS = int(os.environ.get("API_CLIENT_PARALLEL_WORKERS", "16"))
+BREAKER_FAILURES = int(os.environ.get("API_CLIENT_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.environ.get("API_CLIENT_BREAKER_RESET_SECONDS", "10"))
+MAX_CACHE_ENTRIES = 1000
+
+# Breaker states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Opens after consecutive failures and rejects calls until the reset timeout,
+    then lets one trial call through (half-open) to decide whether to close again
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURES, reset_seconds: float = BREAKER_RESET_SECONDS,
+                 clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self.clock() - self.opened_at >= self.reset_seconds:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    logger.warning("api.circuit.open", extra={"failures": self.failures})
+                self.state = OPEN
+                self.opened_at = self.clock()
+
+
+class APIClient:
+    """Shared HTTP client for the frontend's calls to the Deckport API"""
+
+    def __init__(self, base_url: str, pool_size: int = POOL_SIZE, parallel_workers: int = PARALLEL_WORKERS,
+                 session: Optional[requests.Session] = None, clock=time.monotonic):
+        self.base_url = base_url.rstrip("/")
+        self.clock = clock
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=parallel_workers, thread_name_prefix="api-client")
+
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._cache: Dict[str, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "cache_hits": 0, "rejected": 0, "errors": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def breaker(self, url: str) -> CircuitBreaker:
+        upstream = urlsplit(url).netloc
+        with self._lock:
+            if upstream not in self._breakers:
+                self._breakers[upstream] = CircuitBreaker(clock=self.clock)
+            return self._breakers[upstream]
+
+    def _cached(self, key: str):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry and entry[0] > self.clock():
+                self.stats["cache_hits"] += 1
+                return entry[1]
+        return None
+
+    def _store(self, key: str, ttl: float, value):
+        with self._lock:
+            if len(self._cache) >= MAX_CACHE_ENTRIES:
+                now = self.clock()
+                for stale in [k for k, (expires, _) in self._cache.items() if expires <= now]:
+                    del self._cache[stale]
+                if len(self._cache) >= MAX_CACHE_ENTRIES:
+                    self._cache.clear()
+            self._cache[key] = (self.clock() + ttl, value)
+
+    def invalidate(self, path_prefix: str = ""):
+        with self._lock:
+            for key in [k for k in self._cache if k.startswith(path_prefix)]:
+                del self._cache[key]
+
+    def request(self, method: str, path: str, params: Optional[dict] = None, json: Optional[dict] = None,
+                headers: Optional[dict] = None, request_id: Optional[str] = None, timeout: float = 5,
+                cache_ttl: Optional[float] = None):
+        """
+        One API call; returns the decoded JSON body, or None on any failure
+
+        cache_ttl caches the body of a GET for that many seconds. Only use it for
+        public responses: calls carrying an Authorization header are never cached.
+        """
+        rid = request_id or str(uuid.uuid4())
+        hdrs = {"X-Request-ID": rid, **(headers or {})}
+        url = f"{self.base_url}{path}"
+        event = f"api.{method.lower()}"
+        cache_key = None
+        if cache_ttl and method == "GET" and "Authorization" not in hdrs:
+            cache_key = f"{path}?{urlencode(sorted((params or {}).items()))}"
+            cached = self._cached(cache_key)
+            if cached is not None:
+                logger.info(event, extra={"request_id": rid, "url": url, "cache": "hit", "duration_ms": 0})
+                return cached
+
+        breaker = self.breaker(url)
+        if not breaker.allow():
+            self._count("rejected")
+            logger.warning(f"{event}.circuit_open", extra={"request_id": rid, "url": url})
+            return None
+
+        t0 = time.time()
+        self._count("calls")
+        r = None
+        try:
+            r = self.session.request(method, url, params=params, json=json, headers=hdrs, timeout=timeout)
+            # Only an unreachable or failing upstream trips the breaker; 4xx are the caller's problem
+            if r.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            elapsed = int((time.time() - t0) * 1000)
+            logger.info(event, extra={"request_id": rid, "url": url, "status": r.status_code, "duration_ms": elapsed})
+            r.raise_for_status()
+            data = r.json()
+        except Exception:
+            if r is None:  # No response at all: refused, timed out, reset
+                breaker.record_failure()
+            elapsed = int((time.time() - t0) * 1000)
+            self._count("errors")
+            logger.exception(
+                f"{event}.error",
+                extra={"request_id": rid, "url": url, "duration_ms": elapsed, "params": (params or {})},
+            )
+            return None
+
+        if cache_key is not None:
+            self._store(cache_key, cache_ttl, data)
+        return data
+
+    def get(self, path: str, params: Optional[dict] = None, headers: Optional[dict] = None, **kwargs):
+        return self.request("GET", path, params=params, headers=headers, **kwargs)
+
+    def post(self, path: str, json: Optional[dict] = None, headers: Optional[dict] = None, timeout: float = 10,
+             **kwargs):
+        return self.request("POST", path, json=json or {}, headers=headers, timeout=timeout, **kwargs)
+
+    def get_all(self, calls: Sequence[Tuple[str, dict]], request_id: Optional[str] = None) -> List[Any]:
+        """
+        Run independent GETs concurrently; results come back in call order
+
+        Each call is (path, kwargs for get()). The first call runs on the caller's
+        thread, so a single call costs no thread hop.
+        """
+        rid = request_id or str(uuid.uuid4())
+        futures = [self._executor.submit(self.get, path, request_id=rid, **kwargs) for path, kwargs in calls[1:]]
+        results = [self.get(calls[0][0], request_id=rid, **calls[0][1])] if calls else []
+        return results + [future.result() for future in futures]
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
@@ -0,0 +1,29 @@
+-- Migration: Add admin alert state table
+-- Description: Alert engine state (firing / acknowledged / resolved) for the admin panel
+
+CREATE TABLE IF NOT EXISTS admin_alerts (
+    id SERIAL PRIMARY KEY,
+    dedup_key VARCHAR(200) NOT NULL,
+    rule_id VARCHAR(64) NOT NULL,
+    category VARCHAR(32) NOT NULL,
+    severity VARCHAR(16) NOT NULL,
+    title VARCHAR(200) NOT NULL,
+    message TEXT NOT NULL,
+    data JSONB,
+    state VARCHAR(16) NOT NULL DEFAULT 'firing',
+    fire_count INTEGER NOT NULL DEFAULT 1,
+    flap_count INTEGER NOT NULL DEFAULT 0,
+    first_fired_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    last_fired_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    clear_since TIMESTAMPTZ,
+    acknowledged_at TIMESTAMPTZ,
+    acknowledged_by_admin_id INTEGER REFERENCES admins(id) ON DELETE SET NULL,
+    resolved_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Only one open alert per dedup key; resolved rows are kept as history
+CREATE UNIQUE INDEX IF NOT EXISTS uq_admin_alerts_open_dedup_key ON admin_alerts(dedup_key) WHERE state <> 'resolved';
+CREATE INDEX IF NOT EXISTS ix_admin_alerts_rule_state ON admin_alerts(rule_id, state);
+CREATE INDEX IF NOT EXISTS ix_admin_alerts_state_severity ON admin_alerts(state, severity);
+CREATE INDEX IF NOT EXISTS ix_admin_alerts_dedup_resolved ON admin_alerts(dedup_key, resolved_at);
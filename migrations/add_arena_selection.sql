@@ -0,0 +1,10 @@
+-- Migration: Add arena selection settings
+-- Description: Rarity, weight, game modes and ELO band used to build the in-memory
+-- alias tables arenas are drawn from, and a switch to take an arena out of rotation
+
+ALTER TABLE arenas ADD COLUMN IF NOT EXISTS is_active BOOLEAN NOT NULL DEFAULT TRUE;
+ALTER TABLE arenas ADD COLUMN IF NOT EXISTS rarity VARCHAR(20) NOT NULL DEFAULT 'common';
+ALTER TABLE arenas ADD COLUMN IF NOT EXISTS selection_weight DOUBLE PRECISION NOT NULL DEFAULT 1.0;
+ALTER TABLE arenas ADD COLUMN IF NOT EXISTS game_modes JSONB;
+ALTER TABLE arenas ADD COLUMN IF NOT EXISTS min_elo INTEGER;
+ALTER TABLE arenas ADD COLUMN IF NOT EXISTS max_elo INTEGER;
@@ -0,0 +1,9 @@
+-- Migration: Add campaign delivery state to email_logs
+-- Description: email_logs rows double as the per-recipient delivery queue of the
+-- campaign delivery workers: one row per campaign and player, a retry / lease time
+-- and an index for the workers' due-row claims
+
+ALTER TABLE email_logs ADD COLUMN IF NOT EXISTS next_attempt_at TIMESTAMPTZ;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_email_logs_campaign_player ON email_logs(campaign_id, player_id);
+CREATE INDEX IF NOT EXISTS ix_email_logs_due ON email_logs(status, next_attempt_at);
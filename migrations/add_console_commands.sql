@@ -0,0 +1,30 @@
+-- Migration: Add console command queue
+-- Description: Durable per-console queue of remote management commands with
+-- delivery, acknowledgement and result state; fleet and group commands share a batch_id
+
+CREATE TABLE IF NOT EXISTS console_commands (
+    id SERIAL PRIMARY KEY,
+    console_id INTEGER NOT NULL REFERENCES consoles(id) ON DELETE CASCADE,
+    batch_id VARCHAR(36) NOT NULL,
+    command_type VARCHAR(50) NOT NULL,
+    payload JSONB NOT NULL DEFAULT '{}',
+    timeout_seconds INTEGER NOT NULL DEFAULT 300,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    lease_expires_at TIMESTAMPTZ,
+    deadline_at TIMESTAMPTZ,
+    expires_at TIMESTAMPTZ NOT NULL,
+    exit_code INTEGER,
+    result JSONB,
+    output TEXT,
+    created_by_admin_id INTEGER,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    delivered_at TIMESTAMPTZ,
+    acked_at TIMESTAMPTZ,
+    completed_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS ix_console_commands_console_status ON console_commands(console_id, status, id);
+CREATE INDEX IF NOT EXISTS ix_console_commands_status_lease ON console_commands(status, lease_expires_at);
+CREATE INDEX IF NOT EXISTS ix_console_commands_batch ON console_commands(batch_id);
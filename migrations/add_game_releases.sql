@@ -0,0 +1,29 @@
+-- Migration: Add game release rollouts
+-- Description: Staged percentage rollouts of published game builds, and the build
+-- each console reports running, so crash reports can be attributed to a version
+
+CREATE TABLE IF NOT EXISTS game_rollouts (
+    id SERIAL PRIMARY KEY,
+    version VARCHAR(64) NOT NULL,
+    previous_version VARCHAR(64),
+    percent DOUBLE PRECISION NOT NULL DEFAULT 0,
+    status VARCHAR(20) NOT NULL DEFAULT 'active',
+    crash_rate_threshold DOUBLE PRECISION NOT NULL DEFAULT 0.05,
+    min_consoles INTEGER NOT NULL DEFAULT 5,
+    halt_reason TEXT,
+    started_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    halted_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS ix_game_rollouts_status ON game_rollouts(status);
+
+CREATE TABLE IF NOT EXISTS console_game_installs (
+    console_id INTEGER PRIMARY KEY REFERENCES consoles(id) ON DELETE CASCADE,
+    version VARCHAR(64) NOT NULL,
+    previous_version VARCHAR(64),
+    installed_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    last_check_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS ix_console_game_installs_version ON console_game_installs(version);
@@ -0,0 +1,20 @@
+-- Migration: Add inventory reservations
+-- Description: Checkout takes stock into time-boxed reservations instead of holding
+-- product row locks while payment is confirmed; paid checkouts convert them, failed
+-- or abandoned ones give the stock back
+
+CREATE TABLE IF NOT EXISTS shop_inventory_reservations (
+    id SERIAL PRIMARY KEY,
+    product_id INTEGER NOT NULL REFERENCES shop_products(id) ON DELETE CASCADE,
+    checkout_session_id VARCHAR(64) NOT NULL,
+    order_id INTEGER REFERENCES shop_orders(id) ON DELETE SET NULL,
+    quantity INTEGER NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'active',
+    expires_at TIMESTAMPTZ NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS ix_shop_inventory_reservations_checkout ON shop_inventory_reservations(checkout_session_id);
+CREATE INDEX IF NOT EXISTS ix_shop_inventory_reservations_status_expires ON shop_inventory_reservations(status, expires_at);
+CREATE INDEX IF NOT EXISTS ix_shop_inventory_reservations_product ON shop_inventory_reservations(product_id);
@@ -0,0 +1,23 @@
+-- Migration: Add leaderboards
+-- Description: Player regions for regional leaderboards and the venues (consoles) each player
+-- has rated matches at per season, for venue leaderboards
+
+ALTER TABLE players ADD COLUMN IF NOT EXISTS region VARCHAR(50);
+
+CREATE TABLE IF NOT EXISTS season_venue_players (
+    id SERIAL PRIMARY KEY,
+    season_id INTEGER NOT NULL REFERENCES rating_seasons(id) ON DELETE CASCADE,
+    console_id INTEGER NOT NULL REFERENCES consoles(id) ON DELETE CASCADE,
+    player_id INTEGER NOT NULL REFERENCES players(id) ON DELETE CASCADE,
+    first_match_id INTEGER NOT NULL,
+    CONSTRAINT uq_season_venue_players UNIQUE (season_id, console_id, player_id)
+);
+
+-- Backfill venues from the matches already rated
+INSERT INTO season_venue_players (season_id, console_id, player_id, first_match_id)
+SELECT h.season_id, m.console_id, h.player_id, MIN(h.match_id)
+FROM rating_history h
+JOIN matches m ON m.id = h.match_id
+WHERE m.console_id IS NOT NULL
+GROUP BY h.season_id, m.console_id, h.player_id
+ON CONFLICT DO NOTHING;
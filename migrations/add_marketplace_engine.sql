@@ -0,0 +1,31 @@
+-- Migration: Add marketplace engine tables
+-- Description: Buy orders for the per-template order books, the wallet transaction type
+-- for sale proceeds and indexes for the scheduler's expiry scans
+
+DO $$ BEGIN
+    CREATE TYPE buyorderstatus AS ENUM ('OPEN', 'FILLED', 'CANCELLED');
+EXCEPTION
+    WHEN duplicate_object THEN null;
+END $$;
+
+-- Ledger entries store the value as text; the enum type is shared with wallet_transactions
+ALTER TYPE transactiontype ADD VALUE IF NOT EXISTS 'SALE';
+
+CREATE TABLE IF NOT EXISTS marketplace_buy_orders (
+    id SERIAL PRIMARY KEY,
+    buyer_player_id INTEGER NOT NULL REFERENCES players(id) ON DELETE CASCADE,
+    card_template_id INTEGER NOT NULL REFERENCES card_catalog(id),
+    max_price NUMERIC(10, 2) NOT NULL CHECK (max_price > 0),
+    status buyorderstatus NOT NULL DEFAULT 'OPEN',
+    listing_id INTEGER REFERENCES marketplace_listings(id) ON DELETE SET NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    filled_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS ix_marketplace_buy_orders_buyer ON marketplace_buy_orders(buyer_player_id);
+CREATE INDEX IF NOT EXISTS ix_marketplace_buy_orders_template_status ON marketplace_buy_orders(card_template_id, status);
+
+-- The scheduler only ever scans open auctions and listings
+CREATE INDEX IF NOT EXISTS ix_card_auctions_active_ends ON card_auctions(ends_at) WHERE status = 'ACTIVE';
+CREATE INDEX IF NOT EXISTS ix_marketplace_listings_active_expires ON marketplace_listings(expires_at)
+    WHERE status = 'ACTIVE' AND expires_at IS NOT NULL;
@@ -0,0 +1,49 @@
+-- Migration: Add season ratings
+-- Description: Per-season Elo ratings and per-match rating history, filled by the rating
+-- worker from finished matches; matches.rated_at marks the matches it has taken
+
+CREATE TABLE IF NOT EXISTS rating_seasons (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL UNIQUE,
+    starts_at TIMESTAMPTZ NOT NULL UNIQUE,
+    recomputed_at TIMESTAMPTZ,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS player_ratings (
+    id SERIAL PRIMARY KEY,
+    season_id INTEGER NOT NULL REFERENCES rating_seasons(id) ON DELETE CASCADE,
+    player_id INTEGER NOT NULL REFERENCES players(id) ON DELETE CASCADE,
+    rating DOUBLE PRECISION NOT NULL,
+    peak_rating DOUBLE PRECISION NOT NULL,
+    games INTEGER NOT NULL DEFAULT 0,
+    wins INTEGER NOT NULL DEFAULT 0,
+    losses INTEGER NOT NULL DEFAULT 0,
+    draws INTEGER NOT NULL DEFAULT 0,
+    last_match_id INTEGER,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    CONSTRAINT uq_player_ratings_season_player UNIQUE (season_id, player_id)
+);
+
+CREATE INDEX IF NOT EXISTS ix_player_ratings_season_rating ON player_ratings(season_id, rating);
+
+CREATE TABLE IF NOT EXISTS rating_history (
+    id SERIAL PRIMARY KEY,
+    season_id INTEGER NOT NULL REFERENCES rating_seasons(id) ON DELETE CASCADE,
+    player_id INTEGER NOT NULL REFERENCES players(id) ON DELETE CASCADE,
+    match_id INTEGER NOT NULL REFERENCES matches(id) ON DELETE CASCADE,
+    rating_before DOUBLE PRECISION NOT NULL,
+    rating_after DOUBLE PRECISION NOT NULL,
+    k_factor DOUBLE PRECISION NOT NULL,
+    games INTEGER NOT NULL,
+    played_at TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS ix_rating_history_season_player ON rating_history(season_id, player_id, id);
+CREATE INDEX IF NOT EXISTS ix_rating_history_match ON rating_history(match_id);
+
+ALTER TABLE matches ADD COLUMN IF NOT EXISTS rated_at TIMESTAMPTZ;
+CREATE INDEX IF NOT EXISTS ix_matches_rating_queue ON matches(ended_at, id) WHERE rated_at IS NULL;
+
+-- The first season covers all match history
+INSERT INTO rating_seasons (name, starts_at) VALUES ('Season 1', '1970-01-01T00:00:00Z') ON CONFLICT DO NOTHING;
@@ -0,0 +1,23 @@
+-- Migration: Add Stripe webhook inbox
+-- Description: Verified Stripe events stored by event id before processing, so retried
+-- deliveries are applied once; the worker looks orders up by payment intent
+
+CREATE TABLE IF NOT EXISTS stripe_webhook_events (
+    id SERIAL PRIMARY KEY,
+    event_id VARCHAR(255) NOT NULL UNIQUE,
+    event_type VARCHAR(100) NOT NULL,
+    object_id VARCHAR(255) NOT NULL,
+    event_created TIMESTAMPTZ NOT NULL,
+    payload TEXT NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    last_error TEXT,
+    received_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    processed_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS ix_stripe_webhook_events_due ON stripe_webhook_events(status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS ix_stripe_webhook_events_object ON stripe_webhook_events(object_id, event_created);
+
+CREATE INDEX IF NOT EXISTS ix_shop_orders_payment_reference ON shop_orders(payment_reference);
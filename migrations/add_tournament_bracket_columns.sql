@@ -0,0 +1,8 @@
+-- Tournament Bracket Engine Migration
+-- Adds the bracket side to tournament matches (double elimination) and
+-- indexes used when advancing rounds and mapping finished matches
+
+ALTER TABLE tournament_matches ADD COLUMN IF NOT EXISTS bracket VARCHAR(16) DEFAULT 'main' NOT NULL;
+
+CREATE INDEX IF NOT EXISTS ix_tournament_matches_tournament_round ON tournament_matches(tournament_id, round_number);
+CREATE INDEX IF NOT EXISTS ix_tournament_matches_match ON tournament_matches(match_id);
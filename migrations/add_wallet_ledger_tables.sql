@@ -0,0 +1,79 @@
+-- Migration: Add wallet ledger tables
+-- Description: Double-entry postings behind player wallet balances, running daily totals
+-- and the wallet columns the wallet routes expect
+
+ALTER TABLE player_wallets ADD COLUMN IF NOT EXISTS currency VARCHAR(3) NOT NULL DEFAULT 'USD';
+ALTER TABLE player_wallets ADD COLUMN IF NOT EXISTS is_active BOOLEAN NOT NULL DEFAULT TRUE;
+ALTER TABLE player_wallets ADD COLUMN IF NOT EXISTS daily_deposit_limit NUMERIC(10, 2);
+ALTER TABLE player_wallets ADD COLUMN IF NOT EXISTS daily_withdrawal_limit NUMERIC(10, 2);
+
+CREATE TABLE IF NOT EXISTS wallet_ledger_entries (
+    id SERIAL PRIMARY KEY,
+    idempotency_key VARCHAR(128) UNIQUE,
+    entry_type VARCHAR(32) NOT NULL,
+    description VARCHAR(500) NOT NULL,
+    tournament_id INTEGER REFERENCES tournaments(id) ON DELETE SET NULL,
+    reference_id VARCHAR(100),
+    related_entry_id INTEGER REFERENCES wallet_ledger_entries(id),
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS ix_wallet_ledger_entries_type ON wallet_ledger_entries(entry_type);
+CREATE INDEX IF NOT EXISTS ix_wallet_ledger_entries_related ON wallet_ledger_entries(related_entry_id);
+
+CREATE TABLE IF NOT EXISTS wallet_ledger_postings (
+    id SERIAL PRIMARY KEY,
+    entry_id INTEGER NOT NULL REFERENCES wallet_ledger_entries(id),
+    account VARCHAR(64) NOT NULL,
+    wallet_id INTEGER REFERENCES player_wallets(id),
+    amount NUMERIC(12, 2) NOT NULL,
+    balance_after NUMERIC(12, 2),
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS ix_wallet_ledger_postings_entry ON wallet_ledger_postings(entry_id);
+CREATE INDEX IF NOT EXISTS ix_wallet_ledger_postings_wallet ON wallet_ledger_postings(wallet_id, id);
+CREATE INDEX IF NOT EXISTS ix_wallet_ledger_postings_account ON wallet_ledger_postings(account);
+
+CREATE TABLE IF NOT EXISTS wallet_daily_totals (
+    wallet_id INTEGER NOT NULL REFERENCES player_wallets(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    entry_type VARCHAR(32) NOT NULL,
+    total NUMERIC(12, 2) NOT NULL DEFAULT 0,
+    entry_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (wallet_id, day, entry_type)
+);
+
+-- Ledger rows are append-only
+CREATE OR REPLACE FUNCTION wallet_ledger_immutable() RETURNS trigger AS $$
+BEGIN
+    RAISE EXCEPTION 'wallet ledger rows are immutable';
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS wallet_ledger_entries_immutable ON wallet_ledger_entries;
+CREATE TRIGGER wallet_ledger_entries_immutable BEFORE UPDATE OR DELETE ON wallet_ledger_entries
+    FOR EACH ROW EXECUTE FUNCTION wallet_ledger_immutable();
+
+DROP TRIGGER IF EXISTS wallet_ledger_postings_immutable ON wallet_ledger_postings;
+CREATE TRIGGER wallet_ledger_postings_immutable BEFORE UPDATE OR DELETE ON wallet_ledger_postings
+    FOR EACH ROW EXECUTE FUNCTION wallet_ledger_immutable();
+
+-- Opening balances so existing wallets reconcile against their postings
+INSERT INTO wallet_ledger_entries (idempotency_key, entry_type, description)
+SELECT 'opening:' || w.id, 'deposit', 'Opening balance'
+FROM player_wallets w
+WHERE w.balance <> 0
+ON CONFLICT (idempotency_key) DO NOTHING;
+
+INSERT INTO wallet_ledger_postings (entry_id, account, wallet_id, amount, balance_after)
+SELECT e.id, 'wallet:' || w.id, w.id, w.balance, w.balance
+FROM player_wallets w
+JOIN wallet_ledger_entries e ON e.idempotency_key = 'opening:' || w.id
+WHERE NOT EXISTS (SELECT 1 FROM wallet_ledger_postings p WHERE p.entry_id = e.id);
+
+INSERT INTO wallet_ledger_postings (entry_id, account, amount)
+SELECT e.id, 'equity:opening', -w.balance
+FROM player_wallets w
+JOIN wallet_ledger_entries e ON e.idempotency_key = 'opening:' || w.id
+WHERE NOT EXISTS (SELECT 1 FROM wallet_ledger_postings p WHERE p.entry_id = e.id AND p.wallet_id IS NULL);
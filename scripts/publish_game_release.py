@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Publish a Godot game build to the release store
+Stores the build by content hash, computes the delta from the previous release,
+and re-signs the manifest consoles update from. Rolling the version out is a
+separate step in the admin panel.
+
+Usage: python scripts/publish_game_release.py <version> <godot-game.tar.gz> [notes]
+"""
+
+import os
+import sys
+import logging
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from shared.services.game_releases import ReleaseError, get_release_store
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    if len(sys.argv) < 3:
+        print(__doc__.strip().splitlines()[-1])
+        sys.exit(2)
+    version, tarball = sys.argv[1], sys.argv[2]
+    notes = sys.argv[3] if len(sys.argv) > 3 else None
+
+    with open(tarball, 'rb') as f:
+        data = f.read()
+    try:
+        release = get_release_store().publish(version, data, notes)
+    except ReleaseError as e:
+        logger.error(str(e))
+        sys.exit(1)
+
+    logger.info(f"Published {version}: {release['size']} bytes, {len(release['files'])} files, sha256 {release['sha256']}")
+
+
+if __name__ == '__main__':
+    main()
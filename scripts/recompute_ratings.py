@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Recompute a rating season from match history
+Rebuilds the season's player ratings and rating history in match order; run it
+after changing the K-factor schedule or correcting match results
+
+Usage: python scripts/recompute_ratings.py <season name or id>
+"""
+
+import os
+import sys
+import logging
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from shared.database.connection import SessionLocal
+from shared.models.ratings import RatingSeason
+from shared.services.ratings import RatingProcessor
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    if len(sys.argv) != 2:
+        print(__doc__.strip().splitlines()[-1])
+        sys.exit(2)
+    season_ref = sys.argv[1]
+
+    with SessionLocal() as session:
+        season = session.query(RatingSeason).filter(RatingSeason.name == season_ref).first()
+        if season is None and season_ref.isdigit():
+            season = session.get(RatingSeason, int(season_ref))
+    if season is None:
+        logger.error(f"No rating season {season_ref!r}")
+        sys.exit(1)
+
+    stats = RatingProcessor(SessionLocal).recompute_season(season.id)
+    logger.info(f"Season {season.name}: {stats['rated']} of {stats['matches']} matches rated "
+                f"for {stats['players']} players")
+
+
+if __name__ == '__main__':
+    main()
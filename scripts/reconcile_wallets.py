@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Reconcile player wallet balances against the wallet ledger
+Meant to run from cron; exits non-zero when a mismatch or unbalanced entry is found
+
+Usage: python scripts/reconcile_wallets.py [--repair]
+"""
+
+import os
+import sys
+import logging
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from shared.database.connection import SessionLocal
+from shared.services.wallet_ledger import reconcile
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    repair = '--repair' in sys.argv[1:]
+
+    with SessionLocal() as session:
+        report = reconcile(session, repair=repair)
+        session.commit()
+
+    logger.info(f"Checked {report['wallets_checked']} wallets")
+    for mismatch in report['mismatches']:
+        logger.warning(f"Wallet {mismatch['wallet_id']}: balance {mismatch['balance']:.2f}, "
+                       f"postings {mismatch['posted']:.2f}" + (" (repaired)" if repair else ""))
+    for entry_id in report['unbalanced_entries']:
+        logger.error(f"Ledger entry {entry_id} does not balance")
+
+    if report['unbalanced_entries'] or (report['mismatches'] and not repair):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
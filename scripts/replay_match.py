@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Replay a match from its event log
+Rebuilds the match from its initial state and every logged action, prints the
+resulting state, and for a finished match checks it against the state recorded
+when the match ended.
+
+Usage: python scripts/replay_match.py <match_id> [--until SEQ] [--log-dir DIR]
+"""
+
+import os
+import sys
+import json
+import logging
+import argparse
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'services', 'api'))
+
+from game_engine.match_log import MatchLog, MatchLogError
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a match from its event log")
+    parser.add_argument('match_id')
+    parser.add_argument('--until', type=int, help="stop after this sequence number")
+    parser.add_argument('--log-dir', help="match log directory (default: MATCH_LOG_DIR)")
+    args = parser.parse_args()
+
+    match_log = MatchLog(args.log_dir)
+    try:
+        game_state, result = match_log.replay(args.match_id, until_seq=args.until)
+    except (MatchLogError, ValueError) as e:
+        logger.error(f"Replay of match {args.match_id} failed: {e}")
+        sys.exit(1)
+
+    replayed = json.loads(json.dumps(game_state.snapshot()))
+    print(json.dumps(replayed, indent=2))
+    logger.info(f"Replayed match {args.match_id} to sequence {game_state.sequence}"
+                + (f", result {result}" if result else ""))
+
+    recorded = match_log.final_snapshot(args.match_id)
+    if args.until is None and recorded is not None:
+        if recorded != replayed:
+            logger.error("Replayed state differs from the state recorded at the end of the match")
+            sys.exit(1)
+        logger.info("Replayed state matches the recorded end state")
+
+
+if __name__ == '__main__':
+    main()
@@ -28,6 +28,8 @@ from routes.admin_dashboard_stats import admin_dashboard_stats_bp
 from routes.admin_tournaments import admin_tournaments_bp
 from routes.admin_security_monitoring import admin_security_bp
 from routes.player_wallet import player_wallet_bp
+from routes.admin_wallets import admin_wallets_bp
+from routes.marketplace import marketplace_bp
 from routes.gameplay import gameplay_bp
 from routes.card_pack import card_pack_bp
 from routes.shop_admin import shop_admin_bp
@@ -43,6 +45,11 @@ from routes.console_logs_streaming import console_logs_streaming_bp
 from routes.debug_upload import debug_upload_bp
 from routes.admin_card_sets import admin_card_sets_bp
 from routes.admin_cards_stats import admin_cards_stats_bp
+from routes.game_updates import game_updates_bp
+from routes.admin_game_rollouts import admin_game_rollouts_bp
+from routes.console_commands import console_commands_bp
+from routes.admin_console_commands import admin_console_commands_bp
+from routes.leaderboards import leaderboards_bp
 
 # Load environment variables
 load_dotenv()
@@ -74,6 +81,8 @@ app.register_blueprint(admin_dashboard_stats_bp)
 app.register_blueprint(admin_tournaments_bp)
 app.register_blueprint(admin_security_bp)
 app.register_blueprint(player_wallet_bp)
+app.register_blueprint(admin_wallets_bp)
+app.register_blueprint(marketplace_bp)
 app.register_blueprint(gameplay_bp)
 app.register_blueprint(card_pack_bp)
 app.register_blueprint(shop_admin_bp)
@@ -89,6 +98,11 @@ app.register_blueprint(console_logs_streaming_bp)
 app.register_blueprint(debug_upload_bp)
 app.register_blueprint(admin_card_sets_bp)
 app.register_blueprint(admin_cards_stats_bp)
+app.register_blueprint(game_updates_bp)
+app.register_blueprint(admin_game_rollouts_bp)
+app.register_blueprint(console_commands_bp)
+app.register_blueprint(admin_console_commands_bp)
+app.register_blueprint(leaderboards_bp)
 
 # Legacy endpoints for backward compatibility
 @app.get("/v1/hello")
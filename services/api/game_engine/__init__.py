@@ -5,8 +5,11 @@ Core gameplay logic and rules engine
 
 from .match_manager import MatchManager
 from .game_state import GameState
+from .match_log import MatchLog, MatchLogError
 
 __all__ = [
     'MatchManager',
-    'GameState'
+    'GameState',
+    'MatchLog',
+    'MatchLogError'
 ]
@@ -589,13 +589,12 @@ class ArenaEffectsEngine:
                         effect_result["targets_affected"].append(creature.get("id", "unknown"))
         
         elif effect_type == "gain_random_mana":
-            # Mana Storm effect
-            import random
+            # Mana Storm effect, drawn from the match's seeded random stream
             colors = [color.value for color in ManaColor if color != ManaColor.AETHER]
             
             for player_state in game_state.players.values():
                 for _ in range(amount):
-                    random_color = random.choice(colors)
+                    random_color = game_state.random.choice(colors)
                     player_state.mana[random_color] = player_state.mana.get(random_color, 0) + 1
                     effect_result["targets_affected"].append(f"player_{player_state.team}")
         
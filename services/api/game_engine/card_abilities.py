@@ -37,12 +37,12 @@ class DamageType(str, Enum):
 
 class StatusEffect:
     """Represents a temporary status effect on a target"""
-    def __init__(self, effect_type: str, amount: int, duration: int, source: str):
+    def __init__(self, effect_type: str, amount: int, duration: int, source: str, applied_at: datetime = None):
         self.effect_type = effect_type
         self.amount = amount
         self.duration = duration
         self.source = source
-        self.applied_at = datetime.now(timezone.utc)
+        self.applied_at = applied_at or datetime.now(timezone.utc)
     
     def to_dict(self) -> Dict:
         return {
@@ -52,6 +52,11 @@ class StatusEffect:
             "source": self.source,
             "applied_at": self.applied_at.isoformat()
         }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'StatusEffect':
+        return cls(data["effect_type"], data["amount"], data["duration"], data["source"],
+                   datetime.fromisoformat(data["applied_at"]))
 
 class AbilityResult:
     """Result of an ability execution"""
@@ -82,7 +87,8 @@ class AbilityResult:
 class CardAbilitiesEngine:
     """Production-ready card abilities execution engine"""
     
-    def __init__(self):
+    def __init__(self, clock=None):
+        self.clock = clock or (lambda: datetime.now(timezone.utc))
         self.ability_catalog = self._load_ability_catalog()
         self.arena_bonuses = {}
         self.active_effects = {}  # target_id -> [StatusEffect]
@@ -808,6 +814,7 @@ class CardAbilitiesEngine:
     def _apply_status_effect(self, target: Dict, effect: StatusEffect, result: AbilityResult):
         """Apply a status effect to a target"""
         target_id = target.get("id", "unknown")
+        effect.applied_at = self.clock()
         
         if target_id not in self.active_effects:
             self.active_effects[target_id] = []
@@ -820,7 +827,7 @@ class CardAbilitiesEngine:
         """Process all status effects at the start of a turn"""
         effects_processed = []
         
-        for target_id, effects in self.active_effects.items():
+        for target_id, effects in list(self.active_effects.items()):
             remaining_effects = []
             
             for effect in effects:
@@ -2,10 +2,15 @@
 Game State Management
 Handles the complete state of a match including players, cards, and game rules
 Enhanced with card abilities and arena effects integration
+
+Every accepted action runs at a pinned time with a random stream derived from
+the match seed, and is reported to the event sink, so a match can be rebuilt
+exactly from a snapshot plus the actions that followed it (see match_log).
 """
 
 import json
-from typing import Dict, List, Optional, Any
+import random
+from typing import Callable, Dict, List, Optional, Any
 from datetime import datetime, timezone
 from dataclasses import dataclass, asdict
 from enum import Enum
@@ -14,6 +19,10 @@ sys.path.append('/home/jp/deckport.ai')
 
 from .card_abilities import CardAbilitiesEngine
 from .arena_effects import ArenaEffectsEngine
+from .card_abilities import StatusEffect
+
+# Actions kept in memory; the match log holds the complete record
+HISTORY_LIMIT = 100
 
 class GamePhase(str, Enum):
     START = "start"
@@ -72,17 +81,25 @@ class ArenaState:
 class GameState:
     """Complete game state manager"""
     
-    def __init__(self, match_id: str, players: List[Dict], arena: Dict = None):
+    def __init__(self, match_id: str, players: List[Dict], arena: Dict = None, seed: Optional[int] = None):
         self.match_id = match_id
-        self.seed = self._generate_seed()
+        self.seed = seed if seed is not None else self._generate_seed()
         self.status = "active"
         self.turn = 1
         self.phase = GamePhase.START
         self.current_player = 0
         self.sequence = 0  # For state synchronization
         
+        # Time and randomness of the action being applied
+        self.action_time = datetime.now(timezone.utc)
+        self.random = random.Random(self.seed)
+        
+        # Called with each accepted action; timer ms elapsed since the last one
+        self.event_sink: Optional[Callable[[Dict[str, Any]], None]] = None
+        self.ticked_ms = 0
+        
         # Initialize game engines
-        self.abilities_engine = CardAbilitiesEngine()
+        self.abilities_engine = CardAbilitiesEngine(clock=lambda: self.action_time)
         self.arena_engine = ArenaEffectsEngine()
         
         # Game rules
@@ -133,7 +150,7 @@ class GameState:
         
         # Timer state
         self.timer = {
-            "phase_start": datetime.now(timezone.utc).isoformat(),
+            "phase_start": self.action_time.isoformat(),
             "remaining_ms": self._get_phase_duration(self.phase) * 1000
         }
         
@@ -150,9 +167,31 @@ class GameState:
         
     def _generate_seed(self) -> int:
         """Generate random seed for reproducible randomness"""
-        import random
         return random.randint(1000000, 9999999)
     
+    def _begin_action(self, at: Optional[datetime] = None):
+        """Pin the time and random stream for an action so replaying it reproduces it"""
+        self.action_time = at or datetime.now(timezone.utc)
+        self.random.seed(f"{self.seed}:{self.sequence}")
+    
+    def _emit(self, event_type: str, **data):
+        """Report an accepted action to the event sink"""
+        event = {
+            "seq": self.sequence,
+            "type": event_type,
+            "at": self.action_time.isoformat(),
+            "ticked_ms": self.ticked_ms,
+            **data
+        }
+        self.ticked_ms = 0
+        if self.event_sink:
+            self.event_sink(event)
+    
+    def _record(self, entry: Dict[str, Any]):
+        """Append to the in-memory history, keeping the most recent actions"""
+        self.history.append(entry)
+        del self.history[:-HISTORY_LIMIT]
+    
     def _get_phase_duration(self, phase: GamePhase) -> int:
         """Get duration in seconds for a phase"""
         durations = {
@@ -163,8 +202,9 @@ class GameState:
         }
         return durations.get(phase, 10)
     
-    def advance_phase(self) -> Dict[str, Any]:
+    def advance_phase(self, at: Optional[datetime] = None) -> Dict[str, Any]:
         """Advance to next phase and return state changes"""
+        self._begin_action(at)
         old_phase = self.phase
         
         # Determine next phase
@@ -182,7 +222,7 @@ class GameState:
         
         # Reset timer
         self.timer = {
-            "phase_start": datetime.now(timezone.utc).isoformat(),
+            "phase_start": self.action_time.isoformat(),
             "remaining_ms": self._get_phase_duration(self.phase) * 1000
         }
         
@@ -193,14 +233,15 @@ class GameState:
         phase_changes = self._handle_phase_start()
         
         # Record in history
-        self.history.append({
+        self._record({
             "type": "phase_change",
             "from": old_phase.value,
             "to": self.phase.value,
             "turn": self.turn,
             "player": self.current_player,
-            "timestamp": datetime.now(timezone.utc).isoformat()
+            "timestamp": self.action_time.isoformat()
         })
+        self._emit("phase_advanced")
         
         return {
             "turn": self.turn,
@@ -267,7 +308,7 @@ class GameState:
         self.play_window = {
             "active": True,
             "card_types": playable_types,
-            "start_time": datetime.now(timezone.utc).isoformat(),
+            "start_time": self.action_time.isoformat(),
             "remaining_ms": self.rules["play_window_seconds"] * 1000
         }
         
@@ -280,7 +321,7 @@ class GameState:
         self.play_window = {
             "active": True,
             "card_types": reaction_types,
-            "start_time": datetime.now(timezone.utc).isoformat(),
+            "start_time": self.action_time.isoformat(),
             "remaining_ms": self.rules["play_window_seconds"] * 1000
         }
         
@@ -295,8 +336,10 @@ class GameState:
         
         return {}
     
-    def play_card(self, player_team: int, card_id: str, action: str, target: Optional[str] = None) -> Dict[str, Any]:
-        """Play a card and return state changes"""
+    def play_card(self, player_team: int, card_id: str, action: str, target: Optional[str] = None,
+                  at: Optional[datetime] = None) -> Dict[str, Any]:
+        """Play a card and return state changes; a rejected play leaves the state untouched"""
+        self._begin_action(at)
         if player_team != self.current_player:
             raise ValueError("Not your turn")
         
@@ -313,8 +356,8 @@ class GameState:
             cards = getattr(player_state, location)
             for i, c in enumerate(cards):
                 if c.get('id') == card_id:
-                    card = cards.pop(i)
-                    card_location = location
+                    card = c
+                    card_location = (cards, i)
                     break
             if card:
                 break
@@ -331,24 +374,27 @@ class GameState:
         if not self._can_afford_card(player_state, card):
             raise ValueError("Cannot afford card")
         
-        # Pay costs
+        # Take the card and pay costs
+        cards, index = card_location
+        cards.pop(index)
         self._pay_card_costs(player_state, card)
         
         # Apply card effect
         effect_result = self._apply_card_effect(player_state, card, action, target)
         
         # Record in history
-        self.history.append({
+        self._record({
             "type": "card_played",
             "player": player_team,
             "card_id": card_id,
             "card_name": card.get('name', 'Unknown'),
             "action": action,
             "target": target,
-            "timestamp": datetime.now(timezone.utc).isoformat()
+            "timestamp": self.action_time.isoformat()
         })
         
         self.sequence += 1
+        self._emit("card_played", team=player_team, card_id=card_id, action=action, target=target)
         
         return {
             "players": {str(player_team): asdict(player_state)},
@@ -562,8 +608,65 @@ class GameState:
             "history": self.history[-10:]  # Last 10 actions only
         }
     
+    def snapshot(self) -> Dict[str, Any]:
+        """Complete state, including what the player views leave out, for restoring the match"""
+        return {
+            **self.to_dict(),
+            "history": list(self.history),
+            "match_stats": dict(self.match_stats),
+            "arena_state": self.arena_state,
+            "status_effects": {
+                target_id: [effect.to_dict() for effect in effects]
+                for target_id, effects in self.abilities_engine.active_effects.items()
+            }
+        }
+    
+    @classmethod
+    def from_snapshot(cls, data: Dict[str, Any]) -> 'GameState':
+        """Rebuild a game state from snapshot()"""
+        data = json.loads(json.dumps(data))  # Never share structures with the caller
+        players = data["players"]
+        state = cls(data["match_id"], [players[str(team)] for team in range(len(players))], seed=data["seed"])
+        
+        state.status = data["status"]
+        state.turn = data["turn"]
+        state.phase = GamePhase(data["phase"])
+        state.current_player = data["current_player"]
+        state.sequence = data["sequence"]
+        state.rules = data["rules"]
+        state.arena = ArenaState(**data["arena"])
+        state.arena_state = data["arena_state"]
+        state.players = {team: PlayerState(**player) for team, player in players.items()}
+        state.timer = data["timer"]
+        state.play_window = data["play_window"]
+        state.history = data["history"]
+        state.match_stats = data["match_stats"]
+        state.abilities_engine.active_effects = {
+            target_id: [StatusEffect.from_dict(effect) for effect in effects]
+            for target_id, effects in data["status_effects"].items()
+        }
+        return state
+    
+    def apply_event(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """Re-apply an action reported to the event sink, at its recorded time"""
+        at = datetime.fromisoformat(event["at"])
+        if event.get("ticked_ms"):
+            self.update_timer(event["ticked_ms"])
+        
+        if event["type"] == "phase_advanced":
+            changes = self.advance_phase(at=at)
+        elif event["type"] == "card_played":
+            changes = self.play_card(event["team"], event["card_id"], event["action"], event.get("target"), at=at)
+        else:
+            raise ValueError(f"Unknown event type: {event['type']}")
+        
+        if self.sequence != event["seq"]:
+            raise ValueError(f"Event {event['seq']} replayed as sequence {self.sequence}")
+        return changes
+    
     def update_timer(self, delta_ms: int):
         """Update timer state"""
+        self.ticked_ms += delta_ms
         self.timer["remaining_ms"] -= delta_ms
         
         if self.play_window["active"]:
@@ -0,0 +1,202 @@
+"""
+Match Log
+Append-only event log with periodic snapshots for every match on this server
+
+Each match gets a directory holding events.jsonl, whose first line carries the
+initial state, and snapshot.json, the latest compact snapshot. A crashed match
+is rebuilt from the snapshot plus the events after it; a finished match is
+moved under finished/ and can be replayed from its first event.
+"""
+
+import os
+import json
+import shutil
+from typing import Dict, List, Optional, Any, Tuple
+import sys
+sys.path.append('/home/jp/deckport.ai')
+
+from shared.utils.logging import setup_logging
+from .game_state import GameState
+
+logger = setup_logging("match_log", "INFO")
+
+# Match log configuration
+MATCH_LOG_DIR = os.getenv("MATCH_LOG_DIR", "/home/jp/deckport.ai/data/match_logs")
+MATCH_SNAPSHOT_EVERY = int(os.getenv("MATCH_SNAPSHOT_EVERY", "20"))
+MATCH_LOG_FSYNC = os.getenv("MATCH_LOG_FSYNC", "false").lower() == "true"
+
+EVENTS_FILE = "events.jsonl"
+SNAPSHOT_FILE = "snapshot.json"
+MATCH_CREATED = "match_created"
+MATCH_ENDED = "match_ended"
+
+
+class MatchLogError(Exception):
+    """A match log is missing or unreadable"""
+
+
+class MatchLog:
+    """Records match actions as they are accepted and rebuilds matches from them"""
+
+    def __init__(self, directory: str = None, snapshot_every: int = MATCH_SNAPSHOT_EVERY, fsync: bool = MATCH_LOG_FSYNC):
+        self.directory = directory or MATCH_LOG_DIR
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self._since_snapshot: Dict[str, int] = {}
+
+    def _match_dir(self, match_id: str, finished: bool = False) -> str:
+        return os.path.join(self.directory, "finished" if finished else "active", str(match_id))
+
+    def start(self, game_state: GameState, meta: Optional[Dict[str, Any]] = None):
+        """Open the log of a new match with its initial state and start recording"""
+        match_dir = self._match_dir(game_state.match_id)
+        os.makedirs(match_dir, exist_ok=True)
+
+        self._append(match_dir, {
+            "seq": game_state.sequence,
+            "type": MATCH_CREATED,
+            "at": game_state.action_time.isoformat(),
+            "meta": meta or {},
+            "state": game_state.snapshot()
+        })
+        self.attach(game_state)
+
+    def attach(self, game_state: GameState):
+        """Record every action the game state accepts from now on"""
+        match_id = game_state.match_id
+        self._since_snapshot[match_id] = 0
+
+        def record(event: Dict[str, Any]):
+            try:
+                self._append(self._match_dir(match_id), event)
+                self._since_snapshot[match_id] += 1
+                if self._since_snapshot[match_id] >= self.snapshot_every:
+                    self._write_snapshot(self._match_dir(match_id), game_state)
+                    self._since_snapshot[match_id] = 0
+            except OSError as e:
+                # The match goes on; only its recoverability suffers
+                logger.error(f"Failed to log event {event['seq']} of match {match_id}: {e}")
+
+        game_state.event_sink = record
+
+    def finish(self, game_state: GameState, result: Dict[str, Any]):
+        """Close the log of an ended match and move it to the finished matches"""
+        match_id = game_state.match_id
+        game_state.event_sink = None
+        self._since_snapshot.pop(match_id, None)
+
+        match_dir = self._match_dir(match_id)
+        try:
+            self._append(match_dir, {
+                "seq": game_state.sequence,
+                "type": MATCH_ENDED,
+                "at": game_state.action_time.isoformat(),
+                "ticked_ms": game_state.ticked_ms,
+                "result": result
+            })
+            self._write_snapshot(match_dir, game_state)
+
+            finished_dir = self._match_dir(match_id, finished=True)
+            os.makedirs(os.path.dirname(finished_dir), exist_ok=True)
+            if os.path.exists(finished_dir):
+                shutil.rmtree(finished_dir)
+            os.replace(match_dir, finished_dir)
+        except OSError as e:
+            logger.error(f"Failed to close log of match {match_id}: {e}")
+
+    def unfinished(self) -> List[str]:
+        """Matches that were in flight when the server last stopped"""
+        active_dir = os.path.join(self.directory, "active")
+        if not os.path.isdir(active_dir):
+            return []
+        return sorted(name for name in os.listdir(active_dir)
+                      if os.path.exists(os.path.join(active_dir, name, EVENTS_FILE)))
+
+    def recover(self, match_id: str) -> Tuple[GameState, Dict[str, Any]]:
+        """Rebuild an in-flight match from its latest snapshot and the events after it"""
+        match_dir = self._match_dir(match_id)
+        created, events = self._read(match_dir)
+
+        state_data = created["state"]
+        snapshot_path = os.path.join(match_dir, SNAPSHOT_FILE)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, 'r') as f:
+                state_data = json.load(f)["state"]
+
+        game_state = GameState.from_snapshot(state_data)
+        tail = [event for event in events if event["seq"] > game_state.sequence]
+        for event in tail:
+            game_state.apply_event(event)
+
+        logger.info(f"Recovered match {match_id} at sequence {game_state.sequence} ({len(tail)} events after the snapshot)")
+        return game_state, created["meta"]
+
+    def replay(self, match_id: str, until_seq: Optional[int] = None) -> Tuple[GameState, Optional[Dict[str, Any]]]:
+        """Replay a match from its initial state; returns the state and the recorded result"""
+        match_dir = self._match_dir(match_id, finished=True)
+        if not os.path.isdir(match_dir):
+            match_dir = self._match_dir(match_id)
+        created, events = self._read(match_dir)
+
+        game_state = GameState.from_snapshot(created["state"])
+        result = None
+        for event in events:
+            if until_seq is not None and event["seq"] > until_seq:
+                break
+            if event["type"] == MATCH_ENDED:
+                # The timer may have run on between the last action and the end
+                game_state.update_timer(event["ticked_ms"])
+                result = event["result"]
+            else:
+                game_state.apply_event(event)
+        return game_state, result
+
+    def final_snapshot(self, match_id: str) -> Optional[Dict[str, Any]]:
+        """State recorded when a finished match ended"""
+        path = os.path.join(self._match_dir(match_id, finished=True), SNAPSHOT_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            return json.load(f)["state"]
+
+    def _append(self, match_dir: str, event: Dict[str, Any]):
+        with open(os.path.join(match_dir, EVENTS_FILE), 'a') as f:
+            f.write(json.dumps(event, separators=(',', ':')) + "\n")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+
+    def _write_snapshot(self, match_dir: str, game_state: GameState):
+        path = os.path.join(match_dir, SNAPSHOT_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"seq": game_state.sequence, "state": game_state.snapshot()}, f, separators=(',', ':'))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _read(self, match_dir: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """The match_created event and the actions after it"""
+        path = os.path.join(match_dir, EVENTS_FILE)
+        if not os.path.exists(path):
+            raise MatchLogError(f"No match log at {match_dir}")
+
+        with open(path, 'r') as f:
+            lines = f.read().split("\n")
+
+        events = []
+        for number, line in enumerate(lines):
+            if not line:
+                continue
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError:
+                # A line torn by a crash can only be the last one
+                if any(lines[number + 1:]):
+                    raise MatchLogError(f"Corrupt event on line {number + 1} of {path}")
+                logger.warning(f"Ignoring torn last event in {path}")
+
+        if not events or events[0]["type"] != MATCH_CREATED:
+            raise MatchLogError(f"Match log {path} does not start with {MATCH_CREATED}")
+        return events[0], events[1:]
@@ -12,6 +12,7 @@ sys.path.append('/home/jp/deckport.ai')
 from shared.database.connection import SessionLocal
 from shared.models.base import Match, MatchParticipant, MatchStatus, ParticipantResult, MMQueue
 from shared.models.arena import Arena
+from shared.services.tournament_brackets import bracket_service
 from shared.utils.logging import setup_logging
 from .game_state import GameState
 
@@ -257,6 +258,14 @@ class MatchManager:
                             participant.result = ParticipantResult.loss
                     
                     session.commit()
+                    
+                    # Advance the tournament bracket once the match itself is saved
+                    try:
+                        bracket_service.record_match_result(session, match.id, winner)
+                        session.commit()
+                    except Exception as e:
+                        session.rollback()
+                        logger.error(f"Error recording match {match_id} in its tournament bracket: {e}")
             
             # Notify players if connection manager available
             if connection_manager:
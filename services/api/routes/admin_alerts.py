@@ -1,92 +1,44 @@
 
 """
-Admin Alerts API Routes - Simplified Production Version
-Dynamic alert system for the admin panel
+Admin Alerts API Routes
+Alerts are evaluated by the alert engine and read from the admin_alerts table
 """
 
-from flask import Blueprint, jsonify, request
+import os
+from flask import Blueprint, jsonify, request, g
 from datetime import datetime, timedelta
+from shared.database.connection import SessionLocal
+from shared.services.alert_engine import (
+    get_alert_engine, list_alerts, alert_counts, acknowledge_alert as acknowledge_alert_state
+)
 from shared.auth.unified_admin_auth import admin_auth_required
 from shared.auth.admin_roles import Permission
 
 admin_alerts_bp = Blueprint('admin_alerts', __name__, url_prefix='/v1/admin/alerts')
 
-def generate_sample_alerts():
-    """Generate sample alerts for demonstration"""
-    now = datetime.utcnow()
-    alerts = []
-    
-    # Sample console alert
-    alerts.append({
-        'id': 'console_offline_001',
-        'type': 'warning',
-        'category': 'console',
-        'title': 'Console Offline',
-        'message': 'Console DECK_NYC_01 offline for 45 minutes',
-        'timestamp': (now - timedelta(minutes=45)).isoformat(),
-        'severity': 'medium',
-        'data': {
-            'device_uid': 'DECK_NYC_01',
-            'offline_duration': 2700
-        }
-    })
-    
-    # Sample NFC alert
-    alerts.append({
-        'id': 'nfc_activation_low',
-        'type': 'info',
-        'category': 'nfc',
-        'title': 'Low Activation Rate',
-        'message': '15 programmed cards not activated in 7 days',
-        'timestamp': (now - timedelta(hours=2)).isoformat(),
-        'severity': 'low',
-        'data': {
-            'stale_count': 15
-        }
-    })
-    
-    # Sample system alert
-    alerts.append({
-        'id': 'high_streaming_load',
-        'type': 'warning',
-        'category': 'system',
-        'title': 'High Streaming Load',
-        'message': '42 active video streams (high server load)',
-        'timestamp': (now - timedelta(minutes=15)).isoformat(),
-        'severity': 'medium',
-        'data': {
-            'active_streams': 42,
-            'total_consoles': 50,
-            'load_percentage': 84.0
-        }
-    })
-    
-    return alerts
+ALERT_ENGINE_ENABLED = os.getenv("ALERT_ENGINE_ENABLED", "true").lower() == "true"
+
+
+@admin_alerts_bp.record_once
+def start_alert_engine(state):
+    """Evaluate alert rules in the background of every API worker that serves alerts"""
+    if ALERT_ENGINE_ENABLED:
+        get_alert_engine().start()
 
 @admin_alerts_bp.route('/', methods=['GET'])
 @admin_auth_required(permissions=[Permission.SYSTEM_HEALTH])
 def get_alerts():
     """Get all current system alerts"""
     try:
-        all_alerts = generate_sample_alerts()
-        
-        # Filter by category if requested
-        category = request.args.get('category')
-        if category:
-            all_alerts = [alert for alert in all_alerts if alert['category'] == category]
-        
-        # Filter by severity if requested
-        min_severity = request.args.get('min_severity')
-        if min_severity:
-            severity_levels = ['low', 'medium', 'high', 'critical']
-            if min_severity in severity_levels:
-                min_index = severity_levels.index(min_severity)
-                all_alerts = [alert for alert in all_alerts 
-                            if severity_levels.index(alert['severity']) >= min_index]
-        
-        # Limit results
-        limit = int(request.args.get('limit', 50))
-        all_alerts = all_alerts[:limit]
+        with SessionLocal() as session:
+            alerts = list_alerts(
+                session,
+                category=request.args.get('category'),
+                min_severity=request.args.get('min_severity'),
+                include_resolved=request.args.get('include_resolved', 'false').lower() == 'true',
+                limit=int(request.args.get('limit', 50))
+            )
+            all_alerts = [alert.to_dict() for alert in alerts]
         
         return jsonify({
             'alerts': all_alerts,
@@ -103,35 +55,40 @@ def get_alerts():
 def get_alerts_summary():
     """Get alert summary for dashboard"""
     try:
-        all_alerts = generate_sample_alerts()
-        
-        # Count by severity
-        severity_counts = {'critical': 0, 'high': 0, 'medium': 2, 'low': 1}
-        
-        # Get most recent critical/high alerts for display
-        critical_alerts = [alert for alert in all_alerts if alert['severity'] in ['critical', 'high']]
-        critical_alerts.sort(key=lambda x: x['timestamp'], reverse=True)
+        with SessionLocal() as session:
+            severity_counts = alert_counts(session)
+            # Get most recent critical/high alerts for display
+            critical_alerts = [alert.to_dict() for alert in list_alerts(session, min_severity='high', limit=5)]
         
         return jsonify({
-            'total_alerts': len(all_alerts),
+            'total_alerts': sum(severity_counts.values()),
             'severity_breakdown': severity_counts,
-            'critical_alerts': critical_alerts[:5],  # Top 5 most recent critical/high
-            'system_status': 'healthy' if len(critical_alerts) == 0 else 'warning'
+            'critical_alerts': critical_alerts,  # Top 5 most recent critical/high
+            'system_status': 'critical' if severity_counts['critical'] > 0 else 
+                           'warning' if severity_counts['high'] > 0 else 
+                           'caution' if severity_counts['medium'] > 0 else 'healthy'
         })
         
     except Exception as e:
         return jsonify({'error': f'Failed to get alerts summary: {str(e)}'}), 500
 
-@admin_alerts_bp.route('/<alert_id>/acknowledge', methods=['POST'])
+@admin_alerts_bp.route('/<int:alert_id>/acknowledge', methods=['POST'])
 @admin_auth_required(permissions=[Permission.SYSTEM_HEALTH])
 def acknowledge_alert(alert_id):
     """Acknowledge an alert (mark as seen)"""
     try:
-        return jsonify({
-            'success': True,
-            'message': f'Alert {alert_id} acknowledged',
-            'acknowledged_at': datetime.utcnow().isoformat()
-        })
+        with SessionLocal() as session:
+            alert = acknowledge_alert_state(session, alert_id, getattr(g, 'admin_id', None))
+            if alert is None:
+                return jsonify({'error': 'Alert not found'}), 404
+            session.commit()
+            
+            return jsonify({
+                'success': True,
+                'message': f'Alert {alert_id} acknowledged',
+                'acknowledged_at': alert.acknowledged_at.isoformat() if alert.acknowledged_at else None,
+                'alert': alert.to_dict()
+            })
         
     except Exception as e:
         return jsonify({'error': f'Failed to acknowledge alert: {str(e)}'}), 500
@@ -7,16 +7,27 @@ from flask import Blueprint, request, jsonify
 from datetime import datetime, timezone, timedelta
 from sqlalchemy import and_, or_, desc, func
 from shared.database.connection import SessionLocal
-from shared.models.base import Console, Match, ConsoleStatus
+from shared.models.base import ArenaRarity, Console, Match, ConsoleStatus
 from shared.models.arena import Arena
 from shared.auth.auto_rbac_decorator import auto_rbac_required
 from shared.auth.admin_roles import Permission
+from shared.services.arena_selector import get_arena_selector
 import logging
 
 logger = logging.getLogger(__name__)
 
 admin_arenas_bp = Blueprint('admin_arenas', __name__, url_prefix='/v1/admin/arenas')
 
+def _selection_data(arena):
+    return {
+        'is_active': arena.is_active,
+        'rarity': arena.rarity,
+        'selection_weight': arena.selection_weight,
+        'game_modes': arena.game_modes,
+        'min_elo': arena.min_elo,
+        'max_elo': arena.max_elo
+    }
+
 @admin_arenas_bp.route('', methods=['GET'])
 @auto_rbac_required(override_permissions=[Permission.GAME_VIEW])
 def get_arenas():
@@ -54,6 +65,7 @@ def get_arenas():
                     'ambient_sounds': arena.ambient_sounds,
                     'special_rules': arena.special_rules,
                     'difficulty_rating': arena.difficulty_rating,
+                    'selection': _selection_data(arena),
                     'created_at': arena.created_at.isoformat(),
                     'console_count': console_count,
                     'matches_24h': matches_24h,
@@ -126,6 +138,7 @@ def get_arena_detail(arena_id):
                 'ambient_sounds': arena.ambient_sounds,
                 'special_rules': arena.special_rules,
                 'difficulty_rating': arena.difficulty_rating,
+                'selection': _selection_data(arena),
                 'created_at': arena.created_at.isoformat(),
                 'assigned_consoles': [
                     {
@@ -298,25 +311,104 @@ def unassign_console_from_arena(arena_id):
         logger.error(f"Error unassigning console from arena: {e}")
         return jsonify({'error': 'Failed to unassign console from arena'}), 500
 
-@admin_arenas_bp.route('/<int:arena_id>/activate', methods=['POST'])
+@admin_arenas_bp.route('/<int:arena_id>/selection', methods=['PUT'])
 @auto_rbac_required(override_permissions=[Permission.GAME_VIEW])
-def activate_arena(arena_id):
-    """Activate an arena for use"""
+def update_arena_selection(arena_id):
+    """Change how often an arena is drawn and for which modes and ELO band"""
     try:
+        data = request.get_json() or {}
+        
         with SessionLocal() as session:
             arena = session.query(Arena).filter(Arena.id == arena_id).first()
             
             if not arena:
                 return jsonify({'error': 'Arena not found'}), 404
             
-            # For now, we'll just return success since we don't have an active/inactive status field
-            # In a full implementation, you might add an 'active' boolean field to the Arena model
+            if 'rarity' in data:
+                if data['rarity'] not in [r.value for r in ArenaRarity]:
+                    return jsonify({'error': f"Invalid rarity: {data['rarity']}"}), 400
+                arena.rarity = data['rarity']
+            if 'selection_weight' in data:
+                try:
+                    weight = float(data['selection_weight'])
+                except (TypeError, ValueError):
+                    weight = -1
+                if weight < 0:
+                    return jsonify({'error': 'selection_weight must be a non-negative number'}), 400
+                arena.selection_weight = weight
+            if 'game_modes' in data:
+                modes = data['game_modes']
+                if modes is not None and (not isinstance(modes, list) or not all(isinstance(m, str) for m in modes)):
+                    return jsonify({'error': 'game_modes must be a list of mode names or null'}), 400
+                arena.game_modes = modes or None
+            for field in ('min_elo', 'max_elo'):
+                if field in data:
+                    try:
+                        setattr(arena, field, int(data[field]) if data[field] is not None else None)
+                    except (TypeError, ValueError):
+                        return jsonify({'error': f'{field} must be an integer or null'}), 400
+            if arena.min_elo is not None and arena.max_elo is not None and arena.min_elo > arena.max_elo:
+                return jsonify({'error': 'min_elo cannot be above max_elo'}), 400
+            
+            session.commit()
+            get_arena_selector().invalidate()
             
             return jsonify({
                 'success': True,
-                'message': f'Arena {arena.name} activated'
+                'selection': _selection_data(arena)
             })
             
+    except Exception as e:
+        logger.error(f"Error updating arena selection: {e}")
+        return jsonify({'error': 'Failed to update arena selection'}), 500
+
+@admin_arenas_bp.route('/selection', methods=['GET'])
+@auto_rbac_required(override_permissions=[Permission.GAME_VIEW])
+def get_arena_selection():
+    """Draw probability of each arena for a game mode and ELO"""
+    try:
+        mode = request.args.get('mode')
+        elo = request.args.get('elo', type=int)
+        selector = get_arena_selector()
+        
+        return jsonify({
+            'mode': mode,
+            'elo': elo,
+            'probabilities': [
+                {'arena_id': arena_id, 'probability': round(probability, 6)}
+                for arena_id, probability in sorted(selector.probabilities(mode, elo).items(),
+                                                    key=lambda item: -item[1])
+            ],
+            'selector': selector.stats()
+        })
+            
+    except Exception as e:
+        logger.error(f"Error getting arena selection: {e}")
+        return jsonify({'error': 'Failed to retrieve arena selection'}), 500
+
+def _set_active(arena_id, active):
+    with SessionLocal() as session:
+        arena = session.query(Arena).filter(Arena.id == arena_id).first()
+        
+        if not arena:
+            return jsonify({'error': 'Arena not found'}), 404
+        
+        arena.is_active = active
+        session.commit()
+        get_arena_selector().invalidate()
+        
+        return jsonify({
+            'success': True,
+            'message': f"Arena {arena.name} {'activated' if active else 'deactivated'}"
+        })
+
+@admin_arenas_bp.route('/<int:arena_id>/activate', methods=['POST'])
+@auto_rbac_required(override_permissions=[Permission.GAME_VIEW])
+def activate_arena(arena_id):
+    """Activate an arena for use"""
+    try:
+        return _set_active(arena_id, True)
+            
     except Exception as e:
         logger.error(f"Error activating arena: {e}")
         return jsonify({'error': 'Failed to activate arena'}), 500
@@ -324,21 +416,9 @@ def activate_arena(arena_id):
 @admin_arenas_bp.route('/<int:arena_id>/deactivate', methods=['POST'])
 @auto_rbac_required(override_permissions=[Permission.GAME_VIEW])
 def deactivate_arena(arena_id):
-    """Deactivate an arena"""
+    """Take an arena out of match selection"""
     try:
-        with SessionLocal() as session:
-            arena = session.query(Arena).filter(Arena.id == arena_id).first()
-            
-            if not arena:
-                return jsonify({'error': 'Arena not found'}), 404
-            
-            # For now, we'll just return success since we don't have an active/inactive status field
-            # In a full implementation, you might add an 'active' boolean field to the Arena model
-            
-            return jsonify({
-                'success': True,
-                'message': f'Arena {arena.name} deactivated'
-            })
+        return _set_active(arena_id, False)
             
     except Exception as e:
         logger.error(f"Error deactivating arena: {e}")
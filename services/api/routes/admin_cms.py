@@ -17,6 +17,7 @@ from shared.models.cms import (
 from shared.auth.decorators import admin_required
 from shared.auth.admin_roles import Permission
 from shared.auth.auto_rbac_decorator import auto_rbac_required
+from shared.services.response_cache import get_response_cache, invalidate_responses, CMS_NEWS, CMS_VIDEOS
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -190,6 +191,7 @@ def create_article():
 
             session.add(article)
             session.commit()
+            invalidate_responses(CMS_NEWS)
 
             return jsonify({
                 'id': article.id,
@@ -247,6 +249,7 @@ def update_article(article_id: int):
                 article.expires_at = datetime.fromisoformat(data['expires_at']) if data['expires_at'] else None
 
             session.commit()
+            invalidate_responses(CMS_NEWS)
 
             return jsonify({'message': 'Article updated successfully'})
 
@@ -268,6 +271,7 @@ def delete_article(article_id: int):
 
             session.delete(article)
             session.commit()
+            invalidate_responses(CMS_NEWS)
 
             return jsonify({'message': 'Article deleted successfully'})
 
@@ -403,6 +407,7 @@ def create_video():
 
             session.add(video)
             session.commit()
+            invalidate_responses(CMS_VIDEOS)
 
             return jsonify({
                 'id': video.id,
@@ -471,7 +476,8 @@ def get_cms_analytics():
                     'title': video.title,
                     'view_count': video.view_count,
                     'published_at': video.published_at.isoformat() if video.published_at else None
-                } for video in popular_videos]
+                } for video in popular_videos],
+                'response_cache': get_response_cache().stats()
             })
 
     except Exception as e:
@@ -3,8 +3,9 @@ Admin Communications API Routes - Real Database Implementation
 Manages announcements, email campaigns, and social media integration
 """
 
+import os
 from flask import Blueprint, jsonify, request, g
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from sqlalchemy import func, and_, or_, desc
 from shared.auth.auto_rbac_decorator import auto_rbac_required
 from shared.auth.admin_roles import Permission
@@ -16,11 +17,23 @@ from shared.models.communications import (
     CampaignStatus, RecipientType
 )
 from shared.models.base import Player, Admin
+from shared.services.campaign_delivery import (
+    CampaignError, campaign_progress, count_recipients, get_campaign_delivery
+)
 import logging
 
 logger = logging.getLogger(__name__)
 admin_communications_bp = Blueprint('admin_communications', __name__, url_prefix='/v1/admin/communications')
 
+CAMPAIGN_DELIVERY_ENABLED = os.getenv("CAMPAIGN_DELIVERY_ENABLED", "true").lower() == "true"
+
+
+@admin_communications_bp.record_once
+def start_campaign_delivery(state):
+    """Run the campaign delivery workers in every API worker that serves the admin panel"""
+    if CAMPAIGN_DELIVERY_ENABLED:
+        get_campaign_delivery().start()
+
 # Real database implementation - no sample data needed
 
 @admin_communications_bp.route('/announcements', methods=['GET'])
@@ -157,23 +170,60 @@ def create_announcement():
         logger.error(f"Error creating announcement: {e}")
         return jsonify({'error': f'Failed to create announcement: {str(e)}'}), 500
 
+def _campaign_dict(campaign, progress=None):
+    data = {
+        'id': campaign.id,
+        'name': campaign.name,
+        'subject': campaign.subject,
+        'content': campaign.content,
+        'recipient_type': campaign.recipient_type.value,
+        'recipient_count': campaign.recipient_count,
+        'status': campaign.status.value,
+        'scheduled_at': campaign.scheduled_at.isoformat() if campaign.scheduled_at else None,
+        'sent_at': campaign.sent_at.isoformat() if campaign.sent_at else None,
+        'created_at': campaign.created_at.isoformat(),
+        'sent_count': campaign.sent_count,
+        'open_count': campaign.open_count,
+        'click_count': campaign.click_count,
+        'bounce_count': campaign.bounce_count,
+        'unsubscribe_count': campaign.unsubscribe_count
+    }
+    if progress is not None:
+        data['progress'] = progress
+    return data
+
 @admin_communications_bp.route('/email-campaigns', methods=['GET'])
 @auto_rbac_required(override_permissions=[Permission.COMM_EMAIL])
 def get_email_campaigns():
     """Get all email campaigns"""
     try:
-        return jsonify({
-            'campaigns': sample_campaigns,
-            'total_count': len(sample_campaigns)
-        })
+        page = int(request.args.get('page', 1))
+        per_page = min(int(request.args.get('per_page', 50)), 100)
+        status_filter = request.args.get('status', '')
+        
+        with SessionLocal() as session:
+            query = session.query(EmailCampaign)
+            if status_filter:
+                query = query.filter(EmailCampaign.status == CampaignStatus(status_filter))
+            total_count = query.count()
+            campaigns = query.order_by(desc(EmailCampaign.created_at)).offset((page - 1) * per_page).limit(per_page).all()
+            
+            return jsonify({
+                'campaigns': [_campaign_dict(c) for c in campaigns],
+                'total_count': total_count,
+                'page': page,
+                'per_page': per_page
+            })
         
+    except ValueError as e:
+        return jsonify({'error': f'Invalid parameter: {str(e)}'}), 400
     except Exception as e:
         return jsonify({'error': f'Failed to get email campaigns: {str(e)}'}), 500
 
 @admin_communications_bp.route('/email-campaigns', methods=['POST'])
 @auto_rbac_required(override_permissions=[Permission.COMM_EMAIL])
 def create_email_campaign():
-    """Create a new email campaign"""
+    """Create a draft email campaign, or a scheduled one when scheduled_at is given"""
     try:
         data = request.get_json()
         
@@ -183,46 +233,87 @@ def create_email_campaign():
             if not data.get(field):
                 return jsonify({'error': f'{field} is required'}), 400
         
-        # Calculate recipient count based on type (sample data)
-        recipient_counts = {
-            'all_players': 1247,
-            'active_players': 456,
-            'new_players': 89
-        }
-        recipient_count = recipient_counts.get(data['recipient_type'], 0)
-        
-        # Create campaign (in production, save to database)
-        campaign = {
-            'id': len(sample_campaigns) + 1,
-            'name': data['name'],
-            'subject': data['subject'],
-            'content': data['content'],
-            'recipient_type': data['recipient_type'],
-            'recipient_count': recipient_count,
-            'status': data.get('status', 'draft'),
-            'scheduled_at': data.get('scheduled_at'),
-            'created_at': datetime.utcnow().isoformat(),
-            'created_by': 'admin',
-            'sent_count': 0,
-            'open_count': 0,
-            'click_count': 0,
-            'bounce_count': 0,
-            'unsubscribe_count': 0
-        }
-        
-        sample_campaigns.append(campaign)
-        
-        logging.info(f"Created email campaign: {campaign['name']}")
+        try:
+            recipient_type = RecipientType(data['recipient_type'])
+            scheduled_at = datetime.fromisoformat(data['scheduled_at'].replace('Z', '+00:00')) if data.get('scheduled_at') else None
+        except ValueError as e:
+            return jsonify({'error': f'Invalid value: {str(e)}'}), 400
         
-        return jsonify({
-            'success': True,
-            'campaign': campaign,
-            'message': 'Email campaign created successfully'
-        }), 201
+        with SessionLocal() as session:
+            campaign = EmailCampaign(
+                name=data['name'],
+                subject=data['subject'],
+                content=data['content'],
+                html_content=data.get('html_content'),
+                recipient_type=recipient_type,
+                status=CampaignStatus.scheduled if scheduled_at else CampaignStatus.draft,
+                scheduled_at=scheduled_at,
+                created_by_admin_id=g.admin_id,
+                settings=data.get('settings')
+            )
+            try:
+                # Estimate only; the real list is resolved when the campaign starts
+                campaign.recipient_count = count_recipients(session, campaign)
+            except CampaignError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            session.add(campaign)
+            session.commit()
+            session.refresh(campaign)
+            
+            logger.info(f"Created email campaign: {campaign.name} by admin {g.admin_id}")
+            
+            return jsonify({
+                'success': True,
+                'campaign': _campaign_dict(campaign),
+                'message': 'Email campaign created successfully'
+            }), 201
         
     except Exception as e:
+        logger.error(f"Error creating email campaign: {e}")
         return jsonify({'error': f'Failed to create email campaign: {str(e)}'}), 500
 
+@admin_communications_bp.route('/email-campaigns/<int:campaign_id>', methods=['GET'])
+@auto_rbac_required(override_permissions=[Permission.COMM_EMAIL])
+def get_email_campaign(campaign_id):
+    """Get one campaign with per-recipient delivery progress"""
+    with SessionLocal() as session:
+        campaign = session.get(EmailCampaign, campaign_id)
+        if not campaign:
+            return jsonify({'error': 'Campaign not found'}), 404
+        return jsonify({'campaign': _campaign_dict(campaign, campaign_progress(session, campaign_id))})
+
+@admin_communications_bp.route('/email-campaigns/<int:campaign_id>/send', methods=['POST'])
+@auto_rbac_required(override_permissions=[Permission.COMM_EMAIL])
+def send_email_campaign(campaign_id):
+    """Queue a campaign for background delivery, or resume a paused one"""
+    try:
+        result = get_campaign_delivery().start_campaign(campaign_id)
+        logger.info(f"Campaign {campaign_id} send requested by admin {g.admin_id}")
+        return jsonify({'success': True, **result}), 202
+    except CampaignError as e:
+        return jsonify({'error': str(e)}), 404 if str(e) == 'Campaign not found' else 409
+
+@admin_communications_bp.route('/email-campaigns/<int:campaign_id>/pause', methods=['POST'])
+@auto_rbac_required(override_permissions=[Permission.COMM_EMAIL])
+def pause_email_campaign(campaign_id):
+    """Pause a sending campaign"""
+    try:
+        get_campaign_delivery().pause_campaign(campaign_id)
+        return jsonify({'success': True})
+    except CampaignError as e:
+        return jsonify({'error': str(e)}), 404 if str(e) == 'Campaign not found' else 409
+
+@admin_communications_bp.route('/email-campaigns/<int:campaign_id>/cancel', methods=['POST'])
+@auto_rbac_required(override_permissions=[Permission.COMM_EMAIL])
+def cancel_email_campaign(campaign_id):
+    """Cancel a campaign that has not finished sending"""
+    try:
+        dropped = get_campaign_delivery().cancel_campaign(campaign_id)
+        return jsonify({'success': True, 'recipients_dropped': dropped})
+    except CampaignError as e:
+        return jsonify({'error': str(e)}), 404 if str(e) == 'Campaign not found' else 409
+
 @admin_communications_bp.route('/social-metrics', methods=['GET'])
 @auto_rbac_required(override_permissions=[Permission.COMM_VIEW])
 def get_social_metrics():
@@ -283,18 +374,26 @@ def create_social_post():
 def get_communications_summary():
     """Get communications summary for dashboard"""
     try:
-        # Count active announcements
-        active_announcements = len([a for a in sample_announcements if a['status'] == 'active'])
+        week_ago = datetime.now(timezone.utc) - timedelta(days=7)
+        day_ago = datetime.now(timezone.utc) - timedelta(days=1)
         
-        # Count recent campaigns
-        week_ago = datetime.utcnow() - timedelta(days=7)
-        recent_campaigns = len([c for c in sample_campaigns 
-                              if datetime.fromisoformat(c['created_at'].replace('Z', '+00:00')) >= week_ago])
-        
-        # Calculate engagement metrics
-        total_opens = sum(c.get('open_count', 0) for c in sample_campaigns)
-        total_clicks = sum(c.get('click_count', 0) for c in sample_campaigns)
-        total_sent = sum(c.get('sent_count', 0) for c in sample_campaigns)
+        with SessionLocal() as session:
+            active_announcements = session.query(func.count(Announcement.id)).filter(
+                Announcement.status == AnnouncementStatus.active
+            ).scalar()
+            recent_campaigns = session.query(func.count(EmailCampaign.id)).filter(
+                EmailCampaign.created_at >= week_ago
+            ).scalar()
+            
+            # Engagement metrics from the delivery counters
+            total_sent, total_opens, total_clicks = session.query(
+                func.coalesce(func.sum(EmailCampaign.sent_count), 0),
+                func.coalesce(func.sum(EmailCampaign.open_count), 0),
+                func.coalesce(func.sum(EmailCampaign.click_count), 0)
+            ).one()
+            posts_today = session.query(func.count(SocialMediaPost.id)).filter(
+                SocialMediaPost.posted_at >= day_ago
+            ).scalar()
         
         open_rate = (total_opens / total_sent * 100) if total_sent > 0 else 0
         click_rate = (total_clicks / total_opens * 100) if total_opens > 0 else 0
@@ -310,10 +409,7 @@ def get_communications_summary():
                 'click_rate': round(click_rate, 2)
             },
             'social_summary': {
-                'total_followers': sum(platform['members'] if 'members' in platform else platform.get('followers', platform.get('subscribers', 0)) 
-                                     for platform in sample_social_metrics.values()),
-                'total_engagement_today': sum(platform.get('messages_today', platform.get('impressions_today', 0)) 
-                                            for platform in sample_social_metrics.values())
+                'posts_today': posts_today
             }
         })
         
@@ -0,0 +1,144 @@
+"""
+Admin Console Command Routes
+Queue remote management commands for one console, a group, or the whole fleet,
+and follow their delivery and results
+"""
+
+from flask import Blueprint, request, jsonify
+from sqlalchemy import desc
+from shared.database.connection import SessionLocal
+from shared.models.console_commands import ConsoleCommand
+from shared.auth.auto_rbac_decorator import console_management_required
+from shared.auth.admin_roles import Permission
+from shared.auth.admin_context import get_current_admin_id, log_admin_action
+from shared.services.console_commands import CommandError, get_command_queue
+import logging
+
+logger = logging.getLogger(__name__)
+
+admin_console_commands_bp = Blueprint('admin_console_commands', __name__, url_prefix='/v1/admin/console-commands')
+
+def _command_data(command):
+    return {
+        'id': command.id,
+        'console_id': command.console_id,
+        'batch_id': command.batch_id,
+        'command_type': command.command_type,
+        'payload': command.payload,
+        'status': command.status,
+        'attempts': command.attempts,
+        'exit_code': command.exit_code,
+        'result': command.result,
+        'output': command.output,
+        'created_at': command.created_at.isoformat(),
+        'delivered_at': command.delivered_at.isoformat() if command.delivered_at else None,
+        'acked_at': command.acked_at.isoformat() if command.acked_at else None,
+        'completed_at': command.completed_at.isoformat() if command.completed_at else None,
+        'expires_at': command.expires_at.isoformat()
+    }
+
+def queue_command(session, command_type, target, payload=None, **options):
+    """Queue a command for the current admin, audit it, and wake the targeted consoles"""
+    queue = get_command_queue()
+    batch = queue.enqueue(session, command_type, target, payload, admin_id=get_current_admin_id(), **options)
+    log_admin_action(session, "console_command_queued", f"{command_type} queued for {batch['count']} consoles by admin",
+                     {'command_type': command_type, 'target': target, 'payload': payload,
+                      'batch_id': batch['batch_id'], 'count': batch['count']})
+    session.commit()
+    queue.notify_batch(batch)
+    return batch
+
+@admin_console_commands_bp.route('', methods=['POST'])
+@console_management_required(Permission.CONSOLE_REMOTE)
+def create_command():
+    """
+    Queue a command
+    Body: command_type, target ({"console_ids": [...]}, {"arena_id": 3},
+    {"game_version": "1.2.0"}, {"all": true}, ...), payload, timeout_seconds, ttl_seconds
+    """
+    try:
+        data = request.get_json() or {}
+        options = {key: int(data[key]) for key in ('timeout_seconds', 'ttl_seconds', 'max_attempts') if key in data}
+
+        with SessionLocal() as session:
+            batch = queue_command(session, data.get('command_type'), data.get('target') or {},
+                                  data.get('payload'), **options)
+
+        return jsonify({'success': True, 'batch_id': batch['batch_id'], 'count': batch['count']}), 201
+
+    except (CommandError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error queueing console command: {e}")
+        return jsonify({'error': 'Failed to queue command'}), 500
+
+@admin_console_commands_bp.route('', methods=['GET'])
+@console_management_required(Permission.CONSOLE_VIEW)
+def list_commands():
+    """Recent commands, filtered by console_id, batch_id or status"""
+    try:
+        limit = min(request.args.get('limit', 100, type=int), 500)
+        with SessionLocal() as session:
+            query = session.query(ConsoleCommand)
+            if request.args.get('console_id'):
+                query = query.filter(ConsoleCommand.console_id == request.args.get('console_id', type=int))
+            if request.args.get('batch_id'):
+                query = query.filter(ConsoleCommand.batch_id == request.args['batch_id'])
+            if request.args.get('status'):
+                query = query.filter(ConsoleCommand.status == request.args['status'])
+            commands = query.order_by(desc(ConsoleCommand.id)).limit(limit).all()
+            return jsonify({'commands': [_command_data(c) for c in commands]})
+
+    except Exception as e:
+        logger.error(f"Error listing console commands: {e}")
+        return jsonify({'error': 'Failed to retrieve commands'}), 500
+
+@admin_console_commands_bp.route('/batches/<batch_id>', methods=['GET'])
+@console_management_required(Permission.CONSOLE_VIEW)
+def get_batch(batch_id):
+    """Progress of a fleet or group command, by status"""
+    try:
+        with SessionLocal() as session:
+            summary = get_command_queue().batch_summary(session, batch_id)
+            if not summary:
+                return jsonify({'error': 'Batch not found'}), 404
+            return jsonify({'batch_id': batch_id, 'total': sum(summary.values()), 'statuses': summary})
+
+    except Exception as e:
+        logger.error(f"Error getting console command batch {batch_id}: {e}")
+        return jsonify({'error': 'Failed to retrieve batch'}), 500
+
+@admin_console_commands_bp.route('/<int:command_id>/cancel', methods=['POST'])
+@console_management_required(Permission.CONSOLE_REMOTE)
+def cancel_command(command_id):
+    """Cancel a command no console has started"""
+    try:
+        with SessionLocal() as session:
+            cancelled = get_command_queue().cancel(session, command_id=command_id)
+            if cancelled:
+                log_admin_action(session, "console_command_cancelled", f"Console command {command_id} cancelled by admin",
+                                 {'command_id': command_id})
+            session.commit()
+            if not cancelled:
+                return jsonify({'error': 'Command not found or already started'}), 409
+            return jsonify({'success': True})
+
+    except Exception as e:
+        logger.error(f"Error cancelling console command {command_id}: {e}")
+        return jsonify({'error': 'Failed to cancel command'}), 500
+
+@admin_console_commands_bp.route('/batches/<batch_id>/cancel', methods=['POST'])
+@console_management_required(Permission.CONSOLE_REMOTE)
+def cancel_batch(batch_id):
+    """Cancel every command of a batch that has not started"""
+    try:
+        with SessionLocal() as session:
+            cancelled = get_command_queue().cancel(session, batch_id=batch_id)
+            log_admin_action(session, "console_command_cancelled", f"{cancelled} commands of batch {batch_id} cancelled by admin",
+                             {'batch_id': batch_id, 'cancelled': cancelled})
+            session.commit()
+            return jsonify({'success': True, 'cancelled': cancelled})
+
+    except Exception as e:
+        logger.error(f"Error cancelling console command batch {batch_id}: {e}")
+        return jsonify({'error': 'Failed to cancel batch'}), 500
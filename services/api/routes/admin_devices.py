@@ -13,6 +13,7 @@ from shared.auth.admin_roles import Permission
 from shared.auth.decorators import admin_required
 import logging
 from shared.auth.admin_context import log_admin_action, get_current_admin_id
+from shared.services.console_commands import get_command_queue
 
 logger = logging.getLogger(__name__)
 
@@ -273,15 +274,18 @@ def reboot_device(device_uid):
             if console.status != ConsoleStatus.active:
                 return jsonify({'error': 'Console is not active'}), 400
             
-            # TODO: Implement actual remote reboot via WebSocket or message queue
-            # For now, just log the command
-            log_admin_action(session, "console_reboot_command", f"Console {device_uid} reboot command by admin", {'message': f"Reboot command sent to console {device_uid}", 'device_uid': device_uid, 'device_id': console.id}
+            # Delivered on the console's next command poll
+            queue = get_command_queue()
+            batch = queue.enqueue(session, "reboot", {'console_ids': [console.id]}, admin_id=get_current_admin_id())
+            log_admin_action(session, "console_reboot_command", f"Console {device_uid} reboot command by admin", {'message': f"Reboot command queued for console {device_uid}", 'device_uid': device_uid, 'device_id': console.id, 'batch_id': batch['batch_id']}
             )
             session.commit()
+            queue.notify_batch(batch)
             
             return jsonify({
                 'success': True,
-                'message': f'Reboot command sent to {device_uid}'
+                'message': f'Reboot command queued for {device_uid}',
+                'batch_id': batch['batch_id']
             })
             
     except Exception as e:
@@ -302,15 +306,18 @@ def shutdown_device(device_uid):
             if console.status != ConsoleStatus.active:
                 return jsonify({'error': 'Console is not active'}), 400
             
-            # TODO: Implement actual remote shutdown via WebSocket or message queue
-            # For now, just log the command
-            log_admin_action(session, "console_shutdown_command", f"Console {device_uid} shutdown command by admin", {'message': f"Shutdown command sent to console {device_uid}", 'device_uid': device_uid, 'device_id': console.id}
+            # Delivered on the console's next command poll
+            queue = get_command_queue()
+            batch = queue.enqueue(session, "shutdown", {'console_ids': [console.id]}, admin_id=get_current_admin_id())
+            log_admin_action(session, "console_shutdown_command", f"Console {device_uid} shutdown command by admin", {'message': f"Shutdown command queued for console {device_uid}", 'device_uid': device_uid, 'device_id': console.id, 'batch_id': batch['batch_id']}
             )
             session.commit()
+            queue.notify_batch(batch)
             
             return jsonify({
                 'success': True,
-                'message': f'Shutdown command sent to {device_uid}'
+                'message': f'Shutdown command queued for {device_uid}',
+                'batch_id': batch['batch_id']
             })
             
     except Exception as e:
@@ -328,20 +335,19 @@ def ping_device(device_uid):
             if not console:
                 return jsonify({'error': 'Console not found'}), 404
             
-            # TODO: Implement actual ping via WebSocket or message queue
-            # For now, just log the ping attempt
-            log_admin_action(session, "console_ping_command", f"Console {device_uid} ping command by admin", {'message': f"Ping sent to console {device_uid}", 'device_uid': device_uid, 'device_id': console.id}
+            # The console answers on its next command poll; follow the batch for the result
+            queue = get_command_queue()
+            batch = queue.enqueue(session, "ping", {'console_ids': [console.id], 'status': None}, ttl_seconds=300,
+                                  admin_id=get_current_admin_id())
+            log_admin_action(session, "console_ping_command", f"Console {device_uid} ping command by admin", {'message': f"Ping queued for console {device_uid}", 'device_uid': device_uid, 'device_id': console.id, 'batch_id': batch['batch_id']}
             )
             session.commit()
-            
-            # Mock ping response (in real implementation, this would wait for actual response)
-            import random
-            success = random.choice([True, False, True, True])  # 75% success rate
+            queue.notify_batch(batch)
             
             return jsonify({
-                'success': success,
-                'message': f'Ping {"successful" if success else "failed"} for {device_uid}',
-                'response_time': round(random.uniform(10, 100), 2) if success else None
+                'success': True,
+                'message': f'Ping queued for {device_uid}',
+                'batch_id': batch['batch_id']
             })
             
     except Exception as e:
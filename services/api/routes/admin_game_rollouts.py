@@ -0,0 +1,199 @@
+"""
+Admin Game Rollout Routes
+Staged percentage rollouts of published game builds to consoles: start, widen,
+halt, resume, complete and roll back, with crash health per rollout
+"""
+
+from flask import Blueprint, request, jsonify
+from sqlalchemy import func
+from shared.database.connection import SessionLocal
+from shared.models.game_releases import ConsoleGameInstall, GameRollout
+from shared.auth.auto_rbac_decorator import auto_rbac_required
+from shared.auth.admin_roles import Permission
+from shared.services.game_releases import (
+    ACTIVE, COMPLETED, HALTED, ROLLED_BACK, current_rollout, get_release_store, rollout_health, set_status, utcnow
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+admin_game_rollouts_bp = Blueprint('admin_game_rollouts', __name__, url_prefix='/v1/admin/game-rollouts')
+
+def _rollout_data(rollout):
+    return {
+        'id': rollout.id,
+        'version': rollout.version,
+        'previous_version': rollout.previous_version,
+        'percent': rollout.percent,
+        'status': rollout.status,
+        'crash_rate_threshold': rollout.crash_rate_threshold,
+        'min_consoles': rollout.min_consoles,
+        'halt_reason': rollout.halt_reason,
+        'started_at': rollout.started_at.isoformat(),
+        'updated_at': rollout.updated_at.isoformat(),
+        'halted_at': rollout.halted_at.isoformat() if rollout.halted_at else None
+    }
+
+def _stable_version(session, store, version):
+    """Version consoles outside a new rollout keep running"""
+    rollout = current_rollout(session)
+    if rollout is not None:
+        return rollout.version if rollout.status == COMPLETED else rollout.previous_version
+    versions = [r['version'] for r in store.manifest()['releases']]
+    index = versions.index(version)
+    return versions[index - 1] if index > 0 else None
+
+def _parse_percent(value):
+    percent = float(value)
+    if not 0 <= percent <= 100:
+        raise ValueError('percent must be between 0 and 100')
+    return percent
+
+@admin_game_rollouts_bp.route('', methods=['GET'])
+@auto_rbac_required(override_permissions=[Permission.CONSOLE_VIEW])
+def list_rollouts():
+    """Published releases, recent rollouts, and the installed version spread"""
+    try:
+        store = get_release_store()
+        releases = [{k: r[k] for k in ('version', 'sha256', 'size', 'published_at', 'notes')}
+                    for r in store.manifest()['releases']]
+        deltas = {(d['from'], d['to']): d['size'] for d in store.manifest()['deltas']}
+        for previous, release in zip(releases, releases[1:]):
+            release['delta_size'] = deltas.get((previous['version'], release['version']))
+
+        with SessionLocal() as session:
+            rollouts = session.query(GameRollout).order_by(GameRollout.id.desc()).limit(20).all()
+            installed = dict(session.query(ConsoleGameInstall.version, func.count())
+                             .group_by(ConsoleGameInstall.version).all())
+            rollout_list = [_rollout_data(r) for r in rollouts]
+            if rollouts:
+                rollout_list[0]['health'] = rollout_health(session, rollouts[0])
+
+        return jsonify({'releases': releases, 'rollouts': rollout_list, 'installed_versions': installed})
+
+    except Exception as e:
+        logger.error(f"Error listing game rollouts: {e}")
+        return jsonify({'error': 'Failed to retrieve game rollouts'}), 500
+
+@admin_game_rollouts_bp.route('', methods=['POST'])
+@auto_rbac_required(override_permissions=[Permission.CONSOLE_MANAGE])
+def start_rollout():
+    """Start rolling a published version out to a percentage of consoles"""
+    try:
+        data = request.get_json() or {}
+        version = data.get('version')
+        store = get_release_store()
+        if not version or not store.release(version):
+            return jsonify({'error': 'Published version required'}), 400
+        try:
+            percent = _parse_percent(data.get('percent', 5))
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+
+        with SessionLocal() as session:
+            rollout = current_rollout(session)
+            if rollout is not None and rollout.status in (ACTIVE, HALTED):
+                return jsonify({'error': f'Rollout of {rollout.version} is still {rollout.status}'}), 409
+
+            now = utcnow()
+            rollout = GameRollout(
+                version=version,
+                previous_version=data.get('previous_version') or _stable_version(session, store, version),
+                percent=percent,
+                status=ACTIVE,
+                crash_rate_threshold=float(data.get('crash_rate_threshold', 0.05)),
+                min_consoles=int(data.get('min_consoles', 5)),
+                started_at=now,
+                updated_at=now
+            )
+            session.add(rollout)
+            session.commit()
+
+            logger.info(f"Game rollout {rollout.id} started: {version} to {percent}% of consoles")
+            return jsonify({'success': True, 'rollout': _rollout_data(rollout)}), 201
+
+    except Exception as e:
+        logger.error(f"Error starting game rollout: {e}")
+        return jsonify({'error': 'Failed to start rollout'}), 500
+
+@admin_game_rollouts_bp.route('/<int:rollout_id>/percent', methods=['PUT'])
+@auto_rbac_required(override_permissions=[Permission.CONSOLE_MANAGE])
+def update_rollout_percent(rollout_id):
+    """Widen (or narrow) an active rollout; consoles already in the cohort stay in it when widening"""
+    try:
+        data = request.get_json() or {}
+        try:
+            percent = _parse_percent(data.get('percent'))
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+
+        with SessionLocal() as session:
+            rollout = session.get(GameRollout, rollout_id)
+            if not rollout:
+                return jsonify({'error': 'Rollout not found'}), 404
+            if rollout.status != ACTIVE:
+                return jsonify({'error': f'Rollout is {rollout.status}'}), 409
+
+            rollout.percent = percent
+            rollout.updated_at = utcnow()
+            session.commit()
+            return jsonify({'success': True, 'rollout': _rollout_data(rollout)})
+
+    except Exception as e:
+        logger.error(f"Error updating game rollout {rollout_id}: {e}")
+        return jsonify({'error': 'Failed to update rollout'}), 500
+
+def _transition(rollout_id, status, from_statuses, reason=None):
+    with SessionLocal() as session:
+        if not session.get(GameRollout, rollout_id):
+            return jsonify({'error': 'Rollout not found'}), 404
+        if not set_status(session, rollout_id, status, reason, from_statuses=from_statuses):
+            return jsonify({'error': f'Rollout cannot move to {status}'}), 409
+        session.commit()
+        session.expire_all()
+        logger.info(f"Game rollout {rollout_id} -> {status}")
+        return jsonify({'success': True, 'rollout': _rollout_data(session.get(GameRollout, rollout_id))})
+
+@admin_game_rollouts_bp.route('/<int:rollout_id>/halt', methods=['POST'])
+@auto_rbac_required(override_permissions=[Permission.CONSOLE_MANAGE])
+def halt_rollout(rollout_id):
+    """Stop moving consoles to the version; consoles already on it keep it"""
+    try:
+        reason = (request.get_json(silent=True) or {}).get('reason') or 'Halted by admin'
+        return _transition(rollout_id, HALTED, (ACTIVE,), reason)
+    except Exception as e:
+        logger.error(f"Error halting game rollout {rollout_id}: {e}")
+        return jsonify({'error': 'Failed to halt rollout'}), 500
+
+@admin_game_rollouts_bp.route('/<int:rollout_id>/resume', methods=['POST'])
+@auto_rbac_required(override_permissions=[Permission.CONSOLE_MANAGE])
+def resume_rollout(rollout_id):
+    try:
+        return _transition(rollout_id, ACTIVE, (HALTED,))
+    except Exception as e:
+        logger.error(f"Error resuming game rollout {rollout_id}: {e}")
+        return jsonify({'error': 'Failed to resume rollout'}), 500
+
+@admin_game_rollouts_bp.route('/<int:rollout_id>/complete', methods=['POST'])
+@auto_rbac_required(override_permissions=[Permission.CONSOLE_MANAGE])
+def complete_rollout(rollout_id):
+    """Send every console to the version"""
+    try:
+        return _transition(rollout_id, COMPLETED, (ACTIVE,))
+    except Exception as e:
+        logger.error(f"Error completing game rollout {rollout_id}: {e}")
+        return jsonify({'error': 'Failed to complete rollout'}), 500
+
+@admin_game_rollouts_bp.route('/<int:rollout_id>/rollback', methods=['POST'])
+@auto_rbac_required(override_permissions=[Permission.CONSOLE_MANAGE])
+def rollback_rollout(rollout_id):
+    """Send every console back to the previous version"""
+    try:
+        with SessionLocal() as session:
+            rollout = session.get(GameRollout, rollout_id)
+            if rollout and not rollout.previous_version:
+                return jsonify({'error': 'Rollout has no previous version to roll back to'}), 409
+        return _transition(rollout_id, ROLLED_BACK, (ACTIVE, HALTED, COMPLETED))
+    except Exception as e:
+        logger.error(f"Error rolling back game rollout {rollout_id}: {e}")
+        return jsonify({'error': 'Failed to roll back rollout'}), 500
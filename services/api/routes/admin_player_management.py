@@ -13,6 +13,7 @@ from shared.auth.admin_roles import Permission
 import logging
 from shared.auth.admin_context import log_admin_action, get_current_admin_id
 from shared.services.player_moderation_service import PlayerModerationService
+from shared.services.leaderboards import get_leaderboards
 from shared.models.player_moderation import BanType, BanReason, WarningType
 
 logger = logging.getLogger(__name__)
@@ -375,13 +376,20 @@ def get_player_statistics():
             # Average ELO rating
             avg_elo = session.query(func.avg(Player.elo_rating)).scalar() or 1000
             
-            # Top players
-            top_players = session.query(Player).order_by(desc(Player.elo_rating)).limit(10).all()
+            # Top players of the current season, from the leaderboard
+            top_entries = get_leaderboards().top(limit=10)['entries']
+            top_players = {player.id: player for player in session.query(Player).filter(
+                Player.id.in_([entry['player_id'] for entry in top_entries])
+            ).all()}
             
             top_players_data = []
-            for player in top_players:
+            for entry in top_entries:
+                player = top_players.get(entry['player_id'])
+                if player is None:
+                    continue
                 top_players_data.append({
                     'id': player.id,
+                    'rank': entry['rank'],
                     'display_name': player.display_name,
                     'email': player.email,
                     'elo_rating': player.elo_rating
@@ -11,6 +11,9 @@ from shared.models.tournaments import (
     Tournament, TournamentParticipant, TournamentMatch, PlayerWallet, WalletTransaction,
     TournamentStatus, TournamentType, TransactionType
 )
+from shared.services.tournament_brackets import bracket_service, BracketError
+from shared.services import wallet_ledger
+from shared.services.wallet_ledger import LedgerError
 from shared.auth.auto_rbac_decorator import auto_rbac_required
 from shared.auth.admin_roles import Permission
 import logging
@@ -312,10 +315,9 @@ def start_tournament(tournament_id):
             # Update tournament status
             tournament.status = TournamentStatus.IN_PROGRESS
             tournament.start_time = datetime.now(timezone.utc)
-            tournament.current_round = 1
             
-            # TODO: Generate tournament bracket/matches based on format
-            # This would be implemented based on the tournament format
+            # Seed by ELO and create round 1 in one bulk transaction
+            bracket = bracket_service.start(session, tournament)
             
             session.commit()
             
@@ -323,9 +325,85 @@ def start_tournament(tournament_id):
             
             return jsonify({
                 'success': True,
-                'message': f'Tournament "{tournament.name}" started successfully'
+                'message': f'Tournament "{tournament.name}" started successfully',
+                'bracket': bracket
             })
             
+    except BracketError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error starting tournament: {e}")
         return jsonify({'error': 'Failed to start tournament'}), 500
+
+@admin_tournaments_bp.route('/<int:tournament_id>/matches/<int:tournament_match_id>/result', methods=['POST'])
+@auto_rbac_required(override_permissions=[Permission.GAME_TOURNAMENTS])
+def report_tournament_match_result(tournament_id, tournament_match_id):
+    """Record a tournament match result; the next round is created when the round completes"""
+    data = request.get_json() or {}
+    
+    try:
+        with SessionLocal() as session:
+            tournament_match = session.query(TournamentMatch).filter(
+                TournamentMatch.id == tournament_match_id,
+                TournamentMatch.tournament_id == tournament_id
+            ).first()
+            
+            if not tournament_match:
+                return jsonify({'error': 'Tournament match not found'}), 404
+            
+            result = bracket_service.record_result(session, tournament_match, data.get('winner_id'))
+            session.commit()
+            
+            return jsonify({'success': True, **result})
+            
+    except BracketError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error recording tournament match result: {e}")
+        return jsonify({'error': 'Failed to record result'}), 500
+
+@admin_tournaments_bp.route('/<int:tournament_id>/payouts', methods=['POST'])
+@auto_rbac_required(override_permissions=[Permission.GAME_TOURNAMENTS])
+def pay_tournament_prizes(tournament_id):
+    """Credit prize amounts to participants' wallets; already paid prizes are skipped"""
+    try:
+        with SessionLocal() as session:
+            tournament = session.query(Tournament).filter(Tournament.id == tournament_id).first()
+            
+            if not tournament:
+                return jsonify({'error': 'Tournament not found'}), 404
+            
+            if tournament.status != TournamentStatus.COMPLETED:
+                return jsonify({'error': 'Prizes can only be paid for completed tournaments'}), 400
+            
+            winners = session.query(TournamentParticipant).filter(
+                TournamentParticipant.tournament_id == tournament_id,
+                TournamentParticipant.prize_amount > 0
+            ).all()
+            
+            # Lock wallets in id order so concurrent payouts cannot deadlock
+            wallets = sorted(
+                ((wallet_ledger.get_or_create_wallet(session, p.player_id).id, p) for p in winners),
+                key=lambda item: item[0]
+            )
+            
+            payouts = []
+            for wallet_id, participant in wallets:
+                result = wallet_ledger.pay_tournament_prize(session, wallet_id, tournament_id, participant.prize_amount)
+                payouts.append({
+                    'player_id': participant.player_id,
+                    'amount': float(result.amount),
+                    'already_paid': result.replayed
+                })
+            
+            session.commit()
+            
+            logger.info(f"Paid {sum(1 for p in payouts if not p['already_paid'])} prizes for tournament {tournament_id}")
+            
+            return jsonify({'success': True, 'payouts': payouts})
+            
+    except LedgerError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error paying tournament prizes: {e}")
+        return jsonify({'error': 'Failed to pay tournament prizes'}), 500
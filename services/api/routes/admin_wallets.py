@@ -0,0 +1,117 @@
+"""
+Admin wallet routes - Withdrawal payouts
+Player withdrawals hold funds until an admin records the payout or cancels it
+"""
+
+from flask import Blueprint, jsonify, request, g
+from shared.database.connection import SessionLocal
+from shared.services import wallet_ledger
+from shared.services.wallet_ledger import LedgerError, WithdrawalNotFound
+from shared.auth.auto_rbac_decorator import auto_rbac_required
+from shared.auth.admin_roles import Permission
+from shared.security import AdminAuditLogger
+import logging
+
+logger = logging.getLogger(__name__)
+
+admin_wallets_bp = Blueprint('admin_wallets', __name__, url_prefix='/v1/admin/wallets')
+
+@admin_wallets_bp.route('/withdrawals', methods=['GET'])
+@auto_rbac_required(override_permissions=[Permission.ANALYTICS_REVENUE])
+def get_pending_withdrawals():
+    """Withdrawals waiting for a payout, oldest first"""
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+        page_size = min(max(int(request.args.get('page_size', 50)), 1), 200)
+
+        with SessionLocal() as session:
+            withdrawals, total = wallet_ledger.pending_withdrawals(
+                session, limit=page_size, offset=(page - 1) * page_size
+            )
+
+            return jsonify({
+                'withdrawals': withdrawals,
+                'total': total,
+                'page': page,
+                'page_size': page_size
+            })
+
+    except ValueError:
+        return jsonify({'error': 'Invalid pagination parameters'}), 400
+    except Exception as e:
+        logger.error(f"Error getting pending withdrawals: {e}")
+        return jsonify({'error': 'Failed to get pending withdrawals'}), 500
+
+@admin_wallets_bp.route('/withdrawals/<int:entry_id>/settle', methods=['POST'])
+@auto_rbac_required(override_permissions=[Permission.ANALYTICS_REVENUE], require_super_admin=True)
+def settle_withdrawal(entry_id):
+    """Record that a held withdrawal was paid out; repeating it with the same withdrawal is a no-op"""
+    try:
+        data = request.get_json(silent=True) or {}
+        payout_reference = str(data.get('payout_reference') or '').strip()
+        if not payout_reference or len(payout_reference) > 100:
+            return jsonify({'error': 'payout_reference required'}), 400
+
+        with SessionLocal() as session:
+            try:
+                settlement_id = wallet_ledger.settle_withdrawal(session, entry_id, payout_reference)
+                session.commit()
+            except WithdrawalNotFound as e:
+                session.rollback()
+                return jsonify({'error': str(e)}), 404
+            except LedgerError as e:
+                session.rollback()
+                return jsonify({'error': str(e)}), 409
+
+        AdminAuditLogger.log_admin_action(
+            'withdrawal_settled',
+            details={'withdrawal_id': entry_id, 'payout_reference': payout_reference},
+            resource_type='withdrawal',
+            resource_id=entry_id
+        )
+        logger.info(f"Withdrawal {entry_id} settled by admin {g.admin_id} ({payout_reference})")
+
+        return jsonify({'success': True, 'withdrawal_id': entry_id, 'settlement_id': settlement_id})
+
+    except Exception as e:
+        logger.error(f"Error settling withdrawal {entry_id}: {e}")
+        return jsonify({'error': 'Failed to settle withdrawal'}), 500
+
+@admin_wallets_bp.route('/withdrawals/<int:entry_id>/cancel', methods=['POST'])
+@auto_rbac_required(override_permissions=[Permission.ANALYTICS_REVENUE], require_super_admin=True)
+def cancel_withdrawal(entry_id):
+    """Return a held withdrawal's funds to the player's wallet"""
+    try:
+        data = request.get_json(silent=True) or {}
+
+        with SessionLocal() as session:
+            try:
+                result = wallet_ledger.cancel_withdrawal(session, entry_id)
+                session.commit()
+            except WithdrawalNotFound as e:
+                session.rollback()
+                return jsonify({'error': str(e)}), 404
+            except LedgerError as e:
+                session.rollback()
+                return jsonify({'error': str(e)}), 409
+
+        if not result.replayed:
+            AdminAuditLogger.log_admin_action(
+                'withdrawal_cancelled',
+                details={'withdrawal_id': entry_id, 'reason': data.get('reason')},
+                resource_type='withdrawal',
+                resource_id=entry_id
+            )
+            logger.info(f"Withdrawal {entry_id} cancelled by admin {g.admin_id}")
+
+        return jsonify({
+            'success': True,
+            'withdrawal_id': entry_id,
+            'wallet_id': result.wallet_id,
+            'amount': float(result.amount),
+            'balance': float(result.balance)
+        })
+
+    except Exception as e:
+        logger.error(f"Error cancelling withdrawal {entry_id}: {e}")
+        return jsonify({'error': 'Failed to cancel withdrawal'}), 500
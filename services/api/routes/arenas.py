@@ -2,9 +2,12 @@
 Arena management routes - Basic arena system
 """
 
+import random
+
 from flask import Blueprint, request, jsonify
 from shared.database.connection import SessionLocal
 from shared.models.arena import Arena
+from shared.services.arena_selector import get_arena_selector
 
 arenas_bp = Blueprint('arenas', __name__, url_prefix='/v1/arenas')
 
@@ -13,7 +16,7 @@ def get_arena_list():
     """Get list of available arenas"""
     try:
         with SessionLocal() as session:
-            arenas = session.query(Arena).all()
+            arenas = session.query(Arena).filter(Arena.is_active == True).all()
             
             arena_list = []
             for arena in arenas:
@@ -39,50 +42,39 @@ def get_arena_list():
 def get_random_arena():
     """Get a random arena"""
     try:
-        with SessionLocal() as session:
-            from sqlalchemy import func
-            arena = session.query(Arena).order_by(func.random()).first()
-            
-            if not arena:
-                return jsonify({"error": "No arenas available"}), 404
-            
-            arena_data = {
-                "id": arena.id,
-                "name": arena.name,
-                "mana_color": arena.mana_color,
-                "difficulty": arena.difficulty_rating,
-                "story_text": arena.story_text,
-                "flavor_text": arena.flavor_text
-            }
-            
-            return jsonify(arena_data)
+        arena = get_arena_selector().pick_uniform()
+        
+        if not arena:
+            return jsonify({"error": "No arenas available"}), 404
+        
+        return jsonify(arena.to_dict())
             
     except Exception as e:
         return jsonify({"error": "Failed to get random arena"}), 500
 
 @arenas_bp.route('/weighted', methods=['POST'])
 def get_weighted_arena():
-    """Get arena based on player preferences"""
+    """Draw an arena by rarity and weight, limited to the game mode and player ELO when given"""
     try:
-        with SessionLocal() as session:
-            # For now, just return a random arena
-            from sqlalchemy import func
-            arena = session.query(Arena).order_by(func.random()).first()
-            
-            if not arena:
-                return jsonify({"error": "No arenas available"}), 404
-            
-            arena_data = {
-                "id": arena.id,
-                "name": arena.name,
-                "mana_color": arena.mana_color,
-                "difficulty": arena.difficulty_rating,
-                "story_text": arena.story_text,
-                "flavor_text": arena.flavor_text,
-                "selection_reason": "random"
-            }
-            
-            return jsonify(arena_data)
+        data = request.get_json(silent=True) or {}
+        mode = data.get('mode')
+        elo = data.get('elo')
+        seed = data.get('seed')  # Same seed, same draw; used for replays and tests
+        
+        try:
+            elo = int(elo) if elo is not None else None
+        except (TypeError, ValueError):
+            return jsonify({"error": "elo must be an integer"}), 400
+        
+        arena = get_arena_selector().pick(mode=mode, elo=elo, rng=random.Random(seed) if seed is not None else None)
+        
+        if not arena:
+            return jsonify({"error": "No arenas available"}), 404
+        
+        arena_data = arena.to_dict()
+        arena_data["selection_reason"] = "weighted"
+        
+        return jsonify(arena_data)
             
     except Exception as e:
-        return jsonify({"error": "Failed to get weighted arena"}), 500
\ No newline at end of file
+        return jsonify({"error": "Failed to get weighted arena"}), 500
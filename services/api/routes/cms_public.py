@@ -3,24 +3,64 @@ Public CMS Routes
 Public endpoints for serving news articles and videos to the frontend
 """
 
+import os
 import logging
+import ipaddress
 from flask import Blueprint, jsonify, request
 from sqlalchemy import desc, and_
 from sqlalchemy.orm import joinedload
 
 from shared.database.connection import SessionLocal
 from shared.models.cms import (
-    NewsArticle, VideoContent, ContentView, ContentStatus
+    NewsArticle, VideoContent, ContentStatus
 )
+from shared.services.view_counter import get_view_counter, ARTICLE, VIDEO
+from shared.services.response_cache import cached_response, CMS_NEWS, CMS_VIDEOS
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Proxies in front of the API that append to X-Forwarded-For (nginx)
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "1"))
+
 # Create blueprint
 cms_public_bp = Blueprint('cms_public', __name__, url_prefix='/v1/cms')
 
 
+def viewer_ip() -> str:
+    """
+    The client address as seen by the nearest trusted proxy
+
+    Proxies append to X-Forwarded-For, so only the last TRUSTED_PROXY_HOPS entries
+    were written by our own infrastructure; anything before them came from the
+    client and is not trusted. Falls back to the peer address.
+    """
+    hops = [hop.strip() for hop in request.headers.get('X-Forwarded-For', '').split(',') if hop.strip()]
+    if TRUSTED_PROXY_HOPS and len(hops) >= TRUSTED_PROXY_HOPS:
+        try:
+            return str(ipaddress.ip_address(hops[-TRUSTED_PROXY_HOPS]))
+        except ValueError:
+            pass
+    return request.remote_addr or '0.0.0.0'
+
+
+def track_view(kind: str, content_id: int) -> int:
+    """Count a view without touching the database; returns views not yet flushed for the item"""
+    counter = get_view_counter()
+    try:
+        counter.record(
+            kind, content_id,
+            ip_address=viewer_ip(),
+            user_agent=request.headers.get('User-Agent'),
+            referrer=request.headers.get('Referer')
+        )
+    except Exception as e:
+        logger.warning(f"Failed to track view for {kind} {content_id}: {e}")
+    return counter.pending(kind, content_id)
+
+
 @cms_public_bp.route('/news', methods=['GET'])
+@cached_response(CMS_NEWS)
 def get_public_news():
     """Get published news articles for public consumption"""
     try:
@@ -98,21 +138,8 @@ def get_public_article(slug: str):
             if not article:
                 return jsonify({'error': 'Article not found'}), 404
 
-            # Track view
-            try:
-                view = ContentView(
-                    article_id=article.id,
-                    ip_address=request.remote_addr or '0.0.0.0',
-                    user_agent=request.headers.get('User-Agent'),
-                    referrer=request.headers.get('Referer')
-                )
-                session.add(view)
-                
-                # Increment view count
-                article.view_count += 1
-                session.commit()
-            except Exception as e:
-                logger.warning(f"Failed to track view for article {article.id}: {e}")
+            # Track view (flushed to view_count / content_views in batches)
+            unflushed_views = track_view(ARTICLE, article.id)
 
             return jsonify({
                 'id': article.id,
@@ -128,7 +155,7 @@ def get_public_article(slug: str):
                 'meta_title': article.meta_title,
                 'meta_description': article.meta_description,
                 'tags': article.tags or [],
-                'view_count': article.view_count,
+                'view_count': article.view_count + unflushed_views,
                 'like_count': article.like_count,
                 'share_count': article.share_count,
                 'published_at': article.published_at.isoformat() if article.published_at else None,
@@ -143,6 +170,7 @@ def get_public_article(slug: str):
 
 
 @cms_public_bp.route('/videos', methods=['GET'])
+@cached_response(CMS_VIDEOS)
 def get_public_videos():
     """Get published videos for public consumption"""
     try:
@@ -235,21 +263,8 @@ def get_public_video(slug: str):
             if not video:
                 return jsonify({'error': 'Video not found'}), 404
 
-            # Track view
-            try:
-                view = ContentView(
-                    video_id=video.id,
-                    ip_address=request.remote_addr or '0.0.0.0',
-                    user_agent=request.headers.get('User-Agent'),
-                    referrer=request.headers.get('Referer')
-                )
-                session.add(view)
-                
-                # Increment view count
-                video.view_count += 1
-                session.commit()
-            except Exception as e:
-                logger.warning(f"Failed to track view for video {video.id}: {e}")
+            # Track view (flushed to view_count / content_views in batches)
+            unflushed_views = track_view(VIDEO, video.id)
 
             # Format duration
             duration_formatted = None
@@ -275,7 +290,7 @@ def get_public_video(slug: str):
                 'meta_title': video.meta_title,
                 'meta_description': video.meta_description,
                 'tags': video.tags or [],
-                'view_count': video.view_count,
+                'view_count': video.view_count + unflushed_views,
                 'like_count': video.like_count,
                 'share_count': video.share_count,
                 'watch_time_seconds': video.watch_time_seconds,
@@ -291,6 +306,7 @@ def get_public_video(slug: str):
 
 
 @cms_public_bp.route('/featured', methods=['GET'])
+@cached_response(CMS_NEWS, CMS_VIDEOS)
 def get_featured_content():
     """Get featured news and videos for homepage"""
     try:
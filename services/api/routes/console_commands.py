@@ -0,0 +1,90 @@
+"""
+Console Command API Routes
+Consoles fetch queued remote management commands, acknowledge them, and report
+their results. Consoles wait for commands in the realtime service, so polls here
+hold a sync worker for at most CONSOLE_COMMAND_LONG_POLL_MAX_SECONDS
+"""
+
+import os
+from flask import Blueprint, request, jsonify, g
+from shared.database.connection import SessionLocal
+from shared.models.base import Console
+from shared.auth.decorators import device_required
+from shared.services.console_commands import LONG_POLL_MAX_SECONDS, get_command_queue
+import logging
+
+logger = logging.getLogger(__name__)
+
+CONSOLE_COMMAND_SWEEPER_ENABLED = os.getenv("CONSOLE_COMMAND_SWEEPER_ENABLED", "true").lower() == "true"
+
+console_commands_bp = Blueprint('console_commands', __name__, url_prefix='/v1/console-commands')
+
+@console_commands_bp.record_once
+def start_console_command_sweeper(state):
+    """Time out commands consoles never report back on"""
+    if CONSOLE_COMMAND_SWEEPER_ENABLED:
+        get_command_queue().start()
+
+def _console_id():
+    if g.console_id:
+        return int(g.console_id)
+    with SessionLocal() as session:
+        console = session.query(Console).filter(Console.device_uid == g.device_uid).first()
+        return console.id if console else None
+
+@console_commands_bp.route('/poll', methods=['GET'])
+@device_required
+def poll_commands():
+    """
+    Commands queued for this console, as signed envelopes
+    Pass ?wait=<seconds> to hold the request until a command is queued, capped
+    at LONG_POLL_MAX_SECONDS (1s by default). Commands not acknowledged are
+    delivered again.
+    """
+    try:
+        console_id = _console_id()
+        if not console_id:
+            return jsonify({'error': 'Console not found'}), 404
+
+        wait = min(max(request.args.get('wait', 0, type=float), 0), LONG_POLL_MAX_SECONDS)
+        commands = get_command_queue().poll(console_id, wait)
+        return jsonify({'commands': commands})
+
+    except Exception as e:
+        logger.error(f"Error delivering console commands: {e}")
+        return jsonify({'error': 'Failed to fetch commands'}), 500
+
+@console_commands_bp.route('/<int:command_id>/ack', methods=['POST'])
+@device_required
+def acknowledge_command(command_id):
+    """Console received the command and is running it"""
+    try:
+        status = get_command_queue().acknowledge(_console_id(), command_id)
+        if status is None:
+            return jsonify({'error': 'Command not found'}), 404
+        return jsonify({'success': True, 'status': status})
+
+    except Exception as e:
+        logger.error(f"Error acknowledging console command {command_id}: {e}")
+        return jsonify({'error': 'Failed to acknowledge command'}), 500
+
+@console_commands_bp.route('/<int:command_id>/result', methods=['POST'])
+@device_required
+def report_command_result(command_id):
+    """Execution result; reporting the same result twice is harmless"""
+    try:
+        data = request.get_json() or {}
+        if 'success' not in data:
+            return jsonify({'error': 'success required'}), 400
+
+        recorded = get_command_queue().complete(
+            _console_id(), command_id, bool(data['success']),
+            exit_code=data.get('exit_code'), output=data.get('output'), result=data.get('result')
+        )
+        if recorded is None:
+            return jsonify({'error': 'Command not found'}), 404
+        return jsonify({'success': True, 'duplicate': not recorded})
+
+    except Exception as e:
+        logger.error(f"Error recording console command {command_id} result: {e}")
+        return jsonify({'error': 'Failed to record result'}), 500
@@ -8,6 +8,7 @@ from datetime import datetime, timezone
 from shared.database.connection import SessionLocal
 from shared.models.base import Console, AuditLog
 from shared.auth.decorators import device_required
+from shared.services.alert_engine import emit_alert_event
 import logging
 
 logger = logging.getLogger(__name__)
@@ -111,6 +112,9 @@ def console_heartbeat():
             session.add(audit_log)
             session.commit()
             
+            # Clears an open "console offline" alert without waiting for the next evaluation
+            emit_alert_event('console.heartbeat', {'device_uid': device_uid})
+            
             # Determine if any updates are available (simplified logic)
             update_available = False
             latest_versions = {
@@ -2,15 +2,19 @@
 Console QR login routes - allows players to login via phone
 """
 
-from flask import Blueprint, request, jsonify, g, send_file
+from flask import Blueprint, request, jsonify, g, send_file, Response
 from datetime import datetime, timedelta, timezone
+import json
 import secrets
 import hashlib
-import qrcode
 from io import BytesIO
 from shared.auth.jwt_handler import create_access_token, verify_token
 from shared.database.connection import SessionLocal
 from shared.models.base import Console, ConsoleLoginToken, LoginTokenStatus, Player
+from shared.services.console_login_channel import (
+    LoginTokenState, get_login_notifier, get_qr_code_cache,
+    LONG_POLL_MAX_SECONDS
+)
 
 console_login_bp = Blueprint('console_login', __name__, url_prefix='/v1/console-login')
 
@@ -71,6 +75,12 @@ def start_console_login():
             session.add(new_token)
             session.commit()
             
+            get_login_notifier().publish(LoginTokenState(
+                token=login_token,
+                status=LoginTokenStatus.pending.value,
+                expires_at=expires_at
+            ))
+            
             # QR Image URL - use console URL (might be same as public in production)
             qr_image_url = f"{console_base_url}/v1/console-login/qr/{login_token}"
             
@@ -136,6 +146,9 @@ def confirm_console_login():
             login_token_record.confirmed_player_id = player_id
             session.commit()
             
+            # Wake the console's long-poll / SSE stream
+            get_login_notifier().publish(_state_from_record(login_token_record))
+            
             return jsonify({
                 "status": "confirmed",
                 "message": "Console login confirmed successfully"
@@ -144,58 +157,178 @@ def confirm_console_login():
     except Exception as e:
         return jsonify({"error": "Failed to confirm login"}), 500
 
+def _state_from_record(record: ConsoleLoginToken) -> LoginTokenState:
+    """Snapshot a login token row for the notifier"""
+    return LoginTokenState(
+        token=record.token,
+        status=record.status.value,
+        expires_at=record.expires_at,
+        confirmed_player_id=record.confirmed_player_id
+    )
+
+def _get_token_state(login_token: str):
+    """Cached token state, falling back to one database read on a miss"""
+    notifier = get_login_notifier()
+    state = notifier.get(login_token)
+    if state is not None:
+        return state
+    
+    with SessionLocal() as session:
+        login_token_record = session.query(ConsoleLoginToken).filter(
+            ConsoleLoginToken.token == login_token
+        ).first()
+        if not login_token_record:
+            return None
+        return notifier.remember(_state_from_record(login_token_record))
+
+def _expire_pending_token(login_token: str):
+    """Mark a timed-out pending token expired"""
+    with SessionLocal() as session:
+        login_token_record = session.query(ConsoleLoginToken).filter(
+            ConsoleLoginToken.token == login_token,
+            ConsoleLoginToken.status == LoginTokenStatus.pending
+        ).first()
+        if login_token_record:
+            login_token_record.status = LoginTokenStatus.expired
+            session.commit()
+    
+    get_login_notifier().discard(login_token)
+    get_qr_code_cache().discard(login_token)
+
+def _complete_confirmed_login(login_token: str) -> dict:
+    """Issue the player JWT for a confirmed token and mark the token used"""
+    response_data = {"status": LoginTokenStatus.confirmed.value}
+    
+    with SessionLocal() as session:
+        login_token_record = session.query(ConsoleLoginToken).filter(
+            ConsoleLoginToken.token == login_token,
+            ConsoleLoginToken.status == LoginTokenStatus.confirmed
+        ).first()
+        
+        if not login_token_record:
+            # Another poller already consumed the confirmation
+            get_login_notifier().discard(login_token)
+            return {"status": LoginTokenStatus.expired.value}
+        
+        if login_token_record.confirmed_player_id:
+            # Get player info
+            player = session.query(Player).filter(Player.id == login_token_record.confirmed_player_id).first()
+            if player:
+                # Create player JWT for console use
+                player_jwt = create_access_token(player.id, player.email, {"console_login": True})
+                response_data["player_jwt"] = player_jwt
+                response_data["player"] = {
+                    "id": player.id,
+                    "email": player.email,
+                    "display_name": player.display_name,
+                    "elo_rating": player.elo_rating
+                }
+        
+        # Mark token as used
+        login_token_record.status = LoginTokenStatus.expired
+        session.commit()
+    
+    get_login_notifier().discard(login_token)
+    get_qr_code_cache().discard(login_token)
+    return response_data
+
+def _resolve_poll(login_token: str, state: LoginTokenState):
+    """Turn a token state into the poll response body and HTTP status"""
+    if state.status == LoginTokenStatus.confirmed.value:
+        return _complete_confirmed_login(login_token), 200
+    
+    if state.is_expired():
+        if state.status == LoginTokenStatus.pending.value:
+            _expire_pending_token(login_token)
+        return {"status": "expired"}, 410
+    
+    return {"status": state.status}, 200
+
 @console_login_bp.route('/poll', methods=['GET'])
 def poll_console_login():
-    """Poll for console login confirmation status"""
+    """Poll for console login confirmation status
+    
+    Pass ?wait=<seconds> to long-poll: the request is held until the phone
+    confirms or cancels, the token expires, or the wait elapses. Pending
+    tokens are answered from the in-process notifier, so only the first
+    poll and the final confirmation touch the database.
+    """
     login_token = request.args.get('login_token', '').strip()
     
     if not login_token:
         return jsonify({"error": "login_token required"}), 400
     
+    wait = min(max(request.args.get('wait', 0, type=float), 0), LONG_POLL_MAX_SECONDS)
+    
     try:
-        with SessionLocal() as session:
-            # Find the login token
-            login_token_record = session.query(ConsoleLoginToken).filter(
-                ConsoleLoginToken.token == login_token
-            ).first()
-            
-            if not login_token_record:
+        state = _get_token_state(login_token)
+        if not state:
+            return jsonify({"error": "Invalid login token"}), 404
+        
+        if wait and state.status == LoginTokenStatus.pending.value and not state.is_expired():
+            time_to_expiry = (state.expires_at - datetime.now(timezone.utc)).total_seconds()
+            state = get_login_notifier().wait_for_change(
+                login_token, state.version, min(wait, max(time_to_expiry, 0))
+            ) or _get_token_state(login_token)
+            if not state:
                 return jsonify({"error": "Invalid login token"}), 404
-            
-            # Check expiration
-            if datetime.now(timezone.utc) > login_token_record.expires_at:
-                if login_token_record.status == LoginTokenStatus.pending:
-                    login_token_record.status = LoginTokenStatus.expired
-                    session.commit()
-                return jsonify({"status": "expired"}), 410
-            
-            # Return status
-            response_data = {"status": login_token_record.status.value}
-            
-            # If confirmed, include player JWT
-            if login_token_record.status == LoginTokenStatus.confirmed and login_token_record.confirmed_player_id:
-                # Get player info
-                player = session.query(Player).filter(Player.id == login_token_record.confirmed_player_id).first()
-                if player:
-                    # Create player JWT for console use
-                    player_jwt = create_access_token(player.id, player.email, {"console_login": True})
-                    response_data["player_jwt"] = player_jwt
-                    response_data["player"] = {
-                        "id": player.id,
-                        "email": player.email,
-                        "display_name": player.display_name,
-                        "elo_rating": player.elo_rating
-                    }
-                
-                # Mark token as used
-                login_token_record.status = LoginTokenStatus.expired
-                session.commit()
-            
-            return jsonify(response_data)
+        
+        response_data, status_code = _resolve_poll(login_token, state)
+        return jsonify(response_data), status_code
             
     except Exception as e:
         return jsonify({"error": "Failed to check login status"}), 500
 
+@console_login_bp.route('/events', methods=['GET'])
+def console_login_events():
+    """Server-Sent Events stream of login status for the kiosk
+    
+    Emits a "status" event whenever the token changes state and closes
+    after the final (confirmed, expired or cancelled) event.
+    """
+    login_token = request.args.get('login_token', '').strip()
+    
+    if not login_token:
+        return jsonify({"error": "login_token required"}), 400
+    
+    try:
+        state = _get_token_state(login_token)
+    except Exception as e:
+        return jsonify({"error": "Failed to check login status"}), 500
+    
+    if not state:
+        return jsonify({"error": "Invalid login token"}), 404
+    
+    def stream(state):
+        notifier = get_login_notifier()
+        while True:
+            if state.status != LoginTokenStatus.pending.value or state.is_expired():
+                response_data, _ = _resolve_poll(login_token, state)
+                yield f"event: status\ndata: {json.dumps(response_data)}\n\n"
+                return
+            
+            yield f"event: status\ndata: {json.dumps({'status': state.status})}\n\n"
+            
+            version = state.version
+            while True:
+                time_to_expiry = (state.expires_at - datetime.now(timezone.utc)).total_seconds()
+                notifier.wait_for_change(login_token, version, min(15, max(time_to_expiry, 0)))
+                # Re-reads the database only once the cached state is too old to trust
+                next_state = _get_token_state(login_token)
+                if next_state is None:
+                    return
+                if (next_state.version != version or next_state.status != state.status
+                        or next_state.is_expired()):
+                    state = next_state
+                    break
+                # Keep intermediaries from closing an idle connection
+                yield ": keep-alive\n\n"
+    
+    return Response(stream(state), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @console_login_bp.route('/cancel', methods=['POST'])
 def cancel_console_login():
     """Cancel a pending console login"""
@@ -220,6 +353,8 @@ def cancel_console_login():
             if login_token_record:
                 login_token_record.status = LoginTokenStatus.cancelled
                 session.commit()
+                get_login_notifier().publish(_state_from_record(login_token_record))
+                get_qr_code_cache().discard(login_token)
                 return jsonify({"status": "cancelled"})
             else:
                 return jsonify({"error": "Login token not found or already processed"}), 404
@@ -544,50 +679,29 @@ def console_link_confirm():
 
 @console_login_bp.route('/qr/<login_token>', methods=['GET'])
 def generate_qr_code(login_token: str):
-    """Generate and serve QR code image for the given login token"""
+    """Serve the QR code image for the given login token (rendered once per token)"""
     if not login_token:
         return jsonify({"error": "Login token required"}), 400
     
     try:
         # Verify token exists and is valid
-        with SessionLocal() as session:
-            login_token_record = session.query(ConsoleLoginToken).filter(
-                ConsoleLoginToken.token == login_token,
-                ConsoleLoginToken.status == LoginTokenStatus.pending
-            ).first()
-            
-            if not login_token_record:
-                return jsonify({"error": "Invalid or expired token"}), 404
-            
-            # Check expiration
-            if datetime.now(timezone.utc) > login_token_record.expires_at:
-                return jsonify({"error": "Token expired"}), 410
+        state = _get_token_state(login_token)
+        if not state or state.status != LoginTokenStatus.pending.value:
+            return jsonify({"error": "Invalid or expired token"}), 404
+        
+        # Check expiration
+        if state.is_expired():
+            return jsonify({"error": "Token expired"}), 410
         
         # Generate QR code URL using public base URL
         import os
         public_base_url = os.getenv("PUBLIC_API_URL", "https://api.deckport.ai")
         qr_url = f"{public_base_url}/v1/console-login/link?token={login_token}"
         
-        # Create QR code
-        qr = qrcode.QRCode(
-            version=1,  # Controls the size of the QR Code
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,  # Size of each box in pixels
-            border=4,  # Border size
-        )
-        qr.add_data(qr_url)
-        qr.make(fit=True)
-        
-        # Create image
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Save to BytesIO
-        img_buffer = BytesIO()
-        img.save(img_buffer, format='PNG')
-        img_buffer.seek(0)
+        png = get_qr_code_cache().get_png(login_token, qr_url, state.expires_at)
         
         return send_file(
-            img_buffer,
+            BytesIO(png),
             mimetype='image/png',
             as_attachment=False,
             download_name=f'qr_code_{login_token[:8]}.png'
@@ -9,13 +9,30 @@ from sqlalchemy import desc
 from shared.database.connection import SessionLocal
 from shared.models.base import Console, AuditLog
 from shared.auth.decorators import device_required
+from shared.services.game_releases import check_rollout_health
+import os
 import logging
 import json
-import gzip
+import zlib
 import base64
 
 logger = logging.getLogger(__name__)
 
+# Decompressed size accepted from a console, so a small gzip bomb cannot exhaust memory
+MAX_DECOMPRESSED_BYTES = int(os.getenv("CONSOLE_LOG_MAX_DECOMPRESSED_BYTES", str(32 * 1024 * 1024)))
+
+
+def _gunzip(data, limit=None):
+    """Decompressed gzip data, or None if it inflates past the limit; raises ValueError or zlib.error if corrupt"""
+    limit = MAX_DECOMPRESSED_BYTES if limit is None else limit
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    body = decompressor.decompress(data, limit + 1)
+    if len(body) > limit:
+        return None
+    if not decompressor.eof:
+        raise ValueError("Truncated gzip data")
+    return body
+
 console_logs_streaming_bp = Blueprint('console_logs_streaming', __name__, url_prefix='/v1/console-logs')
 
 @console_logs_streaming_bp.route('/stream', methods=['POST'])
@@ -23,10 +40,20 @@ console_logs_streaming_bp = Blueprint('console_logs_streaming', __name__, url_pr
 def stream_console_logs():
     """
     Receive streaming logs from console
-    Handles both individual log entries and bulk log uploads
+    Handles both individual log entries and bulk log uploads; batches from the
+    kiosk log shipper arrive gzipped (Content-Encoding: gzip)
     """
     try:
-        data = request.get_json()
+        if request.headers.get('Content-Encoding', '').lower() == 'gzip':
+            try:
+                body = _gunzip(request.get_data())
+                if body is None:
+                    return jsonify({'error': 'Log batch too large'}), 413
+                data = json.loads(body)
+            except (zlib.error, ValueError):
+                return jsonify({'error': 'Invalid gzipped log batch'}), 400
+        else:
+            data = request.get_json()
         if not data:
             return jsonify({'error': 'No data provided'}), 400
         
@@ -148,8 +175,10 @@ def upload_log_file():
             # Decompress if needed
             if is_compressed:
                 try:
-                    compressed_data = base64.b64decode(log_content)
-                    log_content = gzip.decompress(compressed_data).decode('utf-8')
+                    log_content = _gunzip(base64.b64decode(log_content))
+                    if log_content is None:
+                        return jsonify({'error': 'Log file too large'}), 413
+                    log_content = log_content.decode('utf-8')
                 except Exception as e:
                     return jsonify({'error': f'Failed to decompress log file: {e}'}), 400
             
@@ -245,6 +274,14 @@ def submit_crash_report():
             
             logger.critical(f"Console crash report received: {console.device_uid} - {crash_type}: {error_message}")
             
+            # A crash spike on a game version being rolled out halts the rollout
+            try:
+                check_rollout_health(session)
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                logger.error(f"Error checking game rollout health: {e}")
+            
             return jsonify({
                 'success': True,
                 'crash_report_id': audit_log.id,
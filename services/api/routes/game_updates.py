@@ -0,0 +1,121 @@
+"""
+Game Update API Routes
+Consoles fetch the signed release manifest, ask which version to run and how to
+get there from the one they report, and download content-addressed builds and deltas
+"""
+
+from flask import Blueprint, request, jsonify, g, send_file, Response
+from shared.database.connection import SessionLocal
+from shared.models.base import Console
+from shared.auth.decorators import device_required
+from shared.services.game_releases import (
+    ReleaseError, get_release_store, record_version, target_version
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+game_updates_bp = Blueprint('game_updates', __name__, url_prefix='/v1/game-updates')
+
+def _console_id(session):
+    if g.console_id:
+        return g.console_id
+    console = session.query(Console).filter(Console.device_uid == g.device_uid).first()
+    return console.id if console else None
+
+@game_updates_bp.route('/manifest', methods=['GET'])
+def get_manifest():
+    """Release manifest exactly as signed; verify it against /manifest.sig"""
+    try:
+        return Response(get_release_store().manifest_bytes(), mimetype='application/json',
+                        headers={'Cache-Control': 'no-cache'})
+    except FileNotFoundError:
+        return jsonify({'error': 'No releases published'}), 404
+
+@game_updates_bp.route('/manifest.sig', methods=['GET'])
+def get_manifest_signature():
+    """RSA-SHA256 signature of the manifest bytes"""
+    try:
+        return Response(get_release_store().signature(), mimetype='application/octet-stream',
+                        headers={'Cache-Control': 'no-cache'})
+    except FileNotFoundError:
+        return jsonify({'error': 'No releases published'}), 404
+
+@game_updates_bp.route('/check', methods=['GET'])
+@device_required
+def check_for_update():
+    """
+    Version this console should run and the cheapest download path to it
+    Query: version (installed game version, omitted if none)
+    """
+    try:
+        reported = request.args.get('version') or None
+        store = get_release_store()
+
+        with SessionLocal() as session:
+            console_id = _console_id(session)
+            if not console_id:
+                return jsonify({'error': 'Console not found'}), 404
+
+            target = target_version(session, console_id, reported, store.latest_version())
+            if reported:
+                record_version(session, console_id, reported)
+            session.commit()
+
+        if not target:
+            return jsonify({'current': reported, 'target': None, 'update_available': False, 'steps': []})
+
+        steps = store.plan(reported, target)
+        for step in steps:
+            step['url'] = f"{game_updates_bp.url_prefix}/artifacts/{step['sha256']}"
+        release = store.release(target)
+
+        return jsonify({
+            'current': reported,
+            'target': target,
+            'update_available': bool(steps),
+            'steps': steps,
+            'download_bytes': sum(step['size'] for step in steps),
+            'full_size': release['size']
+        })
+
+    except ReleaseError as e:
+        logger.error(f"Error planning game update: {e}")
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        logger.error(f"Error checking game update: {e}")
+        return jsonify({'error': 'Failed to check for updates'}), 500
+
+@game_updates_bp.route('/artifacts/<sha256>', methods=['GET'])
+def download_artifact(sha256):
+    """Full build or delta by content hash; immutable, so cacheable forever"""
+    path = get_release_store().artifact_path(sha256)
+    if not path:
+        return jsonify({'error': 'Artifact not found'}), 404
+    response = send_file(path, mimetype='application/octet-stream', conditional=True, etag=sha256)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+@game_updates_bp.route('/installed', methods=['POST'])
+@device_required
+def report_installed():
+    """Console reports the version it switched to"""
+    try:
+        data = request.get_json() or {}
+        version = data.get('version')
+        if not version:
+            return jsonify({'error': 'Version required'}), 400
+
+        with SessionLocal() as session:
+            console_id = _console_id(session)
+            if not console_id:
+                return jsonify({'error': 'Console not found'}), 404
+            record_version(session, console_id, version)
+            session.commit()
+
+        logger.info(f"Console {console_id} installed game {version}")
+        return jsonify({'success': True, 'version': version})
+
+    except Exception as e:
+        logger.error(f"Error recording game install: {e}")
+        return jsonify({'error': 'Failed to record install'}), 500
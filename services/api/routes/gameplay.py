@@ -5,6 +5,7 @@ Handles match creation, game actions, and state management
 
 from flask import Blueprint, request, jsonify, g
 from typing import Optional
+import os
 import sys
 sys.path.append('/home/jp/deckport.ai')
 
@@ -12,6 +13,7 @@ from shared.database.connection import SessionLocal
 from shared.models.base import Match, MatchParticipant, MatchStatus, MMQueue, Player
 from shared.auth.decorators import admin_required
 from shared.utils.logging import setup_logging
+from shared.services.ratings import get_rating_processor
 from game_engine.match_manager import MatchManager
 from matchmaking.queue_manager import QueueManager
 
@@ -19,6 +21,8 @@ logger = setup_logging("gameplay_api", "INFO")
 
 gameplay_bp = Blueprint('gameplay', __name__, url_prefix='/v1/gameplay')
 
+RATING_WORKER_ENABLED = os.getenv("RATING_WORKER_ENABLED", "true").lower() == "true"
+
 # Global instances
 match_manager = MatchManager()
 queue_manager = QueueManager(match_manager)
@@ -33,6 +37,12 @@ except:
     # If no loop is running, start will be called later
     pass
 
+@gameplay_bp.record_once
+def start_rating_worker(state):
+    """Rate finished matches in the background of every API worker that serves gameplay"""
+    if RATING_WORKER_ENABLED:
+        get_rating_processor().start()
+
 @gameplay_bp.route('/matches', methods=['POST'])
 def create_match():
     """Create a new match (admin/testing)"""
@@ -0,0 +1,114 @@
+"""
+Leaderboard Routes
+Global, regional and venue rankings per rating season, served from memory
+"""
+
+import os
+import logging
+from flask import Blueprint, jsonify, request, g
+
+from shared.database.connection import SessionLocal
+from shared.models.base import Player
+from shared.auth.decorators import player_required
+from shared.services.leaderboards import GLOBAL, get_leaderboards, region_scope, venue_scope
+
+logger = logging.getLogger(__name__)
+
+leaderboards_bp = Blueprint('leaderboards', __name__, url_prefix='/v1/leaderboards')
+
+LEADERBOARD_REFRESH_ENABLED = os.getenv("LEADERBOARD_REFRESH_ENABLED", "true").lower() == "true"
+MAX_PAGE = 100
+MAX_RADIUS = 25
+
+
+@leaderboards_bp.record_once
+def start_leaderboard_refresh(state):
+    """Follow rating changes in every API worker that serves leaderboards"""
+    if LEADERBOARD_REFRESH_ENABLED:
+        get_leaderboards().start()
+
+
+def _season_arg():
+    season = request.args.get('season')
+    return int(season) if season else None
+
+
+def with_names(entries):
+    """Add display names to leaderboard entries with one primary key lookup"""
+    player_ids = [entry['player_id'] for entry in entries]
+    if not player_ids:
+        return entries
+    with SessionLocal() as session:
+        names = dict(session.query(Player.id, Player.display_name).filter(Player.id.in_(player_ids)).all())
+    return [{**entry, 'display_name': names.get(entry['player_id'])} for entry in entries]
+
+
+def _board_response(scope):
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), MAX_PAGE)
+        offset = max(int(request.args.get('offset', 0)), 0)
+        page = get_leaderboards().top(scope, limit, offset, _season_arg())
+        if page['season_id'] is None:
+            return jsonify({'error': 'Rating season not found'}), 404
+        page['entries'] = with_names(page['entries'])
+        return jsonify(page)
+    except ValueError:
+        return jsonify({'error': 'Invalid leaderboard parameters'}), 400
+    except Exception as e:
+        logger.error(f"Error getting leaderboard {scope}: {e}")
+        return jsonify({'error': 'Failed to get leaderboard'}), 500
+
+
+@leaderboards_bp.route('/global', methods=['GET'])
+def get_global_leaderboard():
+    """Top players of a season (the current one by default)"""
+    return _board_response(GLOBAL)
+
+
+@leaderboards_bp.route('/regions/<region>', methods=['GET'])
+def get_region_leaderboard(region):
+    """Top players of a region"""
+    return _board_response(region_scope(region))
+
+
+@leaderboards_bp.route('/venues/<int:console_id>', methods=['GET'])
+def get_venue_leaderboard(console_id):
+    """Top players who have played rated matches at a console"""
+    return _board_response(venue_scope(console_id))
+
+
+def _player_response(player_id):
+    try:
+        radius = min(max(int(request.args.get('radius', 0)), 0), MAX_RADIUS)
+        season_id = _season_arg()
+        leaderboards = get_leaderboards()
+        ranks = leaderboards.player_ranks(player_id, season_id)
+        if not ranks:
+            return jsonify({'error': 'Player is not ranked this season'}), 404
+
+        response = {'player_id': player_id, 'ranks': ranks}
+        if radius:
+            scope = request.args.get('scope', GLOBAL)
+            window = leaderboards.around(player_id, scope, radius, season_id)
+            if window:
+                window['entries'] = with_names(window['entries'])
+            response['around'] = window
+        return jsonify(response)
+    except ValueError:
+        return jsonify({'error': 'Invalid leaderboard parameters'}), 400
+    except Exception as e:
+        logger.error(f"Error getting leaderboard ranks of player {player_id}: {e}")
+        return jsonify({'error': 'Failed to get player ranks'}), 500
+
+
+@leaderboards_bp.route('/players/<int:player_id>', methods=['GET'])
+def get_player_ranks(player_id):
+    """A player's rank on every board they are on; ?radius=N&scope=... adds the players around them"""
+    return _player_response(player_id)
+
+
+@leaderboards_bp.route('/me', methods=['GET'])
+@player_required
+def get_my_ranks():
+    """The current player's ranks"""
+    return _player_response(g.current_player.id)
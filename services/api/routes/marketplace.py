@@ -0,0 +1,196 @@
+"""
+NFC card marketplace routes
+Fixed-price listings, buy orders and auctions, backed by the marketplace engine
+"""
+
+import os
+import logging
+from datetime import timedelta
+
+from flask import Blueprint, jsonify, request, g
+from shared.database.connection import SessionLocal
+from shared.models.nfc_trading_system import AuctionBid, CardAuction
+from shared.services.marketplace_engine import (
+    BidRejected, MarketplaceError, auction_summary, get_marketplace_engine, utcnow
+)
+from shared.services.wallet_ledger import LedgerError
+from shared.auth.decorators import player_required
+
+logger = logging.getLogger(__name__)
+
+marketplace_bp = Blueprint('marketplace', __name__, url_prefix='/v1/marketplace')
+
+MARKETPLACE_SCHEDULER_ENABLED = os.getenv("MARKETPLACE_SCHEDULER_ENABLED", "true").lower() == "true"
+
+
+@marketplace_bp.record_once
+def start_marketplace_scheduler(state):
+    """Close auctions and expire listings in the background of every API worker that serves the marketplace"""
+    if MARKETPLACE_SCHEDULER_ENABLED:
+        get_marketplace_engine().start()
+
+
+def _rejected(e: Exception):
+    """Engine and ledger errors are the player's to fix; everything else is ours"""
+    if isinstance(e, BidRejected):
+        body = {'error': str(e)}
+        if e.min_bid is not None:
+            body['min_bid'] = float(e.min_bid)
+        return jsonify(body), 409
+    return jsonify({'error': str(e)}), 400
+
+
+@marketplace_bp.route('/books/<int:template_id>', methods=['GET'])
+def get_order_book(template_id):
+    """Price levels of listings and buy orders for one card template"""
+    try:
+        levels = min(int(request.args.get('levels', 10)), 50)
+        return jsonify(get_marketplace_engine().depth(template_id, levels))
+    except Exception as e:
+        logger.error(f"Error getting order book {template_id}: {e}")
+        return jsonify({'error': 'Failed to retrieve order book'}), 500
+
+
+@marketplace_bp.route('/listings', methods=['POST'])
+@player_required
+def create_listing():
+    """List an owned card at a fixed price"""
+    data = request.get_json() or {}
+    if not data.get('card_id'):
+        return jsonify({'error': 'card_id is required'}), 400
+    try:
+        expires_at = None
+        if data.get('expires_in_hours'):
+            expires_at = utcnow() + timedelta(hours=float(data['expires_in_hours']))
+        result = get_marketplace_engine().list_card(g.user_id, int(data['card_id']), data.get('price'), expires_at)
+        return jsonify({'success': True, **result}), 201
+    except (MarketplaceError, LedgerError) as e:
+        return _rejected(e)
+    except Exception as e:
+        logger.error(f"Error creating listing: {e}")
+        return jsonify({'error': 'Failed to create listing'}), 500
+
+
+@marketplace_bp.route('/listings/<int:listing_id>/buy', methods=['POST'])
+@player_required
+def buy_listing(listing_id):
+    try:
+        return jsonify({'success': True, 'trade': get_marketplace_engine().buy_listing(g.user_id, listing_id)})
+    except (MarketplaceError, LedgerError) as e:
+        return _rejected(e)
+    except Exception as e:
+        logger.error(f"Error buying listing {listing_id}: {e}")
+        return jsonify({'error': 'Failed to buy listing'}), 500
+
+
+@marketplace_bp.route('/listings/<int:listing_id>', methods=['DELETE'])
+@player_required
+def cancel_listing(listing_id):
+    try:
+        get_marketplace_engine().cancel_listing(g.user_id, listing_id)
+        return jsonify({'success': True})
+    except (MarketplaceError, LedgerError) as e:
+        return _rejected(e)
+    except Exception as e:
+        logger.error(f"Error cancelling listing {listing_id}: {e}")
+        return jsonify({'error': 'Failed to cancel listing'}), 500
+
+
+@marketplace_bp.route('/buy-orders', methods=['POST'])
+@player_required
+def create_buy_order():
+    """Bid for any card of a template; max_price is held from the wallet until the order fills or is cancelled"""
+    data = request.get_json() or {}
+    if not data.get('card_template_id'):
+        return jsonify({'error': 'card_template_id is required'}), 400
+    try:
+        result = get_marketplace_engine().place_buy_order(g.user_id, int(data['card_template_id']),
+                                                          data.get('max_price'))
+        return jsonify({'success': True, **result}), 201
+    except (MarketplaceError, LedgerError) as e:
+        return _rejected(e)
+    except Exception as e:
+        logger.error(f"Error creating buy order: {e}")
+        return jsonify({'error': 'Failed to create buy order'}), 500
+
+
+@marketplace_bp.route('/buy-orders/<int:order_id>', methods=['DELETE'])
+@player_required
+def cancel_buy_order(order_id):
+    try:
+        get_marketplace_engine().cancel_buy_order(g.user_id, order_id)
+        return jsonify({'success': True})
+    except (MarketplaceError, LedgerError) as e:
+        return _rejected(e)
+    except Exception as e:
+        logger.error(f"Error cancelling buy order {order_id}: {e}")
+        return jsonify({'error': 'Failed to cancel buy order'}), 500
+
+
+@marketplace_bp.route('/auctions', methods=['POST'])
+@player_required
+def create_auction():
+    data = request.get_json() or {}
+    if not data.get('card_id'):
+        return jsonify({'error': 'card_id is required'}), 400
+    try:
+        result = get_marketplace_engine().create_auction(
+            g.user_id, int(data['card_id']), data.get('starting_price'),
+            timedelta(hours=float(data.get('duration_hours', 24))), data.get('reserve_price')
+        )
+        return jsonify({'success': True, **result}), 201
+    except (MarketplaceError, LedgerError) as e:
+        return _rejected(e)
+    except Exception as e:
+        logger.error(f"Error creating auction: {e}")
+        return jsonify({'error': 'Failed to create auction'}), 500
+
+
+@marketplace_bp.route('/auctions/<int:auction_id>', methods=['GET'])
+def get_auction(auction_id):
+    try:
+        with SessionLocal() as session:
+            auction = session.get(CardAuction, auction_id)
+            if not auction:
+                return jsonify({'error': 'Auction not found'}), 404
+            bids = session.query(AuctionBid).filter(AuctionBid.auction_id == auction_id) \
+                .order_by(AuctionBid.id.desc()).limit(20).all()
+            return jsonify({
+                **auction_summary(auction),
+                'recent_bids': [{
+                    'bidder_id': bid.bidder_player_id,
+                    'amount': float(bid.bid_amount),
+                    'is_winning': bid.is_winning,
+                    'bid_at': bid.bid_at.isoformat()
+                } for bid in bids]
+            })
+    except Exception as e:
+        logger.error(f"Error getting auction {auction_id}: {e}")
+        return jsonify({'error': 'Failed to retrieve auction'}), 500
+
+
+@marketplace_bp.route('/auctions/<int:auction_id>/bids', methods=['POST'])
+@player_required
+def place_bid(auction_id):
+    """Bid on an auction; the amount is held from the wallet until outbid or the auction settles"""
+    data = request.get_json() or {}
+    try:
+        return jsonify({'success': True, **get_marketplace_engine().place_bid(auction_id, g.user_id, data.get('amount'))})
+    except (MarketplaceError, LedgerError) as e:
+        return _rejected(e)
+    except Exception as e:
+        logger.error(f"Error placing bid on auction {auction_id}: {e}")
+        return jsonify({'error': 'Failed to place bid'}), 500
+
+
+@marketplace_bp.route('/auctions/<int:auction_id>', methods=['DELETE'])
+@player_required
+def cancel_auction(auction_id):
+    try:
+        get_marketplace_engine().cancel_auction(g.user_id, auction_id)
+        return jsonify({'success': True})
+    except (MarketplaceError, LedgerError) as e:
+        return _rejected(e)
+    except Exception as e:
+        logger.error(f"Error cancelling auction {auction_id}: {e}")
+        return jsonify({'error': 'Failed to cancel auction'}), 500
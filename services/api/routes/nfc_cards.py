@@ -6,10 +6,13 @@ Handles NTAG 424 DNA card programming, activation, trading, and security
 from flask import Blueprint, request, jsonify, g
 from datetime import datetime, timezone, timedelta
 from decimal import Decimal
+import base64
 import hashlib
 import secrets
 import re
 
+from cryptography.hazmat.primitives import hashes, hmac
+
 from shared.database.connection import SessionLocal
 from shared.models.nfc_trading_system import (
     EnhancedNFCCard, TradeOffer, CardAuction, TradingHistory,
@@ -21,6 +24,9 @@ from shared.models.base import NFCCard
 from shared.models.base import Player, Admin
 from shared.auth.jwt_handler import verify_token, verify_admin_token
 from shared.auth.decorators import admin_required, player_required
+from shared.security.card_key_service import get_card_key_service
+from shared.security.security_event_sink import get_security_event_sink
+from shared.services.alert_engine import emit_alert_event
 import logging
 api_logger = logging.getLogger(__name__)
 
@@ -562,10 +568,6 @@ def generate_session_id(card, console_id) -> str:
 def verify_ntag424_response(card, challenge: str, response: str) -> bool:
     """Verify NTAG 424 DNA cryptographic response"""
     try:
-        import base64
-        from cryptography.hazmat.primitives import hashes, hmac
-        from cryptography.hazmat.backends import default_backend
-        
         # Decode challenge and response
         challenge_bytes = base64.b64decode(challenge)
         response_bytes = base64.b64decode(response)
@@ -575,12 +577,12 @@ def verify_ntag424_response(card, challenge: str, response: str) -> bool:
         card_key = derive_card_key(card.issuer_key_ref)
         
         # Verify HMAC-SHA256 response
-        h = hmac.HMAC(card_key, hashes.SHA256(), backend=default_backend())
+        h = hmac.HMAC(card_key, hashes.SHA256())
         h.update(challenge_bytes)
         expected_response = h.finalize()
         
         # Constant-time comparison to prevent timing attacks
-        return hmac.compare_digest(expected_response, response_bytes)
+        return secrets.compare_digest(expected_response, response_bytes)
         
     except Exception as e:
         api_logger.error(f"NTAG 424 DNA verification failed: {e}")
@@ -589,44 +591,12 @@ def verify_ntag424_response(card, challenge: str, response: str) -> bool:
 def derive_card_key(issuer_key_ref: str) -> bytes:
     """Derive card's cryptographic key from issuer key reference"""
     try:
-        # Import the same crypto manager used by the programmer
-        import sys
-        import os
-        sys.path.append(os.path.join(os.path.dirname(__file__), '../../../tools/nfc-card-programmer'))
+        # Extract card UID from issuer_key_ref (it's the first part)
+        card_uid = issuer_key_ref[:14]  # NTAG UID format
         
-        try:
-            from crypto_security import get_crypto_manager
-            crypto_manager = get_crypto_manager()
-            
-            # Extract card UID from issuer_key_ref (it's the first part)
-            card_uid = issuer_key_ref[:14]  # NTAG UID format
-            
-            # Use the same key derivation as the programmer
-            card_keys = crypto_manager.derive_card_keys(card_uid)
-            return card_keys['mac']  # Use MAC key for authentication
-            
-        except ImportError:
-            # Fallback to basic key derivation if crypto_security not available
-            api_logger.warning("Crypto security module not available, using fallback")
-            
-            # Get master key from shared location
-            master_key_path = "/home/jp/deckport.ai/tools/nfc-card-programmer/master_key.bin"
-            if os.path.exists(master_key_path):
-                with open(master_key_path, 'rb') as f:
-                    master_key = f.read()
-            else:
-                raise ValueError("Master key file not found")
-            
-            # Simple key derivation (same as crypto_security fallback)
-            from cryptography.hazmat.primitives import hashes
-            from cryptography.hazmat.backends import default_backend
-            
-            digest = hashes.Hash(hashes.SHA256(), backend=default_backend())
-            digest.update(master_key)
-            digest.update(issuer_key_ref.encode())
-            digest.update(b"MAC")  # MAC key for authentication
-            
-            return digest.finalize()[:16]  # 128-bit key
+        # Only the MAC key is needed for authentication; the key service
+        # holds the master key in memory and caches derived keys per UID
+        return get_card_key_service().get_card_key(card_uid, 'MAC')
         
     except Exception as e:
         api_logger.error(f"Card key derivation failed: {e}")
@@ -661,15 +631,21 @@ def process_trade_payment(buyer_id: int, seller_id: int, amount: Decimal) -> boo
         return False
 
 def log_security_event(session, card_id: int, event_type: str, severity: str, details: dict):
-    """Log security event"""
-    log_entry = NFCSecurityLog(
-        nfc_card_id=card_id,
-        event_type=event_type,
-        severity=severity,
-        console_id=details.get('console_id'),
-        player_id=details.get('player_id'),
-        ip_address=request.remote_addr,
-        user_agent=request.headers.get('User-Agent'),
-        error_details=details
-    )
-    session.add(log_entry)
+    """Log security event
+    
+    Events go to the batched security event sink rather than the request's
+    session, so they no longer add an insert to the caller's transaction.
+    The session argument is kept for call-site compatibility.
+    """
+    event = {
+        "nfc_card_id": card_id,
+        "event_type": event_type,
+        "severity": severity,
+        "console_id": details.get('console_id'),
+        "player_id": details.get('player_id'),
+        "ip_address": request.remote_addr,
+        "user_agent": request.headers.get('User-Agent'),
+        "error_details": details
+    }
+    get_security_event_sink().emit(event)
+    emit_alert_event('nfc.security', event)
@@ -3,14 +3,11 @@ Player wallet management routes
 """
 
 from flask import Blueprint, jsonify, request, g
-from datetime import datetime, timezone, timedelta
-from decimal import Decimal
-from sqlalchemy import and_, or_, desc, func
 from shared.database.connection import SessionLocal
 from shared.models.base import Player
-from shared.models.tournaments import (
-    PlayerWallet, WalletTransaction, TransactionType
-)
+from shared.models.tournaments import PlayerWallet, TransactionType
+from shared.services import wallet_ledger
+from shared.services.wallet_ledger import LedgerError
 from shared.auth.decorators import player_required
 from stripe_service import stripe_service
 import logging
@@ -25,41 +22,12 @@ def get_wallet():
     """Get player's wallet information"""
     try:
         with SessionLocal() as session:
-            player_id = g.user_id
-            
-            # Get or create wallet
-            wallet = session.query(PlayerWallet).filter(PlayerWallet.player_id == player_id).first()
-            
-            if not wallet:
-                # Create wallet for new player
-                wallet = PlayerWallet(
-                    player_id=player_id,
-                    balance=Decimal('0.00'),
-                    currency='USD'
-                )
-                session.add(wallet)
-                session.commit()
-                session.refresh(wallet)
-            
-            # Get recent transactions
-            recent_transactions = session.query(WalletTransaction).filter(
-                WalletTransaction.wallet_id == wallet.id
-            ).order_by(desc(WalletTransaction.created_at)).limit(10).all()
+            wallet = wallet_ledger.get_or_create_wallet(session, g.user_id)
+            session.commit()
             
-            transactions = []
-            for tx in recent_transactions:
-                transactions.append({
-                    'id': tx.id,
-                    'type': tx.transaction_type.value,
-                    'amount': float(tx.amount),
-                    'currency': tx.currency,
-                    'status': tx.status.value,
-                    'description': tx.description,
-                    'balance_before': float(tx.balance_before),
-                    'balance_after': float(tx.balance_after),
-                    'created_at': tx.created_at.isoformat(),
-                    'processed_at': tx.processed_at.isoformat() if tx.processed_at else None
-                })
+            transactions, _ = wallet_ledger.wallet_history(session, wallet.id, limit=10)
+            for tx in transactions:
+                tx['currency'] = wallet.currency
             
             wallet_data = {
                 'id': wallet.id,
@@ -82,14 +50,15 @@ def get_wallet():
 @player_wallet_bp.route('/deposit', methods=['POST'])
 @player_required
 def create_deposit():
-    """Create a deposit using Stripe"""
+    """Create a deposit using Stripe; the wallet is credited by the payment webhook"""
     try:
         data = request.get_json()
         if not data:
             return jsonify({'error': 'No data provided'}), 400
         
-        amount = data.get('amount')
-        if not amount or amount <= 0:
+        try:
+            amount = wallet_ledger.to_money(data.get('amount'))
+        except LedgerError:
             return jsonify({'error': 'Invalid amount'}), 400
         
         with SessionLocal() as session:
@@ -99,34 +68,21 @@ def create_deposit():
             if not player:
                 return jsonify({'error': 'Player not found'}), 404
             
-            # Get or create wallet
-            wallet = session.query(PlayerWallet).filter(PlayerWallet.player_id == player_id).first()
-            if not wallet:
-                wallet = PlayerWallet(
-                    player_id=player_id,
-                    balance=Decimal('0.00'),
-                    currency='USD'
-                )
-                session.add(wallet)
-                session.commit()
-                session.refresh(wallet)
+            wallet = wallet_ledger.get_or_create_wallet(session, player_id)
+            session.commit()
+            
+            if not wallet.is_active:
+                return jsonify({'error': 'Wallet is not active'}), 400
             
-            # Check daily deposit limit
+            # Check daily deposit limit against the running total of credited deposits
             if wallet.daily_deposit_limit:
-                today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-                today_deposits = session.query(func.coalesce(func.sum(WalletTransaction.amount), 0)).filter(
-                    WalletTransaction.wallet_id == wallet.id,
-                    WalletTransaction.transaction_type == WalletTransactionType.DEPOSIT,
-                    WalletTransaction.status == WalletTransactionStatus.COMPLETED,
-                    WalletTransaction.created_at >= today_start
-                ).scalar() or 0
-                
-                if today_deposits + Decimal(str(amount)) > wallet.daily_deposit_limit:
+                today_deposits = wallet_ledger.daily_total(session, wallet.id, TransactionType.DEPOSIT.value)
+                if today_deposits + amount > wallet.daily_deposit_limit:
                     return jsonify({'error': f'Daily deposit limit exceeded. Limit: ${wallet.daily_deposit_limit}, Used: ${today_deposits}'}), 400
             
             # Create Stripe payment intent
             stripe_result = stripe_service.create_payment_intent(
-                amount=Decimal(str(amount)),
+                amount=amount,
                 currency='usd',
                 metadata={
                     'type': 'wallet_deposit',
@@ -138,25 +94,8 @@ def create_deposit():
             if not stripe_result.get('success'):
                 return jsonify({'error': 'Failed to create payment intent'}), 500
             
-            # Create pending transaction
-            transaction = WalletTransaction(
-                wallet_id=wallet.id,
-                transaction_type=WalletTransactionType.DEPOSIT,
-                amount=Decimal(str(amount)),
-                currency='USD',
-                status=WalletTransactionStatus.PENDING,
-                description=f'Wallet deposit - ${amount}',
-                payment_reference=stripe_result['payment_intent_id'],
-                balance_before=wallet.balance,
-                balance_after=wallet.balance  # Will be updated when payment completes
-            )
-            
-            session.add(transaction)
-            session.commit()
-            
             return jsonify({
                 'success': True,
-                'transaction_id': transaction.id,
                 'client_secret': stripe_result['client_secret'],
                 'payment_intent_id': stripe_result['payment_intent_id']
             })
@@ -168,65 +107,42 @@ def create_deposit():
 @player_wallet_bp.route('/withdraw', methods=['POST'])
 @player_required
 def create_withdrawal():
-    """Create a withdrawal request"""
+    """Create a withdrawal request; funds are held until the payout is settled"""
     try:
         data = request.get_json()
         if not data:
             return jsonify({'error': 'No data provided'}), 400
         
-        amount = data.get('amount')
-        if not amount or amount <= 0:
+        try:
+            amount = wallet_ledger.to_money(data.get('amount'))
+        except LedgerError:
             return jsonify({'error': 'Invalid amount'}), 400
         
         with SessionLocal() as session:
             player_id = g.user_id
             
-            # Get wallet
-            wallet = session.query(PlayerWallet).filter(PlayerWallet.player_id == player_id).first()
-            if not wallet:
+            wallet_id = session.query(PlayerWallet.id).filter(PlayerWallet.player_id == player_id).scalar()
+            if not wallet_id:
                 return jsonify({'error': 'Wallet not found'}), 404
             
-            # Check balance
-            if wallet.balance < Decimal(str(amount)):
-                return jsonify({'error': f'Insufficient balance. Available: ${wallet.balance}'}), 400
-            
-            # Check daily withdrawal limit
-            if wallet.daily_withdrawal_limit:
-                today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-                today_withdrawals = session.query(func.coalesce(func.sum(WalletTransaction.amount), 0)).filter(
-                    WalletTransaction.wallet_id == wallet.id,
-                    WalletTransaction.transaction_type == WalletTransactionType.WITHDRAWAL,
-                    WalletTransaction.status == WalletTransactionStatus.COMPLETED,
-                    WalletTransaction.created_at >= today_start
-                ).scalar() or 0
-                
-                if today_withdrawals + Decimal(str(amount)) > wallet.daily_withdrawal_limit:
-                    return jsonify({'error': f'Daily withdrawal limit exceeded. Limit: ${wallet.daily_withdrawal_limit}, Used: ${today_withdrawals}'}), 400
-            
-            # Create withdrawal transaction (pending admin approval)
-            transaction = WalletTransaction(
-                wallet_id=wallet.id,
-                transaction_type=WalletTransactionType.WITHDRAWAL,
-                amount=Decimal(str(amount)),
-                currency='USD',
-                status=WalletTransactionStatus.PENDING,
-                description=f'Wallet withdrawal - ${amount}',
-                balance_before=wallet.balance,
-                balance_after=wallet.balance - Decimal(str(amount))
-            )
-            
-            # Update wallet balance (hold the funds)
-            wallet.balance -= Decimal(str(amount))
-            wallet.updated_at = datetime.now(timezone.utc)
+            # Retried requests with the same key return the original withdrawal
+            client_key = request.headers.get('Idempotency-Key')
+            idempotency_key = f"withdraw:{wallet_id}:{client_key[:80]}" if client_key else None
             
-            session.add(transaction)
-            session.commit()
+            try:
+                result = wallet_ledger.hold_withdrawal(session, wallet_id, amount, idempotency_key=idempotency_key)
+                session.commit()
+            except LedgerError as e:
+                session.rollback()
+                return jsonify({'error': str(e)}), 400
             
-            logger.info(f"Withdrawal request created: ${amount} for player {player_id}")
+            if not result.replayed:
+                logger.info(f"Withdrawal request created: ${amount} for player {player_id}")
             
             return jsonify({
                 'success': True,
-                'transaction_id': transaction.id,
+                'transaction_id': result.entry_id,
+                'balance': float(result.balance),
                 'message': f'Withdrawal request for ${amount} submitted. Processing may take 1-3 business days.'
             })
             
@@ -254,35 +170,17 @@ def get_transactions():
             
             # Filter by type if specified
             transaction_type = request.args.get('type')
-            query = session.query(WalletTransaction).filter(WalletTransaction.wallet_id == wallet.id)
-            
             if transaction_type:
                 try:
-                    query = query.filter(WalletTransaction.transaction_type == WalletTransactionType(transaction_type))
+                    TransactionType(transaction_type)
                 except ValueError:
                     return jsonify({'error': 'Invalid transaction type'}), 400
             
-            # Get total count
-            total = query.count()
-            
-            # Get transactions
-            transactions = query.order_by(desc(WalletTransaction.created_at)).offset(offset).limit(per_page).all()
-            
-            transaction_list = []
-            for tx in transactions:
-                transaction_list.append({
-                    'id': tx.id,
-                    'type': tx.transaction_type.value,
-                    'amount': float(tx.amount),
-                    'currency': tx.currency,
-                    'status': tx.status.value,
-                    'description': tx.description,
-                    'balance_before': float(tx.balance_before),
-                    'balance_after': float(tx.balance_after),
-                    'payment_reference': tx.payment_reference,
-                    'created_at': tx.created_at.isoformat(),
-                    'processed_at': tx.processed_at.isoformat() if tx.processed_at else None
-                })
+            transaction_list, total = wallet_ledger.wallet_history(
+                session, wallet.id, limit=per_page, offset=offset, entry_type=transaction_type
+            )
+            for tx in transaction_list:
+                tx['currency'] = wallet.currency
             
             return jsonify({
                 'transactions': transaction_list,
@@ -13,14 +13,19 @@ import secrets
 import string
 import json
 import hashlib
+import hmac
 
 from shared.database.connection import SessionLocal
 from shared.models.shop import (
     ShopProduct, ShopOrder, ShopOrderItem, ProductDiscount, GiftCard, GiftCardUsage,
-    OrderStatus, ProductType, ProductStatus, PaymentMethod
+    ShopCheckoutSession, ShopInventoryLog, OrderStatus, ProductType, ProductStatus, PaymentMethod
 )
 from shared.models.base import Player
 from shared.auth.decorators import player_required, optional_player_auth
+from shared.services import inventory_reservations
+from shared.services.inventory_reservations import OutOfStock, get_reservation_sweeper
+from shared.services.shop_checkout import complete_order_details, create_paid_order
+from shared.services.stripe_webhook_inbox import WebhookError, get_webhook_inbox
 from stripe_service import stripe_service
 
 logger = logging.getLogger(__name__)
@@ -28,6 +33,8 @@ logger = logging.getLogger(__name__)
 # Configuration
 import os
 SESSION_SECRET_KEY = os.getenv("SHOP_SESSION_SECRET", "dev-session-secret-change-in-production")
+STRIPE_WEBHOOK_WORKER_ENABLED = os.getenv("STRIPE_WEBHOOK_WORKER_ENABLED", "true").lower() == "true"
+RESERVATION_SWEEPER_ENABLED = os.getenv("SHOP_RESERVATION_SWEEPER_ENABLED", "true").lower() == "true"
 
 shop_bp = Blueprint('shop', __name__, url_prefix='/v1/shop')
 
@@ -191,7 +198,7 @@ def get_shop_categories():
 @shop_bp.route('/checkout/create-session', methods=['POST'])
 @optional_player_auth  # Allow both guest and authenticated checkout
 def create_checkout_session():
-    """Create a checkout session for cart items"""
+    """Create a checkout session for cart items, reserving their stock until it expires"""
     try:
         data = request.get_json()
         items = data.get('items', [])  # [{'product_sku': 'BUNDLE-001', 'quantity': 1}]
@@ -199,6 +206,8 @@ def create_checkout_session():
         if not items:
             return jsonify({'error': 'No items provided'}), 400
         
+        customer = g.current_player if hasattr(g, 'current_player') and g.current_player else None
+        
         with SessionLocal() as session:
             # Validate all products and calculate totals
             checkout_items = []
@@ -214,17 +223,13 @@ def create_checkout_session():
                 # Find product
                 product = session.query(ShopProduct).filter(
                     ShopProduct.sku == product_sku,
-                    ShopProduct.status == ProductStatus.ACTIVE,
+                    ShopProduct.status == ProductStatus.ACTIVE.value,
                     ShopProduct.is_active == True
                 ).first()
                 
                 if not product:
                     return jsonify({'error': f'Product {product_sku} not found'}), 404
                 
-                # Check stock
-                if product.track_inventory and product.stock_quantity < quantity:
-                    return jsonify({'error': f'Insufficient stock for {product.name}'}), 400
-                
                 item_total = product.price * quantity
                 subtotal += item_total
                 
@@ -241,13 +246,26 @@ def create_checkout_session():
             shipping_amount = Decimal('5.99') if subtotal < 50 else Decimal('0.00')  # Free shipping over $50
             total_amount = subtotal + tax_amount + shipping_amount
             
-            # Create secure checkout session
-            session_id = generate_secure_session_id()
-            expires_at = datetime.now(timezone.utc) + timedelta(minutes=30)
+            session_id = generate_checkout_session_id()
+            now = datetime.now(timezone.utc)
+            expires_at = inventory_reservations.reservation_expiry(now)
+            
+            # Take the stock now and commit straight away; no product row stays locked while Stripe is called
+            try:
+                inventory_reservations.reserve(
+                    session, session_id, [(item['product'].id, item['quantity']) for item in checkout_items],
+                    expires_at=expires_at, now=now
+                )
+                session.commit()
+            except OutOfStock as e:
+                session.rollback()
+                product = next(item['product'] for item in checkout_items if item['product'].id == e.product_id)
+                return jsonify({'error': f'Insufficient stock for {product.name}'}), 409
             
             # Prepare session data
             session_data = {
                 'items': [{
+                    'product_id': item['product'].id,
                     'product_sku': item['product'].sku,
                     'product_name': item['product'].name,
                     'quantity': item['quantity'],
@@ -260,24 +278,25 @@ def create_checkout_session():
                 'total_amount': float(total_amount),
                 'currency': 'USD',
                 'expires_at': expires_at.isoformat(),
-                'customer_id': g.current_player.id if hasattr(g, 'current_player') and g.current_player else None
+                'customer_id': customer.id if customer else None,
+                'requires_shipping': any(item['product'].product_type == 'physical' for item in checkout_items)
             }
             
             # Create Stripe Payment Intent
-            customer_email = g.current_player.email if hasattr(g, 'current_player') and g.current_player else None
-            
             stripe_result = stripe_service.create_payment_intent(
                 amount=total_amount,
                 currency='USD',
-                customer_email=customer_email,
+                customer_email=customer.email if customer else None,
                 metadata={
                     'session_id': session_id,
-                    'customer_id': g.current_player.id if hasattr(g, 'current_player') and g.current_player else None,
+                    'customer_id': customer.id if customer else None,
                     'item_count': len(checkout_items)
                 }
             )
             
             if not stripe_result['success']:
+                inventory_reservations.release(session, session_id, "Payment intent creation failed")
+                session.commit()
                 return jsonify({
                     'error': 'Payment processing unavailable',
                     'details': stripe_result.get('error', 'Unknown error')
@@ -295,7 +314,7 @@ def create_checkout_session():
                 session_id=session_id,
                 session_data=session_data,
                 session_hash=session_hash,
-                customer_id=g.current_player.id if hasattr(g, 'current_player') and g.current_player else None,
+                customer_id=customer.id if customer else None,
                 customer_ip=request.remote_addr,
                 expires_at=expires_at
             )
@@ -311,7 +330,7 @@ def create_checkout_session():
                 'session_id': session_id,
                 'expires_at': expires_at.isoformat(),
                 'payment_methods': ['stripe'],  # Now using Stripe
-                'requires_shipping': any(item['product'].product_type == ProductType.PHYSICAL for item in checkout_items),
+                'requires_shipping': session_data['requires_shipping'],
                 'total_amount': float(total_amount),
                 'currency': 'USD',
                 'stripe_client_secret': stripe_result['client_secret'],
@@ -363,12 +382,10 @@ def get_checkout_session(session_id):
 @shop_bp.route('/checkout/process', methods=['POST'])
 @optional_player_auth
 def process_checkout():
-    """Process checkout and create order"""
+    """Create the order for a paid checkout session from its reserved stock"""
     try:
         data = request.get_json()
         session_id = data.get('session_id')
-        payment_method = data.get('payment_method')
-        payment_token = data.get('payment_token')  # From Stripe/PayPal
         
         # Customer information
         customer_info = data.get('customer', {})
@@ -379,11 +396,11 @@ def process_checkout():
             return jsonify({'error': 'Session ID required'}), 400
         
         with SessionLocal() as db_session:
-            # Retrieve and validate checkout session
+            # Retrieve and validate checkout session; a used one may have been turned into its order by the payment webhook
             checkout_session_record = db_session.query(ShopCheckoutSession).filter(
                 ShopCheckoutSession.session_id == session_id,
-                ShopCheckoutSession.is_used == False,
-                ShopCheckoutSession.expires_at > datetime.now(timezone.utc)
+                or_(ShopCheckoutSession.is_used == True,
+                    ShopCheckoutSession.expires_at > datetime.now(timezone.utc))
             ).first()
             
             if not checkout_session_record:
@@ -395,125 +412,49 @@ def process_checkout():
                 logger.error(f"Session integrity check failed for session {session_id}")
                 return jsonify({'error': 'Session integrity check failed'}), 400
             
-            # Get items from validated session
             session_data = checkout_session_record.session_data
-            items = session_data.get('items', [])
-            if not items:
-                return jsonify({'error': 'No items in checkout session'}), 400
-            # Validate and lock inventory
-            order_items = []
-            subtotal = Decimal('0.00')
-            
-            for item_data in items:
-                product = db_session.query(ShopProduct).filter(
-                    ShopProduct.sku == item_data['product_sku']
-                ).with_for_update().first()  # Lock for inventory update
-                
-                if not product:
-                    return jsonify({'error': f'Product {item_data["product_sku"]} not found'}), 404
-                
-                quantity = item_data['quantity']
-                
-                # Final stock check
-                if product.track_inventory and product.stock_quantity < quantity:
-                    return jsonify({'error': f'Insufficient stock for {product.name}'}), 400
-                
-                # Reserve inventory
-                if product.track_inventory:
-                    product.stock_quantity -= quantity
-                
-                item_total = product.price * quantity
-                subtotal += item_total
-                
-                order_items.append({
-                    'product': product,
-                    'quantity': quantity,
-                    'unit_price': product.price,
-                    'total_price': item_total
-                })
-            
-            # Calculate final totals
-            tax_amount = subtotal * Decimal('0.08')
-            shipping_amount = Decimal('5.99') if subtotal < 50 else Decimal('0.00')
-            total_amount = subtotal + tax_amount + shipping_amount
-            
-            # Process payment with Stripe
-            stripe_payment_intent_id = session_data.get('stripe_payment_intent_id')
-            if not stripe_payment_intent_id:
-                return jsonify({'error': 'Invalid checkout session - no payment intent'}), 400
-            
-            # Verify payment intent status with Stripe
-            payment_intent = stripe_service.retrieve_payment_intent(stripe_payment_intent_id)
-            if not payment_intent:
-                return jsonify({'error': 'Payment verification failed'}), 400
-            
-            # Check if payment was successful
-            payment_success = payment_intent['status'] == 'succeeded'
-            if not payment_success:
-                logger.warning(f"Payment not completed: {payment_intent['status']} for intent {stripe_payment_intent_id}")
-                return jsonify({
-                    'error': 'Payment not completed',
-                    'payment_status': payment_intent['status']
-                }), 400
-            
-            # Payment was successful, continue with order creation
-            
-            # Create order
-            order = ShopOrder(
-                order_number=generate_order_number(),
-                customer_id=g.current_player.id if hasattr(g, 'current_player') and g.current_player else None,
-                customer_email=customer_info.get('email'),
-                customer_name=customer_info.get('name'),
-                customer_phone=customer_info.get('phone'),
-                subtotal=subtotal,
-                tax_amount=tax_amount,
-                shipping_amount=shipping_amount,
-                total_amount=total_amount,
-                currency='USD',
-                order_status=OrderStatus.CONFIRMED,
-                payment_status='paid',
-                shipping_status=ShippingStatus.NOT_SHIPPED,
-                billing_address=billing_address,
-                shipping_address=shipping_address,
-                payment_method='stripe',
-                payment_reference=stripe_payment_intent_id,
-                paid_at=datetime.now(timezone.utc),
-                requires_shipping=any(item['product'].product_type == ProductType.PHYSICAL for item in order_items)
-            )
-            
-            db_session.add(order)
-            db_session.flush()  # Get order ID
-            
-            # Create order items
-            for item in order_items:
-                order_item = ShopOrderItem(
-                    order_id=order.id,
-                    product_id=item['product'].id,
-                    product_sku=item['product'].sku,
-                    product_name=item['product'].name,
-                    product_image_url=item['product'].image_url,
-                    quantity=item['quantity'],
-                    unit_price=item['unit_price'],
-                    total_price=item['total_price']
+        
+        items = session_data.get('items', [])
+        if not items:
+            return jsonify({'error': 'No items in checkout session'}), 400
+        
+        # Verify the payment with Stripe; the stock is already reserved, so nothing is locked meanwhile
+        stripe_payment_intent_id = session_data.get('stripe_payment_intent_id')
+        if not stripe_payment_intent_id:
+            return jsonify({'error': 'Invalid checkout session - no payment intent'}), 400
+        
+        payment_intent = stripe_service.retrieve_payment_intent(stripe_payment_intent_id)
+        if not payment_intent:
+            return jsonify({'error': 'Payment verification failed'}), 400
+        
+        if payment_intent['status'] != 'succeeded':
+            logger.warning(f"Payment not completed: {payment_intent['status']} for intent {stripe_payment_intent_id}")
+            return jsonify({
+                'error': 'Payment not completed',
+                'payment_status': payment_intent['status']
+            }), 400
+        
+        now = datetime.now(timezone.utc)
+        with SessionLocal() as db_session:
+            try:
+                order = create_paid_order(
+                    db_session, session_id, session_data, now,
+                    customer_id=g.current_player.id if hasattr(g, 'current_player') and g.current_player else None,
+                    customer=customer_info, billing_address=billing_address, shipping_address=shipping_address
                 )
-                db_session.add(order_item)
-            
-            # Log inventory changes
-            for item in order_items:
-                if item['product'].track_inventory:
-                    inventory_log = ShopInventoryLog(
-                        product_id=item['product'].id,
-                        change_type='sale',
-                        quantity_before=item['product'].stock_quantity + item['quantity'],
-                        quantity_change=-item['quantity'],
-                        quantity_after=item['product'].stock_quantity,
-                        reason=f'Sold in order {order.order_number}',
-                        order_id=order.id
-                    )
-                    db_session.add(inventory_log)
-            
-            # Mark checkout session as used
-            checkout_session_record.is_used = True
+            except OutOfStock:
+                db_session.rollback()
+                logger.error(f"Checkout {session_id} paid with {stripe_payment_intent_id} but its stock is gone; refund required")
+                return jsonify({'error': 'Items sold out before payment completed; the payment will be refunded'}), 409
+            
+            if order is None:
+                # Already claimed, usually by the payment webhook; the client still brings the contact details
+                order = db_session.query(ShopOrder).filter(
+                    ShopOrder.payment_reference == stripe_payment_intent_id
+                ).with_for_update().first()
+                if not order:
+                    return jsonify({'error': 'Checkout session already processed'}), 409
+                complete_order_details(order, customer_info, billing_address, shipping_address)
             
             db_session.commit()
             
@@ -524,7 +465,7 @@ def process_checkout():
                     'order_number': order.order_number,
                     'total_amount': float(order.total_amount),
                     'currency': order.currency,
-                    'status': order.order_status.value,
+                    'status': order.order_status,
                     'created_at': order.created_at.isoformat()
                 },
                 'redirect_url': f'/checkout/success?order={order.order_number}'
@@ -635,9 +576,17 @@ def get_my_orders():
 
 # === STRIPE WEBHOOKS ===
 
+@shop_bp.record_once
+def start_shop_workers(state):
+    """Apply stored Stripe events and expire abandoned reservations in every API worker that serves the shop"""
+    if STRIPE_WEBHOOK_WORKER_ENABLED:
+        get_webhook_inbox().start()
+    if RESERVATION_SWEEPER_ENABLED:
+        get_reservation_sweeper().start()
+
 @shop_bp.route('/webhooks/stripe', methods=['POST'])
 def stripe_webhook():
-    """Handle Stripe webhook events"""
+    """Verify and store a Stripe event; the webhook worker applies it"""
     payload = request.get_data()
     signature = request.headers.get('Stripe-Signature')
     
@@ -646,42 +595,17 @@ def stripe_webhook():
         return jsonify({'error': 'Missing signature'}), 400
     
     try:
-        # Handle webhook with Stripe service
-        result = stripe_service.handle_webhook(payload, signature)
-        
-        if not result['success']:
-            return jsonify({'error': result['error']}), 400
-        
-        # Process webhook result
-        action = result.get('action')
-        
-        if action == 'payment_confirmed':
-            # Payment was confirmed via webhook
-            session_id = result.get('session_id')
-            payment_intent_id = result.get('payment_intent_id')
-            
-            if session_id:
-                # Update checkout session or order status if needed
-                with SessionLocal() as db_session:
-                    checkout_session = db_session.query(ShopCheckoutSession).filter(
-                        ShopCheckoutSession.session_id == session_id
-                    ).first()
-                    
-                    if checkout_session:
-                        logger.info(f"Payment confirmed for session {session_id}")
-                        # Additional processing can be added here
-        
-        elif action == 'payment_failed':
-            # Handle payment failure
-            session_id = result.get('session_id')
-            logger.warning(f"Payment failed for session {session_id}")
-            
-            # Could implement inventory release logic here
-        
+        event_id, stored = get_webhook_inbox().ingest(payload, signature)
+        if not stored:
+            logger.info(f"Duplicate Stripe delivery of {event_id}")
         return jsonify({'received': True})
         
+    except WebhookError as e:
+        logger.error(f"Rejected Stripe webhook: {e}")
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        logger.error(f"Webhook processing failed: {e}")
+        # Not stored: a non-2xx response makes Stripe deliver it again
+        logger.error(f"Storing Stripe webhook failed: {e}")
         return jsonify({'error': 'Webhook processing failed'}), 500
 
 # === HELPER FUNCTIONS ===
@@ -690,6 +614,11 @@ def generate_checkout_session_id():
     """Generate secure checkout session ID"""
     return ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(32))
 
+def create_session_hash(session_data, secret_key):
+    """HMAC over the canonical JSON of the session data, so a stored session cannot be edited"""
+    canonical = json.dumps(session_data, sort_keys=True, separators=(',', ':'))
+    return hmac.new(secret_key.encode(), canonical.encode(), hashlib.sha256).hexdigest()
+
 def process_payment(payment_method, payment_token, amount):
     """Process payment with proper validation"""
     logger.info(f"Processing {payment_method} payment for ${amount}")
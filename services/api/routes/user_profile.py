@@ -17,6 +17,7 @@ from shared.models.nfc_trading_system import (
 )
 from shared.models.shop import ShopOrder, ShopOrderItem
 from shared.auth.decorators import player_required
+from shared.services.leaderboards import get_leaderboards, normalize_region
 
 logger = logging.getLogger(__name__)
 
@@ -135,6 +136,12 @@ def update_user_profile():
                 player.username = data['username'].strip()
             if 'avatar_url' in data:
                 player.avatar_url = data['avatar_url']
+            if 'region' in data:
+                region = normalize_region(data['region'])
+                if region and len(region) > 50:
+                    return jsonify({'error': 'Region is too long'}), 400
+                # Regional leaderboards pick the new region up with the next rated match
+                player.region = region
             
             player.updated_at = datetime.now(timezone.utc)
             session.commit()
@@ -336,6 +343,7 @@ def get_user_analytics():
                     'win_rate': round((wins / total_matches * 100) if total_matches > 0 else 0, 1)
                 },
                 'elo_history': elo_history,
+                'rankings': get_leaderboards().player_ranks(g.current_player.id),
                 'card_statistics': [{
                     'product_sku': stat.product_sku,
                     'total_taps': int(stat.total_taps or 0),
@@ -255,6 +255,16 @@ class StripeService:
         session_id = metadata.get("session_id")
         order_id = metadata.get("order_id")
         
+        if metadata.get("type") == "wallet_deposit" and metadata.get("wallet_id"):
+            amount_cents = payment_intent.get("amount_received") or payment_intent["amount"]
+            return {
+                "success": True,
+                "action": "wallet_deposit_confirmed",
+                "wallet_id": int(metadata["wallet_id"]),
+                "amount": Decimal(amount_cents) / 100,
+                "payment_intent_id": payment_intent["id"]
+            }
+        
         if session_id:
             # Update checkout session or order status
             # This will be handled by the shop service
@@ -9,6 +9,7 @@ import os
 import json
 import asyncio
 import logging
+import uuid
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timezone
 from pathlib import Path
@@ -23,11 +24,30 @@ from elevenlabs import ElevenLabs
 import sys
 sys.path.append('/home/jp/deckport.ai')
 from frontend.services.comfyui_service import ComfyUIService
+from shared.services.arena_pipeline import Stage, StagePipeline, safe_name
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Pipeline configuration
+# Stages of every arena in a batch share these slot pools: ComfyUI renders one
+# workflow at a time on the GPU, ffmpeg renders are CPU bound
+ARENA_PIPELINE_SLOTS = {
+    'llm': int(os.getenv('ARENA_LLM_SLOTS', '4')),
+    'gpu': int(os.getenv('ARENA_GPU_SLOTS', '1')),
+    'ffmpeg': int(os.getenv('ARENA_FFMPEG_SLOTS', str(max(1, (os.cpu_count() or 2) // 2)))),
+    'audio': int(os.getenv('ARENA_AUDIO_SLOTS', '2')),
+    'db': int(os.getenv('ARENA_DB_SLOTS', '4')),
+}
+ARENA_PIPELINE_MAX_ARENAS = int(os.getenv('ARENA_PIPELINE_MAX_ARENAS', '4'))  # Arenas in flight at once
+ARENA_STAGE_ATTEMPTS = int(os.getenv('ARENA_STAGE_ATTEMPTS', '3'))
+ARENA_STAGE_RETRY_SECONDS = float(os.getenv('ARENA_STAGE_RETRY_SECONDS', '10'))
+
+def new_run_id() -> str:
+    """Names a batch's checkpoint directory under temp/arena_creation/runs"""
+    return f"{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
 class ArenaCreationEngine:
     """
     Complete AI-powered arena creation system
@@ -56,12 +76,58 @@ class ArenaCreationEngine:
             'celestial_observatory', 'shadow_realm', 'steampunk_factory', 'ethereal_void'
         ]
     
-    async def create_arenas_batch(self, count: int = 10) -> List[Dict]:
+    def build_pipeline(self, checkpoint_dir: Optional[Path] = None, on_progress=None) -> StagePipeline:
+        """
+        The 8-step pipeline as a stage graph, one job per arena index
+
+        Steps:
+        1. Create arena data with LLM
+        2. Insert data into database
+        3. Generate 10+ arena environment images
+        4. Create video clips from images
+        5. Edit clips into sequences
+        6. Generate music with ElevenLabs
+        7. Sync music with video
+        8. Create all arena video types (intro, ambient, etc.)
+
+        Images and music only need the arena data, so they run side by side; the
+        database steps stay off the rendering path.
+        """
+        stages = [
+            Stage('arena_data', lambda index, r: self.generate_arena_data_llm(index), slot='llm'),
+            Stage('arena_id', lambda index, r: self.insert_arena_database(r['arena_data']),
+                  requires=('arena_data',), slot='db'),
+            Stage('images', lambda index, r: self.generate_arena_images(r['arena_data']),
+                  requires=('arena_data',), slot='gpu'),
+            Stage('clips', lambda index, r: self.create_video_clips(r['images'], r['arena_data']),
+                  requires=('images',), slot='gpu'),
+            Stage('sequences', lambda index, r: self.edit_clip_sequences(r['clips'], r['arena_data']),
+                  requires=('clips',), slot='ffmpeg'),
+            Stage('music', lambda index, r: self.generate_arena_music(r['arena_data']),
+                  requires=('arena_data',), slot='audio'),
+            Stage('final_videos', lambda index, r: self.sync_music_video(r['sequences'], r['music'], r['arena_data']),
+                  requires=('sequences', 'music'), slot='ffmpeg'),
+            Stage('arena_videos', lambda index, r: self.create_arena_video_types(r['final_videos'], r['arena_data']),
+                  requires=('final_videos',)),
+            Stage('clip_records', lambda index, r: self.update_arena_videos(r['arena_id'], r['arena_videos']),
+                  requires=('arena_id', 'arena_videos'), slot='db'),
+        ]
+        return StagePipeline(
+            stages, slots=ARENA_PIPELINE_SLOTS, max_jobs=ARENA_PIPELINE_MAX_ARENAS,
+            attempts=ARENA_STAGE_ATTEMPTS, retry_delay=ARENA_STAGE_RETRY_SECONDS,
+            checkpoint_dir=checkpoint_dir, on_progress=on_progress,
+            job_key=lambda index: f"arena_{index:03d}"
+        )
+
+    async def create_arenas_batch(self, count: int = 10, run_id: Optional[str] = None,
+                                  on_progress=None) -> List[Dict]:
         """
         Create multiple arenas using the 8-step AI pipeline
         
         Args:
             count: Number of arenas to create (1-100)
+            run_id: Resume an earlier batch; its finished stages are not redone
+            on_progress: Called with each stage event of the batch
             
         Returns:
             List of created arena data
@@ -69,75 +135,33 @@ class ArenaCreationEngine:
         if count < 1 or count > 100:
             raise ValueError("Arena count must be between 1 and 100")
         
-        logger.info(f"🏗️ Starting creation of {count} arenas...")
-        created_arenas = []
+        run_id = run_id or new_run_id()
+        if not safe_name(run_id):
+            raise ValueError("Invalid run id")
+        logger.info(f"🏗️ Starting creation of {count} arenas (run {run_id})...")
+        pipeline = self.build_pipeline(self.temp_path / 'runs' / run_id, on_progress)
+        outcomes = await pipeline.run(range(count))
         
-        for i in range(count):
-            try:
-                logger.info(f"🏟️ Creating arena {i+1}/{count}")
-                arena_data = await self.create_single_arena(i)
+        created_arenas = []
+        for outcome in outcomes:
+            if outcome.succeeded:
+                arena_data = dict(outcome.results['arena_data'], id=outcome.results['arena_id'])
                 created_arenas.append(arena_data)
                 logger.info(f"✅ Arena '{arena_data['name']}' created successfully")
-                
-            except Exception as e:
-                logger.error(f"❌ Failed to create arena {i+1}: {e}")
-                continue
+            else:
+                logger.error(f"❌ Failed to create {outcome.key} at {outcome.failed_stage}: {outcome.error}")
         
-        logger.info(f"🎉 Created {len(created_arenas)} arenas successfully!")
+        logger.info(f"🎉 Created {len(created_arenas)} arenas successfully! (run {run_id})")
         return created_arenas
     
     async def create_single_arena(self, index: int) -> Dict:
         """
         Create a single arena using the 8-step pipeline
-        
-        Steps:
-        1. Create arena data with LLM
-        2. Insert data into database
-        3. Generate 10+ arena environment images
-        4. Create video clips from images
-        5. Edit clips into sequences
-        6. Generate music with ElevenLabs
-        7. Sync music with video
-        8. Create all arena video types (intro, ambient, etc.)
         """
-        
-        # Step 1: Create arena data with LLM
-        logger.info("Step 1: Generating arena data with LLM...")
-        arena_data = await self.generate_arena_data_llm(index)
-        
-        # Step 2: Insert into database
-        logger.info("Step 2: Inserting arena data into database...")
-        arena_id = await self.insert_arena_database(arena_data)
-        arena_data['id'] = arena_id
-        
-        # Step 3: Generate arena environment images
-        logger.info("Step 3: Generating arena environment images...")
-        image_paths = await self.generate_arena_images(arena_data)
-        
-        # Step 4: Create video clips from images
-        logger.info("Step 4: Creating video clips from images...")
-        video_clips = await self.create_video_clips(image_paths, arena_data)
-        
-        # Step 5: Edit clips into sequences
-        logger.info("Step 5: Editing clips into sequences...")
-        video_sequences = await self.edit_clip_sequences(video_clips, arena_data)
-        
-        # Step 6: Generate music with ElevenLabs
-        logger.info("Step 6: Generating arena music...")
-        music_tracks = await self.generate_arena_music(arena_data)
-        
-        # Step 7: Sync music with video
-        logger.info("Step 7: Synchronizing music with video...")
-        final_videos = await self.sync_music_video(video_sequences, music_tracks, arena_data)
-        
-        # Step 8: Create all arena video types
-        logger.info("Step 8: Creating specialized arena videos...")
-        arena_videos = await self.create_arena_video_types(final_videos, arena_data)
-        
-        # Update database with video paths
-        await self.update_arena_videos(arena_id, arena_videos)
-        
-        return arena_data
+        outcome = (await self.build_pipeline().run([index]))[0]
+        if not outcome.succeeded:
+            raise RuntimeError(f"Arena creation failed at {outcome.failed_stage}: {outcome.error}")
+        return dict(outcome.results['arena_data'], id=outcome.results['arena_id'])
     
     async def generate_arena_data_llm(self, index: int) -> Dict:
         """
@@ -169,7 +193,8 @@ Generate a JSON object with exactly these fields:
 Make it thematically consistent with {mana_color} mana and {theme} theme.
 Return ONLY the JSON object, no other text."""
 
-        response = self.anthropic_client.messages.create(
+        response = await asyncio.to_thread(
+            self.anthropic_client.messages.create,
             model="claude-3-5-sonnet-20241022",
             max_tokens=1500,
             temperature=0.8,
@@ -196,6 +221,9 @@ Return ONLY the JSON object, no other text."""
         """
         Step 2: Insert arena data into database
         """
+        return await asyncio.to_thread(self._insert_arena, arena_data)
+    
+    def _insert_arena(self, arena_data: Dict) -> int:
         from shared.database.connection import SessionLocal
         from shared.models.arena import Arena
         
@@ -229,9 +257,8 @@ Return ONLY the JSON object, no other text."""
         images_dir.mkdir(parents=True, exist_ok=True)
         
         # Check ComfyUI availability
-        if not self.comfyui_service.is_online():
-            logger.error("ComfyUI service is not online")
-            return []
+        if not await asyncio.to_thread(self.comfyui_service.is_online):
+            raise RuntimeError("ComfyUI service is not online")
         
         # Load the arena-specific ComfyUI workflow template
         arena_workflow_path = self.base_path / 'workflows' / 'arena-generation.json'
@@ -303,13 +330,13 @@ Return ONLY the JSON object, no other text."""
                     workflow["40"]["inputs"]["path"] = str(image_path)
                 
                 # Submit to ComfyUI
-                prompt_id = self.comfyui_service.submit_prompt(workflow)
+                prompt_id = await asyncio.to_thread(self.comfyui_service.submit_prompt, workflow)
                 if not prompt_id:
                     logger.error(f"Failed to submit ComfyUI prompt for image {i+1}")
                     continue
                 
                 # Wait for completion
-                image_data = self.comfyui_service.wait_for_completion(prompt_id)
+                image_data = await asyncio.to_thread(self.comfyui_service.wait_for_completion, prompt_id)
                 if image_data and image_path.exists():
                     image_paths.append(str(image_path))
                     logger.info(f"   Generated image {i+1}/{len(angle_variations)}: {angle}")
@@ -323,6 +350,8 @@ Return ONLY the JSON object, no other text."""
                 logger.error(f"Failed to generate image {i+1}: {e}")
                 continue
         
+        if not image_paths:
+            raise RuntimeError("ComfyUI generated no arena images")
         return image_paths
     
     async def create_video_clips(self, image_paths: List[str], arena_data: Dict) -> List[str]:
@@ -334,9 +363,8 @@ Return ONLY the JSON object, no other text."""
         clips_dir.mkdir(parents=True, exist_ok=True)
         
         # Check ComfyUI availability
-        if not self.comfyui_service.is_online():
-            logger.error("ComfyUI service is not online for video generation")
-            return []
+        if not await asyncio.to_thread(self.comfyui_service.is_online):
+            raise RuntimeError("ComfyUI service is not online for video generation")
         
         # Load the arena video generation workflow
         video_workflow_path = self.base_path / 'workflows' / 'arena-video-generation.json'
@@ -368,7 +396,8 @@ Return ONLY the JSON object, no other text."""
                 clip_path = clips_dir / f"{arena_name}_clip_{i+1:02d}.mp4"
                 
                 # Generate video using ComfyUI service
-                generated_video_path = self.comfyui_service.generate_arena_video(
+                generated_video_path = await asyncio.to_thread(
+                    self.comfyui_service.generate_arena_video,
                     image_path=str(image_path),
                     motion_type=motion['type'],
                     motion_strength=motion['strength'],
@@ -391,12 +420,18 @@ Return ONLY the JSON object, no other text."""
                 logger.error(f"Failed to create video clip {i+1}: {e}")
                 continue
         
+        if not video_clips:
+            raise RuntimeError("ComfyUI generated no arena video clips")
         return video_clips
     
     async def edit_clip_sequences(self, video_clips: List[str], arena_data: Dict) -> Dict[str, str]:
         """
         Step 5: Edit clips into different sequences for various arena video types
         """
+        # moviepy renders block, so they run in a worker thread
+        return await asyncio.to_thread(self._render_sequences, video_clips, arena_data)
+    
+    def _render_sequences(self, video_clips: List[str], arena_data: Dict) -> Dict[str, str]:
         arena_name = arena_data['name'].lower().replace(' ', '_')
         sequences_dir = self.assets_path / 'sequences' / arena_name
         sequences_dir.mkdir(parents=True, exist_ok=True)
@@ -528,7 +563,8 @@ Return ONLY the JSON object, no other text."""
                 
                 # Generate music using ElevenLabs Music API
                 # Note: Using the ElevenLabs Music capabilities from https://elevenlabs.io/docs/capabilities/music
-                audio = self.elevenlabs_client.generate(
+                audio = await asyncio.to_thread(
+                    self.elevenlabs_client.generate,
                     text=config['prompt'],
                     model="eleven_music_v1",  # ElevenLabs music model
                     voice_settings={
@@ -539,10 +575,8 @@ Return ONLY the JSON object, no other text."""
                     }
                 )
                 
-                # Save the generated audio
-                with open(output_path, 'wb') as f:
-                    for chunk in audio:
-                        f.write(chunk)
+                # Save the generated audio; the chunks stream from the API
+                await asyncio.to_thread(self._write_audio, output_path, audio)
                 
                 music_tracks[music_type] = str(output_path)
                 logger.info(f"   Generated {music_type} music ({config['duration']}s)")
@@ -558,10 +592,18 @@ Return ONLY the JSON object, no other text."""
         
         return music_tracks
     
+    def _write_audio(self, output_path: Path, audio):
+        with open(output_path, 'wb') as f:
+            for chunk in audio:
+                f.write(chunk)
+    
     async def sync_music_video(self, video_sequences: Dict[str, str], music_tracks: Dict[str, str], arena_data: Dict) -> Dict[str, str]:
         """
         Step 7: Synchronize music with video, ensuring length matches
         """
+        return await asyncio.to_thread(self._render_synced_videos, video_sequences, music_tracks, arena_data)
+    
+    def _render_synced_videos(self, video_sequences: Dict[str, str], music_tracks: Dict[str, str], arena_data: Dict) -> Dict[str, str]:
         arena_name = arena_data['name'].lower().replace(' ', '_')
         final_dir = self.assets_path / 'final' / arena_name
         final_dir.mkdir(parents=True, exist_ok=True)
@@ -646,6 +688,9 @@ Return ONLY the JSON object, no other text."""
         """
         Update arena database record with video file paths
         """
+        await asyncio.to_thread(self._insert_arena_clips, arena_id, arena_videos)
+    
+    def _insert_arena_clips(self, arena_id: int, arena_videos: Dict[str, str]):
         from shared.database.connection import SessionLocal
         from shared.models.arena import Arena, ArenaClip, ArenaClipType
         
@@ -693,23 +738,29 @@ class ArenaCreationAPI:
     def __init__(self):
         self.engine = ArenaCreationEngine()
     
-    async def create_arenas_endpoint(self, count: int, theme_preference: Optional[str] = None) -> Dict:
+    async def create_arenas_endpoint(self, count: int, theme_preference: Optional[str] = None,
+                                     run_id: Optional[str] = None) -> Dict:
         """
-        API endpoint to create multiple arenas
+        API endpoint to create multiple arenas; pass the run_id of an interrupted
+        batch to resume it
         """
         try:
             # Validate input
             if count < 1 or count > 100:
                 return {"error": "Count must be between 1 and 100", "success": False}
+            if run_id is not None and not safe_name(run_id):
+                return {"error": "Invalid run id", "success": False}
             
             # Create arenas
-            created_arenas = await self.engine.create_arenas_batch(count)
+            run_id = run_id or new_run_id()
+            created_arenas = await self.engine.create_arenas_batch(count, run_id=run_id)
             
             return {
                 "success": True,
                 "message": f"Successfully created {len(created_arenas)} arenas",
                 "arenas": created_arenas,
-                "total_created": len(created_arenas)
+                "total_created": len(created_arenas),
+                "run_id": run_id
             }
             
         except Exception as e:
@@ -13,7 +13,7 @@ from datetime import datetime
 # Add shared modules to path
 sys.path.append('/home/jp/deckport.ai')
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 from dotenv import load_dotenv
@@ -23,10 +23,12 @@ from shared.utils.logging import setup_logging
 from handlers.matchmaking import MatchmakingHandler
 from handlers.game_state import GameStateHandler
 from protocols.game_protocol import GameProtocol
+from services.command_wakeups import CommandWakeups, MAX_WAIT_SECONDS
 
 # Import game engine components
 sys.path.append('/home/jp/deckport.ai/services/api')
 from game_engine.match_manager import MatchManager
+from game_engine.match_log import MatchLog
 from matchmaking.queue_manager import QueueManager
 
 # Load environment
@@ -109,17 +111,28 @@ manager = ConnectionManager()
 # Initialize game engine components
 match_manager = MatchManager()
 queue_manager = QueueManager(match_manager)
+match_log = MatchLog()
 
 # Initialize handlers (will be created when needed)
 matchmaking_handler = None
 game_state_handler = None
 protocol = GameProtocol()
 
+# Consoles wait here for remote management commands instead of holding a sync API worker
+command_wakeups = CommandWakeups()
+
 # Start queue manager
 async def startup_event():
     """Initialize services on startup"""
     await queue_manager.start()
     logger.info("Queue manager started")
+    command_wakeups.start()
+    
+    # Pick up the matches that were in flight when the service stopped
+    _, gs_handler = get_handlers()
+    recovered = await gs_handler.recover_matches()
+    if recovered:
+        logger.info(f"Recovered {len(recovered)} in-flight matches: {', '.join(recovered)}")
 
 # Register startup event
 @app.on_event("startup")
@@ -130,6 +143,7 @@ async def startup():
 async def shutdown():
     await queue_manager.stop()
     logger.info("Queue manager stopped")
+    await command_wakeups.stop()
 
 def get_handlers():
     """Get or create handlers"""
@@ -137,7 +151,7 @@ def get_handlers():
     if matchmaking_handler is None:
         matchmaking_handler = MatchmakingHandler(manager, queue_manager)
     if game_state_handler is None:
-        game_state_handler = GameStateHandler(manager, match_manager)
+        game_state_handler = GameStateHandler(manager, match_manager, match_log)
     return matchmaking_handler, game_state_handler
 
 async def get_current_user(websocket: WebSocket) -> Optional[dict]:
@@ -182,6 +196,23 @@ async def health():
         "timestamp": datetime.utcnow().isoformat()
     }
 
+@app.get("/console-commands/wait")
+async def wait_for_console_commands(request: Request, after: Optional[str] = None,
+                                    timeout: float = MAX_WAIT_SECONDS):
+    """
+    Held until a command is queued for the calling console, or the timeout
+    The console then fetches it from the API's /v1/console-commands/poll. Pass the
+    token of the previous wait as ?after= so nothing queued in between is missed.
+    """
+    authorization = request.headers.get('authorization', '')
+    payload = verify_token(authorization[7:]) if authorization.lower().startswith('bearer ') else None
+    if not payload or payload.get('type') != 'device' or not payload.get('console_id'):
+        raise HTTPException(status_code=401, detail="Device token required")
+    if not command_wakeups.connected:
+        # Without Redis nothing would wake the wait; the console falls back to polling the API
+        raise HTTPException(status_code=503, detail="Console command wakeups unavailable")
+    return await command_wakeups.wait(int(payload['console_id']), after, timeout)
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """Main WebSocket endpoint for real-time communication"""
@@ -1,6 +1,10 @@
 """
 Game State Handler
 Manages real-time game state synchronization and match events
+Matches run on the game engine's GameState; each match's participants are
+resolved once when players ready up, so card plays never touch the database.
+With a match log, every accepted action is recorded and in-flight matches are
+recovered when the service restarts.
 """
 
 import json
@@ -12,19 +16,27 @@ sys.path.append('/home/jp/deckport.ai')
 
 from shared.database.connection import SessionLocal
 from shared.models.base import Match, MatchParticipant, MatchStatus, ParticipantResult
+from shared.services.tournament_brackets import bracket_service
 from shared.utils.logging import setup_logging
 from protocols.game_protocol import GameProtocol, MessageType
 
+sys.path.append('/home/jp/deckport.ai/services/api')
+from game_engine.game_state import GameState
+from game_engine.match_log import MatchLog, MatchLogError
+
 logger = setup_logging("game_state", "INFO")
 
 class GameStateHandler:
-    def __init__(self, connection_manager, match_manager=None):
+    def __init__(self, connection_manager, match_manager=None, match_log: Optional[MatchLog] = None):
         self.manager = connection_manager
         self.match_manager = match_manager
+        self.match_log = match_log
         self.protocol = GameProtocol()
         # Use match manager's active matches if available
         self.active_matches = match_manager.active_matches if match_manager else {}
         self.match_timers = match_manager.match_timers if match_manager else {}
+        # match_id -> {user_id: seat}; the seat is the player's team in the GameState
+        self.match_participants: Dict[str, Dict[int, int]] = {}
     
     async def handle_message(self, message: Dict, connection_id: str, user_info: Dict):
         """Handle game state related messages"""
@@ -59,48 +71,42 @@ class GameStateHandler:
         logger.info(f"Player {user_id} ready for match {match_id}")
         
         try:
-            with SessionLocal() as session:
-                # Verify player is in this match
-                participant = session.query(MatchParticipant).filter(
-                    MatchParticipant.match_id == int(match_id),
-                    MatchParticipant.player_id == user_id
-                ).first()
-                
-                if not participant:
-                    await self.manager.send_personal_message(
-                        self.protocol.create_error("not_in_match", "Not a participant in this match"),
-                        connection_id
-                    )
-                    return
-                
-                # Add player to match connections
-                if match_id not in self.manager.match_connections:
-                    self.manager.match_connections[match_id] = []
-                
-                if connection_id not in self.manager.match_connections[match_id]:
-                    self.manager.match_connections[match_id].append(connection_id)
-                
-                # Check if all players are ready
-                match_connections = self.manager.match_connections.get(match_id, [])
-                
-                # Get all participants
-                all_participants = session.query(MatchParticipant).filter(
-                    MatchParticipant.match_id == int(match_id)
-                ).all()
-                
-                if len(match_connections) >= len(all_participants):
-                    # All players ready - start match
-                    await self._start_match(match_id, session)
-                else:
-                    # Send ready acknowledgment
-                    await self.manager.send_personal_message(
-                        self.protocol.create_message("match.ready_ack", {
-                            "match_id": match_id,
-                            "ready_players": len(match_connections),
-                            "total_players": len(all_participants)
-                        }),
-                        connection_id
-                    )
+            participants = await self._get_participants(match_id)
+            
+            # Verify player is in this match
+            if user_id not in participants:
+                await self.manager.send_personal_message(
+                    self.protocol.create_error("not_in_match", "Not a participant in this match"),
+                    connection_id
+                )
+                return
+            
+            # Add player to match connections
+            if match_id not in self.manager.match_connections:
+                self.manager.match_connections[match_id] = []
+            
+            if connection_id not in self.manager.match_connections[match_id]:
+                self.manager.match_connections[match_id].append(connection_id)
+            
+            # Check if all players are ready
+            match_connections = self.manager.match_connections.get(match_id, [])
+            
+            if match_id in self.active_matches:
+                # Match already running (reconnect, or recovered after a restart) - resume from a snapshot
+                await self._send_sync_snapshot(match_id, connection_id)
+            elif len(match_connections) >= len(participants):
+                # All players ready - start match
+                await self._start_match(match_id)
+            else:
+                # Send ready acknowledgment
+                await self.manager.send_personal_message(
+                    self.protocol.create_message("match.ready_ack", {
+                        "match_id": match_id,
+                        "ready_players": len(match_connections),
+                        "total_players": len(participants)
+                    }),
+                    connection_id
+                )
                 
         except Exception as e:
             logger.error(f"Error handling match ready: {e}")
@@ -109,29 +115,53 @@ class GameStateHandler:
                 connection_id
             )
     
-    async def _start_match(self, match_id: str, session):
-        """Start a match when all players are ready"""
-        logger.info(f"Starting match {match_id}")
-        
-        try:
-            # Update match status
+    async def _get_participants(self, match_id: str) -> Dict[int, int]:
+        """Participant map for a match, loaded from the database on first use"""
+        participants = self.match_participants.get(match_id)
+        if participants is None:
+            participants = await asyncio.to_thread(self._load_participants, match_id)
+            self.match_participants[match_id] = participants
+        return participants
+    
+    def _load_participants(self, match_id: str) -> Dict[int, int]:
+        """Map user id -> seat, seats following the participants' teams"""
+        with SessionLocal() as session:
+            participants = session.query(MatchParticipant).filter(
+                MatchParticipant.match_id == int(match_id)
+            ).order_by(MatchParticipant.team, MatchParticipant.id).all()
+            
+            return {participant.player_id: seat for seat, participant in enumerate(participants)}
+    
+    def _mark_match_active(self, match_id: str):
+        """Flag the match as started in the database"""
+        with SessionLocal() as session:
             match = session.query(Match).filter(Match.id == int(match_id)).first()
             if match:
                 match.status = MatchStatus.active
                 match.started_at = datetime.now(timezone.utc)
                 session.commit()
+    
+    async def _start_match(self, match_id: str):
+        """Start a match when all players are ready"""
+        logger.info(f"Starting match {match_id}")
+        
+        try:
+            await asyncio.to_thread(self._mark_match_active, match_id)
             
-            # Initialize game state
-            initial_state = self._create_initial_game_state(match_id)
-            self.active_matches[match_id] = initial_state
+            # Initialize game state, one engine player per seat
+            game_state = self._create_initial_game_state(match_id)
+            self.active_matches[match_id] = game_state
+            if self.match_log:
+                self.match_log.start(game_state, {"participants": self.match_participants.get(match_id, {})})
+            state = game_state.to_dict()
             
             # Send match start to all players
             start_message = self.protocol.create_message(MessageType.MATCH_START, {
                 "match_id": match_id,
-                "seed": initial_state["seed"],
-                "rules": initial_state["rules"],
-                "arena": initial_state["arena"],
-                "players": initial_state["players"]
+                "seed": state["seed"],
+                "rules": state["rules"],
+                "arena": state["arena"],
+                "players": state["players"]
             })
             
             await self.manager.send_to_match(start_message, match_id)
@@ -144,58 +174,41 @@ class GameStateHandler:
         except Exception as e:
             logger.error(f"Error starting match: {e}")
     
-    def _create_initial_game_state(self, match_id: str) -> Dict:
-        """Create initial game state for a new match"""
-        import random
+    def _create_initial_game_state(self, match_id: str) -> GameState:
+        """Create the engine game state for a new match"""
+        seats = sorted(self.match_participants.get(match_id, {}).items(), key=lambda item: item[1])
+        players = [{'player_id': user_id, 'team': seat} for user_id, seat in seats]
+        return GameState(match_id=match_id, players=players)
+    
+    async def recover_matches(self) -> List[str]:
+        """Reload the matches that were in flight when the service stopped
         
-        # Generate random seed for reproducible randomness
-        seed = random.randint(1000000, 9999999)
+        Each match is rebuilt from its latest snapshot plus the logged actions
+        after it. The phase timer resumes from the last logged action; players
+        rejoin with match.ready and are sent a sync snapshot.
+        """
+        if not self.match_log:
+            return []
         
-        # Create initial game state
-        initial_state = {
-            "match_id": match_id,
-            "seed": seed,
-            "status": "active",
-            "turn": 1,
-            "phase": "start",
-            "current_player": 0,  # Team 0 starts
-            "rules": {
-                "turn_time_seconds": 60,
-                "play_window_seconds": 10,
-                "max_turns": 20
-            },
-            "arena": {
-                "name": "Sunspire Plateau",
-                "color": "RADIANT",
-                "passive": "first_match_card_discount"
-            },
-            "players": {
-                "0": {
-                    "energy": 0,
-                    "mana": {},
-                    "hero": None,
-                    "hand": [],
-                    "arsenal": [],
-                    "equipment": [],
-                    "health": 20
-                },
-                "1": {
-                    "energy": 0,
-                    "mana": {},
-                    "hero": None,
-                    "hand": [],
-                    "arsenal": [],
-                    "equipment": [],
-                    "health": 20
-                }
-            },
-            "timer": {
-                "phase_start": datetime.now(timezone.utc).isoformat(),
-                "remaining_ms": 60000
+        recovered = []
+        for match_id in self.match_log.unfinished():
+            if match_id in self.active_matches:
+                continue
+            try:
+                game_state, meta = self.match_log.recover(match_id)
+            except (MatchLogError, ValueError, KeyError) as e:
+                logger.error(f"Could not recover match {match_id}: {e}")
+                continue
+            
+            self.active_matches[match_id] = game_state
+            self.match_participants[match_id] = {
+                int(user_id): seat for user_id, seat in meta.get("participants", {}).items()
             }
-        }
+            self.match_log.attach(game_state)
+            await self._start_match_timer(match_id)
+            recovered.append(match_id)
         
-        return initial_state
+        return recovered
     
     async def _start_match_timer(self, match_id: str):
         """Start timer for match phases"""
@@ -214,17 +227,17 @@ class GameStateHandler:
                 timer_message = self.protocol.create_message(MessageType.TIMER_TICK, {
                     "match_id": match_id,
                     "server_timestamp": datetime.now(timezone.utc).isoformat(),
-                    "phase": game_state["phase"],
-                    "remaining_ms": game_state["timer"]["remaining_ms"]
+                    "phase": game_state.phase.value,
+                    "remaining_ms": game_state.timer["remaining_ms"]
                 })
                 
                 await self.manager.send_to_match(timer_message, match_id)
                 
                 # Update timer
-                game_state["timer"]["remaining_ms"] -= 1000
+                game_state.update_timer(1000)
                 
                 # Check if time expired
-                if game_state["timer"]["remaining_ms"] <= 0:
+                if game_state.timer["remaining_ms"] <= 0:
                     await self._handle_phase_timeout(match_id)
                 
                 await asyncio.sleep(1)  # Update every second
@@ -235,42 +248,30 @@ class GameStateHandler:
             logger.error(f"Timer error for match {match_id}: {e}")
     
     async def _handle_phase_timeout(self, match_id: str):
-        """Handle phase timeout"""
+        """Handle phase timeout - advance the engine to the next phase"""
         logger.info(f"Phase timeout for match {match_id}")
         
-        # TODO: Implement phase transition logic
-        # For MVP, just advance to next phase
-        
         game_state = self.active_matches.get(match_id)
         if not game_state:
             return
         
-        current_phase = game_state["phase"]
-        
-        # Simple phase progression for MVP
-        phase_order = ["start", "main", "attack", "end"]
-        current_index = phase_order.index(current_phase) if current_phase in phase_order else 0
-        next_index = (current_index + 1) % len(phase_order)
-        
-        # If back to start, advance turn
-        if next_index == 0:
-            game_state["turn"] += 1
-            game_state["current_player"] = 1 - game_state["current_player"]  # Switch players
-        
-        game_state["phase"] = phase_order[next_index]
-        game_state["timer"]["remaining_ms"] = 60000  # Reset timer
+        phase_changes = game_state.advance_phase()
         
         # Notify players of phase change
         phase_message = self.protocol.create_message(MessageType.STATE_APPLY, {
             "match_id": match_id,
-            "patch": {
-                "turn": game_state["turn"],
-                "phase": game_state["phase"],
-                "current_player": game_state["current_player"]
-            }
+            "patch": phase_changes,
+            "reason": "phase_timeout"
         })
         
         await self.manager.send_to_match(phase_message, match_id)
+        await self._check_match_over(match_id, game_state)
+    
+    async def _check_match_over(self, match_id: str, game_state: GameState):
+        """End the match if the engine reports a win condition"""
+        win_result = game_state.check_win_conditions()
+        if win_result:
+            await self.end_match(match_id, win_result)
     
     async def _handle_state_update(self, message: Dict, connection_id: str, user_id: int):
         """Handle game state update from player"""
@@ -313,61 +314,48 @@ class GameStateHandler:
         
         logger.info(f"Card play from player {user_id}: {action} card {card_id} in match {match_id}")
         
+        # Seats were resolved when the players readied up
+        player_team = self.match_participants.get(match_id, {}).get(user_id)
+        if player_team is None:
+            await self.manager.send_personal_message(
+                self.protocol.create_error("not_in_match", "Not a participant in this match"),
+                connection_id
+            )
+            return
+        
+        game_state = self.active_matches.get(match_id)
+        if not game_state:
+            await self.manager.send_personal_message(
+                self.protocol.create_error("match_not_found", "Match not found or not active"),
+                connection_id
+            )
+            return
+        
         try:
-            # Get player team from match participants
-            with SessionLocal() as session:
-                participant = session.query(MatchParticipant).filter(
-                    MatchParticipant.match_id == int(match_id),
-                    MatchParticipant.player_id == user_id
-                ).first()
-                
-                if not participant:
-                    await self.manager.send_personal_message(
-                        self.protocol.create_error("not_in_match", "Not a participant in this match"),
-                        connection_id
-                    )
-                    return
-                
-                player_team = participant.team
+            try:
+                result = await self._apply_card_play(
+                    match_id, game_state, player_team, user_id, card_id, action, target_id
+                )
+            except ValueError as e:
+                # Rejected by the engine: wrong turn, no play window, unaffordable...
+                await self.manager.send_personal_message(
+                    self.protocol.create_error("card_play_failed", str(e)),
+                    connection_id
+                )
+                return
             
-            # Use match manager to handle card play if available
-            if self.match_manager:
-                try:
-                    result = await self.match_manager.play_card(
-                        match_id, player_team, card_id, action, target_id, self.manager
-                    )
-                    
-                    # Send success response to player
-                    await self.manager.send_personal_message(
-                        self.protocol.create_message("card.play_result", {
-                            "match_id": match_id,
-                            "success": True,
-                            "result": result,
-                            "timestamp": datetime.now(timezone.utc).isoformat()
-                        }),
-                        connection_id
-                    )
-                    
-                except Exception as e:
-                    # Send error response to player
-                    await self.manager.send_personal_message(
-                        self.protocol.create_error("card_play_failed", str(e)),
-                        connection_id
-                    )
-                    
-            else:
-                # Fallback: just notify other players
-                card_message = self.protocol.create_message("card.played", {
+            # Send success response to player
+            await self.manager.send_personal_message(
+                self.protocol.create_message("card.play_result", {
                     "match_id": match_id,
-                    "player_id": user_id,
-                    "player_team": player_team,
-                    "card_id": card_id,
-                    "action": action,
-                    "target_id": target_id,
+                    "success": True,
+                    "result": result,
                     "timestamp": datetime.now(timezone.utc).isoformat()
-                })
-                
-                await self.manager.send_to_match(card_message, match_id)
+                }),
+                connection_id
+            )
+            
+            await self._check_match_over(match_id, game_state)
                 
         except Exception as e:
             logger.error(f"Error handling card play: {e}")
@@ -376,6 +364,31 @@ class GameStateHandler:
                 connection_id
             )
     
+    async def _apply_card_play(self, match_id: str, game_state: GameState, player_team: int, user_id: int,
+                               card_id: str, action: str, target_id: Optional[str]) -> Dict:
+        """Validate and apply a card play on the engine and broadcast it to the match"""
+        # Use match manager to handle card play if available
+        if self.match_manager:
+            return await self.match_manager.play_card(
+                match_id, player_team, card_id, action, target_id, self.manager
+            )
+        
+        result = game_state.play_card(player_team, card_id, action, target_id)
+        
+        card_message = self.protocol.create_message("card.played", {
+            "match_id": match_id,
+            "player_id": user_id,
+            "player_team": player_team,
+            "card_id": card_id,
+            "action": action,
+            "target_id": target_id,
+            "result": result,
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        })
+        
+        await self.manager.send_to_match(card_message, match_id)
+        return result
+    
     async def _handle_sync_request(self, message: Dict, connection_id: str, user_id: int):
         """Handle request for game state synchronization"""
         match_id = message.get('match_id')
@@ -388,42 +401,43 @@ class GameStateHandler:
             return
         
         # Send current game state
-        game_state = self.active_matches.get(match_id)
-        if game_state:
-            sync_message = self.protocol.create_message(MessageType.SYNC_SNAPSHOT, {
-                "match_id": match_id,
-                "seq": game_state.get("sequence", 0),
-                "full_state": game_state
-            })
-            
-            await self.manager.send_personal_message(sync_message, connection_id)
+        if match_id in self.active_matches:
+            await self._send_sync_snapshot(match_id, connection_id)
         else:
             await self.manager.send_personal_message(
                 self.protocol.create_error("match_not_found", "Match not found or not active"),
                 connection_id
             )
     
+    async def _send_sync_snapshot(self, match_id: str, connection_id: str):
+        """Send a connection the full current state of a match"""
+        game_state = self.active_matches[match_id]
+        sync_message = self.protocol.create_message(MessageType.SYNC_SNAPSHOT, {
+            "match_id": match_id,
+            "seq": game_state.sequence,
+            "full_state": game_state.to_dict()
+        })
+        
+        await self.manager.send_personal_message(sync_message, connection_id)
+    
     async def end_match(self, match_id: str, result: Dict):
         """End a match and clean up"""
         logger.info(f"Ending match {match_id}")
         
         try:
-            # Cancel timer
-            if match_id in self.match_timers:
-                self.match_timers[match_id].cancel()
-                del self.match_timers[match_id]
+            # Cancel timer, unless the timer itself is ending the match
+            timer = self.match_timers.pop(match_id, None)
+            if timer and timer is not asyncio.current_task():
+                timer.cancel()
             
-            # Remove from active matches
-            if match_id in self.active_matches:
-                del self.active_matches[match_id]
+            # Remove from active matches, closing its log
+            game_state = self.active_matches.pop(match_id, None)
+            self.match_participants.pop(match_id, None)
+            if game_state and self.match_log:
+                self.match_log.finish(game_state, result)
             
             # Update database
-            with SessionLocal() as session:
-                match = session.query(Match).filter(Match.id == int(match_id)).first()
-                if match:
-                    match.status = MatchStatus.finished
-                    match.ended_at = datetime.now(timezone.utc)
-                    session.commit()
+            await asyncio.to_thread(self._mark_match_finished, match_id, result)
             
             # Notify players
             end_message = self.protocol.create_message(MessageType.MATCH_END, {
@@ -443,7 +457,38 @@ class GameStateHandler:
         except Exception as e:
             logger.error(f"Error ending match {match_id}: {e}")
     
-    def get_match_state(self, match_id: str) -> Optional[Dict]:
+    def _mark_match_finished(self, match_id: str, result: Dict):
+        """Flag the match finished, record participants' results and advance its bracket; ratings are applied later"""
+        with SessionLocal() as session:
+            match = session.query(Match).filter(Match.id == int(match_id)).first()
+            if match:
+                winner = result.get('winner')
+                match.status = MatchStatus.finished
+                match.ended_at = datetime.now(timezone.utc)
+                match.winner_team = winner
+                match.end_reason = result.get('condition')
+
+                participants = session.query(MatchParticipant).filter(
+                    MatchParticipant.match_id == match.id
+                ).all()
+                for participant in participants:
+                    if winner is None:
+                        participant.result = ParticipantResult.draw
+                    elif participant.team == winner:
+                        participant.result = ParticipantResult.win
+                    else:
+                        participant.result = ParticipantResult.loss
+                session.commit()
+
+                # Advance the tournament bracket once the match itself is saved
+                try:
+                    bracket_service.record_match_result(session, match.id, winner)
+                    session.commit()
+                except Exception as e:
+                    session.rollback()
+                    logger.error(f"Error recording match {match_id} in its tournament bracket: {e}")
+    
+    def get_match_state(self, match_id: str) -> Optional[GameState]:
         """Get current state of a match"""
         return self.active_matches.get(match_id)
     
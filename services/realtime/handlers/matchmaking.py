@@ -4,39 +4,59 @@ Manages player queue and match pairing
 """
 
 import asyncio
-import json
-from typing import Dict, List, Optional
+import time
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timezone
 import sys
 sys.path.append('/home/jp/deckport.ai')
 
 from shared.database.connection import SessionLocal
-from shared.models.base import Player, Match, MatchParticipant, MMQueue, MatchStatus, ParticipantResult
+from shared.models.base import Player, Match, MatchParticipant, MMQueue, MatchStatus
 from shared.utils.logging import setup_logging
 from protocols.game_protocol import GameProtocol, MessageType
+from services.matchmaking_pool import MatchmakingPool, ArrivalStats, QueueEntry
 
 logger = setup_logging("matchmaking", "INFO")
 
 class MatchmakingHandler:
-    def __init__(self, connection_manager, queue_manager=None):
+    """
+    Event-driven matchmaking
+
+    Queue state lives in memory per mode (mirrored to mm_queue for the API and other
+    workers). Joins wake the matchmaking task immediately; otherwise it only wakes
+    when a waiting player's search window widens. Database work runs in a thread so
+    it never blocks the event loop.
+    """
+
+    def __init__(self, connection_manager, queue_manager=None, clock=time.monotonic):
         self.manager = connection_manager
         self.queue_manager = queue_manager
         self.protocol = GameProtocol()
         self.queue_polling_task = None
         self._polling_started = False
-    
+        self._clock = clock
+        self._wakeup = asyncio.Event()
+        self.pools: Dict[str, MatchmakingPool] = {}
+        self.stats: Dict[str, ArrivalStats] = {}
+
+    def _pool(self, mode: str) -> MatchmakingPool:
+        if mode not in self.pools:
+            self.pools[mode] = MatchmakingPool(mode)
+            self.stats[mode] = ArrivalStats(clock=self._clock)
+        return self.pools[mode]
+
     async def start_queue_polling(self):
-        """Start background task to process matchmaking queue"""
+        """Start the background matchmaking task"""
         if not self._polling_started and (self.queue_polling_task is None or self.queue_polling_task.done()):
             self.queue_polling_task = asyncio.create_task(self._process_queue_loop())
             self._polling_started = True
-            logger.info("Matchmaking queue polling started")
-    
+            logger.info("Matchmaking started")
+
     async def handle_message(self, message: Dict, connection_id: str, user_info: Dict):
         """Handle matchmaking-related messages"""
         msg_type = message.get('type')
         user_id = user_info.get('user_id')
-        
+
         if msg_type == MessageType.QUEUE_JOIN.value:
             await self._handle_queue_join(message, connection_id, user_id)
         elif msg_type == MessageType.QUEUE_LEAVE.value:
@@ -46,233 +66,261 @@ class MatchmakingHandler:
                 self.protocol.create_error("unknown_message", f"Unknown matchmaking message: {msg_type}"),
                 connection_id
             )
-    
+
     async def _handle_queue_join(self, message: Dict, connection_id: str, user_id: int):
         """Handle player joining matchmaking queue"""
         mode = message.get('mode', '1v1')
         preferred_range = message.get('preferred_range')  # [min_elo, max_elo]
-        
+
         logger.info(f"Player {user_id} joining queue for mode {mode}")
-        
+
         try:
-            with SessionLocal() as session:
-                # Get player info
-                player = session.query(Player).filter(Player.id == user_id).first()
-                if not player:
-                    await self.manager.send_personal_message(
-                        self.protocol.create_error("player_not_found", "Player not found"),
-                        connection_id
-                    )
-                    return
-                
-                # Check if already in queue
-                existing_queue = session.query(MMQueue).filter(MMQueue.player_id == user_id).first()
-                if existing_queue:
-                    await self.manager.send_personal_message(
-                        self.protocol.create_error("already_queued", "Already in matchmaking queue"),
-                        connection_id
-                    )
-                    return
-                
-                # Add to queue
-                queue_entry = MMQueue(
-                    mode=mode,
-                    player_id=user_id,
-                    elo=player.elo_rating
+            if any(user_id in pool for pool in self.pools.values()):
+                await self.manager.send_personal_message(
+                    self.protocol.create_error("already_queued", "Already in matchmaking queue"),
+                    connection_id
+                )
+                return
+
+            error, elo, console_id = await asyncio.to_thread(self._db_enqueue, user_id, mode)
+            if error == "player_not_found":
+                await self.manager.send_personal_message(
+                    self.protocol.create_error("player_not_found", "Player not found"),
+                    connection_id
                 )
-                
-                session.add(queue_entry)
-                session.commit()
-                
-                # Send acknowledgment
+                return
+            if error == "already_queued":
                 await self.manager.send_personal_message(
-                    self.protocol.create_message(MessageType.QUEUE_ACK, {
-                        "mode": mode,
-                        "estimated_wait_seconds": await self._estimate_wait_time(mode, player.elo_rating)
-                    }),
+                    self.protocol.create_error("already_queued", "Already in matchmaking queue"),
                     connection_id
                 )
-                
-                logger.info(f"Player {user_id} added to {mode} queue (ELO: {player.elo_rating})")
-                
+                return
+
+            now = self._clock()
+            entry = QueueEntry(player_id=user_id, elo=elo, enqueued_at=now, console_id=console_id)
+            if preferred_range and len(preferred_range) == 2:
+                entry.min_elo, entry.max_elo = preferred_range
+
+            pool = self._pool(mode)
+            pool.add(entry)
+            self.stats[mode].record_arrival(elo, now)
+
+            # Send acknowledgment
+            await self.manager.send_personal_message(
+                self.protocol.create_message(MessageType.QUEUE_ACK, {
+                    "mode": mode,
+                    "estimated_wait_seconds": await self._estimate_wait_time(mode, elo)
+                }),
+                connection_id
+            )
+            self._wakeup.set()
+
+            logger.info(f"Player {user_id} added to {mode} queue (ELO: {elo})")
+
         except Exception as e:
             logger.error(f"Error joining queue: {e}")
             await self.manager.send_personal_message(
                 self.protocol.create_error("queue_error", "Failed to join queue"),
                 connection_id
             )
-    
+
     async def _handle_queue_leave(self, message: Dict, connection_id: str, user_id: int):
         """Handle player leaving matchmaking queue"""
         logger.info(f"Player {user_id} leaving queue")
-        
+
         try:
-            with SessionLocal() as session:
-                # Remove from queue
-                removed = session.query(MMQueue).filter(MMQueue.player_id == user_id).delete()
-                session.commit()
-                
-                if removed > 0:
-                    await self.manager.send_personal_message(
-                        self.protocol.create_message("queue.left", {"removed": True}),
-                        connection_id
-                    )
-                    logger.info(f"Player {user_id} removed from queue")
-                else:
-                    await self.manager.send_personal_message(
-                        self.protocol.create_error("not_in_queue", "Not in matchmaking queue"),
-                        connection_id
-                    )
-                    
+            removed_locally = any(pool.remove(user_id) is not None for pool in self.pools.values())
+            removed = await asyncio.to_thread(self._db_dequeue, user_id)
+
+            if removed > 0 or removed_locally:
+                await self.manager.send_personal_message(
+                    self.protocol.create_message("queue.left", {"removed": True}),
+                    connection_id
+                )
+                logger.info(f"Player {user_id} removed from queue")
+            else:
+                await self.manager.send_personal_message(
+                    self.protocol.create_error("not_in_queue", "Not in matchmaking queue"),
+                    connection_id
+                )
+
         except Exception as e:
             logger.error(f"Error leaving queue: {e}")
             await self.manager.send_personal_message(
                 self.protocol.create_error("queue_error", "Failed to leave queue"),
                 connection_id
             )
-    
+
     async def _process_queue_loop(self):
-        """Background loop to process matchmaking queue"""
+        """Pair players whenever someone joins or a search window widens"""
+        try:
+            await self._restore_queue()
+        except Exception as e:
+            logger.error(f"Error restoring matchmaking queue: {e}")
+
         while True:
             try:
+                await self._wait_for_work()
                 await self._process_queue()
-                await asyncio.sleep(2)  # Check every 2 seconds
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logger.error(f"Queue processing error: {e}")
                 await asyncio.sleep(5)  # Wait longer on error
-    
-    async def _process_queue(self):
-        """Process the matchmaking queue and create matches"""
+
+    async def _wait_for_work(self):
+        now = self._clock()
+        deadlines = [t for t in (pool.next_widen_at(now) for pool in self.pools.values()) if t is not None]
+        timeout = max(0.0, min(deadlines) - now) if deadlines else None
         try:
-            with SessionLocal() as session:
-                # Get all queued players, ordered by wait time
-                queue_entries = session.query(MMQueue).order_by(MMQueue.enqueued_at).all()
-                
-                if len(queue_entries) < 2:
-                    return  # Need at least 2 players
-                
-                # Simple pairing algorithm for MVP
-                # TODO: Implement ELO-based pairing with widening windows
-                
-                paired_players = []
-                i = 0
-                while i < len(queue_entries) - 1:
-                    player1 = queue_entries[i]
-                    player2 = queue_entries[i + 1]
-                    
-                    # For MVP, just pair any two players
-                    # TODO: Add ELO range checking
-                    elo_diff = abs(player1.elo - player2.elo)
-                    if elo_diff <= 200:  # Simple ELO range for MVP
-                        paired_players.append((player1, player2))
-                        i += 2  # Skip both players
-                    else:
-                        i += 1  # Try next pair
-                
-                # Create matches for paired players
-                for player1, player2 in paired_players:
-                    await self._create_match(session, player1, player2)
-                    
-        except Exception as e:
-            logger.error(f"Error processing queue: {e}")
-    
-    async def _create_match(self, session, player1: MMQueue, player2: MMQueue):
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _process_queue(self):
+        """Pair everything currently pairable and create the matches"""
+        now = self._clock()
+        for mode, pool in list(self.pools.items()):
+            for player1, player2 in pool.sweep(now):
+                await self._create_match(mode, player1, player2)
+
+    async def _restore_queue(self):
+        """Load mm_queue rows left over from before a restart"""
+        rows = await asyncio.to_thread(self._db_load_queue)
+        now, wall_now = self._clock(), datetime.now(timezone.utc)
+        for mode, player_id, console_id, elo, enqueued_at in rows:
+            if player_id is None:
+                continue
+            waited = (wall_now - enqueued_at).total_seconds() if enqueued_at.tzinfo else 0.0
+            self._pool(mode).add(QueueEntry(player_id=player_id, elo=elo, enqueued_at=now - waited,
+                                            console_id=console_id))
+        if rows:
+            logger.info(f"Restored {len(rows)} queued players")
+            self._wakeup.set()
+
+    async def _create_match(self, mode: str, player1: QueueEntry, player2: QueueEntry):
         """Create a new match for two players"""
         try:
-            # Create match record
-            new_match = Match(
-                mode=player1.mode,
-                status=MatchStatus.queued
-            )
-            session.add(new_match)
-            session.flush()  # Get the match ID
-            
-            # Create participants
-            participant1 = MatchParticipant(
-                match_id=new_match.id,
-                player_id=player1.player_id,
-                console_id=player1.console_id,
-                team=0
-            )
-            
-            participant2 = MatchParticipant(
-                match_id=new_match.id,
-                player_id=player2.player_id,
-                console_id=player2.console_id,
-                team=1
-            )
-            
-            session.add_all([participant1, participant2])
-            
-            # Remove from queue
-            session.delete(player1)
-            session.delete(player2)
-            
-            session.commit()
-            
-            # Notify players
-            await self._notify_match_found(new_match.id, player1.player_id, player2.player_id)
-            
-            logger.info(f"Match created: {new_match.id} (Players: {player1.player_id} vs {player2.player_id})")
-            
+            result = await asyncio.to_thread(self._db_create_match, mode, player1, player2)
         except Exception as e:
             logger.error(f"Error creating match: {e}")
-            session.rollback()
-    
-    async def _notify_match_found(self, match_id: int, player1_id: int, player2_id: int):
+            # Put both players back; the next wakeup retries
+            self.pools[mode].add(player1)
+            self.pools[mode].add(player2)
+            return
+
+        match_id, players = result
+        if match_id is None:
+            # Another worker took one of the players; anyone still queued goes back in
+            for entry in (player1, player2):
+                if entry.player_id in players:
+                    self.pools[mode].add(entry)
+            self._wakeup.set()
+            logger.info(f"Players {player1.player_id}/{player2.player_id} were matched elsewhere; "
+                        f"re-queued {sorted(players)}")
+            return
+
+        now = self._clock()
+        for entry in (player1, player2):
+            self.stats[mode].record_match(now - entry.enqueued_at, now)
+
+        await self._notify_match_found(match_id, mode, players)
+        logger.info(f"Match created: {match_id} (Players: {player1.player_id} vs {player2.player_id})")
+
+    async def _notify_match_found(self, match_id: int, mode: str, players: List[Dict]):
         """Notify players that a match was found"""
         try:
-            with SessionLocal() as session:
-                # Get player info
-                player1 = session.query(Player).filter(Player.id == player1_id).first()
-                player2 = session.query(Player).filter(Player.id == player2_id).first()
-                
-                if not player1 or not player2:
-                    logger.error(f"Players not found for match {match_id}")
-                    return
-                
-                # Create match found messages
-                message1 = self.protocol.create_message(MessageType.MATCH_FOUND, {
+            for team, (player, opponent) in enumerate(((players[0], players[1]), (players[1], players[0]))):
+                message = self.protocol.create_message(MessageType.MATCH_FOUND, {
                     "match_id": str(match_id),
-                    "opponent": {
-                        "id": player2.id,
-                        "display_name": player2.display_name,
-                        "elo_rating": player2.elo_rating
-                    },
-                    "your_team": 0,
-                    "mode": "1v1"
+                    "opponent": opponent,
+                    "your_team": team,
+                    "mode": mode
                 })
-                
-                message2 = self.protocol.create_message(MessageType.MATCH_FOUND, {
-                    "match_id": str(match_id),
-                    "opponent": {
-                        "id": player1.id,
-                        "display_name": player1.display_name,
-                        "elo_rating": player1.elo_rating
-                    },
-                    "your_team": 1,
-                    "mode": "1v1"
-                })
-                
-                # Send to players
-                await self.manager.send_to_user(message1, player1_id)
-                await self.manager.send_to_user(message2, player2_id)
-                
-                logger.info(f"Match found notifications sent for match {match_id}")
-                
+                await self.manager.send_to_user(message, player["id"])
+
+            logger.info(f"Match found notifications sent for match {match_id}")
+
         except Exception as e:
             logger.error(f"Error notifying match found: {e}")
-    
+
     async def _estimate_wait_time(self, mode: str, elo: int) -> int:
-        """Estimate wait time for matchmaking"""
-        try:
-            with SessionLocal() as session:
-                # Count players in queue
-                queue_count = session.query(MMQueue).filter(MMQueue.mode == mode).count()
-                
-                # Simple estimation: 30 seconds per player ahead in queue
-                estimated_seconds = max(30, queue_count * 30)
-                return min(estimated_seconds, 300)  # Cap at 5 minutes
-                
-        except Exception:
-            return 60  # Default estimate
+        """Estimate wait time from the live arrival rate near this ELO"""
+        return self.stats[mode].estimate_wait(elo, self.pools[mode], self._clock())
+
+    def get_queue_stats(self) -> Dict:
+        """Queue sizes and live matchmaking statistics per mode"""
+        now = self._clock()
+        return {
+            mode: {'queued': len(pool), **self.stats[mode].snapshot(now)}
+            for mode, pool in self.pools.items()
+        }
+
+    # --- Database work (runs in a worker thread) ---
+
+    def _db_enqueue(self, user_id: int, mode: str) -> Tuple[Optional[str], Optional[int], Optional[int]]:
+        with SessionLocal() as session:
+            player = session.query(Player.elo_rating).filter(Player.id == user_id).first()
+            if not player:
+                return "player_not_found", None, None
+
+            existing = session.query(MMQueue.id).filter(MMQueue.player_id == user_id).first()
+            if existing:
+                return "already_queued", None, None
+
+            session.add(MMQueue(mode=mode, player_id=user_id, elo=player.elo_rating))
+            session.commit()
+            return None, player.elo_rating, None
+
+    def _db_dequeue(self, user_id: int) -> int:
+        with SessionLocal() as session:
+            removed = session.query(MMQueue).filter(MMQueue.player_id == user_id).delete()
+            session.commit()
+            return removed
+
+    def _db_load_queue(self) -> List[Tuple]:
+        with SessionLocal() as session:
+            return session.query(
+                MMQueue.mode, MMQueue.player_id, MMQueue.console_id, MMQueue.elo, MMQueue.enqueued_at
+            ).order_by(MMQueue.enqueued_at).all()
+
+    def _db_create_match(self, mode: str, player1: QueueEntry, player2: QueueEntry):
+        """
+        Claim both queue rows and create the match in one transaction.
+        Returns (match_id, [player1 info, player2 info]), or (None, still_queued_ids)
+        when another worker already took one of the players.
+        """
+        with SessionLocal() as session:
+            player_ids = [player1.player_id, player2.player_id]
+            claimed = session.query(MMQueue).filter(
+                MMQueue.player_id.in_(player_ids), MMQueue.mode == mode
+            ).delete(synchronize_session=False)
+
+            if claimed != 2:
+                session.rollback()
+                still_queued = {row.player_id for row in session.query(MMQueue.player_id).filter(
+                    MMQueue.player_id.in_(player_ids), MMQueue.mode == mode
+                )}
+                return None, still_queued
+
+            new_match = Match(status=MatchStatus.queued)
+            session.add(new_match)
+            session.flush()  # Get the match ID
+
+            session.add_all([
+                MatchParticipant(match_id=new_match.id, player_id=player1.player_id,
+                                 console_id=player1.console_id, team=0),
+                MatchParticipant(match_id=new_match.id, player_id=player2.player_id,
+                                 console_id=player2.console_id, team=1)
+            ])
+
+            players = {row.id: row for row in session.query(
+                Player.id, Player.display_name, Player.elo_rating
+            ).filter(Player.id.in_(player_ids))}
+            session.commit()
+
+            return new_match.id, [
+                {"id": pid, "display_name": players[pid].display_name, "elo_rating": players[pid].elo_rating}
+                for pid in player_ids
+            ]
@@ -3,7 +3,7 @@ WebSocket Game Protocol Definitions
 Defines all message types and formats for real-time communication
 """
 
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Union
 from enum import Enum
 from datetime import datetime
 
@@ -47,10 +47,10 @@ class GameProtocol:
     """Protocol handler for game messages"""
     
     @staticmethod
-    def create_message(msg_type: MessageType, data: Dict[str, Any] = None) -> Dict[str, Any]:
+    def create_message(msg_type: Union[MessageType, str], data: Dict[str, Any] = None) -> Dict[str, Any]:
         """Create a standardized protocol message"""
         message = {
-            "type": msg_type.value,
+            "type": getattr(msg_type, "value", msg_type),
             "timestamp": datetime.utcnow().isoformat()
         }
         
@@ -0,0 +1,118 @@
+"""
+Console command wakeups
+Holds consoles' waits for remote management commands in the realtime service,
+where a waiting console costs a coroutine instead of a sync API worker. The API
+publishes every queued batch on the console command Redis channel; consoles
+wait here and only call the API, briefly, once something was queued for them.
+
+A wait is keyed by a token (epoch, fleet generation, console generation): a
+console passes the token of its previous wait and is answered at once if
+anything was queued since, so a command queued between its API poll and its
+next wait is never missed.
+"""
+
+import os
+import json
+import uuid
+import asyncio
+import logging
+from typing import Dict, Iterable, Optional
+
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    aioredis = None
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Wakeup configuration; the channel and payload match shared/services/console_commands.py
+REDIS_URL = os.getenv("CONSOLE_COMMAND_REDIS_URL", os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+REDIS_CHANNEL = "console_commands:queued"
+MAX_WAIT_SECONDS = float(os.getenv("CONSOLE_COMMAND_WAIT_MAX_SECONDS", "25"))
+RECONNECT_SECONDS = 5
+
+
+def parse_message(data: str) -> Optional[list]:
+    """Console ids of a '<sender pid>|<json ids or null>' message; None means the whole fleet"""
+    _, _, payload = data.partition('|')
+    return json.loads(payload)
+
+
+class CommandWakeups:
+    """Per-console generations bumped by queued-command messages, with async waits on them"""
+
+    def __init__(self, max_wait: float = MAX_WAIT_SECONDS):
+        self.max_wait = max_wait
+        self.epoch = uuid.uuid4().hex[:8]  # Tokens from before a restart never match
+        self.connected = False
+        self._fleet = 0
+        self._consoles: Dict[int, int] = {}
+        self._changed: Optional[asyncio.Condition] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def changed(self) -> asyncio.Condition:
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+        return self._changed
+
+    def token(self, console_id: int) -> str:
+        return f"{self.epoch}.{self._fleet}.{self._consoles.get(console_id, 0)}"
+
+    async def notify(self, console_ids: Optional[Iterable[int]] = None):
+        """console_ids None wakes every console"""
+        async with self.changed:
+            if console_ids is None:
+                self._fleet += 1
+                self._consoles.clear()
+            else:
+                for console_id in console_ids:
+                    self._consoles[console_id] = self._consoles.get(console_id, 0) + 1
+            self.changed.notify_all()
+
+    async def wait(self, console_id: int, after: Optional[str], timeout: float) -> Dict:
+        """Wait until something is queued for the console after the token, or the timeout; returns the new token"""
+        timeout = min(max(timeout, 0), self.max_wait)
+        async with self.changed:
+            if after == self.token(console_id):
+                try:
+                    await asyncio.wait_for(
+                        self.changed.wait_for(lambda: self.token(console_id) != after), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            token = self.token(console_id)
+        return {'token': token, 'queued': token != after}
+
+    async def listen(self, redis_url: str = REDIS_URL):
+        """Follow the Redis channel, reconnecting after failures"""
+        while True:
+            try:
+                client = aioredis.from_url(redis_url, decode_responses=True)
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(REDIS_CHANNEL)
+                self.connected = True
+                logger.info("Console command wakeups subscribed")
+                async for message in pubsub.listen():
+                    await self.notify(parse_message(message['data']))
+            except asyncio.CancelledError:
+                self.connected = False
+                raise
+            except Exception as e:
+                logger.warning(f"Console command wakeups disconnected: {e}")
+            self.connected = False
+            await asyncio.sleep(RECONNECT_SECONDS)
+
+    def start(self):
+        if self._task is None and REDIS_AVAILABLE:
+            self._task = asyncio.get_running_loop().create_task(self.listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,222 @@
+"""
+In-memory matchmaking pool
+Per-mode queue kept sorted by ELO, with search windows that widen the longer a
+player waits, and live arrival statistics for wait-time estimates
+"""
+
+import os
+import math
+import time
+import bisect
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Tuple
+
+# Search window configuration
+BASE_ELO_WINDOW = int(os.getenv("MM_BASE_ELO_WINDOW", "100"))
+ELO_WINDOW_STEP = int(os.getenv("MM_ELO_WINDOW_STEP", "50"))
+WINDOW_WIDEN_SECONDS = float(os.getenv("MM_WINDOW_WIDEN_SECONDS", "10"))
+MAX_ELO_WINDOW = int(os.getenv("MM_MAX_ELO_WINDOW", "600"))
+
+# Statistics configuration
+STATS_HORIZON_SECONDS = float(os.getenv("MM_STATS_HORIZON_SECONDS", "600"))
+MIN_WAIT_ESTIMATE = 5
+MAX_WAIT_ESTIMATE = 300
+DEFAULT_WAIT_ESTIMATE = 60
+
+
+@dataclass
+class QueueEntry:
+    """A queued player; enqueued_at is on the pool's monotonic clock"""
+    player_id: int
+    elo: int
+    enqueued_at: float
+    console_id: Optional[int] = None
+    min_elo: Optional[int] = None
+    max_elo: Optional[int] = None
+
+    def accepts(self, elo: int) -> bool:
+        """Honour the player's preferred_range, if they sent one"""
+        if self.min_elo is not None and elo < self.min_elo:
+            return False
+        if self.max_elo is not None and elo > self.max_elo:
+            return False
+        return True
+
+
+class MatchmakingPool:
+    """
+    Queue for one game mode
+
+    Entries are indexed by ELO so finding an opponent only scans the players inside
+    the search window. Two players match when their ELO gap fits inside the wider of
+    their two windows, so a long-waiting player's widened window lets newcomers reach
+    them and nobody is starved by an out-of-range neighbour.
+    """
+
+    def __init__(self, mode: str, base_window: int = BASE_ELO_WINDOW, window_step: int = ELO_WINDOW_STEP,
+                 widen_seconds: float = WINDOW_WIDEN_SECONDS, max_window: int = MAX_ELO_WINDOW):
+        self.mode = mode
+        self.base_window = base_window
+        self.window_step = window_step
+        self.widen_seconds = widen_seconds
+        self.max_window = max_window
+        # Insertion order doubles as wait order for the sweep
+        self.entries: Dict[int, QueueEntry] = {}
+        self._by_elo: List[Tuple[int, int]] = []
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, player_id: int):
+        return player_id in self.entries
+
+    def add(self, entry: QueueEntry) -> bool:
+        if entry.player_id in self.entries:
+            return False
+        self.entries[entry.player_id] = entry
+        bisect.insort(self._by_elo, (entry.elo, entry.player_id))
+        return True
+
+    def remove(self, player_id: int) -> Optional[QueueEntry]:
+        entry = self.entries.pop(player_id, None)
+        if entry is not None:
+            index = bisect.bisect_left(self._by_elo, (entry.elo, player_id))
+            del self._by_elo[index]
+        return entry
+
+    def window(self, entry: QueueEntry, now: float) -> int:
+        """ELO search radius for an entry after waiting until now"""
+        steps = int(max(0.0, now - entry.enqueued_at) // self.widen_seconds)
+        return min(self.max_window, self.base_window + steps * self.window_step)
+
+    def find_opponent(self, entry: QueueEntry, now: float) -> Optional[QueueEntry]:
+        """Closest-ELO compatible opponent for entry, scanning outward from its position"""
+        own_window = self.window(entry, now)
+        index = bisect.bisect_left(self._by_elo, (entry.elo, entry.player_id))
+        left, right = index - 1, index
+        if right < len(self._by_elo) and self._by_elo[right][1] == entry.player_id:
+            right += 1
+
+        while left >= 0 or right < len(self._by_elo):
+            left_gap = entry.elo - self._by_elo[left][0] if left >= 0 else math.inf
+            right_gap = self._by_elo[right][0] - entry.elo if right < len(self._by_elo) else math.inf
+            if left_gap <= right_gap:
+                gap, candidate_id = left_gap, self._by_elo[left][1]
+                left -= 1
+            else:
+                gap, candidate_id = right_gap, self._by_elo[right][1]
+                right += 1
+
+            if gap > self.max_window:
+                break
+            candidate = self.entries[candidate_id]
+            if gap <= max(own_window, self.window(candidate, now)) \
+                    and entry.accepts(candidate.elo) and candidate.accepts(entry.elo):
+                return candidate
+        return None
+
+    def match(self, player_id: int, now: float) -> Optional[Tuple[QueueEntry, QueueEntry]]:
+        """Try to pair one player right away (used when they join)"""
+        entry = self.entries.get(player_id)
+        if entry is None:
+            return None
+        opponent = self.find_opponent(entry, now)
+        if opponent is None:
+            return None
+        self.remove(entry.player_id)
+        self.remove(opponent.player_id)
+        # Longest waiter is player 1
+        return (opponent, entry) if opponent.enqueued_at < entry.enqueued_at else (entry, opponent)
+
+    def sweep(self, now: float) -> List[Tuple[QueueEntry, QueueEntry]]:
+        """Pair everyone who can be paired, longest-waiting players first"""
+        pairs = []
+        for player_id in list(self.entries):
+            if player_id in self.entries:
+                pair = self.match(player_id, now)
+                if pair:
+                    pairs.append(pair)
+        return pairs
+
+    def next_widen_at(self, now: float) -> Optional[float]:
+        """When the next search window grows, or None if nothing can change"""
+        if len(self.entries) < 2:
+            return None
+        earliest = None
+        for entry in self.entries.values():
+            if self.window(entry, now) >= self.max_window:
+                continue
+            steps = int(max(0.0, now - entry.enqueued_at) // self.widen_seconds) + 1
+            widen_at = entry.enqueued_at + steps * self.widen_seconds
+            if widen_at <= now:
+                # Float rounding right on a step boundary
+                widen_at += self.widen_seconds
+            if earliest is None or widen_at < earliest:
+                earliest = widen_at
+        return earliest
+
+
+class ArrivalStats:
+    """Sliding-window arrival rate and time-to-match statistics for one mode"""
+
+    def __init__(self, horizon_seconds: float = STATS_HORIZON_SECONDS, clock=time.monotonic):
+        self.horizon_seconds = horizon_seconds
+        self._clock = clock
+        self._started_at = clock()
+        self._arrivals: Deque[Tuple[float, int]] = deque()
+        self._waits: Deque[Tuple[float, float]] = deque()
+
+    def _trim(self, now: float):
+        cutoff = now - self.horizon_seconds
+        while self._arrivals and self._arrivals[0][0] < cutoff:
+            self._arrivals.popleft()
+        while self._waits and self._waits[0][0] < cutoff:
+            self._waits.popleft()
+
+    def record_arrival(self, elo: int, now: Optional[float] = None):
+        now = self._clock() if now is None else now
+        self._arrivals.append((now, elo))
+        self._trim(now)
+
+    def record_match(self, wait_seconds: float, now: Optional[float] = None):
+        now = self._clock() if now is None else now
+        self._waits.append((now, wait_seconds))
+        self._trim(now)
+
+    def arrival_rate(self, now: Optional[float] = None, elo: Optional[int] = None, window: int = 0) -> float:
+        """Arrivals per second over the horizon, optionally only those within window of elo"""
+        now = self._clock() if now is None else now
+        self._trim(now)
+        span = min(self.horizon_seconds, max(1.0, now - self._started_at))
+        if elo is None:
+            return len(self._arrivals) / span
+        return sum(1 for _, other in self._arrivals if abs(other - elo) <= window) / span
+
+    def wait_percentile(self, percentile: float) -> Optional[float]:
+        waits = sorted(wait for _, wait in self._waits)
+        if not waits:
+            return None
+        return waits[min(len(waits) - 1, int(len(waits) * percentile))]
+
+    def estimate_wait(self, elo: int, pool: MatchmakingPool, now: Optional[float] = None) -> int:
+        """
+        Expected seconds until a compatible opponent shows up: the time until the next
+        arrival inside the player's base window, falling back to recent match waits
+        """
+        now = self._clock() if now is None else now
+        rate = self.arrival_rate(now, elo, pool.base_window)
+        if rate > 0:
+            estimate = 1.0 / rate
+        else:
+            estimate = self.wait_percentile(0.5) or DEFAULT_WAIT_ESTIMATE
+        return int(min(MAX_WAIT_ESTIMATE, max(MIN_WAIT_ESTIMATE, round(estimate))))
+
+    def snapshot(self, now: Optional[float] = None) -> Dict:
+        now = self._clock() if now is None else now
+        return {
+            'arrivals_per_minute': round(self.arrival_rate(now) * 60, 2),
+            'matches_in_horizon': len(self._waits),
+            'wait_p50_seconds': self.wait_percentile(0.5),
+            'wait_p90_seconds': self.wait_percentile(0.9)
+        }
@@ -68,6 +68,11 @@ class AdminEndpointPermissions:
         '/v1/admin/tournaments/<int:tournament_id>': [Permission.GAME_TOURNAMENTS],
         '/v1/admin/tournaments/<int:tournament_id>/start': [Permission.GAME_TOURNAMENTS],
         
+        # === WALLETS ===
+        '/v1/admin/wallets/withdrawals': [Permission.ANALYTICS_REVENUE],
+        '/v1/admin/wallets/withdrawals/<int:entry_id>/settle': [Permission.ANALYTICS_REVENUE],
+        '/v1/admin/wallets/withdrawals/<int:entry_id>/cancel': [Permission.ANALYTICS_REVENUE],
+        
         # === SHOP MANAGEMENT ===
         '/v1/admin/shop/stats': [Permission.SHOP_VIEW],
         '/v1/admin/shop/products': [Permission.SHOP_PRODUCTS],
@@ -0,0 +1,81 @@
+"""
+Admin alert state models
+Alerts raised by the alert engine, one open row per dedup key
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from enum import Enum
+from typing import Optional, Dict, Any
+
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, Text, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base, utcnow
+
+
+class AlertState(str, Enum):
+    FIRING = "firing"
+    ACKNOWLEDGED = "acknowledged"
+    RESOLVED = "resolved"
+
+
+# Severity -> legacy alert "type" shown by the admin panel
+SEVERITY_TYPES = {'critical': 'error', 'high': 'error', 'medium': 'warning', 'low': 'info'}
+
+
+class AdminAlert(Base):
+    """An alert raised by an alert rule, with its firing / acknowledged / resolved lifecycle"""
+    __tablename__ = "admin_alerts"
+    __table_args__ = (
+        # Only one open alert per dedup key; resolved rows are kept as history
+        Index(
+            "uq_admin_alerts_open_dedup_key", "dedup_key", unique=True,
+            postgresql_where=text("state <> 'resolved'"), sqlite_where=text("state <> 'resolved'")
+        ),
+        Index("ix_admin_alerts_rule_state", "rule_id", "state"),
+        Index("ix_admin_alerts_state_severity", "state", "severity"),
+        Index("ix_admin_alerts_dedup_resolved", "dedup_key", "resolved_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    dedup_key: Mapped[str] = mapped_column(String(200), nullable=False)
+    rule_id: Mapped[str] = mapped_column(String(64), nullable=False)
+    category: Mapped[str] = mapped_column(String(32), nullable=False)
+    severity: Mapped[str] = mapped_column(String(16), nullable=False)
+    title: Mapped[str] = mapped_column(String(200), nullable=False)
+    message: Mapped[str] = mapped_column(Text, nullable=False)
+    data: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSONB)
+
+    # Lifecycle
+    state: Mapped[str] = mapped_column(String(16), default=AlertState.FIRING.value, nullable=False)
+    fire_count: Mapped[int] = mapped_column(Integer, default=1, nullable=False)
+    flap_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    first_fired_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, nullable=False)
+    last_fired_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, nullable=False)
+    clear_since: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))  # Condition cleared, not yet resolved
+    acknowledged_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    acknowledged_by_admin_id: Mapped[Optional[int]] = mapped_column(ForeignKey("admins.id", ondelete="SET NULL"))
+    resolved_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, onupdate=utcnow, nullable=False)
+
+    def to_dict(self, flap_threshold: int = 3) -> Dict[str, Any]:
+        return {
+            'id': str(self.id),
+            'dedup_key': self.dedup_key,
+            'type': SEVERITY_TYPES.get(self.severity, 'info'),
+            'category': self.category,
+            'title': self.title,
+            'message': self.message,
+            'timestamp': self.last_fired_at.isoformat(),
+            'severity': self.severity,
+            'data': self.data or {},
+            'state': self.state,
+            'first_fired_at': self.first_fired_at.isoformat(),
+            'acknowledged_at': self.acknowledged_at.isoformat() if self.acknowledged_at else None,
+            'resolved_at': self.resolved_at.isoformat() if self.resolved_at else None,
+            'fire_count': self.fire_count,
+            'flapping': self.flap_count >= flap_threshold
+        }
@@ -65,6 +65,14 @@ class Arena(Base):
     special_rules: Mapped[Optional[dict]] = mapped_column(JSONB)   # Arena-specific rule modifications
     difficulty_rating: Mapped[Optional[int]] = mapped_column(Integer, default=1)    # 1-5 difficulty scale
     
+    # Selection (see shared.services.arena_selector)
+    is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
+    rarity: Mapped[str] = mapped_column(String(20), default="common", nullable=False)  # ArenaRarity value
+    selection_weight: Mapped[float] = mapped_column(Float, default=1.0, nullable=False)  # Multiplies the rarity weight
+    game_modes: Mapped[Optional[list]] = mapped_column(JSONB)  # Modes it can be drawn for; NULL = all
+    min_elo: Mapped[Optional[int]] = mapped_column(Integer)    # Inclusive ELO band; NULL = open
+    max_elo: Mapped[Optional[int]] = mapped_column(Integer)
+    
     created_at: Mapped[datetime] = mapped_column(default=utcnow, nullable=False)
     
     # Relationships
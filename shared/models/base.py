@@ -20,7 +20,8 @@ from sqlalchemy import (
     JSON,
     String,
     Text,
-    UniqueConstraint
+    UniqueConstraint,
+    text
 )
 from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.dialects.postgresql import JSONB
@@ -162,6 +163,7 @@ class Player(Base):
     avatar_url: Mapped[Optional[str]] = mapped_column(String(500))
     password_hash: Mapped[Optional[str]] = mapped_column(String(255))
     elo_rating: Mapped[int] = mapped_column(Integer, nullable=False, default=1000)
+    region: Mapped[Optional[str]] = mapped_column(String(50))  # Regional leaderboard, e.g. "eu"
     
     # Account status and moderation
     status: Mapped[str] = mapped_column(String(50), nullable=False, default="active")  # active, suspended, banned, etc.
@@ -234,6 +236,8 @@ class Console(Base):
     status: Mapped[ConsoleStatus] = mapped_column(SAEnum(ConsoleStatus), default=ConsoleStatus.pending, nullable=False)
     owner_player_id: Mapped[Optional[int]] = mapped_column(ForeignKey("players.id", ondelete="SET NULL"))
     current_arena_id: Mapped[Optional[int]] = mapped_column(ForeignKey("arenas.id", ondelete="SET NULL"))
+    # Column added by migrations/add_console_location_version_categories.py
+    last_heartbeat: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
 
     # Relationships
     owner_player: Mapped[Optional["Player"]] = relationship(back_populates="consoles")
@@ -534,6 +538,9 @@ class Match(Base):
     __table_args__ = (
         Index("ix_matches_status", "status"),
         Index("ix_matches_created", "created_at"),
+        # Finished matches still waiting for the rating processor
+        Index("ix_matches_rating_queue", "ended_at", "id",
+              postgresql_where=text("rated_at IS NULL"), sqlite_where=text("rated_at IS NULL")),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -547,6 +554,7 @@ class Match(Base):
     winner_team: Mapped[Optional[int]] = mapped_column(Integer)
     end_reason: Mapped[Optional[str]] = mapped_column(String(100))
     match_data: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSONB)
+    rated_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))  # Set by the rating processor
 
     # Relationships
     console: Mapped[Optional["Console"]] = relationship()
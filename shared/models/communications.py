@@ -177,10 +177,12 @@ class EmailLog(Base):
     """Individual email delivery logs"""
     __tablename__ = "email_logs"
     __table_args__ = (
+        UniqueConstraint("campaign_id", "player_id", name="uq_email_logs_campaign_player"),
         Index("ix_email_logs_campaign", "campaign_id"),
         Index("ix_email_logs_player", "player_id"),
         Index("ix_email_logs_status", "status"),
         Index("ix_email_logs_sent", "sent_at"),
+        Index("ix_email_logs_due", "status", "next_attempt_at"),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -194,7 +196,8 @@ class EmailLog(Base):
     subject: Mapped[str] = mapped_column(String(300), nullable=False)
     
     # Status
-    status: Mapped[str] = mapped_column(String(20), nullable=False)  # sent, delivered, opened, clicked, bounced, unsubscribed
+    status: Mapped[str] = mapped_column(String(20), nullable=False)  # queued, sending, sent, failed, cancelled, delivered, opened, clicked, bounced, unsubscribed
+    next_attempt_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))  # Retry time, or lease expiry while sending
     
     # Timing
     sent_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
@@ -0,0 +1,58 @@
+"""
+Console command queue models
+Remote management commands queued per console, with delivery and execution state
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, Text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base, utcnow
+
+
+class ConsoleCommand(Base):
+    """
+    One command for one console; fleet and group commands share a batch_id
+
+    status moves pending -> delivered (handed to a console poll, redelivered if not
+    acknowledged by lease_expires_at) -> running (acknowledged, must report by
+    deadline_at) -> succeeded / failed, or ends as timed_out, expired (never
+    delivered before expires_at) or cancelled.
+    """
+    __tablename__ = "console_commands"
+    __table_args__ = (
+        Index("ix_console_commands_console_status", "console_id", "status", "id"),
+        Index("ix_console_commands_status_lease", "status", "lease_expires_at"),
+        Index("ix_console_commands_batch", "batch_id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    console_id: Mapped[int] = mapped_column(ForeignKey("consoles.id", ondelete="CASCADE"), nullable=False)
+    batch_id: Mapped[str] = mapped_column(String(36), nullable=False)
+    command_type: Mapped[str] = mapped_column(String(50), nullable=False)
+    payload: Mapped[Dict[str, Any]] = mapped_column(JSONB, default=dict, nullable=False)
+    timeout_seconds: Mapped[int] = mapped_column(Integer, default=300, nullable=False)
+
+    # Delivery
+    status: Mapped[str] = mapped_column(String(20), default="pending", nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    max_attempts: Mapped[int] = mapped_column(Integer, default=5, nullable=False)
+    lease_expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))  # Ack deadline of a delivery
+    deadline_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))  # Result deadline once running
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+    # Result reported by the console
+    exit_code: Mapped[Optional[int]] = mapped_column(Integer)
+    result: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSONB)
+    output: Mapped[Optional[str]] = mapped_column(Text)
+
+    created_by_admin_id: Mapped[Optional[int]] = mapped_column(Integer)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, nullable=False)
+    delivered_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    acked_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    completed_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
@@ -0,0 +1,58 @@
+"""
+Game release rollout models
+Staged rollouts of published game builds and the build each console runs
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import DateTime, Float, ForeignKey, Index, Integer, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base, utcnow
+
+
+class GameRollout(Base):
+    """
+    Staged rollout of one game version to a percentage of consoles
+
+    Consoles are bucketed by a hash of the version and console id, so raising the
+    percentage only adds consoles. status moves active -> completed (100%, closed by
+    an admin), halted (crash spike or admin) or rolled_back (consoles go back to
+    previous_version).
+    """
+    __tablename__ = "game_rollouts"
+    __table_args__ = (
+        Index("ix_game_rollouts_status", "status"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    version: Mapped[str] = mapped_column(String(64), nullable=False)
+    previous_version: Mapped[Optional[str]] = mapped_column(String(64))  # What consoles outside the cohort run
+    percent: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
+    status: Mapped[str] = mapped_column(String(20), default="active", nullable=False)
+
+    # Automatic halt: crash rate on the new version vs the previous one
+    crash_rate_threshold: Mapped[float] = mapped_column(Float, default=0.05, nullable=False)
+    min_consoles: Mapped[int] = mapped_column(Integer, default=5, nullable=False)
+    halt_reason: Mapped[Optional[str]] = mapped_column(Text)
+
+    started_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, nullable=False)
+    halted_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+
+
+class ConsoleGameInstall(Base):
+    """Game build a console last reported, and when it switched to it"""
+    __tablename__ = "console_game_installs"
+    __table_args__ = (
+        Index("ix_console_game_installs_version", "version"),
+    )
+
+    console_id: Mapped[int] = mapped_column(ForeignKey("consoles.id", ondelete="CASCADE"), primary_key=True)
+    version: Mapped[str] = mapped_column(String(64), nullable=False)
+    previous_version: Mapped[Optional[str]] = mapped_column(String(64))
+    installed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, nullable=False)
+    last_check_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, nullable=False)
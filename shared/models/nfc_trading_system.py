@@ -64,6 +64,12 @@ class MarketplaceListingStatus(str, Enum):
     EXPIRED = "expired"
 
 
+class BuyOrderStatus(str, Enum):
+    OPEN = "open"
+    FILLED = "filled"
+    CANCELLED = "cancelled"
+
+
 # === MODELS ===
 
 class EnhancedNFCCard(Base):
@@ -354,6 +360,33 @@ class MarketplaceListing(Base):
     buyer_player: Mapped[Optional["Player"]] = relationship(foreign_keys=[buyer_player_id])
 
 
+class MarketplaceBuyOrder(Base):
+    """Standing offer to buy any card of a template at up to max_price; the funds are held while it is open"""
+    __tablename__ = "marketplace_buy_orders"
+    __table_args__ = (
+        Index("ix_marketplace_buy_orders_buyer", "buyer_player_id"),
+        Index("ix_marketplace_buy_orders_template_status", "card_template_id", "status"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    buyer_player_id: Mapped[int] = mapped_column(ForeignKey("players.id", ondelete="CASCADE"), nullable=False)
+    card_template_id: Mapped[int] = mapped_column(ForeignKey("card_catalog.id"), nullable=False)
+    max_price: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
+
+    # Status
+    status: Mapped[BuyOrderStatus] = mapped_column(SAEnum(BuyOrderStatus), default=BuyOrderStatus.OPEN, nullable=False)
+    listing_id: Mapped[Optional[int]] = mapped_column(ForeignKey("marketplace_listings.id", ondelete="SET NULL"))
+
+    # Timing
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, nullable=False)
+    filled_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+
+    # Relationships
+    buyer_player: Mapped["Player"] = relationship()
+    listing: Mapped[Optional["MarketplaceListing"]] = relationship()
+
+
 class TradingHistory(Base):
     """Complete trading history for analytics"""
     __tablename__ = "trading_history"
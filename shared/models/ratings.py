@@ -0,0 +1,84 @@
+"""
+Rating models
+Per-season player ratings, the rating change every rated match made, and the
+venues each player has rated matches at
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import DateTime, Float, ForeignKey, Index, Integer, String, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base, utcnow
+
+
+class RatingSeason(Base):
+    """
+    A rating season; it runs from starts_at until the next season starts
+
+    A finished match is rated in the season its ended_at falls in.
+    """
+    __tablename__ = "rating_seasons"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(100), unique=True, nullable=False)
+    starts_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), unique=True, nullable=False)
+    recomputed_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, nullable=False)
+
+
+class PlayerRating(Base):
+    """A player's current rating and record in one season"""
+    __tablename__ = "player_ratings"
+    __table_args__ = (
+        UniqueConstraint("season_id", "player_id", name="uq_player_ratings_season_player"),
+        Index("ix_player_ratings_season_rating", "season_id", "rating"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    season_id: Mapped[int] = mapped_column(ForeignKey("rating_seasons.id", ondelete="CASCADE"), nullable=False)
+    player_id: Mapped[int] = mapped_column(ForeignKey("players.id", ondelete="CASCADE"), nullable=False)
+    rating: Mapped[float] = mapped_column(Float, nullable=False)
+    peak_rating: Mapped[float] = mapped_column(Float, nullable=False)
+    games: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    wins: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    losses: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    draws: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    last_match_id: Mapped[Optional[int]] = mapped_column(Integer)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, nullable=False)
+
+
+class RatingHistory(Base):
+    """One player's rating change from one match, in the order matches were rated"""
+    __tablename__ = "rating_history"
+    __table_args__ = (
+        Index("ix_rating_history_season_player", "season_id", "player_id", "id"),
+        Index("ix_rating_history_match", "match_id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    season_id: Mapped[int] = mapped_column(ForeignKey("rating_seasons.id", ondelete="CASCADE"), nullable=False)
+    player_id: Mapped[int] = mapped_column(ForeignKey("players.id", ondelete="CASCADE"), nullable=False)
+    match_id: Mapped[int] = mapped_column(ForeignKey("matches.id", ondelete="CASCADE"), nullable=False)
+    rating_before: Mapped[float] = mapped_column(Float, nullable=False)
+    rating_after: Mapped[float] = mapped_column(Float, nullable=False)
+    k_factor: Mapped[float] = mapped_column(Float, nullable=False)
+    games: Mapped[int] = mapped_column(Integer, nullable=False)  # Season games including this one
+    played_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)  # The match's ended_at
+
+
+class SeasonVenuePlayer(Base):
+    """A player who has played a rated match at a venue (console) in a season"""
+    __tablename__ = "season_venue_players"
+    __table_args__ = (
+        UniqueConstraint("season_id", "console_id", "player_id", name="uq_season_venue_players"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    season_id: Mapped[int] = mapped_column(ForeignKey("rating_seasons.id", ondelete="CASCADE"), nullable=False)
+    console_id: Mapped[int] = mapped_column(ForeignKey("consoles.id", ondelete="CASCADE"), nullable=False)
+    player_id: Mapped[int] = mapped_column(ForeignKey("players.id", ondelete="CASCADE"), nullable=False)
+    first_match_id: Mapped[int] = mapped_column(Integer, nullable=False)
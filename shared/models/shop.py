@@ -156,6 +156,7 @@ class ShopOrder(Base):
         Index("ix_shop_orders_customer", "customer_id"),
         Index("ix_shop_orders_status", "order_status"),
         Index("ix_shop_orders_created", "created_at"),
+        Index("ix_shop_orders_payment_reference", "payment_reference"),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -252,6 +253,90 @@ class ShopOrderItem(Base):
     product: Mapped["ShopProduct"] = relationship(back_populates="order_items")
 
 
+class ShopCheckoutSession(Base):
+    """Signed checkout session holding the cart between session creation and payment"""
+    __tablename__ = "shop_checkout_sessions"
+    __table_args__ = (
+        Index("idx_shop_checkout_sessions_customer_id", "customer_id"),
+        Index("idx_shop_checkout_sessions_expires_at", "expires_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    session_id: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    session_data: Mapped[Dict[str, Any]] = mapped_column(JSON, nullable=False)
+    session_hash: Mapped[str] = mapped_column(String(128), nullable=False)
+    
+    # Customer info
+    customer_id: Mapped[Optional[int]] = mapped_column(ForeignKey("players.id"))
+    customer_ip: Mapped[Optional[str]] = mapped_column(String(45))
+    
+    # Status
+    is_used: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    
+    # Timestamps
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, onupdate=utcnow, nullable=False)
+
+
+class ShopInventoryLog(Base):
+    """Audit trail of stock changes"""
+    __tablename__ = "shop_inventory_logs"
+    __table_args__ = (
+        Index("idx_shop_inventory_logs_product", "product_id"),
+        Index("idx_shop_inventory_logs_created", "created_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    product_id: Mapped[int] = mapped_column(ForeignKey("shop_products.id", ondelete="CASCADE"), nullable=False)
+    
+    # Change details
+    change_type: Mapped[str] = mapped_column(String(50), nullable=False)  # reservation, sale, release, restock, adjustment
+    quantity_before: Mapped[int] = mapped_column(Integer, nullable=False)
+    quantity_change: Mapped[int] = mapped_column(Integer, nullable=False)
+    quantity_after: Mapped[int] = mapped_column(Integer, nullable=False)
+    
+    # Reference
+    reference_type: Mapped[Optional[str]] = mapped_column(String(50))  # order, checkout_session
+    reference_id: Mapped[Optional[int]] = mapped_column(Integer)
+    
+    # Details
+    reason: Mapped[Optional[str]] = mapped_column(String(200))
+    notes: Mapped[Optional[str]] = mapped_column(Text)
+    changed_by: Mapped[Optional[str]] = mapped_column(String(100))
+    
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, nullable=False)
+
+
+class ShopInventoryReservation(Base):
+    """
+    Stock held for a checkout session until it is paid, released or expires
+
+    Reserving decrements shop_products.stock_quantity straight away, so stock_quantity
+    is always the quantity still available to new checkouts.
+    """
+    __tablename__ = "shop_inventory_reservations"
+    __table_args__ = (
+        Index("ix_shop_inventory_reservations_checkout", "checkout_session_id"),
+        Index("ix_shop_inventory_reservations_status_expires", "status", "expires_at"),
+        Index("ix_shop_inventory_reservations_product", "product_id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    product_id: Mapped[int] = mapped_column(ForeignKey("shop_products.id", ondelete="CASCADE"), nullable=False)
+    checkout_session_id: Mapped[str] = mapped_column(String(64), nullable=False)
+    order_id: Mapped[Optional[int]] = mapped_column(ForeignKey("shop_orders.id", ondelete="SET NULL"))
+    quantity: Mapped[int] = mapped_column(Integer, nullable=False)
+    
+    # Status
+    status: Mapped[str] = mapped_column(String(20), default="active", nullable=False)  # active, converted, released, expired
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    
+    # Timestamps
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, onupdate=utcnow, nullable=False)
+
+
 class ProductDiscount(Base):
     """Discounts and promotions for products"""
     __tablename__ = "product_discounts"
@@ -0,0 +1,45 @@
+"""
+Stripe webhook inbox models
+Verified Stripe events stored as received, before any processing
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import DateTime, Index, Integer, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base, utcnow
+
+
+class StripeWebhookEvent(Base):
+    """
+    One Stripe event, keyed by its Stripe id so redeliveries are stored once
+
+    Events for the same Stripe object (payment intent, invoice...) are processed in
+    event_created order; status moves pending -> processing -> processed, skipped
+    (superseded by a newer event for the object) or failed (out of retries).
+    """
+    __tablename__ = "stripe_webhook_events"
+    __table_args__ = (
+        Index("ix_stripe_webhook_events_due", "status", "next_attempt_at"),
+        Index("ix_stripe_webhook_events_object", "object_id", "event_created"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    event_id: Mapped[str] = mapped_column(String(255), unique=True, nullable=False)
+    event_type: Mapped[str] = mapped_column(String(100), nullable=False)
+    object_id: Mapped[str] = mapped_column(String(255), nullable=False)
+    event_created: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    payload: Mapped[str] = mapped_column(Text, nullable=False)  # Raw body exactly as signed by Stripe
+
+    # Processing state
+    status: Mapped[str] = mapped_column(String(20), default="pending", nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, nullable=False)  # Retry time, or lease expiry while processing
+    last_error: Mapped[Optional[str]] = mapped_column(Text)
+
+    received_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, nullable=False)
+    processed_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
@@ -59,6 +59,7 @@ class TransactionType(str, Enum):
     TOURNAMENT_PRIZE = "tournament_prize"
     PURCHASE = "purchase"
     REFUND = "refund"
+    SALE = "sale"
 
 
 # === MODELS ===
@@ -74,8 +75,14 @@ class PlayerWallet(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     player_id: Mapped[int] = mapped_column(ForeignKey("players.id", ondelete="CASCADE"), nullable=False)
     
-    # Balance
+    # Balance - running total of the wallet's ledger postings, only changed by wallet_ledger
     balance: Mapped[Decimal] = mapped_column(Numeric(10, 2), default=0.00, nullable=False)
+    currency: Mapped[str] = mapped_column(String(3), default="USD", nullable=False)
+    is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
+    
+    # Limits
+    daily_deposit_limit: Mapped[Optional[Decimal]] = mapped_column(Numeric(10, 2))
+    daily_withdrawal_limit: Mapped[Optional[Decimal]] = mapped_column(Numeric(10, 2))
     
     # Timestamps
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, nullable=False)
@@ -198,6 +205,8 @@ class TournamentMatch(Base):
     __table_args__ = (
         Index("ix_tournament_matches_tournament", "tournament_id"),
         Index("ix_tournament_matches_round", "round_number"),
+        Index("ix_tournament_matches_tournament_round", "tournament_id", "round_number"),
+        Index("ix_tournament_matches_match", "match_id"),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -206,6 +215,7 @@ class TournamentMatch(Base):
     # Match details
     round_number: Mapped[int] = mapped_column(Integer, nullable=False)
     match_number: Mapped[int] = mapped_column(Integer, nullable=False)  # Match within the round
+    bracket: Mapped[str] = mapped_column(String(16), default="main", nullable=False)  # main, winners, losers, grand_final
     
     # Players
     player1_id: Mapped[Optional[int]] = mapped_column(ForeignKey("players.id", ondelete="SET NULL"))
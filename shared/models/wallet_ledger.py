@@ -0,0 +1,75 @@
+"""
+Wallet ledger models
+Immutable double-entry postings behind player wallet balances
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime
+from decimal import Decimal
+from typing import List, Optional
+
+from sqlalchemy import Date, DateTime, ForeignKey, Index, Integer, Numeric, String
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from .base import Base, utcnow
+from .tournaments import PlayerWallet  # noqa: F401 - registers player_wallets for the foreign keys
+
+
+class LedgerEntry(Base):
+    """
+    One balanced journal entry: its postings always sum to zero
+
+    Entries and postings are append-only; a correction is a new entry that
+    references the one it reverses or settles.
+    """
+    __tablename__ = "wallet_ledger_entries"
+    __table_args__ = (
+        Index("ix_wallet_ledger_entries_type", "entry_type"),
+        Index("ix_wallet_ledger_entries_related", "related_entry_id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    idempotency_key: Mapped[Optional[str]] = mapped_column(String(128), unique=True)
+    entry_type: Mapped[str] = mapped_column(String(32), nullable=False)  # TransactionType value
+    description: Mapped[str] = mapped_column(String(500), nullable=False)
+
+    # References
+    tournament_id: Mapped[Optional[int]] = mapped_column(ForeignKey("tournaments.id", ondelete="SET NULL"))
+    reference_id: Mapped[Optional[str]] = mapped_column(String(100))  # External payment reference
+    related_entry_id: Mapped[Optional[int]] = mapped_column(ForeignKey("wallet_ledger_entries.id"))
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, nullable=False)
+
+    postings: Mapped[List["LedgerPosting"]] = relationship(back_populates="entry")
+
+
+class LedgerPosting(Base):
+    """One side of a ledger entry; wallet postings carry the wallet's balance after the entry"""
+    __tablename__ = "wallet_ledger_postings"
+    __table_args__ = (
+        Index("ix_wallet_ledger_postings_entry", "entry_id"),
+        Index("ix_wallet_ledger_postings_wallet", "wallet_id", "id"),
+        Index("ix_wallet_ledger_postings_account", "account"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    entry_id: Mapped[int] = mapped_column(ForeignKey("wallet_ledger_entries.id"), nullable=False)
+    account: Mapped[str] = mapped_column(String(64), nullable=False)  # "wallet:12", "external:stripe", ...
+    wallet_id: Mapped[Optional[int]] = mapped_column(ForeignKey("player_wallets.id"))
+    amount: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False)  # Signed: credit > 0 > debit
+    balance_after: Mapped[Optional[Decimal]] = mapped_column(Numeric(12, 2))
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, nullable=False)
+
+    entry: Mapped["LedgerEntry"] = relationship(back_populates="postings")
+
+
+class WalletDailyTotal(Base):
+    """Running per-day deposit / withdrawal totals used for daily limit checks"""
+    __tablename__ = "wallet_daily_totals"
+
+    wallet_id: Mapped[int] = mapped_column(ForeignKey("player_wallets.id", ondelete="CASCADE"), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    entry_type: Mapped[str] = mapped_column(String(32), primary_key=True)
+    total: Mapped[Decimal] = mapped_column(Numeric(12, 2), default=0, nullable=False)
+    entry_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
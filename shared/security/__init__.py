@@ -9,6 +9,8 @@ from .session_manager import session_manager, AdminSession
 from .audit_logger import AdminAuditLogger, log_admin_action
 from .csrf_protection import csrf_protect, generate_csrf_token_for_template
 from .ip_access_control import ip_restrict, ip_access_control
+from .card_key_service import CardKeyService, CardKeyBackend, get_card_key_service
+from .security_event_sink import SecurityEventSink, get_security_event_sink
 
 __all__ = [
     'rate_limit',
@@ -21,5 +23,10 @@ __all__ = [
     'csrf_protect',
     'generate_csrf_token_for_template',
     'ip_restrict',
-    'ip_access_control'
+    'ip_access_control',
+    'CardKeyService',
+    'CardKeyBackend',
+    'get_card_key_service',
+    'SecurityEventSink',
+    'get_security_event_sink'
 ]
@@ -0,0 +1,237 @@
+"""
+NTAG 424 DNA card key service
+Loads the issuer master key once, derives only the key a caller needs and keeps
+recently used per-UID keys in a bounded TTL LRU cache for the authenticate hot path
+"""
+
+import os
+import time
+import ctypes
+import ctypes.util
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.backends import default_backend
+
+logger = logging.getLogger(__name__)
+
+# Key service configuration
+MASTER_KEY_PATH = os.getenv(
+    "NFC_MASTER_KEY_PATH",
+    os.path.join(os.path.dirname(__file__), '../../tools/nfc-card-programmer/master_key.bin')
+)
+CARD_KEY_CACHE_SIZE = int(os.getenv("NFC_CARD_KEY_CACHE_SIZE", "10000"))
+CARD_KEY_CACHE_TTL_SECONDS = int(os.getenv("NFC_CARD_KEY_CACHE_TTL_SECONDS", "300"))
+
+# Key types issued by the card programmer (tools/nfc-card-programmer/crypto_security.py)
+KEY_TYPES = ('AUTH', 'ENC', 'MAC', 'DATA')
+
+
+class CardKeyError(Exception):
+    """Raised when a card key cannot be derived"""
+    pass
+
+
+def _lock_memory(buffer: bytearray) -> bool:
+    """Best-effort mlock() of a key buffer so it is never swapped to disk"""
+    try:
+        libc_name = ctypes.util.find_library('c')
+        if not libc_name:
+            return False
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        address = ctypes.addressof((ctypes.c_char * len(buffer)).from_buffer(buffer))
+        return libc.mlock(ctypes.c_void_p(address), ctypes.c_size_t(len(buffer))) == 0
+    except Exception as e:
+        logger.debug(f"mlock unavailable for master key: {e}")
+        return False
+
+
+class CardKeyBackend(ABC):
+    """
+    Source of per-card keys
+
+    Implementations must derive the same keys the card programmer wrote to the card.
+    A hardware security module backend only needs to implement derive_key().
+    """
+
+    name = "abstract"
+
+    @abstractmethod
+    def derive_key(self, card_uid: str, key_type: str) -> bytes:
+        """Derive a single 128-bit key of key_type for card_uid"""
+        raise NotImplementedError
+
+    def close(self):
+        """Release any key material held by the backend"""
+        pass
+
+
+class LocalMasterKeyBackend(CardKeyBackend):
+    """HKDF derivation from a master key file, loaded once into locked memory"""
+
+    name = "local"
+
+    def __init__(self, master_key_path: str = MASTER_KEY_PATH, master_key: Optional[bytes] = None):
+        self.backend = default_backend()
+        if master_key is None:
+            master_key = self._read_master_key(master_key_path)
+        if len(master_key) != 32:
+            raise CardKeyError("Master key must be 256 bits")
+
+        self._master_key = bytearray(master_key)
+        self.memory_locked = _lock_memory(self._master_key)
+        if not self.memory_locked:
+            logger.warning("Master key could not be locked in memory")
+
+    @staticmethod
+    def _read_master_key(master_key_path: str) -> bytes:
+        if not os.path.exists(master_key_path):
+            raise CardKeyError(f"Master key file not found: {master_key_path}")
+        with open(master_key_path, 'rb') as f:
+            return f.read()
+
+    def derive_key(self, card_uid: str, key_type: str) -> bytes:
+        """Derive one key exactly as NTAG424CryptoManager.derive_card_keys does"""
+        if self._master_key is None:
+            raise CardKeyError("Key backend has been closed")
+
+        try:
+            uid_bytes = bytes.fromhex(card_uid.replace(':', ''))
+        except ValueError:
+            raise CardKeyError(f"Invalid card UID: {card_uid}")
+
+        hkdf = HKDF(
+            algorithm=hashes.SHA256(),
+            length=16,  # 128-bit keys for NTAG 424 DNA
+            salt=uid_bytes,
+            info=f"DECKPORT_NTAG424_{key_type}_{card_uid}".encode(),
+            backend=self.backend
+        )
+        return hkdf.derive(bytes(self._master_key))
+
+    def close(self):
+        """Zero the master key buffer"""
+        if self._master_key is not None:
+            for i in range(len(self._master_key)):
+                self._master_key[i] = 0
+            self._master_key = None
+
+
+class TTLLRUCache:
+    """Thread-safe LRU cache whose entries also expire after a fixed TTL"""
+
+    def __init__(self, max_size: int = CARD_KEY_CACHE_SIZE, ttl_seconds: float = CARD_KEY_CACHE_TTL_SECONDS,
+                 clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._data: "OrderedDict[Tuple[str, str], Tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._data[key]
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value: bytes):
+        with self._lock:
+            self._data[key] = (self._clock() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, card_uid: Optional[str] = None):
+        """Drop cached keys for one card, or everything"""
+        with self._lock:
+            if card_uid is None:
+                self._data.clear()
+                return
+            for key in [k for k in self._data if k[0] == card_uid]:
+                del self._data[key]
+
+    def __len__(self):
+        return len(self._data)
+
+
+class CardKeyService:
+    """Cached card key lookups on top of a CardKeyBackend"""
+
+    def __init__(self, backend: CardKeyBackend, cache: Optional[TTLLRUCache] = None):
+        self.backend = backend
+        self.cache = cache if cache is not None else TTLLRUCache()
+
+    def get_card_key(self, card_uid: str, key_type: str = 'MAC') -> bytes:
+        """Get a single card key, deriving it on a cache miss"""
+        key_type = key_type.upper()
+        if key_type not in KEY_TYPES:
+            raise CardKeyError(f"Unknown key type: {key_type}")
+
+        cache_key = (card_uid, key_type)
+        key = self.cache.get(cache_key)
+        if key is None:
+            key = self.backend.derive_key(card_uid, key_type)
+            self.cache.put(cache_key, key)
+        return key
+
+    def invalidate(self, card_uid: Optional[str] = None):
+        """Forget cached keys (e.g. after a card is revoked or re-keyed)"""
+        self.cache.invalidate(card_uid)
+
+    def get_stats(self) -> Dict:
+        """Cache statistics for monitoring"""
+        lookups = self.cache.hits + self.cache.misses
+        return {
+            'backend': self.backend.name,
+            'cached_keys': len(self.cache),
+            'max_size': self.cache.max_size,
+            'ttl_seconds': self.cache.ttl_seconds,
+            'hits': self.cache.hits,
+            'misses': self.cache.misses,
+            'evictions': self.cache.evictions,
+            'hit_ratio': (self.cache.hits / lookups) if lookups else 0.0
+        }
+
+
+_card_key_service: Optional[CardKeyService] = None
+_card_key_service_lock = threading.Lock()
+
+
+def get_card_key_service() -> CardKeyService:
+    """Get the process-wide card key service, loading the master key on first use"""
+    global _card_key_service
+    if _card_key_service is None:
+        with _card_key_service_lock:
+            if _card_key_service is None:
+                _card_key_service = CardKeyService(LocalMasterKeyBackend())
+                logger.info("Card key service initialized with local master key backend")
+    return _card_key_service
+
+
+def set_card_key_service(service: Optional[CardKeyService]):
+    """Replace the process-wide card key service (HSM backends, tests)"""
+    global _card_key_service
+    with _card_key_service_lock:
+        if _card_key_service is not None and _card_key_service is not service:
+            _card_key_service.backend.close()
+        _card_key_service = service
@@ -1,11 +1,16 @@
 """
 Rate limiting system for admin endpoints
-Implements Redis-based rate limiting with configurable limits per endpoint
+Implements Redis-based rate limiting with configurable limits per endpoint.
+Each check is a single atomic Lua script round trip (sliding window or GCRA);
+when Redis is unreachable an in-process limiter enforces the same limits.
 """
 
 import os
 import time
+import uuid
 import logging
+import threading
+from collections import OrderedDict, deque
 
 try:
     import redis
@@ -23,28 +28,102 @@ logger = logging.getLogger(__name__)
 # Redis configuration
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 REDIS_CLIENT = None
+REDIS_RETRY_SECONDS = 30  # Don't re-dial a dead Redis on every request
+_redis_failed_at = None
 
 def get_redis_client():
     """Get Redis client with connection pooling"""
-    global REDIS_CLIENT
+    global REDIS_CLIENT, _redis_failed_at
     if not REDIS_AVAILABLE:
         return None
         
     if REDIS_CLIENT is None:
+        if _redis_failed_at is not None and time.monotonic() - _redis_failed_at < REDIS_RETRY_SECONDS:
+            return None
         try:
             REDIS_CLIENT = redis.from_url(REDIS_URL, decode_responses=True)
             # Test connection
             REDIS_CLIENT.ping()
+            _redis_failed_at = None
             logger.info("Redis connection established for rate limiting")
         except Exception as e:
             logger.warning(f"Redis not available for rate limiting: {e}")
             REDIS_CLIENT = None
+            _redis_failed_at = time.monotonic()
     return REDIS_CLIENT
 
+def _mark_redis_failed():
+    """Drop the cached client so the next retry re-dials after the backoff"""
+    global REDIS_CLIENT, _redis_failed_at
+    REDIS_CLIENT = None
+    _redis_failed_at = time.monotonic()
+
+# Sliding window log: trim, count and record in one atomic step.
+# Returns {allowed, count, reset_ms}
+SLIDING_WINDOW_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+
+redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+local count = redis.call('ZCARD', key)
+
+if count >= limit then
+    local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+    local reset = window
+    if oldest[2] then
+        reset = tonumber(oldest[2]) + window - now
+    end
+    return {0, count, reset}
+end
+
+redis.call('ZADD', key, now, ARGV[4])
+redis.call('PEXPIRE', key, window)
+return {1, count + 1, window}
+"""
+
+# Generic cell rate algorithm: one stored timestamp (theoretical arrival time) per key.
+# Returns {allowed, used, reset_ms} where used approximates requests in the current burst
+GCRA_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local interval = window / limit
+
+local tat = tonumber(redis.call('GET', key))
+if not tat or tat < now then
+    tat = now
+end
+
+local new_tat = tat + interval
+local allow_at = new_tat - window
+
+if allow_at > now then
+    return {0, limit, math.ceil(allow_at - now)}
+end
+
+redis.call('SET', key, new_tat, 'PX', math.ceil(new_tat - now))
+return {1, math.ceil((new_tat - now) / interval), math.ceil(new_tat - now)}
+"""
+
+_scripts = {}
+
+def _get_script(redis_client, algorithm: str):
+    """Registered Lua script (EVALSHA with transparent reload) for the client"""
+    cache_key = (id(redis_client), algorithm)
+    script = _scripts.get(cache_key)
+    if script is None:
+        source = GCRA_SCRIPT if algorithm == 'gcra' else SLIDING_WINDOW_SCRIPT
+        script = _scripts[cache_key] = redis_client.register_script(source)
+    return script
+
 class RateLimitConfig:
     """Rate limit configuration for different admin operations"""
     
-    # Default limits (requests per window)
+    # Default limits (requests per window). An optional 'algorithm' of
+    # 'sliding_window' (default) or 'gcra' selects the limiting strategy
     DEFAULT_LIMITS = {
         'admin_login': {'requests': 5, 'window': 300},  # 5 attempts per 5 minutes
         'admin_general': {'requests': 100, 'window': 60},  # 100 requests per minute
@@ -77,62 +156,119 @@ def get_client_identifier() -> str:
     else:
         return f"ip:{ip_address}"
 
+class LocalRateLimiter:
+    """
+    In-process limiter used while Redis is unreachable
+
+    Limits are per worker process rather than global, which is looser than
+    Redis but still bounded, instead of failing open.
+    """
+    
+    def __init__(self, max_keys: int = 10000, clock=time.time):
+        self.max_keys = max_keys
+        self._clock = clock
+        self._windows: "OrderedDict[str, deque]" = OrderedDict()
+        self._tats: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _touch(self, store: OrderedDict, key: str):
+        store.move_to_end(key)
+        while len(store) > self.max_keys:
+            store.popitem(last=False)
+    
+    def hit(self, key: str, max_requests: int, window_seconds: int, algorithm: str = 'sliding_window') -> Tuple[bool, int, float]:
+        """Record a request; returns (allowed, current_count, reset_in_seconds)"""
+        now = self._clock()
+        with self._lock:
+            if algorithm == 'gcra':
+                interval = window_seconds / max_requests
+                tat = max(self._tats.get(key, now), now)
+                new_tat = tat + interval
+                allow_at = new_tat - window_seconds
+                if allow_at > now:
+                    return False, max_requests, allow_at - now
+                self._tats[key] = new_tat
+                self._touch(self._tats, key)
+                return True, int(-(-(new_tat - now) // interval)), new_tat - now
+            
+            hits = self._windows.get(key)
+            if hits is None:
+                hits = self._windows[key] = deque()
+            while hits and hits[0] <= now - window_seconds:
+                hits.popleft()
+            self._touch(self._windows, key)
+            
+            if len(hits) >= max_requests:
+                return False, len(hits), hits[0] + window_seconds - now
+            hits.append(now)
+            return True, len(hits), window_seconds
+    
+    def count(self, key: str, window_seconds: int) -> int:
+        now = self._clock()
+        with self._lock:
+            hits = self._windows.get(key)
+            return sum(1 for t in hits if t > now - window_seconds) if hits else 0
+    
+    def reset(self, prefix: str = '', suffix: str = ''):
+        with self._lock:
+            for store in (self._windows, self._tats):
+                for key in [k for k in store if k.startswith(prefix) and k.endswith(suffix)]:
+                    del store[key]
+
+local_rate_limiter = LocalRateLimiter()
+
+def _limit_info(allowed: bool, max_requests: int, window_seconds: int, current: int, reset_in: float) -> Dict:
+    reset_in = max(1, int(-(-reset_in // 1)))
+    if not allowed:
+        return {
+            'limit_exceeded': True,
+            'limit': max_requests,
+            'window': window_seconds,
+            'current': current,
+            'reset_in': reset_in
+        }
+    return {
+        'limit_exceeded': False,
+        'limit': max_requests,
+        'window': window_seconds,
+        'current': current,
+        'remaining': max(max_requests - current, 0)
+    }
+
 def check_rate_limit(limit_type: str, identifier: str) -> Tuple[bool, Dict]:
     """
     Check if request is within rate limit
     Returns (allowed, info_dict)
     """
-    redis_client = get_redis_client()
-    
-    # If Redis is not available, allow all requests (fail open)
-    if not redis_client:
-        return True, {'redis_available': False}
-    
     config = RateLimitConfig.DEFAULT_LIMITS.get(limit_type, RateLimitConfig.DEFAULT_LIMITS['admin_general'])
     max_requests = config['requests']
     window_seconds = config['window']
+    algorithm = config.get('algorithm', 'sliding_window')
     
     # Redis key for this limit
     key = f"rate_limit:{limit_type}:{identifier}"
     
-    try:
-        # Use sliding window counter
-        now = int(time.time())
-        window_start = now - window_seconds
-        
-        # Remove old entries
-        redis_client.zremrangebyscore(key, 0, window_start)
-        
-        # Count current requests in window
-        current_count = redis_client.zcard(key)
-        
-        if current_count >= max_requests:
-            # Rate limit exceeded
-            ttl = redis_client.ttl(key)
-            return False, {
-                'limit_exceeded': True,
-                'limit': max_requests,
-                'window': window_seconds,
-                'current': current_count,
-                'reset_in': ttl if ttl > 0 else window_seconds
-            }
-        
-        # Add current request
-        redis_client.zadd(key, {str(now): now})
-        redis_client.expire(key, window_seconds)
-        
-        return True, {
-            'limit_exceeded': False,
-            'limit': max_requests,
-            'window': window_seconds,
-            'current': current_count + 1,
-            'remaining': max_requests - current_count - 1
-        }
-        
-    except Exception as e:
-        logger.error(f"Rate limiting error: {e}")
-        # Fail open on Redis errors
-        return True, {'redis_error': str(e)}
+    redis_client = get_redis_client()
+    if redis_client:
+        try:
+            # Single atomic round trip; the member is unique so concurrent
+            # requests within the same millisecond are all counted
+            allowed, current, reset_ms = _get_script(redis_client, algorithm)(
+                keys=[key],
+                args=[int(time.time() * 1000), window_seconds * 1000, max_requests, uuid.uuid4().hex]
+            )
+            info = _limit_info(bool(allowed), max_requests, window_seconds, int(current), int(reset_ms) / 1000)
+            return bool(allowed), info
+            
+        except Exception as e:
+            logger.error(f"Rate limiting error, using local limiter: {e}")
+            _mark_redis_failed()
+    
+    # Redis unavailable: enforce the limit per process instead of failing open
+    allowed, current, reset_in = local_rate_limiter.hit(key, max_requests, window_seconds, algorithm)
+    info = _limit_info(allowed, max_requests, window_seconds, current, reset_in)
+    info['redis_available'] = False
+    return allowed, info
 
 def rate_limit(limit_type: Optional[str] = None):
     """
@@ -197,7 +333,15 @@ def get_rate_limit_status(identifier: str) -> Dict:
     redis_client = get_redis_client()
     
     if not redis_client:
-        return {'redis_available': False}
+        status = {'redis_available': False}
+        for limit_name, config in RateLimitConfig.DEFAULT_LIMITS.items():
+            key = f"rate_limit:{limit_name}:{identifier}"
+            status[limit_name] = {
+                'current': local_rate_limiter.count(key, config['window']),
+                'limit': config['requests'],
+                'window': config['window']
+            }
+        return status
     
     status = {}
     
@@ -205,7 +349,14 @@ def get_rate_limit_status(identifier: str) -> Dict:
         key = f"rate_limit:{limit_name}:{identifier}"
         
         try:
-            current_count = redis_client.zcard(key)
+            if config.get('algorithm') == 'gcra':
+                # GCRA keeps a theoretical arrival time, not a request log
+                tat = redis_client.get(key)
+                interval = config['window'] / config['requests']
+                remaining_ms = max(float(tat) - time.time() * 1000, 0) if tat else 0
+                current_count = int(-(-remaining_ms // (interval * 1000)))
+            else:
+                current_count = redis_client.zcard(key)
             ttl = redis_client.ttl(key)
             
             status[limit_name] = {
@@ -221,10 +372,15 @@ def get_rate_limit_status(identifier: str) -> Dict:
 
 def reset_rate_limit(identifier: str, limit_type: Optional[str] = None):
     """Reset rate limit for an identifier (admin function)"""
+    if limit_type:
+        local_rate_limiter.reset(prefix=f"rate_limit:{limit_type}:{identifier}", suffix=identifier)
+    else:
+        local_rate_limiter.reset(prefix="rate_limit:", suffix=f":{identifier}")
+    
     redis_client = get_redis_client()
     
     if not redis_client:
-        return False
+        return True
     
     try:
         if limit_type:
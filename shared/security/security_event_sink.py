@@ -0,0 +1,294 @@
+"""
+Batched security event sink
+Buffers NFC / trading security events in-process and writes them to nfc_security_logs
+in multi-row inserts, with a local journal so events survive crashes and DB outages
+"""
+
+import os
+import json
+import time
+import uuid
+import atexit
+import logging
+import tempfile
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Sink configuration
+SPOOL_DIR = os.getenv(
+    "SECURITY_EVENT_SPOOL_DIR",
+    os.path.join(tempfile.gettempdir(), "deckport-security-events")
+)
+BATCH_SIZE = int(os.getenv("SECURITY_EVENT_BATCH_SIZE", "200"))
+FLUSH_INTERVAL_SECONDS = float(os.getenv("SECURITY_EVENT_FLUSH_INTERVAL", "1.0"))
+MAX_BUFFER = int(os.getenv("SECURITY_EVENT_MAX_BUFFER", "10000"))
+FSYNC_JOURNAL = os.getenv("SECURITY_EVENT_FSYNC", "false").lower() == "true"
+
+EventWriter = Callable[[List[Dict]], None]
+
+
+def write_events_to_database(events: List[Dict]):
+    """Insert a batch of events into nfc_security_logs with one multi-row INSERT"""
+    from sqlalchemy import insert
+    from shared.database.connection import SessionLocal
+    from shared.models.nfc_trading_system import NFCSecurityLog
+
+    rows = []
+    for event in events:
+        if event.get('nfc_card_id') is None:
+            # nfc_security_logs.nfc_card_id is NOT NULL; keep unknown-card events in the app log
+            logger.warning(f"Security event without card: {event.get('event_type')} {event.get('error_details')}")
+            continue
+        row = dict(event)
+        row.pop('event_id', None)
+        if isinstance(row.get('timestamp'), str):
+            row['timestamp'] = datetime.fromisoformat(row['timestamp'])
+        rows.append(row)
+
+    if not rows:
+        return
+
+    with SessionLocal() as session:
+        session.execute(insert(NFCSecurityLog), rows)
+        session.commit()
+
+
+class SecurityEventSink:
+    """
+    Bounded in-process buffer in front of a batch writer
+
+    Every event is appended to the active journal segment before it is buffered.
+    A flush hands the buffer and its segment to the writer; the segment is deleted
+    once the writer succeeds, or kept as a spill file when it fails. Spill files and
+    segments left behind by crashed processes are replayed on start and after every
+    successful flush, so delivery is at-least-once.
+    """
+
+    def __init__(self, writer: EventWriter = write_events_to_database, spool_dir: str = SPOOL_DIR,
+                 batch_size: int = BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL_SECONDS,
+                 max_buffer: int = MAX_BUFFER, fsync: bool = FSYNC_JOURNAL):
+        self.writer = writer
+        self.spool_dir = spool_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.fsync = fsync
+
+        self.pid = os.getpid()
+        self.running = False
+        self.worker_thread = None
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._buffer: List[Dict] = []
+        self._segment_seq = 0
+        self._segment_path = None
+        self._segment_file = None
+
+        self.stats = {'emitted': 0, 'written': 0, 'batches': 0, 'spilled': 0, 'replayed': 0, 'write_errors': 0}
+
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._open_segment()
+
+    # --- Journal segments ---
+
+    def _open_segment(self):
+        self._segment_seq += 1
+        name = f"active-{self.pid}-{int(time.time() * 1000)}-{self._segment_seq}-{uuid.uuid4().hex[:8]}.jsonl"
+        self._segment_path = os.path.join(self.spool_dir, name)
+        self._segment_file = open(self._segment_path, 'a', encoding='utf-8')
+
+    def _rotate_segment(self):
+        """Close the active segment and start a new one; caller holds self._lock"""
+        path = self._segment_path
+        self._segment_file.close()
+        self._open_segment()
+        return path
+
+    # --- Producer side ---
+
+    def emit(self, event: Dict):
+        """Record an event; never blocks on the database unless the buffer is full"""
+        event = dict(event)
+        event.setdefault('event_id', uuid.uuid4().hex)
+        event.setdefault('timestamp', datetime.now(timezone.utc).isoformat())
+        line = json.dumps(event, default=str)
+
+        with self._lock:
+            self._segment_file.write(line + "\n")
+            self._segment_file.flush()
+            if self.fsync:
+                os.fsync(self._segment_file.fileno())
+            self._buffer.append(json.loads(line))
+            self.stats['emitted'] += 1
+            buffered = len(self._buffer)
+
+        if buffered >= self.max_buffer or (buffered >= self.batch_size and not self.running):
+            # Backpressure: the producer pays for the flush instead of growing the buffer
+            self.flush()
+        elif buffered >= self.batch_size:
+            self._wakeup.set()
+
+    # --- Consumer side ---
+
+    def flush(self) -> int:
+        """Write everything buffered so far; returns the number of events written"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._buffer:
+                    return 0
+                events, self._buffer = self._buffer, []
+                segment = self._rotate_segment()
+
+            if self._write(events, segment):
+                self._replay_spills()
+                return len(events)
+            return 0
+
+    def _write(self, events: List[Dict], segment: str) -> bool:
+        try:
+            self.writer(events)
+        except Exception as e:
+            spill_path = segment.replace('active-', 'spill-', 1)
+            os.replace(segment, spill_path)
+            self.stats['write_errors'] += 1
+            self.stats['spilled'] += len(events)
+            logger.error(f"Security event write failed, spilled {len(events)} events to {spill_path}: {e}")
+            return False
+
+        os.remove(segment)
+        self.stats['written'] += len(events)
+        self.stats['batches'] += 1
+        return True
+
+    def _claimable_files(self) -> List[str]:
+        """Spill files plus active segments whose owning process is gone"""
+        claimable = []
+        for name in sorted(os.listdir(self.spool_dir)):
+            if not name.endswith('.jsonl'):
+                continue
+            if name.startswith('spill-'):
+                claimable.append(name)
+            elif name.startswith('active-'):
+                owner_pid = int(name.split('-')[1])
+                if owner_pid != self.pid and not _process_alive(owner_pid):
+                    claimable.append(name)
+        return claimable
+
+    def _replay_spills(self):
+        """Re-deliver spilled and orphaned journal files"""
+        for name in self._claimable_files():
+            source = os.path.join(self.spool_dir, name)
+            claimed = os.path.join(self.spool_dir, f"replay-{self.pid}-{name}")
+            try:
+                # Atomic rename so only one worker process replays a file
+                os.replace(source, claimed)
+            except FileNotFoundError:
+                continue
+
+            events = _read_journal(claimed)
+            if not events:
+                os.remove(claimed)
+                continue
+
+            try:
+                self.writer(events)
+            except Exception as e:
+                os.replace(claimed, source)
+                logger.warning(f"Security event replay deferred for {name}: {e}")
+                return
+
+            os.remove(claimed)
+            self.stats['replayed'] += len(events)
+            self.stats['written'] += len(events)
+            logger.info(f"Replayed {len(events)} spilled security events from {name}")
+
+    def _worker_loop(self):
+        while self.running:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Security event flush loop error: {e}")
+
+    def start(self):
+        """Recover leftovers from previous runs and start the background flusher"""
+        if self.running:
+            return
+        current_segment = os.path.basename(self._segment_path)
+        for name in os.listdir(self.spool_dir):
+            # Files carrying our pid but not opened by us belong to a previous
+            # incarnation (pid reuse after a restart, e.g. pid 1 in a container)
+            path = os.path.join(self.spool_dir, name)
+            if name.startswith(f"replay-{self.pid}-"):
+                os.replace(path, os.path.join(self.spool_dir, name[len(f"replay-{self.pid}-"):]))
+            elif name.startswith(f"active-{self.pid}-") and name != current_segment:
+                os.replace(path, os.path.join(self.spool_dir, name.replace('active-', 'spill-', 1)))
+        self._replay_spills()
+
+        self.running = True
+        self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
+        self.worker_thread.start()
+        logger.info("Security event sink started")
+
+    def close(self):
+        """Stop the flusher and flush everything that is still buffered"""
+        self.running = False
+        self._wakeup.set()
+        if self.worker_thread:
+            self.worker_thread.join(timeout=10)
+        self.flush()
+        with self._lock:
+            self._segment_file.close()
+            if os.path.exists(self._segment_path) and os.path.getsize(self._segment_path) == 0:
+                os.remove(self._segment_path)
+        logger.info("Security event sink stopped")
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return dict(self.stats, buffered=len(self._buffer))
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read_journal(path: str) -> List[Dict]:
+    events = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError:
+                # Torn final line from a crash mid-write
+                logger.warning(f"Skipping corrupt security event line in {path}")
+    return events
+
+
+_sink: Optional[SecurityEventSink] = None
+_sink_lock = threading.Lock()
+
+
+def get_security_event_sink() -> SecurityEventSink:
+    """Get this process's sink, starting it on first use (and again after a fork)"""
+    global _sink
+    if _sink is None or _sink.pid != os.getpid():
+        with _sink_lock:
+            if _sink is None or _sink.pid != os.getpid():
+                _sink = SecurityEventSink()
+                _sink.start()
+                atexit.register(_sink.close)
+    return _sink
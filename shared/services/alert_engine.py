@@ -0,0 +1,592 @@
+"""
+Admin Alert Engine
+Evaluates alert rules on a schedule and as events arrive, keeping alert state
+(firing / acknowledged / resolved) in admin_alerts so admin reads never re-run the checks
+"""
+
+import os
+import zlib
+import logging
+import threading
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, func, or_, text
+from sqlalchemy.orm import Session
+
+from shared.models.alerts import AdminAlert, AlertState
+from shared.models.base import Console, ConsoleStatus, Player, VideoStream, VideoStreamStatus
+
+logger = logging.getLogger(__name__)
+
+# Engine configuration
+ALERT_EVALUATION_INTERVAL = float(os.getenv("ALERT_EVALUATION_INTERVAL", "60"))
+FLAP_WINDOW_SECONDS = float(os.getenv("ALERT_FLAP_WINDOW_SECONDS", "900"))
+FLAP_THRESHOLD = int(os.getenv("ALERT_FLAP_THRESHOLD", "3"))
+CONSOLE_OFFLINE_MINUTES = int(os.getenv("ALERT_CONSOLE_OFFLINE_MINUTES", "10"))
+# Repeated events for an alert that is already open refresh it at most this often
+EVENT_TOUCH_SECONDS = 60
+# First key of the Postgres advisory lock taken per rule evaluation
+EVALUATION_LOCK_CLASS = 7420
+
+OPEN_STATES = (AlertState.FIRING.value, AlertState.ACKNOWLEDGED.value)
+SEVERITY_LEVELS = ['low', 'medium', 'high', 'critical']
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value: datetime) -> datetime:
+    """Column queries skip the ORM, and some drivers hand back naive UTC timestamps"""
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+@dataclass
+class AlertSignal:
+    """A condition a rule currently considers violated"""
+    dedup_key: str
+    message: str
+    severity: str
+    data: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class AlertTransition:
+    """A state change made by the engine: fired, reopened or resolved"""
+    kind: str
+    dedup_key: str
+    rule_id: str
+    severity: str
+
+
+# === RULES ===
+
+class AlertRule:
+    """
+    Base alert rule
+
+    evaluate() returns every key currently in violation (the engine resolves open
+    alerts missing from it), or None for purely event-driven rules, whose alerts
+    resolve after quiet_seconds without a new firing event. on_event() returns the
+    keys one event makes fire or clear.
+    """
+
+    rule_id = ""
+    category = ""
+    title = ""
+    severity = "medium"
+    clear_seconds: float = 0  # How long a condition must stay clear before the alert resolves
+    quiet_seconds: float = 0
+    event_types: Tuple[str, ...] = ()
+
+    def evaluate(self, session: Session, now: datetime) -> Optional[List[AlertSignal]]:
+        return []
+
+    def on_event(self, event_type: str, payload: Dict, now: datetime) -> Tuple[List[AlertSignal], List[str]]:
+        return [], []
+
+    def signal(self, key: str, message: str, severity: Optional[str] = None, **data) -> AlertSignal:
+        return AlertSignal(f"{self.rule_id}:{key}" if key else self.rule_id, message, severity or self.severity, data)
+
+
+def _offline_consoles_filter(now: datetime, offline_minutes: int):
+    threshold = now - timedelta(minutes=offline_minutes)
+    return (
+        Console.status == ConsoleStatus.active,
+        or_(Console.last_heartbeat < threshold, Console.last_heartbeat.is_(None))
+    )
+
+
+class ConsoleOfflineRule(AlertRule):
+    """One alert per active console that has stopped sending heartbeats"""
+
+    rule_id = "console_offline"
+    category = "console"
+    title = "Console Offline"
+    clear_seconds = 60
+    event_types = ("console.heartbeat",)
+
+    def __init__(self, offline_minutes: int = CONSOLE_OFFLINE_MINUTES):
+        self.offline_minutes = offline_minutes
+
+    def evaluate(self, session, now):
+        rows = session.query(Console.device_uid, Console.last_heartbeat, Console.registered_at).filter(
+            *_offline_consoles_filter(now, self.offline_minutes)
+        ).all()
+
+        signals = []
+        for device_uid, last_heartbeat, registered_at in rows:
+            offline_seconds = (now - _as_utc(last_heartbeat or registered_at)).total_seconds()
+            hours = int(offline_seconds // 3600)
+            minutes = int((offline_seconds % 3600) // 60)
+            time_str = f"{hours}h {minutes}m" if hours > 0 else f"{minutes}m"
+            signals.append(self.signal(
+                device_uid, f"Console {device_uid} offline for {time_str}",
+                severity='high' if hours >= 2 else 'medium',
+                device_uid=device_uid, offline_duration=offline_seconds
+            ))
+        return signals
+
+    def on_event(self, event_type, payload, now):
+        # A heartbeat clears the console's alert straight away instead of at the next evaluation
+        return [], [f"{self.rule_id}:{payload['device_uid']}"]
+
+
+class CountThresholdRule(AlertRule):
+    """A single aggregate alert while a count query is above a threshold"""
+
+    def __init__(self, rule_id: str, category: str, title: str, severity: str,
+                 query: Callable[[Session, datetime], int], threshold: int, message: str,
+                 clear_seconds: float = 0):
+        self.rule_id = rule_id
+        self.category = category
+        self.title = title
+        self.severity = severity
+        self.query = query
+        self.threshold = threshold
+        self.message = message
+        self.clear_seconds = clear_seconds
+
+    def evaluate(self, session, now):
+        count = self.query(session, now) or 0
+        if count <= self.threshold:
+            return []
+        return [self.signal("", self.message.format(count=count), count=count)]
+
+
+class StreamingLoadRule(AlertRule):
+    """Fires when more than 80% of active consoles are streaming"""
+
+    rule_id = "high_streaming_load"
+    category = "system"
+    title = "High Streaming Load"
+    clear_seconds = 300
+
+    def evaluate(self, session, now):
+        active_streams = session.query(func.count(VideoStream.id)).filter(
+            VideoStream.status == VideoStreamStatus.active
+        ).scalar() or 0
+        total_consoles = session.query(func.count(Console.id)).filter(
+            Console.status == ConsoleStatus.active
+        ).scalar() or 0
+
+        if not active_streams or active_streams <= total_consoles * 0.8:
+            return []
+        return [self.signal(
+            "", f"{active_streams} active video streams (high server load)",
+            active_streams=active_streams, total_consoles=total_consoles,
+            load_percentage=round(active_streams / total_consoles * 100, 1) if total_consoles > 0 else 0
+        )]
+
+
+class RegistrationSpikeRule(AlertRule):
+    """Fires when today's registrations are more than three times yesterday's"""
+
+    rule_id = "registration_spike"
+    category = "player"
+    title = "Registration Spike"
+    severity = "low"
+
+    def evaluate(self, session, now):
+        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        yesterday_start = today_start - timedelta(days=1)
+        registrations_today, registrations_yesterday = session.query(
+            func.count(Player.id).filter(Player.created_at >= today_start),
+            func.count(Player.id).filter(Player.created_at < today_start)
+        ).filter(Player.created_at >= yesterday_start).one()
+
+        if not registrations_yesterday or registrations_today <= registrations_yesterday * 3:
+            return []
+        return [self.signal(
+            "", f"{registrations_today} new registrations today (vs {registrations_yesterday} yesterday)",
+            today_count=registrations_today, yesterday_count=registrations_yesterday,
+            spike_ratio=round(registrations_today / registrations_yesterday, 1)
+        )]
+
+
+class SecurityEventBurstRule(AlertRule):
+    """
+    Fires when one card (or console) produces threshold matching NFC security events
+    within window_seconds. Counted from the live event stream of this process.
+    """
+
+    category = "nfc"
+    severity = "high"
+    event_types = ("nfc.security",)
+
+    def __init__(self, rule_id: str, title: str, event_names: Iterable[str], key_field: str,
+                 threshold: int, window_seconds: float, clear_seconds: float = 0):
+        self.rule_id = rule_id
+        self.title = title
+        self.event_names = frozenset(event_names)
+        self.key_field = key_field
+        self.threshold = threshold
+        self.window_seconds = window_seconds
+        self.quiet_seconds = window_seconds
+        self.clear_seconds = clear_seconds
+        self._windows: Dict[Any, Deque[float]] = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    def evaluate(self, session, now):
+        # Drop idle windows so the map stays bounded by recently active keys
+        cutoff = now.timestamp() - self.window_seconds
+        with self._lock:
+            for key in [k for k, w in self._windows.items() if not w or w[-1] < cutoff]:
+                del self._windows[key]
+        return None
+
+    def on_event(self, event_type, payload, now):
+        if payload.get('event_type') not in self.event_names:
+            return [], []
+        key = payload.get(self.key_field)
+        if key is None:
+            key = (payload.get('error_details') or {}).get(self.key_field)
+        if key is None:
+            return [], []
+
+        at = now.timestamp()
+        with self._lock:
+            window = self._windows[key]
+            window.append(at)
+            while window and window[0] < at - self.window_seconds:
+                window.popleft()
+            count = len(window)
+
+        if count < self.threshold:
+            return [], []
+        return [self.signal(
+            str(key), f"{count} {self.title.lower()} from {self.key_field.replace('_', ' ')} {key} "
+                      f"in {int(self.window_seconds // 60)} minutes",
+            count=count, **{self.key_field: key}
+        )], []
+
+
+def default_rules() -> List[AlertRule]:
+    """The admin panel's alert rules"""
+    from shared.models.nfc_trading_system import TradeOffer, TradeStatus
+
+    return [
+        ConsoleOfflineRule(),
+        CountThresholdRule(
+            "multiple_consoles_offline", "console", "Multiple Consoles Offline", "critical",
+            lambda session, now: session.query(func.count(Console.id)).filter(
+                *_offline_consoles_filter(now, CONSOLE_OFFLINE_MINUTES)
+            ).scalar(),
+            threshold=1, message="{count} consoles are currently offline", clear_seconds=120
+        ),
+        CountThresholdRule(
+            "pending_registrations", "console", "Pending Console Registrations", "low",
+            lambda session, now: session.query(func.count(Console.id)).filter(
+                Console.status == ConsoleStatus.pending
+            ).scalar(),
+            threshold=0, message="{count} console(s) awaiting approval"
+        ),
+        CountThresholdRule(
+            "high_pending_trades", "nfc", "High Pending Trades", "medium",
+            lambda session, now: session.query(func.count(TradeOffer.id)).filter(
+                TradeOffer.status == TradeStatus.PENDING
+            ).scalar(),
+            threshold=20, message="{count} card trades awaiting processing", clear_seconds=300
+        ),
+        StreamingLoadRule(),
+        RegistrationSpikeRule(),
+        SecurityEventBurstRule(
+            "nfc_auth_failures", "Failed Card Authentications",
+            ("auth_failed", "auth_card_not_activated", "invalid_activation_code", "trade_card_mismatch"),
+            key_field="nfc_card_id", threshold=5, window_seconds=600, clear_seconds=60
+        ),
+        SecurityEventBurstRule(
+            "nfc_unknown_cards", "Unknown Card Taps",
+            ("auth_card_not_found", "card_not_found"),
+            key_field="console_id", threshold=10, window_seconds=600, clear_seconds=60
+        ),
+    ]
+
+
+# === ENGINE ===
+
+class AlertEngine:
+    """Applies rule output to admin_alerts: dedup, hysteresis and flap suppression"""
+
+    def __init__(self, rules: Optional[List[AlertRule]] = None, session_factory=None, clock=utcnow,
+                 interval: float = ALERT_EVALUATION_INTERVAL, flap_window_seconds: float = FLAP_WINDOW_SECONDS,
+                 flap_threshold: int = FLAP_THRESHOLD):
+        if session_factory is None:
+            from shared.database.connection import SessionLocal
+            session_factory = SessionLocal
+        self.session_factory = session_factory
+        self.rules: Dict[str, AlertRule] = {rule.rule_id: rule for rule in (rules if rules is not None else default_rules())}
+        self._clock = clock
+        self.interval = interval
+        self.flap_window_seconds = flap_window_seconds
+        self.flap_threshold = flap_threshold
+
+        self._event_rules: Dict[str, List[AlertRule]] = defaultdict(list)
+        for rule in self.rules.values():
+            for event_type in rule.event_types:
+                self._event_rules[event_type].append(rule)
+
+        # dedup_key -> clearing? for every open alert, so events only touch the
+        # database when they change something
+        self._open: Dict[str, bool] = {}
+        self._touched: Dict[str, datetime] = {}
+        self._lock = threading.Lock()
+
+        self.running = False
+        self.worker_thread = None
+        self._stop = threading.Event()
+
+    # --- Evaluation ---
+
+    def evaluate(self, rule_ids: Optional[Iterable[str]] = None) -> List[AlertTransition]:
+        """Run scheduled rules; each rule is evaluated and applied in its own transaction"""
+        transitions = []
+        for rule in [self.rules[r] for r in rule_ids] if rule_ids else list(self.rules.values()):
+            now = self._clock()
+            with self.session_factory() as session:
+                try:
+                    if not self._try_lock(session, rule):
+                        continue
+                    signals = rule.evaluate(session, now)
+                    transitions.extend(self._apply(session, rule, signals, [], now, full=True))
+                    session.commit()
+                except Exception as e:
+                    session.rollback()
+                    logger.error(f"Alert rule {rule.rule_id} failed: {e}")
+
+        with self.session_factory() as session:
+            self._refresh_open(session)
+        return transitions
+
+    def handle_event(self, event_type: str, payload: Dict) -> List[AlertTransition]:
+        """Feed one event (heartbeat, NFC security event, ...) to the rules that watch it"""
+        rules = self._event_rules.get(event_type)
+        if not rules:
+            return []
+
+        now = self._clock()
+        work = []
+        with self._lock:
+            for rule in rules:
+                firing, cleared = rule.on_event(event_type, payload, now)
+                firing = [s for s in firing if self._needs_write(s.dedup_key, now)]
+                cleared = [key for key in cleared if self._open.get(key) is False]
+                if firing or cleared:
+                    work.append((rule, firing, cleared))
+        if not work:
+            return []
+
+        transitions = []
+        with self.session_factory() as session:
+            try:
+                for rule, firing, cleared in work:
+                    transitions.extend(self._apply(session, rule, firing, cleared, now, full=False))
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                logger.error(f"Alert event {event_type} failed: {e}")
+                return []
+        return transitions
+
+    def _needs_write(self, dedup_key: str, now: datetime) -> bool:
+        if dedup_key not in self._open or self._open[dedup_key]:
+            return True
+        touched = self._touched.get(dedup_key)
+        return touched is None or (now - touched).total_seconds() >= EVENT_TOUCH_SECONDS
+
+    def _try_lock(self, session: Session, rule: AlertRule) -> bool:
+        """Let only one API worker evaluate a rule at a time (Postgres only)"""
+        if session.get_bind().dialect.name != 'postgresql':
+            return True
+        key = zlib.crc32(rule.rule_id.encode()) & 0x7FFFFFFF
+        return bool(session.execute(
+            text("SELECT pg_try_advisory_xact_lock(:lock_class, :key)"),
+            {"lock_class": EVALUATION_LOCK_CLASS, "key": key}
+        ).scalar())
+
+    def _refresh_open(self, session: Session):
+        rows = session.query(AdminAlert.dedup_key, AdminAlert.clear_since).filter(
+            AdminAlert.state.in_(OPEN_STATES)
+        ).all()
+        with self._lock:
+            self._open = {key: clear_since is not None for key, clear_since in rows}
+            self._touched = {key: at for key, at in self._touched.items() if key in self._open}
+
+    # --- State transitions ---
+
+    def _apply(self, session: Session, rule: AlertRule, signals: Optional[List[AlertSignal]],
+               cleared_keys: List[str], now: datetime, full: bool) -> List[AlertTransition]:
+        signals_by_key = {s.dedup_key: s for s in (signals or [])}
+        query = session.query(AdminAlert).filter(AdminAlert.state.in_(OPEN_STATES))
+        if full:
+            query = query.filter(AdminAlert.rule_id == rule.rule_id)
+        else:
+            query = query.filter(AdminAlert.dedup_key.in_(set(signals_by_key) | set(cleared_keys)))
+        open_alerts = {alert.dedup_key: alert for alert in query}
+
+        transitions = []
+        new_keys = [key for key in signals_by_key if key not in open_alerts]
+        recently_resolved = {}
+        if new_keys:
+            for alert in session.query(AdminAlert).filter(
+                AdminAlert.dedup_key.in_(new_keys),
+                AdminAlert.state == AlertState.RESOLVED.value,
+                AdminAlert.resolved_at >= now - timedelta(seconds=self.flap_window_seconds)
+            ).order_by(AdminAlert.resolved_at):
+                recently_resolved[alert.dedup_key] = alert
+
+        for key, signal in signals_by_key.items():
+            alert = open_alerts.get(key)
+            if alert is not None:
+                # Still firing: dedup into the open alert
+                alert.last_fired_at = now
+                alert.clear_since = None
+                alert.severity, alert.message, alert.data = signal.severity, signal.message, signal.data
+            elif key in recently_resolved:
+                # Came back soon after resolving: reopen the same alert and count a flap
+                alert = recently_resolved[key]
+                alert.state = AlertState.FIRING.value
+                alert.resolved_at = alert.acknowledged_at = alert.acknowledged_by_admin_id = None
+                alert.clear_since = None
+                alert.flap_count += 1
+                alert.fire_count += 1
+                alert.last_fired_at = now
+                alert.severity, alert.message, alert.data = signal.severity, signal.message, signal.data
+                transitions.append(AlertTransition("reopened", key, rule.rule_id, signal.severity))
+            else:
+                session.add(AdminAlert(
+                    dedup_key=key, rule_id=rule.rule_id, category=rule.category, title=rule.title,
+                    severity=signal.severity, message=signal.message, data=signal.data,
+                    state=AlertState.FIRING.value, first_fired_at=now, last_fired_at=now
+                ))
+                transitions.append(AlertTransition("fired", key, rule.rule_id, signal.severity))
+            self._track(key, clearing=False, touched=now)
+
+        if not full:
+            clear_keys = cleared_keys
+        elif signals is None:
+            clear_keys = [key for key, alert in open_alerts.items()
+                          if (now - alert.last_fired_at).total_seconds() >= rule.quiet_seconds]
+        else:
+            clear_keys = [key for key in open_alerts if key not in signals_by_key]
+
+        for key in clear_keys:
+            alert = open_alerts.get(key)
+            if alert is None:
+                continue
+            if alert.clear_since is None:
+                alert.clear_since = now
+            # Flapping alerts must stay clear for the whole flap window before resolving
+            hold = self.flap_window_seconds if alert.flap_count >= self.flap_threshold else rule.clear_seconds
+            if (now - alert.clear_since).total_seconds() >= hold:
+                alert.state = AlertState.RESOLVED.value
+                alert.resolved_at = now
+                transitions.append(AlertTransition("resolved", key, rule.rule_id, alert.severity))
+                self._track(key, resolved=True)
+            else:
+                self._track(key, clearing=True)
+
+        session.flush()
+        for transition in transitions:
+            logger.info(f"Alert {transition.kind}: {transition.dedup_key} ({transition.severity})")
+        return transitions
+
+    def _track(self, key: str, clearing: bool = False, resolved: bool = False, touched: Optional[datetime] = None):
+        with self._lock:
+            if resolved:
+                self._open.pop(key, None)
+                self._touched.pop(key, None)
+                return
+            self._open[key] = clearing
+            if touched is not None:
+                self._touched[key] = touched
+
+    # --- Scheduler ---
+
+    def _worker_loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.evaluate()
+            except Exception as e:
+                logger.error(f"Alert evaluation loop error: {e}")
+
+    def start(self):
+        """Start the background evaluation thread"""
+        if self.running:
+            return
+        self.running = True
+        self._stop.clear()
+        self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
+        self.worker_thread.start()
+        logger.info(f"Alert engine started ({len(self.rules)} rules, every {self.interval:.0f}s)")
+
+    def stop(self):
+        self.running = False
+        self._stop.set()
+        if self.worker_thread:
+            self.worker_thread.join(timeout=10)
+        logger.info("Alert engine stopped")
+
+
+# === READ SIDE ===
+
+def list_alerts(session: Session, category: Optional[str] = None, min_severity: Optional[str] = None,
+                include_resolved: bool = False, limit: int = 50) -> List[AdminAlert]:
+    """Open alerts, most severe and most recent first"""
+    query = session.query(AdminAlert)
+    if not include_resolved:
+        query = query.filter(AdminAlert.state.in_(OPEN_STATES))
+    if category:
+        query = query.filter(AdminAlert.category == category)
+    if min_severity in SEVERITY_LEVELS:
+        query = query.filter(AdminAlert.severity.in_(SEVERITY_LEVELS[SEVERITY_LEVELS.index(min_severity):]))
+
+    severity_rank = case({level: rank for rank, level in enumerate(SEVERITY_LEVELS)}, value=AdminAlert.severity, else_=-1)
+    return query.order_by(severity_rank.desc(), AdminAlert.last_fired_at.desc()).limit(limit).all()
+
+
+def alert_counts(session: Session) -> Dict[str, int]:
+    """Open alert counts per severity"""
+    counts = {level: 0 for level in reversed(SEVERITY_LEVELS)}
+    for severity, count in session.query(AdminAlert.severity, func.count(AdminAlert.id)).filter(
+        AdminAlert.state.in_(OPEN_STATES)
+    ).group_by(AdminAlert.severity):
+        counts[severity] = count
+    return counts
+
+
+def acknowledge_alert(session: Session, alert_id: int, admin_id: Optional[int] = None) -> Optional[AdminAlert]:
+    """Mark a firing alert as acknowledged; it keeps deduplicating until it resolves"""
+    alert = session.get(AdminAlert, alert_id)
+    if alert is None:
+        return None
+    if alert.state == AlertState.FIRING.value:
+        alert.state = AlertState.ACKNOWLEDGED.value
+        alert.acknowledged_at = utcnow()
+        alert.acknowledged_by_admin_id = admin_id
+    return alert
+
+
+_alert_engine: Optional[AlertEngine] = None
+_alert_engine_lock = threading.Lock()
+
+
+def get_alert_engine() -> AlertEngine:
+    """Get the process-wide alert engine"""
+    global _alert_engine
+    if _alert_engine is None:
+        with _alert_engine_lock:
+            if _alert_engine is None:
+                _alert_engine = AlertEngine()
+    return _alert_engine
+
+
+def emit_alert_event(event_type: str, payload: Dict):
+    """Best-effort event hook for request handlers; alerting never fails the request"""
+    try:
+        get_alert_engine().handle_event(event_type, payload)
+    except Exception as e:
+        logger.warning(f"Alert event {event_type} dropped: {e}")
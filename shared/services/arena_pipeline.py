@@ -0,0 +1,260 @@
+"""
+Arena Pipeline
+Runs the steps of a multi-stage job, arena creation in particular, as a
+dependency graph on one asyncio loop. A stage starts as soon as the stages it
+requires have finished, so independent stages of one job overlap (music is
+generated while images render) and stages of different jobs overlap across the
+batch. Each stage can draw from a named slot pool, such as a GPU pool of one
+slot for ComfyUI or a few CPU slots for ffmpeg renders, which bounds how many
+run at once whichever job they belong to. Failed stages are retried with
+backoff, every finished stage is checkpointed to disk, and a rerun over the
+same checkpoint directory resumes each job from where it stopped.
+"""
+
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Progress event statuses
+STARTED = "started"
+COMPLETED = "completed"
+RETRYING = "retrying"
+FAILED = "failed"
+RESUMED = "resumed"
+SKIPPED = "skipped"  # A required stage failed, so this one never ran
+
+# Run ids and job keys name files and directories; nothing that could leave the checkpoint directory
+SAFE_NAME = re.compile(r'[A-Za-z0-9_-]{1,64}')
+
+
+def safe_name(value) -> bool:
+    """Whether value can be used as one path component under a checkpoint directory"""
+    return isinstance(value, str) and SAFE_NAME.fullmatch(value) is not None
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    One step of a job
+
+    run is called as run(job, results) and awaited; results holds the output of
+    every stage this one requires, directly or through other stages. Outputs are
+    checkpointed as JSON, so they must be JSON serializable.
+    """
+    name: str
+    run: Callable[[Any, Dict[str, Any]], Awaitable[Any]]
+    requires: Tuple[str, ...] = ()
+    slot: Optional[str] = None
+    attempts: Optional[int] = None  # Defaults to the pipeline's attempts
+
+
+@dataclass
+class JobOutcome:
+    key: str
+    results: Dict[str, Any] = field(default_factory=dict)
+    failed_stage: Optional[str] = None
+    error: Optional[BaseException] = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.failed_stage is None
+
+
+class StageFailed(Exception):
+    """A stage ran out of attempts; dependent stages of its job are skipped"""
+
+    def __init__(self, key: str, stage: str, error: BaseException):
+        super().__init__(f"{key}: stage {stage} failed: {error}")
+        self.key = key
+        self.stage = stage
+        self.error = error
+
+
+class StagePipeline:
+    """Schedules the stages of many jobs under shared slot limits"""
+
+    def __init__(self, stages: Iterable[Stage], slots: Optional[Dict[str, int]] = None,
+                 max_jobs: Optional[int] = None, attempts: int = 1, retry_delay: float = 1.0,
+                 checkpoint_dir: Optional[str] = None, on_progress: Optional[Callable[[Dict], None]] = None,
+                 job_key: Callable[[Any], str] = str, sleep=asyncio.sleep, clock=time.monotonic):
+        self.stages = _ordered(list(stages))
+        self.slots = dict(slots or {})
+        for stage in self.stages:
+            if stage.slot is not None and self.slots.get(stage.slot, 0) < 1:
+                raise ValueError(f"Stage {stage.name} uses slot pool {stage.slot!r}, which has no slots")
+        self.max_jobs = max_jobs
+        self.attempts = max(1, attempts)
+        self.retry_delay = retry_delay
+        self.checkpoint_dir = Path(checkpoint_dir) if checkpoint_dir else None
+        self.on_progress = on_progress
+        self.job_key = job_key
+        self.sleep = sleep
+        self.clock = clock
+        self._counts = {}
+        self._jobs = {}
+
+    async def run(self, jobs: Iterable[Any]) -> List[JobOutcome]:
+        """Run every job; outcomes come back in job order, failed jobs included"""
+        jobs = list(jobs)
+        if self.checkpoint_dir:
+            unsafe = [key for key in map(self.job_key, jobs) if not safe_name(key)]
+            if unsafe:
+                raise ValueError(f"Job keys {unsafe!r} cannot name checkpoint files")
+        # Semaphores belong to the running loop, so they are made per run
+        pools = {name: asyncio.Semaphore(size) for name, size in self.slots.items()}
+        admission = asyncio.Semaphore(self.max_jobs) if self.max_jobs else None
+        self._counts = {stage.name: {STARTED: 0, COMPLETED: 0, FAILED: 0, RETRYING: 0, RESUMED: 0, SKIPPED: 0}
+                        for stage in self.stages}
+        self._jobs = {'total': len(jobs), 'running': 0, COMPLETED: 0, FAILED: 0}
+        if self.checkpoint_dir:
+            self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+
+        async def admitted(job):
+            if admission is None:
+                return await self._run_job(job, pools)
+            async with admission:
+                return await self._run_job(job, pools)
+
+        return list(await asyncio.gather(*(admitted(job) for job in jobs)))
+
+    def progress(self) -> Dict:
+        """Jobs and per-stage counts of the current or last run"""
+        return {'jobs': dict(self._jobs), 'stages': {name: dict(c) for name, c in self._counts.items()}}
+
+    async def _run_job(self, job, pools) -> JobOutcome:
+        key = self.job_key(job)
+        outcome = JobOutcome(key=key, results=self._load_checkpoint(key))
+        resumed = set(outcome.results)
+        tasks = {}
+        self._jobs['running'] += 1
+
+        async def run_stage(stage):
+            for name in stage.requires:
+                if not await tasks[name]:
+                    self._emit(key, stage, SKIPPED)
+                    return False
+            if stage.name in resumed:
+                self._emit(key, stage, RESUMED)
+                return True
+            try:
+                result = await self._attempt(job, key, stage, outcome.results, pools)
+            except StageFailed as e:
+                if outcome.failed_stage is None:
+                    outcome.failed_stage, outcome.error = e.stage, e.error
+                return False
+            outcome.results[stage.name] = result
+            self._save_checkpoint(key, outcome.results)
+            return True
+
+        # Every stage waits on the tasks of the stages it requires; the graph is acyclic
+        for stage in self.stages:
+            tasks[stage.name] = asyncio.ensure_future(run_stage(stage))
+        await asyncio.gather(*tasks.values())
+
+        self._jobs['running'] -= 1
+        self._jobs[COMPLETED if outcome.succeeded else FAILED] += 1
+        if not outcome.succeeded:
+            logger.error(f"{key}: stage {outcome.failed_stage} failed: {outcome.error}")
+        return outcome
+
+    async def _attempt(self, job, key, stage, results, pools):
+        attempts = stage.attempts or self.attempts
+        pool = pools.get(stage.slot)
+        for attempt in range(1, attempts + 1):
+            try:
+                if pool is None:
+                    return await self._execute(job, key, stage, attempt, results)
+                async with pool:
+                    return await self._execute(job, key, stage, attempt, results)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if attempt >= attempts:
+                    self._emit(key, stage, FAILED, attempt=attempt, error=str(e))
+                    raise StageFailed(key, stage.name, e)
+                delay = self.retry_delay * 2 ** (attempt - 1)
+                logger.warning(f"{key}: stage {stage.name} attempt {attempt} failed, retrying in {delay:.1f}s: {e}")
+                self._emit(key, stage, RETRYING, attempt=attempt, error=str(e))
+                # Backoff happens outside the slot so other jobs can use it meanwhile
+                await self.sleep(delay)
+
+    async def _execute(self, job, key, stage, attempt, results):
+        self._emit(key, stage, STARTED, attempt=attempt)
+        started = self.clock()
+        result = await stage.run(job, dict(results))
+        self._emit(key, stage, COMPLETED, attempt=attempt, seconds=round(self.clock() - started, 3))
+        return result
+
+    def _emit(self, key, stage, status, **details):
+        self._counts[stage.name][status] += 1
+        if self.on_progress is None:
+            return
+        try:
+            self.on_progress({'job': key, 'stage': stage.name, 'status': status, **details})
+        except Exception as e:
+            logger.error(f"Pipeline progress callback failed: {e}")
+
+    def _checkpoint_path(self, key) -> Optional[Path]:
+        return self.checkpoint_dir / f"{key}.json" if self.checkpoint_dir else None
+
+    def _load_checkpoint(self, key) -> Dict[str, Any]:
+        path = self._checkpoint_path(key)
+        if path is None or not path.exists():
+            return {}
+        try:
+            saved = json.loads(path.read_text())
+        except (OSError, ValueError) as e:
+            logger.error(f"Unreadable checkpoint {path}, starting {key} over: {e}")
+            return {}
+        known = {stage.name for stage in self.stages}
+        return {name: value for name, value in saved.get('stages', {}).items() if name in known}
+
+    def _save_checkpoint(self, key, results):
+        path = self._checkpoint_path(key)
+        if path is None:
+            return
+        try:
+            tmp = path.with_suffix('.tmp')
+            tmp.write_text(json.dumps({'job': key, 'stages': results}))
+            os.replace(tmp, path)
+        except (OSError, TypeError, ValueError) as e:
+            # The run goes on; only resuming this job is affected
+            logger.error(f"Could not checkpoint {key}: {e}")
+
+
+def _ordered(stages: List[Stage]) -> List[Stage]:
+    """Stages in dependency order; rejects duplicate names, unknown requirements and cycles"""
+    by_name = {}
+    for stage in stages:
+        if stage.name in by_name:
+            raise ValueError(f"Duplicate stage {stage.name}")
+        by_name[stage.name] = stage
+    for stage in stages:
+        for name in stage.requires:
+            if name not in by_name:
+                raise ValueError(f"Stage {stage.name} requires unknown stage {name}")
+
+    ordered, state = [], {}
+
+    def visit(stage, path):
+        if state.get(stage.name) == "done":
+            return
+        if state.get(stage.name) == "visiting":
+            raise ValueError(f"Stage dependency cycle: {' -> '.join(path + [stage.name])}")
+        state[stage.name] = "visiting"
+        for name in stage.requires:
+            visit(by_name[name], path + [stage.name])
+        state[stage.name] = "done"
+        ordered.append(stage)
+
+    for stage in stages:
+        visit(stage, [])
+    return ordered
@@ -0,0 +1,236 @@
+"""
+Arena Selector
+Draws the arena for a match from an in-memory alias table, O(1) per draw, instead
+of sorting the arenas table with ORDER BY random() on every match start. Weights
+come from arena rarity times the arena's own selection weight; arenas can be
+limited to game modes and an ELO band. Tables are rebuilt when admins edit arenas
+and at least every ARENA_SELECTOR_TTL_SECONDS so other API workers pick edits up.
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+
+from shared.models.arena import Arena
+from shared.models.base import ArenaRarity
+
+logger = logging.getLogger(__name__)
+
+# Selector configuration
+ARENA_SELECTOR_TTL_SECONDS = float(os.getenv("ARENA_SELECTOR_TTL_SECONDS", "60"))
+
+# Relative draw weight of each rarity before the per-arena selection_weight
+RARITY_WEIGHTS = {
+    ArenaRarity.common.value: 1.0,
+    ArenaRarity.uncommon.value: 0.6,
+    ArenaRarity.rare.value: 0.3,
+    ArenaRarity.epic.value: 0.15,
+    ArenaRarity.legendary.value: 0.05,
+}
+
+
+class AliasTable:
+    """
+    Walker/Vose alias table: one uniform column pick and one biased coin per draw
+
+    Every column holds probability for at most two outcomes, its own and an alias,
+    so sampling is O(1) however many outcomes there are.
+    """
+
+    def __init__(self, outcomes: Sequence, weights: Sequence[float]):
+        if not outcomes or len(outcomes) != len(weights):
+            raise ValueError("Alias table needs one positive weight per outcome")
+        total = float(sum(weights))
+        if total <= 0 or any(w < 0 for w in weights):
+            raise ValueError("Alias table needs one positive weight per outcome")
+
+        n = len(outcomes)
+        self.outcomes = list(outcomes)
+        self.probability = [0.0] * n
+        self.alias = list(range(n))
+        scaled = [w * n / total for w in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+        for i in small + large:  # Leftovers are 1.0 up to rounding
+            self.probability[i] = 1.0
+
+    def __len__(self):
+        return len(self.outcomes)
+
+    def sample(self, rng: random.Random):
+        column = rng.randrange(len(self.outcomes))
+        return self.outcomes[column if rng.random() < self.probability[column] else self.alias[column]]
+
+
+@dataclass(frozen=True)
+class ArenaEntry:
+    """Snapshot of the arena fields selection and the public arena endpoints need"""
+    id: int
+    name: str
+    mana_color: str
+    difficulty: Optional[int]
+    story_text: Optional[str]
+    flavor_text: Optional[str]
+    rarity: str
+    weight: float
+    game_modes: Optional[FrozenSet[str]]
+    min_elo: Optional[int]
+    max_elo: Optional[int]
+
+    def allows(self, mode: Optional[str], elo: Optional[int]) -> bool:
+        if mode is not None and self.game_modes is not None and mode not in self.game_modes:
+            return False
+        if elo is not None:
+            if self.min_elo is not None and elo < self.min_elo:
+                return False
+            if self.max_elo is not None and elo > self.max_elo:
+                return False
+        return True
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "mana_color": self.mana_color,
+            "difficulty": self.difficulty,
+            "story_text": self.story_text,
+            "flavor_text": self.flavor_text,
+            "rarity": self.rarity,
+        }
+
+
+def arena_weight(rarity: Optional[str], selection_weight: Optional[float]) -> float:
+    base = RARITY_WEIGHTS.get(rarity or ArenaRarity.common.value, RARITY_WEIGHTS[ArenaRarity.common.value])
+    return base * max(selection_weight if selection_weight is not None else 1.0, 0.0)
+
+
+class _Snapshot:
+    def __init__(self, arenas: List[ArenaEntry], loaded_at: float):
+        self.arenas = [a for a in arenas if a.weight > 0]
+        self.all = arenas
+        self.loaded_at = loaded_at
+        # Eligibility only changes at band edges, so every ELO between two edges shares a table
+        self.elo_edges = sorted({a.min_elo for a in arenas if a.min_elo is not None}
+                                | {a.max_elo + 1 for a in arenas if a.max_elo is not None})
+        self.tables: Dict[Tuple[Optional[str], Optional[int]], Optional[AliasTable]] = {}
+
+
+class ArenaSelector:
+    """Process-wide weighted arena draws over a cached snapshot of the active arenas"""
+
+    def __init__(self, session_factory=None, ttl_seconds: float = ARENA_SELECTOR_TTL_SECONDS,
+                 rng: Optional[random.Random] = None, clock=time.monotonic):
+        self._session_factory = session_factory
+        self.ttl_seconds = ttl_seconds
+        self.rng = rng or random.Random()
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._snapshot: Optional[_Snapshot] = None
+        self.loads = 0
+        self.draws = 0
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            from shared.database.connection import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    def invalidate(self):
+        """Drop the snapshot; the next draw reloads the arenas"""
+        with self._lock:
+            self._snapshot = None
+
+    def _load(self) -> List[ArenaEntry]:
+        with self.session_factory() as session:
+            rows = session.execute(
+                select(Arena.id, Arena.name, Arena.mana_color, Arena.difficulty_rating, Arena.story_text,
+                       Arena.flavor_text, Arena.rarity, Arena.selection_weight, Arena.game_modes,
+                       Arena.min_elo, Arena.max_elo)
+                .where(Arena.is_active.is_(True))
+                .order_by(Arena.id)
+            ).all()
+        return [
+            ArenaEntry(id=row.id, name=row.name, mana_color=row.mana_color, difficulty=row.difficulty_rating,
+                       story_text=row.story_text, flavor_text=row.flavor_text,
+                       rarity=row.rarity or ArenaRarity.common.value,
+                       weight=arena_weight(row.rarity, row.selection_weight),
+                       game_modes=frozenset(row.game_modes) if row.game_modes else None,
+                       min_elo=row.min_elo, max_elo=row.max_elo)
+            for row in rows
+        ]
+
+    def _current(self) -> _Snapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and self.clock() - snapshot.loaded_at < self.ttl_seconds:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or self.clock() - snapshot.loaded_at >= self.ttl_seconds:
+                snapshot = _Snapshot(self._load(), self.clock())
+                self._snapshot = snapshot
+                self.loads += 1
+            return snapshot
+
+    def _table(self, snapshot: _Snapshot, mode: Optional[str], elo: Optional[int]) -> Optional[AliasTable]:
+        key = (mode, None if elo is None else bisect_right(snapshot.elo_edges, elo))
+        if key not in snapshot.tables:
+            eligible = [a for a in snapshot.arenas if a.allows(mode, elo)]
+            snapshot.tables[key] = AliasTable(eligible, [a.weight for a in eligible]) if eligible else None
+        return snapshot.tables[key]
+
+    def pick(self, mode: Optional[str] = None, elo: Optional[int] = None,
+             rng: Optional[random.Random] = None) -> Optional[ArenaEntry]:
+        """Weighted draw among the arenas allowed for the mode and ELO; None if there are none"""
+        table = self._table(self._current(), mode, elo)
+        self.draws += 1
+        return table.sample(rng or self.rng) if table else None
+
+    def pick_uniform(self, rng: Optional[random.Random] = None) -> Optional[ArenaEntry]:
+        """Any active arena with equal chance, ignoring weights and filters"""
+        arenas = self._current().all
+        self.draws += 1
+        return (rng or self.rng).choice(arenas) if arenas else None
+
+    def probabilities(self, mode: Optional[str] = None, elo: Optional[int] = None) -> Dict[int, float]:
+        """Configured draw probability of each eligible arena, by arena id"""
+        eligible = [a for a in self._current().arenas if a.allows(mode, elo)]
+        total = sum(a.weight for a in eligible)
+        return {a.id: a.weight / total for a in eligible}
+
+    def stats(self) -> Dict:
+        snapshot = self._snapshot
+        return {
+            'arenas': len(snapshot.all) if snapshot else None,
+            'tables': len(snapshot.tables) if snapshot else 0,
+            'loads': self.loads,
+            'draws': self.draws,
+        }
+
+
+_arena_selector: Optional[ArenaSelector] = None
+_arena_selector_lock = threading.Lock()
+
+
+def get_arena_selector() -> ArenaSelector:
+    """Get the process-wide arena selector"""
+    global _arena_selector
+    if _arena_selector is None:
+        with _arena_selector_lock:
+            if _arena_selector is None:
+                _arena_selector = ArenaSelector()
+    return _arena_selector
@@ -0,0 +1,769 @@
+"""
+Campaign Delivery
+Background delivery of admin email campaigns. Starting a campaign resolves its
+recipient segment into one email_logs row per player with a single INSERT ...
+SELECT; a pool of worker threads then claims due rows in batches, sends them
+through a pluggable transport under a shared rate limit and records every
+outcome, retrying transient failures with backoff. The rows are the delivery
+state, so an interrupted send resumes from where it stopped without mailing
+anyone twice.
+"""
+
+import os
+import atexit
+import logging
+import smtplib
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from typing import Dict, List, Optional
+
+from sqlalchemy import DateTime, Integer, String, and_, case, exists, func, insert, literal, or_, select, update
+
+from shared.models.base import Player
+from shared.models.communications import CampaignStatus, EmailCampaign, EmailLog, RecipientType
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    redis = None
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Delivery configuration
+DELIVERY_WORKERS = int(os.getenv("CAMPAIGN_DELIVERY_WORKERS", "8"))
+DELIVERY_RATE = float(os.getenv("CAMPAIGN_DELIVERY_RATE", "50"))  # Messages per second across all processes, 0 for no limit
+# Processes running delivery workers (gunicorn -w); the rate is split between them while Redis is unreachable
+DELIVERY_PROCESSES = max(1, int(os.getenv("CAMPAIGN_DELIVERY_PROCESSES", os.getenv("WEB_CONCURRENCY", "1"))))
+CLAIM_BATCH_SIZE = int(os.getenv("CAMPAIGN_CLAIM_BATCH_SIZE", "50"))
+LEASE_SECONDS = int(os.getenv("CAMPAIGN_LEASE_SECONDS", "300"))  # A claimed row goes back to the queue after this long
+MAX_ATTEMPTS = int(os.getenv("CAMPAIGN_MAX_ATTEMPTS", "5"))
+RETRY_BASE_SECONDS = int(os.getenv("CAMPAIGN_RETRY_BASE_SECONDS", "60"))
+RETRY_MAX_SECONDS = 3600
+SCHEDULER_INTERVAL = float(os.getenv("CAMPAIGN_SCHEDULER_INTERVAL", "5"))
+ACTIVE_PLAYER_DAYS = int(os.getenv("CAMPAIGN_ACTIVE_PLAYER_DAYS", "30"))
+NEW_PLAYER_DAYS = int(os.getenv("CAMPAIGN_NEW_PLAYER_DAYS", "7"))
+
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "25"))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "false").lower() == "true"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))  # Must stay well under the lease
+MAIL_FROM = os.getenv("CAMPAIGN_MAIL_FROM", "Deckport <no-reply@deckport.ai>")
+REDIS_URL = os.getenv("CAMPAIGN_DELIVERY_REDIS_URL", os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+RATE_KEY = "campaign_delivery:rate"
+REDIS_RETRY_SECONDS = 30
+
+# email_logs.status values owned by the delivery pipeline
+QUEUED = "queued"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+BOUNCED = "bounced"
+CANCELLED = "cancelled"
+PENDING_STATUSES = (QUEUED, SENDING)
+
+STARTABLE = (CampaignStatus.draft, CampaignStatus.scheduled)
+
+
+class CampaignError(Exception):
+    """Raised when a campaign cannot move to the requested state"""
+    pass
+
+
+class TransientDeliveryError(Exception):
+    """The transport could not send now; the message is retried with backoff"""
+    pass
+
+
+class PermanentDeliveryError(Exception):
+    """The recipient was refused; the message is recorded as bounced and never retried"""
+    pass
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def retry_delay(attempt: int, base: int = RETRY_BASE_SECONDS) -> timedelta:
+    """Exponential backoff after the given (1-based) failed attempt"""
+    return timedelta(seconds=min(RETRY_MAX_SECONDS, base * 2 ** (attempt - 1)))
+
+
+@dataclass
+class OutboundEmail:
+    log_id: int
+    campaign_id: int
+    player_id: int
+    to: str
+    subject: str
+    text: str
+    html: Optional[str] = None
+
+    @property
+    def message_id(self) -> str:
+        # Stable per recipient, so a relay that de-duplicates on Message-ID can catch a resend
+        return f"<campaign-{self.campaign_id}-{self.player_id}@deckport.ai>"
+
+
+# === TRANSPORTS ===
+
+class EmailTransport:
+    """Sends one message; returns the provider message id or raises a delivery error"""
+
+    def send(self, message: OutboundEmail) -> str:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SMTPTransport(EmailTransport):
+    """SMTP relay transport with one kept-alive connection per worker thread"""
+
+    def __init__(self, host: str = SMTP_HOST, port: int = SMTP_PORT, username: Optional[str] = SMTP_USERNAME,
+                 password: Optional[str] = SMTP_PASSWORD, starttls: bool = SMTP_STARTTLS,
+                 timeout: float = SMTP_TIMEOUT, sender: str = MAIL_FROM):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.sender = sender
+        self._local = threading.local()
+        self._connections: List[smtplib.SMTP] = []
+        self._lock = threading.Lock()
+
+    def _connection(self) -> smtplib.SMTP:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.starttls:
+                conn.starttls()
+            if self.username:
+                conn.login(self.username, self.password or "")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _drop(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            with self._lock:
+                if conn in self._connections:
+                    self._connections.remove(conn)
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def build(self, message: OutboundEmail) -> EmailMessage:
+        email = EmailMessage()
+        email['From'] = self.sender
+        email['To'] = message.to
+        email['Subject'] = message.subject
+        email['Message-ID'] = message.message_id
+        email.set_content(message.text)
+        if message.html:
+            email.add_alternative(message.html, subtype='html')
+        return email
+
+    def send(self, message: OutboundEmail) -> str:
+        try:
+            self._connection().send_message(self.build(message))
+            return message.message_id
+        except smtplib.SMTPRecipientsRefused as e:
+            raise PermanentDeliveryError(f"Recipient refused: {e.recipients}")
+        except smtplib.SMTPResponseException as e:
+            if e.smtp_code >= 500:
+                raise PermanentDeliveryError(f"{e.smtp_code} {e.smtp_error!r}")
+            self._drop()
+            raise TransientDeliveryError(f"{e.smtp_code} {e.smtp_error!r}")
+        except (smtplib.SMTPException, OSError) as e:
+            self._drop()
+            raise TransientDeliveryError(str(e))
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.quit()
+            except Exception:
+                pass
+
+
+class MemoryTransport(EmailTransport):
+    """
+    Local stand-in for the SMTP relay
+
+    Keeps every accepted message in outbox; fail() makes the next sends to an address
+    raise transient or permanent errors. Used by tests and the delivery benchmark.
+    """
+
+    def __init__(self):
+        self.outbox: List[OutboundEmail] = []
+        self._failures: Dict[str, List] = {}
+        self._lock = threading.Lock()
+
+    def fail(self, address: str, times: int = 1, permanent: bool = False):
+        with self._lock:
+            self._failures[address] = [times, permanent]
+
+    def send(self, message: OutboundEmail) -> str:
+        with self._lock:
+            failure = self._failures.get(message.to)
+            if failure and failure[0] > 0:
+                failure[0] -= 1
+                if failure[1]:
+                    raise PermanentDeliveryError(f"550 mailbox unavailable: {message.to}")
+                raise TransientDeliveryError("421 try again later")
+            self.outbox.append(message)
+        return message.message_id
+
+
+class TokenBucket:
+    """Blocking token bucket shared by the worker threads of one process; rate <= 0 disables it"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+# Reserve the next send slot of a GCRA schedule shared by every process.
+# Returns how many milliseconds the caller waits before sending
+RESERVE_SLOT_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local burst = tonumber(ARGV[3])
+
+local tat = tonumber(redis.call('GET', key))
+if not tat or tat < now then
+    tat = now
+end
+
+local new_tat = tat + interval
+redis.call('SET', key, new_tat, 'PX', math.ceil(new_tat - now + burst))
+return math.max(0, math.ceil(new_tat - burst - now))
+"""
+
+
+class SharedRateLimit:
+    """
+    The delivery rate enforced across every API process through Redis
+
+    Each send reserves its own slot in one atomic script call, so concurrent
+    workers in different processes queue behind each other instead of each
+    getting the full rate. While Redis is unreachable every process falls back
+    to a local bucket at rate / processes, which keeps the total at the
+    configured rate as long as CAMPAIGN_DELIVERY_PROCESSES is right.
+    """
+
+    def __init__(self, rate: float, processes: int = DELIVERY_PROCESSES, redis_url: Optional[str] = REDIS_URL,
+                 client=None, clock=time.time, sleep=time.sleep):
+        self.rate = rate
+        self.burst = max(1.0, rate)
+        self.local = TokenBucket(rate / max(1, processes), sleep=sleep)
+        self._redis_url = redis_url
+        self._client = client
+        self._script = None
+        self._failed_at: Optional[float] = None
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+
+    def _redis(self):
+        with self._lock:
+            if self._client is None and REDIS_AVAILABLE and self._redis_url:
+                if self._failed_at is not None and time.monotonic() - self._failed_at < REDIS_RETRY_SECONDS:
+                    return None
+                try:
+                    client = redis.from_url(self._redis_url, decode_responses=True)
+                    client.ping()
+                    self._client = client
+                except Exception as e:
+                    logger.warning(f"Redis not available for the campaign rate limit, limiting per process: {e}")
+                    self._failed_at = time.monotonic()
+            if self._client is not None and self._script is None:
+                self._script = self._client.register_script(RESERVE_SLOT_SCRIPT)
+            return self._client
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        if self._redis() is not None:
+            try:
+                interval = 1000.0 / self.rate
+                wait_ms = self._script(keys=[RATE_KEY], args=[int(self._clock() * 1000), interval,
+                                                             self.burst * interval])
+                if wait_ms:
+                    self._sleep(int(wait_ms) / 1000)
+                return
+            except Exception as e:
+                logger.warning(f"Campaign rate limit lost Redis, limiting per process: {e}")
+                with self._lock:
+                    self._client = self._script = None
+                    self._failed_at = time.monotonic()
+        self.local.acquire()
+
+
+# === SEGMENTS ===
+
+def segment_filters(campaign: EmailCampaign, now: datetime) -> List:
+    """Player predicates for the campaign's recipient type; everyone must be reachable and opted in"""
+    players = Player.__table__
+    filters = [players.c.status == "active", players.c.is_banned.is_(False), players.c.email_notifications.is_(True)]
+    active_since = now - timedelta(days=ACTIVE_PLAYER_DAYS)
+    kind = campaign.recipient_type
+    if kind == RecipientType.active_players:
+        filters.append(players.c.last_login_at >= active_since)
+    elif kind == RecipientType.new_players:
+        filters.append(players.c.created_at >= now - timedelta(days=NEW_PLAYER_DAYS))
+    elif kind == RecipientType.premium_players:
+        filters.append(players.c.is_premium.is_(True))
+    elif kind == RecipientType.inactive_players:
+        filters.append(or_(players.c.last_login_at.is_(None), players.c.last_login_at < active_since))
+    elif kind == RecipientType.custom_segment:
+        # Custom segments are explicit player id lists; stored SQL is never executed
+        player_ids = (campaign.settings or {}).get('player_ids')
+        if not player_ids:
+            raise CampaignError("Custom segment campaigns need settings.player_ids")
+        filters.append(players.c.id.in_([int(pid) for pid in player_ids]))
+    return filters
+
+
+def count_recipients(session, campaign: EmailCampaign, now: Optional[datetime] = None) -> int:
+    players = Player.__table__
+    return session.execute(
+        select(func.count()).select_from(players).where(*segment_filters(campaign, now or utcnow()))
+    ).scalar()
+
+
+def campaign_progress(session, campaign_id: int) -> Dict[str, int]:
+    """Per-status recipient counts for one campaign"""
+    logs = EmailLog.__table__
+    counts = dict(session.execute(
+        select(logs.c.status, func.count()).where(logs.c.campaign_id == campaign_id).group_by(logs.c.status)
+    ).all())
+    counts['total'] = sum(counts.values())
+    return counts
+
+
+# === DELIVERY ===
+
+class CampaignDelivery:
+    """
+    Campaign state transitions plus the worker pool that drains email_logs
+
+    Workers claim rows with a conditional UPDATE (SKIP LOCKED on Postgres) that moves
+    them to 'sending' under a lease, and record each outcome in its own commit right
+    after the transport returns. A process that dies mid-send leaves its claimed rows
+    leased; they become due again when the lease runs out. Everything already
+    recorded as sent is never claimed again, so only a message the relay accepted in
+    the instant before the crash can be sent twice.
+    """
+
+    def __init__(self, session_factory=None, transport: Optional[EmailTransport] = None,
+                 workers: int = DELIVERY_WORKERS, rate: float = DELIVERY_RATE, batch_size: int = CLAIM_BATCH_SIZE,
+                 lease_seconds: int = LEASE_SECONDS, max_attempts: int = MAX_ATTEMPTS,
+                 retry_base_seconds: int = RETRY_BASE_SECONDS, interval: float = SCHEDULER_INTERVAL, clock=utcnow):
+        self._session_factory = session_factory
+        self._transport = transport
+        self.workers = workers
+        self.bucket = SharedRateLimit(rate)
+        self.batch_size = batch_size
+        self.lease = timedelta(seconds=lease_seconds)
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.interval = interval
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._content: Dict[int, tuple] = {}
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+        self.running = False
+        self.worker_threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            from shared.database.connection import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    @property
+    def transport(self) -> EmailTransport:
+        if self._transport is None:
+            self._transport = SMTPTransport()
+        return self._transport
+
+    # --- Campaign state ---
+
+    def _transition(self, session, campaign_id: int, from_statuses, to_status: CampaignStatus, **values) -> bool:
+        campaigns = EmailCampaign.__table__
+        row = session.execute(
+            update(campaigns)
+            .where(campaigns.c.id == campaign_id, campaigns.c.status.in_(from_statuses))
+            .values(status=to_status, updated_at=self.clock(), **values)
+            .returning(campaigns.c.id)
+        ).first()
+        return row is not None
+
+    def _require(self, session, campaign_id: int) -> EmailCampaign:
+        campaign = session.get(EmailCampaign, campaign_id)
+        if campaign is None:
+            raise CampaignError("Campaign not found")
+        return campaign
+
+    def start_campaign(self, campaign_id: int) -> Dict:
+        """
+        Queue a draft or scheduled campaign for delivery, or resume a paused one
+
+        The first start resolves the segment into email_logs in the same transaction
+        as the status change, so a campaign is either fully queued or not started.
+        Resuming never re-resolves: players who joined meanwhile are not added.
+        """
+        now = self.clock()
+        with self.session_factory() as session:
+            if self._transition(session, campaign_id, [CampaignStatus.paused], CampaignStatus.sending):
+                session.commit()
+                return {'campaign_id': campaign_id, 'resumed': True, 'progress': campaign_progress(session, campaign_id)}
+
+            campaign = self._require(session, campaign_id)
+            if not self._transition(session, campaign_id, STARTABLE, CampaignStatus.sending):
+                raise CampaignError(f"Campaign is {campaign.status.value}")
+            queued = self._resolve_recipients(session, campaign, now)
+            total = session.execute(
+                select(func.count()).select_from(EmailLog.__table__).where(EmailLog.__table__.c.campaign_id == campaign_id)
+            ).scalar()
+            session.execute(
+                update(EmailCampaign.__table__).where(EmailCampaign.__table__.c.id == campaign_id)
+                .values(recipient_count=total)
+            )
+            session.commit()
+        logger.info(f"Campaign {campaign_id} queued for {total} recipients ({queued} new)")
+        return {'campaign_id': campaign_id, 'resumed': False, 'queued': queued, 'recipient_count': total}
+
+    def _resolve_recipients(self, session, campaign: EmailCampaign, now: datetime) -> int:
+        """One INSERT ... SELECT over players; rows that already exist are skipped"""
+        players, logs = Player.__table__, EmailLog.__table__
+        recipients = select(
+            literal(campaign.id, Integer), players.c.id, players.c.email, literal(campaign.subject, String),
+            literal(QUEUED, String), literal(0, Integer), literal(now, DateTime(timezone=True)),
+            literal(now, DateTime(timezone=True))
+        ).where(
+            *segment_filters(campaign, now),
+            ~exists().where(logs.c.campaign_id == campaign.id, logs.c.player_id == players.c.id)
+        )
+        result = session.execute(insert(logs).from_select(
+            ['campaign_id', 'player_id', 'email_address', 'subject', 'status', 'retry_count', 'next_attempt_at',
+             'created_at'],
+            recipients
+        ))
+        return result.rowcount
+
+    def pause_campaign(self, campaign_id: int):
+        """Stop claiming a sending campaign; rows already claimed still finish"""
+        with self.session_factory() as session:
+            campaign = self._require(session, campaign_id)
+            if not self._transition(session, campaign_id, [CampaignStatus.sending], CampaignStatus.paused):
+                raise CampaignError(f"Campaign is {campaign.status.value}")
+            session.commit()
+
+    def cancel_campaign(self, campaign_id: int) -> int:
+        """Cancel a campaign that has not finished; returns the number of recipients dropped"""
+        logs = EmailLog.__table__
+        with self.session_factory() as session:
+            campaign = self._require(session, campaign_id)
+            open_statuses = list(STARTABLE) + [CampaignStatus.sending, CampaignStatus.paused]
+            if not self._transition(session, campaign_id, open_statuses, CampaignStatus.cancelled):
+                raise CampaignError(f"Campaign is {campaign.status.value}")
+            dropped = session.execute(
+                update(logs).where(logs.c.campaign_id == campaign_id, logs.c.status == QUEUED).values(status=CANCELLED)
+            ).rowcount
+            session.commit()
+        return dropped
+
+    def start_due_campaigns(self) -> List[int]:
+        campaigns = EmailCampaign.__table__
+        with self.session_factory() as session:
+            due = session.execute(
+                select(campaigns.c.id).where(campaigns.c.status == CampaignStatus.scheduled,
+                                             campaigns.c.scheduled_at <= self.clock())
+            ).scalars().all()
+        started = []
+        for campaign_id in due:
+            try:
+                self.start_campaign(campaign_id)
+                started.append(campaign_id)
+            except CampaignError:
+                pass  # Another worker got there first
+        return started
+
+    def finalize(self) -> List[int]:
+        """Refresh counters of sending campaigns and mark the ones with nothing left pending as sent"""
+        campaigns, logs = EmailCampaign.__table__, EmailLog.__table__
+        now = self.clock()
+        with self.session_factory() as session:
+            sending = session.execute(
+                select(campaigns.c.id).where(campaigns.c.status == CampaignStatus.sending)
+            ).scalars().all()
+            if not sending:
+                return []
+            counts = session.execute(
+                select(logs.c.campaign_id,
+                       func.count().filter(logs.c.status == SENT),
+                       func.count().filter(logs.c.status == BOUNCED))
+                .where(logs.c.campaign_id.in_(sending)).group_by(logs.c.campaign_id)
+            ).all()
+            for campaign_id, sent_count, bounce_count in counts:
+                session.execute(
+                    update(campaigns).where(campaigns.c.id == campaign_id)
+                    .values(sent_count=sent_count, bounce_count=bounce_count)
+                )
+            pending = exists().where(logs.c.campaign_id == campaigns.c.id, logs.c.status.in_(PENDING_STATUSES))
+            done = session.execute(
+                update(campaigns)
+                .where(campaigns.c.id.in_(sending), campaigns.c.status == CampaignStatus.sending, ~pending)
+                .values(status=CampaignStatus.sent, sent_at=now, updated_at=now)
+                .returning(campaigns.c.id)
+            ).scalars().all()
+            session.commit()
+        for campaign_id in done:
+            with self._lock:
+                self._content.pop(campaign_id, None)
+            logger.info(f"Campaign {campaign_id} sent")
+        return list(done)
+
+    # --- Workers ---
+
+    def claim(self, limit: Optional[int] = None) -> List[OutboundEmail]:
+        """
+        Lease up to limit due rows of sending campaigns
+
+        A row still 'sending' when its lease ran out belongs to a worker that died
+        mid-send, so reclaiming it counts as an attempt; one that has used up its
+        attempts that way is failed instead of being sent again.
+        """
+        campaigns, logs = EmailCampaign.__table__, EmailLog.__table__
+        now = self.clock()
+        due = and_(logs.c.status.in_(PENDING_STATUSES), logs.c.next_attempt_at <= now)
+        candidates = (
+            select(logs.c.id)
+            .join(campaigns, campaigns.c.id == logs.c.campaign_id)
+            .where(campaigns.c.status == CampaignStatus.sending, due)
+            .order_by(logs.c.next_attempt_at)
+            .limit(limit or self.batch_size)
+            .with_for_update(skip_locked=True, of=logs)
+        )
+        with self.session_factory() as session:
+            exhausted = session.execute(
+                update(logs)
+                .where(logs.c.status == SENDING, logs.c.next_attempt_at <= now,
+                       logs.c.retry_count + 1 >= self.max_attempts)
+                .values(status=FAILED, retry_count=logs.c.retry_count + 1, next_attempt_at=None,
+                        error_message="Delivery lease expired: worker stopped mid-send")
+            ).rowcount
+            rows = session.execute(
+                update(logs).where(logs.c.id.in_(candidates.scalar_subquery()), due)
+                .values(status=SENDING, next_attempt_at=now + self.lease,
+                        retry_count=logs.c.retry_count + case((logs.c.status == SENDING, 1), else_=0))
+                .returning(logs.c.id, logs.c.campaign_id, logs.c.player_id, logs.c.email_address, logs.c.subject)
+            ).all()
+            session.commit()
+            if exhausted:
+                with self._lock:
+                    self.failed += exhausted
+            if not rows:
+                return []
+            content = self._campaign_content(session, {row.campaign_id for row in rows})
+        return [
+            OutboundEmail(row.id, row.campaign_id, row.player_id, row.email_address, row.subject,
+                          *content[row.campaign_id])
+            for row in rows
+        ]
+
+    def _campaign_content(self, session, campaign_ids) -> Dict[int, tuple]:
+        # Content is frozen once a campaign is sending, so it is cached for the whole send
+        with self._lock:
+            missing = [cid for cid in campaign_ids if cid not in self._content]
+        if missing:
+            campaigns = EmailCampaign.__table__
+            loaded = session.execute(
+                select(campaigns.c.id, campaigns.c.content, campaigns.c.html_content).where(campaigns.c.id.in_(missing))
+            ).all()
+            with self._lock:
+                for campaign_id, text, html in loaded:
+                    self._content[campaign_id] = (text, html)
+        with self._lock:
+            return {cid: self._content[cid] for cid in campaign_ids}
+
+    def _record(self, session, message: OutboundEmail, **values):
+        logs = EmailLog.__table__
+        session.execute(
+            update(logs).where(logs.c.id == message.log_id, logs.c.status == SENDING).values(**values)
+        )
+        session.commit()
+
+    def deliver(self, message: OutboundEmail, session):
+        """Send one claimed message and commit its outcome"""
+        self.bucket.acquire()
+        try:
+            provider_id = self.transport.send(message)
+        except PermanentDeliveryError as e:
+            self._record(session, message, status=BOUNCED, error_message=str(e)[:1000], next_attempt_at=None)
+            with self._lock:
+                self.failed += 1
+            return
+        except Exception as e:
+            attempts = session.execute(
+                select(EmailLog.__table__.c.retry_count).where(EmailLog.__table__.c.id == message.log_id)
+            ).scalar() + 1
+            if attempts >= self.max_attempts:
+                self._record(session, message, status=FAILED, retry_count=attempts, error_message=str(e)[:1000],
+                             next_attempt_at=None)
+                with self._lock:
+                    self.failed += 1
+            else:
+                self._record(session, message, status=QUEUED, retry_count=attempts, error_message=str(e)[:1000],
+                             next_attempt_at=self.clock() + retry_delay(attempts, self.retry_base_seconds))
+                with self._lock:
+                    self.retried += 1
+            return
+        self._record(session, message, status=SENT, sent_at=self.clock(), provider_message_id=provider_id,
+                     error_message=None, next_attempt_at=None)
+        with self._lock:
+            self.sent += 1
+
+    def _release(self, messages: List[OutboundEmail]):
+        """Hand unsent claims back on shutdown instead of waiting out the lease"""
+        if not messages:
+            return
+        logs = EmailLog.__table__
+        with self.session_factory() as session:
+            session.execute(
+                update(logs).where(logs.c.id.in_([m.log_id for m in messages]), logs.c.status == SENDING)
+                .values(status=QUEUED, next_attempt_at=self.clock())
+            )
+            session.commit()
+
+    def work_once(self) -> int:
+        """Claim one batch and deliver it; returns the number of messages handled"""
+        messages = self.claim()
+        with self.session_factory() as session:
+            for i, message in enumerate(messages):
+                if self._stop.is_set() and self.running:
+                    self._release(messages[i:])
+                    return i
+                self.deliver(message, session)
+        return len(messages)
+
+    def drain(self) -> Dict:
+        """Deliver everything due with the worker pool in the calling thread, then finalize"""
+        def worker():
+            while self.work_once():
+                pass
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, self.workers))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return {'finished': self.finalize(), **self.stats()}
+
+    def run_once(self) -> Dict:
+        return {'started': self.start_due_campaigns(), 'finished': self.finalize()}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'sent': self.sent,
+                'retried': self.retried,
+                'failed': self.failed,
+                'workers_running': self.running
+            }
+
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            try:
+                if not self.work_once():
+                    self._stop.wait(self.interval)
+            except Exception as e:
+                logger.error(f"Campaign delivery worker error: {e}")
+                self._stop.wait(self.interval)
+
+    def _scheduler_loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Campaign scheduler error: {e}")
+
+    def start(self):
+        """Start the delivery workers and the scheduler that starts and finalizes campaigns"""
+        if self.running:
+            return
+        self.running = True
+        self._stop.clear()
+        self.worker_threads = [threading.Thread(target=self._scheduler_loop, daemon=True)]
+        self.worker_threads += [threading.Thread(target=self._worker_loop, daemon=True) for _ in range(self.workers)]
+        for thread in self.worker_threads:
+            thread.start()
+        atexit.register(self.stop)
+        logger.info(f"Campaign delivery started ({self.workers} workers, {self.bucket.rate:.0f}/s)")
+
+    def stop(self):
+        if not self.running:
+            return
+        self._stop.set()
+        for thread in self.worker_threads:
+            thread.join(timeout=SMTP_TIMEOUT + 5)
+        self.running = False
+        self.transport.close()
+        logger.info("Campaign delivery stopped")
+
+
+_campaign_delivery: Optional[CampaignDelivery] = None
+_campaign_delivery_lock = threading.Lock()
+
+
+def get_campaign_delivery() -> CampaignDelivery:
+    """Get the process-wide campaign delivery pipeline"""
+    global _campaign_delivery
+    if _campaign_delivery is None:
+        with _campaign_delivery_lock:
+            if _campaign_delivery is None:
+                _campaign_delivery = CampaignDelivery()
+    return _campaign_delivery
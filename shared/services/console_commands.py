@@ -0,0 +1,455 @@
+"""
+Console Commands
+Durable per-console command queue for remote management. Admins queue a command
+for one console, a group, or the whole fleet with one INSERT ... SELECT; consoles
+wait for it in the realtime service, which hears every queued batch over Redis
+pub/sub, then poll for it briefly, get it as a signed envelope, acknowledge it,
+and report the result. Unacknowledged deliveries are redelivered (at least once; the console
+agent drops duplicates by command id), and commands that never report back time out.
+"""
+
+import os
+import json
+import time
+import uuid
+import atexit
+import base64
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding
+from sqlalchemy import and_, func, insert, literal, or_, select, update
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session
+
+from shared.models.base import Console, ConsoleStatus
+from shared.models.console_commands import ConsoleCommand
+from shared.models.game_releases import ConsoleGameInstall
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    redis = None
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Queue configuration
+CONSOLE_COMMAND_SIGNING_KEY_FILE = os.getenv("CONSOLE_COMMAND_SIGNING_KEY_FILE", "")
+ACK_TIMEOUT_SECONDS = int(os.getenv("CONSOLE_COMMAND_ACK_TIMEOUT_SECONDS", "60"))
+DEFAULT_TTL_SECONDS = int(os.getenv("CONSOLE_COMMAND_TTL_SECONDS", "86400"))
+RESULT_GRACE_SECONDS = 60
+# API polls run on sync workers, so they are held at most this long; long waits happen in the realtime service
+LONG_POLL_MAX_SECONDS = float(os.getenv("CONSOLE_COMMAND_LONG_POLL_MAX_SECONDS", "1"))
+# Without the Redis bridge, commands queued by another API worker are found by re-reading this often
+RECHECK_SECONDS = float(os.getenv("CONSOLE_COMMAND_RECHECK_SECONDS", "3"))
+DELIVERY_BATCH_SIZE = 10
+MAX_OUTPUT_CHARS = 64 * 1024
+SWEEP_INTERVAL = float(os.getenv("CONSOLE_COMMAND_SWEEP_INTERVAL", "30"))
+REDIS_URL = os.getenv("CONSOLE_COMMAND_REDIS_URL", os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+REDIS_CHANNEL = "console_commands:queued"
+
+COMMAND_TYPES = {"ping", "reboot", "shutdown", "restart_game", "update_game", "upload_logs", "run_script"}
+
+# console_commands.status values
+PENDING = "pending"
+DELIVERED = "delivered"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+TIMED_OUT = "timed_out"
+EXPIRED = "expired"
+CANCELLED = "cancelled"
+OPEN_STATUSES = (PENDING, DELIVERED, RUNNING)
+
+
+class CommandError(Exception):
+    """Raised when a command cannot be queued"""
+    pass
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def canonical_envelope(command) -> str:
+    """The exact text a console verifies and executes"""
+    return json.dumps({
+        "id": command.id,
+        "batch_id": command.batch_id,
+        "console_id": command.console_id,
+        "type": command.command_type,
+        "payload": command.payload or {},
+        "timeout_seconds": command.timeout_seconds,
+        "expires_at": _as_utc(command.expires_at).isoformat(),
+    }, sort_keys=True, separators=(",", ":"))
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def target_query(target: Dict):
+    """
+    SELECT of the console ids a target names
+
+    target keys (combined with AND): console_ids, device_uids, arena_id,
+    owner_player_id, game_version, status (default active). {"all": true} alone
+    means every active console.
+    """
+    query = select(Console.id)
+    status = target.get("status", ConsoleStatus.active.value)
+    if status:
+        query = query.where(Console.status == ConsoleStatus(status))
+    if target.get("console_ids") is not None:
+        query = query.where(Console.id.in_([int(c) for c in target["console_ids"]]))
+    if target.get("device_uids") is not None:
+        query = query.where(Console.device_uid.in_(target["device_uids"]))
+    if target.get("arena_id") is not None:
+        query = query.where(Console.current_arena_id == int(target["arena_id"]))
+    if target.get("owner_player_id") is not None:
+        query = query.where(Console.owner_player_id == int(target["owner_player_id"]))
+    if target.get("game_version") is not None:
+        query = query.where(Console.id.in_(
+            select(ConsoleGameInstall.console_id).where(ConsoleGameInstall.version == target["game_version"])))
+    narrowed = {"console_ids", "device_uids", "arena_id", "owner_player_id", "game_version"} & set(target)
+    if not narrowed and not target.get("all"):
+        raise CommandError("Target must name consoles, a group, or all")
+    return query
+
+
+class CommandNotifier:
+    """Wakes long-polls when commands are queued; per console, or for everyone on fleet commands"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._fleet = 0
+        self._consoles: Dict[int, int] = {}
+        self._bridge: Optional['RedisCommandBridge'] = None
+
+    @property
+    def bridged(self) -> bool:
+        return self._bridge is not None and self._bridge.connected
+
+    def attach_bridge(self, bridge: 'RedisCommandBridge'):
+        self._bridge = bridge
+
+    def generation(self, console_id: int) -> tuple:
+        with self._condition:
+            return self._fleet, self._consoles.get(console_id, 0)
+
+    def notify(self, console_ids: Optional[Iterable[int]] = None, broadcast: bool = True):
+        """console_ids None wakes every waiter"""
+        console_ids = list(console_ids) if console_ids is not None else None
+        with self._condition:
+            if console_ids is None:
+                self._fleet += 1
+                self._consoles.clear()
+            else:
+                for console_id in console_ids:
+                    self._consoles[console_id] = self._consoles.get(console_id, 0) + 1
+            self._condition.notify_all()
+        if broadcast and self._bridge is not None:
+            self._bridge.publish(console_ids)
+
+    def wait(self, console_id: int, generation: tuple, timeout: float):
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while (self._fleet, self._consoles.get(console_id, 0)) == generation:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                self._condition.wait(remaining)
+
+
+class RedisCommandBridge:
+    """Relays queued-command wakeups over Redis pub/sub, to other API workers and the realtime service"""
+
+    def __init__(self, notifier: CommandNotifier, redis_url: str = REDIS_URL):
+        self.notifier = notifier
+        self.client = redis.from_url(redis_url, decode_responses=True)
+        self.client.ping()
+        self.connected = True
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(REDIS_CHANNEL)
+        self._thread = threading.Thread(target=self._listen, daemon=True)
+        self._thread.start()
+
+    def publish(self, console_ids: Optional[List[int]]):
+        try:
+            self.client.publish(REDIS_CHANNEL, f"{os.getpid()}|{json.dumps(console_ids)}")
+        except Exception as e:
+            self.connected = False
+            logger.warning(f"Console command bridge publish failed: {e}")
+
+    def _listen(self):
+        try:
+            for message in self._pubsub.listen():
+                sender, _, payload = message['data'].partition('|')
+                if sender != str(os.getpid()):
+                    self.notifier.notify(json.loads(payload), broadcast=False)
+        except Exception as e:
+            logger.warning(f"Console command bridge disconnected: {e}")
+        self.connected = False
+
+
+class CommandQueue:
+    """Queue, deliver, and settle console commands"""
+
+    def __init__(self, session_factory=None, notifier: Optional[CommandNotifier] = None,
+                 signing_key_file: str = CONSOLE_COMMAND_SIGNING_KEY_FILE, ack_timeout: int = ACK_TIMEOUT_SECONDS,
+                 recheck_seconds: float = RECHECK_SECONDS, sweep_interval: float = SWEEP_INTERVAL, clock=utcnow):
+        self._session_factory = session_factory
+        self.notifier = notifier or CommandNotifier()
+        self.signing_key_file = signing_key_file
+        self.ack_timeout = timedelta(seconds=ack_timeout)
+        self.recheck_seconds = recheck_seconds
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+        self._signing_key = None
+
+        self.running = False
+        self.worker_thread = None
+        self._stop = threading.Event()
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            from shared.database.connection import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    @property
+    def signing_key(self):
+        if self._signing_key is None:
+            if not self.signing_key_file:
+                raise CommandError("CONSOLE_COMMAND_SIGNING_KEY_FILE is not configured")
+            with open(self.signing_key_file, "rb") as f:
+                self._signing_key = serialization.load_pem_private_key(f.read(), password=None)
+        return self._signing_key
+
+    def sign(self, envelope: str) -> str:
+        """RSA PKCS#1 v1.5 over SHA-256, base64; verified on the console against its pinned public key"""
+        signature = self.signing_key.sign(envelope.encode(), padding.PKCS1v15(), hashes.SHA256())
+        return base64.b64encode(signature).decode()
+
+    def enqueue(self, session: Session, command_type: str, target: Dict, payload: Optional[Dict] = None,
+                timeout_seconds: int = 300, ttl_seconds: int = DEFAULT_TTL_SECONDS, max_attempts: int = 5,
+                admin_id: Optional[int] = None) -> Dict:
+        """
+        Queue one command per targeted console in a single INSERT ... SELECT
+
+        Returns the batch id and the number of consoles it was queued for. The
+        caller commits, then calls notify_batch() to wake the consoles' long-polls.
+        """
+        if command_type not in COMMAND_TYPES:
+            raise CommandError(f"Unknown command type {command_type}")
+        if command_type == "run_script" and not (payload or {}).get("script"):
+            raise CommandError("run_script needs a script")
+        self.signing_key  # Refuse to queue what could never be delivered
+        now = self.clock()
+        batch_id = str(uuid.uuid4())
+        consoles = target_query(target).subquery()
+        commands = ConsoleCommand.__table__
+        inserted = session.execute(
+            insert(commands).from_select(
+                ["console_id", "batch_id", "command_type", "payload", "timeout_seconds", "status", "attempts",
+                 "max_attempts", "expires_at", "created_by_admin_id", "created_at"],
+                select(consoles.c.id, literal(batch_id), literal(command_type), literal(payload or {}, JSONB),
+                       literal(int(timeout_seconds)), literal(PENDING), literal(0), literal(int(max_attempts)),
+                       literal(now + timedelta(seconds=ttl_seconds), commands.c.expires_at.type),
+                       literal(admin_id, commands.c.created_by_admin_id.type),
+                       literal(now, commands.c.created_at.type))
+            ).returning(commands.c.console_id)
+        ).scalars().all()
+        logger.info(f"Queued {command_type} for {len(inserted)} consoles (batch {batch_id})")
+        return {"batch_id": batch_id, "count": len(inserted),
+                "console_ids": inserted if "console_ids" in target or "device_uids" in target else None}
+
+    def notify_batch(self, batch: Dict):
+        self.notifier.notify(batch["console_ids"])
+
+    def deliver(self, console_id: int, limit: int = DELIVERY_BATCH_SIZE) -> List[Dict]:
+        """
+        Claim the console's due commands and return them signed
+
+        Due: pending, or delivered and not acknowledged within the ack timeout.
+        """
+        commands = ConsoleCommand.__table__
+        now = self.clock()
+        due = and_(
+            commands.c.console_id == console_id,
+            commands.c.expires_at > now,
+            commands.c.attempts < commands.c.max_attempts,
+            or_(commands.c.status == PENDING,
+                and_(commands.c.status == DELIVERED, commands.c.lease_expires_at <= now)),
+        )
+        candidates = (select(commands.c.id).where(due).order_by(commands.c.id).limit(limit)
+                      .with_for_update(skip_locked=True))
+        with self.session_factory() as session:
+            rows = session.execute(
+                update(commands).where(commands.c.id.in_(candidates.scalar_subquery()), due)
+                .values(status=DELIVERED, attempts=commands.c.attempts + 1, lease_expires_at=now + self.ack_timeout,
+                        delivered_at=now)
+                .returning(commands.c.id, commands.c.batch_id, commands.c.console_id, commands.c.command_type,
+                           commands.c.payload, commands.c.timeout_seconds, commands.c.expires_at)
+            ).all()
+            session.commit()
+        deliveries = []
+        for row in sorted(rows, key=lambda r: r.id):
+            envelope = canonical_envelope(row)
+            deliveries.append({"id": row.id, "envelope": envelope, "signature": self.sign(envelope)})
+        return deliveries
+
+    def poll(self, console_id: int, wait: float = 0) -> List[Dict]:
+        """deliver(), holding the request up to wait seconds until something is queued"""
+        deadline = time.monotonic() + min(max(wait, 0), LONG_POLL_MAX_SECONDS)
+        while True:
+            generation = self.notifier.generation(console_id)
+            deliveries = self.deliver(console_id)
+            remaining = deadline - time.monotonic()
+            if deliveries or remaining <= 0:
+                return deliveries
+            recheck = remaining if self.notifier.bridged else min(remaining, self.recheck_seconds)
+            self.notifier.wait(console_id, generation, recheck)
+
+    def acknowledge(self, console_id: int, command_id: int) -> Optional[str]:
+        """Console started the command; returns its status, None if it is not this console's"""
+        commands = ConsoleCommand.__table__
+        now = self.clock()
+        with self.session_factory() as session:
+            command = session.execute(
+                select(commands.c.status, commands.c.timeout_seconds)
+                .where(commands.c.id == command_id, commands.c.console_id == console_id)
+            ).first()
+            if command is None:
+                return None
+            if command.status != DELIVERED:
+                return command.status
+            session.execute(
+                update(commands).where(commands.c.id == command_id, commands.c.status == DELIVERED)
+                .values(status=RUNNING, acked_at=now,
+                        deadline_at=now + timedelta(seconds=command.timeout_seconds + RESULT_GRACE_SECONDS))
+            )
+            session.commit()
+        return RUNNING
+
+    def complete(self, console_id: int, command_id: int, success: bool, exit_code: Optional[int] = None,
+                 output: Optional[str] = None, result: Optional[Dict] = None) -> Optional[bool]:
+        """
+        Record the console's result; True if recorded, False for a duplicate report,
+        None if the command is not this console's
+
+        Late results of timed-out commands are still recorded.
+        """
+        commands = ConsoleCommand.__table__
+        now = self.clock()
+        if output and len(output) > MAX_OUTPUT_CHARS:
+            output = output[-MAX_OUTPUT_CHARS:]
+        with self.session_factory() as session:
+            recorded = session.execute(
+                update(commands)
+                .where(commands.c.id == command_id, commands.c.console_id == console_id,
+                       commands.c.status.in_((DELIVERED, RUNNING, TIMED_OUT)))
+                .values(status=SUCCEEDED if success else FAILED, exit_code=exit_code, output=output, result=result,
+                        completed_at=now, acked_at=func.coalesce(commands.c.acked_at, now))
+                .returning(commands.c.id)
+            ).first()
+            if recorded is None:
+                exists = session.execute(select(commands.c.id).where(
+                    commands.c.id == command_id, commands.c.console_id == console_id)).first()
+                return False if exists else None
+            session.commit()
+        return True
+
+    def cancel(self, session: Session, command_id: Optional[int] = None, batch_id: Optional[str] = None) -> int:
+        """Cancel commands no console has started yet"""
+        commands = ConsoleCommand.__table__
+        condition = commands.c.id == command_id if command_id is not None else commands.c.batch_id == batch_id
+        return session.execute(
+            update(commands).where(condition, commands.c.status.in_((PENDING, DELIVERED)))
+            .values(status=CANCELLED, completed_at=self.clock())
+        ).rowcount
+
+    def sweep(self) -> Dict[str, int]:
+        """Settle commands that will never report: undeliverable, expired, or past their result deadline"""
+        commands = ConsoleCommand.__table__
+        now = self.clock()
+        with self.session_factory() as session:
+            counts = {
+                FAILED: session.execute(
+                    update(commands).where(commands.c.status == DELIVERED, commands.c.lease_expires_at <= now,
+                                           commands.c.attempts >= commands.c.max_attempts)
+                    .values(status=FAILED, completed_at=now, output="Not acknowledged by the console")
+                ).rowcount,
+                EXPIRED: session.execute(
+                    update(commands).where(commands.c.status.in_((PENDING, DELIVERED)), commands.c.expires_at <= now)
+                    .values(status=EXPIRED, completed_at=now)
+                ).rowcount,
+                TIMED_OUT: session.execute(
+                    update(commands).where(commands.c.status == RUNNING, commands.c.deadline_at <= now)
+                    .values(status=TIMED_OUT, completed_at=now)
+                ).rowcount,
+            }
+            session.commit()
+        if any(counts.values()):
+            logger.info(f"Console command sweep: {counts}")
+        return counts
+
+    def batch_summary(self, session: Session, batch_id: str) -> Dict[str, int]:
+        rows = session.execute(
+            select(ConsoleCommand.status, func.count()).where(ConsoleCommand.batch_id == batch_id)
+            .group_by(ConsoleCommand.status)
+        ).all()
+        return {status: count for status, count in rows}
+
+    def _worker_loop(self):
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Console command sweeper error: {e}")
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._stop.clear()
+        self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
+        self.worker_thread.start()
+        atexit.register(self.stop)
+        logger.info(f"Console command sweeper started (every {self.sweep_interval:.0f}s)")
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self._stop.set()
+        if self.worker_thread:
+            self.worker_thread.join(timeout=10)
+        logger.info("Console command sweeper stopped")
+
+
+_command_queue: Optional[CommandQueue] = None
+_command_queue_lock = threading.Lock()
+
+
+def get_command_queue() -> CommandQueue:
+    """Get the process-wide command queue, its wakeups bridged over Redis when reachable"""
+    global _command_queue
+    if _command_queue is None:
+        with _command_queue_lock:
+            if _command_queue is None:
+                notifier = CommandNotifier()
+                if REDIS_AVAILABLE and os.getenv("CONSOLE_COMMAND_REDIS_BRIDGE", "true").lower() == "true":
+                    try:
+                        notifier.attach_bridge(RedisCommandBridge(notifier))
+                        logger.info("Console command notifier bridged over Redis pub/sub")
+                    except Exception as e:
+                        logger.warning(f"Redis not available for console command notifier: {e}")
+                _command_queue = CommandQueue(notifier=notifier)
+    return _command_queue
@@ -0,0 +1,251 @@
+"""
+Console login confirmation channel
+In-process notifier that lets kiosk long-polls / SSE streams wake up as soon as a phone
+confirms a QR login, plus a per-token cache of rendered QR images.
+An optional Redis pub/sub bridge fans state changes out to the other API workers.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from io import BytesIO
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    redis = None
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Channel configuration
+REDIS_URL = os.getenv("CONSOLE_LOGIN_REDIS_URL", os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+REDIS_CHANNEL = "console_login:state"
+# Without the Redis bridge another worker may confirm a token behind our back, so cached
+# pending states are re-read from the database after this many seconds
+STATE_TRUST_SECONDS = float(os.getenv("CONSOLE_LOGIN_STATE_TRUST_SECONDS", "30"))
+MAX_TRACKED_TOKENS = int(os.getenv("CONSOLE_LOGIN_MAX_TRACKED_TOKENS", "10000"))
+LONG_POLL_MAX_SECONDS = int(os.getenv("CONSOLE_LOGIN_LONG_POLL_MAX_SECONDS", "25"))
+
+
+@dataclass
+class LoginTokenState:
+    """Cached view of a console_login_tokens row"""
+    token: str
+    status: str
+    expires_at: datetime
+    confirmed_player_id: Optional[int] = None
+    version: int = 0
+    checked_at: float = 0.0
+
+    def is_expired(self) -> bool:
+        return datetime.now(timezone.utc) > self.expires_at
+
+    def to_message(self) -> str:
+        data = asdict(self)
+        data['expires_at'] = self.expires_at.isoformat()
+        data.pop('checked_at')
+        return json.dumps(data)
+
+    @classmethod
+    def from_message(cls, message: str) -> 'LoginTokenState':
+        data = json.loads(message)
+        data['expires_at'] = datetime.fromisoformat(data['expires_at'])
+        return cls(**data)
+
+
+class LoginNotifier:
+    """Token state cache with condition-variable wakeups for waiting pollers"""
+
+    def __init__(self, trust_seconds: float = STATE_TRUST_SECONDS, max_tokens: int = MAX_TRACKED_TOKENS,
+                 clock=time.monotonic):
+        self.trust_seconds = trust_seconds
+        self.max_tokens = max_tokens
+        self._clock = clock
+        self._states: "OrderedDict[str, LoginTokenState]" = OrderedDict()
+        self._condition = threading.Condition()
+        self._bridge: Optional['RedisLoginBridge'] = None
+
+    def attach_bridge(self, bridge: 'RedisLoginBridge'):
+        self._bridge = bridge
+
+    def get(self, token: str) -> Optional[LoginTokenState]:
+        """Cached state, or None when unknown or too old to trust"""
+        with self._condition:
+            state = self._states.get(token)
+            if state is None:
+                return None
+            bridged = self._bridge is not None and self._bridge.connected
+            if not bridged and self._clock() - state.checked_at > self.trust_seconds:
+                return None
+            return state
+
+    def remember(self, state: LoginTokenState) -> LoginTokenState:
+        """Cache a state read from the database, waking waiters only if it changed"""
+        with self._condition:
+            current = self._states.get(state.token)
+            state.checked_at = self._clock()
+            if current is not None and current.status == state.status:
+                state.version = current.version
+            else:
+                state.version = current.version + 1 if current else 0
+                self._condition.notify_all()
+            self._store(state)
+            return state
+
+    def publish(self, state: LoginTokenState, broadcast: bool = True) -> LoginTokenState:
+        """Record a state change and wake every waiter on that token"""
+        with self._condition:
+            current = self._states.get(state.token)
+            if current is not None:
+                state.version = max(state.version, current.version + 1)
+            state.checked_at = self._clock()
+            self._store(state)
+            self._condition.notify_all()
+
+        if broadcast and self._bridge is not None:
+            self._bridge.publish(state)
+        return state
+
+    def wait_for_change(self, token: str, version: int, timeout: float) -> Optional[LoginTokenState]:
+        """Block until the token's version moves past version, or timeout"""
+        deadline = self._clock() + timeout
+        with self._condition:
+            while True:
+                state = self._states.get(token)
+                if state is None or state.version != version:
+                    return state
+                remaining = deadline - self._clock()
+                if remaining <= 0:
+                    return state
+                self._condition.wait(remaining)
+
+    def discard(self, token: str):
+        with self._condition:
+            self._states.pop(token, None)
+
+    def _store(self, state: LoginTokenState):
+        self._states[state.token] = state
+        self._states.move_to_end(state.token)
+        while len(self._states) > self.max_tokens:
+            self._states.popitem(last=False)
+
+
+class RedisLoginBridge:
+    """Relays token state changes between API workers over Redis pub/sub"""
+
+    def __init__(self, notifier: LoginNotifier, redis_url: str = REDIS_URL):
+        self.notifier = notifier
+        self.client = redis.from_url(redis_url, decode_responses=True)
+        self.client.ping()
+        self.connected = True
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(REDIS_CHANNEL)
+        self._thread = threading.Thread(target=self._listen, daemon=True)
+        self._thread.start()
+
+    def publish(self, state: LoginTokenState):
+        try:
+            self.client.publish(REDIS_CHANNEL, f"{os.getpid()}|{state.to_message()}")
+        except Exception as e:
+            self.connected = False
+            logger.warning(f"Console login bridge publish failed: {e}")
+
+    def _listen(self):
+        try:
+            for message in self._pubsub.listen():
+                sender, _, payload = message['data'].partition('|')
+                if sender == str(os.getpid()):
+                    continue
+                self.notifier.publish(LoginTokenState.from_message(payload), broadcast=False)
+        except Exception as e:
+            logger.warning(f"Console login bridge disconnected: {e}")
+        self.connected = False
+
+
+class QRCodeCache:
+    """Rendered QR PNGs kept until their login token expires"""
+
+    def __init__(self, max_entries: int = 1000, renderer: Optional[Callable[[str], bytes]] = None):
+        self.max_entries = max_entries
+        self.renderer = renderer or render_qr_png
+        self._images: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.renders = 0
+
+    def get_png(self, token: str, qr_url: str, expires_at: datetime) -> bytes:
+        with self._lock:
+            entry = self._images.get(token)
+            if entry is not None and entry[0] > datetime.now(timezone.utc):
+                self._images.move_to_end(token)
+                return entry[1]
+
+        png = self.renderer(qr_url)
+        with self._lock:
+            self.renders += 1
+            self._images[token] = (expires_at, png)
+            self._images.move_to_end(token)
+            while len(self._images) > self.max_entries:
+                self._images.popitem(last=False)
+        return png
+
+    def discard(self, token: str):
+        with self._lock:
+            self._images.pop(token, None)
+
+
+def render_qr_png(qr_url: str) -> bytes:
+    """Render a login QR code as PNG bytes"""
+    import qrcode
+
+    qr = qrcode.QRCode(
+        version=1,  # Controls the size of the QR Code
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,  # Size of each box in pixels
+        border=4,  # Border size
+    )
+    qr.add_data(qr_url)
+    qr.make(fit=True)
+
+    img = qr.make_image(fill_color="black", back_color="white")
+    img_buffer = BytesIO()
+    img.save(img_buffer, format='PNG')
+    return img_buffer.getvalue()
+
+
+_notifier: Optional[LoginNotifier] = None
+_qr_cache: Optional[QRCodeCache] = None
+_init_lock = threading.Lock()
+
+
+def get_login_notifier() -> LoginNotifier:
+    """Get the process-wide notifier, bridged over Redis when it is reachable"""
+    global _notifier
+    if _notifier is None:
+        with _init_lock:
+            if _notifier is None:
+                notifier = LoginNotifier()
+                if REDIS_AVAILABLE and os.getenv("CONSOLE_LOGIN_REDIS_BRIDGE", "true").lower() == "true":
+                    try:
+                        notifier.attach_bridge(RedisLoginBridge(notifier))
+                        logger.info("Console login notifier bridged over Redis pub/sub")
+                    except Exception as e:
+                        logger.warning(f"Redis not available for console login notifier: {e}")
+                _notifier = notifier
+    return _notifier
+
+
+def get_qr_code_cache() -> QRCodeCache:
+    global _qr_cache
+    if _qr_cache is None:
+        with _init_lock:
+            if _qr_cache is None:
+                _qr_cache = QRCodeCache()
+    return _qr_cache
@@ -0,0 +1,361 @@
+"""
+Game Releases
+Published game builds are stored by content hash next to a signed manifest that
+lists every release, its files, and a binary delta from the release before it.
+A console reports the version it runs and is given the cheapest chain of deltas
+(or the full build, when that is smaller) to the version its rollout assigns it.
+Rollouts put a new version on a stable, growing percentage of consoles and halt
+automatically when crash reports from consoles on it spike.
+"""
+
+import os
+import json
+import heapq
+import hashlib
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from shared.models.base import AuditLog
+from shared.models.game_releases import ConsoleGameInstall, GameRollout
+from shared.utils import binary_delta
+
+logger = logging.getLogger(__name__)
+
+# Release store configuration
+GAME_RELEASES_DIR = os.getenv("GAME_RELEASES_DIR", "/home/jp/deckport.ai/static/deploy/releases")
+GAME_RELEASE_SIGNING_KEY_FILE = os.getenv("GAME_RELEASE_SIGNING_KEY_FILE", "")
+GAME_RELEASE_PUBLIC_KEY_FILE = os.getenv("GAME_RELEASE_PUBLIC_KEY_FILE", "")
+
+# Rollout health
+MIN_CRASHES_TO_HALT = int(os.getenv("GAME_ROLLOUT_MIN_CRASHES", "3"))
+BASELINE_CRASH_MULTIPLIER = 2.0
+CRASH_REPORT_ACTION = "console.crash_report"
+
+# game_rollouts.status values
+ACTIVE = "active"
+HALTED = "halted"
+COMPLETED = "completed"
+ROLLED_BACK = "rolled_back"
+
+
+class ReleaseError(Exception):
+    """Raised when a release cannot be published or no update path exists"""
+    pass
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _is_sha256(value: str) -> bool:
+    return len(value) == 64 and all(c in "0123456789abcdef" for c in value)
+
+
+def sign_manifest(manifest_bytes: bytes, private_key_pem: bytes) -> bytes:
+    """RSA PKCS#1 v1.5 over SHA-256, same scheme as console device signatures; `openssl dgst -verify` checks it"""
+    key = serialization.load_pem_private_key(private_key_pem, password=None)
+    return key.sign(manifest_bytes, padding.PKCS1v15(), hashes.SHA256())
+
+
+def verify_manifest(manifest_bytes: bytes, signature: bytes, public_key_pem: bytes) -> bool:
+    key = serialization.load_pem_public_key(public_key_pem)
+    try:
+        key.verify(signature, manifest_bytes, padding.PKCS1v15(), hashes.SHA256())
+        return True
+    except InvalidSignature:
+        return False
+
+
+class ReleaseStore:
+    """
+    Content-addressed release directory
+
+    root/artifacts/<sha256>  full builds (tar.gz) and package deltas
+    root/manifest.json       releases and deltas, canonical JSON
+    root/manifest.sig        signature of manifest.json
+    """
+
+    def __init__(self, root: str = GAME_RELEASES_DIR, signing_key_file: str = GAME_RELEASE_SIGNING_KEY_FILE,
+                 public_key_file: str = GAME_RELEASE_PUBLIC_KEY_FILE, clock=utcnow):
+        self.root = root
+        self.signing_key_file = signing_key_file
+        self.public_key_file = public_key_file
+        self.clock = clock
+        self._lock = threading.Lock()
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.root, "manifest.json")
+
+    @property
+    def signature_path(self) -> str:
+        return os.path.join(self.root, "manifest.sig")
+
+    def artifact_path(self, digest: str) -> Optional[str]:
+        """Path of a stored artifact; None for anything that is not a stored sha256"""
+        if not _is_sha256(digest):
+            return None
+        path = os.path.join(self.root, "artifacts", digest)
+        return path if os.path.exists(path) else None
+
+    def manifest(self) -> Dict:
+        try:
+            with open(self.manifest_path, "rb") as f:
+                return json.loads(f.read())
+        except FileNotFoundError:
+            return {"releases": [], "deltas": []}
+
+    def manifest_bytes(self) -> bytes:
+        with open(self.manifest_path, "rb") as f:
+            return f.read()
+
+    def signature(self) -> bytes:
+        with open(self.signature_path, "rb") as f:
+            return f.read()
+
+    def public_key(self) -> Optional[bytes]:
+        if not self.public_key_file or not os.path.exists(self.public_key_file):
+            return None
+        with open(self.public_key_file, "rb") as f:
+            return f.read()
+
+    def release(self, version: str) -> Optional[Dict]:
+        return next((r for r in self.manifest()["releases"] if r["version"] == version), None)
+
+    def latest_version(self) -> Optional[str]:
+        releases = self.manifest()["releases"]
+        return releases[-1]["version"] if releases else None
+
+    def _write_file(self, path: str, data: bytes):
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _store_artifact(self, data: bytes) -> Dict:
+        digest = binary_delta.sha256(data)
+        path = os.path.join(self.root, "artifacts", digest)
+        if not os.path.exists(path):
+            self._write_file(path, data)
+        return {"sha256": digest, "size": len(data)}
+
+    def publish(self, version: str, tarball: bytes, notes: Optional[str] = None) -> Dict:
+        """
+        Store a full build, compute the delta from the latest release, and re-sign the manifest
+
+        Releases are ordered by publish time; deltas link each release to the one before it.
+        """
+        if not self.signing_key_file:
+            raise ReleaseError("GAME_RELEASE_SIGNING_KEY_FILE is not configured")
+        with open(self.signing_key_file, "rb") as f:
+            signing_key = f.read()
+        tree = binary_delta.read_tarball(tarball)
+        if not tree:
+            raise ReleaseError("Build tarball contains no files")
+
+        with self._lock:
+            os.makedirs(os.path.join(self.root, "artifacts"), exist_ok=True)
+            manifest = self.manifest()
+            if any(r["version"] == version for r in manifest["releases"]):
+                raise ReleaseError(f"Version {version} is already published")
+
+            release = {"version": version, **self._store_artifact(tarball),
+                       "files": binary_delta.tree_listing(tree),
+                       "published_at": self.clock().isoformat(), "notes": notes}
+            if manifest["releases"]:
+                previous = manifest["releases"][-1]
+                with open(os.path.join(self.root, "artifacts", previous["sha256"]), "rb") as f:
+                    previous_tree = binary_delta.read_tarball(f.read())
+                delta = binary_delta.make_package_delta(previous_tree, tree)
+                manifest["deltas"].append({"from": previous["version"], "to": version, **self._store_artifact(delta)})
+                logger.info(f"Delta {previous['version']} -> {version}: {len(delta)} bytes "
+                            f"(full build {len(tarball)} bytes)")
+            manifest["releases"].append(release)
+
+            manifest_bytes = json.dumps(manifest, sort_keys=True, separators=(",", ":")).encode()
+            # Signature first: a reader that sees the new manifest with the old signature just retries
+            self._write_file(self.signature_path, sign_manifest(manifest_bytes, signing_key))
+            self._write_file(self.manifest_path, manifest_bytes)
+        return release
+
+    def plan(self, from_version: Optional[str], to_version: str) -> List[Dict]:
+        """
+        Cheapest way from the installed version to the target, in download bytes
+
+        Every release can be reached by its full build from anywhere; deltas are
+        edges between versions. Empty when nothing needs downloading.
+        """
+        manifest = self.manifest()
+        releases = {r["version"]: r for r in manifest["releases"]}
+        if to_version not in releases:
+            raise ReleaseError(f"Version {to_version} is not published")
+        if from_version == to_version:
+            return []
+
+        edges: Dict[str, List[Dict]] = {}
+        for delta in manifest["deltas"]:
+            edges.setdefault(delta["from"], []).append(delta)
+
+        target = releases[to_version]
+        best = {"kind": "full", "version": to_version, "sha256": target["sha256"], "size": target["size"]}
+        if from_version not in releases:
+            return [best]
+
+        # Dijkstra over deltas; the full download bounds every path
+        distances = {from_version: 0}
+        previous: Dict[str, Dict] = {}
+        queue = [(0, from_version)]
+        while queue:
+            cost, version = heapq.heappop(queue)
+            if version == to_version or cost >= best["size"]:
+                break
+            if cost > distances.get(version, float("inf")):
+                continue
+            for delta in edges.get(version, ()):
+                new_cost = cost + delta["size"]
+                if new_cost < distances.get(delta["to"], float("inf")):
+                    distances[delta["to"]] = new_cost
+                    previous[delta["to"]] = delta
+                    heapq.heappush(queue, (new_cost, delta["to"]))
+
+        if distances.get(to_version, float("inf")) >= best["size"]:
+            return [best]
+        steps = []
+        version = to_version
+        while version != from_version:
+            delta = previous[version]
+            steps.append({"kind": "delta", "from": delta["from"], "version": delta["to"],
+                          "sha256": delta["sha256"], "size": delta["size"]})
+            version = delta["from"]
+        return steps[::-1]
+
+
+# Rollouts
+
+def cohort_bucket(version: str, console_id: int) -> float:
+    """Stable position of a console in [0, 100) for a version's rollout"""
+    digest = hashlib.sha256(f"{version}:{console_id}".encode()).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64 * 100
+
+
+def current_rollout(session: Session) -> Optional[GameRollout]:
+    return session.execute(select(GameRollout).order_by(GameRollout.id.desc()).limit(1)).scalar_one_or_none()
+
+
+def target_version(session: Session, console_id: int, reported_version: Optional[str],
+                   latest_version: Optional[str]) -> Optional[str]:
+    """
+    Version a console should run
+
+    Without a rollout every console follows the latest release. Consoles already on
+    a halted version keep it (no churn while the halt is investigated); only a
+    rollback sends them back.
+    """
+    rollout = current_rollout(session)
+    if rollout is None or rollout.status == COMPLETED:
+        return rollout.version if rollout else latest_version
+    fallback = rollout.previous_version or reported_version
+    if rollout.status == ROLLED_BACK:
+        return fallback
+    if reported_version == rollout.version:
+        return rollout.version
+    if rollout.status == ACTIVE and cohort_bucket(rollout.version, console_id) < rollout.percent:
+        return rollout.version
+    return fallback
+
+
+def record_version(session: Session, console_id: int, version: str, now: Optional[datetime] = None):
+    """Note the version a console runs; installed_at moves only when the version changes"""
+    now = now or utcnow()
+    install = session.get(ConsoleGameInstall, console_id)
+    if install is None:
+        session.add(ConsoleGameInstall(console_id=console_id, version=version, installed_at=now, last_check_at=now))
+        return
+    if install.version != version:
+        install.previous_version = install.version
+        install.version = version
+        install.installed_at = now
+    install.last_check_at = now
+
+
+def _crash_rate(session: Session, version: str, since: Optional[datetime]) -> Dict:
+    installs = select(ConsoleGameInstall.console_id, ConsoleGameInstall.installed_at).where(
+        ConsoleGameInstall.version == version).subquery()
+    consoles = session.execute(select(func.count()).select_from(installs)).scalar_one()
+    # Crashes count from when the console moved to the version (or the rollout start, if later)
+    crash_window = AuditLog.created_at >= installs.c.installed_at
+    if since is not None:
+        crash_window = crash_window & (AuditLog.created_at >= since)
+    crashes = session.execute(
+        select(func.count(AuditLog.id))
+        .join(installs, AuditLog.actor_id == installs.c.console_id)
+        .where(AuditLog.actor_type == "console", AuditLog.action == CRASH_REPORT_ACTION, crash_window)
+    ).scalar_one()
+    return {"consoles": consoles, "crashes": crashes, "rate": crashes / consoles if consoles else 0.0}
+
+
+def rollout_health(session: Session, rollout: GameRollout) -> Dict:
+    new = _crash_rate(session, rollout.version, None)
+    baseline = (_crash_rate(session, rollout.previous_version, rollout.started_at)
+                if rollout.previous_version else {"consoles": 0, "crashes": 0, "rate": 0.0})
+    limit = max(rollout.crash_rate_threshold, baseline["rate"] * BASELINE_CRASH_MULTIPLIER)
+    return {"version": new, "baseline": baseline, "crash_rate_limit": limit,
+            "unhealthy": (new["consoles"] >= rollout.min_consoles and new["crashes"] >= MIN_CRASHES_TO_HALT
+                          and new["rate"] > limit)}
+
+
+def set_status(session: Session, rollout_id: int, status: str, reason: Optional[str] = None,
+               now: Optional[datetime] = None, from_statuses=(ACTIVE, HALTED, COMPLETED)) -> bool:
+    """Conditional status change so concurrent halts and admin actions apply once"""
+    now = now or utcnow()
+    values = {"status": status, "updated_at": now}
+    if status == HALTED:
+        values.update(halted_at=now, halt_reason=reason)
+    rollouts = GameRollout.__table__
+    changed = session.execute(
+        update(rollouts)
+        .where(rollouts.c.id == rollout_id, rollouts.c.status.in_(from_statuses))
+        .values(**values)
+        .returning(rollouts.c.id)
+    ).first()
+    return changed is not None
+
+
+def check_rollout_health(session: Session, now: Optional[datetime] = None) -> Optional[Dict]:
+    """Halt the active rollout if consoles on its version crash well above the baseline"""
+    rollout = current_rollout(session)
+    if rollout is None or rollout.status != ACTIVE:
+        return None
+    health = rollout_health(session, rollout)
+    if health["unhealthy"]:
+        new = health["version"]
+        reason = (f"{new['crashes']} crashes on {new['consoles']} consoles ({new['rate']:.1%}), "
+                  f"limit {health['crash_rate_limit']:.1%}")
+        if set_status(session, rollout.id, HALTED, reason, now, from_statuses=(ACTIVE,)):
+            logger.critical(f"Game rollout {rollout.id} ({rollout.version}) halted: {reason}")
+            health["halted"] = True
+    return health
+
+
+_release_store: Optional[ReleaseStore] = None
+_release_store_lock = threading.Lock()
+
+
+def get_release_store() -> ReleaseStore:
+    """Get the process-wide release store"""
+    global _release_store
+    if _release_store is None:
+        with _release_store_lock:
+            if _release_store is None:
+                _release_store = ReleaseStore()
+    return _release_store
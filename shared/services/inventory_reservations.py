@@ -0,0 +1,290 @@
+"""
+Inventory Reservations
+Checkout takes stock with one conditional decrement per product and records a
+time-boxed reservation for it, instead of holding row locks on the products
+while payment is confirmed. Paying converts the reservation into the order's
+stock; a failed payment or an expired checkout gives the stock back.
+"""
+
+import os
+import atexit
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from shared.models.shop import ShopInventoryLog, ShopInventoryReservation, ShopProduct
+
+logger = logging.getLogger(__name__)
+
+# Reservation configuration
+RESERVATION_TTL_SECONDS = int(os.getenv("SHOP_RESERVATION_TTL_SECONDS", "900"))
+SWEEP_INTERVAL = float(os.getenv("SHOP_RESERVATION_SWEEP_INTERVAL", "30"))
+SWEEP_BATCH_SIZE = 500
+
+# shop_inventory_reservations.status values
+ACTIVE = "active"
+CONVERTED = "converted"
+RELEASED = "released"
+EXPIRED = "expired"
+
+
+class ReservationError(Exception):
+    """Raised when stock cannot be reserved or converted"""
+    pass
+
+
+class OutOfStock(ReservationError):
+    def __init__(self, product_id: int, requested: int):
+        super().__init__(f"Insufficient stock for product {product_id}")
+        self.product_id = product_id
+        self.requested = requested
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def reservation_expiry(now: Optional[datetime] = None) -> datetime:
+    return (now or utcnow()) + timedelta(seconds=RESERVATION_TTL_SECONDS)
+
+
+def _merge(items) -> List[Tuple[int, int]]:
+    """(product_id, quantity) pairs summed per product, in product id order so carts lock in the same order"""
+    merged = defaultdict(int)
+    for product_id, quantity in (items.items() if isinstance(items, dict) else items):
+        if quantity <= 0:
+            raise ReservationError(f"Invalid quantity for product {product_id}")
+        merged[product_id] += quantity
+    return sorted(merged.items())
+
+
+def _take(session: Session, product_id: int, quantity: int, now: datetime) -> bool:
+    """
+    Decrement available stock if there is enough; returns False for products without tracked stock
+
+    The row is locked only by this UPDATE until the caller commits.
+    """
+    products = ShopProduct.__table__
+    taken = session.execute(
+        update(products)
+        .where(products.c.id == product_id, products.c.track_inventory.is_(True),
+               products.c.stock_quantity.isnot(None), products.c.stock_quantity >= quantity)
+        .values(stock_quantity=products.c.stock_quantity - quantity, updated_at=now)
+        .returning(products.c.id)
+    ).first()
+    if taken:
+        return True
+    product = session.execute(
+        select(products.c.track_inventory, products.c.stock_quantity).where(products.c.id == product_id)
+    ).first()
+    if product is None:
+        raise ReservationError(f"Product {product_id} not found")
+    if product.track_inventory and product.stock_quantity is not None:
+        raise OutOfStock(product_id, quantity)
+    return False
+
+
+def reserve(session: Session, checkout_session_id: str, items, expires_at: Optional[datetime] = None,
+            now: Optional[datetime] = None) -> int:
+    """
+    Reserve stock for every item of a checkout; all or nothing
+
+    Runs in the caller's transaction and does not commit; on OutOfStock the caller
+    rolls back and nothing stays taken. Returns the number of units reserved.
+    """
+    now = now or utcnow()
+    expires_at = expires_at or reservation_expiry(now)
+    rows = []
+    for product_id, quantity in _merge(items):
+        if _take(session, product_id, quantity, now):
+            rows.append({'product_id': product_id, 'checkout_session_id': checkout_session_id, 'quantity': quantity,
+                         'status': ACTIVE, 'expires_at': expires_at, 'created_at': now, 'updated_at': now})
+    if rows:
+        session.execute(insert(ShopInventoryReservation), rows)
+        _log(session, {row['product_id']: -row['quantity'] for row in rows}, "reservation",
+             f"Reserved for checkout {checkout_session_id}", "checkout_session", None, now)
+    return sum(row['quantity'] for row in rows)
+
+
+def _log(session: Session, changes: Dict[int, int], change_type: str, reason: str, reference_type: str,
+         reference_id: Optional[int], now: datetime):
+    """
+    One inventory log row per product, after its stock has already moved by change
+
+    Every movement of stock_quantity is logged where it happens: a reservation
+    takes stock, a release gives it back. A sale is logged with a change of 0
+    since its units already left stock when they were reserved.
+    """
+    products = ShopProduct.__table__
+    stock = dict(session.execute(
+        select(products.c.id, products.c.stock_quantity).where(products.c.id.in_(list(changes)))
+    ).all())
+    session.add_all([
+        ShopInventoryLog(product_id=product_id, change_type=change_type, quantity_before=stock[product_id] - change,
+                         quantity_change=change, quantity_after=stock[product_id], reference_type=reference_type,
+                         reference_id=reference_id, reason=reason, changed_by="checkout", created_at=now)
+        for product_id, change in changes.items()
+    ])
+
+
+def release(session: Session, checkout_session_id: str, reason: str, status: str = RELEASED,
+            now: Optional[datetime] = None) -> int:
+    """
+    Give a checkout's active reservations back to stock; returns the units released
+
+    The status change is the claim, so concurrent releases and conversions of the
+    same checkout return each unit at most once.
+    """
+    now = now or utcnow()
+    reservations, products = ShopInventoryReservation.__table__, ShopProduct.__table__
+    released = session.execute(
+        update(reservations)
+        .where(reservations.c.checkout_session_id == checkout_session_id, reservations.c.status == ACTIVE)
+        .values(status=status, updated_at=now)
+        .returning(reservations.c.product_id, reservations.c.quantity)
+    ).all()
+    changes = defaultdict(int)
+    for product_id, quantity in released:
+        changes[product_id] += quantity
+    for product_id, quantity in sorted(changes.items()):
+        session.execute(
+            update(products).where(products.c.id == product_id)
+            .values(stock_quantity=products.c.stock_quantity + quantity, updated_at=now)
+        )
+    if changes:
+        _log(session, dict(changes), "release", reason, "checkout_session", None, now)
+    return sum(changes.values())
+
+
+def convert(session: Session, checkout_session_id: str, order_id: int, items, now: Optional[datetime] = None) -> int:
+    """
+    Turn a paid checkout's reservations into the order's stock
+
+    A reservation that expired or was released before the payment came through is
+    taken again if the stock is still there; otherwise OutOfStock is raised and the
+    caller rolls back. Units already converted for the order count as sold, so a
+    replayed confirmation takes nothing. Returns the number of units newly sold.
+    """
+    now = now or utcnow()
+    reservations = ShopInventoryReservation.__table__
+    done = defaultdict(int)
+    for product_id, quantity in session.execute(
+        select(reservations.c.product_id, reservations.c.quantity)
+        .where(reservations.c.checkout_session_id == checkout_session_id, reservations.c.order_id == order_id,
+               reservations.c.status == CONVERTED)
+    ):
+        done[product_id] += quantity
+    converted = session.execute(
+        update(reservations)
+        .where(reservations.c.checkout_session_id == checkout_session_id, reservations.c.status == ACTIVE)
+        .values(status=CONVERTED, order_id=order_id, updated_at=now)
+        .returning(reservations.c.product_id, reservations.c.quantity)
+    ).all()
+    held = defaultdict(int)
+    for product_id, quantity in converted:
+        held[product_id] += quantity
+
+    retaken = {}
+    for product_id, quantity in _merge(items):
+        missing = quantity - done[product_id] - held[product_id]
+        if missing > 0 and _take(session, product_id, missing, now):
+            session.execute(insert(ShopInventoryReservation).values(
+                product_id=product_id, checkout_session_id=checkout_session_id, order_id=order_id,
+                quantity=missing, status=CONVERTED, expires_at=now, created_at=now, updated_at=now
+            ))
+            held[product_id] += missing
+            retaken[product_id] = -missing
+    if retaken:
+        _log(session, retaken, "reservation", f"Reserved again for order {order_id}", "order", order_id, now)
+    sold = {product_id: quantity for product_id, quantity in held.items() if quantity}
+    if sold:
+        # The units left stock when they were reserved; the order holds the quantities sold
+        _log(session, dict.fromkeys(sold, 0), "sale", f"Sold in order {order_id}", "order", order_id, now)
+    return sum(sold.values())
+
+
+class ReservationSweeper:
+    """Releases reservations of checkouts that were abandoned past their expiry"""
+
+    def __init__(self, session_factory=None, interval: float = SWEEP_INTERVAL, batch_size: int = SWEEP_BATCH_SIZE,
+                 clock=utcnow):
+        self._session_factory = session_factory
+        self.interval = interval
+        self.batch_size = batch_size
+        self.clock = clock
+        self.expired = 0
+
+        self.running = False
+        self.worker_thread = None
+        self._stop = threading.Event()
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            from shared.database.connection import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    def run_once(self) -> int:
+        """Expire one batch of overdue checkouts; returns the units given back"""
+        reservations = ShopInventoryReservation.__table__
+        now = self.clock()
+        units = 0
+        with self.session_factory() as session:
+            overdue = session.execute(
+                select(reservations.c.checkout_session_id)
+                .where(reservations.c.status == ACTIVE, reservations.c.expires_at <= now)
+                .distinct().limit(self.batch_size)
+            ).scalars().all()
+            for checkout_session_id in overdue:
+                units += release(session, checkout_session_id, "Checkout reservation expired", status=EXPIRED, now=now)
+            session.commit()
+        self.expired += len(overdue)
+        if units:
+            logger.info(f"Released {units} reserved units from {len(overdue)} expired checkouts")
+        return units
+
+    def _worker_loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Reservation sweeper error: {e}")
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._stop.clear()
+        self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
+        self.worker_thread.start()
+        atexit.register(self.stop)
+        logger.info(f"Reservation sweeper started (every {self.interval:.0f}s)")
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self._stop.set()
+        if self.worker_thread:
+            self.worker_thread.join(timeout=10)
+        logger.info("Reservation sweeper stopped")
+
+
+_reservation_sweeper: Optional[ReservationSweeper] = None
+_reservation_sweeper_lock = threading.Lock()
+
+
+def get_reservation_sweeper() -> ReservationSweeper:
+    """Get the process-wide reservation sweeper"""
+    global _reservation_sweeper
+    if _reservation_sweeper is None:
+        with _reservation_sweeper_lock:
+            if _reservation_sweeper is None:
+                _reservation_sweeper = ReservationSweeper()
+    return _reservation_sweeper
@@ -0,0 +1,545 @@
+"""
+Leaderboards
+Global, regional and venue rankings per rating season, held in memory.
+Each board is an order-statistics structure: ratings fall into fixed-width
+buckets counted by a Fenwick tree, and every bucket keeps its players sorted
+in flat arrays, so rank of a player, the entry at a rank, top-N and the window
+around a player cost O(log n) rather than an ORDER BY over every player.
+
+The rating processor is the only writer. A process builds its boards from
+player_ratings and season_venue_players, which are the persisted leaderboard,
+and then follows rating_history by id to apply every later rating change.
+"""
+
+import os
+import math
+import atexit
+import logging
+import threading
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass, field
+from operator import itemgetter
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from shared.models.base import Match, Player
+from shared.models.ratings import PlayerRating, RatingHistory, RatingSeason, SeasonVenuePlayer
+from shared.services.ratings import season_at
+
+logger = logging.getLogger(__name__)
+
+# Leaderboard configuration
+MIN_RATING = float(os.getenv("LEADERBOARD_MIN_RATING", "0"))
+MAX_RATING = float(os.getenv("LEADERBOARD_MAX_RATING", "4000"))
+BUCKET_WIDTH = float(os.getenv("LEADERBOARD_BUCKET_WIDTH", "1"))
+REFRESH_INTERVAL = float(os.getenv("LEADERBOARD_REFRESH_INTERVAL", "2"))
+REFRESH_BATCH = 5000
+
+GLOBAL = "global"
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    return value.replace(tzinfo=timezone.utc) if value is not None and value.tzinfo is None else value
+
+
+def normalize_region(region: Optional[str]) -> Optional[str]:
+    region = (region or "").strip().lower()
+    return region or None
+
+
+def region_scope(region: str) -> str:
+    return f"region:{normalize_region(region)}"
+
+
+def venue_scope(console_id: int) -> str:
+    return f"venue:{console_id}"
+
+
+# === ORDER STATISTICS ===
+
+class Leaderboard:
+    """
+    Players ordered by rating, highest first, ties broken by player id
+
+    Ratings outside [min_rating, max_rating) share the edge buckets and are
+    still ordered exactly; the range only bounds the Fenwick tree.
+    """
+
+    def __init__(self, min_rating: float = MIN_RATING, max_rating: float = MAX_RATING,
+                 bucket_width: float = BUCKET_WIDTH):
+        self.max_rating = max_rating
+        self.bucket_width = bucket_width
+        self.size = max(1, math.ceil((max_rating - min_rating) / bucket_width))
+        self._tree = [0] * (self.size + 1)
+        self._top_bit = 1 << (self.size.bit_length() - 1)
+        # bucket -> (negated ratings, player ids), both in board order
+        self._buckets: Dict[int, Tuple[array, array]] = {}
+        self._occupied = array('l')  # Non-empty buckets in order, for walking a page
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _bucket(self, rating: float) -> int:
+        index = math.floor((self.max_rating - rating) / self.bucket_width)
+        return 0 if index < 0 else self.size - 1 if index >= self.size else index
+
+    def _adjust(self, bucket: int, delta: int):
+        tree, size = self._tree, self.size
+        index = bucket + 1
+        while index <= size:
+            tree[index] += delta
+            index += index & -index
+
+    def _before(self, bucket: int) -> int:
+        """Players in the buckets ahead of this one"""
+        total = 0
+        while bucket > 0:
+            total += self._tree[bucket]
+            bucket -= bucket & -bucket
+        return total
+
+    def _select(self, rank: int) -> Tuple[int, int]:
+        """The bucket holding the player at a 0-based rank, and the player's offset in it"""
+        position, step = 0, self._top_bit
+        while step:
+            following = position + step
+            if following <= self.size and self._tree[following] <= rank:
+                position = following
+                rank -= self._tree[following]
+            step >>= 1
+        return position, rank
+
+    def _locate(self, bucket: Tuple[array, array], player_id: int, rating: float) -> int:
+        ratings, players = bucket
+        low = bisect_left(ratings, -rating)
+        high = bisect_right(ratings, -rating, low)
+        return bisect_left(players, player_id, low, high)
+
+    def _insert(self, index: int, player_id: int, rating: float):
+        bucket = self._buckets.get(index)
+        if bucket is None:
+            bucket = self._buckets[index] = (array('d'), array('q'))
+            insort(self._occupied, index)
+        position = self._locate(bucket, player_id, rating)
+        bucket[0].insert(position, -rating)
+        bucket[1].insert(position, player_id)
+
+    def _delete(self, index: int, player_id: int, rating: float) -> bool:
+        bucket = self._buckets.get(index)
+        if bucket is None:
+            return False
+        position = self._locate(bucket, player_id, rating)
+        if position == len(bucket[1]) or bucket[1][position] != player_id or bucket[0][position] != -rating:
+            return False
+        del bucket[0][position]
+        del bucket[1][position]
+        if not bucket[1]:
+            del self._buckets[index]
+            del self._occupied[bisect_left(self._occupied, index)]
+        return True
+
+    def add(self, player_id: int, rating: float):
+        index = self._bucket(rating)
+        self._insert(index, player_id, rating)
+        self._adjust(index, 1)
+        self._count += 1
+
+    def remove(self, player_id: int, rating: float) -> bool:
+        index = self._bucket(rating)
+        if not self._delete(index, player_id, rating):
+            return False
+        self._adjust(index, -1)
+        self._count -= 1
+        return True
+
+    def move(self, player_id: int, old_rating: float, new_rating: float):
+        old_index, new_index = self._bucket(old_rating), self._bucket(new_rating)
+        if not self._delete(old_index, player_id, old_rating):
+            return
+        self._insert(new_index, player_id, new_rating)
+        if old_index != new_index:
+            self._adjust(old_index, -1)
+            self._adjust(new_index, 1)
+
+    def rank(self, player_id: int, rating: float) -> Optional[int]:
+        """0-based rank of a player at the given rating, or None when not on the board"""
+        index = self._bucket(rating)
+        bucket = self._buckets.get(index)
+        if bucket is None:
+            return None
+        position = self._locate(bucket, player_id, rating)
+        if position == len(bucket[1]) or bucket[1][position] != player_id or bucket[0][position] != -rating:
+            return None
+        return self._before(index) + position
+
+    def entries(self, start: int, count: int) -> List[Tuple[int, float]]:
+        """(player_id, rating) from a 0-based rank on"""
+        result: List[Tuple[int, float]] = []
+        start = max(start, 0)
+        if start >= self._count or count <= 0:
+            return result
+        index, offset = self._select(start)
+        occupied = self._occupied
+        for position in range(bisect_left(occupied, index), len(occupied)):
+            ratings, players = self._buckets[occupied[position]]
+            stop = min(len(players), offset + count - len(result))
+            result.extend(zip(players[offset:stop], [-rating for rating in ratings[offset:stop]]))
+            if len(result) >= count:
+                break
+            offset = 0
+        return result
+
+    def load(self, ratings: Iterable[Tuple[int, float]]):
+        """Fill an empty board in one pass"""
+        entries = sorted(ratings, key=itemgetter(0))
+        entries.sort(key=itemgetter(1), reverse=True)  # Stable: ties stay in player order
+        for player_id, rating in entries:
+            index = self._bucket(rating)
+            bucket = self._buckets.get(index)
+            if bucket is None:
+                bucket = self._buckets[index] = (array('d'), array('q'))
+            bucket[0].append(-rating)
+            bucket[1].append(player_id)
+        self._occupied = array('l', sorted(self._buckets))
+        # Fenwick tree from the bucket sizes: one linear pass, or point updates for a sparse board
+        tree = self._tree = [0] * (self.size + 1)
+        if len(self._buckets) * self.size.bit_length() < self.size:
+            for index, (_, players) in self._buckets.items():
+                self._adjust(index, len(players))
+        else:
+            for index, (_, players) in self._buckets.items():
+                tree[index + 1] = len(players)
+            for index in range(1, self.size + 1):
+                parent = index + (index & -index)
+                if parent <= self.size:
+                    tree[parent] += tree[index]
+        self._count = sum(len(players) for _, players in self._buckets.values())
+
+
+# === SEASON BOARDS ===
+
+@dataclass
+class SeasonBoards:
+    """Every board of one season, sharing the season's ratings"""
+    season_id: int
+    recomputed_at: Optional[datetime]
+    ratings: Dict[int, float] = field(default_factory=dict)
+    regions: Dict[int, str] = field(default_factory=dict)
+    venues: Dict[int, Tuple[int, ...]] = field(default_factory=dict)  # player -> consoles
+    boards: Dict[str, Leaderboard] = field(default_factory=dict)
+    # The same boards keyed for applying changes without building scope names
+    region_boards: Dict[str, Leaderboard] = field(default_factory=dict)
+    venue_boards: Dict[int, Leaderboard] = field(default_factory=dict)
+
+    def region_board(self, region: str) -> Leaderboard:
+        board = self.region_boards.get(region)
+        if board is None:
+            board = self.region_boards[region] = self.boards[region_scope(region)] = Leaderboard()
+        return board
+
+    def venue_board(self, console_id: int) -> Leaderboard:
+        board = self.venue_boards.get(console_id)
+        if board is None:
+            board = self.venue_boards[console_id] = self.boards[venue_scope(console_id)] = Leaderboard()
+        return board
+
+    @property
+    def global_board(self) -> Leaderboard:
+        board = self.boards.get(GLOBAL)
+        if board is None:
+            board = self.boards[GLOBAL] = Leaderboard()
+        return board
+
+    def scopes(self, player_id: int) -> List[str]:
+        scopes = [GLOBAL]
+        if player_id in self.regions:
+            scopes.append(region_scope(self.regions[player_id]))
+        scopes.extend(venue_scope(console_id) for console_id in sorted(self.venues.get(player_id, ())))
+        return scopes
+
+    def apply(self, player_id: int, rating: float, region: Optional[str], console_id: Optional[int]):
+        """Move a player to a new rating on every board they are on, joining the match's venue"""
+        old = self.ratings.get(player_id)
+        old_region = self.regions.get(player_id)
+        venues = self.venues.get(player_id, ())
+        if old is None:
+            self.global_board.add(player_id, rating)
+        else:
+            self.global_board.move(player_id, old, rating)
+            for venue in venues:
+                self.venue_boards[venue].move(player_id, old, rating)
+
+        if old_region is not None and old_region != region:
+            self.region_boards[old_region].remove(player_id, old)
+            del self.regions[player_id]
+        if region is not None:
+            if old_region == region:
+                self.region_boards[region].move(player_id, old, rating)
+            else:
+                self.region_board(region).add(player_id, rating)
+                self.regions[player_id] = region
+
+        if console_id is not None and console_id not in venues:
+            self.venue_board(console_id).add(player_id, rating)
+            self.venues[player_id] = venues + (console_id,)
+        self.ratings[player_id] = rating
+
+
+# === SERVICE ===
+
+class LeaderboardService:
+    """
+    Answers leaderboard queries from memory and follows rating changes
+
+    The current season is loaded up front and past seasons on first use. A
+    season that was recomputed since it was loaded is rebuilt on the next
+    refresh.
+    """
+
+    def __init__(self, session_factory=None, interval: float = REFRESH_INTERVAL, clock=utcnow):
+        self._session_factory = session_factory
+        self.interval = interval
+        self.clock = clock
+
+        self._lock = threading.RLock()
+        self._seasons: List[Tuple[datetime, int]] = []
+        self._recomputed: Dict[int, Optional[datetime]] = {}
+        self._boards: Dict[int, SeasonBoards] = {}
+        self._cursor: Optional[int] = None  # Last rating_history id applied
+        self.changes_applied = 0
+
+        self.running = False
+        self.worker_thread = None
+        self._stop = threading.Event()
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            from shared.database.connection import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    # --- Loading ---
+
+    def _load_seasons(self, session):
+        rows = session.execute(
+            select(RatingSeason.id, RatingSeason.starts_at, RatingSeason.recomputed_at).order_by(RatingSeason.starts_at)
+        ).all()
+        self._seasons = [(_as_utc(starts_at), season_id) for season_id, starts_at, _ in rows]
+        self._recomputed = {season_id: _as_utc(recomputed_at) for season_id, _, recomputed_at in rows}
+
+    def _load_season(self, session, season_id: int) -> SeasonBoards:
+        season = SeasonBoards(season_id, self._recomputed.get(season_id))
+        rows = session.execute(
+            select(PlayerRating.player_id, PlayerRating.rating, Player.region)
+            .join(Player, Player.id == PlayerRating.player_id)
+            .where(PlayerRating.season_id == season_id)
+        ).all()
+
+        by_region: Dict[str, List[Tuple[int, float]]] = {}
+        for player_id, rating, region in rows:
+            season.ratings[player_id] = rating
+            region = normalize_region(region)
+            if region is not None:
+                season.regions[player_id] = region
+                by_region.setdefault(region, []).append((player_id, rating))
+        season.global_board.load(season.ratings.items())
+        for region, entries in by_region.items():
+            season.region_board(region).load(entries)
+
+        by_venue: Dict[int, List[Tuple[int, float]]] = {}
+        for console_id, player_id in session.execute(
+            select(SeasonVenuePlayer.console_id, SeasonVenuePlayer.player_id)
+            .where(SeasonVenuePlayer.season_id == season_id)
+        ):
+            if player_id in season.ratings:
+                season.venues[player_id] = season.venues.get(player_id, ()) + (console_id,)
+                by_venue.setdefault(console_id, []).append((player_id, season.ratings[player_id]))
+        for console_id, entries in by_venue.items():
+            season.venue_board(console_id).load(entries)
+
+        logger.info(f"Loaded leaderboards of season {season_id}: {len(season.ratings)} players, "
+                    f"{len(season.boards)} boards")
+        return season
+
+    def load(self):
+        """Rebuild every board from the database"""
+        with self._lock, self.session_factory() as session:
+            # The cursor is read first: changes after it are applied again, which is harmless
+            self._cursor = session.execute(select(func.coalesce(func.max(RatingHistory.id), 0))).scalar()
+            self._load_seasons(session)
+            self._boards = {}
+            current = season_at(self._seasons, self.clock())
+            if current is not None:
+                self._boards[current] = self._load_season(session, current)
+
+    def _ensure_loaded(self):
+        if self._cursor is None:
+            self.load()
+
+    def _season(self, season_id: Optional[int]) -> Optional[SeasonBoards]:
+        self._ensure_loaded()
+        if season_id is None:
+            season_id = season_at(self._seasons, self.clock())
+        if season_id is None or season_id not in self._recomputed:
+            return None
+        season = self._boards.get(season_id)
+        if season is None:
+            with self.session_factory() as session:
+                season = self._boards[season_id] = self._load_season(session, season_id)
+        return season
+
+    # --- Following rating changes ---
+
+    def refresh(self) -> int:
+        """Apply rating changes made since the last refresh; returns how many were applied"""
+        with self._lock:
+            if self._cursor is None:
+                self.load()
+                return 0
+            applied = 0
+            with self.session_factory() as session:
+                self._load_seasons(session)
+                for season_id, season in list(self._boards.items()):
+                    if season_id not in self._recomputed:
+                        del self._boards[season_id]
+                    elif self._recomputed[season_id] != season.recomputed_at:
+                        self._boards[season_id] = self._load_season(session, season_id)
+                current = season_at(self._seasons, self.clock())
+                if current is not None and current not in self._boards:
+                    self._boards[current] = self._load_season(session, current)
+
+                while True:
+                    rows = session.execute(
+                        select(RatingHistory.id, RatingHistory.season_id, RatingHistory.player_id,
+                               RatingHistory.rating_after, Match.console_id, Player.region)
+                        .join(Match, Match.id == RatingHistory.match_id)
+                        .join(Player, Player.id == RatingHistory.player_id)
+                        .where(RatingHistory.id > self._cursor)
+                        .order_by(RatingHistory.id)
+                        .limit(REFRESH_BATCH)
+                    ).all()
+                    for _, season_id, player_id, rating, console_id, region in rows:
+                        season = self._boards.get(season_id)
+                        if season is not None:  # Seasons not in memory load fresh when asked for
+                            season.apply(player_id, rating, normalize_region(region), console_id)
+                    if rows:
+                        self._cursor = rows[-1].id
+                        applied += len(rows)
+                    if len(rows) < REFRESH_BATCH:
+                        break
+            self.changes_applied += applied
+            return applied
+
+    # --- Queries ---
+
+    def _entry(self, rank: int, player_id: int, rating: float) -> Dict:
+        return {'rank': rank + 1, 'player_id': player_id, 'rating': round(rating)}
+
+    def top(self, scope: str = GLOBAL, limit: int = 10, offset: int = 0, season_id: Optional[int] = None) -> Dict:
+        """A page of a board from a 0-based offset"""
+        with self._lock:
+            season = self._season(season_id)
+            board = season.boards.get(scope) if season else None
+            entries = board.entries(offset, limit) if board else []
+            return {
+                'season_id': season.season_id if season else None,
+                'scope': scope,
+                'total': len(board) if board else 0,
+                'entries': [self._entry(offset + i, player_id, rating)
+                            for i, (player_id, rating) in enumerate(entries)]
+            }
+
+    def rank(self, player_id: int, scope: str = GLOBAL, season_id: Optional[int] = None) -> Optional[Dict]:
+        """A player's place on a board, or None when they are not on it"""
+        with self._lock:
+            season = self._season(season_id)
+            board = season.boards.get(scope) if season else None
+            rating = season.ratings.get(player_id) if season else None
+            if board is None or rating is None:
+                return None
+            rank = board.rank(player_id, rating)
+            if rank is None:
+                return None
+            return {**self._entry(rank, player_id, rating), 'total': len(board)}
+
+    def around(self, player_id: int, scope: str = GLOBAL, radius: int = 5,
+               season_id: Optional[int] = None) -> Optional[Dict]:
+        """The players ranked within radius places of a player"""
+        with self._lock:
+            place = self.rank(player_id, scope, season_id)
+            if place is None:
+                return None
+            start = max(place['rank'] - 1 - radius, 0)
+            page = self.top(scope, place['rank'] - start + radius, start, season_id)
+            return {**page, 'player': place}
+
+    def player_ranks(self, player_id: int, season_id: Optional[int] = None) -> Dict[str, Dict]:
+        """A player's place on every board of a season they are on"""
+        with self._lock:
+            season = self._season(season_id)
+            if season is None or player_id not in season.ratings:
+                return {}
+            return {scope: self.rank(player_id, scope, season.season_id) for scope in season.scopes(player_id)}
+
+    # --- Worker ---
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'seasons_loaded': sorted(self._boards),
+                'players': {season_id: len(season.ratings) for season_id, season in self._boards.items()},
+                'cursor': self._cursor,
+                'changes_applied': self.changes_applied,
+                'worker_running': self.running
+            }
+
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Leaderboard refresh error: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Start following rating changes every interval"""
+        if self.running:
+            return
+        self.running = True
+        self._stop.clear()
+        self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
+        self.worker_thread.start()
+        atexit.register(self.stop)
+        logger.info(f"Leaderboard refresh started (every {self.interval:.0f}s)")
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self._stop.set()
+        if self.worker_thread:
+            self.worker_thread.join(timeout=10)
+        logger.info("Leaderboard refresh stopped")
+
+
+_leaderboards: Optional[LeaderboardService] = None
+_leaderboards_lock = threading.Lock()
+
+
+def get_leaderboards() -> LeaderboardService:
+    """Get the process-wide leaderboards"""
+    global _leaderboards
+    if _leaderboards is None:
+        with _leaderboards_lock:
+            if _leaderboards is None:
+                _leaderboards = LeaderboardService()
+    return _leaderboards
@@ -0,0 +1,838 @@
+"""
+Marketplace Engine
+Price-ordered books of card listings and buy orders per card template, matched
+and settled against the database, and card auctions with atomic bid increments,
+anti-sniping extensions and scheduled closing. Money moves through the wallet
+ledger: open bids and buy orders hold their funds in escrow accounts until they
+settle or are released.
+"""
+
+import os
+import atexit
+import bisect
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal, ROUND_UP
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from shared.models.nfc_trading_system import (
+    AuctionBid, AuctionStatus, BuyOrderStatus, CardAuction, EnhancedNFCCard, MarketplaceBuyOrder,
+    MarketplaceListing, MarketplaceListingStatus, TradeType, TradingHistory
+)
+from shared.models.tournaments import TransactionType
+from shared.services import wallet_ledger
+from shared.services.wallet_ledger import CENT, LedgerError
+
+logger = logging.getLogger(__name__)
+
+# Engine configuration
+SCHEDULER_INTERVAL = float(os.getenv("MARKETPLACE_SCHEDULER_INTERVAL", "5"))
+BOOK_TTL_SECONDS = float(os.getenv("MARKETPLACE_BOOK_TTL_SECONDS", "30"))  # Reload a book from the database after this long
+MIN_BID_INCREMENT = Decimal(os.getenv("AUCTION_MIN_BID_INCREMENT", "0.50"))
+BID_INCREMENT_RATE = Decimal(os.getenv("AUCTION_BID_INCREMENT_RATE", "0.05"))  # Share of the current bid
+SNIPE_WINDOW_SECONDS = int(os.getenv("AUCTION_SNIPE_WINDOW_SECONDS", "120"))  # A bid this close to the end...
+SNIPE_EXTENSION_SECONDS = int(os.getenv("AUCTION_SNIPE_EXTENSION_SECONDS", "120"))  # ...moves it to this long after the bid
+MAX_AUCTION_DURATION = timedelta(days=14)
+CLOSE_BATCH_SIZE = 500
+
+
+class MarketplaceError(Exception):
+    """Raised when a marketplace operation cannot be applied"""
+    pass
+
+
+class BidRejected(MarketplaceError):
+    """A bid that lost a race or is too low; min_bid is the lowest amount accepted right now"""
+
+    def __init__(self, message: str, min_bid: Optional[Decimal] = None):
+        super().__init__(message)
+        self.min_bid = min_bid
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Core queries on SQLite return naive datetimes"""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _money(value, what: str = "price") -> Decimal:
+    try:
+        return wallet_ledger.to_money(value)
+    except LedgerError:
+        raise MarketplaceError(f"Invalid {what}")
+
+
+# Escrow accounts on the other side of hold / release / sale postings
+def auction_account(auction_id: int) -> str:
+    return f"auction:{auction_id}"
+
+
+def buy_order_account(order_id: int) -> str:
+    return f"buy_order:{order_id}"
+
+
+def listing_account(listing_id: int) -> str:
+    return f"listing:{listing_id}"
+
+
+def min_next_bid(current_bid: Decimal, bid_count: int, starting_price: Decimal) -> Decimal:
+    """Lowest acceptable next bid: the starting price, then the current bid plus the larger of the fixed and relative increment"""
+    if not bid_count:
+        return starting_price
+    increment = max(MIN_BID_INCREMENT, (current_bid * BID_INCREMENT_RATE).quantize(CENT, rounding=ROUND_UP))
+    return current_bid + increment
+
+
+def _required_bid():
+    """min_next_bid as SQL, evaluated against the row the bid is about to replace"""
+    increment = CardAuction.current_bid * BID_INCREMENT_RATE
+    return case(
+        (CardAuction.bid_count == 0, CardAuction.starting_price),
+        else_=CardAuction.current_bid + case((increment > MIN_BID_INCREMENT, increment), else_=MIN_BID_INCREMENT)
+    )
+
+
+# === ORDER BOOKS ===
+
+@dataclass(frozen=True)
+class BookEntry:
+    """A resting listing (ask) or buy order (bid)"""
+    order_id: int
+    player_id: int
+    price: Decimal
+    placed_at: datetime
+    card_id: Optional[int] = None  # Asks only
+
+
+class OrderBook:
+    """
+    Listings cheapest first and buy orders highest first, oldest first at equal price
+
+    A cache of the database: entries are claimed with conditional updates when they
+    trade, so a stale entry costs a failed claim, never a double sale.
+    """
+
+    def __init__(self, template_id: int):
+        self.template_id = template_id
+        self.loaded_at: Optional[datetime] = None
+        self.lock = threading.RLock()
+        self.asks: List[Tuple[tuple, BookEntry]] = []
+        self.bids: List[Tuple[tuple, BookEntry]] = []
+
+    def reset(self, asks: List[BookEntry], bids: List[BookEntry], loaded_at: datetime):
+        self.asks = sorted(((self._ask_key(e), e) for e in asks), key=lambda item: item[0])
+        self.bids = sorted(((self._bid_key(e), e) for e in bids), key=lambda item: item[0])
+        self.loaded_at = loaded_at
+
+    @staticmethod
+    def _ask_key(entry: BookEntry) -> tuple:
+        return (entry.price, entry.placed_at, entry.order_id)
+
+    @staticmethod
+    def _bid_key(entry: BookEntry) -> tuple:
+        return (-entry.price, entry.placed_at, entry.order_id)
+
+    def add_ask(self, entry: BookEntry):
+        self.remove_ask(entry.order_id)
+        bisect.insort(self.asks, (self._ask_key(entry), entry), key=lambda item: item[0])
+
+    def add_bid(self, entry: BookEntry):
+        self.remove_bid(entry.order_id)
+        bisect.insort(self.bids, (self._bid_key(entry), entry), key=lambda item: item[0])
+
+    def remove_ask(self, order_id: int):
+        self.asks = [item for item in self.asks if item[1].order_id != order_id]
+
+    def remove_bid(self, order_id: int):
+        self.bids = [item for item in self.bids if item[1].order_id != order_id]
+
+    def crossing(self) -> Optional[Tuple[BookEntry, BookEntry]]:
+        """Highest-priority (bid, ask) pair that trades, skipping pairs from the same player"""
+        for _, bid in self.bids:
+            if not self.asks or bid.price < self.asks[0][1].price:
+                return None
+            for _, ask in self.asks:
+                if ask.price > bid.price:
+                    break
+                if ask.player_id != bid.player_id:
+                    return bid, ask
+        return None
+
+    def depth(self, levels: int = 10) -> Dict:
+        def aggregate(side):
+            result = []
+            for _, entry in side:
+                if result and result[-1]['price'] == float(entry.price):
+                    result[-1]['orders'] += 1
+                elif len(result) == levels:
+                    break
+                else:
+                    result.append({'price': float(entry.price), 'orders': 1})
+            return result
+
+        return {
+            'card_template_id': self.template_id,
+            'asks': aggregate(self.asks),
+            'bids': aggregate(self.bids),
+            'best_ask': float(self.asks[0][1].price) if self.asks else None,
+            'best_bid': float(self.bids[0][1].price) if self.bids else None
+        }
+
+
+# === ENGINE ===
+
+class MarketplaceEngine:
+    """
+    Listings, buy orders and auctions for NFC cards
+
+    Every state change is a conditional update on the row being changed, so
+    concurrent requests and API workers cannot both win: a listing sells once, a
+    buy order fills once, an auction closes once and a bid only replaces a lower
+    one. Rows are locked market row first, then the card, then wallets in id order.
+    """
+
+    def __init__(self, session_factory=None, clock=utcnow, interval: float = SCHEDULER_INTERVAL,
+                 book_ttl: float = BOOK_TTL_SECONDS):
+        if session_factory is None:
+            from shared.database.connection import SessionLocal
+            session_factory = SessionLocal
+        self.session_factory = session_factory
+        self._clock = clock
+        self.interval = interval
+        self.book_ttl = book_ttl
+
+        self._books: Dict[int, OrderBook] = {}
+        self._lock = threading.Lock()
+
+        # Statistics
+        self.bids_accepted = 0
+        self.bids_rejected = 0
+        self.trades = 0
+        self.auctions_closed = 0
+        self.stale_entries = 0
+
+        self.running = False
+        self.worker_thread = None
+        self._stop = threading.Event()
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    # --- Books ---
+
+    def book(self, template_id: int) -> OrderBook:
+        """The template's book, (re)loaded from the database when missing or older than book_ttl"""
+        with self._lock:
+            book = self._books.get(template_id)
+            if book is None:
+                book = self._books[template_id] = OrderBook(template_id)
+        with book.lock:
+            if book.loaded_at is None or (self._clock() - book.loaded_at).total_seconds() >= self.book_ttl:
+                self._load(book)
+        return book
+
+    def _load(self, book: OrderBook):
+        now = self._clock()
+        with self.session_factory() as session:
+            asks = session.execute(
+                select(MarketplaceListing.id, MarketplaceListing.seller_player_id, MarketplaceListing.price,
+                       MarketplaceListing.listed_at, MarketplaceListing.card_id)
+                .join(EnhancedNFCCard, EnhancedNFCCard.id == MarketplaceListing.card_id)
+                .where(EnhancedNFCCard.card_template_id == book.template_id,
+                       MarketplaceListing.status == MarketplaceListingStatus.ACTIVE,
+                       or_(MarketplaceListing.expires_at.is_(None), MarketplaceListing.expires_at > now))
+            ).all()
+            bids = session.execute(
+                select(MarketplaceBuyOrder.id, MarketplaceBuyOrder.buyer_player_id, MarketplaceBuyOrder.max_price,
+                       MarketplaceBuyOrder.created_at)
+                .where(MarketplaceBuyOrder.card_template_id == book.template_id,
+                       MarketplaceBuyOrder.status == BuyOrderStatus.OPEN)
+            ).all()
+        book.reset(
+            [BookEntry(row.id, row.seller_player_id, row.price, _as_utc(row.listed_at), row.card_id) for row in asks],
+            [BookEntry(row.id, row.buyer_player_id, row.max_price, _as_utc(row.created_at)) for row in bids],
+            now
+        )
+
+    def _forget(self, template_id: int, ask: Optional[int] = None, bid: Optional[int] = None):
+        with self._lock:
+            book = self._books.get(template_id)
+        if book is None:
+            return
+        with book.lock:
+            if ask is not None:
+                book.remove_ask(ask)
+            if bid is not None:
+                book.remove_bid(bid)
+
+    def depth(self, template_id: int, levels: int = 10) -> Dict:
+        book = self.book(template_id)
+        with book.lock:
+            return book.depth(levels)
+
+    # --- Cards ---
+
+    def _reserve_card(self, session: Session, card_id: int, player_id: int) -> int:
+        """Lock a tradeable card for sale by its owner; returns its template id"""
+        template_id = session.execute(
+            update(EnhancedNFCCard.__table__).where(
+                EnhancedNFCCard.id == card_id,
+                EnhancedNFCCard.owner_player_id == player_id,
+                EnhancedNFCCard.is_tradeable.is_(True),
+                EnhancedNFCCard.is_locked.is_(False)
+            ).values(is_locked=True).returning(EnhancedNFCCard.card_template_id)
+        ).scalar()
+        if template_id is None:
+            raise MarketplaceError("Card is not available for trading")
+        return template_id
+
+    def _release_card(self, session: Session, card_id: int) -> Optional[int]:
+        return session.execute(
+            update(EnhancedNFCCard.__table__).where(EnhancedNFCCard.id == card_id).values(is_locked=False)
+            .returning(EnhancedNFCCard.card_template_id)
+        ).scalar()
+
+    def _transfer_card(self, session: Session, card_id: int, seller_id: int, buyer_id: int, price: Decimal,
+                       trade_type: TradeType, now: datetime, **references) -> Dict:
+        """Hand the card to the buyer and record the trade; fails if the seller no longer owns it"""
+        template_id = session.execute(
+            update(EnhancedNFCCard.__table__).where(
+                EnhancedNFCCard.id == card_id, EnhancedNFCCard.owner_player_id == seller_id
+            ).values(
+                owner_player_id=buyer_id, is_locked=False, trade_count=EnhancedNFCCard.trade_count + 1,
+                last_traded_at=now
+            ).returning(EnhancedNFCCard.card_template_id)
+        ).scalar()
+        if template_id is None:
+            raise MarketplaceError(f"Card {card_id} is no longer owned by the seller")
+        trade_id = session.execute(
+            insert(TradingHistory).values(
+                card_id=card_id, seller_player_id=seller_id, buyer_player_id=buyer_id, trade_type=trade_type,
+                price=price, traded_at=now, **references
+            ).returning(TradingHistory.id)
+        ).scalar_one()
+        return {
+            'trade_id': trade_id,
+            'card_id': card_id,
+            'card_template_id': template_id,
+            'seller_id': seller_id,
+            'buyer_id': buyer_id,
+            'price': float(price),
+            'trade_type': trade_type.value
+        }
+
+    def _wallets(self, session: Session, player_ids, now: datetime) -> Dict[int, int]:
+        """player id -> wallet id, with every wallet locked in id order"""
+        wallets = {player_id: wallet_ledger.get_or_create_wallet(session, player_id).id for player_id in player_ids}
+        wallet_ledger.lock_wallets(session, wallets.values(), now)
+        return wallets
+
+    # --- Listings and buy orders ---
+
+    def list_card(self, seller_id: int, card_id: int, price, expires_at: Optional[datetime] = None) -> Dict:
+        """List a card at a fixed price; it sells at once if a buy order already crosses it"""
+        price = _money(price)
+        now = self._clock()
+        with self.session_factory() as session:
+            template_id = self._reserve_card(session, card_id, seller_id)
+            listing_id = session.execute(
+                insert(MarketplaceListing).values(
+                    seller_player_id=seller_id, card_id=card_id, price=price,
+                    status=MarketplaceListingStatus.ACTIVE, listed_at=now, expires_at=expires_at
+                ).returning(MarketplaceListing.id)
+            ).scalar_one()
+            session.commit()
+
+        book = self.book(template_id)
+        with book.lock:
+            book.add_ask(BookEntry(listing_id, seller_id, price, now, card_id))
+        return {'listing_id': listing_id, 'card_template_id': template_id, 'trades': self.match(template_id)}
+
+    def place_buy_order(self, buyer_id: int, template_id: int, max_price) -> Dict:
+        """Hold max_price and bid for any card of the template; fills at once against a crossing listing"""
+        max_price = _money(max_price)
+        now = self._clock()
+        with self.session_factory() as session:
+            order_id = session.execute(
+                insert(MarketplaceBuyOrder).values(
+                    buyer_player_id=buyer_id, card_template_id=template_id, max_price=max_price,
+                    status=BuyOrderStatus.OPEN, created_at=now
+                ).returning(MarketplaceBuyOrder.id)
+            ).scalar_one()
+            wallet_id = self._wallets(session, [buyer_id], now)[buyer_id]
+            wallet_ledger.post_wallet_entry(
+                session, wallet_id, TransactionType.PURCHASE, -max_price, buy_order_account(order_id),
+                f"Buy order #{order_id} - funds held", idempotency_key=f"buy_order:{order_id}:hold", now=now
+            )
+            session.commit()
+
+        book = self.book(template_id)
+        with book.lock:
+            book.add_bid(BookEntry(order_id, buyer_id, max_price, now))
+        return {'order_id': order_id, 'card_template_id': template_id, 'trades': self.match(template_id)}
+
+    def buy_listing(self, buyer_id: int, listing_id: int) -> Dict:
+        """Buy a listing outright at its price"""
+        now = self._clock()
+        with self.session_factory() as session:
+            row = session.execute(
+                update(MarketplaceListing.__table__).where(
+                    MarketplaceListing.id == listing_id,
+                    MarketplaceListing.status == MarketplaceListingStatus.ACTIVE,
+                    MarketplaceListing.seller_player_id != buyer_id,
+                    or_(MarketplaceListing.expires_at.is_(None), MarketplaceListing.expires_at > now)
+                ).values(
+                    status=MarketplaceListingStatus.SOLD, buyer_player_id=buyer_id, sold_at=now
+                ).returning(MarketplaceListing.seller_player_id, MarketplaceListing.card_id, MarketplaceListing.price)
+            ).first()
+            if row is None:
+                raise MarketplaceError("Listing is no longer available")
+
+            wallets = self._wallets(session, [buyer_id, row.seller_player_id], now)
+            escrow = listing_account(listing_id)
+            wallet_ledger.post_wallet_entry(
+                session, wallets[buyer_id], TransactionType.PURCHASE, -row.price, escrow,
+                f"Marketplace purchase - listing #{listing_id}", idempotency_key=f"listing:{listing_id}:purchase",
+                now=now
+            )
+            wallet_ledger.post_wallet_entry(
+                session, wallets[row.seller_player_id], TransactionType.SALE, row.price, escrow,
+                f"Marketplace sale - listing #{listing_id}", idempotency_key=f"listing:{listing_id}:sale", now=now
+            )
+            trade = self._transfer_card(session, row.card_id, row.seller_player_id, buyer_id, row.price,
+                                        TradeType.MARKETPLACE, now, marketplace_listing_id=listing_id)
+            session.commit()
+
+        self._count('trades')
+        self._forget(trade['card_template_id'], ask=listing_id)
+        return trade
+
+    def cancel_listing(self, seller_id: int, listing_id: int):
+        with self.session_factory() as session:
+            card_id = session.execute(
+                update(MarketplaceListing.__table__).where(
+                    MarketplaceListing.id == listing_id,
+                    MarketplaceListing.seller_player_id == seller_id,
+                    MarketplaceListing.status == MarketplaceListingStatus.ACTIVE
+                ).values(status=MarketplaceListingStatus.CANCELLED).returning(MarketplaceListing.card_id)
+            ).scalar()
+            if card_id is None:
+                raise MarketplaceError("Listing not found or no longer active")
+            template_id = self._release_card(session, card_id)
+            session.commit()
+        self._forget(template_id, ask=listing_id)
+
+    def cancel_buy_order(self, buyer_id: int, order_id: int):
+        """Cancel an open buy order and release its held funds"""
+        now = self._clock()
+        with self.session_factory() as session:
+            row = session.execute(
+                update(MarketplaceBuyOrder.__table__).where(
+                    MarketplaceBuyOrder.id == order_id,
+                    MarketplaceBuyOrder.buyer_player_id == buyer_id,
+                    MarketplaceBuyOrder.status == BuyOrderStatus.OPEN
+                ).values(status=BuyOrderStatus.CANCELLED)
+                .returning(MarketplaceBuyOrder.card_template_id, MarketplaceBuyOrder.max_price)
+            ).first()
+            if row is None:
+                raise MarketplaceError("Buy order not found or no longer open")
+            wallet_id = self._wallets(session, [buyer_id], now)[buyer_id]
+            wallet_ledger.post_wallet_entry(
+                session, wallet_id, TransactionType.REFUND, row.max_price, buy_order_account(order_id),
+                f"Buy order #{order_id} cancelled", idempotency_key=f"buy_order:{order_id}:release", now=now
+            )
+            session.commit()
+        self._forget(row.card_template_id, bid=order_id)
+
+    def match(self, template_id: int) -> List[Dict]:
+        """Trade crossing buy orders and listings until the book no longer crosses; one transaction per trade"""
+        book = self.book(template_id)
+        trades = []
+        with book.lock:
+            while True:
+                pair = book.crossing()
+                if pair is None:
+                    break
+                bid, ask = pair
+                try:
+                    trade = self._fill(book, bid, ask)
+                except Exception as e:
+                    # Leave both orders in the database for the next sweep, but stop spinning on them now
+                    logger.error(f"Marketplace match of buy order {bid.order_id} and listing {ask.order_id} failed: {e}")
+                    book.remove_bid(bid.order_id)
+                    book.remove_ask(ask.order_id)
+                    continue
+                if trade is not None:
+                    trades.append(trade)
+        return trades
+
+    def _fill(self, book: OrderBook, bid: BookEntry, ask: BookEntry) -> Optional[Dict]:
+        """Claim both sides and settle at the resting order's price; None when either side was stale"""
+        now = self._clock()
+        price = ask.price if ask.placed_at <= bid.placed_at else bid.price
+        with self.session_factory() as session:
+            sold = session.execute(
+                update(MarketplaceListing.__table__).where(
+                    MarketplaceListing.id == ask.order_id,
+                    MarketplaceListing.status == MarketplaceListingStatus.ACTIVE,
+                    or_(MarketplaceListing.expires_at.is_(None), MarketplaceListing.expires_at > now)
+                ).values(status=MarketplaceListingStatus.SOLD, buyer_player_id=bid.player_id, sold_at=now)
+            ).rowcount
+            if not sold:
+                session.rollback()
+                book.remove_ask(ask.order_id)
+                self._count('stale_entries')
+                return None
+            filled = session.execute(
+                update(MarketplaceBuyOrder.__table__).where(
+                    MarketplaceBuyOrder.id == bid.order_id, MarketplaceBuyOrder.status == BuyOrderStatus.OPEN
+                ).values(status=BuyOrderStatus.FILLED, listing_id=ask.order_id, filled_at=now)
+            ).rowcount
+            if not filled:
+                session.rollback()
+                book.remove_bid(bid.order_id)
+                self._count('stale_entries')
+                return None
+
+            wallets = self._wallets(session, [bid.player_id, ask.player_id], now)
+            escrow = buy_order_account(bid.order_id)
+            wallet_ledger.post_wallet_entry(
+                session, wallets[ask.player_id], TransactionType.SALE, price, escrow,
+                f"Marketplace sale - listing #{ask.order_id}", idempotency_key=f"buy_order:{bid.order_id}:sale",
+                now=now
+            )
+            if bid.price > price:
+                wallet_ledger.post_wallet_entry(
+                    session, wallets[bid.player_id], TransactionType.REFUND, bid.price - price, escrow,
+                    f"Buy order #{bid.order_id} filled below limit",
+                    idempotency_key=f"buy_order:{bid.order_id}:release", now=now
+                )
+            trade = self._transfer_card(session, ask.card_id, ask.player_id, bid.player_id, price,
+                                        TradeType.MARKETPLACE, now, marketplace_listing_id=ask.order_id)
+            session.commit()
+
+        book.remove_ask(ask.order_id)
+        book.remove_bid(bid.order_id)
+        self._count('trades')
+        return trade
+
+    def expire_listings(self) -> int:
+        """Close listings past expires_at and unlock their cards"""
+        now = self._clock()
+        with self.session_factory() as session:
+            rows = session.execute(
+                update(MarketplaceListing.__table__).where(
+                    MarketplaceListing.status == MarketplaceListingStatus.ACTIVE,
+                    MarketplaceListing.expires_at <= now
+                ).values(status=MarketplaceListingStatus.EXPIRED)
+                .returning(MarketplaceListing.id, MarketplaceListing.card_id)
+            ).all()
+            expired = [(listing_id, self._release_card(session, card_id)) for listing_id, card_id in rows]
+            session.commit()
+        for listing_id, template_id in expired:
+            self._forget(template_id, ask=listing_id)
+        return len(expired)
+
+    def sweep_books(self) -> int:
+        """Re-match every known book; catches orders placed through other API workers"""
+        with self._lock:
+            template_ids = list(self._books)
+        return sum(len(self.match(template_id)) for template_id in template_ids)
+
+    # --- Auctions ---
+
+    def create_auction(self, seller_id: int, card_id: int, starting_price, duration: timedelta,
+                       reserve_price=None) -> Dict:
+        starting_price = _money(starting_price, "starting price")
+        reserve_price = _money(reserve_price, "reserve price") if reserve_price is not None else None
+        if not timedelta(0) < duration <= MAX_AUCTION_DURATION:
+            raise MarketplaceError(f"Auction duration must be at most {MAX_AUCTION_DURATION.days} days")
+
+        now = self._clock()
+        with self.session_factory() as session:
+            self._reserve_card(session, card_id, seller_id)
+            auction_id = session.execute(
+                insert(CardAuction).values(
+                    seller_player_id=seller_id, card_id=card_id, starting_price=starting_price,
+                    reserve_price=reserve_price, current_bid=Decimal("0.00"), bid_count=0,
+                    status=AuctionStatus.ACTIVE, created_at=now, starts_at=now, ends_at=now + duration
+                ).returning(CardAuction.id)
+            ).scalar_one()
+            session.commit()
+        return {'auction_id': auction_id, 'ends_at': (now + duration).isoformat(), 'min_bid': float(starting_price)}
+
+    def place_bid(self, auction_id: int, bidder_id: int, amount) -> Dict:
+        """
+        Place a bid and move the escrowed funds from the previous high bidder to this one
+
+        The conditional update is both the increment check and the auction's row lock:
+        concurrent bids serialize on it and each is checked against the bid it replaces.
+        A bid inside the snipe window pushes ends_at out in the same statement.
+        """
+        amount = _money(amount, "bid amount")
+        now = self._clock()
+        extended_until = now + timedelta(seconds=SNIPE_EXTENSION_SECONDS)
+        with self.session_factory() as session:
+            row = session.execute(
+                update(CardAuction.__table__).where(
+                    CardAuction.id == auction_id,
+                    CardAuction.status == AuctionStatus.ACTIVE,
+                    CardAuction.starts_at <= now,
+                    CardAuction.ends_at > now,
+                    CardAuction.seller_player_id != bidder_id,
+                    or_(CardAuction.current_bidder_id.is_(None), CardAuction.current_bidder_id != bidder_id),
+                    _required_bid() <= amount
+                ).values(
+                    current_bid=amount,
+                    current_bidder_id=bidder_id,
+                    bid_count=CardAuction.bid_count + 1,
+                    ends_at=case(
+                        (CardAuction.ends_at < now + timedelta(seconds=SNIPE_WINDOW_SECONDS), extended_until),
+                        else_=CardAuction.ends_at
+                    )
+                ).returning(CardAuction.ends_at, CardAuction.bid_count, CardAuction.starting_price)
+            ).first()
+            if row is None:
+                session.rollback()
+                self._count('bids_rejected')
+                raise self._rejection(session, auction_id, bidder_id, now)
+
+            previous = session.execute(
+                select(AuctionBid.id, AuctionBid.bidder_player_id, AuctionBid.bid_amount)
+                .where(AuctionBid.auction_id == auction_id, AuctionBid.is_winning.is_(True))
+            ).first()
+            if previous:
+                session.execute(update(AuctionBid.__table__).where(AuctionBid.id == previous.id).values(is_winning=False))
+            bid_id = session.execute(
+                insert(AuctionBid).values(
+                    auction_id=auction_id, bidder_player_id=bidder_id, bid_amount=amount, is_winning=True, bid_at=now
+                ).returning(AuctionBid.id)
+            ).scalar_one()
+
+            wallets = self._wallets(session, [bidder_id] + ([previous.bidder_player_id] if previous else []), now)
+            escrow = auction_account(auction_id)
+            wallet_ledger.post_wallet_entry(
+                session, wallets[bidder_id], TransactionType.PURCHASE, -amount, escrow,
+                f"Auction #{auction_id} bid - funds held", idempotency_key=f"auction:{auction_id}:bid:{bid_id}:hold",
+                now=now
+            )
+            if previous:
+                wallet_ledger.post_wallet_entry(
+                    session, wallets[previous.bidder_player_id], TransactionType.REFUND, previous.bid_amount, escrow,
+                    f"Auction #{auction_id} outbid - funds released",
+                    idempotency_key=f"auction:{auction_id}:bid:{previous.id}:release", now=now
+                )
+            session.commit()
+
+        self._count('bids_accepted')
+        ends_at = _as_utc(row.ends_at)
+        return {
+            'bid_id': bid_id,
+            'auction_id': auction_id,
+            'amount': float(amount),
+            'ends_at': ends_at.isoformat(),
+            'extended': ends_at == extended_until,
+            'min_next_bid': float(min_next_bid(amount, row.bid_count, row.starting_price))
+        }
+
+    def _rejection(self, session: Session, auction_id: int, bidder_id: int, now: datetime) -> MarketplaceError:
+        auction = session.execute(select(CardAuction).where(CardAuction.id == auction_id)).scalar()
+        if auction is None:
+            return MarketplaceError("Auction not found")
+        if auction.status != AuctionStatus.ACTIVE or _as_utc(auction.ends_at) <= now:
+            return BidRejected("Auction has ended")
+        if _as_utc(auction.starts_at) > now:
+            return BidRejected("Auction has not started")
+        if auction.seller_player_id == bidder_id:
+            return BidRejected("Sellers cannot bid on their own auction")
+        if auction.current_bidder_id == bidder_id:
+            return BidRejected("You already have the highest bid")
+        minimum = min_next_bid(auction.current_bid, auction.bid_count, auction.starting_price)
+        return BidRejected(f"Bid must be at least ${minimum}", min_bid=minimum)
+
+    def cancel_auction(self, seller_id: int, auction_id: int):
+        """Withdraw an auction nobody has bid on yet"""
+        now = self._clock()
+        with self.session_factory() as session:
+            card_id = session.execute(
+                update(CardAuction.__table__).where(
+                    CardAuction.id == auction_id,
+                    CardAuction.seller_player_id == seller_id,
+                    CardAuction.status == AuctionStatus.ACTIVE,
+                    CardAuction.bid_count == 0
+                ).values(status=AuctionStatus.CANCELLED, ended_at=now).returning(CardAuction.card_id)
+            ).scalar()
+            if card_id is None:
+                raise MarketplaceError("Only active auctions without bids can be cancelled")
+            self._release_card(session, card_id)
+            session.commit()
+
+    def close_auction(self, auction_id: int) -> Optional[Dict]:
+        """
+        Close an auction past ends_at: settle to the high bidder if the reserve is met,
+        otherwise refund them and unlock the card. None if it is not due or already closed.
+        """
+        now = self._clock()
+        with self.session_factory() as session:
+            row = session.execute(
+                update(CardAuction.__table__).where(
+                    CardAuction.id == auction_id,
+                    CardAuction.status == AuctionStatus.ACTIVE,
+                    CardAuction.ends_at <= now
+                ).values(status=AuctionStatus.ENDED, ended_at=now).returning(
+                    CardAuction.seller_player_id, CardAuction.card_id, CardAuction.current_bid,
+                    CardAuction.current_bidder_id, CardAuction.reserve_price
+                )
+            ).first()
+            if row is None:
+                return None
+
+            winner_id = row.current_bidder_id
+            sold = winner_id is not None and (row.reserve_price is None or row.current_bid >= row.reserve_price)
+            escrow = auction_account(auction_id)
+            result = {'auction_id': auction_id, 'sold': sold, 'winner_id': winner_id if sold else None,
+                      'price': float(row.current_bid) if sold else None, 'trade_id': None}
+            if sold:
+                wallets = self._wallets(session, [row.seller_player_id], now)
+                wallet_ledger.post_wallet_entry(
+                    session, wallets[row.seller_player_id], TransactionType.SALE, row.current_bid, escrow,
+                    f"Auction #{auction_id} sale", idempotency_key=f"auction:{auction_id}:settle", now=now
+                )
+                trade = self._transfer_card(session, row.card_id, row.seller_player_id, winner_id, row.current_bid,
+                                            TradeType.AUCTION, now, auction_id=auction_id)
+                result['trade_id'] = trade['trade_id']
+            else:
+                if winner_id is not None:
+                    winning_bid = session.execute(
+                        select(AuctionBid.id).where(AuctionBid.auction_id == auction_id, AuctionBid.is_winning.is_(True))
+                    ).scalar_one()
+                    wallets = self._wallets(session, [winner_id], now)
+                    wallet_ledger.post_wallet_entry(
+                        session, wallets[winner_id], TransactionType.REFUND, row.current_bid, escrow,
+                        f"Auction #{auction_id} reserve not met - funds released",
+                        idempotency_key=f"auction:{auction_id}:bid:{winning_bid}:release", now=now
+                    )
+                self._release_card(session, row.card_id)
+            session.commit()
+
+        self._count('auctions_closed')
+        if sold:
+            self._count('trades')
+        return result
+
+    def close_expired_auctions(self) -> List[Dict]:
+        """Close every auction past ends_at; each in its own transaction so one failure does not block the rest"""
+        now = self._clock()
+        with self.session_factory() as session:
+            due = session.execute(
+                select(CardAuction.id).where(CardAuction.status == AuctionStatus.ACTIVE, CardAuction.ends_at <= now)
+                .order_by(CardAuction.ends_at).limit(CLOSE_BATCH_SIZE)
+            ).scalars().all()
+
+        closed = []
+        for auction_id in due:
+            try:
+                result = self.close_auction(auction_id)
+                if result is not None:
+                    closed.append(result)
+            except Exception as e:
+                logger.error(f"Closing auction {auction_id} failed, will retry: {e}")
+        return closed
+
+    # --- Scheduler ---
+
+    def run_once(self) -> Dict[str, int]:
+        return {
+            'auctions_closed': len(self.close_expired_auctions()),
+            'listings_expired': self.expire_listings(),
+            'trades': self.sweep_books()
+        }
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'books': len(self._books),
+                'bids_accepted': self.bids_accepted,
+                'bids_rejected': self.bids_rejected,
+                'trades': self.trades,
+                'auctions_closed': self.auctions_closed,
+                'stale_entries': self.stale_entries,
+                'scheduler_running': self.running
+            }
+
+    def _worker_loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Marketplace scheduler error: {e}")
+
+    def start(self):
+        """
+        Start the scheduler: closes auctions, expires listings and re-matches books
+
+        Bids after ends_at are rejected by the bid update itself, so the interval only
+        delays settlement, never lets a late bid in. Every API worker may run one.
+        """
+        if self.running:
+            return
+        self.running = True
+        self._stop.clear()
+        self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
+        self.worker_thread.start()
+        atexit.register(self.stop)
+        logger.info(f"Marketplace scheduler started (every {self.interval:.0f}s)")
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self._stop.set()
+        if self.worker_thread:
+            self.worker_thread.join(timeout=10)
+        logger.info("Marketplace scheduler stopped")
+
+
+# === READS ===
+
+def auction_summary(auction: CardAuction) -> Dict:
+    return {
+        'id': auction.id,
+        'card_id': auction.card_id,
+        'seller_id': auction.seller_player_id,
+        'status': auction.status.value,
+        'starting_price': float(auction.starting_price),
+        'reserve_met': auction.reserve_price is None or (auction.bid_count > 0 and auction.current_bid >= auction.reserve_price),
+        'current_bid': float(auction.current_bid) if auction.bid_count else None,
+        'current_bidder_id': auction.current_bidder_id,
+        'bid_count': auction.bid_count,
+        'min_next_bid': float(min_next_bid(auction.current_bid, auction.bid_count, auction.starting_price)),
+        'starts_at': auction.starts_at.isoformat(),
+        'ends_at': auction.ends_at.isoformat(),
+        'ended_at': auction.ended_at.isoformat() if auction.ended_at else None
+    }
+
+
+_marketplace_engine: Optional[MarketplaceEngine] = None
+_marketplace_engine_lock = threading.Lock()
+
+
+def get_marketplace_engine() -> MarketplaceEngine:
+    """Get the process-wide marketplace engine"""
+    global _marketplace_engine
+    if _marketplace_engine is None:
+        with _marketplace_engine_lock:
+            if _marketplace_engine is None:
+                _marketplace_engine = MarketplaceEngine()
+    return _marketplace_engine
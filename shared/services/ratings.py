@@ -0,0 +1,507 @@
+"""
+Ratings
+Per-season Elo ratings for finished matches, computed off the match-end path.
+Ending a match only records its results; a worker takes finished, unrated
+matches in (ended_at, id) order and rates them in batches, keeping every
+player's rating in memory across the batch so each player's row is written once
+per batch, next to one history row per player and match. A season can be
+recomputed from match history and comes out identical to rating it live.
+"""
+
+import os
+import atexit
+import logging
+import threading
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import bindparam, delete, insert, select, update
+
+from shared.models.base import Match, MatchParticipant, MatchStatus, ParticipantResult, Player
+from shared.models.ratings import PlayerRating, RatingHistory, RatingSeason, SeasonVenuePlayer
+
+logger = logging.getLogger(__name__)
+
+# Rating configuration
+INITIAL_RATING = float(os.getenv("RATING_INITIAL", "1000"))
+PROVISIONAL_K = float(os.getenv("RATING_PROVISIONAL_K", "40"))
+PROVISIONAL_GAMES = int(os.getenv("RATING_PROVISIONAL_GAMES", "30"))
+STANDARD_K = float(os.getenv("RATING_K", "20"))
+ESTABLISHED_K = float(os.getenv("RATING_ESTABLISHED_K", "10"))
+ESTABLISHED_RATING = float(os.getenv("RATING_ESTABLISHED_AT", "2400"))
+WORKER_INTERVAL = float(os.getenv("RATING_WORKER_INTERVAL", "10"))
+BATCH_SIZE = int(os.getenv("RATING_BATCH_SIZE", "500"))
+SETTLE_SECONDS = int(os.getenv("RATING_SETTLE_SECONDS", "5"))  # Lets matches ending together commit first
+RECOMPUTE_CHUNK = 5000
+
+FINISHED = (MatchStatus.finished, MatchStatus.completed)
+SCORES = {ParticipantResult.win.value: 1.0, ParticipantResult.draw.value: 0.5, ParticipantResult.loss.value: 0.0}
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+# === ELO ===
+
+@dataclass(frozen=True)
+class KSchedule:
+    """K-factor by experience: provisional players move fast, established top players slowly"""
+    provisional_k: float = PROVISIONAL_K
+    provisional_games: int = PROVISIONAL_GAMES
+    k: float = STANDARD_K
+    established_k: float = ESTABLISHED_K
+    established_rating: float = ESTABLISHED_RATING
+
+    def k_for(self, rating: float, games: int) -> float:
+        if games < self.provisional_games:
+            return self.provisional_k
+        if rating >= self.established_rating:
+            return self.established_k
+        return self.k
+
+
+DEFAULT_SCHEDULE = KSchedule()
+
+
+@dataclass
+class RatingState:
+    """A player's rating and record as the engine carries it between matches"""
+    rating: float
+    peak: float
+    games: int = 0
+    wins: int = 0
+    losses: int = 0
+    draws: int = 0
+    last_match_id: Optional[int] = None
+
+
+class RatingChange(NamedTuple):
+    match_id: int
+    player_id: int
+    before: float
+    after: float
+    k_factor: float
+    games: int
+    played_at: datetime
+
+
+class FinishedMatch(NamedTuple):
+    match_id: int
+    ended_at: datetime
+    participants: Tuple[Tuple[Optional[int], Optional[int], str], ...]  # (player_id, team, result)
+    console_id: Optional[int] = None  # The venue the match was played at
+
+
+def season_at(seasons: List[Tuple[datetime, int]], when: datetime) -> Optional[int]:
+    """The season (from (starts_at, id) pairs, oldest first) a moment falls in"""
+    index = bisect_right([starts_at for starts_at, _ in seasons], when) - 1
+    return seasons[index][1] if index >= 0 else None
+
+
+def expected_score(rating: float, opponent: float) -> float:
+    return 1.0 / (1.0 + 10.0 ** ((opponent - rating) / 400.0))
+
+
+class RatingEngine:
+    """
+    Applies Elo to matches in the order given, entirely in memory
+
+    Teams are rated on their mean rating and every member moves by its own K.
+    A match that is not exactly two teams with complementary results (an
+    abandoned match, a console-only seat) is left unrated.
+    """
+
+    def __init__(self, ratings: Optional[Dict[int, RatingState]] = None, schedule: KSchedule = DEFAULT_SCHEDULE,
+                 initial_rating: float = INITIAL_RATING):
+        self.ratings = ratings if ratings is not None else {}
+        self.schedule = schedule
+        self.initial_rating = initial_rating
+        self.touched = set()
+
+    def state(self, player_id: int) -> RatingState:
+        state = self.ratings.get(player_id)
+        if state is None:
+            state = self.ratings[player_id] = RatingState(self.initial_rating, self.initial_rating)
+        return state
+
+    def rate(self, match: FinishedMatch) -> List[RatingChange]:
+        teams: Dict[int, List[int]] = {}
+        scores: Dict[int, float] = {}
+        for player_id, team, result in match.participants:
+            score = SCORES.get(result)
+            if player_id is None or team is None or score is None or scores.setdefault(team, score) != score:
+                return []
+            teams.setdefault(team, []).append(player_id)
+        if len(teams) != 2:
+            return []
+        (team_a, members_a), (team_b, members_b) = sorted(teams.items())
+        if scores[team_a] + scores[team_b] != 1.0:
+            return []
+
+        states_a = [self.state(p) for p in members_a]
+        states_b = [self.state(p) for p in members_b]
+        rating_a = sum(s.rating for s in states_a) / len(states_a)
+        rating_b = sum(s.rating for s in states_b) / len(states_b)
+        expected_a = expected_score(rating_a, rating_b)
+
+        changes = []
+        for members, states, score, expected in ((members_a, states_a, scores[team_a], expected_a),
+                                                  (members_b, states_b, scores[team_b], 1.0 - expected_a)):
+            for player_id, state in zip(members, states):
+                k = self.schedule.k_for(state.rating, state.games)
+                before = state.rating
+                state.rating = before + k * (score - expected)
+                state.peak = max(state.peak, state.rating)
+                state.games += 1
+                if score == 1.0:
+                    state.wins += 1
+                elif score == 0.0:
+                    state.losses += 1
+                else:
+                    state.draws += 1
+                state.last_match_id = match.match_id
+                self.touched.add(player_id)
+                changes.append(RatingChange(match.match_id, player_id, before, state.rating, k, state.games,
+                                            match.ended_at))
+        return changes
+
+
+# === PROCESSOR ===
+
+class RatingProcessor:
+    """
+    Rates finished matches in the background, and recomputes seasons on demand
+
+    Every batch and every recompute locks the season rows first, so batches
+    from several workers and a recompute never interleave. Ratings only need
+    ended_at and the participants' results, which the match end already writes.
+    """
+
+    def __init__(self, session_factory=None, schedule: KSchedule = DEFAULT_SCHEDULE,
+                 initial_rating: float = INITIAL_RATING, batch_size: int = BATCH_SIZE,
+                 interval: float = WORKER_INTERVAL, settle_seconds: int = SETTLE_SECONDS, clock=utcnow):
+        self._session_factory = session_factory
+        self.schedule = schedule
+        self.initial_rating = initial_rating
+        self.batch_size = batch_size
+        self.interval = interval
+        self.settle = timedelta(seconds=settle_seconds)
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self.matches_rated = 0
+        self.matches_skipped = 0
+        self.batches = 0
+
+        self.running = False
+        self.worker_thread = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            from shared.database.connection import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    # --- Loading ---
+
+    def _seasons(self, session) -> List[Tuple[datetime, int]]:
+        """(starts_at, id) of every season, oldest first, locked for this transaction"""
+        rows = session.execute(
+            select(RatingSeason.starts_at, RatingSeason.id).order_by(RatingSeason.starts_at).with_for_update()
+        ).all()
+        return [(_as_utc(starts_at), season_id) for starts_at, season_id in rows]
+
+    def _load_matches(self, session, *conditions, limit: Optional[int] = None) -> List[FinishedMatch]:
+        query = select(Match.id, Match.ended_at, Match.console_id).where(
+            Match.status.in_(FINISHED), Match.ended_at.isnot(None), *conditions
+        ).order_by(Match.ended_at, Match.id)
+        if limit:
+            query = query.limit(limit)
+        matches = session.execute(query).all()
+        if not matches:
+            return []
+
+        participants: Dict[int, list] = {}
+        rows = session.execute(
+            select(MatchParticipant.match_id, MatchParticipant.player_id, MatchParticipant.team,
+                   MatchParticipant.result)
+            .where(MatchParticipant.match_id.in_([m.id for m in matches]))
+            .order_by(MatchParticipant.match_id, MatchParticipant.team, MatchParticipant.id)
+        ).all()
+        for match_id, player_id, team, result in rows:
+            participants.setdefault(match_id, []).append((player_id, team, getattr(result, "value", result)))
+        return [FinishedMatch(m.id, _as_utc(m.ended_at), tuple(participants.get(m.id, ())), m.console_id)
+                for m in matches]
+
+    def _load_ratings(self, session, season_id: int, player_ids: Iterable[int]) -> Dict[int, RatingState]:
+        """The season's stored ratings of these players, locked for this transaction"""
+        ratings = PlayerRating.__table__
+        rows = session.execute(
+            select(ratings.c.player_id, ratings.c.rating, ratings.c.peak_rating, ratings.c.games, ratings.c.wins,
+                   ratings.c.losses, ratings.c.draws, ratings.c.last_match_id)
+            .where(ratings.c.season_id == season_id, ratings.c.player_id.in_(list(player_ids)))
+            .with_for_update()
+        ).all()
+        return {row[0]: RatingState(*row[1:]) for row in rows}
+
+    # --- Writing ---
+
+    def _write_changes(self, session, season_id: int, changes: List[RatingChange]):
+        """History rows and the participants' displayed Elo change"""
+        if not changes:
+            return
+        session.execute(insert(RatingHistory.__table__), [{
+            "season_id": season_id, "player_id": c.player_id, "match_id": c.match_id,
+            "rating_before": c.before, "rating_after": c.after, "k_factor": c.k_factor,
+            "games": c.games, "played_at": c.played_at
+        } for c in changes])
+        participants = MatchParticipant.__table__
+        session.execute(
+            update(participants)
+            .where(participants.c.match_id == bindparam("m_id"), participants.c.player_id == bindparam("p_id"))
+            .values(elo_change=bindparam("delta")),
+            [{"m_id": c.match_id, "p_id": c.player_id, "delta": round(c.after) - round(c.before)} for c in changes]
+        )
+
+    def _save_ratings(self, session, season_id: int, engine: RatingEngine, stored: Iterable[int],
+                      current: bool, now: datetime):
+        """One write per player the engine moved, plus Player.elo_rating for the current season"""
+        touched = sorted(engine.touched)
+        stored = set(stored)
+        new_rows, changed_rows = [], []
+        for player_id in touched:
+            state = engine.ratings[player_id]
+            values = {
+                "p_id": player_id, "rating": state.rating, "peak_rating": state.peak, "games": state.games,
+                "wins": state.wins, "losses": state.losses, "draws": state.draws,
+                "last_match_id": state.last_match_id, "updated_at": now
+            }
+            (changed_rows if player_id in stored else new_rows).append(values)
+
+        ratings = PlayerRating.__table__
+        if new_rows:
+            session.execute(insert(ratings).values(season_id=season_id, player_id=bindparam("p_id")), new_rows)
+        if changed_rows:
+            session.execute(
+                update(ratings)
+                .where(ratings.c.season_id == season_id, ratings.c.player_id == bindparam("p_id"))
+                .values({name: bindparam(name) for name in changed_rows[0] if name != "p_id"}),
+                changed_rows
+            )
+
+        if current and touched:
+            players = Player.__table__
+            session.execute(
+                update(players).where(players.c.id == bindparam("p_id")).values(elo_rating=bindparam("elo")),
+                [{"p_id": player_id, "elo": round(engine.ratings[player_id].rating)} for player_id in touched]
+            )
+        engine.touched.clear()
+
+    def _write_venues(self, session, season_id: int, rated: List[FinishedMatch], known: Optional[set] = None):
+        """Record the venues (consoles) each player has rated matches at this season, for venue leaderboards"""
+        first_match: Dict[Tuple[int, int], int] = {}
+        for match in rated:
+            if match.console_id is not None:
+                for player_id, _, _ in match.participants:
+                    first_match.setdefault((match.console_id, player_id), match.match_id)
+        if known is None:
+            venues = SeasonVenuePlayer.__table__
+            known = {tuple(row) for row in session.execute(
+                select(venues.c.console_id, venues.c.player_id).where(
+                    venues.c.season_id == season_id,
+                    venues.c.console_id.in_({console_id for console_id, _ in first_match}),
+                    venues.c.player_id.in_({player_id for _, player_id in first_match})
+                )
+            )} if first_match else set()
+
+        new_rows = [{"season_id": season_id, "console_id": console_id, "player_id": player_id, "first_match_id": match_id}
+                    for (console_id, player_id), match_id in first_match.items() if (console_id, player_id) not in known]
+        if new_rows:
+            session.execute(insert(SeasonVenuePlayer.__table__), new_rows)
+            known.update((row["console_id"], row["player_id"]) for row in new_rows)
+
+    def _mark_rated(self, session, match_ids: List[int], now: datetime):
+        matches = Match.__table__
+        session.execute(update(matches).where(matches.c.id.in_(match_ids)).values(rated_at=now))
+
+    # --- Live rating ---
+
+    def run_once(self) -> int:
+        """Rate the next batch of settled, unrated matches; returns how many were taken"""
+        now = self.clock()
+        with self.session_factory() as session:
+            seasons = self._seasons(session)
+            matches = self._load_matches(session, Match.rated_at.is_(None), Match.ended_at <= now - self.settle,
+                                         limit=self.batch_size)
+            if not matches:
+                session.rollback()
+                return 0
+
+            by_season: Dict[int, List[FinishedMatch]] = {}
+            for match in matches:
+                season_id = season_at(seasons, match.ended_at)
+                if season_id is None:
+                    continue  # Played before the first season: never rated
+                by_season.setdefault(season_id, []).append(match)
+
+            rated = 0
+            current_season = season_at(seasons, now)
+            for season_id, season_matches in by_season.items():
+                player_ids = {p for m in season_matches for p, _, _ in m.participants if p is not None}
+                stored = self._load_ratings(session, season_id, player_ids)
+                engine = RatingEngine(dict(stored), self.schedule, self.initial_rating)
+
+                changes, rated_matches = [], []
+                for match in season_matches:
+                    match_changes = engine.rate(match)
+                    if match_changes:
+                        rated_matches.append(match)
+                    changes.extend(match_changes)
+                rated += len(rated_matches)
+                self._write_changes(session, season_id, changes)
+                self._write_venues(session, season_id, rated_matches)
+                self._save_ratings(session, season_id, engine, stored, season_id == current_season, now)
+
+            self._mark_rated(session, [m.match_id for m in matches], now)
+            session.commit()
+
+        with self._lock:
+            self.batches += 1
+            self.matches_rated += rated
+            self.matches_skipped += len(matches) - rated
+        logger.info(f"Rated {rated} of {len(matches)} finished matches")
+        return len(matches)
+
+    def drain(self) -> int:
+        """Rate everything that has settled"""
+        total = 0
+        while True:
+            taken = self.run_once()
+            if not taken:
+                return total
+            total += taken
+
+    # --- Recomputation ---
+
+    def recompute_season(self, season_id: int) -> Dict:
+        """
+        Rebuild a season's ratings and history from its finished matches
+
+        Matches are replayed in the same (ended_at, id) order live rating uses,
+        so the result is identical to what rating the season live produced.
+        """
+        now = self.clock()
+        with self.session_factory() as session:
+            seasons = self._seasons(session)
+            ids = [season for _, season in seasons]
+            if season_id not in ids:
+                raise ValueError(f"Unknown rating season {season_id}")
+            index = ids.index(season_id)
+            conditions = [Match.ended_at >= seasons[index][0]]
+            if index + 1 < len(seasons):
+                conditions.append(Match.ended_at < seasons[index + 1][0])
+
+            session.execute(delete(RatingHistory).where(RatingHistory.season_id == season_id))
+            session.execute(delete(PlayerRating).where(PlayerRating.season_id == season_id))
+            session.execute(delete(SeasonVenuePlayer).where(SeasonVenuePlayer.season_id == season_id))
+
+            engine = RatingEngine(schedule=self.schedule, initial_rating=self.initial_rating)
+            last, total, rated, venues = None, 0, 0, set()
+            while True:
+                # Keyset pages over (ended_at, id)
+                page = list(conditions)
+                if last:
+                    page.append((Match.ended_at > last.ended_at)
+                                | ((Match.ended_at == last.ended_at) & (Match.id > last.match_id)))
+                matches = self._load_matches(session, *page, limit=RECOMPUTE_CHUNK)
+                if not matches:
+                    break
+                changes, rated_matches = [], []
+                for match in matches:
+                    match_changes = engine.rate(match)
+                    if match_changes:
+                        rated_matches.append(match)
+                    changes.extend(match_changes)
+                rated += len(rated_matches)
+                self._write_changes(session, season_id, changes)
+                self._write_venues(session, season_id, rated_matches, venues)
+                self._mark_rated(session, [m.match_id for m in matches], now)
+                total += len(matches)
+                last = matches[-1]
+
+            self._save_ratings(session, season_id, engine, (), season_id == season_at(seasons, now), now)
+            session.execute(update(RatingSeason).where(RatingSeason.id == season_id).values(recomputed_at=now))
+            session.commit()
+
+        logger.info(f"Recomputed rating season {season_id}: {rated} of {total} matches rated, "
+                    f"{len(engine.ratings)} players")
+        return {'season_id': season_id, 'matches': total, 'rated': rated, 'players': len(engine.ratings)}
+
+    # --- Worker ---
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'batches': self.batches,
+                'matches_rated': self.matches_rated,
+                'matches_skipped': self.matches_skipped,
+                'worker_running': self.running
+            }
+
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            try:
+                if self.run_once() >= self.batch_size:
+                    continue  # Backlog: go straight to the next batch
+            except Exception as e:
+                logger.error(f"Rating worker error: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def wake(self):
+        self._wake.set()
+
+    def start(self):
+        """Start the worker; it polls for finished matches every interval"""
+        if self.running:
+            return
+        self.running = True
+        self._stop.clear()
+        self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
+        self.worker_thread.start()
+        atexit.register(self.stop)
+        logger.info(f"Rating worker started (every {self.interval:.0f}s)")
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self._stop.set()
+        self._wake.set()
+        if self.worker_thread:
+            self.worker_thread.join(timeout=10)
+        logger.info("Rating worker stopped")
+
+
+_rating_processor: Optional[RatingProcessor] = None
+_rating_processor_lock = threading.Lock()
+
+
+def get_rating_processor() -> RatingProcessor:
+    """Get the process-wide rating processor"""
+    global _rating_processor
+    if _rating_processor is None:
+        with _rating_processor_lock:
+            if _rating_processor is None:
+                _rating_processor = RatingProcessor()
+    return _rating_processor
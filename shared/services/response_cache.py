@@ -0,0 +1,321 @@
+"""
+Rendered Response Cache
+Caches the JSON bodies of public read endpoints keyed by route and query args, with
+ETag / Last-Modified validators for conditional GETs, single-flight rendering so a
+cold key is built once however many requests arrive, and namespace invalidation
+fanned out to the other API workers over Redis pub/sub when it is reachable
+"""
+
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from functools import wraps
+from typing import Callable, Deque, Dict, Iterable, Optional, Tuple
+
+from flask import Response, request
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    redis = None
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Cache configuration
+REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL", os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+REDIS_CHANNEL = "response_cache:invalidate"
+# Upper bound on staleness when an invalidation from another worker is missed
+CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "60"))
+MAX_CACHE_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+# Followers give up waiting for a slow leader and render themselves after this long
+SINGLE_FLIGHT_TIMEOUT = 10.0
+LATENCY_SAMPLES = 1000
+
+# Namespaces invalidated by content writes
+CMS_NEWS = "cms:news"
+CMS_VIDEOS = "cms:videos"
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    etag: str
+    last_modified: datetime
+    created_at: float
+    content_type: str = "application/json"
+
+    def is_not_modified(self, if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+        """RFC 7232: If-None-Match wins over If-Modified-Since"""
+        if if_none_match:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            return '*' in tags or self.etag in tags or f"W/{self.etag}" in tags
+        if if_modified_since:
+            try:
+                return self.last_modified <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+
+class _Flight:
+    """A render in progress that other requests for the same key wait on"""
+
+    def __init__(self, generation: Tuple[int, ...]):
+        self.generation = generation
+        self.done = threading.Event()
+        self.result: Optional[CachedResponse] = None
+
+
+class ResponseCache:
+    """LRU of rendered responses, invalidated by namespace"""
+
+    def __init__(self, ttl_seconds: float = CACHE_TTL_SECONDS, max_entries: int = MAX_CACHE_ENTRIES,
+                 clock=time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[CachedResponse, Tuple[str, ...], Tuple[int, ...]]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._flights: Dict[str, _Flight] = {}
+        self._bridge: Optional['RedisInvalidationBridge'] = None
+
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.not_modified = 0
+        self.invalidations = 0
+        self._render_ms: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self._hit_ms: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+
+    def attach_bridge(self, bridge: 'RedisInvalidationBridge'):
+        self._bridge = bridge
+
+    def _generation(self, namespaces: Tuple[str, ...]) -> Tuple[int, ...]:
+        return tuple(self._generations.get(namespace, 0) for namespace in namespaces)
+
+    def _lookup(self, key: str, namespaces: Tuple[str, ...]) -> Optional[CachedResponse]:
+        """Caller holds the lock"""
+        stored = self._entries.get(key)
+        if stored is None:
+            return None
+        cached, stored_namespaces, generation = stored
+        if generation != self._generation(stored_namespaces) or self._clock() - cached.created_at > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return cached
+
+    def get_or_render(self, key: str, namespaces: Iterable[str],
+                      render: Callable[[], Optional[bytes]]) -> Tuple[Optional[CachedResponse], str]:
+        """
+        Cached response for key, rendering it at most once concurrently
+
+        render returns the body, or None when the result must not be cached (errors);
+        in that case every caller renders for itself. Returns (response, "hit" | "miss"
+        | "coalesced"); the response is None when render declined to cache.
+        """
+        namespaces = tuple(namespaces)
+        started = time.perf_counter()
+        with self._lock:
+            cached = self._lookup(key, namespaces)
+            if cached is not None:
+                self.hits += 1
+                self._hit_ms.append((time.perf_counter() - started) * 1000)
+                return cached, "hit"
+            generation = self._generation(namespaces)
+            flight = self._flights.get(key)
+            # A render that started before an invalidation cannot serve requests that arrive after it
+            leader = flight is None or flight.generation != generation
+            if leader:
+                flight = self._flights[key] = _Flight(generation)
+                self.misses += 1
+
+        if not leader:
+            if flight.done.wait(SINGLE_FLIGHT_TIMEOUT) and flight.result is not None:
+                with self._lock:
+                    self.coalesced += 1
+                return flight.result, "coalesced"
+            return None, "miss"
+
+        try:
+            body = render()
+            if body is None:
+                return None, "miss"
+            cached = CachedResponse(
+                body=body,
+                etag='"' + hashlib.sha1(body).hexdigest() + '"',
+                last_modified=datetime.now(timezone.utc).replace(microsecond=0),
+                created_at=self._clock()
+            )
+            with self._lock:
+                self._render_ms.append((time.perf_counter() - started) * 1000)
+                # An invalidation while rendering means the body may already be stale
+                if generation == self._generation(namespaces):
+                    self._entries[key] = (cached, namespaces, generation)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            flight.result = cached
+            return cached, "miss"
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.done.set()
+
+    def invalidate(self, *namespaces: str, broadcast: bool = True):
+        """Drop every entry depending on any of namespaces, here and (optionally) in other workers"""
+        with self._lock:
+            for namespace in namespaces:
+                self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            stale = [key for key, (_, deps, _) in self._entries.items() if set(deps) & set(namespaces)]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += 1
+
+        if broadcast and self._bridge is not None:
+            self._bridge.publish(namespaces)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def stats(self) -> Dict:
+        def percentile(samples, p):
+            ordered = sorted(samples)
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))], 3) if ordered else None
+
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'not_modified': self.not_modified,
+                'invalidations': self.invalidations,
+                'hit_ratio': round((self.hits + self.coalesced) / lookups, 4) if lookups else None,
+                'hit_ms_p50': percentile(self._hit_ms, 0.5),
+                'render_ms_p50': percentile(self._render_ms, 0.5),
+                'render_ms_p95': percentile(self._render_ms, 0.95),
+                'bridged': self._bridge is not None and self._bridge.connected
+            }
+
+
+class RedisInvalidationBridge:
+    """Relays namespace invalidations between API workers over Redis pub/sub"""
+
+    def __init__(self, cache: ResponseCache, redis_url: str = REDIS_URL):
+        self.cache = cache
+        self.client = redis.from_url(redis_url, decode_responses=True)
+        self.client.ping()
+        self.connected = True
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(REDIS_CHANNEL)
+        self._thread = threading.Thread(target=self._listen, daemon=True)
+        self._thread.start()
+
+    def publish(self, namespaces: Iterable[str]):
+        try:
+            self.client.publish(REDIS_CHANNEL, f"{os.getpid()}|{','.join(namespaces)}")
+        except Exception as e:
+            self.connected = False
+            logger.warning(f"Response cache bridge publish failed: {e}")
+
+    def _listen(self):
+        try:
+            for message in self._pubsub.listen():
+                sender, _, payload = message['data'].partition('|')
+                if sender == str(os.getpid()):
+                    continue
+                self.cache.invalidate(*payload.split(','), broadcast=False)
+        except Exception as e:
+            logger.warning(f"Response cache bridge disconnected: {e}")
+        self.connected = False
+
+
+_response_cache: Optional[ResponseCache] = None
+_init_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Get the process-wide response cache, bridged over Redis when it is reachable"""
+    global _response_cache
+    if _response_cache is None:
+        with _init_lock:
+            if _response_cache is None:
+                cache = ResponseCache()
+                if REDIS_AVAILABLE and os.getenv("RESPONSE_CACHE_REDIS_BRIDGE", "true").lower() == "true":
+                    try:
+                        cache.attach_bridge(RedisInvalidationBridge(cache))
+                        logger.info("Response cache invalidations bridged over Redis pub/sub")
+                    except Exception as e:
+                        logger.warning(f"Redis not available for response cache invalidation: {e}")
+                _response_cache = cache
+    return _response_cache
+
+
+def invalidate_responses(*namespaces: str):
+    """Best-effort hook for write paths; a failed invalidation never fails the write"""
+    try:
+        get_response_cache().invalidate(*namespaces)
+    except Exception as e:
+        logger.warning(f"Response cache invalidation of {namespaces} failed: {e}")
+
+
+def cache_key() -> str:
+    """Route plus sorted query args, so ?a=1&b=2 and ?b=2&a=1 share an entry"""
+    args = sorted((name, value) for name in request.args for value in request.args.getlist(name))
+    return request.path + '?' + '&'.join(f"{name}={value}" for name, value in args)
+
+
+def cached_response(*namespaces: str):
+    """
+    Serve a public GET endpoint from the response cache
+
+    Only 200 responses are cached. Clients revalidate with If-None-Match /
+    If-Modified-Since and get a bodyless 304 while the content is unchanged.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = get_response_cache()
+            uncached = []
+
+            def render():
+                response = view(*args, **kwargs)
+                if isinstance(response, tuple) or getattr(response, 'status_code', None) != 200:
+                    uncached.append(response)
+                    return None
+                return response.get_data()
+
+            cached, outcome = cache.get_or_render(cache_key(), namespaces, render)
+            if cached is None:
+                return uncached[0] if uncached else view(*args, **kwargs)
+
+            headers = {
+                'ETag': cached.etag,
+                'Last-Modified': format_datetime(cached.last_modified, usegmt=True),
+                'Cache-Control': 'public, no-cache',
+                'X-Cache': outcome.upper()
+            }
+            if cached.is_not_modified(request.headers.get('If-None-Match'), request.headers.get('If-Modified-Since')):
+                cache.record_not_modified()
+                return Response(status=304, headers=headers)
+            return Response(cached.body, status=200, mimetype=cached.content_type, headers=headers)
+        return wrapper
+    return decorator
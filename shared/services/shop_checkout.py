@@ -0,0 +1,101 @@
+"""
+Shop Checkout
+Turns a paid checkout session into its order. The client's /checkout/process and
+the payment_intent.succeeded webhook both get here, whichever arrives first; the
+checkout session is claimed with a conditional update, so a paid checkout gets
+exactly one order and its reserved stock is converted once.
+"""
+
+import json
+import secrets
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from shared.models.shop import OrderStatus, ShopCheckoutSession, ShopOrder, ShopOrderItem
+from shared.services import inventory_reservations
+
+
+def generate_order_number():
+    """Human-readable order number, e.g. DP250301-7F3A9C"""
+    return f"DP{datetime.now(timezone.utc):%y%m%d}-{secrets.token_hex(3).upper()}"
+
+
+def create_paid_order(session: Session, checkout_session_id: str, session_data: Dict, now: datetime,
+                      customer_id: Optional[int] = None, customer: Optional[Dict] = None,
+                      billing_address: Optional[Dict] = None, shipping_address: Optional[Dict] = None
+                      ) -> Optional[ShopOrder]:
+    """
+    Claim a paid checkout session and create its order from the stored cart
+
+    Returns None when the session was already claimed. The checkout's reservations
+    become the order's stock; OutOfStock is raised when a lapsed reservation cannot
+    be taken again, and the caller rolls back. The caller commits.
+    """
+    checkouts = ShopCheckoutSession.__table__
+    claimed = session.execute(
+        update(checkouts)
+        .where(checkouts.c.session_id == checkout_session_id, checkouts.c.is_used.is_(False))
+        .values(is_used=True, updated_at=now)
+    ).rowcount
+    if not claimed:
+        return None
+
+    customer = customer or {}
+    # Charge what the customer was shown and paid for
+    order = ShopOrder(
+        order_number=generate_order_number(),
+        customer_id=customer_id,
+        customer_email=customer.get('email'),
+        customer_name=customer.get('name'),
+        customer_phone=customer.get('phone'),
+        subtotal=Decimal(str(session_data['subtotal'])),
+        tax_amount=Decimal(str(session_data['tax_amount'])),
+        shipping_amount=Decimal(str(session_data['shipping_amount'])),
+        total_amount=Decimal(str(session_data['total_amount'])),
+        currency=session_data.get('currency', 'USD'),
+        order_status=OrderStatus.PROCESSING.value,
+        payment_status='paid',
+        shipping_status='not_shipped',
+        billing_address=json.dumps(billing_address) if billing_address is not None else None,
+        shipping_address=json.dumps(shipping_address) if shipping_address is not None else None,
+        payment_method='stripe',
+        payment_reference=session_data['stripe_payment_intent_id'],
+        paid_at=now,
+        requires_shipping=session_data.get('requires_shipping', False)
+    )
+    session.add(order)
+    session.flush()  # Get order ID
+
+    items = session_data.get('items', [])
+    for item in items:
+        session.add(ShopOrderItem(
+            order_id=order.id,
+            product_id=item['product_id'],
+            product_sku=item['product_sku'],
+            product_name=item['product_name'],
+            quantity=item['quantity'],
+            unit_price=Decimal(str(item['unit_price'])),
+            total_price=Decimal(str(item['total_price']))
+        ))
+
+    # Reserved stock becomes the order's; a lapsed reservation is taken again if stock allows
+    inventory_reservations.convert(
+        session, checkout_session_id, order.id, [(item['product_id'], item['quantity']) for item in items], now=now
+    )
+    return order
+
+
+def complete_order_details(order: ShopOrder, customer: Optional[Dict] = None, billing_address: Optional[Dict] = None,
+                           shipping_address: Optional[Dict] = None) -> None:
+    """Fill in the contact and address fields a webhook-created order could not know"""
+    customer = customer or {}
+    for field, value in (('customer_email', customer.get('email')), ('customer_name', customer.get('name')),
+                         ('customer_phone', customer.get('phone')),
+                         ('billing_address', json.dumps(billing_address) if billing_address else None),
+                         ('shipping_address', json.dumps(shipping_address) if shipping_address else None)):
+        if value and not getattr(order, field):
+            setattr(order, field, value)
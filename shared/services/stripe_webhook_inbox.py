@@ -0,0 +1,478 @@
+"""
+Stripe Webhook Inbox
+The webhook endpoint only verifies Stripe's signature and stores the raw event
+keyed by its event id, then acknowledges; redeliveries of the same event are
+stored once. A worker applies stored events exactly once, in event order per
+Stripe object, retrying failures with backoff: it credits wallet deposits,
+creates the order of a paid checkout the client never came back to confirm,
+marks shop orders paid or failed and gives the stock of failed orders and
+checkouts back.
+"""
+
+import os
+import hmac
+import json
+import atexit
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, exists, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from shared.models.shop import (
+    OrderStatus, ShopCheckoutSession, ShopInventoryLog, ShopOrder, ShopOrderItem, ShopProduct
+)
+from shared.models.stripe_webhooks import StripeWebhookEvent
+from shared.services import inventory_reservations, wallet_ledger
+from shared.services.inventory_reservations import OutOfStock
+from shared.services.shop_checkout import create_paid_order
+
+logger = logging.getLogger(__name__)
+
+# Inbox configuration
+STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
+SIGNATURE_TOLERANCE_SECONDS = int(os.getenv("STRIPE_WEBHOOK_TOLERANCE_SECONDS", "300"))
+WORKER_INTERVAL = float(os.getenv("STRIPE_WEBHOOK_WORKER_INTERVAL", "5"))
+LEASE_SECONDS = int(os.getenv("STRIPE_WEBHOOK_LEASE_SECONDS", "120"))
+MAX_ATTEMPTS = int(os.getenv("STRIPE_WEBHOOK_MAX_ATTEMPTS", "8"))
+RETRY_BASE_SECONDS = int(os.getenv("STRIPE_WEBHOOK_RETRY_BASE_SECONDS", "30"))
+RETRY_MAX_SECONDS = 3600
+CLAIM_BATCH_SIZE = 20
+
+# stripe_webhook_events.status values
+PENDING = "pending"
+PROCESSING = "processing"
+PROCESSED = "processed"
+SKIPPED = "skipped"
+FAILED = "failed"
+UNFINISHED = (PENDING, PROCESSING)
+
+PAID = "paid"
+
+
+class WebhookError(Exception):
+    """Raised when a webhook delivery cannot be accepted"""
+    pass
+
+
+class WebhookSignatureError(WebhookError):
+    """The Stripe-Signature header does not match the payload"""
+    pass
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+# === SIGNATURES ===
+
+def sign_payload(payload: bytes, secret: str, timestamp: int) -> str:
+    """Stripe-Signature header for payload, as Stripe computes it"""
+    digest = hmac.new(secret.encode(), f"{timestamp}.".encode() + payload, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def verify_signature(payload: bytes, header: str, secret: str, now: Optional[datetime] = None,
+                     tolerance: int = SIGNATURE_TOLERANCE_SECONDS) -> Dict:
+    """Check a Stripe-Signature header (v1 scheme) and return the decoded event"""
+    parts = [item.split("=", 1) for item in (header or "").split(",") if "=" in item]
+    timestamps = [value for key, value in parts if key.strip() == "t"]
+    signatures = [value for key, value in parts if key.strip() == "v1"]
+    if not timestamps or not signatures or not timestamps[0].isdigit():
+        raise WebhookSignatureError("Malformed signature header")
+
+    timestamp = int(timestamps[0])
+    expected = sign_payload(payload, secret, timestamp).split("v1=", 1)[1]
+    if not any(hmac.compare_digest(expected, signature) for signature in signatures):
+        raise WebhookSignatureError("Signature mismatch")
+    if (now or utcnow()).timestamp() - timestamp > tolerance:
+        raise WebhookSignatureError("Signature timestamp outside the tolerance")
+
+    try:
+        event = json.loads(payload)
+        event["id"], event["type"], event["created"], event["data"]["object"]
+    except (ValueError, KeyError, TypeError):
+        raise WebhookError("Invalid event payload")
+    return event
+
+
+# === HANDLERS ===
+# Each runs inside the worker's transaction, which also marks the event processed
+
+def _order_for_intent(session, payment_intent_id: str) -> Optional[ShopOrder]:
+    return session.query(ShopOrder).filter(
+        ShopOrder.payment_reference == payment_intent_id
+    ).with_for_update().first()
+
+
+def _move_stock(session, order: ShopOrder, direction: int, change_type: str, reason: str, now: datetime) -> bool:
+    """
+    Give an order's tracked stock back (direction 1) or take it again (direction -1)
+
+    Taking is all or nothing: if any product is short, nothing changes.
+    """
+    products = ShopProduct.__table__
+    items = session.query(ShopOrderItem).filter(ShopOrderItem.order_id == order.id).all()
+    savepoint = session.begin_nested()
+    logs = []
+    for item in items:
+        change = direction * item.quantity
+        conditions = [products.c.id == item.product_id, products.c.track_inventory.is_(True),
+                      products.c.stock_quantity.isnot(None)]
+        if direction < 0:
+            conditions.append(products.c.stock_quantity >= item.quantity)
+        row = session.execute(
+            update(products).where(*conditions)
+            .values(stock_quantity=products.c.stock_quantity + change, updated_at=now)
+            .returning(products.c.stock_quantity, products.c.track_inventory)
+        ).first()
+        if row is None:
+            tracked = session.execute(
+                select(products.c.track_inventory, products.c.stock_quantity).where(products.c.id == item.product_id)
+            ).first()
+            if direction < 0 and tracked and tracked[0] and tracked[1] is not None:
+                savepoint.rollback()
+                return False
+            continue
+        logs.append(ShopInventoryLog(
+            product_id=item.product_id, change_type=change_type, quantity_before=row[0] - change,
+            quantity_change=change, quantity_after=row[0], reference_type="order", reference_id=order.id,
+            reason=reason, changed_by="stripe_webhook", created_at=now
+        ))
+    session.add_all(logs)
+    savepoint.commit()
+    return True
+
+
+def _order_for_checkout(session, intent: Dict, checkout_session_id: str, now: datetime) -> str:
+    """Create the order of a paid checkout, in case the client closed the page before confirming it"""
+    checkout = session.query(ShopCheckoutSession).filter(
+        ShopCheckoutSession.session_id == checkout_session_id
+    ).first()
+    if checkout is None or checkout.session_data.get("stripe_payment_intent_id") != intent["id"]:
+        return "no checkout for payment"
+
+    savepoint = session.begin_nested()
+    try:
+        order = create_paid_order(session, checkout_session_id, checkout.session_data, now,
+                                  customer_id=checkout.session_data.get("customer_id"),
+                                  customer={"email": intent.get("receipt_email")},
+                                  shipping_address=intent.get("shipping"))
+    except OutOfStock:
+        savepoint.rollback()
+        logger.error(f"Checkout {checkout_session_id} paid with {intent['id']} but its stock is gone; refund required")
+        return f"checkout {checkout_session_id} sold out; refund required"
+    savepoint.commit()
+    if order is None:
+        return "checkout already processed"
+    return f"order {order.order_number} created from checkout {checkout_session_id}"
+
+
+def handle_payment_succeeded(session, event: Dict, now: datetime) -> str:
+    intent = event["data"]["object"]
+    metadata = intent.get("metadata") or {}
+
+    if metadata.get("type") == "wallet_deposit" and metadata.get("wallet_id"):
+        # The ledger entry is keyed on the payment intent as well
+        cents = intent.get("amount_received") or intent["amount"]
+        result = wallet_ledger.credit_deposit(session, int(metadata["wallet_id"]), Decimal(cents) / 100,
+                                              intent["id"], now=now)
+        return "deposit already credited" if result.replayed else f"wallet {result.wallet_id} credited"
+
+    order = _order_for_intent(session, intent["id"])
+    if order is None and metadata.get("session_id"):
+        return _order_for_checkout(session, intent, metadata["session_id"], now)
+    if order is None:
+        return "no order for payment"
+    if order.payment_status == PAID:
+        return "order already paid"
+
+    order.payment_status = PAID
+    order.paid_at = now
+    if order.order_status == OrderStatus.PENDING.value:
+        order.order_status = OrderStatus.PROCESSING.value
+        return f"order {order.order_number} paid"
+
+    # An earlier failure released the stock; take it again or leave it to an admin
+    if order.order_status == OrderStatus.FAILED.value and _move_stock(
+            session, order, -1, "sale", f"Paid after failure, order {order.order_number}", now):
+        order.order_status = OrderStatus.PROCESSING.value
+        return f"order {order.order_number} paid after failure"
+    note = f"{now.isoformat()} payment captured after the order was {order.order_status}; refund or fulfil manually"
+    order.admin_notes = f"{order.admin_notes}\n{note}" if order.admin_notes else note
+    logger.error(f"Order {order.order_number}: {note}")
+    return f"order {order.order_number} needs attention"
+
+
+def handle_payment_failed(session, event: Dict, now: datetime) -> str:
+    intent = event["data"]["object"]
+    metadata = intent.get("metadata") or {}
+
+    if metadata.get("type") == "wallet_deposit":
+        return "deposit not captured"  # Nothing was credited
+
+    outcome = []
+    order = _order_for_intent(session, intent["id"])
+    if order is not None and order.order_status == OrderStatus.PENDING.value and order.payment_status != PAID:
+        order.order_status = OrderStatus.FAILED.value
+        order.payment_status = "failed"
+        _move_stock(session, order, 1, "release", f"Payment failed, order {order.order_number}", now)
+        outcome.append(f"order {order.order_number} failed")
+
+    if metadata.get("session_id"):
+        # The checkout stays usable: a retried payment takes the stock again if it is still there
+        units = inventory_reservations.release(session, metadata["session_id"], "Payment failed", now=now)
+        if units:
+            outcome.append(f"{units} reserved units released")
+    return ", ".join(outcome) or "nothing to release"
+
+
+HANDLERS: Dict[str, Callable] = {
+    "payment_intent.succeeded": handle_payment_succeeded,
+    "payment_intent.payment_failed": handle_payment_failed,
+    "payment_intent.canceled": handle_payment_failed,
+}
+
+
+# === INBOX ===
+
+class WebhookInbox:
+    """
+    Stores verified events and runs the worker that applies them
+
+    A claimed event is leased to one worker; its handler's writes and the
+    'processed' mark commit together, and only while the lease is still that
+    worker's (fenced on the attempt counter), so an event's effects land once even
+    when a slow worker's lease is taken over. An event is not claimed while an
+    older event for the same object is unfinished, and an event older than one
+    already processed for its object is skipped as superseded.
+    """
+
+    def __init__(self, session_factory=None, secret: Optional[str] = None, handlers: Optional[Dict] = None,
+                 interval: float = WORKER_INTERVAL, lease_seconds: int = LEASE_SECONDS,
+                 max_attempts: int = MAX_ATTEMPTS, retry_base_seconds: int = RETRY_BASE_SECONDS,
+                 batch_size: int = CLAIM_BATCH_SIZE, clock=utcnow):
+        self._session_factory = session_factory
+        self.secret = secret if secret is not None else STRIPE_WEBHOOK_SECRET
+        self.handlers = handlers if handlers is not None else HANDLERS
+        self.interval = interval
+        self.lease = timedelta(seconds=lease_seconds)
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.batch_size = batch_size
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self.received = 0
+        self.duplicates = 0
+        self.processed = 0
+        self.skipped = 0
+        self.retried = 0
+        self.failed = 0
+
+        self.running = False
+        self.worker_thread = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            from shared.database.connection import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    # --- Receiving ---
+
+    def ingest(self, payload: bytes, signature: str) -> Tuple[str, bool]:
+        """Verify and store one delivery; returns (event id, whether it was new)"""
+        if not self.secret:
+            raise WebhookError("Webhook not configured")
+        now = self.clock()
+        event = verify_signature(payload, signature, self.secret, now=now)
+        stored = StripeWebhookEvent(
+            event_id=event["id"], event_type=event["type"],
+            object_id=event["data"]["object"].get("id") or event["id"],
+            event_created=datetime.fromtimestamp(event["created"], tz=timezone.utc),
+            payload=payload.decode("utf-8"), status=PENDING, next_attempt_at=now, received_at=now
+        )
+        with self.session_factory() as session:
+            session.add(stored)
+            try:
+                session.commit()
+            except IntegrityError:
+                session.rollback()
+                with self._lock:
+                    self.duplicates += 1
+                return event["id"], False
+        with self._lock:
+            self.received += 1
+        self._wake.set()
+        return event["id"], True
+
+    # --- Processing ---
+
+    def claim(self) -> List:
+        events = StripeWebhookEvent.__table__
+        other = events.alias("other")
+        now = self.clock()
+        blocked = exists().where(
+            other.c.object_id == events.c.object_id,
+            other.c.status.in_(UNFINISHED),
+            or_(
+                and_(other.c.status == PROCESSING, other.c.next_attempt_at > now),
+                other.c.event_created < events.c.event_created,
+                and_(other.c.event_created == events.c.event_created, other.c.id < events.c.id)
+            )
+        )
+        due = and_(events.c.status.in_(UNFINISHED), events.c.next_attempt_at <= now)
+        candidates = (
+            select(events.c.id).where(due, ~blocked)
+            .order_by(events.c.event_created, events.c.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True, of=events)
+        )
+        with self.session_factory() as session:
+            rows = session.execute(
+                update(events).where(events.c.id.in_(candidates.scalar_subquery()), due)
+                .values(status=PROCESSING, next_attempt_at=now + self.lease, attempts=events.c.attempts + 1)
+                .returning(events.c.id, events.c.event_id, events.c.event_type, events.c.object_id,
+                           events.c.event_created, events.c.payload, events.c.attempts)
+            ).all()
+            session.commit()
+        return sorted(rows, key=lambda row: (_as_utc(row.event_created), row.id))
+
+    def _finish(self, session, row, **values) -> bool:
+        events = StripeWebhookEvent.__table__
+        return session.execute(
+            update(events)
+            .where(events.c.id == row.id, events.c.status == PROCESSING, events.c.attempts == row.attempts)
+            .values(**values)
+        ).rowcount == 1
+
+    def process(self, row) -> str:
+        """Apply one claimed event; returns the status it ended in"""
+        events = StripeWebhookEvent.__table__
+        now = self.clock()
+        with self.session_factory() as session:
+            superseded = session.execute(
+                select(events.c.id).where(
+                    events.c.object_id == row.object_id, events.c.status == PROCESSED,
+                    events.c.event_created > row.event_created
+                ).limit(1)
+            ).first()
+            try:
+                if superseded:
+                    status, note = SKIPPED, "superseded by a newer event"
+                else:
+                    handler = self.handlers.get(row.event_type)
+                    status, note = PROCESSED, handler(session, json.loads(row.payload), now) if handler else "ignored"
+                if not self._finish(session, row, status=status, processed_at=now, last_error=None):
+                    session.rollback()
+                    logger.warning(f"Stripe event {row.event_id} lease lost; its work was rolled back")
+                    return PROCESSING
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                status = FAILED if row.attempts >= self.max_attempts else PENDING
+                delay = min(RETRY_MAX_SECONDS, self.retry_base_seconds * 2 ** (row.attempts - 1))
+                self._finish(session, row, status=status, last_error=str(e)[:2000],
+                             next_attempt_at=now + timedelta(seconds=delay))
+                session.commit()
+                with self._lock:
+                    if status == FAILED:
+                        self.failed += 1
+                    else:
+                        self.retried += 1
+                log = logger.error if status == FAILED else logger.warning
+                log(f"Stripe event {row.event_id} ({row.event_type}) attempt {row.attempts} failed: {e}")
+                return status
+
+        with self._lock:
+            if status == SKIPPED:
+                self.skipped += 1
+            else:
+                self.processed += 1
+        logger.info(f"Stripe event {row.event_id} ({row.event_type}) {status}: {note}")
+        return status
+
+    def run_once(self) -> int:
+        """Claim and apply one batch; returns the number of events handled"""
+        rows = self.claim()
+        for row in rows:
+            self.process(row)
+        return len(rows)
+
+    def drain(self) -> int:
+        """Apply everything that is due now"""
+        total = 0
+        while True:
+            handled = self.run_once()
+            if not handled:
+                return total
+            total += handled
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'received': self.received,
+                'duplicates': self.duplicates,
+                'processed': self.processed,
+                'skipped': self.skipped,
+                'retried': self.retried,
+                'failed': self.failed,
+                'worker_running': self.running
+            }
+
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            try:
+                if self.run_once():
+                    continue
+            except Exception as e:
+                logger.error(f"Stripe webhook worker error: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def start(self):
+        """Start the worker; new deliveries wake it, retries are picked up every interval"""
+        if self.running:
+            return
+        self.running = True
+        self._stop.clear()
+        self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
+        self.worker_thread.start()
+        atexit.register(self.stop)
+        logger.info(f"Stripe webhook worker started (every {self.interval:.0f}s)")
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self._stop.set()
+        self._wake.set()
+        if self.worker_thread:
+            self.worker_thread.join(timeout=10)
+        logger.info("Stripe webhook worker stopped")
+
+
+_webhook_inbox: Optional[WebhookInbox] = None
+_webhook_inbox_lock = threading.Lock()
+
+
+def get_webhook_inbox() -> WebhookInbox:
+    """Get the process-wide Stripe webhook inbox"""
+    global _webhook_inbox
+    if _webhook_inbox is None:
+        with _webhook_inbox_lock:
+            if _webhook_inbox is None:
+                _webhook_inbox = WebhookInbox()
+    return _webhook_inbox
@@ -0,0 +1,559 @@
+"""
+Tournament Bracket Engine
+ELO seeding, Swiss pairings and single/double elimination brackets, with bulk creation
+of each round's TournamentMatch / Match rows and automatic round advancement
+"""
+
+import math
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func, insert, update
+from sqlalchemy.orm import Session
+
+from shared.models.base import Player, Match, MatchParticipant, MatchStatus
+from shared.models.tournaments import (
+    Tournament, TournamentParticipant, TournamentMatch, TournamentStatus, TournamentType
+)
+
+logger = logging.getLogger(__name__)
+
+# Bracket names stored in tournament_matches.bracket
+MAIN = "main"
+WINNERS = "winners"
+LOSERS = "losers"
+GRAND_FINAL = "grand_final"
+
+# Give up on rematch-free Swiss pairing after this many backtracking steps
+MAX_SWISS_BACKTRACK = 100000
+
+
+class BracketError(Exception):
+    """Raised when a bracket operation is not valid for the tournament's state"""
+    pass
+
+
+@dataclass
+class Entrant:
+    """Seeded tournament entrant"""
+    player_id: int
+    elo: int
+    seed: int = 0
+
+
+@dataclass
+class Pairing:
+    """One match of a round to be created; player2_id is None for a bye"""
+    player1_id: int
+    player2_id: Optional[int]
+    bracket: str = MAIN
+
+    @property
+    def is_bye(self) -> bool:
+        return self.player2_id is None
+
+
+@dataclass
+class PlayedMatch:
+    """Lightweight view of a tournament_matches row used for pairing"""
+    round_number: int
+    match_number: int
+    bracket: str
+    player1_id: Optional[int]
+    player2_id: Optional[int]
+    winner_id: Optional[int]
+    is_bye: bool
+    completed: bool
+
+    @property
+    def loser_id(self) -> Optional[int]:
+        if self.is_bye or self.winner_id is None:
+            return None
+        return self.player2_id if self.winner_id == self.player1_id else self.player1_id
+
+
+# === SEEDING ===
+
+def seed_entrants(entrants: Iterable[Entrant]) -> List[Entrant]:
+    """Order entrants by ELO (ties by player id) and assign seeds 1..n"""
+    ordered = sorted(entrants, key=lambda e: (-e.elo, e.player_id))
+    for seed, entrant in enumerate(ordered, start=1):
+        entrant.seed = seed
+    return ordered
+
+
+def bracket_seed_order(size: int) -> List[int]:
+    """Standard bracket positions for a power-of-two field: 1, size, size/2+1, size/2, ..."""
+    order = [1]
+    while len(order) < size:
+        total = len(order) * 2 + 1
+        order = [seed for s in order for seed in (s, total - s)]
+    return order
+
+
+# === PAIRING ENGINES ===
+
+class SwissPairer:
+    """Swiss-system rounds: score groups, fold pairing, no rematches, one bye per player"""
+
+    def standings(self, entrants: List[Entrant], history: List[PlayedMatch]) -> List[Tuple[Entrant, float, float]]:
+        """(entrant, points, buchholz) ordered best first"""
+        points: Dict[int, float] = defaultdict(float)
+        opponents: Dict[int, List[int]] = defaultdict(list)
+        for match in history:
+            if not match.completed:
+                continue
+            if match.is_bye:
+                points[match.player1_id] += 1
+                continue
+            opponents[match.player1_id].append(match.player2_id)
+            opponents[match.player2_id].append(match.player1_id)
+            if match.winner_id is None:
+                points[match.player1_id] += 0.5
+                points[match.player2_id] += 0.5
+            else:
+                points[match.winner_id] += 1
+
+        rows = []
+        for entrant in entrants:
+            buchholz = sum(points[o] for o in opponents[entrant.player_id])
+            rows.append((entrant, points[entrant.player_id], buchholz))
+        rows.sort(key=lambda row: (-row[1], -row[2], row[0].seed))
+        return rows
+
+    def pair_round(self, entrants: List[Entrant], history: List[PlayedMatch]) -> List[Pairing]:
+        played: Set[Tuple[int, int]] = set()
+        had_bye: Set[int] = set()
+        for match in history:
+            if match.is_bye:
+                had_bye.add(match.player1_id)
+            elif match.player1_id is not None and match.player2_id is not None:
+                played.add((match.player1_id, match.player2_id))
+                played.add((match.player2_id, match.player1_id))
+
+        points: Dict[int, float] = {}
+        for entrant, score, _ in self.standings(entrants, history):
+            points[entrant.player_id] = score
+        ranked = sorted(entrants, key=lambda e: (-points[e.player_id], e.seed))
+
+        pairings = []
+        if len(ranked) % 2:
+            # Bye to the lowest-ranked player who has not had one yet
+            bye = next((e for e in reversed(ranked) if e.player_id not in had_bye), ranked[-1])
+            ranked.remove(bye)
+            pairings.append(Pairing(bye.player_id, None))
+
+        # Fold each score group (top half meets bottom half) before pairing in order
+        order: List[int] = []
+        group: List[int] = []
+        for entrant in ranked:
+            if group and points[entrant.player_id] != points[group[0]]:
+                order.extend(_fold(group))
+                group = []
+            group.append(entrant.player_id)
+        order.extend(_fold(group))
+
+        pairs = pair_without_rematches(order, played)
+        if pairs is None:
+            logger.warning("Swiss pairing could not avoid rematches; pairing in standings order")
+            pairs = [(order[i], order[i + 1]) for i in range(0, len(order), 2)]
+        pairings.extend(Pairing(a, b) for a, b in pairs)
+        return pairings
+
+
+def _fold(group: List[int]) -> List[int]:
+    half = (len(group) + 1) // 2
+    top, bottom = group[:half], group[half:]
+    folded = []
+    for i in range(half):
+        folded.append(top[i])
+        if i < len(bottom):
+            folded.append(bottom[i])
+    return folded
+
+
+def pair_without_rematches(order: List[int], played: Set[Tuple[int, int]]) -> Optional[List[Tuple[int, int]]]:
+    """
+    Pair players in preference order, each with the nearest unpaired player they
+    have not met, backtracking iteratively when someone is left without an opponent
+    """
+    n = len(order)
+    paired = [False] * n
+    stack: List[Tuple[int, int]] = []  # (i, j) choices made
+    i, j_start = 0, None
+    steps = 0
+
+    while True:
+        if j_start is None:
+            while i < n and paired[i]:
+                i += 1
+            if i >= n:
+                return [(order[a], order[b]) for a, b in stack]
+            j_start = i + 1
+
+        j = j_start
+        while j < n and (paired[j] or (order[i], order[j]) in played):
+            j += 1
+
+        if j < n:
+            paired[i] = paired[j] = True
+            stack.append((i, j))
+            i, j_start = i + 1, None
+            continue
+
+        # Dead end: undo the last choice and try that player's next candidate
+        steps += 1
+        if not stack or steps > MAX_SWISS_BACKTRACK:
+            return None
+        i, j = stack.pop()
+        paired[i] = paired[j] = False
+        j_start = j + 1
+
+
+class EliminationBracket:
+    """Single elimination, or double elimination when double=True"""
+
+    def __init__(self, double: bool = False):
+        self.double = double
+
+    def first_round(self, entrants: List[Entrant]) -> List[Pairing]:
+        size = 1 << max(1, math.ceil(math.log2(len(entrants))))
+        by_seed = {e.seed: e.player_id for e in entrants}
+        positions = [by_seed.get(seed) for seed in bracket_seed_order(size)]
+        bracket = WINNERS if self.double else MAIN
+
+        pairings = []
+        for a, b in zip(positions[0::2], positions[1::2]):
+            # Top seeds are placed against the missing (bye) seeds
+            if a is None:
+                a, b = b, None
+            pairings.append(Pairing(a, b, bracket))
+        return pairings
+
+    def next_round(self, entrants: List[Entrant], history: List[PlayedMatch]) -> List[Pairing]:
+        """Pairings for the round after the latest one; empty when the event is decided"""
+        last_round = max(m.round_number for m in history)
+        latest = sorted((m for m in history if m.round_number == last_round),
+                        key=lambda m: m.match_number)
+
+        if not self.double:
+            winners = [m.winner_id for m in latest]
+            if len(winners) <= 1:
+                return []
+            return [Pairing(a, b) for a, b in zip(winners[0::2], winners[1::2])]
+
+        return self._next_double_round(history, latest)
+
+    def _next_double_round(self, history: List[PlayedMatch], latest: List[PlayedMatch]) -> List[Pairing]:
+        losses: Dict[int, int] = defaultdict(int)
+        played: Set[Tuple[int, int]] = set()
+        for match in history:
+            if match.loser_id is not None:
+                losses[match.loser_id] += 1
+                played.add((match.player1_id, match.player2_id))
+                played.add((match.player2_id, match.player1_id))
+
+        grand_finals = [m for m in latest if m.bracket == GRAND_FINAL]
+        if grand_finals:
+            final = grand_finals[0]
+            # Bracket reset only if the losers-bracket champion won the first final
+            if losses[final.player1_id] == 1 and losses[final.player2_id] == 1:
+                if sum(1 for m in history if m.bracket == GRAND_FINAL) == 1:
+                    return [Pairing(final.player1_id, final.player2_id, GRAND_FINAL)]
+            return []
+
+        winners_alive = [m.winner_id for m in latest if m.bracket == WINNERS]
+        if not winners_alive:
+            # Winners bracket finished earlier; its champion is still waiting
+            winners_alive = [p for p in _winners_bracket_champion(history) if losses[p] == 0]
+
+        # Losers bracket order: survivors first, then players who just dropped
+        losers_alive = [m.winner_id for m in latest if m.bracket == LOSERS]
+        losers_alive += [m.loser_id for m in latest if m.bracket == WINNERS and m.loser_id is not None]
+        losers_alive = [p for p in losers_alive if losses[p] == 1]
+
+        if len(winners_alive) == 1 and len(losers_alive) == 1:
+            return [Pairing(winners_alive[0], losers_alive[0], GRAND_FINAL)]
+        if len(winners_alive) == 1 and not losers_alive:
+            return []
+
+        pairings = []
+        if len(winners_alive) > 1:
+            pairings.extend(Pairing(a, b, WINNERS) for a, b in zip(winners_alive[0::2], winners_alive[1::2]))
+
+        if len(losers_alive) > 1:
+            if len(losers_alive) % 2:
+                pairings.append(Pairing(losers_alive.pop(), None, LOSERS))
+            pairs = pair_without_rematches(losers_alive, played) or list(zip(losers_alive[0::2], losers_alive[1::2]))
+            pairings.extend(Pairing(a, b, LOSERS) for a, b in pairs)
+        elif losers_alive:
+            # Lone losers-bracket player waits for the winners bracket to finish
+            pairings.append(Pairing(losers_alive[0], None, LOSERS))
+        return pairings
+
+    @staticmethod
+    def placements(entrants: List[Entrant], history: List[PlayedMatch], double: bool) -> Dict[int, int]:
+        """Final placement per player: players knocked out in the same round share a place"""
+        eliminations_allowed = 2 if double else 1
+        losses: Dict[int, int] = defaultdict(int)
+        knocked_out_round: Dict[int, int] = {}
+        for match in sorted(history, key=lambda m: (m.round_number, m.match_number)):
+            loser = match.loser_id
+            if loser is None:
+                continue
+            losses[loser] += 1
+            if losses[loser] >= eliminations_allowed:
+                knocked_out_round[loser] = match.round_number
+
+        placements = {}
+        remaining = len(entrants)
+        for round_number in sorted(set(knocked_out_round.values())):
+            out = [p for p, r in knocked_out_round.items() if r == round_number]
+            for player_id in out:
+                placements[player_id] = remaining - len(out) + 1
+            remaining -= len(out)
+        for entrant in entrants:
+            placements.setdefault(entrant.player_id, 1)
+        return placements
+
+
+def _winners_bracket_champion(history: List[PlayedMatch]) -> List[int]:
+    last_winners_round = max((m.round_number for m in history if m.bracket == WINNERS), default=None)
+    if last_winners_round is None:
+        return []
+    return [m.winner_id for m in history if m.bracket == WINNERS and m.round_number == last_winners_round]
+
+
+# === DATABASE SERVICE ===
+
+class TournamentBracketService:
+    """Creates rounds in bulk and advances them as match results arrive"""
+
+    def __init__(self, clock=lambda: datetime.now(timezone.utc)):
+        self._clock = clock
+
+    # --- Loading ---
+
+    def _load_entrants(self, session: Session, tournament_id: int) -> List[Entrant]:
+        rows = session.query(
+            TournamentParticipant.player_id, Player.elo_rating, TournamentParticipant.seed
+        ).join(Player, Player.id == TournamentParticipant.player_id).filter(
+            TournamentParticipant.tournament_id == tournament_id,
+            TournamentParticipant.is_active == True
+        ).all()
+        return [Entrant(player_id, elo or 0, seed or 0) for player_id, elo, seed in rows]
+
+    def _load_history(self, session: Session, tournament_id: int) -> List[PlayedMatch]:
+        rows = session.query(
+            TournamentMatch.round_number, TournamentMatch.match_number, TournamentMatch.bracket,
+            TournamentMatch.player1_id, TournamentMatch.player2_id, TournamentMatch.winner_id,
+            TournamentMatch.is_bye, TournamentMatch.completed_at
+        ).filter(TournamentMatch.tournament_id == tournament_id).all()
+        return [
+            PlayedMatch(r[0], r[1], r[2], r[3], r[4], r[5], r[6], r[7] is not None)
+            for r in rows
+        ]
+
+    # --- Round creation ---
+
+    def _create_round(self, session: Session, tournament: Tournament, round_number: int,
+                      pairings: List[Pairing]) -> int:
+        """Insert a round's Match, MatchParticipant and TournamentMatch rows in bulk"""
+        now = self._clock()
+        played = [p for p in pairings if not p.is_bye]
+
+        match_ids: List[int] = []
+        if played:
+            match_ids = list(session.execute(
+                insert(Match).returning(Match.id, sort_by_parameter_order=True),
+                [{"status": MatchStatus.queued, "created_at": now} for _ in played]
+            ).scalars())
+
+            participants = []
+            for match_id, pairing in zip(match_ids, played):
+                participants.append({"match_id": match_id, "player_id": pairing.player1_id, "team": 0, "joined_at": now})
+                participants.append({"match_id": match_id, "player_id": pairing.player2_id, "team": 1, "joined_at": now})
+            session.execute(insert(MatchParticipant), participants)
+
+        match_iter = iter(match_ids)
+        rows = []
+        for match_number, pairing in enumerate(pairings, start=1):
+            rows.append({
+                "tournament_id": tournament.id,
+                "round_number": round_number,
+                "match_number": match_number,
+                "bracket": pairing.bracket,
+                "player1_id": pairing.player1_id,
+                "player2_id": pairing.player2_id,
+                "winner_id": pairing.player1_id if pairing.is_bye else None,
+                "match_id": None if pairing.is_bye else next(match_iter),
+                "is_bye": pairing.is_bye,
+                "scheduled_at": now,
+                "completed_at": now if pairing.is_bye else None
+            })
+        session.execute(insert(TournamentMatch), rows)
+
+        logger.info(f"Tournament {tournament.id}: created round {round_number} "
+                    f"({len(played)} matches, {len(pairings) - len(played)} byes)")
+        return len(rows)
+
+    def _pairer(self, tournament: Tournament):
+        if tournament.tournament_type == TournamentType.SWISS:
+            return SwissPairer()
+        if tournament.tournament_type == TournamentType.SINGLE_ELIMINATION:
+            return EliminationBracket(double=False)
+        if tournament.tournament_type == TournamentType.DOUBLE_ELIMINATION:
+            return EliminationBracket(double=True)
+        raise BracketError(f"Unsupported tournament type: {tournament.tournament_type.value}")
+
+    def _swiss_rounds(self, tournament: Tournament, entrant_count: int) -> int:
+        settings = tournament.tournament_settings or {}
+        return int(settings.get('swiss_rounds') or max(1, math.ceil(math.log2(entrant_count))))
+
+    # --- Public API ---
+
+    def start(self, session: Session, tournament: Tournament) -> Dict:
+        """Seed participants by ELO and create round 1; caller commits"""
+        entrants = seed_entrants(self._load_entrants(session, tournament.id))
+        if len(entrants) < 2:
+            raise BracketError("At least two active participants are required")
+
+        seeds = {e.player_id: e.seed for e in entrants}
+        participants = session.query(TournamentParticipant.id, TournamentParticipant.player_id).filter(
+            TournamentParticipant.tournament_id == tournament.id,
+            TournamentParticipant.is_active == True
+        ).all()
+        session.execute(update(TournamentParticipant), [
+            {"id": participant_id, "seed": seeds[player_id]} for participant_id, player_id in participants
+        ])
+
+        pairer = self._pairer(tournament)
+        if isinstance(pairer, SwissPairer):
+            pairings = pairer.pair_round(entrants, [])
+        else:
+            pairings = pairer.first_round(entrants)
+
+        created = self._create_round(session, tournament, 1, pairings)
+        return {"round": 1, "matches_created": created, "participants": len(entrants)}
+
+    def record_result(self, session: Session, tournament_match: TournamentMatch,
+                      winner_id: Optional[int]) -> Dict:
+        """
+        Record a tournament match result (winner_id None is a draw, Swiss only)
+        and create the next round once the current one is complete; caller commits
+        """
+        # Serialize result reporting per tournament so a round advances exactly once
+        tournament = session.query(Tournament).filter(
+            Tournament.id == tournament_match.tournament_id
+        ).with_for_update().one()
+
+        if tournament_match.completed_at is not None:
+            return {"advanced": False, "already_recorded": True}
+        if winner_id is not None and winner_id not in (tournament_match.player1_id, tournament_match.player2_id):
+            raise BracketError("Winner is not a player in this match")
+        if winner_id is None and tournament.tournament_type != TournamentType.SWISS:
+            raise BracketError("Elimination matches cannot end in a draw")
+
+        tournament_match.winner_id = winner_id
+        tournament_match.completed_at = self._clock()
+        session.flush()
+
+        return self.advance(session, tournament, tournament_match.round_number)
+
+    def record_match_result(self, session: Session, match_id: int, winner_team: Optional[int]) -> Optional[Dict]:
+        """
+        Hook for the match lifecycle: map a finished Match to its tournament match
+
+        Called once the match itself is committed. An elimination match that ended
+        in a draw has no one to advance, so it is left open for a replay instead of
+        being recorded; caller commits
+        """
+        tournament_match = session.query(TournamentMatch).filter(
+            TournamentMatch.match_id == match_id
+        ).first()
+        if not tournament_match:
+            return None
+
+        winner_id = None
+        if winner_team is not None:
+            winner_id = tournament_match.player1_id if int(winner_team) == 0 else tournament_match.player2_id
+        elif session.query(Tournament.tournament_type).filter(
+            Tournament.id == tournament_match.tournament_id
+        ).scalar() != TournamentType.SWISS:
+            logger.warning(f"Tournament match {tournament_match.id}: match {match_id} was drawn, "
+                           f"left open for a replay")
+            return {"advanced": False, "needs_replay": True}
+        return self.record_result(session, tournament_match, winner_id)
+
+    def advance(self, session: Session, tournament: Tournament, round_number: int) -> Dict:
+        """Create round_number + 1 if round_number is complete (idempotent)"""
+        pending = session.query(func.count(TournamentMatch.id)).filter(
+            TournamentMatch.tournament_id == tournament.id,
+            TournamentMatch.round_number == round_number,
+            TournamentMatch.completed_at.is_(None)
+        ).scalar()
+        if pending:
+            return {"advanced": False, "pending_in_round": pending}
+
+        next_exists = session.query(TournamentMatch.id).filter(
+            TournamentMatch.tournament_id == tournament.id,
+            TournamentMatch.round_number == round_number + 1
+        ).first()
+        if next_exists:
+            return {"advanced": False}
+
+        entrants = self._load_entrants(session, tournament.id)
+        history = self._load_history(session, tournament.id)
+        pairer = self._pairer(tournament)
+
+        if isinstance(pairer, SwissPairer):
+            if round_number >= self._swiss_rounds(tournament, len(entrants)):
+                pairings = []
+            else:
+                pairings = pairer.pair_round(entrants, history)
+        else:
+            pairings = pairer.next_round(entrants, history)
+
+        if not pairings:
+            self._complete(session, tournament, entrants, history)
+            return {"advanced": False, "completed": True}
+
+        created = self._create_round(session, tournament, round_number + 1, pairings)
+        # A round made only of byes completes immediately
+        if all(p.is_bye for p in pairings):
+            return self.advance(session, tournament, round_number + 1)
+        return {"advanced": True, "round": round_number + 1, "matches_created": created}
+
+    def _complete(self, session: Session, tournament: Tournament, entrants: List[Entrant],
+                  history: List[PlayedMatch]):
+        if tournament.tournament_type == TournamentType.SWISS:
+            standings = SwissPairer().standings(entrants, history)
+            placements = {row[0].player_id: place for place, row in enumerate(standings, start=1)}
+        else:
+            placements = EliminationBracket.placements(
+                entrants, history, tournament.tournament_type == TournamentType.DOUBLE_ELIMINATION
+            )
+
+        now = self._clock()
+        participants = session.query(TournamentParticipant.id, TournamentParticipant.player_id).filter(
+            TournamentParticipant.tournament_id == tournament.id,
+            TournamentParticipant.is_active == True
+        ).all()
+        session.execute(update(TournamentParticipant), [
+            {
+                "id": participant_id,
+                "final_placement": placements.get(player_id),
+                "eliminated_at": None if placements.get(player_id) == 1 else now
+            }
+            for participant_id, player_id in participants
+        ])
+
+        tournament.status = TournamentStatus.COMPLETED
+        tournament.end_time = now
+        logger.info(f"Tournament {tournament.id} completed")
+
+
+bracket_service = TournamentBracketService()
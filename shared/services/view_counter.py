@@ -0,0 +1,243 @@
+"""
+CMS View Counter
+Counts public article / video views in memory, de-duplicated per viewer IP and
+session window, and flushes aggregated view_count increments plus a sample of
+ContentView rows in periodic batches instead of writing on every page view
+"""
+
+import os
+import atexit
+import random
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, insert, update
+
+from shared.models.cms import ContentView, NewsArticle, VideoContent
+
+logger = logging.getLogger(__name__)
+
+# Counter configuration
+VIEW_FLUSH_SECONDS = float(os.getenv("CMS_VIEW_FLUSH_SECONDS", "10"))
+VIEW_SESSION_SECONDS = float(os.getenv("CMS_VIEW_SESSION_SECONDS", "1800"))  # Repeat views inside count once
+VIEW_SAMPLE_RATE = float(os.getenv("CMS_VIEW_SAMPLE_RATE", "0.1"))  # Share of counted views kept as ContentView rows
+MAX_DEDUP_KEYS = int(os.getenv("CMS_VIEW_DEDUP_MAX_KEYS", "200000"))
+MAX_PENDING_SAMPLES = 10000
+
+ARTICLE = "article"
+VIDEO = "video"
+CONTENT_MODELS = {ARTICLE: NewsArticle, VIDEO: VideoContent}
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class ViewCounter:
+    """
+    Per-process view aggregation
+
+    view_count stays exact (every de-duplicated view is counted) while content_views
+    only receives a sample for analytics. De-duplication is per worker process, so
+    with N workers a viewer can be counted at most N times per session window.
+    """
+
+    def __init__(self, session_factory=None, flush_interval: float = VIEW_FLUSH_SECONDS,
+                 session_seconds: float = VIEW_SESSION_SECONDS, sample_rate: float = VIEW_SAMPLE_RATE,
+                 max_dedup_keys: int = MAX_DEDUP_KEYS, clock=time.monotonic, rng=None):
+        self._session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.session_seconds = session_seconds
+        self.sample_rate = sample_rate
+        self.max_dedup_keys = max_dedup_keys
+        self._clock = clock
+        self._rng = rng or random.Random()
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._seen: "OrderedDict[Tuple[str, int, str], float]" = OrderedDict()
+        self._pending: Dict[str, Dict[int, int]] = {ARTICLE: defaultdict(int), VIDEO: defaultdict(int)}
+        self._samples: List[Dict] = []
+        self.dropped_samples = 0
+
+        self.running = False
+        self.worker_thread = None
+        self._stop = threading.Event()
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            from shared.database.connection import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    # --- Recording ---
+
+    def record(self, kind: str, content_id: int, ip_address: str, user_agent: Optional[str] = None,
+               referrer: Optional[str] = None, player_id: Optional[int] = None) -> bool:
+        """Count one view; returns False when the viewer was already counted this session window"""
+        now = self._clock()
+        key = (kind, content_id, ip_address)
+        with self._lock:
+            seen_at = self._seen.get(key)
+            if seen_at is not None and now - seen_at < self.session_seconds:
+                return False
+            self._seen[key] = now
+            self._seen.move_to_end(key)
+            while len(self._seen) > self.max_dedup_keys:
+                self._seen.popitem(last=False)
+
+            self._pending[kind][content_id] += 1
+            if self._rng.random() < self.sample_rate:
+                if len(self._samples) < MAX_PENDING_SAMPLES:
+                    self._samples.append({
+                        'article_id': content_id if kind == ARTICLE else None,
+                        'video_id': content_id if kind == VIDEO else None,
+                        'player_id': player_id,
+                        'ip_address': ip_address,
+                        'user_agent': user_agent,
+                        'referrer': referrer[:500] if referrer else None,
+                        'viewed_at': utcnow()
+                    })
+                else:
+                    self.dropped_samples += 1
+        return True
+
+    def pending(self, kind: str, content_id: int) -> int:
+        """Views counted here but not flushed yet, so responses can show an up-to-date count"""
+        with self._lock:
+            return self._pending[kind].get(content_id, 0)
+
+    # --- Flushing ---
+
+    def _take(self) -> Tuple[Dict[str, Dict[int, int]], List[Dict]]:
+        with self._lock:
+            pending, samples = self._pending, self._samples
+            self._pending = {ARTICLE: defaultdict(int), VIDEO: defaultdict(int)}
+            self._samples = []
+        return pending, samples
+
+    def _restore(self, pending: Dict[str, Dict[int, int]], samples: List[Dict]):
+        """Put back a batch whose flush failed; the next flush retries it"""
+        with self._lock:
+            for kind, counts in pending.items():
+                for content_id, count in counts.items():
+                    self._pending[kind][content_id] += count
+            room = MAX_PENDING_SAMPLES - len(self._samples)
+            self._samples.extend(samples[:max(0, room)])
+            self.dropped_samples += max(0, len(samples) - max(0, room))
+
+    def flush(self) -> Dict[str, int]:
+        """
+        Apply pending increments in one transaction; rows are updated in id order so workers cannot deadlock
+
+        Sampled ContentView rows go in a second transaction once the counts are
+        committed. A batch of samples that fails is dropped rather than retried,
+        so a single bad row can never hold view_count back.
+        """
+        with self._flush_lock:
+            pending, samples = self._take()
+            if not any(pending.values()) and not samples:
+                return {'articles': 0, 'videos': 0, 'views': 0, 'samples': 0}
+
+            try:
+                with self.session_factory() as session:
+                    for kind, counts in pending.items():
+                        if not counts:
+                            continue
+                        model = CONTENT_MODELS[kind]
+                        session.execute(
+                            update(model.__table__)
+                            .where(model.__table__.c.id == bindparam('content_id'))
+                            .values(view_count=model.__table__.c.view_count + bindparam('views')),
+                            [{'content_id': cid, 'views': counts[cid]} for cid in sorted(counts)]
+                        )
+                    session.commit()
+            except Exception as e:
+                logger.error(f"View count flush failed, will retry: {e}")
+                self._restore(pending, samples)
+                raise
+
+            stored = self._insert_samples(samples)
+            return {
+                'articles': len(pending[ARTICLE]),
+                'videos': len(pending[VIDEO]),
+                'views': sum(sum(counts.values()) for counts in pending.values()),
+                'samples': stored
+            }
+
+    def _insert_samples(self, samples: List[Dict]) -> int:
+        """Store sampled views; on failure the batch is counted as dropped, never put back"""
+        if not samples:
+            return 0
+        try:
+            with self.session_factory() as session:
+                session.execute(insert(ContentView), samples)
+                session.commit()
+            return len(samples)
+        except Exception as e:
+            logger.warning(f"Dropping {len(samples)} sampled views that failed to insert: {e}")
+            with self._lock:
+                self.dropped_samples += len(samples)
+            return 0
+
+    def _prune(self):
+        """Forget viewers whose session window has passed"""
+        cutoff = self._clock() - self.session_seconds
+        with self._lock:
+            while self._seen:
+                key, seen_at = next(iter(self._seen.items()))
+                if seen_at >= cutoff:
+                    break
+                self._seen.popitem(last=False)
+
+    def _worker_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+                self._prune()
+            except Exception as e:
+                logger.error(f"View counter loop error: {e}")
+
+    def start(self):
+        """Start the background flush thread"""
+        if self.running:
+            return
+        self.running = True
+        self._stop.clear()
+        self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
+        self.worker_thread.start()
+        atexit.register(self.stop)
+        logger.info(f"View counter started (flush every {self.flush_interval:.0f}s)")
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self._stop.set()
+        if self.worker_thread:
+            self.worker_thread.join(timeout=10)
+        try:
+            self.flush()
+        except Exception:
+            logger.warning("Unflushed views lost at shutdown")
+        logger.info("View counter stopped")
+
+
+_view_counter: Optional[ViewCounter] = None
+_view_counter_lock = threading.Lock()
+
+
+def get_view_counter() -> ViewCounter:
+    """Get the process-wide view counter, starting its flush thread on first use"""
+    global _view_counter
+    if _view_counter is None:
+        with _view_counter_lock:
+            if _view_counter is None:
+                _view_counter = ViewCounter()
+                _view_counter.start()
+    return _view_counter
@@ -0,0 +1,440 @@
+"""
+Wallet Ledger
+Double-entry postings for player wallets with per-wallet serialization, idempotency
+keys, running daily-limit totals and balance reconciliation
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, exists, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
+
+from shared.models.tournaments import PlayerWallet, TransactionType
+from shared.models.wallet_ledger import LedgerEntry, LedgerPosting, WalletDailyTotal
+
+logger = logging.getLogger(__name__)
+
+# System accounts on the other side of wallet postings
+EXTERNAL_DEPOSITS = "external:stripe"
+PENDING_WITHDRAWALS = "withdrawals:pending"
+EXTERNAL_PAYOUTS = "external:payouts"
+
+# Entry types with a running daily total
+LIMITED_TYPES = {
+    TransactionType.DEPOSIT.value: "daily_deposit_limit",
+    TransactionType.WITHDRAWAL.value: "daily_withdrawal_limit",
+}
+
+CENT = Decimal("0.01")
+
+
+class LedgerError(Exception):
+    """Raised when a ledger operation cannot be applied"""
+    pass
+
+
+class InsufficientFunds(LedgerError):
+    pass
+
+
+class DailyLimitExceeded(LedgerError):
+    pass
+
+
+class WithdrawalNotFound(LedgerError):
+    pass
+
+
+@dataclass
+class PostingResult:
+    """Outcome of a wallet posting; replayed is True when the idempotency key had already been applied"""
+    entry_id: int
+    wallet_id: int
+    amount: Decimal
+    balance: Decimal
+    replayed: bool = False
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def wallet_account(wallet_id: int) -> str:
+    return f"wallet:{wallet_id}"
+
+
+def tournament_account(tournament_id: int) -> str:
+    return f"tournament:{tournament_id}"
+
+
+def to_money(value) -> Decimal:
+    """Validate a positive amount with at most two decimals"""
+    try:
+        amount = Decimal(str(value))
+    except (InvalidOperation, ValueError, TypeError):
+        raise LedgerError("Invalid amount")
+    if not amount.is_finite() or amount <= 0 or amount != amount.quantize(CENT):
+        raise LedgerError("Invalid amount")
+    return amount
+
+
+def get_or_create_wallet(session: Session, player_id: int) -> PlayerWallet:
+    wallet = session.query(PlayerWallet).filter(PlayerWallet.player_id == player_id).first()
+    if wallet:
+        return wallet
+    try:
+        with session.begin_nested():
+            wallet = PlayerWallet(player_id=player_id, balance=Decimal("0.00"), currency="USD")
+            session.add(wallet)
+        return wallet
+    except IntegrityError:
+        # Created concurrently by another request
+        return session.query(PlayerWallet).filter(PlayerWallet.player_id == player_id).one()
+
+
+# === POSTING ===
+
+def _lock_wallet(session: Session, wallet_id: int, now: datetime):
+    """
+    Take the wallet's row lock for the rest of the transaction
+
+    A write rather than SELECT ... FOR UPDATE so the same statement also serializes
+    writers on databases without row locks. Everything read after it is stable
+    until commit.
+    """
+    row = session.execute(
+        update(PlayerWallet.__table__).where(PlayerWallet.id == wallet_id).values(updated_at=now).returning(
+            PlayerWallet.balance, PlayerWallet.is_active,
+            PlayerWallet.daily_deposit_limit, PlayerWallet.daily_withdrawal_limit
+        )
+    ).first()
+    if row is None:
+        raise LedgerError("Wallet not found")
+    return row
+
+
+def lock_wallets(session: Session, wallet_ids, now: Optional[datetime] = None):
+    """Lock several wallets in id order so operations touching more than one cannot deadlock"""
+    now = now or utcnow()
+    for wallet_id in sorted(set(wallet_ids)):
+        _lock_wallet(session, wallet_id, now)
+
+
+def _replay(session: Session, idempotency_key: str) -> Optional[Tuple[int, str, Optional[int], Decimal, Optional[Decimal]]]:
+    """(entry_id, entry_type, wallet_id, wallet_amount, balance_after) of an already applied key"""
+    row = session.execute(
+        select(LedgerEntry.id, LedgerEntry.entry_type, LedgerPosting.wallet_id,
+               LedgerPosting.amount, LedgerPosting.balance_after)
+        .outerjoin(LedgerPosting, (LedgerPosting.entry_id == LedgerEntry.id) & LedgerPosting.wallet_id.isnot(None))
+        .where(LedgerEntry.idempotency_key == idempotency_key)
+    ).first()
+    return tuple(row) if row else None
+
+
+def daily_total(session: Session, wallet_id: int, entry_type: str, day: Optional[date] = None) -> Decimal:
+    day = day or utcnow().date()
+    total = session.execute(
+        select(WalletDailyTotal.total).where(
+            WalletDailyTotal.wallet_id == wallet_id,
+            WalletDailyTotal.day == day,
+            WalletDailyTotal.entry_type == entry_type
+        )
+    ).scalar()
+    return total if total is not None else Decimal("0.00")
+
+
+def _add_daily_total(session: Session, wallet_id: int, entry_type: str, day: date, amount: Decimal, count: int = 1):
+    """Only called under the wallet lock, so update-then-insert cannot race for the same key"""
+    updated = session.execute(
+        update(WalletDailyTotal).where(
+            WalletDailyTotal.wallet_id == wallet_id,
+            WalletDailyTotal.day == day,
+            WalletDailyTotal.entry_type == entry_type
+        ).values(total=WalletDailyTotal.total + amount, entry_count=WalletDailyTotal.entry_count + count)
+    ).rowcount
+    if not updated:
+        session.execute(insert(WalletDailyTotal).values(
+            wallet_id=wallet_id, day=day, entry_type=entry_type, total=amount, entry_count=count
+        ))
+
+
+def _insert_entry(session: Session, entry_type: str, description: str, postings: List[Dict], now: datetime,
+                  idempotency_key: Optional[str] = None, tournament_id: Optional[int] = None,
+                  reference_id: Optional[str] = None, related_entry_id: Optional[int] = None) -> int:
+    if sum(p["amount"] for p in postings) != 0:
+        raise LedgerError("Ledger entry does not balance")
+    entry_id = session.execute(
+        insert(LedgerEntry).values(
+            idempotency_key=idempotency_key, entry_type=entry_type, description=description,
+            tournament_id=tournament_id, reference_id=reference_id, related_entry_id=related_entry_id,
+            created_at=now
+        ).returning(LedgerEntry.id)
+    ).scalar_one()
+    session.execute(insert(LedgerPosting), [
+        {"wallet_id": None, "balance_after": None, **posting, "entry_id": entry_id, "created_at": now}
+        for posting in postings
+    ])
+    return entry_id
+
+
+def post_wallet_entry(session: Session, wallet_id: int, entry_type: TransactionType, amount: Decimal,
+                      counter_account: str, description: str, idempotency_key: Optional[str] = None,
+                      tournament_id: Optional[int] = None, reference_id: Optional[str] = None,
+                      related_entry_id: Optional[int] = None, enforce_limit: bool = True,
+                      now: Optional[datetime] = None) -> PostingResult:
+    """
+    Move amount (signed: positive credits the wallet) between a wallet and a system account
+
+    Runs in the caller's transaction and does not commit. Raises before writing
+    anything but the lock, so on LedgerError the caller just rolls back. Replaying an
+    idempotency key returns the original result without posting again.
+    """
+    now = now or utcnow()
+    entry_type = TransactionType(entry_type).value
+    if amount == 0:
+        raise LedgerError("Invalid amount")
+
+    balance, is_active, deposit_limit, withdrawal_limit = _lock_wallet(session, wallet_id, now)
+
+    if idempotency_key:
+        applied = _replay(session, idempotency_key)
+        if applied:
+            entry_id, applied_type, applied_wallet, applied_amount, balance_after = applied
+            if (applied_type, applied_wallet, applied_amount) != (entry_type, wallet_id, amount):
+                raise LedgerError("Idempotency key already used for a different operation")
+            return PostingResult(entry_id, wallet_id, applied_amount, balance_after, replayed=True)
+
+    if not is_active:
+        raise LedgerError("Wallet is not active")
+
+    new_balance = balance + amount
+    if new_balance < 0:
+        raise InsufficientFunds(f"Insufficient balance. Available: ${balance}")
+
+    if entry_type in LIMITED_TYPES:
+        limit = deposit_limit if entry_type == TransactionType.DEPOSIT.value else withdrawal_limit
+        if limit is not None and enforce_limit:
+            used = daily_total(session, wallet_id, entry_type, now.date())
+            if used + abs(amount) > limit:
+                raise DailyLimitExceeded(
+                    f"Daily {entry_type} limit exceeded. Limit: ${limit}, Used: ${used}"
+                )
+        _add_daily_total(session, wallet_id, entry_type, now.date(), abs(amount))
+
+    session.execute(
+        update(PlayerWallet).where(PlayerWallet.id == wallet_id).values(balance=PlayerWallet.balance + amount)
+    )
+    entry_id = _insert_entry(
+        session, entry_type, description, [
+            {"account": wallet_account(wallet_id), "wallet_id": wallet_id, "amount": amount,
+             "balance_after": new_balance},
+            {"account": counter_account, "amount": -amount},
+        ], now, idempotency_key=idempotency_key, tournament_id=tournament_id,
+        reference_id=reference_id, related_entry_id=related_entry_id
+    )
+    return PostingResult(entry_id, wallet_id, amount, new_balance)
+
+
+def credit_deposit(session: Session, wallet_id: int, amount, payment_intent_id: str,
+                   now: Optional[datetime] = None) -> PostingResult:
+    """
+    Credit a captured Stripe payment; safe to call once per webhook delivery
+
+    The money has already been taken, so the daily limit is not enforced here (it is
+    checked when the payment intent is created) but the deposit still counts toward it.
+    """
+    amount = to_money(amount)
+    return post_wallet_entry(
+        session, wallet_id, TransactionType.DEPOSIT, amount, EXTERNAL_DEPOSITS,
+        f"Wallet deposit - ${amount}", idempotency_key=f"stripe:{payment_intent_id}",
+        reference_id=payment_intent_id, enforce_limit=False, now=now
+    )
+
+
+def hold_withdrawal(session: Session, wallet_id: int, amount, idempotency_key: Optional[str] = None,
+                    now: Optional[datetime] = None) -> PostingResult:
+    """Move funds out of the wallet into pending withdrawals until an admin settles or cancels them"""
+    amount = to_money(amount)
+    return post_wallet_entry(
+        session, wallet_id, TransactionType.WITHDRAWAL, -amount, PENDING_WITHDRAWALS,
+        f"Wallet withdrawal - ${amount}", idempotency_key=idempotency_key, now=now
+    )
+
+
+def _withdrawal_hold(session: Session, entry_id: int) -> Tuple[int, Decimal, datetime]:
+    row = session.execute(
+        select(LedgerPosting.wallet_id, LedgerPosting.amount, LedgerEntry.created_at)
+        .join(LedgerEntry, LedgerEntry.id == LedgerPosting.entry_id)
+        .where(LedgerEntry.id == entry_id, LedgerEntry.entry_type == TransactionType.WITHDRAWAL.value,
+               LedgerPosting.wallet_id.isnot(None))
+    ).first()
+    if row is None:
+        raise WithdrawalNotFound("Withdrawal not found")
+    return row.wallet_id, -row.amount, row.created_at
+
+
+def settle_withdrawal(session: Session, entry_id: int, payout_reference: str,
+                      now: Optional[datetime] = None) -> int:
+    """Record that a held withdrawal was paid out; returns the settlement entry id"""
+    now = now or utcnow()
+    wallet_id, amount, _ = _withdrawal_hold(session, entry_id)
+    _lock_wallet(session, wallet_id, now)
+    key = f"withdrawal:{entry_id}:close"
+    applied = _replay(session, key)
+    if applied:
+        if applied[1] != TransactionType.WITHDRAWAL.value:
+            raise LedgerError("Withdrawal was already cancelled")
+        return applied[0]
+    return _insert_entry(
+        session, TransactionType.WITHDRAWAL.value, f"Withdrawal payout - ${amount}", [
+            {"account": PENDING_WITHDRAWALS, "amount": -amount},
+            {"account": EXTERNAL_PAYOUTS, "amount": amount},
+        ], now, idempotency_key=key, reference_id=payout_reference, related_entry_id=entry_id
+    )
+
+
+def cancel_withdrawal(session: Session, entry_id: int, now: Optional[datetime] = None) -> PostingResult:
+    """Return held funds to the wallet and take them back off that day's withdrawal total"""
+    now = now or utcnow()
+    wallet_id, amount, held_at = _withdrawal_hold(session, entry_id)
+    key = f"withdrawal:{entry_id}:close"
+    _lock_wallet(session, wallet_id, now)
+    applied = _replay(session, key)
+    if applied and applied[1] != TransactionType.REFUND.value:
+        raise LedgerError("Withdrawal was already paid out")
+    result = post_wallet_entry(
+        session, wallet_id, TransactionType.REFUND, amount, PENDING_WITHDRAWALS,
+        f"Withdrawal cancelled - ${amount}", idempotency_key=key, related_entry_id=entry_id, now=now
+    )
+    if not result.replayed:
+        _add_daily_total(session, wallet_id, TransactionType.WITHDRAWAL.value, held_at.date(), -amount, count=-1)
+    return result
+
+
+def pay_tournament_prize(session: Session, wallet_id: int, tournament_id: int, amount,
+                         now: Optional[datetime] = None) -> PostingResult:
+    """Credit a prize from the tournament's pool account; paid at most once per wallet and tournament"""
+    amount = to_money(amount)
+    return post_wallet_entry(
+        session, wallet_id, TransactionType.TOURNAMENT_PRIZE, amount, tournament_account(tournament_id),
+        f"Tournament prize - ${amount}", idempotency_key=f"tournament:{tournament_id}:prize:{wallet_id}",
+        tournament_id=tournament_id, now=now
+    )
+
+
+# === READS ===
+
+def wallet_history(session: Session, wallet_id: int, limit: int = 20, offset: int = 0,
+                   entry_type: Optional[str] = None) -> Tuple[List[Dict], int]:
+    """Newest-first wallet postings with their entry details, and the total count"""
+    query = select(LedgerPosting, LedgerEntry).join(LedgerEntry, LedgerEntry.id == LedgerPosting.entry_id) \
+        .where(LedgerPosting.wallet_id == wallet_id)
+    count_query = select(func.count(LedgerPosting.id)).where(LedgerPosting.wallet_id == wallet_id)
+    if entry_type:
+        entry_type = TransactionType(entry_type).value
+        query = query.where(LedgerEntry.entry_type == entry_type)
+        count_query = count_query.join(LedgerEntry, LedgerEntry.id == LedgerPosting.entry_id) \
+            .where(LedgerEntry.entry_type == entry_type)
+
+    rows = session.execute(query.order_by(LedgerPosting.id.desc()).offset(offset).limit(limit)).all()
+    total = session.execute(count_query).scalar() or 0
+
+    # Withdrawal holds stay pending until a settlement or cancellation entry references them
+    holds = [entry.id for _, entry in rows if entry.entry_type == TransactionType.WITHDRAWAL.value]
+    closed = dict(session.execute(
+        select(LedgerEntry.related_entry_id, LedgerEntry.entry_type).where(LedgerEntry.related_entry_id.in_(holds))
+    ).all()) if holds else {}
+
+    history = []
+    for posting, entry in rows:
+        status = "completed"
+        if entry.id in holds:
+            status = {None: "pending", TransactionType.REFUND.value: "cancelled"}.get(closed.get(entry.id), "completed")
+        history.append({
+            'id': entry.id,
+            'type': entry.entry_type,
+            'amount': float(posting.amount),
+            'status': status,
+            'description': entry.description,
+            'balance_before': float(posting.balance_after - posting.amount),
+            'balance_after': float(posting.balance_after),
+            'payment_reference': entry.reference_id,
+            'tournament_id': entry.tournament_id,
+            'created_at': posting.created_at.isoformat()
+        })
+    return history, total
+
+
+def pending_withdrawals(session: Session, limit: int = 50, offset: int = 0) -> Tuple[List[Dict], int]:
+    """Oldest-first withdrawal holds that were neither paid out nor cancelled, and their count"""
+    closing = aliased(LedgerEntry)
+    is_open = and_(
+        LedgerEntry.entry_type == TransactionType.WITHDRAWAL.value, LedgerEntry.related_entry_id.is_(None),
+        ~exists().where(closing.related_entry_id == LedgerEntry.id)
+    )
+    rows = session.execute(
+        select(LedgerEntry, LedgerPosting.wallet_id, LedgerPosting.amount, PlayerWallet.player_id)
+        .join(LedgerPosting, and_(LedgerPosting.entry_id == LedgerEntry.id, LedgerPosting.wallet_id.isnot(None)))
+        .join(PlayerWallet, PlayerWallet.id == LedgerPosting.wallet_id)
+        .where(is_open).order_by(LedgerEntry.id).offset(offset).limit(limit)
+    ).all()
+    total = session.execute(select(func.count(LedgerEntry.id)).where(is_open)).scalar() or 0
+    return [{
+        'id': entry.id,
+        'wallet_id': wallet_id,
+        'player_id': player_id,
+        'amount': float(-amount),
+        'description': entry.description,
+        'created_at': entry.created_at.isoformat()
+    } for entry, wallet_id, amount, player_id in rows], total
+
+
+# === RECONCILIATION ===
+
+def reconcile(session: Session, repair: bool = False) -> Dict:
+    """
+    Recompute wallet balances from postings and check every entry balances
+
+    Mismatches found by the bulk pass are re-checked under the wallet lock so
+    postings committed mid-scan are not reported. With repair the stored balance is
+    reset to the posted total; the caller commits.
+    """
+    posted = dict(session.execute(
+        select(LedgerPosting.wallet_id, func.sum(LedgerPosting.amount))
+        .where(LedgerPosting.wallet_id.isnot(None)).group_by(LedgerPosting.wallet_id)
+    ).all())
+    wallets = session.execute(select(PlayerWallet.id, PlayerWallet.balance)).all()
+
+    mismatches = []
+    for wallet_id, balance in wallets:
+        if balance == posted.get(wallet_id, 0):
+            continue
+        locked_balance = _lock_wallet(session, wallet_id, utcnow()).balance
+        expected = session.execute(
+            select(func.coalesce(func.sum(LedgerPosting.amount), 0)).where(LedgerPosting.wallet_id == wallet_id)
+        ).scalar()
+        expected = Decimal(str(expected)).quantize(CENT)
+        if locked_balance == expected:
+            continue
+        mismatches.append({'wallet_id': wallet_id, 'balance': float(locked_balance), 'posted': float(expected)})
+        if repair:
+            session.execute(update(PlayerWallet).where(PlayerWallet.id == wallet_id).values(balance=expected))
+
+    unbalanced = session.execute(
+        select(LedgerPosting.entry_id).group_by(LedgerPosting.entry_id).having(func.sum(LedgerPosting.amount) != 0)
+    ).scalars().all()
+
+    if mismatches or unbalanced:
+        logger.warning(f"Wallet reconciliation: {len(mismatches)} balance mismatches, "
+                       f"{len(unbalanced)} unbalanced entries")
+    return {
+        'wallets_checked': len(wallets),
+        'mismatches': mismatches,
+        'unbalanced_entries': list(unbalanced),
+        'repaired': len(mismatches) if repair else 0
+    }
@@ -0,0 +1,252 @@
+"""
+Binary deltas for game builds
+File deltas use rsync-style block matching: every aligned block of the old file is
+indexed by a rolling checksum, the new file is scanned for blocks the old one
+already has, and the delta is a list of COPY(offset, length) and literal runs.
+Package deltas apply that file by file across a whole build tree. Standard
+library only: the kiosk game updater ships this file as is.
+"""
+
+import io
+import os
+import json
+import lzma
+import struct
+import hashlib
+import tarfile
+
+FILE_MAGIC = b"DPDELTA1"
+PACKAGE_MAGIC = b"DPPKGDL1"
+BLOCK_SIZE = 2048
+_MOD = 1 << 16
+
+# Delta opcodes
+_COPY = 0x43    # 'C' offset length
+_INSERT = 0x49  # 'I' length bytes
+_END = 0x45     # 'E'
+
+
+class DeltaError(Exception):
+    """Raised when a delta does not apply to the given base or produces the wrong result"""
+    pass
+
+
+def sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _varint(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _read_varint(buf: memoryview, pos: int):
+    shift = result = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _checksum(block) -> tuple:
+    a = b = 0
+    n = len(block)
+    for i, x in enumerate(block):
+        a += x
+        b += (n - i) * x
+    return a % _MOD, b % _MOD
+
+
+def make_delta(old: bytes, new: bytes, block_size: int = BLOCK_SIZE) -> bytes:
+    """Delta that turns old into new; apply_delta(old, delta) == new"""
+    index = {}
+    for offset in range(0, len(old) - block_size + 1, block_size):
+        a, b = _checksum(old[offset:offset + block_size])
+        index.setdefault(a | (b << 16), offset)
+
+    out = bytearray(FILE_MAGIC)
+    out += bytes.fromhex(sha256(old)) + bytes.fromhex(sha256(new)) + _varint(len(new))
+    literal_start = 0
+    copy = None  # Pending (offset, length), merged while copies are contiguous
+
+    def flush_literal(end):
+        if end > literal_start:
+            out.append(_INSERT)
+            out.extend(_varint(end - literal_start))
+            out.extend(new[literal_start:end])
+
+    def flush_copy():
+        if copy:
+            out.append(_COPY)
+            out.extend(_varint(copy[0]) + _varint(copy[1]))
+
+    i = 0
+    n = len(new)
+    a = b = None
+    while index and i + block_size <= n:
+        if a is None:
+            a, b = _checksum(new[i:i + block_size])
+        offset = index.get(a | (b << 16))
+        if offset is not None and old[offset:offset + block_size] == new[i:i + block_size]:
+            # Extend the match block by block; slice compares run in C
+            length = block_size
+            while (i + length + block_size <= n and offset + length + block_size <= len(old)
+                   and old[offset + length:offset + length + block_size] == new[i + length:i + length + block_size]):
+                length += block_size
+            if copy and copy[0] + copy[1] == offset and literal_start == i:
+                copy = (copy[0], copy[1] + length)
+            else:
+                flush_copy()
+                flush_literal(i)
+                copy = (offset, length)
+            i += length
+            literal_start = i
+            a = None
+            continue
+        # Roll the checksum one byte forward
+        if i + block_size < n:
+            out_byte, in_byte = new[i], new[i + block_size]
+            a = (a - out_byte + in_byte) % _MOD
+            b = (b - block_size * out_byte + a) % _MOD
+        i += 1
+        if copy and literal_start < i:
+            flush_copy()
+            copy = None
+    flush_copy()
+    flush_literal(n)
+    out.append(_END)
+    return bytes(out)
+
+
+def apply_delta(old: bytes, delta: bytes) -> bytes:
+    """Rebuild the new file from old and a make_delta() delta; verifies both ends by hash"""
+    buf = memoryview(delta)
+    if bytes(buf[:8]) != FILE_MAGIC:
+        raise DeltaError("Not a file delta")
+    old_hash, new_hash = bytes(buf[8:40]).hex(), bytes(buf[40:72]).hex()
+    if sha256(old) != old_hash:
+        raise DeltaError("Delta was made against a different base file")
+    size, pos = _read_varint(buf, 72)
+    out = bytearray()
+    while True:
+        op = buf[pos]
+        pos += 1
+        if op == _END:
+            break
+        if op == _COPY:
+            offset, pos = _read_varint(buf, pos)
+            length, pos = _read_varint(buf, pos)
+            out += old[offset:offset + length]
+        elif op == _INSERT:
+            length, pos = _read_varint(buf, pos)
+            out += buf[pos:pos + length]
+            pos += length
+        else:
+            raise DeltaError(f"Bad delta opcode {op}")
+    if len(out) != size or sha256(bytes(out)) != new_hash:
+        raise DeltaError("Delta produced the wrong file")
+    return bytes(out)
+
+
+# Build trees: {relative path: (content, mode)}
+
+def read_tarball(data: bytes) -> dict:
+    tree = {}
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r:*") as tar:
+        for member in tar.getmembers():
+            if member.isfile():
+                tree[os.path.normpath(member.name)] = (tar.extractfile(member).read(), member.mode & 0o777)
+    return tree
+
+
+def read_tree(root: str) -> dict:
+    tree = {}
+    for directory, _, files in os.walk(root):
+        for name in files:
+            path = os.path.join(directory, name)
+            with open(path, "rb") as f:
+                tree[os.path.relpath(path, root)] = (f.read(), os.stat(path).st_mode & 0o777)
+    return tree
+
+
+def write_tree(tree: dict, root: str):
+    for path, (content, mode) in tree.items():
+        target = os.path.join(root, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "wb") as f:
+            f.write(content)
+        os.chmod(target, mode)
+
+
+def tree_listing(tree: dict) -> dict:
+    """What a manifest records per file, to check an installed build against"""
+    return {path: {"sha256": sha256(content), "size": len(content), "mode": mode}
+            for path, (content, mode) in sorted(tree.items())}
+
+
+def make_package_delta(old_tree: dict, new_tree: dict, block_size: int = BLOCK_SIZE) -> bytes:
+    """
+    Delta between two build trees: unchanged files are kept, changed files are
+    patched against the old file at the same path, new files are sent whole
+    """
+    entries, payloads = [], []
+    for path, (content, mode) in sorted(new_tree.items()):
+        old = old_tree.get(path)
+        if old is not None and old[0] == content:
+            entries.append({"path": path, "op": "keep", "mode": mode, "sha256": sha256(content)})
+            continue
+        if old is not None:
+            payload = make_delta(old[0], content, block_size)
+            op = "patch" if len(payload) < len(content) else "add"
+        else:
+            op = "add"
+        if op == "add":
+            payload = content
+        entries.append({"path": path, "op": op, "mode": mode, "sha256": sha256(content), "size": len(payload)})
+        payloads.append(payload)
+    header = json.dumps({"files": entries, "remove": sorted(set(old_tree) - set(new_tree))}).encode()
+    body = struct.pack(">I", len(header)) + header + b"".join(payloads)
+    return PACKAGE_MAGIC + lzma.compress(body, preset=6)
+
+
+def apply_package_delta(old_tree: dict, delta: bytes) -> dict:
+    """New build tree from the old tree and a package delta; every file is checked by hash"""
+    if delta[:8] != PACKAGE_MAGIC:
+        raise DeltaError("Not a package delta")
+    try:
+        body = lzma.decompress(delta[8:])
+    except lzma.LZMAError as e:
+        raise DeltaError(f"Corrupt package delta: {e}")
+    (header_size,) = struct.unpack(">I", body[:4])
+    header = json.loads(body[4:4 + header_size])
+    pos = 4 + header_size
+    new_tree = {}
+    for entry in header["files"]:
+        path = entry["path"]
+        if entry["op"] == "keep":
+            if path not in old_tree:
+                raise DeltaError(f"{path} missing from the installed build")
+            content = old_tree[path][0]
+        else:
+            payload = body[pos:pos + entry["size"]]
+            pos += entry["size"]
+            if entry["op"] == "patch":
+                if path not in old_tree:
+                    raise DeltaError(f"{path} missing from the installed build")
+                content = apply_delta(old_tree[path][0], payload)
+            else:
+                content = payload
+        if sha256(content) != entry["sha256"]:
+            raise DeltaError(f"{path} does not match the release")
+        new_tree[path] = (content, entry["mode"])
+    return new_tree
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Auction bidding benchmark
+Many concurrent bidders on one auction through the marketplace engine, then
+concurrent closers; checks that no accepted bid was lost, the auction settled
+exactly once and every escrowed cent went back or to the seller
+
+Usage: python tests/performance/benchmark_auction_bids.py [bidders] [threads] [attempts]
+Runs against a temporary SQLite file; set BENCH_DATABASE_URL to use Postgres
+(the run adds throwaway players, a card and an auction there).
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session, sessionmaker
+
+from shared.models.base import Base, CardCatalog, CardCategory, CardRarity, Player
+from shared.models.nfc_trading_system import AuctionBid, CardAuction, EnhancedNFCCard, TradingHistory
+from shared.models.tournaments import PlayerWallet
+from shared.models.wallet_ledger import LedgerPosting
+from shared.services import wallet_ledger
+from shared.services.marketplace_engine import BidRejected, MarketplaceEngine, auction_account, min_next_bid
+
+TABLES = ['players', 'card_catalog', 'enhanced_nfc_cards', 'card_auctions', 'auction_bids', 'marketplace_listings',
+          'marketplace_buy_orders', 'trade_offers', 'trading_history', 'player_wallets', 'wallet_ledger_entries',
+          'wallet_ledger_postings', 'wallet_daily_totals']
+STARTING_FUNDS = Decimal("5000.00")
+
+
+class Clock:
+    """Wall clock that the closing phase can move past the auction end"""
+
+    def __init__(self):
+        self.offset = timedelta(0)
+
+    def __call__(self):
+        return datetime.now(timezone.utc) + self.offset
+
+
+def make_engine():
+    url = os.getenv("BENCH_DATABASE_URL")
+    if url:
+        return create_engine(url, pool_size=64, max_overflow=64)
+    path = os.path.join(tempfile.mkdtemp(), "auction.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"timeout": 120, "check_same_thread": False})
+    # The catalog table has Postgres JSONB / ARRAY columns
+    compiles(JSONB, 'sqlite')(lambda type_, compiler, **kw: 'JSON')
+    compiles(ARRAY, 'sqlite')(lambda type_, compiler, **kw: 'JSON')
+    Base.metadata.create_all(engine, tables=[Base.metadata.tables[name] for name in TABLES])
+    return engine
+
+
+def seed(SessionLocal, bidders):
+    run = time.time_ns()
+    with SessionLocal() as session:
+        players = [Player(email=f"bench-{run}-{i}@example.com") for i in range(bidders + 1)]
+        session.add_all(players)
+        template_id = session.execute(insert(CardCatalog).values(
+            product_sku=f"BENCH-{run}", name="Benchmark card", rarity=CardRarity.rare,
+            category=CardCategory.creature, asset_quality_levels=None, mana_colors=None
+        ).returning(CardCatalog.id)).scalar_one()
+        session.flush()
+        seller, bidder_ids = players[0].id, [p.id for p in players[1:]]
+        card = EnhancedNFCCard(nfc_uid=f"{run % 10 ** 14:014X}", card_template_id=template_id, owner_player_id=seller)
+        session.add(card)
+        session.flush()
+        for player in players:
+            wallet = wallet_ledger.get_or_create_wallet(session, player.id)
+            session.flush()
+            wallet_ledger.credit_deposit(session, wallet.id, STARTING_FUNDS, f"bench-{run}-{player.id}")
+        session.commit()
+        return seller, bidder_ids, card.id
+
+
+def main():
+    bidders = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    attempts = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    engine = make_engine()
+    SessionLocal = sessionmaker(bind=engine, class_=Session, expire_on_commit=False)
+    clock = Clock()
+    market = MarketplaceEngine(session_factory=SessionLocal, clock=clock)
+
+    print(f"{engine.dialect.name}: {bidders} bidders x {attempts} attempts on one auction from {threads} threads")
+    seller, bidder_ids, card_id = seed(SessionLocal, bidders)
+    auction_id = market.create_auction(seller, card_id, "1.00", timedelta(hours=1))['auction_id']
+
+    accepted, rejected, latencies, lock = [], [0], [], threading.Lock()
+
+    def bid(bidder_id):
+        rng = random.Random(bidder_id)
+        for _ in range(attempts):
+            with SessionLocal() as session:
+                current = session.execute(
+                    select(CardAuction.current_bid, CardAuction.bid_count, CardAuction.starting_price)
+                    .where(CardAuction.id == auction_id)
+                ).one()
+            amount = min_next_bid(*current) + Decimal(rng.randint(0, 300)) / 100
+            if amount > STARTING_FUNDS:
+                return  # Priced out
+            started = time.perf_counter()
+            try:
+                result = market.place_bid(auction_id, bidder_id, amount)
+                with lock:
+                    accepted.append((result['bid_id'], bidder_id, amount))
+            except BidRejected:
+                with lock:
+                    rejected[0] += 1
+            finally:
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(bid, bidder_ids))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    print(f"{'bidding':10s} {len(latencies) / elapsed:8.0f} bids/s  p50 {pct(0.5):7.2f}ms  p99 {pct(0.99):8.2f}ms  "
+          f"accepted {len(accepted)}  rejected {rejected[0]}")
+
+    # Every closer races for the same auction; exactly one may settle it
+    clock.offset = timedelta(hours=2)
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        closes = [r for r in pool.map(lambda _: market.close_auction(auction_id), range(16)) if r is not None]
+    print(f"{'closing':10s} {len(closes)} of 16 closers settled: {closes[0] if closes else None}")
+
+    with SessionLocal() as session:
+        auction = session.get(CardAuction, auction_id)
+        bids = session.query(AuctionBid).filter(AuctionBid.auction_id == auction_id).order_by(AuctionBid.id).all()
+        winner = max(accepted, key=lambda a: a[0])
+        balances = dict(session.execute(
+            select(PlayerWallet.player_id, PlayerWallet.balance).where(PlayerWallet.player_id.in_([seller] + bidder_ids))
+        ).all())
+        escrow = session.execute(
+            select(func.coalesce(func.sum(LedgerPosting.amount), 0))
+            .where(LedgerPosting.account == auction_account(auction_id))
+        ).scalar()
+        trades = session.query(TradingHistory).filter(TradingHistory.auction_id == auction_id).count()
+        owner = session.get(EnhancedNFCCard, card_id).owner_player_id
+
+        checks = {
+            'every accepted bid recorded': len(bids) == len(accepted) == auction.bid_count,
+            'bids strictly increasing by the increment': all(
+                later.bid_amount >= min_next_bid(earlier.bid_amount, 1, Decimal("1.00"))
+                for earlier, later in zip(bids, bids[1:])
+            ),
+            'one winning bid, the last one': [b.id for b in bids if b.is_winning] == [bids[-1].id] == [winner[0]],
+            'settled exactly once': len(closes) == 1 and trades == 1,
+            'card with the winner': owner == winner[1],
+            'escrow emptied': Decimal(str(escrow)) == 0,
+            'losers refunded': all(balances[b] == STARTING_FUNDS for b in bidder_ids if b != winner[1]),
+            'winner and seller paid': (balances[winner[1]], balances[seller]) ==
+                                      (STARTING_FUNDS - winner[2], STARTING_FUNDS + winner[2]),
+        }
+    for name, ok in checks.items():
+        print(f"{'':10s} {'ok  ' if ok else 'FAIL'} {name}")
+    assert all(checks.values())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Campaign delivery benchmark
+Queues one campaign for many players, kills the delivery workers part way through
+the send, then resumes with a fresh pipeline once the leases run out; checks that
+every recipient got exactly one message
+
+Usage: python tests/performance/benchmark_campaign_delivery.py [recipients] [workers] [crash_after]
+Runs against a temporary SQLite file; set BENCH_DATABASE_URL to use Postgres
+(the run adds throwaway players, an admin and a campaign there).
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session, sessionmaker
+
+from shared.models.base import Admin, Base, Player
+from shared.models.communications import CampaignStatus, EmailCampaign, RecipientType
+from shared.services.campaign_delivery import CampaignDelivery, MemoryTransport, campaign_progress
+
+TABLES = ['players', 'admins', 'email_campaigns', 'email_logs']
+LEASE_SECONDS = 300
+
+
+class Crash(BaseException):
+    """Escapes the workers' error handling like a killed process would"""
+    pass
+
+
+class CrashingTransport(MemoryTransport):
+    def __init__(self, crash_after):
+        super().__init__()
+        self.crash_after = crash_after
+
+    def send(self, message):
+        if self.crash_after is not None and len(self.outbox) >= self.crash_after:
+            raise Crash()
+        return super().send(message)
+
+
+class Clock:
+    def __init__(self):
+        self.offset = timedelta(0)
+
+    def __call__(self):
+        return datetime.now(timezone.utc) + self.offset
+
+
+def make_engine():
+    url = os.getenv("BENCH_DATABASE_URL")
+    if url:
+        return create_engine(url, pool_size=32, max_overflow=32)
+    path = os.path.join(tempfile.mkdtemp(), "campaigns.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"timeout": 120, "check_same_thread": False})
+    Base.metadata.create_all(engine, tables=[Base.metadata.tables[name] for name in TABLES])
+    return engine
+
+
+def seed(SessionLocal, recipients):
+    run = time.time_ns()
+    with SessionLocal() as session:
+        admin = Admin(username=f"bench-{run}", email=f"bench-{run}@example.com", password_hash="x")
+        session.add(admin)
+        session.flush()
+        for start in range(0, recipients, 10000):
+            session.execute(insert(Player), [
+                {'email': f"bench-{run}-{i}@example.com", 'is_premium': True}
+                for i in range(start, min(recipients, start + 10000))
+            ])
+        campaign = EmailCampaign(name=f"bench-{run}", subject="Benchmark", content="Hello",
+                                 recipient_type=RecipientType.premium_players, created_by_admin_id=admin.id)
+        session.add(campaign)
+        session.commit()
+        return campaign.id
+
+
+def main():
+    recipients = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    crash_after = int(sys.argv[3]) if len(sys.argv) > 3 else recipients * 2 // 5
+    engine = make_engine()
+    SessionLocal = sessionmaker(bind=engine, class_=Session, expire_on_commit=False)
+    clock = Clock()
+    transport = CrashingTransport(crash_after)
+    threading.excepthook = lambda args: None if args.exc_type is Crash else threading.__excepthook__(args)
+
+    print(f"{engine.dialect.name}: {recipients} recipients, {workers} workers, crash after {crash_after} sends")
+    campaign_id = seed(SessionLocal, recipients)
+
+    def pipeline():
+        return CampaignDelivery(session_factory=SessionLocal, transport=transport, workers=workers, rate=0,
+                                batch_size=100, lease_seconds=LEASE_SECONDS, clock=clock)
+
+    started = time.perf_counter()
+    queued = pipeline().start_campaign(campaign_id)['queued']
+    print(f"{'resolve':10s} {queued} recipients queued in {time.perf_counter() - started:6.2f}s")
+
+    started = time.perf_counter()
+    pipeline().drain()
+    elapsed = time.perf_counter() - started
+    with SessionLocal() as session:
+        progress = campaign_progress(session, campaign_id)
+    print(f"{'crashed':10s} {len(transport.outbox)} sent at {len(transport.outbox) / elapsed:8.0f}/s, "
+          f"{progress.get('sending', 0)} left leased")
+
+    # The restarted process waits out the leases of the dead workers
+    transport.crash_after = None
+    clock.offset = timedelta(seconds=LEASE_SECONDS + 1)
+    before = len(transport.outbox)
+    started = time.perf_counter()
+    result = pipeline().drain()
+    elapsed = time.perf_counter() - started
+    print(f"{'resumed':10s} {len(transport.outbox) - before} sent at {(len(transport.outbox) - before) / elapsed:8.0f}/s")
+
+    sends = Counter(m.to for m in transport.outbox)
+    with SessionLocal() as session:
+        campaign = session.get(EmailCampaign, campaign_id)
+        checks = {
+            'every recipient reached': len(sends) == recipients,
+            'no duplicate sends': set(sends.values()) == {1},
+            'campaign finished': result['finished'] == [campaign_id] and campaign.status == CampaignStatus.sent,
+            'counters match': campaign.sent_count == campaign.recipient_count == recipients,
+        }
+    for name, ok in checks.items():
+        print(f"{'':10s} {'ok  ' if ok else 'FAIL'} {name}")
+    assert all(checks.values())
+
+
+if __name__ == '__main__':
+    main()
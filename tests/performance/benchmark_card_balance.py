@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Card balance analytics benchmark
+Times the vectorized balance library against the row-by-row analysis it
+replaced, on the 1,800-card gameplay CSV replicated 100x
+
+Usage: python tests/performance/benchmark_card_balance.py [replicas]
+"""
+
+import os
+import sys
+import csv
+import time
+import statistics
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, os.path.join(ROOT, 'cardmaker.ai', 'scripts'))
+
+from balance import CardTable, evaluate, outliers, quantiles, summarize, sweep, turns_needed
+
+GAMEPLAY_CSV = os.path.join(ROOT, 'cardmaker.ai', 'data', 'cards_gameplay.csv')
+
+
+def legacy_analysis(rows):
+    """The pre-vectorized per-row loop: power, efficiency, quantiles and time-to-afford"""
+    def power(r):
+        if r['category'] == 'CREATURE':
+            return max(0, r['attack']) * 1.0 + max(0, r['health']) * 0.5
+        if r['category'] == 'STRUCTURE':
+            return max(0, r['defense']) * 1.0 + max(0, r['health']) * 0.6
+        return 1.0
+
+    efficiency = [power(r) / max(1, r['mana_cost'] + r['energy_cost']) for r in rows]
+    qs = statistics.quantiles(efficiency, n=100, method='inclusive')
+    heroes = [r for r in rows if r['category'] in ('CREATURE', 'STRUCTURE')]
+    turns = []
+    for r in heroes:
+        income = max(1, max(1, r['base_energy_per_turn']))
+        turns.append((r['energy_cost'] + income - 1) // income)
+    return statistics.mean(efficiency), (qs[9], qs[49], qs[89]), statistics.mean(turns)
+
+
+def timed(label, fn, repeat=5):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    print(f"  {label:<44} median {statistics.median(samples):9.1f} ms   best {min(samples):9.1f} ms")
+    return result
+
+
+def main():
+    replicas = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    base = CardTable.from_csv(GAMEPLAY_CSV)
+    table = base.replicate(replicas)
+    print(f"Card balance analytics: {len(base)} cards x {replicas} = {len(table)} rows")
+
+    with open(GAMEPLAY_CSV, 'r', encoding='utf-8') as f:
+        # A repeated name replaces the earlier card, as in the table
+        by_name = {r['name']: {key: (value.upper() if key == 'category' else int(value or 0))
+                               for key, value in r.items()
+                               if key in ('category', 'mana_cost', 'energy_cost', 'attack', 'defense', 'health',
+                                          'base_energy_per_turn')}
+                   for r in csv.DictReader(f)}
+    legacy_rows = list(by_name.values()) * replicas
+
+    legacy = timed("row-by-row (legacy)", lambda: legacy_analysis(legacy_rows), repeat=3)
+    metrics = timed("vectorized evaluate", lambda: evaluate(table))
+    heroes = table.is_category('CREATURE', 'STRUCTURE')
+    vectorized = (float(metrics.efficiency.mean()), quantiles(metrics.efficiency),
+                  float(turns_needed(metrics.energy_cost[heroes], table.base_energy_per_turn[heroes].clip(1)).mean()))
+    timed("vectorized summarize (incl. outlier count)", lambda: summarize(table))
+    flagged = timed("outliers by rarity and colour", lambda: outliers(table, metrics))
+    timed("sweep creature_energy_divisor x 5", lambda: sweep(table, 'creature_energy_divisor', [3, 3.5, 4, 4.5, 5]),
+          repeat=3)
+
+    print(f"  legacy efficiency mean/q10-q50-q90/turns:     {legacy[0]:.4f} {tuple(round(q, 4) for q in legacy[1])} {legacy[2]:.4f}")
+    print(f"  vectorized efficiency mean/q10-q50-q90/turns: {vectorized[0]:.4f} "
+          f"{tuple(round(q, 4) for q in vectorized[1])} {vectorized[2]:.4f}")
+    print(f"  outliers flagged: {len(flagged)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Frontend API client benchmark
+Renders the /cards page's API calls (filter facets + one page of cards) from many
+threads against a local stand-in API with realistic latency, first with bare
+requests.get calls made one after the other, then through the pooled client with
+filters cached and both calls in flight together; compares render p50/p99
+
+Usage: python tests/performance/benchmark_frontend_api_client.py [renders] [threads] [filters_ms] [cards_ms]
+Set BENCH_API_BASE to point both runs at a real API instead of the stand-in.
+"""
+
+import os
+import sys
+import time
+import json
+import uuid
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, ROOT)
+
+import requests
+
+from frontend.services.api_client import APIClient
+
+LATENCY = {"/v1/catalog/filters": 0.015, "/v1/catalog/cards": 0.025}
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        time.sleep(LATENCY.get(path, 0.005))
+        body = json.dumps({"items": [{"product_sku": f"CARD-{i:03d}"} for i in range(24)], "total": 240}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stand_in():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.daemon_threads = True
+    server.request_queue_size = 256
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def bare_render(base):
+    def render(page):
+        rid = str(uuid.uuid4())
+        filters = requests.get(f"{base}/v1/catalog/filters", headers={"X-Request-ID": rid}, timeout=5).json()
+        cards = requests.get(f"{base}/v1/catalog/cards", params={"page": page % 10 + 1},
+                             headers={"X-Request-ID": rid}, timeout=5).json()
+        return filters is not None and cards is not None
+    return render
+
+
+def client_render(client):
+    def render(page):
+        filters, cards = client.get_all([
+            ("/v1/catalog/filters", {"cache_ttl": 300}),
+            ("/v1/catalog/cards", {"params": {"page": page % 10 + 1}}),
+        ], request_id=str(uuid.uuid4()))
+        return filters is not None and cards is not None
+    return render
+
+
+def measure(label, render, renders, threads):
+    def timed(page):
+        start = time.perf_counter()
+        ok = render(page)
+        return time.perf_counter() - start, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(timed, range(renders)))
+    elapsed = time.perf_counter() - started
+    samples = sorted(duration for duration, _ in results)
+    p50 = statistics.median(samples) * 1000
+    p99 = samples[int(len(samples) * 0.99) - 1] * 1000
+    failed = sum(1 for _, ok in results if not ok)
+    print(f"{label:8s} p50 {p50:7.1f}ms  p99 {p99:7.1f}ms  {renders / elapsed:7.0f} renders/s  {failed} failed")
+    return p99, failed
+
+
+def main():
+    renders = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    if len(sys.argv) > 3:
+        LATENCY["/v1/catalog/filters"] = float(sys.argv[3]) / 1000
+    if len(sys.argv) > 4:
+        LATENCY["/v1/catalog/cards"] = float(sys.argv[4]) / 1000
+
+    base = os.getenv("BENCH_API_BASE")
+    if not base:
+        _, base = start_stand_in()
+    print(f"{renders} /cards renders from {threads} threads against {base}")
+
+    bare_p99, bare_failed = measure("bare", bare_render(base), renders, threads)
+    client = APIClient(base, pool_size=threads * 2, parallel_workers=threads)
+    client_p99, client_failed = measure("client", client_render(client), renders, threads)
+    client.close()
+    print(f"{'':8s} p99 {bare_p99 / client_p99:.1f}x lower, {client.stats['cache_hits']} filter calls served from cache, "
+          f"{client.stats['calls']} API calls")
+
+    checks = {
+        'no failed renders': bare_failed == client_failed == 0,
+        'client p99 lower': client_p99 < bare_p99,
+    }
+    for name, ok in checks.items():
+        print(f"{'':8s} {'ok  ' if ok else 'FAIL'} {name}")
+    assert all(checks.values())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Inventory drop benchmark
+Thousands of buyers race for a limited product: each reserves a unit, waits on a
+simulated payment outside any transaction, then pays (converting the reservation),
+fails (releasing it) or walks away (left for the sweeper). Checks that nothing is
+oversold and that every unit ends up sold or back in stock. For comparison, the
+same drop is run with the stock row locked for the length of the payment call,
+the way checkout worked before reservations.
+
+Usage: python tests/performance/benchmark_inventory_drop.py [buyers] [units] [threads] [payment_ms]
+Runs against a temporary SQLite file; set BENCH_DATABASE_URL to use Postgres
+(the run adds a throwaway product, player and orders there).
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import create_engine, func, select, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from shared.models.base import Base, Player
+from shared.models.shop import ShopInventoryReservation, ShopOrder, ShopProduct
+from shared.services import inventory_reservations
+from shared.services.inventory_reservations import OutOfStock, ReservationSweeper
+
+TABLES = ['players', 'shop_products', 'shop_orders', 'shop_inventory_logs', 'shop_inventory_reservations']
+FAIL_RATE = 0.10
+ABANDON_RATE = 0.05
+
+
+def make_engine(threads):
+    url = os.getenv("BENCH_DATABASE_URL")
+    if url:
+        return create_engine(url, pool_size=threads, max_overflow=8)
+    path = os.path.join(tempfile.mkdtemp(), "drop.db")
+    engine = create_engine(f"sqlite:///{path}", pool_size=threads, max_overflow=8,
+                           connect_args={"timeout": 300, "check_same_thread": False})
+    Base.metadata.create_all(engine, tables=[Base.metadata.tables[name] for name in TABLES])
+    return engine
+
+
+def seed(SessionLocal, units):
+    run = time.time_ns()
+    with SessionLocal() as session:
+        player = Player(email=f"bench-{run}@example.com")
+        product = ShopProduct(sku=f"DROP-{run}", name="Benchmark drop", product_type="card_pack",
+                              price=Decimal("20.00"), stock_quantity=units)
+        session.add_all([player, product])
+        session.commit()
+        return run, player.id, product.id
+
+
+def place_order(session, run, player_id, buyer):
+    order = ShopOrder(order_number=f"B{run % 10**8}-{buyer}", customer_id=player_id, subtotal=Decimal("20.00"),
+                      total_amount=Decimal("20.00"), payment_method="stripe", order_status="processing",
+                      payment_status="paid")
+    session.add(order)
+    session.flush()
+    return order.id
+
+
+def outcome(rng):
+    roll = rng.random()
+    return "abandon" if roll < ABANDON_RATE else "fail" if roll < ABANDON_RATE + FAIL_RATE else "pay"
+
+
+def reservation_buyer(SessionLocal, run, player_id, product_id, payment_seconds):
+    def buy(buyer):
+        rng = random.Random(buyer)
+        checkout = f"bench-{run}-{buyer}"
+        with SessionLocal() as session:
+            try:
+                inventory_reservations.reserve(session, checkout, {product_id: 1})
+                session.commit()
+            except OutOfStock:
+                session.rollback()
+                return "sold out"
+        time.sleep(payment_seconds)  # Stripe call, no transaction open
+        result = outcome(rng)
+        with SessionLocal() as session:
+            if result == "pay":
+                try:
+                    inventory_reservations.convert(session, checkout, place_order(session, run, player_id, buyer),
+                                                   {product_id: 1})
+                except OutOfStock:
+                    session.rollback()
+                    return "lost"
+            elif result == "fail":
+                inventory_reservations.release(session, checkout, "Payment failed")
+            session.commit()
+        return result
+    return buy
+
+
+def locking_buyer(SessionLocal, run, player_id, product_id, payment_seconds):
+    products = ShopProduct.__table__
+
+    def buy(buyer):
+        rng = random.Random(buyer)
+        with SessionLocal() as session:
+            taken = session.execute(
+                update(products)
+                .where(products.c.id == product_id, products.c.stock_quantity >= 1)
+                .values(stock_quantity=products.c.stock_quantity - 1)
+            ).rowcount
+            if not taken:
+                session.rollback()
+                return "sold out"
+            time.sleep(payment_seconds)  # Stripe call with the stock row locked
+            result = outcome(rng)
+            if result == "pay":
+                place_order(session, run, player_id, buyer)
+                session.commit()
+            else:
+                session.rollback()
+        return result
+    return buy
+
+
+def drop(name, make_buyer, buyers, units, threads, payment_seconds):
+    engine = make_engine(threads)
+    SessionLocal = sessionmaker(bind=engine, class_=Session, expire_on_commit=False)
+    run, player_id, product_id = seed(SessionLocal, units)
+    buy = make_buyer(SessionLocal, run, player_id, product_id, payment_seconds)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = Counter(pool.map(buy, range(buyers)))
+    elapsed = time.perf_counter() - started
+    print(f"{name:12s} {buyers / elapsed:8.0f} buyers/s  {results['pay']:5d} sold in {elapsed:6.2f}s  "
+          f"({results['sold out']} sold out, {results['fail']} failed, {results['abandon']} abandoned)")
+    return SessionLocal, run, product_id, results
+
+
+def main():
+    buyers = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    units = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    threads = int(sys.argv[3]) if len(sys.argv) > 3 else 64
+    payment_seconds = (float(sys.argv[4]) if len(sys.argv) > 4 else 50) / 1000
+    print(f"{buyers} buyers for {units} units, {threads} threads, {payment_seconds * 1000:.0f}ms payment call")
+
+    drop("row lock", locking_buyer, buyers, units, threads, payment_seconds)
+    SessionLocal, run, product_id, results = drop("reservation", reservation_buyer, buyers, units, threads,
+                                                  payment_seconds)
+
+    # Abandoned checkouts come back once the sweeper sees them expire
+    sweeper = ReservationSweeper(
+        session_factory=SessionLocal,
+        clock=lambda: datetime.now(timezone.utc) + timedelta(seconds=inventory_reservations.RESERVATION_TTL_SECONDS + 1)
+    )
+    while sweeper.run_once():
+        pass
+
+    with SessionLocal() as session:
+        stock = session.get(ShopProduct, product_id).stock_quantity
+        orders = session.scalar(select(func.count()).select_from(ShopOrder).where(ShopOrder.order_number.like(f"B{run % 10**8}-%")))
+        held = dict(session.execute(
+            select(ShopInventoryReservation.status, func.sum(ShopInventoryReservation.quantity))
+            .where(ShopInventoryReservation.product_id == product_id)
+            .group_by(ShopInventoryReservation.status)
+        ).all())
+    checks = {
+        'no oversell': stock >= 0 and orders <= units,
+        'sold + stock == units': orders + stock == units,
+        'converted reservations match orders': held.get(inventory_reservations.CONVERTED, 0) == orders == results['pay'],
+        'no reservation left active': not held.get(inventory_reservations.ACTIVE),
+        'abandoned checkouts expired': held.get(inventory_reservations.EXPIRED, 0) == results['abandon'],
+    }
+    for name, ok in checks.items():
+        print(f"{'':12s} {'ok  ' if ok else 'FAIL'} {name}")
+    assert all(checks.values())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Leaderboard benchmark
+Loads a season of players onto global, regional and venue boards, streams
+rating updates through them and times rank, top-N and around-me queries,
+against a full sort for comparison
+
+Usage: python tests/performance/benchmark_leaderboards.py [players] [updates] [queries]
+"""
+
+import os
+import sys
+import time
+import random
+import resource
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, ROOT)
+
+from shared.services.leaderboards import SeasonBoards
+
+REGIONS = ["eu", "na", "sa", "asia", "oce", "af"]
+VENUES = 2000
+
+
+def build(players, rng):
+    season = SeasonBoards(1, None)
+    by_region, by_venue = {}, {}
+    for player_id in range(1, players + 1):
+        rating = rng.gauss(1000, 200)
+        season.ratings[player_id] = rating
+        region = rng.choice(REGIONS)
+        season.regions[player_id] = region
+        by_region.setdefault(region, []).append((player_id, rating))
+        if rng.random() < 0.6:  # Most players have played at a venue or two
+            venues = tuple({rng.randrange(VENUES) for _ in range(rng.choice((1, 1, 2)))})
+            season.venues[player_id] = venues
+            for venue in venues:
+                by_venue.setdefault(venue, []).append((player_id, rating))
+
+    start = time.perf_counter()
+    season.global_board.load(season.ratings.items())
+    for region, entries in by_region.items():
+        season.region_board(region).load(entries)
+    for venue, entries in by_venue.items():
+        season.venue_board(venue).load(entries)
+    print(f"Load: {players} players onto {len(season.boards)} boards in {time.perf_counter() - start:6.2f}s")
+    return season
+
+
+def stream(season, players, updates, rng):
+    # Rating changes arrive as match results: a winner and a loser each move by up to 40
+    changes = []
+    for _ in range(updates // 2):
+        a, b = rng.randrange(1, players + 1), rng.randrange(1, players + 1)
+        delta = rng.uniform(1, 40)
+        changes.append((a, delta, rng.randrange(VENUES) if rng.random() < 0.5 else None))
+        changes.append((b, -delta, None))
+
+    start = time.perf_counter()
+    for player_id, delta, venue in changes:
+        season.apply(player_id, season.ratings[player_id] + delta, season.regions[player_id], venue)
+    elapsed = time.perf_counter() - start
+    print(f"Updates: {len(changes)} rating changes in {elapsed:6.2f}s "
+          f"({elapsed / len(changes) * 1e6:6.1f}us each, {len(changes) / elapsed:,.0f}/s)")
+
+
+def query(season, players, count, rng):
+    board = season.global_board
+    sample = [rng.randrange(1, players + 1) for _ in range(count)]
+
+    timings = {}
+    start = time.perf_counter()
+    for player_id in sample:
+        board.rank(player_id, season.ratings[player_id])
+    timings['rank'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(count):
+        board.entries(0, 100)
+    timings['top 100'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for player_id in sample:
+        rank = board.rank(player_id, season.ratings[player_id])
+        board.entries(max(rank - 5, 0), 11)
+    timings['around (+-5)'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for player_id in sample:
+        region = season.region_boards[season.regions[player_id]]
+        region.rank(player_id, season.ratings[player_id])
+    timings['region rank'] = time.perf_counter() - start
+
+    for name, elapsed in timings.items():
+        print(f"Query {name:14s}: {elapsed / count * 1e6:8.1f}us each over {count} queries")
+
+    # What every rank query cost before: an ORDER BY over all players
+    start = time.perf_counter()
+    ordered = sorted(season.ratings.items(), key=lambda entry: (-entry[1], entry[0]))
+    ordered.index((sample[0], season.ratings[sample[0]]))
+    print(f"Full sort for one rank    : {(time.perf_counter() - start) * 1e6:8.1f}us")
+
+    expected = ordered.index((sample[0], season.ratings[sample[0]]))
+    assert board.rank(sample[0], season.ratings[sample[0]]) == expected
+    assert board.entries(0, 100) == ordered[:100]
+
+
+def main():
+    players = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    updates = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000
+    count = int(sys.argv[3]) if len(sys.argv) > 3 else 100_000
+    rng = random.Random(1)
+
+    season = build(players, rng)
+    stream(season, players, updates, rng)
+    query(season, players, count, rng)
+    print(f"Peak memory: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f}MB")
+
+
+if __name__ == '__main__':
+    main()
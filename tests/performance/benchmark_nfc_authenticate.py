@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+NFC authenticate hot path benchmark
+Compares taps/sec through verify_ntag424_response with the legacy per-call
+four-key HKDF derivation against the cached card key service
+
+Usage: python tests/performance/benchmark_nfc_authenticate.py [taps] [distinct_cards]
+"""
+
+import os
+import sys
+import time
+import base64
+import random
+import secrets
+import tempfile
+import importlib
+
+from cryptography.hazmat.primitives import hashes, hmac
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'services/api'))
+
+from shared.security import card_key_service
+from shared.security.card_key_service import CardKeyService, LocalMasterKeyBackend
+from routes import nfc_cards
+
+
+class Card:
+    def __init__(self, uid):
+        self.issuer_key_ref = uid
+
+
+def make_taps(service, taps, distinct_cards):
+    cards = [Card(secrets.token_hex(7).upper()) for _ in range(distinct_cards)]
+    requests = []
+    for _ in range(taps):
+        card = random.choice(cards)
+        challenge = secrets.token_bytes(16)
+        h = hmac.HMAC(service.backend.derive_key(card.issuer_key_ref, 'MAC'), hashes.SHA256())
+        h.update(challenge)
+        requests.append((card, base64.b64encode(challenge).decode(), base64.b64encode(h.finalize()).decode()))
+    return requests
+
+
+def run(requests):
+    start = time.perf_counter()
+    for card, challenge, response in requests:
+        assert nfc_cards.verify_ntag424_response(card, challenge, response)
+    return len(requests) / (time.perf_counter() - start)
+
+
+def main():
+    taps = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    distinct_cards = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+    sys.path.append(os.path.join(ROOT, 'tools/nfc-card-programmer'))
+    programmer = importlib.import_module('crypto_security').get_crypto_manager()
+
+    service = CardKeyService(LocalMasterKeyBackend(os.path.join(workdir, 'master_key.bin')))
+    requests = make_taps(service, taps, distinct_cards)
+
+    # Legacy path: sys.path lookup + all four HKDF keys on every tap
+    def legacy_derive_card_key(issuer_key_ref):
+        sys.path.append(os.path.join(ROOT, 'tools/nfc-card-programmer'))
+        from crypto_security import get_crypto_manager
+        return get_crypto_manager().derive_card_keys(issuer_key_ref[:14])['mac']
+
+    original = nfc_cards.derive_card_key
+    nfc_cards.derive_card_key = legacy_derive_card_key
+    legacy_rate = run(requests)
+    nfc_cards.derive_card_key = original
+
+    card_key_service.set_card_key_service(service)
+    cached_rate = run(requests)
+
+    print(f"taps={taps} distinct_cards={distinct_cards}")
+    print(f"legacy derivation:  {legacy_rate:10.0f} taps/sec")
+    print(f"card key service:   {cached_rate:10.0f} taps/sec ({cached_rate / legacy_rate:.1f}x)")
+    print(f"cache stats: {service.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
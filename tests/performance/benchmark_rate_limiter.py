@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Rate limiter per-check overhead benchmark
+Compares the legacy four-command sliding window with the single Lua round trip
+and the in-process fallback
+
+Usage: python tests/performance/benchmark_rate_limiter.py [checks]
+Set BENCH_REDIS_URL to measure against a real Redis instead of fakeredis.
+"""
+
+import os
+import sys
+import time
+import statistics
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, ROOT)
+
+from shared.security import rate_limiter
+from shared.security.rate_limiter import check_rate_limit, LocalRateLimiter
+
+
+def legacy_check(redis_client, key, max_requests, window_seconds):
+    """The pre-Lua implementation: four unpipelined commands"""
+    now = int(time.time())
+    redis_client.zremrangebyscore(key, 0, now - window_seconds)
+    current_count = redis_client.zcard(key)
+    if current_count >= max_requests:
+        redis_client.ttl(key)
+        return False
+    redis_client.zadd(key, {str(now): now})
+    redis_client.expire(key, window_seconds)
+    return True
+
+
+def measure(label, fn, checks):
+    samples = []
+    for i in range(checks):
+        start = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    print(f"{label:28s} mean {statistics.mean(samples):8.1f}us  "
+          f"p50 {samples[len(samples) // 2]:8.1f}us  p99 {samples[int(len(samples) * 0.99)]:8.1f}us")
+
+
+def main():
+    checks = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    if os.getenv("BENCH_REDIS_URL"):
+        import redis
+        client = redis.from_url(os.getenv("BENCH_REDIS_URL"), decode_responses=True)
+    else:
+        import fakeredis
+        client = fakeredis.FakeRedis(decode_responses=True)
+
+    rate_limiter.REDIS_CLIENT = client
+    measure("legacy 4-command window", lambda i: legacy_check(client, f"bench:legacy:{i % 100}", 100, 60), checks)
+    measure("lua sliding window", lambda i: check_rate_limit('admin_general', f"bench:{i % 100}"), checks)
+
+    rate_limiter.RateLimitConfig.DEFAULT_LIMITS['bench_gcra'] = {'requests': 100, 'window': 60, 'algorithm': 'gcra'}
+    measure("lua gcra", lambda i: check_rate_limit('bench_gcra', f"bench:{i % 100}"), checks)
+
+    rate_limiter.REDIS_CLIENT = None
+    rate_limiter.REDIS_AVAILABLE = False
+    rate_limiter.local_rate_limiter = LocalRateLimiter()
+    measure("local fallback", lambda i: check_rate_limit('admin_general', f"bench:{i % 100}"), checks)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Rating throughput benchmark
+Rates a synthetic match history in memory, then drains and recomputes a
+smaller history end to end through the rating processor against in-memory SQLite
+
+Usage: python tests/performance/benchmark_ratings.py [matches] [database_matches] [players]
+"""
+
+import os
+import sys
+import time
+import random
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.dialects.postgresql import JSONB, ARRAY
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from shared.models.base import Base, Match, MatchParticipant, MatchStatus, Player
+from shared.models.ratings import RatingSeason
+from shared.services.ratings import FinishedMatch, RatingEngine, RatingProcessor
+
+TABLES = ("players", "consoles", "matches", "match_participants", "rating_seasons", "player_ratings", "rating_history",
+          "season_venue_players")
+T0 = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+@compiles(JSONB, 'sqlite')
+def _compile_jsonb_sqlite(type_, compiler, **kw):
+    return 'JSON'
+
+
+@compiles(ARRAY, 'sqlite')
+def _compile_array_sqlite(type_, compiler, **kw):
+    return 'JSON'
+
+
+def history(count, players, seed=1):
+    """1v1 matches between players of hidden skill, one second apart"""
+    rng = random.Random(seed)
+    skill = [rng.gauss(0, 1) for _ in range(players + 1)]
+    for match_id in range(1, count + 1):
+        a, b = rng.sample(range(1, players + 1), 2)
+        roll = rng.random() + (skill[a] - skill[b]) * 0.2
+        result_a, result_b = ("win", "loss") if roll > 0.55 else ("loss", "win") if roll < 0.45 else ("draw", "draw")
+        yield FinishedMatch(match_id, T0 + timedelta(seconds=match_id), ((a, 0, result_a), (b, 1, result_b)))
+
+
+def bench_engine(count, players):
+    matches = list(history(count, players))
+    engine = RatingEngine()
+    start = time.perf_counter()
+    changes = 0
+    for match in matches:
+        changes += len(engine.rate(match))
+    elapsed = time.perf_counter() - start
+    ratings = sorted(state.rating for state in engine.ratings.values())
+    print(f"Engine: {count} matches, {changes} rating changes in {elapsed:6.2f}s "
+          f"({count / elapsed:,.0f} matches/s); ratings {ratings[0]:.0f}..{ratings[-1]:.0f}")
+
+
+def bench_processor(count, players):
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine, tables=[Base.metadata.tables[name] for name in TABLES])
+    SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+
+    with SessionLocal() as session:
+        session.execute(insert(Player), [{"id": i, "email": f"p{i}@example.com", "elo_rating": 1000, "status": "active",
+                                          "is_verified": False, "is_premium": False, "is_banned": False,
+                                          "warning_count": 0, "created_at": T0, "updated_at": T0}
+                                         for i in range(1, players + 1)])
+        session.add(RatingSeason(id=1, name="Season 1", starts_at=T0))
+        matches, participants = [], []
+        for match in history(count, players):
+            matches.append({"id": match.match_id, "status": MatchStatus.finished, "created_at": match.ended_at,
+                            "ended_at": match.ended_at})
+            participants.extend({"match_id": match.match_id, "player_id": p, "team": team, "result": result,
+                                 "joined_at": match.ended_at} for p, team, result in match.participants)
+        session.execute(insert(Match), matches)
+        session.execute(insert(MatchParticipant), participants)
+        session.commit()
+
+    processor = RatingProcessor(SessionLocal, batch_size=1000, clock=lambda: T0 + timedelta(days=365))
+    start = time.perf_counter()
+    processor.drain()
+    elapsed = time.perf_counter() - start
+    print(f"Processor: {count} matches live in batches of {processor.batch_size}: {elapsed:6.2f}s "
+          f"({count / elapsed:,.0f} matches/s)")
+
+    start = time.perf_counter()
+    stats = processor.recompute_season(1)
+    elapsed = time.perf_counter() - start
+    print(f"Processor: season recompute of {stats['matches']} matches: {elapsed:6.2f}s "
+          f"({stats['matches'] / elapsed:,.0f} matches/s)")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    database_count = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    players = int(sys.argv[3]) if len(sys.argv) > 3 else 20_000
+
+    bench_engine(count, players)
+    bench_processor(database_count, players)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Tournament bracket benchmark
+Times round creation and advancement for a large Swiss tournament and a
+single-elimination bracket against in-memory SQLite
+
+Usage: python tests/performance/benchmark_tournament_brackets.py [players]
+"""
+
+import os
+import sys
+import time
+import random
+from datetime import datetime, timezone
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import JSONB, ARRAY
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from shared.models.base import Base, Player, Admin
+from shared.models.tournaments import (
+    Tournament, TournamentParticipant, TournamentMatch, TournamentStatus, TournamentType
+)
+from shared.services.tournament_brackets import TournamentBracketService
+
+TABLES = (
+    'players', 'admins', 'matches', 'match_participants',
+    'tournaments', 'tournament_participants', 'tournament_matches'
+)
+
+
+@compiles(JSONB, 'sqlite')
+def _compile_jsonb_sqlite(type_, compiler, **kw):
+    return 'JSON'
+
+
+@compiles(ARRAY, 'sqlite')
+def _compile_array_sqlite(type_, compiler, **kw):
+    return 'JSON'
+
+
+def setup(tournament_type, players):
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine, tables=[Base.metadata.tables[name] for name in TABLES])
+    SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+    now = datetime.now(timezone.utc)
+    rng = random.Random(1)
+
+    with SessionLocal() as session:
+        session.add(Admin(id=1, username="admin", email="admin@example.com", password_hash="x"))
+        session.add_all([
+            Player(id=i, email=f"player{i}@example.com", elo_rating=rng.randint(800, 2400))
+            for i in range(1, players + 1)
+        ])
+        session.add(Tournament(
+            id=1, name="Benchmark Open", tournament_type=tournament_type, status=TournamentStatus.IN_PROGRESS,
+            max_participants=players, registration_start=now, registration_end=now, start_time=now,
+            created_by_admin_id=1
+        ))
+        session.flush()
+        session.add_all([TournamentParticipant(tournament_id=1, player_id=i) for i in range(1, players + 1)])
+        session.commit()
+    return SessionLocal
+
+
+def run(label, tournament_type, players):
+    SessionLocal = setup(tournament_type, players)
+    service = TournamentBracketService()
+    rng = random.Random(2)
+
+    start = time.perf_counter()
+    with SessionLocal() as session:
+        service.start(session, session.get(Tournament, 1))
+        session.commit()
+    print(f"{label}: start + round 1 for {players} players: {(time.perf_counter() - start) * 1000:8.1f}ms")
+
+    round_number = 1
+    while True:
+        with SessionLocal() as session:
+            if session.get(Tournament, 1).status == TournamentStatus.COMPLETED:
+                break
+            open_matches = session.query(TournamentMatch).filter(TournamentMatch.completed_at.is_(None)).all()
+            # Report all but the last result untimed; the last one triggers advancement
+            for tournament_match in open_matches[:-1]:
+                service.record_result(session, tournament_match, rng.choice(
+                    [tournament_match.player1_id, tournament_match.player2_id]))
+            last = open_matches[-1]
+            start = time.perf_counter()
+            result = service.record_result(session, last, last.player1_id)
+            session.commit()
+            elapsed = (time.perf_counter() - start) * 1000
+        round_number += 1
+        action = f"round {round_number} created" if result.get("advanced") else "tournament completed"
+        print(f"{label}: {action:24s} {elapsed:8.1f}ms ({len(open_matches)} results in previous round)")
+
+
+def main():
+    players = int(sys.argv[1]) if len(sys.argv) > 1 else 4096
+    run("swiss", TournamentType.SWISS, players)
+    run("single elimination", TournamentType.SINGLE_ELIMINATION, players)
+
+
+if __name__ == '__main__':
+    main()
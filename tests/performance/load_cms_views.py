@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+CMS article read load test
+Concurrent readers of one hot article, comparing the legacy per-view
+INSERT + view_count += 1 + commit with the batched view counter
+
+Usage: python tests/performance/load_cms_views.py [reads] [threads]
+Runs against a temporary SQLite file; set BENCH_DATABASE_URL to use Postgres
+(the run adds a throwaway article there).
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session, sessionmaker
+
+from shared.models.base import Base
+from shared.models.cms import ContentStatus, ContentType, ContentView, NewsArticle
+from shared.services.view_counter import ARTICLE, ViewCounter
+
+TABLES = [NewsArticle.__table__, ContentView.__table__]
+
+
+def make_engine():
+    url = os.getenv("BENCH_DATABASE_URL")
+    if url:
+        return create_engine(url, pool_size=32, max_overflow=32)
+    path = os.path.join(tempfile.mkdtemp(), "cms.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"timeout": 60, "check_same_thread": False})
+    # The article table has Postgres JSONB / ARRAY columns
+    compiles(JSONB, 'sqlite')(lambda type_, compiler, **kw: 'JSON')
+    compiles(ARRAY, 'sqlite')(lambda type_, compiler, **kw: 'JSON')
+    Base.metadata.create_all(engine, tables=TABLES)
+    return engine
+
+
+def create_article(SessionLocal):
+    with SessionLocal() as session:
+        article = NewsArticle(title="Hot article", slug=f"hot-{time.time_ns()}", content="...",
+                              content_type=ContentType.news, status=ContentStatus.published, author_admin_id=1)
+        session.add(article)
+        session.commit()
+        return article.id, article.slug
+
+
+def legacy_read(SessionLocal, slug, reader):
+    with SessionLocal() as session:
+        article = session.query(NewsArticle).filter(NewsArticle.slug == slug).first()
+        session.add(ContentView(article_id=article.id, ip_address=f"10.0.{reader // 256 % 256}.{reader % 256}"))
+        article.view_count += 1
+        session.commit()
+
+
+def batched_read(SessionLocal, counter, slug, reader):
+    with SessionLocal() as session:
+        article = session.query(NewsArticle).filter(NewsArticle.slug == slug).first()
+    counter.record(ARTICLE, article.id, f"10.0.{reader // 256 % 256}.{reader % 256}")
+
+
+def measure(label, read, reads, threads, article_writes, flush=None):
+    latencies, lock = [], threading.Lock()
+    article_writes[0] = 0
+
+    def timed(reader):
+        started = time.perf_counter()
+        read(reader)
+        with lock:
+            latencies.append(time.perf_counter() - started)
+
+    flusher_stop = threading.Event()
+    flusher = None
+    if flush:
+        # Stand-in for the counter's background thread, at a load-test friendly interval
+        flusher = threading.Thread(target=lambda: [flush() for _ in iter(lambda: flusher_stop.wait(0.2), True)])
+        flusher.start()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(timed, range(reads)))
+    elapsed = time.perf_counter() - started
+    if flusher:
+        flusher_stop.set()
+        flusher.join()
+        flush()
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    print(f"{label:18s} {reads / elapsed:8.0f} reads/s  p50 {pct(0.5):7.2f}ms  p99 {pct(0.99):8.2f}ms  "
+          f"news_articles writes {article_writes[0]:6d}")
+
+
+def main():
+    reads = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    engine = make_engine()
+    SessionLocal = sessionmaker(bind=engine, class_=Session, expire_on_commit=False)
+
+    article_writes = [0]
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def count_article_writes(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('UPDATE NEWS_ARTICLES'):
+            article_writes[0] += 1
+
+    print(f"{engine.dialect.name}: {reads} reads of one article from {threads} threads")
+
+    article_id, slug = create_article(SessionLocal)
+    measure("legacy per-view", lambda reader: legacy_read(SessionLocal, slug, reader), reads, threads, article_writes)
+    with SessionLocal() as session:
+        # The read-modify-write increment also loses updates under concurrency
+        print(f"{'':18s} view_count {session.get(NewsArticle, article_id).view_count}/{reads}")
+
+    article_id, slug = create_article(SessionLocal)
+    counter = ViewCounter(session_factory=SessionLocal)
+    measure("batched counter", lambda reader: batched_read(SessionLocal, counter, slug, reader), reads, threads,
+            article_writes, flush=counter.flush)
+    with SessionLocal() as session:
+        count = session.get(NewsArticle, article_id).view_count
+        print(f"{'':18s} view_count {count}/{reads}")
+        assert count == reads
+
+
+if __name__ == '__main__':
+    main()
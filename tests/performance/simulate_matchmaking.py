@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Matchmaking time-to-match simulation
+Feeds Poisson arrivals with normally distributed ELO into the legacy 2-second
+adjacent-pair poll and the event-driven widening-window pool, on a virtual clock
+
+Usage: python tests/performance/simulate_matchmaking.py [arrivals_per_minute] [minutes]
+"""
+
+import os
+import sys
+import random
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, os.path.join(ROOT, 'services', 'realtime'))
+
+from services.matchmaking_pool import MatchmakingPool, QueueEntry
+
+
+def poisson_arrivals(rate_per_second, duration, rng):
+    t = 0.0
+    player_id = 0
+    while True:
+        t += rng.expovariate(rate_per_second)
+        if t > duration:
+            return
+        player_id += 1
+        yield t, player_id, int(rng.gauss(1200, 250))
+
+
+def simulate_legacy(arrivals, duration, poll_seconds=2.0, max_diff=200):
+    """The old loop: every poll, walk the queue in join order pairing adjacent entries"""
+    queue, waits, pending = [], [], list(arrivals)
+    t = 0.0
+    while t <= duration:
+        while pending and pending[0][0] <= t:
+            queue.append(pending.pop(0))
+        i, remaining = 0, []
+        while i < len(queue) - 1:
+            if abs(queue[i][2] - queue[i + 1][2]) <= max_diff:
+                waits.extend([t - queue[i][0], t - queue[i + 1][0]])
+                i += 2
+            else:
+                remaining.append(queue[i])
+                i += 1
+        remaining.extend(queue[i:])
+        queue = remaining
+        t += poll_seconds
+    return waits, len(queue)
+
+
+def simulate_pool(arrivals, duration):
+    """Event-driven: match on join, re-sweep only when a search window widens"""
+    pool = MatchmakingPool("1v1")
+    waits, clock = [], 0.0
+    for arrival_time, player_id, elo in arrivals:
+        widen_at = pool.next_widen_at(clock)
+        while widen_at is not None and widen_at <= arrival_time:
+            for a, b in pool.sweep(widen_at):
+                waits.extend([widen_at - a.enqueued_at, widen_at - b.enqueued_at])
+            widen_at = pool.next_widen_at(widen_at)
+
+        clock = arrival_time
+        pool.add(QueueEntry(player_id=player_id, elo=elo, enqueued_at=arrival_time))
+        pair = pool.match(player_id, arrival_time)
+        if pair:
+            waits.extend([arrival_time - pair[0].enqueued_at, 0.0])
+    return waits, len(pool)
+
+
+def report(label, waits, unmatched, total):
+    waits = sorted(waits)
+    pct = lambda p: waits[min(len(waits) - 1, int(len(waits) * p))] if waits else float('nan')
+    print(f"{label:24s} matched {len(waits):6d}/{total:<6d} unmatched {unmatched:5d}  "
+          f"p50 {pct(0.5):6.1f}s  p90 {pct(0.9):6.1f}s  p99 {pct(0.99):6.1f}s")
+
+
+def main():
+    per_minute = float(sys.argv[1]) if len(sys.argv) > 1 else 30
+    minutes = float(sys.argv[2]) if len(sys.argv) > 2 else 60
+    duration = minutes * 60
+    arrivals = list(poisson_arrivals(per_minute / 60.0, duration, random.Random(42)))
+
+    print(f"{len(arrivals)} arrivals over {minutes:.0f} minutes ({per_minute:.0f}/min)")
+    report("legacy 2s poll", *simulate_legacy(arrivals, duration), len(arrivals))
+    report("event-driven pool", *simulate_pool(arrivals, duration), len(arrivals))
+
+
+if __name__ == '__main__':
+    main()
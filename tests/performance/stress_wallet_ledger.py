@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Wallet ledger concurrency stress test
+Hammers a single wallet with parallel deposits, withdrawals, prizes, cancellations
+and retried (duplicate) requests, then checks no update was lost or applied twice
+
+Usage: python tests/performance/stress_wallet_ledger.py [operations] [threads]
+Runs against a temporary SQLite file; set BENCH_DATABASE_URL to use a Postgres database
+(the ledger tables must exist there, the run adds a throwaway player and wallet).
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from shared.models.base import Base, Player
+from shared.models.tournaments import PlayerWallet
+from shared.models.wallet_ledger import LedgerEntry, LedgerPosting, WalletDailyTotal
+from shared.services.wallet_ledger import (
+    LedgerError, cancel_withdrawal, credit_deposit, hold_withdrawal, pay_tournament_prize, reconcile
+)
+
+LEDGER_TABLES = [PlayerWallet.__table__, LedgerEntry.__table__, LedgerPosting.__table__, WalletDailyTotal.__table__]
+
+
+def make_session_factory():
+    url = os.getenv("BENCH_DATABASE_URL")
+    if url:
+        engine = create_engine(url, pool_size=32, max_overflow=32)
+    else:
+        path = os.path.join(tempfile.mkdtemp(), "ledger.db")
+        engine = create_engine(f"sqlite:///{path}", connect_args={"timeout": 60, "check_same_thread": False})
+        Base.metadata.create_all(engine, tables=LEDGER_TABLES)
+    return engine, sessionmaker(bind=engine, class_=Session, expire_on_commit=False)
+
+
+def create_wallet(SessionLocal):
+    with SessionLocal() as session:
+        player_id = None
+        if session.bind.dialect.name != "sqlite":
+            player = Player(email=f"ledger-stress-{time.time_ns()}@example.com")
+            session.add(player)
+            session.flush()
+            player_id = player.id
+        wallet = PlayerWallet(player_id=player_id or 1, balance=Decimal("0.00"), currency="USD")
+        session.add(wallet)
+        session.commit()
+        return wallet.id
+
+
+def build_operations(count, rng):
+    """Operation plans; roughly one in five repeats an earlier key the way a client retry would"""
+    ops, keyed = [], []
+    for i in range(count):
+        if keyed and rng.random() < 0.2:
+            ops.append(rng.choice(keyed))
+            continue
+        amount = Decimal(rng.randint(1, 5000)) / 100
+        kind = rng.choices(["deposit", "withdraw", "prize", "cancel"], weights=[45, 40, 10, 5])[0]
+        op = (kind, f"{kind}-{i}", amount)
+        ops.append(op)
+        if kind != "cancel":
+            keyed.append(op)
+    rng.shuffle(ops)
+    return ops
+
+
+def run(SessionLocal, wallet_id, ops, threads):
+    outcomes = Counter()
+    applied = {}  # idempotency key -> wallet delta, first successful application only
+    holds = []
+    lock = threading.Lock()
+
+    def execute(op):
+        kind, key, amount = op
+        with SessionLocal() as session:
+            try:
+                if kind == "deposit":
+                    result = credit_deposit(session, wallet_id, amount, key)
+                elif kind == "withdraw":
+                    result = hold_withdrawal(session, wallet_id, amount, idempotency_key=key)
+                elif kind == "prize":
+                    result = pay_tournament_prize(session, wallet_id, int(key.split("-")[1]), amount)
+                else:
+                    with lock:
+                        hold = holds.pop() if holds else None
+                    if hold is None:
+                        outcomes["cancel_skipped"] += 1
+                        return
+                    result = cancel_withdrawal(session, hold)
+                session.commit()
+            except LedgerError as e:
+                session.rollback()
+                with lock:
+                    outcomes[f"{kind}_{type(e).__name__}"] += 1
+                return
+
+        with lock:
+            outcomes[f"{kind}_{'replayed' if result.replayed else 'applied'}"] += 1
+            if not result.replayed:
+                applied[result.entry_id] = result.amount
+                if kind == "withdraw":
+                    holds.append(result.entry_id)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(execute, ops))
+    return time.perf_counter() - started, outcomes, applied
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    engine, SessionLocal = make_session_factory()
+    wallet_id = create_wallet(SessionLocal)
+    ops = build_operations(count, random.Random(7))
+
+    elapsed, outcomes, applied = run(SessionLocal, wallet_id, ops, threads)
+
+    with SessionLocal() as session:
+        balance = session.get(PlayerWallet, wallet_id).balance
+        posted = session.execute(
+            select(func.coalesce(func.sum(LedgerPosting.amount), 0)).where(LedgerPosting.wallet_id == wallet_id)
+        ).scalar()
+        entries = session.execute(
+            select(func.count(LedgerPosting.id)).where(LedgerPosting.wallet_id == wallet_id)
+        ).scalar()
+        report = reconcile(session)
+        session.rollback()
+
+    expected = sum(applied.values(), Decimal("0.00"))
+    print(f"{engine.dialect.name}: {len(ops)} operations on wallet {wallet_id} with {threads} threads "
+          f"in {elapsed:.2f}s ({len(ops) / elapsed:.0f} ops/s)")
+    for outcome, n in sorted(outcomes.items()):
+        print(f"  {outcome:32s} {n:6d}")
+    print(f"balance {balance}  postings {Decimal(str(posted)).quantize(Decimal('0.01'))}  "
+          f"expected {expected}  wallet postings {entries}/{len(applied)}")
+
+    ok = (balance == expected and entries == len(applied) and balance >= 0
+          and not report['mismatches'] and not report['unbalanced_entries'])
+    print("OK" if ok else "FAILED: lost, duplicated or unbalanced postings")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
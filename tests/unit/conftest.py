@@ -0,0 +1,81 @@
+"""
+Shared fixtures for unit tests that need a real database
+Runs the Postgres models against in-memory SQLite; also holds test doubles
+shared by several test modules
+"""
+
+import os
+import sys
+import json
+from datetime import timezone
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import pytest
+from sqlalchemy import create_engine, event, DateTime
+from sqlalchemy.dialects.postgresql import JSONB, ARRAY
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import StaticPool
+
+
+@compiles(JSONB, 'sqlite')
+def _compile_jsonb_sqlite(type_, compiler, **kw):
+    return 'JSON'
+
+
+@compiles(ARRAY, 'sqlite')
+def _compile_array_sqlite(type_, compiler, **kw):
+    return 'JSON'
+
+
+def _restore_timezones(target, context):
+    """SQLite drops tzinfo; the code under test compares against aware datetimes"""
+    for column in target.__table__.columns:
+        if isinstance(column.type, DateTime) and column.type.timezone:
+            value = getattr(target, column.key, None)
+            if value is not None and value.tzinfo is None:
+                setattr(target, column.key, value.replace(tzinfo=timezone.utc))
+
+
+@pytest.fixture
+def sqlite_db():
+    """Factory: sqlite_db(*table_names) -> (engine, SessionLocal, executed_statements)"""
+    from shared.models.base import Base
+
+    engines = []
+    event.listen(Base, 'load', _restore_timezones, propagate=True)
+
+    def make(*table_names):
+        engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(engine, tables=[Base.metadata.tables[name] for name in table_names])
+        statements = []
+        event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+        engines.append(engine)
+        return engine, sessionmaker(bind=engine, class_=Session, expire_on_commit=False), statements
+
+    yield make
+
+    event.remove(Base, 'load', _restore_timezones)
+    for engine in engines:
+        engine.dispose()
+
+
+class FakeConnections:
+    """Realtime ConnectionManager stand-in that keeps what each connection was sent, as JSON"""
+
+    def __init__(self):
+        self.match_connections = {}
+        self.sent = {}
+
+    async def send_personal_message(self, message, connection_id):
+        self.sent.setdefault(connection_id, []).append(json.loads(json.dumps(message)))
+
+    async def send_to_match(self, message, match_id):
+        for connection_id in self.match_connections.get(match_id, []):
+            await self.send_personal_message(message, connection_id)
+
+    def last(self, connection_id, msg_type):
+        return [m for m in self.sent.get(connection_id, []) if m['type'] == msg_type][-1]
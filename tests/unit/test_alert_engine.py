@@ -0,0 +1,167 @@
+"""
+Unit tests for the admin alert engine
+Feeds synthetic heartbeat and NFC event streams and checks alert state transitions
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from shared.models.alerts import AdminAlert, AlertState
+from shared.models.base import Console, ConsoleStatus
+from shared.services.alert_engine import (
+    AlertEngine, ConsoleOfflineRule, SecurityEventBurstRule,
+    acknowledge_alert, alert_counts, list_alerts
+)
+
+TABLES = ('players', 'admins', 'consoles', 'admin_alerts')
+T0 = datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+class Clock:
+    def __init__(self):
+        self.now = T0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += timedelta(seconds=seconds)
+
+
+def _engine(SessionLocal, clock):
+    rules = [
+        ConsoleOfflineRule(offline_minutes=10),
+        SecurityEventBurstRule(
+            "nfc_auth_failures", "Failed Card Authentications", ("auth_failed",),
+            key_field="nfc_card_id", threshold=5, window_seconds=600, clear_seconds=60
+        ),
+    ]
+    return AlertEngine(rules=rules, session_factory=SessionLocal, clock=clock, flap_window_seconds=900,
+                       flap_threshold=2)
+
+
+def _add_consoles(SessionLocal, heartbeats):
+    with SessionLocal() as session:
+        for device_uid, last_heartbeat in heartbeats.items():
+            session.add(Console(device_uid=device_uid, status=ConsoleStatus.active,
+                                registered_at=T0 - timedelta(days=30), last_heartbeat=last_heartbeat))
+        session.commit()
+
+
+def _heartbeat(SessionLocal, engine, device_uid, at):
+    with SessionLocal() as session:
+        session.query(Console).filter(Console.device_uid == device_uid).update({'last_heartbeat': at})
+        session.commit()
+    return engine.handle_event('console.heartbeat', {'device_uid': device_uid})
+
+
+def _alerts(SessionLocal, dedup_key):
+    with SessionLocal() as session:
+        return session.query(AdminAlert).filter(AdminAlert.dedup_key == dedup_key).all()
+
+
+def test_console_offline_fires_and_resolves_after_heartbeat(sqlite_db):
+    _, SessionLocal, statements = sqlite_db(*TABLES)
+    clock = Clock()
+    engine = _engine(SessionLocal, clock)
+    _add_consoles(SessionLocal, {'KIOSK-A': T0 - timedelta(minutes=20), 'KIOSK-B': T0 - timedelta(seconds=30)})
+
+    transitions = engine.evaluate()
+    assert [(t.kind, t.dedup_key) for t in transitions] == [('fired', 'console_offline:KIOSK-A')]
+
+    # Re-evaluating while still offline dedups into the same alert
+    clock.advance(60)
+    assert engine.evaluate() == []
+    assert len(_alerts(SessionLocal, 'console_offline:KIOSK-A')) == 1
+
+    # Heartbeats from a healthy console never touch the alert table
+    before = len(statements)
+    _heartbeat(SessionLocal, engine, 'KIOSK-B', clock.now)
+    assert not any('admin_alerts' in sql for sql in statements[before:])
+
+    # The heartbeat starts the clear period; the alert resolves once it has held
+    _heartbeat(SessionLocal, engine, 'KIOSK-A', clock.now)
+    alert, = _alerts(SessionLocal, 'console_offline:KIOSK-A')
+    assert alert.state == AlertState.FIRING.value and alert.clear_since == clock.now
+    clock.advance(30)
+    assert engine.evaluate() == []
+    clock.advance(31)
+    assert [t.kind for t in engine.evaluate()] == ['resolved']
+    assert _alerts(SessionLocal, 'console_offline:KIOSK-A')[0].state == AlertState.RESOLVED.value
+
+
+def test_flapping_console_reopens_same_alert_and_holds_open(sqlite_db):
+    _, SessionLocal, _ = sqlite_db(*TABLES)
+    clock = Clock()
+    engine = _engine(SessionLocal, clock)
+    _add_consoles(SessionLocal, {'KIOSK-A': T0 - timedelta(minutes=20)})
+
+    for flap in range(3):
+        transitions = engine.evaluate()
+        assert [t.kind for t in transitions] == ['fired' if flap == 0 else 'reopened']
+        _heartbeat(SessionLocal, engine, 'KIOSK-A', clock.now)
+        clock.advance(61)
+        resolved = engine.evaluate()
+        # After two flaps the alert must stay clear for the whole flap window
+        assert [t.kind for t in resolved] == (['resolved'] if flap < 2 else [])
+        clock.advance(60)
+        with SessionLocal() as session:
+            session.query(Console).update({'last_heartbeat': clock.now - timedelta(minutes=11)})
+            session.commit()
+
+    alerts = _alerts(SessionLocal, 'console_offline:KIOSK-A')
+    assert len(alerts) == 1
+    assert alerts[0].flap_count == 2 and alerts[0].fire_count == 3
+    assert alerts[0].to_dict(flap_threshold=2)['flapping'] is True
+
+
+def test_nfc_failure_burst_fires_once_and_resolves_when_quiet(sqlite_db):
+    _, SessionLocal, statements = sqlite_db(*TABLES)
+    clock = Clock()
+    engine = _engine(SessionLocal, clock)
+
+    def failure(card_id):
+        clock.advance(10)
+        return engine.handle_event('nfc.security', {'event_type': 'auth_failed', 'nfc_card_id': card_id})
+
+    for _ in range(4):
+        assert failure(7) == []
+    assert [t.dedup_key for t in failure(7)] == ['nfc_auth_failures:7']
+
+    # Further failures inside the touch interval are absorbed in memory
+    before = len(statements)
+    for _ in range(3):
+        assert failure(7) == []
+    assert len(statements) == before
+
+    # Successful events and other cards below threshold do nothing
+    engine.handle_event('nfc.security', {'event_type': 'auth_success', 'nfc_card_id': 7})
+    assert failure(8) == []
+
+    clock.advance(600)
+    assert engine.evaluate() == []  # quiet period reached: clearing starts
+    clock.advance(60)
+    assert [(t.kind, t.dedup_key) for t in engine.evaluate()] == [('resolved', 'nfc_auth_failures:7')]
+
+
+def test_acknowledged_alert_stays_acknowledged_while_firing(sqlite_db):
+    _, SessionLocal, _ = sqlite_db(*TABLES)
+    clock = Clock()
+    engine = _engine(SessionLocal, clock)
+    _add_consoles(SessionLocal, {'KIOSK-A': T0 - timedelta(hours=3), 'KIOSK-C': T0 - timedelta(minutes=15)})
+    engine.evaluate()
+
+    with SessionLocal() as session:
+        alerts = list_alerts(session)
+        # Three hours offline is high severity, so it sorts first
+        assert [a.dedup_key for a in alerts] == ['console_offline:KIOSK-A', 'console_offline:KIOSK-C']
+        assert acknowledge_alert(session, alerts[0].id) is not None
+        assert acknowledge_alert(session, 9999) is None
+        session.commit()
+
+    clock.advance(60)
+    engine.evaluate()
+    with SessionLocal() as session:
+        alert, = session.query(AdminAlert).filter(AdminAlert.dedup_key == 'console_offline:KIOSK-A').all()
+        assert alert.state == AlertState.ACKNOWLEDGED.value
+        assert alert_counts(session) == {'critical': 0, 'high': 1, 'medium': 1, 'low': 0}
+        assert [a.dedup_key for a in list_alerts(session, min_severity='high')] == ['console_offline:KIOSK-A']
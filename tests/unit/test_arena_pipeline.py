@@ -0,0 +1,170 @@
+"""
+Unit tests for the arena pipeline scheduler
+The arena creation graph runs on stub generators with configurable latencies in
+place of the LLM, ComfyUI, ElevenLabs and ffmpeg calls
+"""
+
+import asyncio
+import time
+from collections import defaultdict
+
+import pytest
+
+from shared.services.arena_pipeline import COMPLETED, RESUMED, RETRYING, SKIPPED, Stage, StagePipeline, safe_name
+
+# The stage graph of ArenaCreationEngine.build_pipeline: (name, requires, slot)
+ARENA_GRAPH = [
+    ('arena_data', (), 'llm'),
+    ('arena_id', ('arena_data',), 'db'),
+    ('images', ('arena_data',), 'gpu'),
+    ('clips', ('images',), 'gpu'),
+    ('sequences', ('clips',), 'ffmpeg'),
+    ('music', ('arena_data',), 'audio'),
+    ('final_videos', ('sequences', 'music'), 'ffmpeg'),
+    ('arena_videos', ('final_videos',), None),
+    ('clip_records', ('arena_id', 'arena_videos'), 'db'),
+]
+SLOTS = {'llm': 4, 'gpu': 1, 'ffmpeg': 2, 'audio': 2, 'db': 4}
+
+
+class StubGenerators:
+    """Stage functions that sleep for a configured latency and record what ran when"""
+
+    def __init__(self, latencies, failures=None):
+        self.latencies = latencies
+        self.failures = dict(failures or {})  # (job, stage) -> failures before it succeeds
+        self.calls = defaultdict(int)
+        self.running = defaultdict(int)
+        self.peak = defaultdict(int)
+        self.spans = {}
+
+    def stage(self, name, slot):
+        async def run(job, results):
+            self.calls[(job, name)] += 1
+            self.running[slot] += 1
+            self.peak[slot] = max(self.peak[slot], self.running[slot])
+            started = time.monotonic()
+            try:
+                await asyncio.sleep(self.latencies.get(name, 0))
+                if self.failures.get((job, name), 0) > 0:
+                    self.failures[(job, name)] -= 1
+                    raise RuntimeError(f"{name} unavailable")
+            finally:
+                self.running[slot] -= 1
+            self.spans[(job, name)] = (started, time.monotonic())
+            return {'job': job, 'stage': name, 'inputs': sorted(results)}
+        return run
+
+    def stages(self):
+        return [Stage(name, self.stage(name, slot), requires, slot) for name, requires, slot in ARENA_GRAPH]
+
+
+LATENCIES = {'arena_data': 0.02, 'arena_id': 0.01, 'images': 0.06, 'clips': 0.06,
+             'sequences': 0.04, 'music': 0.1, 'final_videos': 0.04, 'arena_videos': 0, 'clip_records': 0.01}
+
+
+def _run(pipeline, jobs):
+    return asyncio.run(pipeline.run(jobs))
+
+
+def test_stages_overlap_within_and_across_arenas():
+    stubs = StubGenerators(LATENCIES)
+    pipeline = StagePipeline(stubs.stages(), slots=SLOTS)
+
+    started = time.monotonic()
+    outcomes = _run(pipeline, range(4))
+    elapsed = time.monotonic() - started
+
+    assert [o.key for o in outcomes] == ['0', '1', '2', '3'] and all(o.succeeded for o in outcomes)
+    sequential = 4 * sum(LATENCIES.values())
+    # The single GPU slot is the bottleneck: 4 arenas x (images + clips) = 0.48s
+    assert elapsed < sequential * 0.7
+    # Music renders while the arena's images are being generated
+    music, images = stubs.spans[(0, 'music')], stubs.spans[(0, 'images')]
+    assert music[0] < images[1] and images[0] < music[1]
+    # Each stage sees the results of everything upstream of it
+    assert outcomes[0].results['clip_records']['inputs'] == sorted(n for n, _, _ in ARENA_GRAPH[:-1])
+    assert pipeline.progress()['jobs'] == {'total': 4, 'running': 0, 'completed': 4, 'failed': 0}
+
+
+def test_slot_pools_bound_concurrency_across_arenas():
+    stubs = StubGenerators(LATENCIES)
+    _run(StagePipeline(stubs.stages(), slots=SLOTS), range(6))
+    assert stubs.peak['gpu'] == 1
+    assert stubs.peak['ffmpeg'] == 2
+    assert stubs.peak['llm'] == 4
+
+    stubs = StubGenerators(LATENCIES)
+    _run(StagePipeline(stubs.stages(), slots=SLOTS, max_jobs=1), range(3))
+    assert stubs.peak['llm'] == 1  # One arena in flight at a time
+
+
+def test_failed_stage_is_retried_then_fails_only_its_dependents():
+    stubs = StubGenerators(LATENCIES, failures={(0, 'images'): 2, (1, 'music'): 5})
+    events = []
+    sleeps = []
+
+    async def no_backoff(delay):
+        sleeps.append(delay)
+
+    pipeline = StagePipeline(stubs.stages(), slots=SLOTS, attempts=3, retry_delay=0.5,
+                             on_progress=events.append, sleep=no_backoff)
+    first, second = _run(pipeline, [0, 1])
+
+    assert first.succeeded and stubs.calls[(0, 'images')] == 3
+    assert [e['attempt'] for e in events if e['job'] == '0' and e['status'] == RETRYING] == [1, 2]
+
+    assert second.failed_stage == 'music' and str(second.error) == "music unavailable"
+    assert stubs.calls[(1, 'music')] == 3
+    # The video path of the failed arena still ran; only what needs the music was skipped
+    assert 'sequences' in second.results and 'final_videos' not in second.results
+    skipped = {e['stage'] for e in events if e['job'] == '1' and e['status'] == SKIPPED}
+    assert skipped == {'final_videos', 'arena_videos', 'clip_records'}
+    assert sorted(sleeps) == [0.5, 0.5, 1.0, 1.0]  # Exponential backoff per stage
+    assert pipeline.progress()['jobs']['failed'] == 1
+
+
+def test_rerun_resumes_from_checkpoints(tmp_path):
+    stubs = StubGenerators(LATENCIES, failures={(0, 'sequences'): 1})
+    pipeline = StagePipeline(stubs.stages(), slots=SLOTS, checkpoint_dir=tmp_path, job_key=lambda i: f"arena_{i:03d}")
+    first, second = _run(pipeline, [0, 1])
+    assert not first.succeeded and second.succeeded
+
+    events = []
+    resumed = StagePipeline(stubs.stages(), slots=SLOTS, checkpoint_dir=tmp_path,
+                            job_key=lambda i: f"arena_{i:03d}", on_progress=events.append)
+    first, second = _run(resumed, [0, 1])
+
+    assert first.succeeded and second.succeeded
+    # Finished stages, the LLM call included, are not paid for twice
+    assert stubs.calls[(0, 'arena_data')] == 1 and stubs.calls[(0, 'images')] == 1
+    assert stubs.calls[(0, 'sequences')] == 2 and stubs.calls[(0, 'music')] == 1
+    assert all(n == 1 for (job, _), n in stubs.calls.items() if job == 1)
+    assert {e['stage'] for e in events if e['job'] == 'arena_001'} == {n for n, _, _ in ARENA_GRAPH}
+    assert all(e['status'] == RESUMED for e in events if e['job'] == 'arena_001')
+    assert {e['stage'] for e in events if e['job'] == 'arena_000' and e['status'] == COMPLETED} == {
+        'sequences', 'final_videos', 'arena_videos', 'clip_records'}
+
+
+def test_invalid_graphs_are_rejected():
+    async def noop(job, results):
+        return None
+
+    with pytest.raises(ValueError, match="cycle"):
+        StagePipeline([Stage('a', noop, ('b',)), Stage('b', noop, ('a',))])
+    with pytest.raises(ValueError, match="unknown"):
+        StagePipeline([Stage('a', noop, ('missing',))])
+    with pytest.raises(ValueError, match="slot"):
+        StagePipeline([Stage('a', noop, slot='gpu')], slots={'ffmpeg': 1})
+
+
+def test_checkpoints_stay_inside_the_checkpoint_directory(tmp_path):
+    assert safe_name("20250301120000_a1b2c3") and safe_name("arena_007")
+    assert not any(safe_name(name) for name in ("", "..", "../etc", "runs/x", "/tmp/x", "a\n", "x" * 65, 7, None))
+
+    stubs = StubGenerators(LATENCIES)
+    pipeline = StagePipeline(stubs.stages(), slots=SLOTS, checkpoint_dir=tmp_path / "runs" / "r1",
+                             job_key=lambda i: f"../../arena_{i:03d}")
+    with pytest.raises(ValueError):
+        _run(pipeline, [0])
+    assert not stubs.calls and not list(tmp_path.rglob("*.json"))
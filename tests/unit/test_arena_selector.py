@@ -0,0 +1,104 @@
+"""
+Unit tests for the arena selector
+Alias-table draws checked against the configured weights with seeded generators
+"""
+
+import random
+from collections import Counter
+
+import pytest
+
+from shared.models.arena import Arena
+from shared.services.arena_selector import AliasTable, ArenaSelector, RARITY_WEIGHTS
+
+# Chi-square critical values at p = 0.001 by degrees of freedom
+CHI2_CRITICAL = {1: 10.83, 2: 13.82, 3: 16.27, 4: 18.47, 5: 20.52}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def arenas(sqlite_db):
+    _, SessionLocal, _ = sqlite_db('arenas')
+    with SessionLocal() as session:
+        session.add_all([
+            Arena(id=1, name="Crimson Forge", mana_color="CRIMSON", rarity="common"),
+            Arena(id=2, name="Azure Depths", mana_color="AZURE", rarity="common", selection_weight=2.0),
+            Arena(id=3, name="Verdant Grove", mana_color="VERDANT", rarity="rare", game_modes=["1v1"]),
+            Arena(id=4, name="Obsidian Throne", mana_color="OBSIDIAN", rarity="legendary", min_elo=1600),
+            Arena(id=5, name="Radiant Spire", mana_color="RADIANT", rarity="epic", max_elo=1199),
+            Arena(id=6, name="Closed Arena", mana_color="AETHER", is_active=False),
+        ])
+        session.commit()
+    clock = Clock()
+    return ArenaSelector(session_factory=SessionLocal, rng=random.Random(7), clock=clock), SessionLocal, clock
+
+
+def chi_square(counts, probabilities, draws):
+    return sum((counts.get(k, 0) - p * draws) ** 2 / (p * draws) for k, p in probabilities.items())
+
+
+def test_alias_table_matches_weights():
+    weights = [5, 1, 0.5, 3, 0.01]
+    table = AliasTable(list("abcde"), weights)
+    rng = random.Random(1)
+    draws = 200000
+    counts = Counter(table.sample(rng) for _ in range(draws))
+    expected = {k: w / sum(weights) for k, w in zip("abcde", weights)}
+    assert chi_square(counts, expected, draws) < CHI2_CRITICAL[4]
+    assert AliasTable(["only"], [3]).sample(rng) == "only"
+    with pytest.raises(ValueError):
+        AliasTable(["a", "b"], [0, 0])
+
+
+def test_draws_follow_rarity_and_filters(arenas):
+    selector, _, _ = arenas
+    probabilities = selector.probabilities(mode="1v1", elo=1400)
+    assert set(probabilities) == {1, 2, 3}
+    assert probabilities[2] == pytest.approx(2 * probabilities[1])
+    assert probabilities[3] == pytest.approx(probabilities[1] * RARITY_WEIGHTS["rare"])
+
+    draws = 50000
+    for mode, elo in [("1v1", 1400), ("2v2", 1800), (None, 1000)]:
+        expected = selector.probabilities(mode=mode, elo=elo)
+        counts = Counter(selector.pick(mode=mode, elo=elo).id for _ in range(draws))
+        assert set(counts) <= set(expected)
+        assert chi_square(counts, expected, draws) < CHI2_CRITICAL[len(expected) - 1]
+    assert set(selector.probabilities(mode="2v2", elo=1800)) == {1, 2, 4}
+    assert selector.stats()['loads'] == 1
+
+
+def test_seeded_draws_are_reproducible(arenas):
+    selector, _, _ = arenas
+
+    def draws(seed):
+        rng = random.Random(seed)
+        return [selector.pick(elo=1700, rng=rng).id for _ in range(200)]
+
+    assert draws(99) == draws(99)
+    assert draws(99) != draws(100)
+
+
+def test_edits_refresh_the_tables(arenas):
+    selector, SessionLocal, clock = arenas
+    assert 6 not in selector.probabilities()
+    with SessionLocal() as session:
+        session.get(Arena, 6).is_active = True
+        session.get(Arena, 1).selection_weight = 0
+        session.commit()
+    assert 6 not in selector.probabilities()  # Still the cached snapshot
+
+    selector.invalidate()
+    assert set(selector.probabilities()) == {2, 3, 4, 5, 6}
+
+    with SessionLocal() as session:
+        session.query(Arena).update({Arena.is_active: False})
+        session.commit()
+    clock.now += selector.ttl_seconds  # Edits from another worker show up after the TTL
+    assert selector.pick() is None and selector.pick_uniform() is None
@@ -0,0 +1,271 @@
+"""
+Unit tests for the campaign delivery pipeline
+Segment resolution, retries, resuming an interrupted send and the SMTP transport
+"""
+
+import socketserver
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from shared.models.base import Admin, Player
+from shared.models.communications import CampaignStatus, EmailCampaign, EmailLog, RecipientType
+from shared.services.campaign_delivery import (
+    BOUNCED, FAILED, QUEUED, SENDING, SENT, CampaignDelivery, CampaignError, MemoryTransport, OutboundEmail,
+    PermanentDeliveryError, SharedRateLimit, SMTPTransport, TokenBucket, campaign_progress
+)
+
+TABLES = ('players', 'admins', 'email_campaigns', 'email_logs')
+T0 = datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+class Clock:
+    def __init__(self):
+        self.now = T0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def db(sqlite_db):
+    _, SessionLocal, statements = sqlite_db(*TABLES)
+    with SessionLocal() as session:
+        session.add(Admin(id=1, username="ops", email="ops@deckport.ai", password_hash="x"))
+        session.commit()
+    return SessionLocal, statements
+
+
+def _players(SessionLocal, count, **attrs):
+    with SessionLocal() as session:
+        start = session.query(Player).count()
+        for i in range(start, start + count):
+            session.add(Player(email=f"player{i}@example.com", created_at=T0 - timedelta(days=60), **attrs))
+        session.commit()
+
+
+def _campaign(SessionLocal, recipient_type=RecipientType.all_players, **attrs):
+    with SessionLocal() as session:
+        campaign = EmailCampaign(name="Season 2", subject="Season 2 is live", content="New cards are in.",
+                                 recipient_type=recipient_type, created_by_admin_id=1, **attrs)
+        session.add(campaign)
+        session.commit()
+        return campaign.id
+
+
+def _delivery(SessionLocal, transport, clock, **kwargs):
+    kwargs.setdefault('workers', 1)
+    return CampaignDelivery(session_factory=SessionLocal, transport=transport, rate=0, batch_size=10,
+                            retry_base_seconds=60, clock=clock, **kwargs)
+
+
+def test_segment_resolves_in_one_statement(db):
+    SessionLocal, statements = db
+    _players(SessionLocal, 3, is_premium=True)
+    _players(SessionLocal, 2, is_premium=False)
+    _players(SessionLocal, 1, is_premium=True, email_notifications=False)
+    _players(SessionLocal, 1, is_premium=True, is_banned=True)
+    campaign_id = _campaign(SessionLocal, RecipientType.premium_players)
+    delivery = _delivery(SessionLocal, MemoryTransport(), Clock())
+
+    del statements[:]
+    result = delivery.start_campaign(campaign_id)
+    assert (result['queued'], result['recipient_count']) == (3, 3)
+    assert sum(1 for s in statements if s.lstrip().upper().startswith('INSERT')) == 1
+
+    with pytest.raises(CampaignError):
+        delivery.start_campaign(campaign_id)  # Already sending
+    with SessionLocal() as session:
+        assert campaign_progress(session, campaign_id) == {QUEUED: 3, 'total': 3}
+        assert session.get(EmailCampaign, campaign_id).status == CampaignStatus.sending
+
+
+def test_transient_failures_retry_and_bounces_stop(db):
+    SessionLocal, _ = db
+    _players(SessionLocal, 4)
+    campaign_id = _campaign(SessionLocal)
+    transport, clock = MemoryTransport(), Clock()
+    transport.fail("player1@example.com", times=1)
+    transport.fail("player2@example.com", permanent=True)
+    transport.fail("player3@example.com", times=10)
+    delivery = _delivery(SessionLocal, transport, clock, max_attempts=2)
+    delivery.start_campaign(campaign_id)
+
+    assert delivery.drain()['finished'] == []
+    assert [m.to for m in transport.outbox] == ["player0@example.com"]
+    with SessionLocal() as session:
+        assert campaign_progress(session, campaign_id) == {SENT: 1, QUEUED: 2, BOUNCED: 1, 'total': 4}
+
+    # Nothing is due until the backoff has passed
+    assert delivery.claim() == []
+    clock.now += timedelta(seconds=61)
+    assert delivery.drain()['finished'] == [campaign_id]
+    assert sorted(m.to for m in transport.outbox) == ["player0@example.com", "player1@example.com"]
+    with SessionLocal() as session:
+        campaign = session.get(EmailCampaign, campaign_id)
+        assert (campaign.status, campaign.sent_count, campaign.bounce_count) == (CampaignStatus.sent, 2, 1)
+        assert campaign.open_count == 0
+        failed = session.query(EmailLog).filter(EmailLog.status == FAILED).one()
+        assert (failed.email_address, failed.retry_count) == ("player3@example.com", 2)
+
+
+def test_interrupted_send_resumes_without_duplicates(db):
+    SessionLocal, _ = db
+    _players(SessionLocal, 25)
+    campaign_id = _campaign(SessionLocal)
+    transport, clock = MemoryTransport(), Clock()
+    crashed = _delivery(SessionLocal, transport, clock)
+    crashed.start_campaign(campaign_id)
+
+    # The first process sends part of one batch and dies with the rest of it claimed
+    claimed = crashed.claim()
+    with SessionLocal() as session:
+        for message in claimed[:4]:
+            crashed.deliver(message, session)
+
+    resumed = _delivery(SessionLocal, transport, clock)
+    resumed.drain()
+    with SessionLocal() as session:
+        assert campaign_progress(session, campaign_id) == {SENT: 19, SENDING: 6, 'total': 25}
+
+    clock.now += timedelta(seconds=301)  # Lease expired
+    assert resumed.drain()['finished'] == [campaign_id]
+    sends = Counter(m.to for m in transport.outbox)
+    assert len(sends) == 25 and set(sends.values()) == {1}
+    with SessionLocal() as session:
+        retries = Counter(log.retry_count for log in session.query(EmailLog))
+    assert retries == {0: 19, 1: 6}  # The reclaim counted as an attempt
+
+
+def test_reclaimed_leases_stop_after_max_attempts(db):
+    SessionLocal, _ = db
+    _players(SessionLocal, 1)
+    campaign_id = _campaign(SessionLocal)
+    clock = Clock()
+    delivery = _delivery(SessionLocal, MemoryTransport(), clock, max_attempts=3)
+    delivery.start_campaign(campaign_id)
+
+    # A message that kills its worker every time is claimed and abandoned until it runs out of attempts
+    for attempt in range(3):
+        assert len(delivery.claim()) == 1
+        clock.now += timedelta(seconds=301)
+    assert delivery.claim() == []
+    with SessionLocal() as session:
+        log = session.query(EmailLog).one()
+        assert (log.status, log.retry_count) == (FAILED, 3)
+    assert delivery.finalize() == [campaign_id]
+
+
+def test_pause_resume_and_cancel(db):
+    SessionLocal, _ = db
+    _players(SessionLocal, 5)
+    transport, clock = MemoryTransport(), Clock()
+    delivery = _delivery(SessionLocal, transport, clock)
+    campaign_id = _campaign(SessionLocal)
+    delivery.start_campaign(campaign_id)
+
+    delivery.pause_campaign(campaign_id)
+    assert delivery.claim() == []
+    _players(SessionLocal, 2)
+    assert delivery.start_campaign(campaign_id)['resumed']
+    delivery.drain()
+    assert len(transport.outbox) == 5  # Players who joined while paused are not added
+
+    scheduled = _campaign(SessionLocal, status=CampaignStatus.scheduled, scheduled_at=T0 + timedelta(hours=1))
+    assert delivery.run_once()['started'] == []
+    clock.now = T0 + timedelta(hours=1)
+    assert delivery.run_once()['started'] == [scheduled]
+    assert delivery.cancel_campaign(scheduled) == 7
+    assert delivery.claim() == []
+    with pytest.raises(CampaignError):
+        delivery.cancel_campaign(scheduled)
+
+
+def test_token_bucket_spaces_out_sends():
+    now, slept = [0.0], []
+
+    def sleep(seconds):
+        slept.append(seconds)
+        now[0] += seconds
+
+    bucket = TokenBucket(rate=10, burst=2, clock=lambda: now[0], sleep=sleep)
+    for _ in range(5):
+        bucket.acquire()
+    assert now[0] == pytest.approx(0.3)
+
+
+def test_shared_rate_limit_splits_the_rate_across_processes():
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeRedis(decode_responses=True)
+    now, slept = [100.0], []
+
+    def sleep(seconds):
+        slept.append(seconds)
+
+    # Two processes at 10/s with a burst of 10 share one schedule: 20 sends reserve 2s of slots
+    processes = [SharedRateLimit(10, client=client, clock=lambda: now[0], sleep=sleep) for _ in range(2)]
+    for i in range(20):
+        processes[i % 2].acquire()
+    assert len(slept) == 10 and max(slept) == pytest.approx(1.0, abs=0.01)
+
+    # Without Redis each process falls back to its share of the rate
+    offline = SharedRateLimit(10, processes=4, redis_url=None)
+    assert offline.local.rate == 2.5
+
+
+class _SMTPSink(socketserver.StreamRequestHandler):
+    """Just enough SMTP to accept mail; refuses any recipient at blocked.example.com"""
+
+    def reply(self, line):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        self.reply("220 sink ready")
+        data = None
+        while True:
+            line = self.rfile.readline().decode()
+            if not line:
+                return
+            if data is not None:
+                if line == ".\r\n":
+                    self.server.messages.append("".join(data))
+                    data = None
+                    self.reply("250 queued")
+                else:
+                    data.append(line)
+                continue
+            command = line[:4].upper()
+            if command in ("EHLO", "HELO"):
+                self.reply("250 sink")
+            elif command == "RCPT" and "blocked.example.com" in line:
+                self.reply("550 no such user")
+            elif command == "DATA":
+                data = []
+                self.reply("354 go ahead")
+            elif command == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+def test_smtp_transport_against_local_sink():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _SMTPSink)
+    server.daemon_threads = True
+    server.messages = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    transport = SMTPTransport(host="127.0.0.1", port=server.server_address[1], username=None, timeout=5)
+    try:
+        message = OutboundEmail(1, 7, 42, "player42@example.com", "Season 2 is live", "New cards are in.")
+        assert transport.send(message) == "<campaign-7-42@deckport.ai>"
+        transport.send(OutboundEmail(2, 7, 43, "player43@example.com", "Season 2 is live", "Again."))
+        with pytest.raises(PermanentDeliveryError):
+            transport.send(OutboundEmail(3, 7, 44, "x@blocked.example.com", "Season 2 is live", "Nope."))
+    finally:
+        transport.close()
+        server.shutdown()
+        server.server_close()
+    assert len(server.messages) == 2
+    assert "Message-ID: <campaign-7-42@deckport.ai>" in server.messages[0]
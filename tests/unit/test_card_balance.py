@@ -0,0 +1,130 @@
+"""
+Unit tests for the vectorized card balance library
+Checked against per-card reference formulas on small hand-built card sets
+"""
+
+import os
+import random
+import statistics
+import importlib.util
+
+import numpy as np
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+_spec = importlib.util.spec_from_file_location("balance", os.path.join(ROOT, "cardmaker.ai/scripts/balance.py"))
+balance = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(balance)
+
+
+def _card(name, category, mana, energy=0, attack=0, defense=0, health=0, rarity='COMMON', color='CRIMSON',
+          legendary=False, effects='[]', keywords='', ept=1):
+    return {'slug': name.lower(), 'name': name, 'category': category, 'rarity': rarity,
+            'legendary': 'TRUE' if legendary else 'FALSE', 'mana_color_code': color, 'mana_cost': str(mana),
+            'energy_cost': str(energy), 'attack': str(attack), 'defense': str(defense), 'health': str(health),
+            'base_energy_per_turn': str(ept), 'keywords': keywords, 'effects_json': effects}
+
+
+def _reference_energy(c):
+    if c['category'] == 'ACTION' or int(c['energy_cost']) > 0:
+        return int(c['energy_cost'])
+    attack, defense, health = int(c['attack']), int(c['defense']), int(c['health'])
+    if c['category'] == 'STRUCTURE':
+        cost = int(round((defense + health / 3.0) / 3.0))
+    else:
+        cost = int(round((attack + health / 4.0) / 4.0))
+    cost += (int(c['mana_cost']) >= 7) + (c['rarity'] == 'EPIC') + (c['legendary'] == 'TRUE')
+    return max(1, min(6, cost))
+
+
+def _random_set(n, seed=7):
+    rng = random.Random(seed)
+    cards = []
+    for i in range(n):
+        category = rng.choice(['CREATURE', 'STRUCTURE', 'ACTION'])
+        cards.append(_card(f"Card {i}", category, rng.randint(1, 8), rng.choice([0, 0, 1, 2, 3]),
+                           attack=rng.randint(0, 9), defense=rng.randint(0, 6), health=rng.randint(1, 14),
+                           rarity=rng.choice(['COMMON', 'RARE', 'EPIC']), color=rng.choice(['CRIMSON', 'AZURE']),
+                           legendary=rng.random() < 0.05,
+                           effects=rng.choice(['[]', '[{"amount": 3}]', '[{"amount": 2}, {"kind": "draw"}]']),
+                           keywords=rng.choice(['', 'swift', 'swift guard'])))
+    return cards
+
+
+def test_vectorized_formulas_match_per_card_reference():
+    cards = _random_set(400)
+    table = balance.CardTable.from_records(cards)
+    metrics = balance.evaluate(table)
+
+    assert metrics.energy_cost.tolist() == [_reference_energy(c) for c in cards]
+    for c, power, efficiency in zip(cards, metrics.power, metrics.efficiency):
+        attack, defense, health = int(c['attack']), int(c['defense']), int(c['health'])
+        expected = {'CREATURE': attack + health * 0.5, 'STRUCTURE': defense + health * 0.6}.get(c['category'])
+        if expected is None:
+            count, amount, keywords = balance._action_effects(c['effects_json'], c['keywords'])
+            expected = 1.0 + 0.7 * count + 0.05 * amount + 0.1 * keywords
+        assert power == pytest.approx(expected)
+        assert efficiency == pytest.approx(expected / max(1, int(c['mana_cost']) + _reference_energy(c)))
+
+    # Rarity by efficiency percentile: 60/25/10/5, ties keep set order
+    ranked = sorted(range(len(cards)), key=lambda i: metrics.efficiency[i])
+    expected_rarity = ['COMMON'] * 240 + ['RARE'] * 100 + ['EPIC'] * 40 + ['LEGENDARY'] * 20
+    assert [metrics.rarity_names[i] for i in ranked] == expected_rarity
+
+    reference = statistics.quantiles(metrics.efficiency.tolist(), n=100, method='inclusive')
+    assert balance.quantiles(metrics.efficiency, order=metrics.order) == pytest.approx(
+        (reference[9], reference[49], reference[89]))
+    assert balance.quantiles(metrics.efficiency) == pytest.approx(tuple(np.quantile(metrics.efficiency, [.1, .5, .9])))
+
+
+def test_repeated_names_keep_the_last_card():
+    table = balance.CardTable.from_records([_card("Twin", "CREATURE", 2, 1, attack=1),
+                                            _card("Other", "ACTION", 1, 1),
+                                            _card("Twin", "CREATURE", 3, 2, attack=5)])
+    assert table.name.tolist() == ["Twin", "Other"] and table.attack.tolist() == [5, 0]
+    assert len(table.replicate(3)) == 6
+
+
+def test_what_if_sweep_recomputes_the_energy_formula():
+    cards = [_card("Brute", "CREATURE", 4, 1, attack=8, health=8),
+             _card("Wall", "STRUCTURE", 3, 0, defense=6, health=9),
+             _card("Bolt", "ACTION", 1, 2)]
+    table = balance.CardTable.from_records(cards)
+
+    kept = balance.evaluate(table, balance.parse_params(["creature_energy_divisor=2"]))
+    assert kept.energy_cost.tolist() == [1, 3, 2]  # Designed costs stay unless recomputed
+
+    results = balance.sweep(table, 'creature_energy_divisor', [2.0, 4.0, 8.0])
+    assert [r['creature_energy_divisor'] for r in results] == [2.0, 4.0, 8.0]
+    # Brute: round((8 + 8/4) / divisor), 2.5 rounding to even as round() does; the
+    # wall (3) and the action (2) are untouched
+    assert [r['energy_curve'][:6] for r in results] == [
+        [0, 0, 1, 1, 0, 1], [0, 0, 2, 1, 0, 0], [0, 1, 1, 1, 0, 0]]
+    assert results[0]['efficiency_mean'] < results[2]['efficiency_mean']
+
+    with pytest.raises(ValueError):
+        balance.parse_params(["no_such_knob=1"])
+    assert balance.parse_params(["max_energy=5", "epic_share=0.2"]) == balance.BalanceParams(max_energy=5, epic_share=0.2)
+
+
+def test_outliers_are_judged_within_their_rarity_and_colour():
+    # Twenty similar creatures per colour, one of them wildly efficient; the azure
+    # set is stronger overall, which on its own is not an outlier
+    cards = [_card(f"Crimson {i}", "CREATURE", 4, 2, attack=3 + i % 3, health=4, color='CRIMSON') for i in range(20)]
+    cards += [_card(f"Azure {i}", "CREATURE", 4, 2, attack=6 + i % 3, health=4, color='AZURE') for i in range(20)]
+    cards.append(_card("Broken", "CREATURE", 1, 1, attack=9, health=9, color='CRIMSON'))
+    table = balance.CardTable.from_records(cards)
+    # Everything in one rarity, so grouping is by colour alone
+    params = balance.BalanceParams(common_share=1.0, rare_share=0.0, epic_share=0.0)
+    metrics = balance.evaluate(table, params)
+
+    flagged = balance.outliers(table, metrics, params)
+    assert [card['name'] for card in flagged] == ["Broken"]
+    assert flagged[0]['color'] == 'CRIMSON' and flagged[0]['rarity'] == 'COMMON' and flagged[0]['z'] > 3.5
+    assert balance.summarize(table, params)['outliers'] == 1
+
+    codes, labels = balance.combine_groups(table.codes('color'), (metrics.rarity, balance.RARITIES))
+    assert labels == [('AZURE', 'COMMON'), ('CRIMSON', 'COMMON')]
+    assert codes.tolist() == [1] * 20 + [0] * 20 + [1]
+    assert balance.group_medians(metrics.efficiency, codes) == pytest.approx(
+        [statistics.median(metrics.efficiency[codes == g]) for g in (0, 1)])
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Card key service tests
+Checks the cached single-key derivation against the card programmer's HKDF scheme
+"""
+
+import os
+import sys
+import base64
+import secrets
+import importlib
+
+from cryptography.hazmat.primitives import hashes, hmac
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, ROOT)
+
+from shared.security.card_key_service import (
+    CardKeyService, LocalMasterKeyBackend, TTLLRUCache, CardKeyError
+)
+
+CARD_UID = "04A1B2C3D4E5F6"
+
+
+def load_programmer_crypto(tmp_path, monkeypatch):
+    """Import the programmer's crypto manager with its master key in tmp_path"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(os.path.join(ROOT, 'tools/nfc-card-programmer'))
+    sys.modules.pop('crypto_security', None)
+    return importlib.import_module('crypto_security').get_crypto_manager()
+
+
+def test_keys_match_card_programmer(tmp_path, monkeypatch):
+    programmer = load_programmer_crypto(tmp_path, monkeypatch)
+    expected = programmer.derive_card_keys(CARD_UID)
+
+    service = CardKeyService(LocalMasterKeyBackend(str(tmp_path / 'master_key.bin')))
+    for key_type in ('AUTH', 'ENC', 'MAC', 'DATA'):
+        assert service.get_card_key(CARD_UID, key_type) == expected[key_type.lower()]
+
+
+def test_cache_hits_skip_backend():
+    calls = []
+
+    class CountingBackend(LocalMasterKeyBackend):
+        def derive_key(self, card_uid, key_type):
+            calls.append((card_uid, key_type))
+            return super().derive_key(card_uid, key_type)
+
+    service = CardKeyService(CountingBackend(master_key=secrets.token_bytes(32)))
+    first = service.get_card_key(CARD_UID)
+    for _ in range(10):
+        assert service.get_card_key(CARD_UID) == first
+
+    assert calls == [(CARD_UID, 'MAC')]
+    assert service.get_stats()['hits'] == 10
+
+
+def test_cache_is_bounded_and_expires():
+    now = [0.0]
+    cache = TTLLRUCache(max_size=2, ttl_seconds=10, clock=lambda: now[0])
+    cache.put(('a', 'MAC'), b'1')
+    cache.put(('b', 'MAC'), b'2')
+    cache.get(('a', 'MAC'))
+    cache.put(('c', 'MAC'), b'3')
+
+    # 'b' was least recently used
+    assert cache.get(('b', 'MAC')) is None
+    assert cache.get(('a', 'MAC')) == b'1'
+    assert cache.evictions == 1
+
+    now[0] = 11.0
+    assert cache.get(('a', 'MAC')) is None
+    assert len(cache) == 1
+
+
+def test_closed_backend_refuses_derivation():
+    backend = LocalMasterKeyBackend(master_key=secrets.token_bytes(32))
+    backend.close()
+    try:
+        backend.derive_key(CARD_UID, 'MAC')
+        assert False, "closed backend should not derive keys"
+    except CardKeyError:
+        pass
+
+
+def test_verify_ntag424_response_uses_key_service(monkeypatch):
+    sys.path.insert(0, os.path.join(ROOT, 'services/api'))
+    from shared.security import card_key_service
+    from routes import nfc_cards
+
+    service = CardKeyService(LocalMasterKeyBackend(master_key=secrets.token_bytes(32)))
+    monkeypatch.setattr(card_key_service, '_card_key_service', service)
+
+    class Card:
+        issuer_key_ref = CARD_UID + "ffffffff"
+
+    challenge = secrets.token_bytes(16)
+    h = hmac.HMAC(service.get_card_key(CARD_UID, 'MAC'), hashes.SHA256())
+    h.update(challenge)
+    response = h.finalize()
+
+    encode = lambda b: base64.b64encode(b).decode()
+    assert nfc_cards.verify_ntag424_response(Card(), encode(challenge), encode(response))
+    assert not nfc_cards.verify_ntag424_response(Card(), encode(challenge), encode(b'\x00' * 32))
@@ -0,0 +1,375 @@
+"""
+Unit tests for the console command queue
+A simulated fleet of console agents waits for wakeups from the realtime
+service and polls a real queue on SQLite; the agents' HTTP calls are routed
+straight to the queue and the wakeups
+"""
+
+import asyncio
+import base64
+import json
+import os
+import sys
+import threading
+import time
+import importlib.util
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import requests
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from shared.models.base import Base, Console, ConsoleStatus
+from shared.models.console_commands import ConsoleCommand
+from shared.models.game_releases import ConsoleGameInstall
+from shared.services.console_commands import (
+    CANCELLED, EXPIRED, FAILED, RUNNING, SUCCEEDED, TIMED_OUT, CommandError, CommandQueue
+)
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+REALTIME = os.path.join(ROOT, 'services', 'realtime')
+if REALTIME not in sys.path:
+    sys.path.insert(0, REALTIME)
+
+from services.command_wakeups import CommandWakeups
+
+_spec = importlib.util.spec_from_file_location(
+    "console_command_agent", os.path.join(ROOT, "console/kiosk/console_command_agent.py"))
+agent_module = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(agent_module)
+
+T0 = datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+class Clock:
+    def __init__(self):
+        self.now = T0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def keys(tmp_path):
+    """(command signing key, its public key, console device key, its public key)"""
+    paths = []
+    for name in ("command", "device"):
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        (tmp_path / f"{name}.key").write_bytes(key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+        (tmp_path / f"{name}.pub").write_bytes(key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo))
+        paths += [str(tmp_path / f"{name}.key"), str(tmp_path / f"{name}.pub")]
+    return tuple(paths)
+
+
+@pytest.fixture
+def fleet_db(tmp_path):
+    # File-backed so the simulated consoles' threads each get their own connection
+    engine = create_engine(f"sqlite:///{tmp_path / 'fleet.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine, tables=[Base.metadata.tables[name] for name in
+                                             ('consoles', 'console_game_installs', 'console_commands')])
+    SessionLocal = sessionmaker(bind=engine, class_=Session, expire_on_commit=False)
+    with SessionLocal() as session:
+        for console_id in range(1, 23):
+            status = ConsoleStatus.revoked if console_id > 20 else ConsoleStatus.active
+            session.add(Console(id=console_id, device_uid=f"DECK-{console_id:04d}", status=status,
+                                current_arena_id=1 if console_id <= 5 else None))
+        session.add_all([ConsoleGameInstall(console_id=c, version="1.1.0") for c in (2, 4, 6)])
+        session.commit()
+    yield SessionLocal
+    engine.dispose()
+
+
+class FakeResponse:
+    def __init__(self, data, status=200):
+        self.data = data
+        self.status_code = status
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(self.status_code)
+
+    def json(self):
+        return self.data
+
+
+class RealtimeWakeups:
+    """The realtime service's wakeups on their own event loop, fed by the API notifier as Redis would"""
+
+    def __init__(self):
+        self.wakeups = CommandWakeups()
+        self.wakeups.connected = True
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+    def run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def publish(self, console_ids):  # RedisCommandBridge.publish
+        self.run(self.wakeups.notify(console_ids))
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+class FakeCommandAPI:
+    """Routes one console agent's calls to the queue, as the device login and console_commands blueprints do"""
+
+    def __init__(self, queue, console_id, device_public_key, realtime=None):
+        self.queue = queue
+        self.console_id = console_id
+        self.device_public_key = device_public_key
+        self.realtime = realtime
+        self.fail_results = 0
+        self.tamper = None
+        self.token = None
+        self.logins = 0
+
+    def login(self, data):
+        with open(self.device_public_key, 'rb') as f:
+            key = serialization.load_pem_public_key(f.read())
+        key.verify(base64.b64decode(data['signature']), data['nonce'].encode(), padding.PKCS1v15(), hashes.SHA256())
+        assert data['device_uid'] == f"DECK-{self.console_id:04d}"
+        self.logins += 1
+        self.token = f"token-{self.console_id}-{self.logins}"
+        return FakeResponse({'access_token': self.token, 'expires_in': 86400, 'device_id': self.console_id})
+
+    def authorized(self, headers):
+        return self.token is not None and (headers or {}).get('Authorization') == f"Bearer {self.token}"
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        if not self.authorized(headers):
+            return FakeResponse({'error': 'Invalid device token'}, 401)
+        if url.endswith('/console-commands/wait'):
+            if self.realtime is None:
+                raise requests.ConnectionError("realtime service down")
+            return FakeResponse(self.realtime.run(
+                self.realtime.wakeups.wait(self.console_id, params['after'], params['timeout'])))
+        commands = self.queue.poll(self.console_id, params['wait'])
+        if self.tamper:
+            commands = [self.tamper(c) for c in commands]
+        return FakeResponse({'commands': commands})
+
+    def post(self, url, json=None, headers=None, **kwargs):
+        if url.endswith('/v1/auth/device/login'):
+            return self.login(json)
+        if not self.authorized(headers):
+            return FakeResponse({'error': 'Invalid device token'}, 401)
+        command_id = int(url.rsplit('/', 2)[1])
+        if url.endswith('/ack'):
+            return FakeResponse({'status': self.queue.acknowledge(self.console_id, command_id)})
+        if self.fail_results:
+            self.fail_results -= 1
+            raise requests.ConnectionError("network down")
+        recorded = self.queue.complete(self.console_id, command_id, json['success'], exit_code=json.get('exit_code'),
+                                       output=json.get('output'), result=json.get('result'))
+        return FakeResponse({'duplicate': not recorded}, 200 if recorded is not None else 404)
+
+
+def _agent(tmp_path, queue, console_id, keys, handlers=None, realtime=None):
+    config = tmp_path / f"console-{console_id}.conf"
+    config.write_text(f"CONSOLE_ID={console_id}\nDEVICE_UID=DECK-{console_id:04d}\nAPI_SERVER=http://api.test\n"
+                      f"DEVICE_KEY_FILE={keys[2]}\n")
+    calls = []
+    handlers = handlers or {"ping": lambda payload, timeout: calls.append(payload) or (True, 0, "pong", None)}
+    agent = agent_module.ConsoleCommandAgent(config_file=str(config), state_dir=str(tmp_path / f"agent-{console_id}"),
+                                             public_key_file=keys[1],
+                                             session=FakeCommandAPI(queue, console_id, keys[3], realtime),
+                                             handlers=handlers, wait_seconds=3)
+    return agent, calls
+
+
+def _statuses(SessionLocal, **filters):
+    with SessionLocal() as session:
+        return {c.console_id: c.status for c in session.query(ConsoleCommand).filter_by(**filters)}
+
+
+def test_fleet_command_reaches_every_waiting_console(fleet_db, keys, tmp_path):
+    # API polls never wait: only the wakeup through the realtime service can deliver within the deadline
+    queue = CommandQueue(session_factory=fleet_db, signing_key_file=keys[0], recheck_seconds=60)
+    realtime = RealtimeWakeups()
+    queue.notifier.attach_bridge(realtime)
+    agents = [_agent(tmp_path, queue, console_id, keys, realtime=realtime) for console_id in range(1, 21)]
+    stop = threading.Event()
+
+    def console_loop(agent):
+        while not stop.is_set():
+            agent.run_once(wait=0)
+            assert agent.wait_for_commands()
+
+    threads = [threading.Thread(target=console_loop, args=(agent,), daemon=True) for agent, _ in agents]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.3)  # Every console is waiting in the realtime service
+
+    with fleet_db() as session:
+        batch = queue.enqueue(session, "ping", {"all": True}, {"probe": 1})
+        session.commit()
+    queue.notify_batch(batch)
+    assert batch["count"] == 20  # Revoked consoles are not targeted
+
+    started = time.monotonic()
+    while time.monotonic() - started < 2.5:
+        with fleet_db() as session:
+            if queue.batch_summary(session, batch["batch_id"]) == {SUCCEEDED: 20}:
+                break
+        time.sleep(0.05)
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=5)
+    realtime.close()
+
+    with fleet_db() as session:
+        assert queue.batch_summary(session, batch["batch_id"]) == {SUCCEEDED: 20}
+        assert all(c.output == "pong" and c.acked_at for c in session.query(ConsoleCommand))
+    assert all(calls == [{"probe": 1}] for _, calls in agents)
+
+
+def test_group_targets_use_one_insert(fleet_db, keys):
+    queue = CommandQueue(session_factory=fleet_db, signing_key_file=keys[0])
+    with fleet_db() as session:
+        assert queue.enqueue(session, "restart_game", {"arena_id": 1})["count"] == 5
+        assert queue.enqueue(session, "update_game", {"game_version": "1.1.0"})["count"] == 3
+        assert queue.enqueue(session, "ping", {"console_ids": [21, 3], "status": None})["count"] == 2
+        for bad in ({}, {"status": "active"}):
+            with pytest.raises(CommandError):
+                queue.enqueue(session, "ping", bad)
+        with pytest.raises(CommandError):
+            queue.enqueue(session, "format_disk", {"all": True})
+        with pytest.raises(CommandError):
+            queue.enqueue(session, "run_script", {"all": True}, {})
+        session.commit()
+        assert session.query(ConsoleCommand).count() == 10
+
+    unsigned = CommandQueue(session_factory=fleet_db, signing_key_file="")
+    with fleet_db() as session, pytest.raises(CommandError):
+        unsigned.enqueue(session, "ping", {"all": True})
+
+
+def test_unacknowledged_commands_are_redelivered_but_run_once(fleet_db, keys, tmp_path):
+    queue = CommandQueue(session_factory=fleet_db, signing_key_file=keys[0], ack_timeout=1)
+    agent, calls = _agent(tmp_path, queue, 1, keys)
+    with fleet_db() as session:
+        queue.enqueue(session, "ping", {"console_ids": [1]})
+        session.commit()
+
+    lost = queue.deliver(1)  # Delivered, but the console lost the response
+    assert len(lost) == 1 and queue.deliver(1) == []
+    time.sleep(1.1)
+
+    agent.session.fail_results = 1  # Ran it, but the result report is lost too
+    assert agent.run_once(wait=0) == 1
+    assert calls == [{}] and _statuses(fleet_db) == {1: RUNNING}
+
+    assert agent.run_once(wait=0) == 0  # Next poll reports the saved result
+    assert _statuses(fleet_db) == {1: SUCCEEDED}
+    assert queue.complete(1, lost[0]["id"], False) is False  # Duplicate report changes nothing
+    assert queue.complete(2, lost[0]["id"], True) is None
+
+    # A redelivery of a command the console already ran is answered from its saved result
+    agent.handle(lost[0])
+    assert calls == [{}] and agent.executed == 1
+
+
+def test_forged_and_misaddressed_commands_are_refused(fleet_db, keys, tmp_path):
+    queue = CommandQueue(session_factory=fleet_db, signing_key_file=keys[0])
+    agent, calls = _agent(tmp_path, queue, 1, keys)
+    with fleet_db() as session:
+        queue.enqueue(session, "ping", {"console_ids": [1]}, {"n": 1})
+        session.commit()
+
+    agent.session.tamper = lambda c: {**c, "envelope": c["envelope"].replace('"n":1', '"n":2')}
+    agent.run_once(wait=0)
+    with fleet_db() as session:
+        command = session.query(ConsoleCommand).one()
+        assert command.status == FAILED and "signature" in command.output
+
+    with fleet_db() as session:
+        queue.enqueue(session, "ping", {"console_ids": [2]})
+        session.commit()
+    other_consoles_command = queue.deliver(2)[0]
+    agent.handle(other_consoles_command)
+    assert calls == []
+    assert queue.complete(1, other_consoles_command["id"], True) is None  # Still open for console 2
+
+
+def test_agent_signs_in_with_its_device_key_and_again_when_the_token_expires(fleet_db, keys, tmp_path):
+    queue = CommandQueue(session_factory=fleet_db, signing_key_file=keys[0])
+    agent, calls = _agent(tmp_path, queue, 1, keys)
+    assert agent.run_once(wait=0) == 0 and agent.session.logins == 1
+    assert agent.run_once(wait=0) == 0 and agent.session.logins == 1
+
+    agent.session.token = "token-1-reissued"  # The agent's token expired on the server
+    with fleet_db() as session:
+        queue.enqueue(session, "ping", {"console_ids": [1]})
+        session.commit()
+    assert agent.run_once(wait=0) == 1
+    assert calls == [{}] and agent.session.logins == 2 and _statuses(fleet_db) == {1: SUCCEEDED}
+
+
+def test_sweep_settles_commands_that_never_report(fleet_db, keys):
+    clock = Clock()
+    queue = CommandQueue(session_factory=fleet_db, signing_key_file=keys[0], ack_timeout=60, clock=clock)
+    with fleet_db() as session:
+        queue.enqueue(session, "ping", {"console_ids": [1]}, max_attempts=1)
+        queue.enqueue(session, "update_game", {"console_ids": [2]}, timeout_seconds=600)
+        queue.enqueue(session, "ping", {"console_ids": [3]}, ttl_seconds=300)
+        cancel_me = queue.enqueue(session, "reboot", {"console_ids": [4]})
+        session.commit()
+        assert queue.cancel(session, batch_id=cancel_me["batch_id"]) == 1
+        session.commit()
+
+    queue.deliver(1)
+    command = queue.deliver(2)[0]
+    assert queue.acknowledge(2, command["id"]) == RUNNING
+    assert json.loads(command["envelope"])["timeout_seconds"] == 600
+
+    clock.now += timedelta(minutes=6)
+    assert queue.sweep() == {FAILED: 1, EXPIRED: 1, TIMED_OUT: 0}
+    assert queue.deliver(1) == [] and queue.deliver(4) == []
+    clock.now += timedelta(minutes=6)
+    assert queue.sweep()[TIMED_OUT] == 1
+    assert _statuses(fleet_db) == {1: FAILED, 2: TIMED_OUT, 3: EXPIRED, 4: CANCELLED}
+
+    assert queue.complete(2, command["id"], True, exit_code=0, output="updated late") is True
+    assert _statuses(fleet_db)[2] == SUCCEEDED
+
+
+def test_wakeup_tokens_catch_commands_queued_between_waits():
+    async def scenario():
+        wakeups = CommandWakeups(max_wait=5)
+        first = await wakeups.wait(1, None, 5)  # No token yet: answered at once
+        assert first['queued']
+
+        await wakeups.notify([1])  # Queued while the console was polling the API
+        started = time.monotonic()
+        second = await wakeups.wait(1, first['token'], 5)
+        assert second['queued'] and time.monotonic() - started < 0.1
+
+        quiet = await wakeups.wait(1, second['token'], 0.05)  # Nothing queued: times out
+        assert not quiet['queued'] and quiet['token'] == second['token']
+
+        waiters = [asyncio.ensure_future(wakeups.wait(c, wakeups.token(c), 5)) for c in (1, 2)]
+        await asyncio.sleep(0.01)
+        await wakeups.notify(None)  # Fleet command wakes everyone
+        assert [w['queued'] for w in await asyncio.gather(*waiters)] == [True, True]
+
+        assert (await CommandWakeups().wait(1, second['token'], 5))['queued']  # Restarted service
+
+    asyncio.run(scenario())
+
+
+def test_agent_polls_the_api_while_the_realtime_service_is_down(fleet_db, keys, tmp_path, monkeypatch):
+    queue = CommandQueue(session_factory=fleet_db, signing_key_file=keys[0])
+    agent, _ = _agent(tmp_path, queue, 1, keys)
+    assert not agent.wait_for_commands() and agent.wake_token is None
+
+    slept = []
+    monkeypatch.setattr(agent_module.time, 'sleep', slept.append)
+    monkeypatch.setattr(agent, 'run_once', agent.stop)
+    agent.run()
+    assert slept == [agent.fallback_seconds]
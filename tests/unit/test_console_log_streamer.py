@@ -0,0 +1,214 @@
+"""
+Unit tests for the kiosk log shipper
+Rotation, truncation and network loss against a local fake log server, and the
+size limit on batches the API accepts
+"""
+
+import base64
+import gzip
+import json
+import os
+import importlib.util
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+from flask import Flask
+
+from shared.auth.jwt_handler import create_device_token
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+# By path: test_console_commands puts the realtime service's own services package on sys.path
+_route_spec = importlib.util.spec_from_file_location(
+    "console_logs_streaming", os.path.join(ROOT, "services/api/routes/console_logs_streaming.py"))
+console_logs_streaming = importlib.util.module_from_spec(_route_spec)
+_route_spec.loader.exec_module(console_logs_streaming)
+
+_spec = importlib.util.spec_from_file_location(
+    "console_log_streamer", os.path.join(ROOT, "console/kiosk/console_log_streamer.py"))
+streamer_module = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(streamer_module)
+ConsoleLogStreamer = streamer_module.ConsoleLogStreamer
+
+
+class FakeLogServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeLogHandler)
+        self.batches = []
+        self.status = 200
+        self.device_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.token = None
+        self.logins = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def messages(self):
+        return [entry['message'] for batch in self.batches for entry in batch['logs']]
+
+
+class FakeLogHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if self.path == '/v1/auth/device/login':
+            return self.login(json.loads(body))
+        if self.server.token is None or self.headers['Authorization'] != f"Bearer {self.server.token}":
+            return self.respond(401, {'error': 'Invalid device token'})
+        if self.server.status == 200:
+            assert self.headers['Content-Encoding'] == 'gzip'
+            self.server.batches.append(json.loads(gzip.decompress(body)))
+        self.respond(self.server.status, {'success': True})
+
+    def login(self, data):
+        self.server.device_key.public_key().verify(base64.b64decode(data['signature']), data['nonce'].encode(),
+                                                   padding.PKCS1v15(), hashes.SHA256())
+        self.server.logins += 1
+        self.server.token = f"device-token-{self.server.logins}"
+        self.respond(200, {'access_token': self.server.token, 'expires_in': 86400, 'device_id': 7})
+
+    def respond(self, status, data):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(json.dumps(data).encode())
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = FakeLogServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def shipper(tmp_path, server):
+    log = tmp_path / "console.log"
+    log.write_text("")
+    key = tmp_path / "device.key"
+    key.write_bytes(server.device_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+    config = tmp_path / "console.conf"
+    config.write_text(f"CONSOLE_ID=7\nAPI_SERVER={server.url}\nDEVICE_KEY_FILE={key}\n")
+
+    def make():
+        return ConsoleLogStreamer(config_file=str(config), state_dir=str(tmp_path / "state"),
+                                  log_files={'console': str(log)}, journal=False)
+    return make, log
+
+
+def append(path, *lines):
+    with open(path, 'a') as f:
+        f.writelines(line + "\n" for line in lines)
+
+
+def test_ships_only_new_lines_with_their_timestamps(shipper, server):
+    make, log = shipper
+    append(log, "2025-03-01 12:00:00,250 INFO boot", "Traceback (most recent call last):")
+    assert make().stream_logs()
+    append(log, "[2025-03-01 12:00:05] [ERROR] game crashed")
+    with open(log, 'a') as f:
+        f.write("2025-03-01 12:00:06 half a li")  # Still being written
+    assert make().stream_logs()  # A fresh process resumes from the saved offset
+    with open(log, 'a') as f:
+        f.write("ne\n")
+    assert make().stream_logs()
+
+    assert server.messages() == ["2025-03-01 12:00:00,250 INFO boot", "Traceback (most recent call last):",
+                                 "[2025-03-01 12:00:05] [ERROR] game crashed", "2025-03-01 12:00:06 half a line"]
+    stamps = [datetime.fromisoformat(entry['timestamp']) for batch in server.batches for entry in batch['logs']]
+    local = lambda text: datetime.fromisoformat(text).astimezone()  # Log lines are in local time
+    assert stamps == [local("2025-03-01 12:00:00.250"), local("2025-03-01 12:00:00.250"),
+                      local("2025-03-01 12:00:05"), local("2025-03-01 12:00:06")]
+    assert server.batches[0]['console_id'] == "7"
+
+
+def test_follows_rotation_and_truncation(shipper, server):
+    make, log = shipper
+    shipper_ = make()
+    append(log, "line 1")
+    shipper_.stream_logs()
+
+    append(log, "line 2")  # Written just before logrotate moves the file
+    os.rename(log, f"{log}.1")
+    append(log, "line 3")
+    shipper_.stream_logs()
+
+    append(log, "line 4")
+    with open(log, 'w'):
+        pass  # copytruncate
+    append(log, "line 5")
+    shipper_.stream_logs()
+
+    assert server.messages() == ["line 1", "line 2", "line 3", "line 5"]
+
+
+def test_spools_while_offline_and_replays_in_order(shipper, server):
+    make, log = shipper
+    shipper_ = make()
+    server.status = 503
+    for i in range(3):
+        append(log, f"offline {i}")
+        assert not shipper_.stream_logs()
+    assert len(shipper_.spooled()) == 3 and not server.batches
+    assert shipper_.next_delay() == shipper_.upload_interval
+    shipper_.failures = 3
+    assert shipper_.upload_interval * 4 <= shipper_.next_delay() <= shipper_.upload_interval * 8
+
+    server.status = 200
+    append(log, "back online")
+    assert shipper_.stream_logs()
+    assert server.messages() == ["offline 0", "offline 1", "offline 2", "back online"]
+    assert not shipper_.spooled()
+
+
+def test_unreachable_server_and_bounded_spool(shipper, server, monkeypatch):
+    make, log = shipper
+    shipper_ = make()
+    shipper_.api_server = shipper_.device.api_server = "http://127.0.0.1:9"  # Nothing listens
+    monkeypatch.setattr(streamer_module, "SPOOL_MAX_FILES", 2)
+    for i in range(4):
+        append(log, f"batch {i}")
+        assert not shipper_.stream_logs()
+    assert len(shipper_.spooled()) == 2
+    assert shipper_.state['dropped_batches'] == 2
+
+    shipper_.api_server = shipper_.device.api_server = server.url
+    assert shipper_.stream_logs()
+    assert server.messages() == ["batch 2", "batch 3"]
+
+
+def test_signs_in_again_when_the_device_token_expires(shipper, server):
+    make, log = shipper
+    shipper_ = make()
+    append(log, "first")
+    assert shipper_.stream_logs() and server.logins == 1
+
+    server.token = "device-token-reissued"  # The shipper's token expired on the server
+    append(log, "second")
+    assert shipper_.stream_logs() and server.logins == 2
+    assert server.messages() == ["first", "second"]
+
+
+def test_stream_rejects_batches_that_inflate_past_the_limit(monkeypatch):
+    app = Flask(__name__)
+    app.register_blueprint(console_logs_streaming.console_logs_streaming_bp)
+    monkeypatch.setattr(console_logs_streaming, "MAX_DECOMPRESSED_BYTES", 1024 * 1024)
+    headers = {'Authorization': f"Bearer {create_device_token('DECK-0007', 7)}", 'Content-Encoding': 'gzip'}
+
+    bomb = gzip.compress(b' ' * (64 * 1024 * 1024))  # 64KB on the wire
+    with app.test_client() as client:
+        assert client.post('/v1/console-logs/stream', data=bomb, headers=headers).status_code == 413
+        assert client.post('/v1/console-logs/stream', data=bomb[:-20], headers=headers).status_code == 413
+        assert client.post('/v1/console-logs/stream', data=gzip.compress(b'{}')[:-9],
+                           headers=headers).status_code == 400
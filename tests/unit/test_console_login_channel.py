@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Console QR login channel tests
+Long-poll wakeups, cached QR rendering and database query counts per login
+"""
+
+import os
+import sys
+import time
+import threading
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'services/api'))
+
+import pytest
+from flask import Flask
+
+from shared.models.base import Player, Console
+from shared.models import arena  # noqa: F401  (consoles.current_arena_id target)
+from shared.auth.jwt_handler import create_access_token
+from shared.services import console_login_channel
+from shared.services.console_login_channel import LoginNotifier, QRCodeCache
+from routes import console_login
+
+
+@pytest.fixture
+def client(monkeypatch, sqlite_db):
+    engine, SessionLocal, queries = sqlite_db('players', 'arenas', 'consoles', 'console_login_tokens')
+    with SessionLocal() as session:
+        session.add(Player(id=1, email="player@deckport.ai", display_name="Player"))
+        session.add(Console(id=1, device_uid="console-1"))
+        session.commit()
+
+    renders = []
+    monkeypatch.setattr(console_login, 'SessionLocal', SessionLocal)
+    monkeypatch.setattr(console_login_channel, '_notifier', LoginNotifier())
+    monkeypatch.setattr(console_login_channel, '_qr_cache',
+                        QRCodeCache(renderer=lambda url: renders.append(url) or b'PNG'))
+
+    app = Flask(__name__)
+    app.register_blueprint(console_login.console_login_bp)
+    client = app.test_client()
+    client.queries = queries
+    client.renders = renders
+    return client
+
+
+def start_login(client):
+    response = client.post('/v1/console-login/start', headers={'X-Device-UID': 'console-1'})
+    assert response.status_code == 200
+    return response.get_json()['login_token']
+
+
+def confirm_login(client, token):
+    jwt = create_access_token(1, "player@deckport.ai")
+    response = client.post('/v1/console-login/confirm', json={'login_token': token},
+                           headers={'Authorization': f'Bearer {jwt}'})
+    assert response.status_code == 200
+
+
+def test_db_queries_do_not_grow_with_poll_count(client):
+    token = start_login(client)
+
+    client.queries.clear()
+    for _ in range(100):
+        assert client.get(f'/v1/console-login/poll?login_token={token}').get_json() == {'status': 'pending'}
+    pending_queries = len(client.queries)
+
+    confirm_login(client, token)
+    client.queries.clear()
+    confirmed = client.get(f'/v1/console-login/poll?login_token={token}').get_json()
+
+    assert confirmed['status'] == 'confirmed' and confirmed['player']['id'] == 1
+    assert pending_queries == 0
+    # Token lookup, player lookup, mark-used update
+    assert len(client.queries) <= 3
+
+
+def test_long_poll_wakes_on_confirmation(client):
+    token = start_login(client)
+
+    def confirm_later():
+        time.sleep(0.2)
+        confirm_login(client, token)
+
+    threading.Thread(target=confirm_later).start()
+    started = time.monotonic()
+    response = client.get(f'/v1/console-login/poll?login_token={token}&wait=10')
+    elapsed = time.monotonic() - started
+
+    assert response.get_json()['status'] == 'confirmed'
+    assert 'player_jwt' in response.get_json()
+    assert elapsed < 5
+
+
+def test_sse_stream_ends_with_confirmation(client):
+    token = start_login(client)
+    threading.Timer(0.2, confirm_login, args=(client, token)).start()
+
+    body = client.get(f'/v1/console-login/events?login_token={token}').get_data(as_text=True)
+    events = [chunk for chunk in body.split('\n\n') if chunk.startswith('event: status')]
+
+    assert '"pending"' in events[0]
+    assert '"confirmed"' in events[-1] and 'player_jwt' in events[-1]
+
+
+def test_qr_rendered_once_per_token(client):
+    token = start_login(client)
+    for _ in range(5):
+        response = client.get(f'/v1/console-login/qr/{token}')
+        assert response.status_code == 200 and response.data == b'PNG'
+    assert len(client.renders) == 1
+
+
+def test_cancel_wakes_waiter(client):
+    token = start_login(client)
+    threading.Timer(0.2, lambda: client.post('/v1/console-login/cancel', json={'login_token': token})).start()
+    response = client.get(f'/v1/console-login/poll?login_token={token}&wait=10')
+    assert response.get_json() == {'status': 'cancelled'}
@@ -0,0 +1,135 @@
+"""
+Unit tests for the frontend API client
+Runs against a local HTTP/1.1 server standing in for the API
+"""
+
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from frontend.services.api_client import CLOSED, HALF_OPEN, OPEN, APIClient
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeAPI(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeAPIHandler)
+        self.connections = set()
+        self.requests = []
+        self.status = 200
+        self.delay = 0.0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class FakeAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive
+
+    def do_GET(self):
+        self.server.connections.add(self.client_address)
+        self.server.requests.append((self.path, self.headers.get("X-Request-ID")))
+        time.sleep(self.server.delay)
+        body = json.dumps({"path": self.path}).encode()
+        self.send_response(self.server.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def api():
+    server = FakeAPI()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    clock = Clock()
+    client = APIClient(server.url, clock=clock)
+    yield server, client, clock
+    client.close()
+    server.shutdown()
+    server.server_close()
+
+
+def test_connections_are_reused(api):
+    server, client, _ = api
+    for _ in range(20):
+        assert client.get("/v1/catalog/cards", params={"page": 1}) == {"path": "/v1/catalog/cards?page=1"}
+    assert len(server.requests) == 20
+    assert len(server.connections) == 1
+
+
+def test_public_gets_are_cached_for_their_ttl(api):
+    server, client, clock = api
+    for _ in range(3):
+        client.get("/v1/catalog/filters", cache_ttl=60)
+    client.get("/v1/catalog/filters", params={"set": "a"}, cache_ttl=60)
+    for _ in range(2):
+        client.get("/v1/me", headers={"Authorization": "Bearer t"}, cache_ttl=60)  # Per-player, never cached
+    assert len(server.requests) == 4
+
+    clock.now += 61
+    client.get("/v1/catalog/filters", cache_ttl=60)
+    assert len(server.requests) == 5
+    assert client.stats["cache_hits"] == 2
+
+
+def test_get_all_runs_calls_concurrently_in_order(api):
+    server, client, _ = api
+    server.delay = 0.2
+    started = time.perf_counter()
+    results = client.get_all([("/v1/a", {}), ("/v1/b", {"params": {"x": 1}}), ("/v1/c", {})], request_id="rid-1")
+    elapsed = time.perf_counter() - started
+
+    assert [r["path"] for r in results] == ["/v1/a", "/v1/b?x=1", "/v1/c"]
+    assert elapsed < 0.5
+    assert {rid for _, rid in server.requests} == {"rid-1"}
+
+
+def test_breaker_opens_on_failures_and_recovers(api):
+    server, client, clock = api
+    server.status = 503
+    for _ in range(5):
+        assert client.get("/v1/catalog/cards") is None
+    breaker = client.breaker(server.url)
+    assert breaker.state == OPEN
+
+    assert client.get("/v1/catalog/cards") is None  # Rejected without calling the API
+    assert len(server.requests) == 5 and client.stats["rejected"] == 1
+
+    server.status = 404  # The API answers again; a 4xx does not count against it
+    clock.now += breaker.reset_seconds
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert not breaker.allow()  # One trial at a time
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    clock.now += breaker.reset_seconds
+    assert client.get("/v1/catalog/cards") is None
+    assert breaker.state == CLOSED
+
+
+def test_unreachable_upstream_trips_breaker():
+    client = APIClient("http://127.0.0.1:9")  # Discard port, nothing listens
+    try:
+        for _ in range(client.breaker(client.base_url).failure_threshold):
+            assert client.get("/v1/health", timeout=1) is None
+        assert client.breaker(client.base_url).state == OPEN
+    finally:
+        client.close()
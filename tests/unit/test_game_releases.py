@@ -0,0 +1,359 @@
+"""
+Unit tests for game releases
+Binary deltas on synthetic builds, the signed release store and update planning,
+the kiosk updater, and staged rollouts against in-memory SQLite
+"""
+
+import io
+import os
+import json
+import base64
+import random
+import tarfile
+import importlib.util
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+
+from shared.models.base import AuditLog, Console
+from shared.models.game_releases import ConsoleGameInstall, GameRollout
+from shared.services import game_releases
+from shared.services.game_releases import (
+    ACTIVE, HALTED, ROLLED_BACK, ReleaseError, ReleaseStore, check_rollout_health, cohort_bucket, record_version,
+    target_version, verify_manifest
+)
+from shared.utils.binary_delta import (
+    DeltaError, apply_delta, apply_package_delta, make_delta, make_package_delta, read_tarball, read_tree
+)
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+_spec = importlib.util.spec_from_file_location("game_updater", os.path.join(ROOT, "console/kiosk/game_updater.py"))
+updater_module = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(updater_module)
+
+T0 = datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def _blob(rng, size):
+    # Compressible but not trivially so, like packed game resources
+    words = [bytes(rng.getrandbits(8) for _ in range(rng.randint(3, 12))) for _ in range(400)]
+    out = bytearray()
+    while len(out) < size:
+        out += rng.choice(words)
+    return bytes(out[:size])
+
+
+def _builds():
+    """Three consecutive synthetic game builds as {path: (content, mode)}"""
+    rng = random.Random(7)
+    pck = bytes(rng.getrandbits(8) for _ in range(400_000))
+    v1 = {
+        "game.x86_64": (_blob(rng, 300_000), 0o755),
+        "game.pck": (pck, 0o644),
+        "config/settings.json": (b'{"api": "https://api.deckport.ai"}', 0o644),
+        "assets/old_intro.ogg": (_blob(rng, 50_000), 0o644),
+    }
+    v2 = dict(v1)
+    v2["game.pck"] = (pck[:1000] + b"PATCHED-RESOURCE" + pck[1000:200_000] + pck[210_000:] + b"tail" * 500, 0o644)
+    v2["config/settings.json"] = (b'{"api": "https://api.deckport.ai", "arena_music": true}', 0o644)
+    del v2["assets/old_intro.ogg"]
+    v2["assets/new_arena.png"] = (_blob(rng, 20_000), 0o644)
+    v3 = dict(v2)
+    exe = v2["game.x86_64"][0]
+    v3["game.x86_64"] = (exe[:150_000] + b"\x90" * 64 + exe[150_064:], 0o755)
+    return v1, v2, v3
+
+
+def _tarball(tree):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        for path, (content, mode) in sorted(tree.items()):
+            info = tarfile.TarInfo(path)
+            info.size, info.mode = len(content), mode
+            tar.addfile(info, io.BytesIO(content))
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def store(tmp_path):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    (tmp_path / "release.key").write_bytes(key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+    (tmp_path / "release.pub").write_bytes(key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo))
+    return ReleaseStore(root=str(tmp_path / "releases"), signing_key_file=str(tmp_path / "release.key"),
+                        public_key_file=str(tmp_path / "release.pub"), clock=lambda: T0)
+
+
+def test_file_delta_applies_exactly():
+    rng = random.Random(1)
+    old = bytes(rng.getrandbits(8) for _ in range(200_000))
+    cases = {
+        "insert": old[:5] + b"inserted" + old[5:],
+        "shift": old[3000:] + old[:3000],
+        "append": old + b"appended" * 1000,
+        "delete": old[:50_000] + old[90_000:],
+        "truncate": old[:12_345],
+        "identical": old,
+        "unrelated": bytes(rng.getrandbits(8) for _ in range(10_000)),
+        "empty": b"",
+    }
+    for name, new in cases.items():
+        delta = make_delta(old, new)
+        assert apply_delta(old, delta) == new, name
+    assert apply_delta(b"", make_delta(b"", b"fresh file")) == b"fresh file"
+
+    # Small edits cost a few blocks, not the file
+    for name in ("insert", "shift", "append", "delete", "identical"):
+        assert len(make_delta(old, cases[name])) < len(cases[name]) * 0.05 + 10_000, name
+
+    with pytest.raises(DeltaError):
+        apply_delta(old[:-1] + b"x", make_delta(old, cases["insert"]))
+
+
+def test_package_delta_round_trip_and_savings(tmp_path):
+    v1, v2, _ = _builds()
+    delta = make_package_delta(v1, v2)
+    assert apply_package_delta(v1, delta) == v2
+    assert len(delta) < len(_tarball(v2)) * 0.05
+
+    # Applies to a build read back from disk, and refuses a modified install
+    tar_tree = read_tarball(_tarball(v1))
+    assert tar_tree == v1
+    root = tmp_path / "game"
+    for path, (content, mode) in v1.items():
+        (root / path).parent.mkdir(parents=True, exist_ok=True)
+        (root / path).write_bytes(content)
+        os.chmod(root / path, mode)
+    assert apply_package_delta(read_tree(str(root)), delta) == v2
+    (root / "game.pck").write_bytes(b"locally modified")
+    with pytest.raises(DeltaError):
+        apply_package_delta(read_tree(str(root)), delta)
+
+
+def test_publish_signs_manifest_and_plans_cheapest_path(store):
+    v1, v2, v3 = _builds()
+    for version, tree in (("1.0.0", v1), ("1.1.0", v2), ("1.2.0", v3)):
+        store.publish(version, _tarball(tree))
+    with pytest.raises(ReleaseError):
+        store.publish("1.2.0", _tarball(v3))
+
+    manifest_bytes = store.manifest_bytes()
+    public_key = store.public_key()
+    assert verify_manifest(manifest_bytes, store.signature(), public_key)
+    assert not verify_manifest(manifest_bytes.replace(b"1.2.0", b"6.6.6"), store.signature(), public_key)
+    assert updater_module.verify_signature(manifest_bytes, store.signature(), store.public_key_file)
+
+    manifest = store.manifest()
+    assert [(d["from"], d["to"]) for d in manifest["deltas"]] == [("1.0.0", "1.1.0"), ("1.1.0", "1.2.0")]
+    full = store.release("1.2.0")["size"]
+
+    steps = store.plan("1.0.0", "1.2.0")
+    assert [(s["kind"], s["version"]) for s in steps] == [("delta", "1.1.0"), ("delta", "1.2.0")]
+    assert sum(s["size"] for s in steps) < full * 0.1
+    assert store.plan("1.2.0", "1.2.0") == []
+    assert [s["kind"] for s in store.plan(None, "1.2.0")] == ["full"]
+    assert [s["kind"] for s in store.plan("0.9.0", "1.2.0")] == ["full"]
+    # Deltas that cost more than the full build are never planned
+    manifest["deltas"][0]["size"] = full
+    with open(store.manifest_path, "w") as f:
+        json.dump(manifest, f)
+    assert [s["kind"] for s in store.plan("1.0.0", "1.2.0")] == ["full"]
+    with pytest.raises(ReleaseError):
+        store.plan("1.0.0", "2.0.0")
+
+    for step in steps:
+        assert store.artifact_path(step["sha256"])
+    assert store.artifact_path("../manifest.json") is None
+
+
+class FakeResponse:
+    def __init__(self, content, status=200):
+        self.content = content
+        self.status_code = status
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise updater_module.requests.HTTPError(self.status_code)
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, size):
+        for i in range(0, len(self.content), size):
+            yield self.content[i:i + size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class FakeReleaseServer:
+    """requests.Session stand-in that serves a release store the way game_updates and device login do"""
+
+    def __init__(self, store, target, device_key):
+        self.store = store
+        self.target = target
+        self.device_key = device_key
+        self.downloaded = 0
+        self.installed = []
+        self.token = None
+        self.logins = 0
+
+    def authorized(self, headers):
+        return self.token is not None and (headers or {}).get("Authorization") == f"Bearer {self.token}"
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        path = url.split("/v1/game-updates", 1)[1]
+        if path == "/check":
+            if not self.authorized(headers):
+                return FakeResponse(b'{"error": "Invalid device token"}', 401)
+            steps = self.store.plan(params["version"] or None, self.target)
+            for step in steps:
+                step["url"] = f"/v1/game-updates/artifacts/{step['sha256']}"
+            return FakeResponse(json.dumps({
+                "target": self.target, "update_available": bool(steps), "steps": steps,
+                "download_bytes": sum(s["size"] for s in steps), "full_size": self.store.release(self.target)["size"]
+            }).encode())
+        if path == "/manifest":
+            return FakeResponse(self.store.manifest_bytes())
+        if path == "/manifest.sig":
+            return FakeResponse(self.store.signature())
+        with open(self.store.artifact_path(path.rsplit("/", 1)[1]), "rb") as f:
+            content = f.read()
+        self.downloaded += len(content)
+        return FakeResponse(content)
+
+    def post(self, url, json=None, headers=None, **kwargs):
+        if url.endswith("/v1/auth/device/login"):
+            self.device_key.public_key().verify(base64.b64decode(json["signature"]), json["nonce"].encode(),
+                                                padding.PKCS1v15(), hashes.SHA256())
+            self.logins += 1
+            self.token = f"device-token-{self.logins}"
+            return FakeResponse(f'{{"access_token": "{self.token}", "expires_in": 86400}}'.encode())
+        if not self.authorized(headers):
+            return FakeResponse(b'{"error": "Invalid device token"}', 401)
+        self.installed.append(json["version"])
+        return FakeResponse(b"{}")
+
+
+def test_kiosk_updater_applies_deltas_and_falls_back_to_full(store, tmp_path):
+    v1, v2, v3 = _builds()
+    for version, tree in (("1.0.0", v1), ("1.1.0", v2), ("1.2.0", v3)):
+        store.publish(version, _tarball(tree))
+
+    device_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    (tmp_path / "device.key").write_bytes(device_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+    (tmp_path / "console.conf").write_text(f"CONSOLE_ID=console-7\nDEVICE_KEY_FILE={tmp_path / 'device.key'}\n")
+
+    server = FakeReleaseServer(store, "1.0.0", device_key)
+    updater = updater_module.GameUpdater(config_file=str(tmp_path / "console.conf"), game_dir=str(tmp_path / "game"),
+                                         state_dir=str(tmp_path / "state"), public_key_file=store.public_key_file,
+                                         session=server, restart=False)
+    assert updater.run() == "1.0.0"
+    assert read_tree(str(tmp_path / "game")) == v1
+
+    server.target, server.downloaded = "1.2.0", 0
+    assert updater.run() == "1.2.0"
+    assert read_tree(str(tmp_path / "game")) == v3
+    assert server.downloaded < store.release("1.2.0")["size"] * 0.1
+    assert updater.run() is None
+    assert server.installed == ["1.0.0", "1.2.0"] and server.logins == 1
+
+    # A damaged install cannot take the delta, so the full build is fetched; the expired token is renewed
+    server.target, server.token = "1.1.0", "device-token-reissued"
+    updater.state_file.write_text(json.dumps({"version": "1.0.0"}))
+    (tmp_path / "game" / "game.pck").write_bytes(b"corrupted")
+    assert updater.run() == "1.1.0"
+    assert read_tree(str(tmp_path / "game")) == v2 and server.logins == 2
+
+    # Nothing is installed from a manifest the release key did not sign
+    server.target = "1.2.0"
+    original = store.signature()
+    with open(store.signature_path, "wb") as f:
+        f.write(original[:-1] + bytes([original[-1] ^ 1]))
+    with pytest.raises(updater_module.UpdateError):
+        updater.run()
+    assert read_tree(str(tmp_path / "game")) == v2
+
+
+@pytest.fixture
+def fleet(sqlite_db):
+    _, SessionLocal, _ = sqlite_db('consoles', 'audit_logs', 'game_rollouts', 'console_game_installs')
+    with SessionLocal() as session:
+        for console_id in range(1, 201):
+            session.add(Console(id=console_id, device_uid=f"DECK-{console_id:04d}"))
+            record_version(session, console_id, "1.0.0", now=T0 - timedelta(days=7))
+        session.commit()
+    return SessionLocal
+
+
+def _start(session, percent, **kwargs):
+    rollout = GameRollout(version="1.1.0", previous_version="1.0.0", percent=percent, status=ACTIVE,
+                          started_at=T0, updated_at=T0, **kwargs)
+    session.add(rollout)
+    session.commit()
+    return rollout
+
+
+def _targets(session):
+    installs = {i.console_id: i.version for i in session.query(ConsoleGameInstall)}
+    return {console_id: target_version(session, console_id, version, "1.1.0")
+            for console_id, version in installs.items()}
+
+
+def test_rollout_cohorts_are_stable_and_grow(fleet):
+    with fleet() as session:
+        assert set(_targets(session).values()) == {"1.1.0"}  # No rollout: follow the latest release
+
+        rollout = _start(session, 10)
+        first = {c for c, v in _targets(session).items() if v == "1.1.0"}
+        assert 8 <= len(first) <= 35
+        assert first == {c for c in range(1, 201) if cohort_bucket("1.1.0", c) < 10}
+
+        rollout.percent = 50
+        session.commit()
+        second = {c for c, v in _targets(session).items() if v == "1.1.0"}
+        assert first < second and 70 <= len(second) <= 130
+
+
+def test_crash_spike_halts_rollout(fleet):
+    with fleet() as session:
+        _start(session, 20, min_consoles=5, crash_rate_threshold=0.05)
+        cohort = [c for c, v in _targets(session).items() if v == "1.1.0"]
+        for console_id in cohort:
+            record_version(session, console_id, "1.1.0", now=T0 + timedelta(minutes=10))
+        # Background crashes on the old version, and a few before the update on the new cohort
+        for console_id in [c for c in range(1, 201) if c not in cohort][:4]:
+            session.add(AuditLog(actor_type="console", actor_id=console_id, action="console.crash_report",
+                                 created_at=T0 + timedelta(minutes=30)))
+        for console_id in cohort[:5]:
+            session.add(AuditLog(actor_type="console", actor_id=console_id, action="console.crash_report",
+                                 created_at=T0 - timedelta(hours=1)))
+        session.commit()
+        health = check_rollout_health(session, now=T0 + timedelta(hours=1))
+        assert not health["unhealthy"] and health["version"]["crashes"] == 0
+
+        for console_id in cohort[:6]:
+            session.add(AuditLog(actor_type="console", actor_id=console_id, action="console.crash_report",
+                                 created_at=T0 + timedelta(hours=1)))
+        session.commit()
+        health = check_rollout_health(session, now=T0 + timedelta(hours=2))
+        session.commit()
+        assert health["halted"] and health["version"]["crashes"] == 6
+
+        rollout = game_releases.current_rollout(session)
+        assert rollout.status == HALTED and "6 crashes" in rollout.halt_reason
+        assert check_rollout_health(session) is None  # Already halted
+
+        # Halted: updated consoles stay put, nobody else moves; rolled back: everyone returns
+        targets = _targets(session)
+        assert {c for c, v in targets.items() if v == "1.1.0"} == set(cohort)
+        rollout.status = ROLLED_BACK
+        session.commit()
+        assert set(_targets(session).values()) == {"1.0.0"}
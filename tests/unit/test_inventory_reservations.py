@@ -0,0 +1,130 @@
+"""
+Unit tests for checkout inventory reservations
+Reserve, convert, release and expiry against in-memory SQLite
+"""
+
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+
+from shared.models.base import Player
+from shared.models.shop import ShopInventoryLog, ShopInventoryReservation, ShopOrder, ShopProduct
+from shared.services import inventory_reservations as reservations
+from shared.services.inventory_reservations import OutOfStock, ReservationError, ReservationSweeper
+
+TABLES = ('players', 'shop_products', 'shop_orders', 'shop_inventory_logs', 'shop_inventory_reservations')
+T0 = datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def shop(sqlite_db):
+    _, SessionLocal, _ = sqlite_db(*TABLES)
+    with SessionLocal() as session:
+        session.add(Player(id=1, email="buyer@example.com"))
+        session.add(ShopProduct(id=1, sku="DROP-001", name="Founders pack", product_type="card_pack",
+                                price=Decimal("20.00"), stock_quantity=5))
+        session.add(ShopProduct(id=2, sku="DROP-002", name="Playmat", product_type="physical",
+                                price=Decimal("30.00"), stock_quantity=1))
+        session.add(ShopProduct(id=3, sku="CODE-001", name="Digital code", product_type="digital",
+                                price=Decimal("5.00"), track_inventory=False))
+        session.add(ShopOrder(id=1, order_number="DP-0001", customer_id=1, subtotal=Decimal("70.00"), total_amount=Decimal("70.00"),
+                              payment_method="stripe"))
+        session.commit()
+    return SessionLocal
+
+
+def _stock(SessionLocal):
+    with SessionLocal() as session:
+        return [p.stock_quantity for p in session.query(ShopProduct).order_by(ShopProduct.id)]
+
+
+def _reservations(SessionLocal):
+    with SessionLocal() as session:
+        return sorted((r.checkout_session_id, r.product_id, r.quantity, r.status)
+                      for r in session.query(ShopInventoryReservation))
+
+
+def test_reserve_is_all_or_nothing(shop):
+    with shop() as session:
+        assert reservations.reserve(session, "cs_a", [(1, 2), (3, 4), (1, 1)], now=T0) == 3  # Untracked product not held
+        session.commit()
+    assert _stock(shop) == [2, 1, None]
+    assert _reservations(shop) == [("cs_a", 1, 3, "active")]
+
+    with shop() as session:
+        with pytest.raises(OutOfStock) as exc:
+            reservations.reserve(session, "cs_b", {1: 1, 2: 2}, now=T0)
+        session.rollback()
+    assert exc.value.product_id == 2
+    assert _stock(shop) == [2, 1, None]
+
+    with shop() as session:
+        with pytest.raises(ReservationError):
+            reservations.reserve(session, "cs_c", {1: 0}, now=T0)
+        with pytest.raises(ReservationError):
+            reservations.reserve(session, "cs_c", {99: 1}, now=T0)
+
+
+def test_release_returns_stock_once(shop):
+    with shop() as session:
+        reservations.reserve(session, "cs_a", {1: 2, 2: 1}, now=T0)
+        session.commit()
+    for _ in range(2):
+        with shop() as session:
+            reservations.release(session, "cs_a", "Payment failed", now=T0)
+            session.commit()
+
+    assert _stock(shop) == [5, 1, None]
+    assert {r[3] for r in _reservations(shop)} == {"released"}
+    with shop() as session:
+        logs = session.query(ShopInventoryLog).order_by(ShopInventoryLog.product_id, ShopInventoryLog.id).all()
+        assert [(log.change_type, log.quantity_before, log.quantity_after) for log in logs] == \
+            [("reservation", 5, 3), ("release", 3, 5), ("reservation", 1, 0), ("release", 0, 1)]
+
+
+def test_convert_sells_reserved_stock(shop):
+    with shop() as session:
+        reservations.reserve(session, "cs_a", {1: 2, 2: 1}, now=T0)
+        session.commit()
+    with shop() as session:
+        assert reservations.convert(session, "cs_a", 1, {1: 2, 2: 1, 3: 1}, now=T0) == 3
+        session.commit()
+    with shop() as session:
+        assert reservations.convert(session, "cs_a", 1, {1: 2, 2: 1}, now=T0) == 0  # Replayed confirmation
+        session.commit()
+
+    assert _stock(shop) == [3, 0, None]
+    with shop() as session:
+        assert {(r.status, r.order_id) for r in session.query(ShopInventoryReservation)} == {("converted", 1)}
+        logs = session.query(ShopInventoryLog).order_by(ShopInventoryLog.product_id, ShopInventoryLog.id).all()
+        # Stock moved at reserve; the sale only records that the reserved units were sold
+        assert [(log.change_type, log.quantity_before, log.quantity_change, log.quantity_after) for log in logs] == \
+            [("reservation", 5, -2, 3), ("sale", 3, 0, 3), ("reservation", 1, -1, 0), ("sale", 0, 0, 0)]
+
+
+def test_sweeper_expires_abandoned_checkouts_and_late_payment_retakes(shop):
+    with shop() as session:
+        reservations.reserve(session, "cs_old", {1: 2, 2: 1}, expires_at=T0, now=T0 - timedelta(minutes=15))
+        reservations.reserve(session, "cs_new", {1: 1}, expires_at=T0 + timedelta(minutes=15), now=T0)
+        session.commit()
+
+    sweeper = ReservationSweeper(session_factory=shop, clock=lambda: T0)
+    assert sweeper.run_once() == 3
+    assert sweeper.run_once() == 0
+    assert _stock(shop) == [4, 1, None]
+    assert _reservations(shop) == [("cs_new", 1, 1, "active"), ("cs_old", 1, 2, "expired"), ("cs_old", 2, 1, "expired")]
+
+    # The abandoned checkout is paid after all: stock is taken again while it lasts
+    with shop() as session:
+        assert reservations.convert(session, "cs_old", 1, {1: 2, 2: 1}, now=T0) == 3
+        session.commit()
+    assert _stock(shop) == [2, 0, None]
+
+    with shop() as session:
+        reservations.release(session, "cs_new", "Payment failed", now=T0)
+        session.get(ShopProduct, 1).stock_quantity = 0
+        session.commit()
+    with shop() as session:
+        with pytest.raises(OutOfStock):
+            reservations.convert(session, "cs_new", 1, {1: 1}, now=T0)
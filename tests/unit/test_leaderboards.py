@@ -0,0 +1,148 @@
+"""
+Unit tests for leaderboards: the bucketed order-statistics board against a
+sorted list, and the service following the rating processor
+"""
+
+import random
+from datetime import datetime, timedelta, timezone
+
+from shared.models.base import Console, Match, MatchParticipant, MatchStatus, ParticipantResult, Player
+from shared.models.ratings import PlayerRating, RatingSeason, SeasonVenuePlayer
+from shared.services.leaderboards import GLOBAL, Leaderboard, LeaderboardService, region_scope, venue_scope
+from shared.services.ratings import RatingProcessor
+
+TABLES = ("players", "consoles", "matches", "match_participants", "rating_seasons", "player_ratings", "rating_history",
+          "season_venue_players")
+T0 = datetime(2025, 1, 1, tzinfo=timezone.utc)
+REGIONS = {1: "eu", 2: "eu", 3: "na", 4: "na", 5: "eu", 6: None, 7: "na", 8: "eu"}
+
+
+def _expected(ratings):
+    return sorted(ratings.items(), key=lambda entry: (-entry[1], entry[0]))
+
+
+def test_board_matches_a_sorted_list_under_random_updates():
+    rng = random.Random(7)
+    # Narrow buckets and ratings past both edges exercise the tree and the edge buckets
+    board = Leaderboard(min_rating=900, max_rating=1100, bucket_width=3)
+    ratings = {}
+    for step in range(3000):
+        player_id = rng.randint(1, 300)
+        rating = rng.choice([1000.0, 1020.0, round(rng.uniform(850, 1150), 1)])  # Plenty of ties
+        if player_id in ratings and rng.random() < 0.15:
+            assert board.remove(player_id, ratings.pop(player_id))
+        elif player_id in ratings:
+            board.move(player_id, ratings[player_id], rating)
+            ratings[player_id] = rating
+        else:
+            board.add(player_id, rating)
+            ratings[player_id] = rating
+
+        if step % 250 == 0:
+            expected = _expected(ratings)
+            assert len(board) == len(expected) and board.entries(0, len(expected) + 5) == expected
+            for rank, (player, rating) in enumerate(expected):
+                assert board.rank(player, rating) == rank
+            start = rng.randrange(len(expected))
+            assert board.entries(start, 17) == expected[start:start + 17]
+
+    assert board.rank(999, 1000.0) is None and not board.remove(999, 1000.0)
+    some_player = next(iter(ratings))
+    assert board.rank(some_player, ratings[some_player] + 1) is None  # Not at that rating
+
+    loaded = Leaderboard(min_rating=900, max_rating=1100, bucket_width=3)
+    loaded.load(ratings.items())
+    assert loaded.entries(0, len(ratings)) == board.entries(0, len(ratings))
+    assert [loaded.rank(p, r) for p, r in ratings.items()] == [board.rank(p, r) for p, r in ratings.items()]
+
+
+def _setup(sqlite_db):
+    _, SessionLocal, statements = sqlite_db(*TABLES)
+    with SessionLocal() as session:
+        session.add_all([Player(id=i, email=f"p{i}@example.com", region=region) for i, region in REGIONS.items()])
+        session.add_all([Console(id=i, device_uid=f"console-{i}") for i in (1, 2)])
+        session.add(RatingSeason(id=1, name="Season 1", starts_at=T0))
+        session.commit()
+    return SessionLocal, statements
+
+
+def _add_matches(SessionLocal, count, first_id, seed):
+    rng = random.Random(seed)
+    with SessionLocal() as session:
+        for match_id in range(first_id, first_id + count):
+            session.add(Match(id=match_id, status=MatchStatus.finished, console_id=rng.choice((1, 2, None)),
+                              ended_at=T0 + timedelta(minutes=match_id)))
+            a, b = rng.sample(sorted(REGIONS), 2)
+            won = rng.random() < 0.5
+            session.add(MatchParticipant(match_id=match_id, player_id=a, team=0,
+                                         result=ParticipantResult.win if won else ParticipantResult.loss))
+            session.add(MatchParticipant(match_id=match_id, player_id=b, team=1,
+                                         result=ParticipantResult.loss if won else ParticipantResult.win))
+        session.commit()
+
+
+def _from_database(SessionLocal):
+    """Every board, rebuilt by brute force from the stored ratings"""
+    with SessionLocal() as session:
+        ratings = {r.player_id: r.rating for r in session.query(PlayerRating).filter_by(season_id=1)}
+        regions = dict(session.query(Player.id, Player.region))
+        boards = {GLOBAL: _expected(ratings)}
+        for region in ("eu", "na"):
+            boards[region_scope(region)] = _expected({p: r for p, r in ratings.items() if regions[p] == region})
+        for console_id in (1, 2):
+            members = {v.player_id for v in session.query(SeasonVenuePlayer).filter_by(season_id=1,
+                                                                                      console_id=console_id)}
+            boards[venue_scope(console_id)] = _expected({p: ratings[p] for p in members})
+    return boards
+
+
+def _boards(service):
+    return {scope: [(e['player_id'], e['rating']) for e in service.top(scope, 100)['entries']]
+            for scope in (GLOBAL, region_scope("eu"), region_scope("na"), venue_scope(1), venue_scope(2))}
+
+
+def _rounded(boards):
+    return {scope: [(p, round(r)) for p, r in entries] for scope, entries in boards.items()}
+
+
+def test_service_follows_rating_changes_and_recomputes(sqlite_db):
+    SessionLocal, statements = _setup(sqlite_db)
+    clock = lambda: T0 + timedelta(days=10)
+    processor = RatingProcessor(SessionLocal, batch_size=10, clock=clock)
+    _add_matches(SessionLocal, 30, 1, seed=1)
+    processor.drain()
+
+    service = LeaderboardService(SessionLocal, clock=clock)
+    assert _boards(service) == _rounded(_from_database(SessionLocal))
+
+    # Queries after loading never touch the database
+    queries = len(statements)
+    page = service.top(GLOBAL, 3, offset=2)
+    assert [e['rank'] for e in page['entries']] == [3, 4, 5] and page['total'] == len(REGIONS)
+    window = service.around(page['entries'][1]['player_id'], GLOBAL, radius=2)
+    assert [e['rank'] for e in window['entries']] == [2, 3, 4, 5, 6] and window['player']['rank'] == 4
+    ranks = service.player_ranks(1)
+    assert set(ranks) >= {GLOBAL, region_scope("eu")} and all(r['player_id'] == 1 for r in ranks.values())
+    assert service.rank(6, region_scope("eu")) is None  # Player 6 has no region
+    assert len(statements) == queries
+
+    # New matches are applied from the rating history, and a region change moves the player
+    with SessionLocal() as session:
+        session.get(Player, 2).region = "na"
+        session.commit()
+    _add_matches(SessionLocal, 40, 31, seed=2)
+    processor.drain()
+    assert service.refresh() > 0
+    assert service.rank(2, region_scope("na")) is not None and service.rank(2, region_scope("eu")) is None
+    assert _boards(service) == _rounded(_from_database(SessionLocal))
+    assert _boards(service) == _boards(LeaderboardService(SessionLocal, clock=clock))
+
+    # A recompute replaces the season, which the next refresh rebuilds
+    with SessionLocal() as session:
+        session.query(MatchParticipant).filter_by(match_id=1).delete()
+        session.commit()
+    processor.recompute_season(1)
+    service.refresh()
+    assert _boards(service) == _rounded(_from_database(SessionLocal))
+
+    assert service.top(GLOBAL, season_id=99)['season_id'] is None
@@ -0,0 +1,235 @@
+"""
+Unit tests for the marketplace engine
+Order book matching, auction bidding and settlement against in-memory SQLite
+"""
+
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import func, insert, select
+
+from shared.models.base import CardCatalog, CardCategory, CardRarity, Player
+from shared.models.nfc_trading_system import (
+    AuctionBid, AuctionStatus, CardAuction, EnhancedNFCCard, MarketplaceBuyOrder, BuyOrderStatus,
+    MarketplaceListing, MarketplaceListingStatus, TradingHistory
+)
+from shared.models.tournaments import PlayerWallet
+from shared.models.wallet_ledger import LedgerPosting
+from shared.services import wallet_ledger
+from shared.services.marketplace_engine import (
+    BidRejected, MarketplaceEngine, MarketplaceError, auction_account, buy_order_account, min_next_bid
+)
+
+TABLES = ('players', 'card_catalog', 'enhanced_nfc_cards', 'card_auctions', 'auction_bids', 'marketplace_listings',
+          'marketplace_buy_orders', 'trade_offers', 'trading_history', 'player_wallets', 'wallet_ledger_entries',
+          'wallet_ledger_postings', 'wallet_daily_totals')
+T0 = datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc)
+SELLER, ALICE, BOB = 1, 2, 3
+
+
+class Clock:
+    def __init__(self):
+        self.now = T0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def market(sqlite_db):
+    _, SessionLocal, _ = sqlite_db(*TABLES)
+    with SessionLocal() as session:
+        for player_id in (SELLER, ALICE, BOB):
+            session.add(Player(id=player_id, email=f"player{player_id}@example.com"))
+        # Core insert: the ORM would fill the Postgres ARRAY defaults SQLite cannot bind
+        session.execute(insert(CardCatalog).values(
+            id=1, product_sku="RADIANT-001", name="Solar Vanguard", rarity=CardRarity.rare,
+            category=CardCategory.creature, asset_quality_levels=None, mana_colors=None
+        ))
+        for card_id in (1, 2, 3):
+            session.add(EnhancedNFCCard(id=card_id, nfc_uid=f"04AABB{card_id:02d}", card_template_id=1,
+                                        owner_player_id=SELLER))
+        session.flush()
+        for player_id in (SELLER, ALICE, BOB):
+            wallet = wallet_ledger.get_or_create_wallet(session, player_id)
+            session.flush()
+            wallet_ledger.credit_deposit(session, wallet.id, "100.00", f"pi_{player_id}", now=T0)
+        session.commit()
+
+    clock = Clock()
+    engine = MarketplaceEngine(session_factory=SessionLocal, clock=clock)
+    engine.SessionLocal = SessionLocal
+    engine.clock = clock
+    return engine
+
+
+def _balance(market, player_id):
+    with market.SessionLocal() as session:
+        return session.query(PlayerWallet).filter(PlayerWallet.player_id == player_id).one().balance
+
+
+def _escrow(market, account):
+    with market.SessionLocal() as session:
+        return session.execute(
+            select(func.coalesce(func.sum(LedgerPosting.amount), 0)).where(LedgerPosting.account == account)
+        ).scalar()
+
+
+def _card(market, card_id):
+    with market.SessionLocal() as session:
+        return session.get(EnhancedNFCCard, card_id)
+
+
+def test_min_next_bid_uses_larger_of_fixed_and_relative_increment():
+    assert min_next_bid(Decimal("0.00"), 0, Decimal("5.00")) == Decimal("5.00")
+    assert min_next_bid(Decimal("5.00"), 1, Decimal("5.00")) == Decimal("5.50")
+    assert min_next_bid(Decimal("40.00"), 3, Decimal("5.00")) == Decimal("42.00")
+    assert min_next_bid(Decimal("10.01"), 3, Decimal("5.00")) == Decimal("10.52")
+
+
+def test_bids_enforce_increment_and_move_escrow(market):
+    auction_id = market.create_auction(SELLER, 1, "10.00", timedelta(hours=24))['auction_id']
+    assert _card(market, 1).is_locked
+    with pytest.raises(MarketplaceError):
+        market.list_card(SELLER, 1, "20.00")  # Already up for auction
+
+    with pytest.raises(BidRejected) as low:
+        market.place_bid(auction_id, ALICE, "9.00")
+    assert low.value.min_bid == Decimal("10.00")
+    with pytest.raises(BidRejected):
+        market.place_bid(auction_id, SELLER, "50.00")
+
+    first = market.place_bid(auction_id, ALICE, "10.00")
+    assert first['min_next_bid'] == 10.50 and not first['extended']
+    with pytest.raises(BidRejected):
+        market.place_bid(auction_id, ALICE, "20.00")  # Already winning
+    with pytest.raises(BidRejected) as outbid:
+        market.place_bid(auction_id, BOB, "10.25")
+    assert outbid.value.min_bid == Decimal("10.50")
+
+    market.place_bid(auction_id, BOB, "10.50")
+    assert _balance(market, ALICE) == Decimal("100.00")
+    assert _balance(market, BOB) == Decimal("89.50")
+    assert _escrow(market, auction_account(auction_id)) == Decimal("10.50")
+
+    # A bid the bidder cannot cover leaves the auction untouched
+    with pytest.raises(wallet_ledger.InsufficientFunds):
+        market.place_bid(auction_id, ALICE, "150.00")
+    with market.SessionLocal() as session:
+        auction = session.get(CardAuction, auction_id)
+        assert (auction.current_bidder_id, auction.current_bid, auction.bid_count) == (BOB, Decimal("10.50"), 2)
+        assert [b.is_winning for b in session.query(AuctionBid).order_by(AuctionBid.id)] == [False, True]
+
+
+def test_late_bids_extend_the_auction(market):
+    auction_id = market.create_auction(SELLER, 1, "10.00", timedelta(hours=1))['auction_id']
+    ends_at = T0 + timedelta(hours=1)
+
+    market.clock.now = ends_at - timedelta(seconds=30)
+    result = market.place_bid(auction_id, ALICE, "10.00")
+    assert result['extended'] and result['ends_at'] == (market.clock.now + timedelta(seconds=120)).isoformat()
+
+    # Nothing closes at the original end time
+    market.clock.now = ends_at + timedelta(seconds=10)
+    assert market.close_expired_auctions() == []
+    market.place_bid(auction_id, BOB, "11.00")
+
+    market.clock.now += timedelta(seconds=121)
+    with pytest.raises(BidRejected, match="ended"):
+        market.place_bid(auction_id, ALICE, "20.00")
+
+
+def test_auction_settles_exactly_once(market):
+    auction_id = market.create_auction(SELLER, 1, "10.00", timedelta(hours=1), reserve_price="12.00")['auction_id']
+    market.place_bid(auction_id, ALICE, "10.00")
+    market.place_bid(auction_id, BOB, "15.00")
+
+    market.clock.now = T0 + timedelta(hours=2)
+    closed = market.close_expired_auctions()
+    assert [(c['sold'], c['winner_id'], c['price']) for c in closed] == [(True, BOB, 15.0)]
+    assert market.close_auction(auction_id) is None
+    assert market.close_expired_auctions() == []
+
+    card = _card(market, 1)
+    assert (card.owner_player_id, card.is_locked, card.trade_count) == (BOB, False, 1)
+    assert (_balance(market, SELLER), _balance(market, ALICE), _balance(market, BOB)) == \
+        (Decimal("115.00"), Decimal("100.00"), Decimal("85.00"))
+    assert _escrow(market, auction_account(auction_id)) == 0
+    with market.SessionLocal() as session:
+        assert session.query(TradingHistory).filter(TradingHistory.auction_id == auction_id).count() == 1
+        assert session.get(CardAuction, auction_id).status == AuctionStatus.ENDED
+        report = wallet_ledger.reconcile(session)
+        assert not report['mismatches'] and not report['unbalanced_entries']
+
+
+def test_unmet_reserve_refunds_and_unlocks(market):
+    auction_id = market.create_auction(SELLER, 1, "10.00", timedelta(hours=1), reserve_price="50.00")['auction_id']
+    market.place_bid(auction_id, ALICE, "20.00")
+    market.clock.now = T0 + timedelta(hours=1)
+
+    assert market.close_auction(auction_id) == {'auction_id': auction_id, 'sold': False, 'winner_id': None,
+                                                'price': None, 'trade_id': None}
+    card = _card(market, 1)
+    assert (card.owner_player_id, card.is_locked) == (SELLER, False)
+    assert _balance(market, ALICE) == Decimal("100.00")
+    assert _escrow(market, auction_account(auction_id)) == 0
+
+
+def test_orders_match_at_resting_price(market):
+    # Buy order rests first, so the incoming listing trades at the buyer's price
+    order = market.place_buy_order(ALICE, 1, "12.00")
+    assert order['trades'] == [] and _balance(market, ALICE) == Decimal("88.00")
+    market.clock.now += timedelta(minutes=1)
+    listed = market.list_card(SELLER, 1, "10.00")
+    assert [(t['buyer_id'], t['price']) for t in listed['trades']] == [(ALICE, 12.0)]
+
+    # Listing rests first, so the incoming buy order pays the listing price and gets the rest back
+    market.list_card(SELLER, 2, "8.00")
+    market.clock.now += timedelta(minutes=1)
+    filled = market.place_buy_order(BOB, 1, "15.00")
+    assert [(t['card_id'], t['price']) for t in filled['trades']] == [(2, 8.0)]
+    assert _balance(market, BOB) == Decimal("92.00")
+    assert _balance(market, SELLER) == Decimal("120.00")
+    assert _escrow(market, buy_order_account(order['order_id'])) == 0
+    assert _escrow(market, buy_order_account(filled['order_id'])) == 0
+    assert (_card(market, 1).owner_player_id, _card(market, 2).owner_player_id) == (ALICE, BOB)
+
+    # Players never trade with themselves
+    market.list_card(BOB, 2, "5.00")
+    assert market.place_buy_order(BOB, 1, "6.00")['trades'] == []
+    depth = market.depth(1)
+    assert (depth['best_ask'], depth['best_bid']) == (5.0, 6.0)
+
+
+def test_stale_book_entry_never_sells_twice(market):
+    other_worker = MarketplaceEngine(session_factory=market.SessionLocal, clock=market.clock)
+    listing_id = market.list_card(SELLER, 1, "10.00")['listing_id']
+    assert market.depth(1)['best_ask'] == 10.0
+
+    # Sold through another worker; this worker's book still shows the listing
+    other_worker.buy_listing(BOB, listing_id)
+    result = market.place_buy_order(ALICE, 1, "10.00")
+    assert result['trades'] == [] and market.stats()['stale_entries'] == 1
+    assert _card(market, 1).owner_player_id == BOB
+    with market.SessionLocal() as session:
+        assert session.query(TradingHistory).count() == 1
+        assert session.get(MarketplaceBuyOrder, result['order_id']).status == BuyOrderStatus.OPEN
+    assert market.depth(1)['best_ask'] is None
+
+
+def test_cancel_and_expiry_release_cards_and_funds(market):
+    order_id = market.place_buy_order(ALICE, 1, "30.00")['order_id']
+    market.cancel_buy_order(ALICE, order_id)
+    assert _balance(market, ALICE) == Decimal("100.00")
+    with pytest.raises(MarketplaceError):
+        market.cancel_buy_order(ALICE, order_id)
+
+    listing_id = market.list_card(SELLER, 1, "40.00", expires_at=T0 + timedelta(hours=1))['listing_id']
+    market.clock.now = T0 + timedelta(hours=1)
+    with pytest.raises(MarketplaceError):
+        market.buy_listing(BOB, listing_id)
+    assert market.run_once()['listings_expired'] == 1
+    with market.SessionLocal() as session:
+        assert session.get(MarketplaceListing, listing_id).status == MarketplaceListingStatus.EXPIRED
+    assert not _card(market, 1).is_locked
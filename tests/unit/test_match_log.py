@@ -0,0 +1,164 @@
+"""
+Unit tests for the match event log: crash recovery and deterministic replay
+The crash test plays half a match in a child process, SIGKILLs it, and recovers
+the match in this process from the log alone
+"""
+
+import os
+import sys
+import json
+import signal
+import asyncio
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+for path in (os.path.join(ROOT, 'services', 'realtime'), os.path.join(ROOT, 'services', 'api'), ROOT):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, Session
+
+from conftest import FakeConnections
+from game_engine.game_state import GameState
+from game_engine.match_log import MatchLog
+from handlers import game_state as game_state_module
+from handlers.game_state import GameStateHandler
+from shared.models.base import Base, Match, MatchParticipant, MatchStatus
+
+BURN = {'name': 'burn', 'parameters': {'amount': 1, 'duration': 2, 'target_type': 'enemy'}}
+
+
+class DealingHandler(GameStateHandler):
+    """Deals fixed opening hands, standing in for deck loading"""
+
+    def _create_initial_game_state(self, match_id):
+        state = super()._create_initial_game_state(match_id)
+        state.players['0'].hand = [{'id': 'whelp', 'name': 'Whelp', 'category': 'CREATURE', 'health': 6},
+                                   {'id': 'spark', 'name': 'Spark', 'category': 'ACTION_SLOW', 'abilities': [BURN]}]
+        state.players['1'].hand = [{'id': 'golem', 'name': 'Golem', 'category': 'CREATURE', 'health': 8,
+                                    'energy_cost': 2}]
+        state.rules['max_turns'] = 3
+        return state
+
+
+def _database(db_path):
+    engine = create_engine(f"sqlite:///{db_path}")
+    if not os.path.exists(db_path):
+        Base.metadata.create_all(engine, tables=[Base.metadata.tables[t] for t in ("matches", "match_participants")])
+        with Session(engine) as session:
+            session.add(Match(id=7, status=MatchStatus.queued))
+            session.add(MatchParticipant(match_id=7, player_id=11, team=0))
+            session.add(MatchParticipant(match_id=7, player_id=22, team=1))
+            session.commit()
+    return sessionmaker(bind=engine, class_=Session, expire_on_commit=False)
+
+
+def _snapshot(state):
+    return json.loads(json.dumps(state.snapshot()))
+
+
+def crash_mid_match(log_dir, db_path, expected_path):
+    """Child process: play into turn 2 of the match, write the state out, then get killed"""
+    game_state_module.SessionLocal = _database(db_path)
+    handler = DealingHandler(FakeConnections(), match_log=MatchLog(log_dir, snapshot_every=3))
+
+    async def play(user_id, message):
+        await handler.handle_message({'match_id': '7', **message}, f"conn_{user_id}", {'user_id': user_id})
+
+    async def first_half():
+        await play(11, {'type': 'match.ready'})
+        await play(22, {'type': 'match.ready'})
+        await handler._handle_phase_timeout('7')  # main
+        await play(11, {'type': 'card.play', 'card_id': 'whelp'})
+        await play(22, {'type': 'card.play', 'card_id': 'golem'})  # Rejected: not seat 1's turn
+        for _ in range(4):  # Turn 2, seat 1, main
+            await handler._handle_phase_timeout('7')
+        await play(22, {'type': 'card.play', 'card_id': 'golem'})
+        await handler._handle_phase_timeout('7')  # attack
+
+        with open(expected_path, 'w') as f:
+            json.dump(_snapshot(handler.active_matches['7']), f)
+        os.kill(os.getpid(), signal.SIGKILL)
+
+    asyncio.run(first_half())
+
+
+def test_match_killed_mid_game_recovers_identically_and_replays(tmp_path, monkeypatch):
+    log_dir, db_path, expected_path = tmp_path / "logs", tmp_path / "match.db", tmp_path / "expected.json"
+    child = subprocess.run([sys.executable, __file__, str(log_dir), str(db_path), str(expected_path)],
+                           cwd=os.path.dirname(__file__), capture_output=True, text=True, timeout=60)
+    assert child.returncode == -signal.SIGKILL, child.stderr
+    with open(expected_path) as f:
+        expected = json.load(f)
+
+    # The snapshot is behind the last action, so recovery replays a tail
+    with open(log_dir / "active" / "7" / "snapshot.json") as f:
+        assert json.load(f)["seq"] < expected["sequence"]
+
+    monkeypatch.setattr(game_state_module, "SessionLocal", _database(db_path))
+    match_log = MatchLog(str(log_dir), snapshot_every=3)
+    connections = FakeConnections()
+    handler = DealingHandler(connections, match_log=match_log)
+
+    async def second_half():
+        assert await handler.recover_matches() == ['7']
+        state = handler.active_matches['7']
+        assert _snapshot(state) == expected
+        assert handler.match_participants['7'] == {11: 0, 22: 1}
+
+        # Players rejoin and pick up where they were
+        await handler.handle_message({'type': 'match.ready', 'match_id': '7'}, 'conn_11', {'user_id': 11})
+        await handler.handle_message({'type': 'match.ready', 'match_id': '7'}, 'conn_22', {'user_id': 22})
+        assert connections.last('conn_22', 'sync.snapshot')['seq'] == expected['sequence']
+
+        for _ in range(3):  # Turn 3, seat 0, main
+            await handler._handle_phase_timeout('7')
+        await handler.handle_message({'type': 'card.play', 'match_id': '7', 'card_id': 'spark'}, 'conn_11',
+                                     {'user_id': 11})
+        assert connections.last('conn_11', 'card.play_result')['success'] is True
+        while '7' in handler.active_matches:  # Play out to the turn limit, burn ticking at turn start
+            await handler._handle_phase_timeout('7')
+        return connections.last('conn_11', 'match.end'), _snapshot(state)
+
+    end, final = asyncio.run(second_half())
+    assert end['result']['condition'] == 'draw'
+    assert match_log.unfinished() == []
+
+    replayed, result = match_log.replay('7')
+    assert result == end['result']
+    assert _snapshot(replayed) == final == json.loads(json.dumps(match_log.final_snapshot('7')))
+    assert final['players']['1']['battlefield'][0]['health'] < 8  # The burn landed and was replayed
+
+    halfway, _ = match_log.replay('7', until_seq=expected['sequence'])
+    assert _snapshot(halfway) == expected
+
+
+def test_replay_reproduces_timer_ticks_and_ignores_a_torn_last_event(tmp_path):
+    match_log = MatchLog(str(tmp_path), snapshot_every=100)
+    state = GameState('9', [{'player_id': 1}, {'player_id': 2}], seed=1234)
+    state.players['0'].hand = [{'id': 'a', 'name': 'A', 'category': 'CREATURE', 'health': 3}]
+    match_log.start(state, {"participants": {"1": 0, "2": 1}})
+
+    state.advance_phase()
+    state.update_timer(4000)
+    state.update_timer(7000)  # The play window closes after 10s of the main phase
+    try:
+        state.play_card(0, 'a', 'play')
+    except ValueError as e:
+        assert str(e) == "No play window active"
+    state.advance_phase()
+    live = _snapshot(state)
+
+    with open(tmp_path / "active" / "9" / "events.jsonl", 'a') as f:
+        f.write('{"seq": 3, "type": "phase_adv')  # Killed while writing
+
+    recovered, meta = match_log.recover('9')
+    assert _snapshot(recovered) == live and meta == {"participants": {"1": 0, "2": 1}}
+    assert recovered.players['0'].hand[0]['id'] == 'a'  # The rejected play did not take the card
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import conftest  # noqa: F401  - SQLite compilation of the Postgres column types
+    crash_mid_match(*sys.argv[1:4])
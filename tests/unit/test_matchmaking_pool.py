@@ -0,0 +1,119 @@
+"""
+Unit tests for the in-memory matchmaking pool and the event-driven MatchmakingHandler
+"""
+
+import os
+import sys
+import asyncio
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+REALTIME = os.path.join(ROOT, 'services', 'realtime')
+if REALTIME not in sys.path:
+    sys.path.insert(0, REALTIME)
+
+from services.matchmaking_pool import MatchmakingPool, ArrivalStats, QueueEntry
+
+
+def _pool():
+    return MatchmakingPool("1v1", base_window=100, window_step=50, widen_seconds=10, max_window=600)
+
+
+def test_far_neighbour_does_not_starve_compatible_players():
+    pool = _pool()
+    # The old adjacent-pair scan stalled on 1000 vs 1500 and never reached 1520
+    for player_id, elo in ((1, 1000), (2, 1500), (3, 1520)):
+        pool.add(QueueEntry(player_id=player_id, elo=elo, enqueued_at=0.0))
+
+    pairs = pool.sweep(now=1.0)
+    assert [(a.player_id, b.player_id) for a, b in pairs] == [(2, 3)]
+    assert list(pool.entries) == [1]
+
+
+def test_window_widens_with_wait_and_long_waiter_accepts_newcomers():
+    pool = _pool()
+    pool.add(QueueEntry(player_id=1, elo=1000, enqueued_at=0.0))
+    pool.add(QueueEntry(player_id=2, elo=1280, enqueued_at=39.0))
+
+    assert pool.sweep(now=39.0) == []
+    assert pool.next_widen_at(39.0) == 40.0
+    # After 40s player 1 searches +/-300, which covers the newcomer's 280 gap
+    pairs = pool.sweep(now=40.0)
+    assert [(a.player_id, b.player_id) for a, b in pairs] == [(1, 2)]
+
+
+def test_match_prefers_closest_elo_and_respects_preferred_range():
+    pool = _pool()
+    pool.add(QueueEntry(player_id=1, elo=1040, enqueued_at=0.0))
+    pool.add(QueueEntry(player_id=2, elo=990, enqueued_at=0.0, max_elo=1000))
+    pool.add(QueueEntry(player_id=3, elo=1010, enqueued_at=1.0))
+
+    player1, player2 = pool.match(3, now=1.0)
+    # Player 2 is the closest but only accepts opponents up to 1000
+    assert {player1.player_id, player2.player_id} == {1, 3}
+    assert player1.player_id == 1  # longest waiter is team 0
+    assert 2 in pool and len(pool) == 1
+
+
+def test_arrival_stats_estimate_tracks_local_rate():
+    stats = ArrivalStats(horizon_seconds=600, clock=lambda: 0.0)
+    pool = _pool()
+    for second in range(120):
+        # One arrival near 1200 every 4s, one far away every 4s
+        if second % 4 == 0:
+            stats.record_arrival(1200, now=float(second))
+            stats.record_arrival(2000, now=float(second))
+
+    assert stats.estimate_wait(1210, pool, now=120.0) == 5  # clamped minimum, rate 0.25/s
+    stats.record_match(12.0, now=120.0)
+    assert stats.estimate_wait(500, pool, now=120.0) == 12  # nobody nearby: recent median wait
+    assert stats.snapshot(now=120.0)['arrivals_per_minute'] == 30.0
+
+
+class _FakeConnections:
+    def __init__(self):
+        self.personal = []
+        self.users = []
+
+    async def send_personal_message(self, message, connection_id):
+        self.personal.append((connection_id, message))
+
+    async def send_to_user(self, message, user_id):
+        self.users.append((user_id, message))
+
+
+def test_handler_matches_on_join_without_polling():
+    from handlers.matchmaking import MatchmakingHandler
+
+    elos = {1: 1500, 2: 1530}
+    created = []
+
+    class Handler(MatchmakingHandler):
+        def _db_enqueue(self, user_id, mode):
+            return None, elos[user_id], None
+
+        def _db_load_queue(self):
+            return []
+
+        def _db_create_match(self, mode, player1, player2):
+            created.append((player1.player_id, player2.player_id))
+            return 77, [{"id": p.player_id, "display_name": f"p{p.player_id}", "elo_rating": p.elo}
+                        for p in (player1, player2)]
+
+    async def scenario():
+        connections = _FakeConnections()
+        handler = Handler(connections)
+        await handler.start_queue_polling()
+        await handler.handle_message({"type": "queue.join", "mode": "1v1"}, "c1", {"user_id": 1})
+        await handler.handle_message({"type": "queue.join", "mode": "1v1"}, "c2", {"user_id": 2})
+        for _ in range(20):
+            if connections.users:
+                break
+            await asyncio.sleep(0.01)
+        handler.queue_polling_task.cancel()
+        return connections, handler
+
+    connections, handler = asyncio.run(scenario())
+    assert created == [(1, 2)]
+    assert sorted(user_id for user_id, _ in connections.users) == [1, 2]
+    assert all(message["match_id"] == "77" for _, message in connections.users)
+    assert handler.get_queue_stats()["1v1"]["queued"] == 0
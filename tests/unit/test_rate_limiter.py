@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Rate limiter tests
+Atomic Lua checks against fakeredis under concurrent bursts, GCRA spacing
+and the in-process fallback when Redis is down
+"""
+
+import os
+import sys
+import threading
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, ROOT)
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+from shared.security import rate_limiter
+from shared.security.rate_limiter import check_rate_limit, LocalRateLimiter, RateLimitConfig
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(rate_limiter, 'REDIS_CLIENT', client)
+    monkeypatch.setattr(rate_limiter, '_redis_failed_at', None)
+    monkeypatch.setattr(rate_limiter, '_scripts', {})
+    monkeypatch.setattr(rate_limiter, 'local_rate_limiter', LocalRateLimiter())
+    return client
+
+
+@pytest.fixture
+def redis_down(monkeypatch):
+    monkeypatch.setattr(rate_limiter, 'REDIS_CLIENT', None)
+    monkeypatch.setattr(rate_limiter, 'REDIS_AVAILABLE', False)
+    monkeypatch.setattr(rate_limiter, 'local_rate_limiter', LocalRateLimiter())
+
+
+@pytest.fixture
+def gcra_limit(monkeypatch):
+    limits = dict(RateLimitConfig.DEFAULT_LIMITS)
+    limits['test_gcra'] = {'requests': 10, 'window': 60, 'algorithm': 'gcra'}
+    monkeypatch.setattr(RateLimitConfig, 'DEFAULT_LIMITS', limits)
+
+
+def burst(limit_type, identifier, requests):
+    results = []
+    barrier = threading.Barrier(requests)
+
+    def worker():
+        barrier.wait()
+        results.append(check_rate_limit(limit_type, identifier)[0])
+
+    threads = [threading.Thread(target=worker) for _ in range(requests)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_concurrent_burst_admits_exactly_the_limit(fake_redis):
+    results = burst('admin_sensitive', 'ip:10.0.0.1', 100)
+    assert results.count(True) == 10
+    assert fake_redis.zcard('rate_limit:admin_sensitive:ip:10.0.0.1') == 10
+
+
+def test_rejection_reports_reset_time(fake_redis):
+    for _ in range(5):
+        assert check_rate_limit('admin_login', 'ip:10.0.0.2')[0]
+    allowed, info = check_rate_limit('admin_login', 'ip:10.0.0.2')
+    assert not allowed
+    assert info['limit_exceeded'] and info['current'] == 5
+    assert 0 < info['reset_in'] <= 300
+
+
+def test_gcra_allows_burst_then_spaces_requests(fake_redis, gcra_limit):
+    results = burst('test_gcra', 'ip:10.0.0.3', 50)
+    assert results.count(True) == 10
+
+
+def test_local_fallback_when_redis_unavailable(redis_down):
+    results = burst('admin_sensitive', 'ip:10.0.0.4', 100)
+    assert results.count(True) == 10
+    allowed, info = check_rate_limit('admin_sensitive', 'ip:10.0.0.4')
+    assert not allowed and info['redis_available'] is False
+
+
+def test_redis_error_falls_back_to_local_limiter(fake_redis, monkeypatch):
+    class BrokenRedis:
+        def register_script(self, source):
+            def run(**kwargs):
+                raise ConnectionError("redis went away")
+            return run
+
+    monkeypatch.setattr(rate_limiter, 'REDIS_CLIENT', BrokenRedis())
+    monkeypatch.setattr(rate_limiter, 'REDIS_AVAILABLE', False)
+    results = [check_rate_limit('admin_sensitive', 'ip:10.0.0.5')[0] for _ in range(20)]
+    assert results.count(True) == 10
+
+
+def test_local_limiter_window_slides():
+    now = [1000.0]
+    limiter = LocalRateLimiter(clock=lambda: now[0])
+    assert all(limiter.hit('k', 3, 10)[0] for _ in range(3))
+    assert not limiter.hit('k', 3, 10)[0]
+    now[0] += 10.5
+    assert limiter.hit('k', 3, 10)[0]
@@ -0,0 +1,194 @@
+"""
+Unit tests for the rating processor: Elo with a K-factor schedule, batched
+live rating of finished matches, and deterministic season recomputation
+"""
+
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from shared.models.base import Match, MatchParticipant, MatchStatus, ParticipantResult, Player
+from shared.models.ratings import PlayerRating, RatingHistory, RatingSeason
+from shared.services.ratings import (
+    FinishedMatch, KSchedule, RatingEngine, RatingProcessor, RatingState, expected_score
+)
+
+TABLES = ("players", "consoles", "matches", "match_participants", "rating_seasons", "player_ratings", "rating_history",
+          "season_venue_players")
+T0 = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _finished(match_id, *participants):
+    return FinishedMatch(match_id, T0, tuple(participants))
+
+
+def _setup(sqlite_db, players=8, seasons=((1, "Season 1", T0),)):
+    _, SessionLocal, statements = sqlite_db(*TABLES)
+    with SessionLocal() as session:
+        session.add_all([Player(id=i, email=f"p{i}@example.com") for i in range(1, players + 1)])
+        session.add_all([RatingSeason(id=i, name=name, starts_at=at) for i, name, at in seasons])
+        session.commit()
+    return SessionLocal, statements
+
+
+def _add_matches(SessionLocal, count, start, players=8, seed=1, first_id=1):
+    """Random 1v1 and 2v2 matches one minute apart, with a few unratable ones mixed in"""
+    rng = random.Random(seed)
+    with SessionLocal() as session:
+        for offset in range(count):
+            match_id = first_id + offset
+            session.add(Match(id=match_id, status=MatchStatus.finished, ended_at=start + timedelta(minutes=offset)))
+            seats = rng.sample(range(1, players + 1), rng.choice((2, 4)))
+            outcome = rng.choice(("win", "loss", "draw", "win", "loss", "none"))
+            for seat, player_id in enumerate(seats):
+                team = seat % 2
+                if outcome == "none":
+                    result = ParticipantResult.none
+                elif outcome == "draw":
+                    result = ParticipantResult.draw
+                else:
+                    result = ParticipantResult.win if (team == 0) == (outcome == "win") else ParticipantResult.loss
+                session.add(MatchParticipant(match_id=match_id, player_id=player_id, team=team, result=result))
+        session.commit()
+
+
+def _ratings(SessionLocal, season_id):
+    with SessionLocal() as session:
+        rows = session.query(PlayerRating).filter(PlayerRating.season_id == season_id).order_by(PlayerRating.player_id)
+        return [(r.player_id, r.rating, r.peak_rating, r.games, r.wins, r.losses, r.draws, r.last_match_id)
+                for r in rows]
+
+
+def _history(SessionLocal, season_id):
+    with SessionLocal() as session:
+        rows = session.query(RatingHistory).filter(RatingHistory.season_id == season_id).order_by(RatingHistory.id)
+        return [(r.match_id, r.player_id, r.rating_before, r.rating_after, r.k_factor, r.games) for r in rows]
+
+
+def test_k_schedule_and_elo_updates():
+    schedule = KSchedule(provisional_k=40, provisional_games=2, k=20, established_k=10, established_rating=1500)
+    assert schedule.k_for(1000, 0) == 40 and schedule.k_for(1000, 2) == 20 and schedule.k_for(1600, 5) == 10
+    assert expected_score(1000, 1000) == 0.5
+    assert expected_score(1400, 1000) == pytest.approx(10 / 11)
+
+    engine = RatingEngine(schedule=schedule, initial_rating=1000)
+    changes = engine.rate(_finished(1, (1, 0, "win"), (2, 1, "loss")))
+    assert [(c.player_id, c.after, c.k_factor) for c in changes] == [(1, 1020, 40), (2, 980, 40)]
+
+    # A 2v2 is rated on team means; each member moves by its own K
+    engine = RatingEngine({1: RatingState(1100, 1100, games=5), 3: RatingState(900, 900),
+                           2: RatingState(1000, 1000, games=5), 4: RatingState(1000, 1000, games=5)}, schedule)
+    changes = engine.rate(_finished(2, (1, 0, "draw"), (3, 0, "draw"), (2, 1, "draw"), (4, 1, "draw")))
+    assert all(c.after == c.before for c in changes)
+    changes = engine.rate(_finished(3, (1, 0, "loss"), (3, 0, "loss"), (2, 1, "win"), (4, 1, "win")))
+    deltas = {c.player_id: c.after - c.before for c in changes}
+    assert deltas == pytest.approx({1: -10, 3: -20, 2: 10, 4: 10})
+    assert (engine.ratings[3].games, engine.ratings[3].draws, engine.ratings[3].losses) == (2, 1, 1)
+
+    # Abandoned, one-sided, contradictory and three-team matches stay unrated
+    for participants in (((1, 0, "none"), (2, 1, "none")),
+                         ((1, 0, "win"), (2, 0, "win")),
+                         ((1, 0, "win"), (3, 0, "loss"), (2, 1, "loss")),
+                         ((1, 0, "win"), (2, 1, "win")),
+                         ((1, 0, "win"), (2, 1, "loss"), (3, 2, "loss")),
+                         ((None, 0, "win"), (2, 1, "loss"))):
+        assert engine.rate(_finished(9, *participants)) == []
+
+
+def test_batched_live_rating_matches_a_full_recompute(sqlite_db):
+    SessionLocal, statements = _setup(sqlite_db)
+    _add_matches(SessionLocal, 60, T0)
+    clock = Clock(T0 + timedelta(minutes=57, seconds=3))
+    processor = RatingProcessor(SessionLocal, batch_size=7, settle_seconds=5, clock=clock)
+
+    # The match that ended three seconds ago has not settled
+    assert processor.drain() == 57
+    with SessionLocal() as session:
+        assert session.query(Match).filter(Match.rated_at.is_(None)).count() == 3
+    assert processor.stats()['batches'] == 9
+
+    clock.now += timedelta(minutes=5)
+    batch_statements = len(statements)
+    assert processor.run_once() == 3
+    assert len(statements) - batch_statements < 15  # A batch is a fixed handful of statements
+    assert processor.run_once() == 0
+
+    live_ratings, live_history = _ratings(SessionLocal, 1), _history(SessionLocal, 1)
+    stats = processor.stats()
+    assert stats['matches_rated'] + stats['matches_skipped'] == 60 and stats['matches_skipped'] > 0
+    assert len({match_id for match_id, *_ in live_history}) == stats['matches_rated']
+
+    with SessionLocal() as session:
+        # The current season drives the displayed rating and each participant's Elo change
+        for player_id, rating, *_ in live_ratings:
+            assert session.get(Player, player_id).elo_rating == round(rating)
+        match_id, player_id, before, after, _, _ = live_history[0]
+        participant = session.query(MatchParticipant).filter_by(match_id=match_id, player_id=player_id).one()
+        assert participant.elo_change == round(after) - round(before)
+
+    stats = processor.recompute_season(1)
+    assert stats['matches'] == 60 and stats['players'] == len(live_ratings)
+    assert _ratings(SessionLocal, 1) == live_ratings
+    assert _history(SessionLocal, 1) == live_history
+    with SessionLocal() as session:
+        assert session.get(RatingSeason, 1).recomputed_at is not None
+
+
+def test_matches_are_rated_in_the_season_they_ended_in(sqlite_db):
+    SessionLocal, _ = _setup(sqlite_db, seasons=((1, "Season 1", T0), (2, "Season 2", T0 + timedelta(days=30))))
+    with SessionLocal() as session:
+        for match_id, ended_at in ((1, T0 - timedelta(days=1)), (2, T0 + timedelta(days=1)),
+                                   (3, T0 + timedelta(days=31))):
+            session.add(Match(id=match_id, status=MatchStatus.finished, ended_at=ended_at))
+            session.add(MatchParticipant(match_id=match_id, player_id=1, team=0, result=ParticipantResult.win))
+            session.add(MatchParticipant(match_id=match_id, player_id=2, team=1, result=ParticipantResult.loss))
+        session.add(Match(id=4, status=MatchStatus.active))
+        session.commit()
+
+    processor = RatingProcessor(SessionLocal, clock=Clock(T0 + timedelta(days=40)))
+    assert processor.drain() == 3
+
+    # Match 1 predates every season; each season starts everyone afresh
+    assert [h[0] for h in _history(SessionLocal, 1)] == [2, 2]
+    assert [h[0] for h in _history(SessionLocal, 2)] == [3, 3]
+    assert [(r[0], r[1]) for r in _ratings(SessionLocal, 1)] == [(1, 1020), (2, 980)]
+    assert [(r[0], r[1]) for r in _ratings(SessionLocal, 2)] == [(1, 1020), (2, 980)]
+    with SessionLocal() as session:
+        assert session.get(Match, 1).rated_at is not None and session.get(Match, 4).rated_at is None
+        assert session.get(Player, 1).elo_rating == 1020
+
+    # Recomputing an old season leaves the displayed rating to the current one
+    processor.recompute_season(1)
+    assert [(r[0], r[1]) for r in _ratings(SessionLocal, 1)] == [(1, 1020), (2, 980)]
+    with pytest.raises(ValueError):
+        processor.recompute_season(99)
+
+
+def test_displayed_rating_follows_the_running_season_not_a_scheduled_one(sqlite_db):
+    SessionLocal, _ = _setup(sqlite_db, seasons=((1, "Season 1", T0), (2, "Season 2", T0 + timedelta(days=30))))
+    with SessionLocal() as session:
+        session.add(Match(id=1, status=MatchStatus.finished, ended_at=T0 + timedelta(days=1)))
+        session.add(MatchParticipant(match_id=1, player_id=1, team=0, result=ParticipantResult.win))
+        session.add(MatchParticipant(match_id=1, player_id=2, team=1, result=ParticipantResult.loss))
+        session.commit()
+
+    # Season 2 is already scheduled, but season 1 is the one being played
+    processor = RatingProcessor(SessionLocal, clock=Clock(T0 + timedelta(days=2)))
+    assert processor.drain() == 1
+    with SessionLocal() as session:
+        assert (session.get(Player, 1).elo_rating, session.get(Player, 2).elo_rating) == (1020, 980)
+        session.get(Player, 1).elo_rating = 1000
+        session.commit()
+
+    processor.recompute_season(1)
+    with SessionLocal() as session:
+        assert session.get(Player, 1).elo_rating == 1020
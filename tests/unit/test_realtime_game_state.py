@@ -0,0 +1,160 @@
+"""
+Unit tests for the realtime GameStateHandler running matches on the game engine
+A scripted match is replayed through the handler's websocket message entry point
+"""
+
+import os
+import sys
+import asyncio
+from datetime import datetime, timezone
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+for path in (os.path.join(ROOT, 'services', 'realtime'), os.path.join(ROOT, 'services', 'api')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from conftest import FakeConnections
+from handlers import game_state as game_state_module
+from handlers.game_state import GameStateHandler
+from shared.models.base import Admin, Match, MatchParticipant, MatchStatus, ParticipantResult, Player
+from shared.models.tournaments import (
+    Tournament, TournamentMatch, TournamentParticipant, TournamentStatus, TournamentType
+)
+
+TABLES = ("matches", "match_participants")
+
+
+def _setup(sqlite_db, monkeypatch):
+    _, SessionLocal, statements = sqlite_db(*TABLES)
+    with SessionLocal() as session:
+        session.add(Match(id=7, status=MatchStatus.queued))
+        # Seats follow the team, not the insert order
+        session.add(MatchParticipant(match_id=7, player_id=22, team=1))
+        session.add(MatchParticipant(match_id=7, player_id=11, team=0))
+        session.commit()
+    monkeypatch.setattr(game_state_module, "SessionLocal", SessionLocal)
+    return SessionLocal, statements
+
+
+def _card(card_id, category, energy=0, **extra):
+    return {'id': card_id, 'name': card_id.title(), 'category': category, 'energy_cost': energy, **extra}
+
+
+def test_scripted_match_replays_on_the_engine_without_database_round_trips(sqlite_db, monkeypatch):
+    SessionLocal, statements = _setup(sqlite_db, monkeypatch)
+    connections = FakeConnections()
+    handler = GameStateHandler(connections)
+
+    async def send(user_id, message):
+        await handler.handle_message({'match_id': '7', **message}, f"conn_{user_id}", {'user_id': user_id})
+
+    async def scripted_match():
+        await send(11, {'type': 'match.ready'})
+        assert connections.last('conn_11', 'match.ready_ack')['ready_players'] == 1
+        await send(22, {'type': 'match.ready'})
+
+        start = connections.last('conn_22', 'match.start')
+        assert start['players']['0']['player_id'] == 11 and start['players']['1']['player_id'] == 22
+        state = handler.active_matches['7']
+        state.players['0'].hand.extend([_card('whelp', 'CREATURE', health=5, attack=2)])
+        state.players['1'].hand.extend([_card('golem', 'CREATURE', energy=2, health=6),
+                                        _card('bolt', 'ACTION_SLOW', abilities=[
+                                            {'name': 'deal_damage', 'parameters': {'amount': 3, 'target_type': 'enemy'}}])])
+        state.rules['max_turns'] = 2
+        loaded = len(statements)
+
+        # Turn 1 belongs to seat 0 and nothing is playable before the main phase
+        await send(22, {'type': 'card.play', 'card_id': 'golem'})
+        assert connections.last('conn_22', 'error')['message'] == "Not your turn"
+        await send(11, {'type': 'card.play', 'card_id': 'whelp'})
+        assert connections.last('conn_11', 'error')['message'] == "No play window active"
+
+        await handler._handle_phase_timeout('7')  # start -> main
+        await send(11, {'type': 'card.play', 'card_id': 'whelp'})
+        assert connections.last('conn_11', 'card.play_result')['success'] is True
+        played = connections.last('conn_22', 'card.played')
+        assert played['player_team'] == 0 and played['result']['effect_result']['placement']['type'] == 'summon'
+
+        for _ in range(4):  # main -> attack -> end -> start (turn 2, seat 1) -> main
+            await handler._handle_phase_timeout('7')
+        assert connections.last('conn_11', 'state.apply')['patch']['current_player'] == 1
+
+        # Turn 2 grants seat 1 two energy, exactly the golem's cost
+        await send(22, {'type': 'card.play', 'card_id': 'golem'})
+        await send(22, {'type': 'card.play', 'card_id': 'bolt'})
+        bolt = connections.last('conn_22', 'card.play_result')['result']['effect_result']['ability_results'][0]
+        assert bolt['damage_dealt'] == 3
+        assert state.players['0'].battlefield[0]['health'] == 2
+
+        await send(11, {'type': 'sync.request'})
+        snapshot = connections.last('conn_11', 'sync.snapshot')
+        assert snapshot['seq'] == state.sequence and snapshot['full_state']['players']['1']['battlefield'][0]['name'] == 'Golem'
+        assert len(statements) == loaded  # Plays, phases and syncs never hit the database
+
+        for _ in range(4):  # Turn 3 passes the two-turn limit with both players on 20 health
+            await handler._handle_phase_timeout('7')
+        return connections.last('conn_11', 'match.end')
+
+    end = asyncio.run(scripted_match())
+
+    assert end['result']['condition'] == 'draw'
+    assert '7' not in handler.active_matches and '7' not in handler.match_participants
+    with SessionLocal() as session:
+        assert session.get(Match, 7).status == MatchStatus.finished
+        # Results are recorded for the rating processor to pick up
+        assert {p.result for p in session.query(MatchParticipant).filter_by(match_id=7)} == {ParticipantResult.draw}
+
+
+def test_outsiders_are_rejected_from_the_cached_participant_map(sqlite_db, monkeypatch):
+    _, statements = _setup(sqlite_db, monkeypatch)
+    connections = FakeConnections()
+    handler = GameStateHandler(connections)
+
+    async def scenario():
+        await handler.handle_message({'type': 'match.ready', 'match_id': '7'}, 'conn_11', {'user_id': 11})
+        loaded = len(statements)
+        await handler.handle_message({'type': 'match.ready', 'match_id': '7'}, 'conn_99', {'user_id': 99})
+        await handler.handle_message({'type': 'card.play', 'match_id': '7', 'card_id': 'x'}, 'conn_99', {'user_id': 99})
+        return loaded
+
+    loaded = asyncio.run(scenario())
+    assert [m['error_code'] for m in connections.sent['conn_99']] == ['not_in_match', 'not_in_match']
+    assert len(statements) == loaded
+    assert connections.match_connections == {'7': ['conn_11']}
+
+
+def test_finished_tournament_matches_advance_the_bracket(sqlite_db, monkeypatch):
+    _, SessionLocal, _ = sqlite_db(*TABLES, "players", "admins", "tournaments", "tournament_participants",
+                                   "tournament_matches")
+    now = datetime.now(timezone.utc)
+    with SessionLocal() as session:
+        session.add(Admin(id=1, username="admin", email="admin@example.com", password_hash="x"))
+        session.add_all([Player(id=i, email=f"player{i}@example.com") for i in (11, 22)])
+        session.add(Tournament(id=1, name="Cup", tournament_type=TournamentType.SINGLE_ELIMINATION,
+                               status=TournamentStatus.IN_PROGRESS, max_participants=2, registration_start=now,
+                               registration_end=now, start_time=now, created_by_admin_id=1))
+        session.flush()
+        session.add_all([TournamentParticipant(tournament_id=1, player_id=i) for i in (11, 22)])
+        for match_id in (7, 8):
+            session.add(Match(id=match_id, status=MatchStatus.active))
+            session.add_all([MatchParticipant(match_id=match_id, player_id=11, team=0),
+                             MatchParticipant(match_id=match_id, player_id=22, team=1)])
+        session.add(TournamentMatch(tournament_id=1, round_number=1, match_number=1, player1_id=11,
+                                    player2_id=22, match_id=7, scheduled_at=now))
+        session.commit()
+    monkeypatch.setattr(game_state_module, "SessionLocal", SessionLocal)
+    handler = GameStateHandler(FakeConnections())
+
+    # An elimination draw still saves the match; the bracket keeps it open for a replay
+    handler._mark_match_finished('7', {'winner': None, 'condition': 'turn_limit'})
+    with SessionLocal() as session:
+        assert session.get(Match, 7).status == MatchStatus.finished
+        assert {p.result for p in session.query(MatchParticipant).filter_by(match_id=7)} == {ParticipantResult.draw}
+        assert session.query(TournamentMatch).one().completed_at is None
+        session.query(TournamentMatch).one().match_id = 8  # The replay
+        session.commit()
+
+    handler._mark_match_finished('8', {'winner': 1, 'condition': 'hero_defeated'})
+    with SessionLocal() as session:
+        tournament_match = session.query(TournamentMatch).one()
+        assert tournament_match.winner_id == 22 and tournament_match.completed_at is not None
@@ -0,0 +1,192 @@
+"""
+Response cache tests
+Invalidation correctness, conditional GETs and single-flight rendering for the public CMS routes
+"""
+
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'services/api'))
+
+import pytest
+from flask import Flask
+
+from shared.models.base import Admin
+from shared.models.cms import ContentStatus, ContentType, NewsArticle, VideoContent, VideoPlatform, VideoType
+from shared.services import response_cache
+from shared.services.response_cache import CMS_NEWS, CMS_VIDEOS, ResponseCache, invalidate_responses
+from routes import cms_public
+
+
+@pytest.fixture
+def client(monkeypatch, sqlite_db):
+    _, SessionLocal, statements = sqlite_db('admins', 'news_articles', 'video_content')
+    with SessionLocal() as session:
+        session.add(Admin(id=1, username="editor", email="editor@deckport.ai", password_hash="x"))
+        session.add(NewsArticle(id=1, title="Launch", slug="launch", content="...", content_type=ContentType.news,
+                                status=ContentStatus.published, is_featured=True, author_admin_id=1))
+        session.add(VideoContent(id=1, title="Tutorial", slug="tutorial", video_type=VideoType.tutorial,
+                                 platform=VideoPlatform.youtube, video_url="https://example.com/v",
+                                 status=ContentStatus.published, is_featured=True, author_admin_id=1))
+        session.commit()
+
+    monkeypatch.setattr(cms_public, 'SessionLocal', SessionLocal)
+    monkeypatch.setattr(response_cache, '_response_cache', ResponseCache())
+
+    app = Flask(__name__)
+    app.register_blueprint(cms_public.cms_public_bp)
+    client = app.test_client()
+    client.SessionLocal = SessionLocal
+    client.statements = statements
+    return client
+
+
+def _titles(response):
+    return [article['title'] for article in response.get_json()['articles']]
+
+
+def _publish(SessionLocal, article_id, title):
+    with SessionLocal() as session:
+        session.add(NewsArticle(id=article_id, title=title, slug=title.lower(), content="...",
+                                content_type=ContentType.news, status=ContentStatus.published, author_admin_id=1))
+        session.commit()
+
+
+def test_cached_until_namespace_is_invalidated(client):
+    first = client.get('/v1/cms/news?page=1&page_size=10')
+    assert first.headers['X-Cache'] == 'MISS' and _titles(first) == ['Launch']
+
+    # Same args in another order share the entry and run no queries
+    before = len(client.statements)
+    second = client.get('/v1/cms/news?page_size=10&page=1')
+    assert second.headers['X-Cache'] == 'HIT' and len(client.statements) == before
+    assert second.headers['ETag'] == first.headers['ETag']
+
+    _publish(client.SessionLocal, 2, "Patch")
+    assert _titles(client.get('/v1/cms/news?page=1&page_size=10')) == ['Launch']
+
+    invalidate_responses(CMS_NEWS)
+    fresh = client.get('/v1/cms/news?page=1&page_size=10')
+    assert fresh.headers['X-Cache'] == 'MISS' and sorted(_titles(fresh)) == ['Launch', 'Patch']
+    assert fresh.headers['ETag'] != first.headers['ETag']
+
+
+def test_featured_depends_on_both_namespaces(client):
+    client.get('/v1/cms/featured')
+    client.get('/v1/cms/videos')
+
+    invalidate_responses(CMS_NEWS)
+    assert client.get('/v1/cms/featured').headers['X-Cache'] == 'MISS'
+    assert client.get('/v1/cms/videos').headers['X-Cache'] == 'HIT'
+
+    invalidate_responses(CMS_VIDEOS)
+    assert client.get('/v1/cms/featured').headers['X-Cache'] == 'MISS'
+    assert client.get('/v1/cms/videos').headers['X-Cache'] == 'MISS'
+
+
+def test_conditional_get_returns_304_until_content_changes(client):
+    first = client.get('/v1/cms/news')
+    etag, last_modified = first.headers['ETag'], first.headers['Last-Modified']
+
+    not_modified = client.get('/v1/cms/news', headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304 and not_modified.data == b''
+    assert client.get('/v1/cms/news', headers={'If-Modified-Since': last_modified}).status_code == 304
+    assert client.get('/v1/cms/news', headers={'If-None-Match': '"stale"'}).status_code == 200
+
+    _publish(client.SessionLocal, 2, "Patch")
+    invalidate_responses(CMS_NEWS)
+    changed = client.get('/v1/cms/news', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and 'Patch' in _titles(changed)
+    assert response_cache.get_response_cache().stats()['not_modified'] == 2
+
+
+def test_errors_are_not_cached(client, monkeypatch):
+    def broken_session():
+        raise RuntimeError("database down")
+
+    healthy = cms_public.SessionLocal
+    monkeypatch.setattr(cms_public, 'SessionLocal', broken_session)
+    assert client.get('/v1/cms/news').status_code == 500
+
+    monkeypatch.setattr(cms_public, 'SessionLocal', healthy)
+    response = client.get('/v1/cms/news')
+    assert response.status_code == 200 and response.headers['X-Cache'] == 'MISS'
+
+
+def test_viewer_ip_ignores_client_supplied_forwarded_hops(monkeypatch):
+    app = Flask(__name__)
+    environ = {'REMOTE_ADDR': '10.0.0.5'}
+    with app.test_request_context(headers={'X-Forwarded-For': '1.2.3.4, 203.0.113.7'}, environ_base=environ):
+        assert cms_public.viewer_ip() == '203.0.113.7'  # Appended by our proxy; 1.2.3.4 came from the client
+    with app.test_request_context(headers={'X-Forwarded-For': 'spoofed'}, environ_base=environ):
+        assert cms_public.viewer_ip() == '10.0.0.5'
+    with app.test_request_context(environ_base=environ):
+        assert cms_public.viewer_ip() == '10.0.0.5'
+
+    monkeypatch.setattr(cms_public, 'TRUSTED_PROXY_HOPS', 0)  # Served directly
+    with app.test_request_context(headers={'X-Forwarded-For': '203.0.113.7'}, environ_base=environ):
+        assert cms_public.viewer_ip() == '10.0.0.5'
+
+
+def test_single_flight_renders_cold_key_once():
+    cache = ResponseCache()
+    renders = []
+    release = threading.Event()
+
+    def render():
+        renders.append(1)
+        release.wait(5)
+        return b'{"articles": []}'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_render("/news?", [CMS_NEWS], render)))
+               for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(renders) == 1
+    assert sorted(outcome for _, outcome in results) == ['coalesced'] * 19 + ['miss']
+    stats = cache.stats()
+    assert stats['misses'] == 1 and stats['coalesced'] == 19 and stats['hit_ratio'] == 0.95
+
+
+def test_invalidation_during_render_is_not_lost():
+    cache = ResponseCache()
+    started, release = threading.Event(), threading.Event()
+
+    def slow_render():
+        started.set()
+        release.wait(5)
+        return b'old'
+
+    leader = threading.Thread(target=lambda: cache.get_or_render("/news?", [CMS_NEWS], slow_render))
+    leader.start()
+    started.wait(5)
+
+    # Content changes while the old body is being rendered
+    cache.invalidate(CMS_NEWS)
+    late, outcome = cache.get_or_render("/news?", [CMS_NEWS], lambda: b'new')
+    assert (late.body, outcome) == (b'new', 'miss')
+
+    release.set()
+    leader.join()
+    cached, outcome = cache.get_or_render("/news?", [CMS_NEWS], lambda: b'unexpected')
+    assert (cached.body, outcome) == (b'new', 'hit')
+
+
+def test_entries_expire_after_ttl():
+    now = [0.0]
+    cache = ResponseCache(ttl_seconds=60, clock=lambda: now[0])
+    cache.get_or_render("/videos?", [CMS_VIDEOS], lambda: b'v1')
+    now[0] = 59
+    assert cache.get_or_render("/videos?", [CMS_VIDEOS], lambda: b'v2')[0].body == b'v1'
+    now[0] = 61
+    assert cache.get_or_render("/videos?", [CMS_VIDEOS], lambda: b'v2')[0].body == b'v2'
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Security event sink tests
+Batching thresholds, spill-to-file on DB outage and recovery after a crash
+"""
+
+import os
+import sys
+import time
+import subprocess
+import textwrap
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, ROOT)
+
+from shared.security.security_event_sink import SecurityEventSink
+
+
+class FakeDatabase:
+    """Stand-in writer that records batches and can be taken offline"""
+
+    def __init__(self):
+        self.batches = []
+        self.available = True
+
+    def __call__(self, events):
+        if not self.available:
+            raise ConnectionError("database unavailable")
+        self.batches.append(list(events))
+
+    @property
+    def event_ids(self):
+        return [e['event_id'] for batch in self.batches for e in batch]
+
+
+def event(i):
+    return {'nfc_card_id': i, 'event_type': 'auth_success', 'severity': 'info', 'error_details': {'n': i}}
+
+
+def test_flushes_in_multi_row_batches(tmp_path):
+    db = FakeDatabase()
+    sink = SecurityEventSink(writer=db, spool_dir=str(tmp_path), batch_size=10)
+    for i in range(25):
+        sink.emit(event(i))
+
+    assert [len(b) for b in db.batches] == [10, 10]
+    sink.close()
+    assert [len(b) for b in db.batches] == [10, 10, 5]
+    assert os.listdir(tmp_path) == []
+
+
+def test_time_threshold_flush(tmp_path):
+    db = FakeDatabase()
+    sink = SecurityEventSink(writer=db, spool_dir=str(tmp_path), batch_size=1000, flush_interval=0.05)
+    sink.start()
+    for i in range(3):
+        sink.emit(event(i))
+
+    deadline = time.time() + 2
+    while not db.batches and time.time() < deadline:
+        time.sleep(0.01)
+    sink.close()
+    assert len(db.event_ids) == 3
+
+
+def test_spills_while_database_down_and_replays(tmp_path):
+    db = FakeDatabase()
+    sink = SecurityEventSink(writer=db, spool_dir=str(tmp_path), batch_size=1000)
+    db.available = False
+    for i in range(50):
+        sink.emit(event(i))
+    assert sink.flush() == 0
+    assert any(name.startswith('spill-') for name in os.listdir(tmp_path))
+
+    db.available = True
+    sink.emit(event(50))
+    sink.flush()
+    sink.close()
+
+    assert sorted(e['nfc_card_id'] for b in db.batches for e in b) == list(range(51))
+    assert len(set(db.event_ids)) == 51
+    assert os.listdir(tmp_path) == []
+
+
+def test_no_events_lost_after_crash_and_restart(tmp_path):
+    # Emit from a separate process and kill it before anything is flushed
+    crash = textwrap.dedent(f"""
+        import os, sys
+        sys.path.insert(0, {ROOT!r})
+        from shared.security.security_event_sink import SecurityEventSink
+        sink = SecurityEventSink(writer=lambda events: None, spool_dir={str(tmp_path)!r}, batch_size=10**6)
+        for i in range(500):
+            sink.emit({{'nfc_card_id': i, 'event_type': 'auth_success'}})
+        os._exit(9)
+    """)
+    assert subprocess.run([sys.executable, '-c', crash]).returncode == 9
+
+    db = FakeDatabase()
+    sink = SecurityEventSink(writer=db, spool_dir=str(tmp_path))
+    sink.start()
+    sink.close()
+
+    assert sorted(e['nfc_card_id'] for b in db.batches for e in b) == list(range(500))
+    assert os.listdir(tmp_path) == []
+
+
+def test_torn_journal_line_is_skipped(tmp_path):
+    abandoned = SecurityEventSink(writer=FakeDatabase(), spool_dir=str(tmp_path), batch_size=1000)
+    abandoned.emit(event(1))
+    with open(abandoned._segment_path, 'a') as f:
+        f.write('{"nfc_card_id": 2, "event_ty')
+
+    db = FakeDatabase()
+    recovered = SecurityEventSink(writer=db, spool_dir=str(tmp_path))
+    recovered.start()
+    recovered.close()
+    assert [e['nfc_card_id'] for b in db.batches for e in b] == [1]
@@ -0,0 +1,256 @@
+"""
+Unit tests for the Stripe webhook inbox
+Replays duplicated and out-of-order deliveries from a local Stripe stand-in
+against in-memory SQLite
+"""
+
+import json
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+
+from shared.models.base import Player
+from shared.models.shop import (
+    ShopCheckoutSession, ShopInventoryLog, ShopInventoryReservation, ShopOrder, ShopOrderItem, ShopProduct
+)
+from shared.models.stripe_webhooks import StripeWebhookEvent
+from shared.models.tournaments import PlayerWallet
+from shared.services import inventory_reservations, wallet_ledger
+from shared.services.stripe_webhook_inbox import (
+    FAILED, HANDLERS, PENDING, PROCESSED, SKIPPED, WebhookError, WebhookInbox, WebhookSignatureError,
+    sign_payload, verify_signature
+)
+
+TABLES = ('players', 'player_wallets', 'wallet_ledger_entries', 'wallet_ledger_postings', 'wallet_daily_totals',
+          'shop_products', 'shop_orders', 'shop_order_items', 'shop_checkout_sessions', 'shop_inventory_logs',
+          'shop_inventory_reservations', 'stripe_webhook_events')
+SECRET = "whsec_test"
+T0 = datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+class Clock:
+    def __init__(self):
+        self.now = T0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeStripe:
+    """Builds signed events the way Stripe sends them; delivery order is up to the test"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.sequence = 0
+
+    def event(self, event_type, obj, created=None):
+        self.sequence += 1
+        return json.dumps({
+            "id": f"evt_{self.sequence:04d}", "object": "event", "type": event_type,
+            "created": int((created or self.clock()).timestamp()), "data": {"object": obj}
+        }).encode()
+
+    def deliver(self, inbox, payload):
+        return inbox.ingest(payload, sign_payload(payload, SECRET, int(self.clock().timestamp())))
+
+
+@pytest.fixture
+def shop(sqlite_db):
+    _, SessionLocal, _ = sqlite_db(*TABLES)
+    with SessionLocal() as session:
+        session.add(Player(id=1, email="buyer@example.com"))
+        session.add(ShopProduct(id=1, sku="DROP-001", name="Founders pack", product_type="card_pack",
+                                price=Decimal("20.00"), stock_quantity=10))
+        session.flush()
+        wallet = wallet_ledger.get_or_create_wallet(session, 1)
+        session.flush()
+        session.add(ShopOrder(id=1, order_number="DP-0001", customer_id=1, subtotal=Decimal("40.00"),
+                              total_amount=Decimal("40.00"), payment_method="stripe", payment_reference="pi_order",
+                              order_status="pending", payment_status="pending"))
+        session.add(ShopOrderItem(order_id=1, product_id=1, quantity=2, unit_price=Decimal("20.00"),
+                                  total_price=Decimal("40.00"), product_name="Founders pack", product_sku="DROP-001"))
+        session.add(ShopCheckoutSession(session_id="cs_1", session_data={}, session_hash="x",
+                                        expires_at=T0 + timedelta(minutes=30)))
+        session.commit()
+        wallet_id = wallet.id
+
+    clock = Clock()
+    inbox = WebhookInbox(session_factory=SessionLocal, secret=SECRET, clock=clock)
+    return inbox, FakeStripe(clock), SessionLocal, wallet_id
+
+
+def _intent(intent_id, **metadata):
+    return {"id": intent_id, "object": "payment_intent", "amount": 2500, "amount_received": 2500,
+            "metadata": metadata}
+
+
+def _order(SessionLocal):
+    with SessionLocal() as session:
+        order = session.get(ShopOrder, 1)
+        return order.order_status, order.payment_status, session.get(ShopProduct, 1).stock_quantity
+
+
+def _statuses(SessionLocal):
+    with SessionLocal() as session:
+        return {e.event_id: e.status for e in session.query(StripeWebhookEvent)}
+
+
+def test_signature_verification():
+    payload = b'{"id": "evt_1", "type": "x", "created": 1, "data": {"object": {}}}'
+    now = datetime.fromtimestamp(1000, tz=timezone.utc)
+    assert verify_signature(payload, sign_payload(payload, SECRET, 1000), SECRET, now=now)["id"] == "evt_1"
+    with pytest.raises(WebhookSignatureError):
+        verify_signature(payload, sign_payload(payload, "whsec_other", 1000), SECRET, now=now)
+    with pytest.raises(WebhookSignatureError):
+        verify_signature(payload + b" ", sign_payload(payload, SECRET, 1000), SECRET, now=now)
+    with pytest.raises(WebhookSignatureError):
+        verify_signature(payload, sign_payload(payload, SECRET, 1000), SECRET, now=now + timedelta(minutes=6))
+    with pytest.raises(WebhookError):
+        verify_signature(b'{"id": "evt_1"}', sign_payload(b'{"id": "evt_1"}', SECRET, 1000), SECRET, now=now)
+
+
+def test_duplicate_deliveries_credit_once(shop):
+    inbox, stripe, SessionLocal, wallet_id = shop
+    payload = stripe.event("payment_intent.succeeded", _intent("pi_dep", type="wallet_deposit", wallet_id=str(wallet_id)))
+    assert stripe.deliver(inbox, payload) == ("evt_0001", True)
+    assert stripe.deliver(inbox, payload) == ("evt_0001", False)
+    inbox.drain()
+    stripe.deliver(inbox, payload)  # Redelivered after it was applied
+    inbox.drain()
+
+    with SessionLocal() as session:
+        assert session.get(PlayerWallet, wallet_id).balance == Decimal("25.00")
+        assert session.query(StripeWebhookEvent).count() == 1
+    assert inbox.stats()['processed'] == 1 and inbox.stats()['duplicates'] == 2
+
+
+def test_payment_failure_fails_order_and_releases_stock_once(shop):
+    inbox, stripe, SessionLocal, _ = shop
+    with SessionLocal() as session:
+        inventory_reservations.reserve(session, "cs_1", {1: 3}, now=T0)
+        session.commit()
+    failed = stripe.event("payment_intent.payment_failed", _intent("pi_order", session_id="cs_1"))
+    stripe.deliver(inbox, failed)
+    stripe.deliver(inbox, failed)
+    inbox.drain()
+
+    assert _order(SessionLocal) == ("failed", "failed", 12)
+    with SessionLocal() as session:
+        logs = session.query(ShopInventoryLog).order_by(ShopInventoryLog.id).all()
+        assert [(log.change_type, log.quantity_change) for log in logs] == \
+            [("reservation", -3), ("release", 2), ("release", 3)]
+        assert session.query(ShopInventoryReservation).one().status == inventory_reservations.RELEASED
+        assert not session.query(ShopCheckoutSession).one().is_used
+
+
+def test_paid_checkout_becomes_an_order_without_the_client(shop):
+    inbox, stripe, SessionLocal, _ = shop
+    with SessionLocal() as session:
+        inventory_reservations.reserve(session, "cs_paid", {1: 3}, expires_at=T0 + timedelta(minutes=15), now=T0)
+        session.add(ShopCheckoutSession(session_id="cs_paid", session_hash="x", expires_at=T0 + timedelta(minutes=15),
+                                        session_data={
+            'items': [{'product_id': 1, 'product_sku': "DROP-001", 'product_name': "Founders pack", 'quantity': 3,
+                       'unit_price': 20.0, 'total_price': 60.0}],
+            'subtotal': 60.0, 'tax_amount': 4.8, 'shipping_amount': 0.0, 'total_amount': 64.8, 'currency': "USD",
+            'customer_id': 1, 'stripe_payment_intent_id': "pi_cs"}))
+        session.commit()
+
+    # The customer paid and closed the tab; /checkout/process is never called
+    stripe.deliver(inbox, stripe.event("payment_intent.succeeded", _intent("pi_cs", session_id="cs_paid")))
+    stripe.deliver(inbox, stripe.event("payment_intent.succeeded", _intent("pi_cs", session_id="cs_paid")))
+    inbox.drain()
+    sweeper = inventory_reservations.ReservationSweeper(session_factory=SessionLocal,
+                                                        clock=lambda: T0 + timedelta(hours=1))
+    assert sweeper.run_once() == 0
+
+    with SessionLocal() as session:
+        order = session.query(ShopOrder).filter(ShopOrder.payment_reference == "pi_cs").one()
+        assert (order.order_status, order.payment_status, order.customer_id, order.total_amount) == \
+            ("processing", "paid", 1, Decimal("64.80"))
+        assert [(item.product_id, item.quantity) for item in session.query(ShopOrderItem).filter(
+            ShopOrderItem.order_id == order.id)] == [(1, 3)]
+        reservation = session.query(ShopInventoryReservation).one()
+        assert (reservation.status, reservation.order_id) == (inventory_reservations.CONVERTED, order.id)
+        assert session.get(ShopProduct, 1).stock_quantity == 7
+        assert session.query(ShopCheckoutSession).filter(ShopCheckoutSession.session_id == "cs_paid").one().is_used
+    assert set(_statuses(SessionLocal).values()) == {PROCESSED}
+
+
+def test_stale_failure_delivered_after_success_is_skipped(shop):
+    inbox, stripe, SessionLocal, _ = shop
+    failed = stripe.event("payment_intent.payment_failed", _intent("pi_order"), created=T0 - timedelta(minutes=2))
+    succeeded = stripe.event("payment_intent.succeeded", _intent("pi_order"), created=T0 - timedelta(minutes=1))
+
+    stripe.deliver(inbox, succeeded)
+    inbox.drain()
+    stripe.deliver(inbox, failed)
+    inbox.drain()
+    assert _order(SessionLocal) == ("processing", "paid", 10)
+    assert _statuses(SessionLocal) == {"evt_0001": SKIPPED, "evt_0002": PROCESSED}
+
+
+def test_queued_events_apply_in_creation_order(shop):
+    inbox, stripe, SessionLocal, _ = shop
+    failed = stripe.event("payment_intent.payment_failed", _intent("pi_order"), created=T0 - timedelta(minutes=2))
+    succeeded = stripe.event("payment_intent.succeeded", _intent("pi_order"), created=T0 - timedelta(minutes=1))
+
+    # Delivered newest first; the first attempt failed, the retry with another card succeeded
+    stripe.deliver(inbox, succeeded)
+    stripe.deliver(inbox, failed)
+    assert [row.event_id for row in inbox.claim()] == ["evt_0001"]  # The success waits behind the older failure
+    inbox.clock.now += timedelta(seconds=121)  # Lease of the abandoned claim runs out
+    inbox.drain()
+
+    assert _order(SessionLocal) == ("processing", "paid", 10)
+    with SessionLocal() as session:
+        assert [log.change_type for log in session.query(ShopInventoryLog).order_by(ShopInventoryLog.id)] == \
+            ["release", "sale"]
+
+
+def test_payment_after_release_without_stock_is_flagged(shop):
+    inbox, stripe, SessionLocal, _ = shop
+    stripe.deliver(inbox, stripe.event("payment_intent.payment_failed", _intent("pi_order"), created=T0 - timedelta(minutes=2)))
+    inbox.drain()
+    with SessionLocal() as session:
+        session.get(ShopProduct, 1).stock_quantity = 1  # Released units sold to someone else
+        session.commit()
+
+    stripe.deliver(inbox, stripe.event("payment_intent.succeeded", _intent("pi_order")))
+    inbox.drain()
+    assert _order(SessionLocal) == ("failed", "paid", 1)
+    with SessionLocal() as session:
+        assert "refund or fulfil manually" in session.get(ShopOrder, 1).admin_notes
+        assert session.query(ShopInventoryLog).count() == 1
+
+
+def test_failures_retry_with_backoff_and_block_the_object(shop):
+    inbox, stripe, SessionLocal, _ = shop
+    calls = []
+
+    def flaky(session, event, now):
+        calls.append(event["id"])
+        if len(calls) == 1:
+            raise RuntimeError("database hiccup")
+        return HANDLERS["payment_intent.succeeded"](session, event, now)
+
+    inbox.handlers = {**HANDLERS, "payment_intent.succeeded": flaky}
+    inbox.max_attempts = 2
+    stripe.deliver(inbox, stripe.event("payment_intent.succeeded", _intent("pi_order"), created=T0 - timedelta(minutes=1)))
+    stripe.deliver(inbox, stripe.event("payment_intent.canceled", _intent("pi_order")))
+    inbox.drain()
+    assert _statuses(SessionLocal) == {"evt_0001": PENDING, "evt_0002": PENDING}
+    assert _order(SessionLocal) == ("pending", "pending", 10)
+
+    inbox.clock.now += timedelta(seconds=31)
+    inbox.drain()
+    assert calls == ["evt_0001", "evt_0001"]
+    assert _statuses(SessionLocal) == {"evt_0001": PROCESSED, "evt_0002": PROCESSED}
+    assert _order(SessionLocal) == ("processing", "paid", 10)  # Cancel after payment changes nothing
+
+    inbox.handlers = {"payment_intent.succeeded": lambda session, event, now: 1 / 0}
+    stripe.deliver(inbox, stripe.event("payment_intent.succeeded", _intent("pi_other")))
+    for _ in range(2):
+        inbox.drain()
+        inbox.clock.now += timedelta(minutes=5)
+    assert _statuses(SessionLocal)["evt_0003"] == FAILED
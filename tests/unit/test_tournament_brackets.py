@@ -0,0 +1,191 @@
+"""
+Unit tests for the tournament bracket engine
+Pairing logic is tested directly; full tournaments run against in-memory SQLite
+"""
+
+import random
+from collections import Counter
+from datetime import datetime, timezone
+
+import pytest
+
+from shared.models.base import Player, Admin, Match, MatchParticipant
+from shared.models.tournaments import (
+    Tournament, TournamentParticipant, TournamentMatch, TournamentStatus, TournamentType
+)
+from shared.services.tournament_brackets import (
+    BracketError, Entrant, EliminationBracket, SwissPairer, TournamentBracketService,
+    bracket_seed_order, pair_without_rematches, LOSERS
+)
+
+TABLES = (
+    'players', 'admins', 'matches', 'match_participants',
+    'tournaments', 'tournament_participants', 'tournament_matches'
+)
+
+
+def _create_tournament(SessionLocal, tournament_type, player_count, settings=None):
+    now = datetime.now(timezone.utc)
+    with SessionLocal() as session:
+        session.add(Admin(id=1, username="admin", email="admin@example.com", password_hash="x"))
+        session.add_all([
+            Player(id=i, email=f"player{i}@example.com", elo_rating=1000 + i * 10)
+            for i in range(1, player_count + 1)
+        ])
+        session.add(Tournament(
+            id=1, name="Test Cup", tournament_type=tournament_type, status=TournamentStatus.IN_PROGRESS,
+            max_participants=player_count, registration_start=now, registration_end=now, start_time=now,
+            created_by_admin_id=1, tournament_settings=settings
+        ))
+        session.flush()
+        session.add_all([
+            TournamentParticipant(tournament_id=1, player_id=i) for i in range(1, player_count + 1)
+        ])
+        session.commit()
+
+
+def _play_out(SessionLocal, service, pick_winner, max_rounds=50):
+    """Start the tournament and report every open match until it completes"""
+    with SessionLocal() as session:
+        service.start(session, session.get(Tournament, 1))
+        session.commit()
+
+    for _ in range(max_rounds):
+        with SessionLocal() as session:
+            if session.get(Tournament, 1).status == TournamentStatus.COMPLETED:
+                return
+            open_matches = session.query(TournamentMatch).filter(
+                TournamentMatch.completed_at.is_(None)
+            ).all()
+            assert open_matches, "tournament stalled with no open matches"
+            for tournament_match in open_matches:
+                service.record_result(session, tournament_match, pick_winner(tournament_match))
+            session.commit()
+    pytest.fail("tournament did not complete")
+
+
+def _higher_seed_wins(tournament_match):
+    # Player ids double as ELO order in these fixtures
+    return max(tournament_match.player1_id, tournament_match.player2_id)
+
+
+def test_bracket_seed_order_keeps_top_seeds_apart():
+    assert bracket_seed_order(8) == [1, 8, 4, 5, 2, 7, 3, 6]
+    order = bracket_seed_order(64)
+    assert sorted(order) == list(range(1, 65))
+    # Seeds 1 and 2 can only meet in the final
+    assert order.index(1) < 32 <= order.index(2)
+
+
+def test_pair_without_rematches_backtracks():
+    # Greedy pairing 1-2 would leave 3-4, which already played
+    pairs = pair_without_rematches([1, 2, 3, 4], {(3, 4), (1, 3)})
+    assert sorted(pairs) == [(1, 4), (2, 3)]
+    assert pair_without_rematches([1, 2], {(1, 2)}) is None
+
+
+def test_swiss_round_gives_bye_to_lowest_ranked_player():
+    entrants = [Entrant(player_id=i, elo=1000 + i, seed=6 - i) for i in range(1, 6)]
+    pairings = SwissPairer().pair_round(entrants, [])
+    byes = [p for p in pairings if p.is_bye]
+    assert len(pairings) == 3 and len(byes) == 1
+    assert byes[0].player1_id == 1
+
+
+def test_single_elimination_first_round_byes_go_to_top_seeds():
+    entrants = [Entrant(player_id=i, elo=2000 - i, seed=i) for i in range(1, 7)]
+    pairings = EliminationBracket().first_round(entrants)
+    assert sorted(p.player1_id for p in pairings if p.is_bye) == [1, 2]
+    assert len([p for p in pairings if not p.is_bye]) == 2
+
+
+def test_swiss_tournament_has_no_rematches(sqlite_db):
+    _, SessionLocal, _ = sqlite_db(*TABLES)
+    _create_tournament(SessionLocal, TournamentType.SWISS, 9, settings={'swiss_rounds': 4})
+    rng = random.Random(7)
+    _play_out(SessionLocal, TournamentBracketService(),
+              lambda tm: rng.choice([tm.player1_id, tm.player2_id, None]))
+
+    with SessionLocal() as session:
+        matches = session.query(TournamentMatch).all()
+        assert max(m.round_number for m in matches) == 4
+        pairs = [frozenset((m.player1_id, m.player2_id)) for m in matches if not m.is_bye]
+        assert len(pairs) == len(set(pairs))
+        bye_players = [m.player1_id for m in matches if m.is_bye]
+        assert len(bye_players) == 4 and len(set(bye_players)) == 4
+
+        placements = sorted(p.final_placement for p in session.query(TournamentParticipant))
+        assert placements == list(range(1, 10))
+
+
+def test_single_elimination_crowns_top_seed(sqlite_db):
+    _, SessionLocal, _ = sqlite_db(*TABLES)
+    _create_tournament(SessionLocal, TournamentType.SINGLE_ELIMINATION, 11)
+    _play_out(SessionLocal, TournamentBracketService(), _higher_seed_wins)
+
+    with SessionLocal() as session:
+        tournament = session.get(Tournament, 1)
+        assert tournament.status == TournamentStatus.COMPLETED
+        placements = {p.player_id: p.final_placement for p in session.query(TournamentParticipant)}
+        assert placements[11] == 1 and placements[10] == 2
+        assert placements[9] == placements[8] == 3
+        # 11 players, bracket of 16: rounds of 8, 4, 2, 1 matches
+        rounds = Counter(m.round_number for m in session.query(TournamentMatch))
+        assert rounds == {1: 8, 2: 4, 3: 2, 4: 1}
+
+
+def test_double_elimination_needs_two_losses(sqlite_db):
+    _, SessionLocal, _ = sqlite_db(*TABLES)
+    _create_tournament(SessionLocal, TournamentType.DOUBLE_ELIMINATION, 8)
+    rng = random.Random(3)
+    _play_out(SessionLocal, TournamentBracketService(),
+              lambda tm: rng.choice([tm.player1_id, tm.player2_id]))
+
+    with SessionLocal() as session:
+        matches = session.query(TournamentMatch).filter(TournamentMatch.is_bye == False).all()
+        losses = Counter(
+            m.player2_id if m.winner_id == m.player1_id else m.player1_id for m in matches
+        )
+        champion = next(p.player_id for p in session.query(TournamentParticipant) if p.final_placement == 1)
+        assert losses[champion] <= 1
+        assert all(losses[player_id] == 2 for player_id in range(1, 9) if player_id != champion)
+        assert any(m.bracket == LOSERS for m in matches)
+
+
+def test_match_result_hook_advances_round(sqlite_db):
+    _, SessionLocal, _ = sqlite_db(*TABLES)
+    _create_tournament(SessionLocal, TournamentType.SINGLE_ELIMINATION, 4)
+    service = TournamentBracketService()
+
+    with SessionLocal() as session:
+        service.start(session, session.get(Tournament, 1))
+        session.commit()
+        assert session.query(Match).count() == 2
+        assert session.query(MatchParticipant).count() == 4
+
+    with SessionLocal() as session:
+        first, second = session.query(TournamentMatch).order_by(TournamentMatch.match_number).all()
+        assert service.record_match_result(session, first.match_id, 0)["advanced"] is False
+        assert service.record_match_result(session, second.match_id, 1)["advanced"] is True
+        session.commit()
+
+        final = session.query(TournamentMatch).filter(TournamentMatch.round_number == 2).one()
+        assert {final.player1_id, final.player2_id} == {first.player1_id, second.player2_id}
+        assert service.record_match_result(session, 9999, 0) is None
+
+
+def test_elimination_rejects_draws(sqlite_db):
+    _, SessionLocal, _ = sqlite_db(*TABLES)
+    _create_tournament(SessionLocal, TournamentType.SINGLE_ELIMINATION, 2)
+    service = TournamentBracketService()
+
+    with SessionLocal() as session:
+        service.start(session, session.get(Tournament, 1))
+        tournament_match = session.query(TournamentMatch).one()
+        with pytest.raises(BracketError):
+            service.record_result(session, tournament_match, None)
+
+        # A drawn match reported by the match lifecycle is left open for a replay instead
+        assert service.record_match_result(session, tournament_match.match_id, None) == {
+            "advanced": False, "needs_replay": True}
+        assert tournament_match.completed_at is None
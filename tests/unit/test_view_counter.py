@@ -0,0 +1,124 @@
+"""
+Unit tests for the batched CMS view counter
+"""
+
+import random
+
+import pytest
+
+from shared.models.cms import ContentView, ContentType, NewsArticle, VideoContent, VideoPlatform, VideoType
+from shared.services.view_counter import ARTICLE, VIDEO, ViewCounter
+
+TABLES = ('news_articles', 'video_content', 'content_views')
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _content(SessionLocal):
+    with SessionLocal() as session:
+        session.add_all([
+            NewsArticle(id=1, title="Patch notes", slug="patch-notes", content="...", content_type=ContentType.news,
+                        author_admin_id=1),
+            NewsArticle(id=2, title="Tournament", slug="tournament", content="...", content_type=ContentType.tournament,
+                        author_admin_id=1),
+            VideoContent(id=1, title="How to play", slug="how-to-play", video_type=VideoType.tutorial,
+                         platform=VideoPlatform.youtube, video_url="https://example.com/v", author_admin_id=1),
+        ])
+        session.commit()
+
+
+def _view_counts(SessionLocal):
+    with SessionLocal() as session:
+        return ({a.id: a.view_count for a in session.query(NewsArticle)},
+                {v.id: v.view_count for v in session.query(VideoContent)})
+
+
+def test_repeat_views_count_once_per_session_window():
+    clock = Clock()
+    counter = ViewCounter(session_factory=lambda: None, session_seconds=1800, clock=clock)
+
+    assert counter.record(ARTICLE, 1, "10.0.0.1")
+    assert not counter.record(ARTICLE, 1, "10.0.0.1")
+    assert counter.record(ARTICLE, 1, "10.0.0.2")
+    assert counter.record(VIDEO, 1, "10.0.0.1")  # Different content, separate window
+    clock.now += 1801
+    assert counter.record(ARTICLE, 1, "10.0.0.1")
+    assert counter.pending(ARTICLE, 1) == 3 and counter.pending(VIDEO, 1) == 1
+
+
+def test_dedup_memory_is_bounded():
+    counter = ViewCounter(session_factory=lambda: None, max_dedup_keys=100)
+    for i in range(1000):
+        counter.record(ARTICLE, 1, f"10.0.{i // 256}.{i % 256}")
+    assert len(counter._seen) == 100
+    assert counter.pending(ARTICLE, 1) == 1000
+
+
+def test_flush_applies_aggregated_increments_in_one_batch(sqlite_db):
+    _, SessionLocal, statements = sqlite_db(*TABLES)
+    _content(SessionLocal)
+    counter = ViewCounter(session_factory=SessionLocal, sample_rate=0.25, rng=random.Random(1))
+
+    for i in range(400):
+        counter.record(ARTICLE, 1 + i % 2, f"10.0.{i // 256}.{i % 256}", user_agent="test")
+    for i in range(50):
+        counter.record(VIDEO, 1, f"10.1.0.{i}")
+
+    before = len(statements)
+    result = counter.flush()
+    flush_statements = statements[before:]
+
+    assert result['views'] == 450 and result['articles'] == 2 and result['videos'] == 1
+    # One executemany per content table and one for the sampled rows
+    assert sum('UPDATE news_articles' in sql for sql in flush_statements) == 1
+    assert sum('UPDATE video_content' in sql for sql in flush_statements) == 1
+    assert _view_counts(SessionLocal) == ({1: 200, 2: 200}, {1: 50})
+    with SessionLocal() as session:
+        samples = session.query(ContentView).count()
+    assert samples == result['samples'] and 60 < samples < 170
+
+    assert counter.pending(ARTICLE, 1) == 0
+    assert counter.flush()['views'] == 0
+
+
+def test_failed_flush_keeps_increments_for_retry(sqlite_db):
+    _, SessionLocal, _ = sqlite_db(*TABLES)
+    _content(SessionLocal)
+    healthy = [False]
+
+    def session_factory():
+        if not healthy[0]:
+            raise RuntimeError("database unavailable")
+        return SessionLocal()
+
+    counter = ViewCounter(session_factory=session_factory, sample_rate=1.0)
+    counter.record(ARTICLE, 1, "10.0.0.1")
+    with pytest.raises(RuntimeError):
+        counter.flush()
+    counter.record(ARTICLE, 1, "10.0.0.2")
+    assert counter.pending(ARTICLE, 1) == 2
+
+    healthy[0] = True
+    assert counter.flush()['samples'] == 2
+    assert _view_counts(SessionLocal)[0][1] == 2
+
+
+def test_bad_sample_is_dropped_without_holding_back_counts(sqlite_db):
+    _, SessionLocal, _ = sqlite_db(*TABLES)
+    _content(SessionLocal)
+    counter = ViewCounter(session_factory=SessionLocal, sample_rate=1.0)
+
+    counter.record(ARTICLE, 1, "10.0.0.1")
+    counter._samples.append({'not_a_column': 1})  # Fails the whole sample insert
+    result = counter.flush()
+    assert result['views'] == 1 and result['samples'] == 0 and counter.dropped_samples == 2
+
+    counter.record(ARTICLE, 1, "10.0.0.2")
+    assert counter.flush()['samples'] == 1
+    assert _view_counts(SessionLocal)[0][1] == 2
@@ -0,0 +1,210 @@
+"""
+Unit tests for the wallet ledger
+Postings, idempotency, daily totals and reconciliation against in-memory SQLite
+"""
+
+import os
+import importlib.util
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from flask import Flask
+
+from shared.auth.jwt_handler import create_admin_token
+from shared.models.base import Admin, AuditLog, Player
+from shared.models.tournaments import PlayerWallet
+from shared.models.wallet_ledger import LedgerEntry, LedgerPosting
+from shared.services.wallet_ledger import (
+    DailyLimitExceeded, InsufficientFunds, LedgerError,
+    cancel_withdrawal, credit_deposit, daily_total, get_or_create_wallet, hold_withdrawal,
+    pay_tournament_prize, pending_withdrawals, reconcile, settle_withdrawal, to_money, wallet_history
+)
+
+TABLES = ('players', 'player_wallets', 'wallet_ledger_entries', 'wallet_ledger_postings', 'wallet_daily_totals')
+T0 = datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+# By path: test_console_commands puts the realtime service's own services package on sys.path
+_route_spec = importlib.util.spec_from_file_location(
+    "admin_wallets", os.path.join(ROOT, "services/api/routes/admin_wallets.py"))
+admin_wallets = importlib.util.module_from_spec(_route_spec)
+_route_spec.loader.exec_module(admin_wallets)
+
+
+def _wallet(SessionLocal, **limits):
+    with SessionLocal() as session:
+        session.add(Player(id=1, email="player1@example.com"))
+        session.flush()
+        wallet = get_or_create_wallet(session, 1)
+        for name, value in limits.items():
+            setattr(wallet, name, Decimal(value))
+        session.commit()
+        return wallet.id
+
+
+def _balance(SessionLocal, wallet_id):
+    with SessionLocal() as session:
+        return session.get(PlayerWallet, wallet_id).balance
+
+
+def test_to_money_rejects_invalid_amounts():
+    assert to_money("12.50") == Decimal("12.50")
+    assert to_money(3) == Decimal("3")
+    for bad in (0, -5, "1.005", "abc", None, "NaN"):
+        with pytest.raises(LedgerError):
+            to_money(bad)
+
+
+def test_redelivered_deposit_is_credited_once(sqlite_db):
+    _, SessionLocal, _ = sqlite_db(*TABLES)
+    wallet_id = _wallet(SessionLocal)
+
+    for attempt in range(3):
+        with SessionLocal() as session:
+            result = credit_deposit(session, wallet_id, "50.00", "pi_123", now=T0)
+            session.commit()
+        assert result.replayed == (attempt > 0)
+        assert result.balance == Decimal("50.00")
+
+    assert _balance(SessionLocal, wallet_id) == Decimal("50.00")
+    with SessionLocal() as session:
+        postings = session.query(LedgerPosting).all()
+        assert sorted(p.amount for p in postings) == [Decimal("-50.00"), Decimal("50.00")]
+        assert daily_total(session, wallet_id, 'deposit', T0.date()) == Decimal("50.00")
+        # A different amount under the same key is a client bug, not a replay
+        with pytest.raises(LedgerError):
+            credit_deposit(session, wallet_id, "60.00", "pi_123", now=T0)
+
+
+def test_withdrawal_limits_and_lifecycle(sqlite_db):
+    _, SessionLocal, _ = sqlite_db(*TABLES)
+    wallet_id = _wallet(SessionLocal, daily_withdrawal_limit="100.00")
+    with SessionLocal() as session:
+        credit_deposit(session, wallet_id, "150.00", "pi_1", now=T0)
+        session.commit()
+
+    with SessionLocal() as session:
+        first = hold_withdrawal(session, wallet_id, "60.00", idempotency_key="w1", now=T0)
+        assert hold_withdrawal(session, wallet_id, "60.00", idempotency_key="w1", now=T0).replayed
+        with pytest.raises(DailyLimitExceeded):
+            hold_withdrawal(session, wallet_id, "50.00", now=T0)
+        session.commit()
+
+    # Cancelling returns the funds and frees the day's limit
+    with SessionLocal() as session:
+        cancel_withdrawal(session, first.entry_id, now=T0)
+        assert cancel_withdrawal(session, first.entry_id, now=T0).replayed
+        assert daily_total(session, wallet_id, 'withdrawal', T0.date()) == Decimal("0.00")
+        with pytest.raises(LedgerError):
+            settle_withdrawal(session, first.entry_id, "po_1", now=T0)
+        second = hold_withdrawal(session, wallet_id, "100.00", now=T0)
+        session.commit()
+    assert _balance(SessionLocal, wallet_id) == Decimal("50.00")
+
+    with SessionLocal() as session:
+        with pytest.raises(InsufficientFunds):
+            hold_withdrawal(session, wallet_id, "75.00", now=T0 + timedelta(days=1))
+        session.rollback()
+        settle_withdrawal(session, second.entry_id, "po_2", now=T0)
+        session.commit()
+
+        history, total = wallet_history(session, wallet_id)
+        assert total == 4
+        assert [(h['type'], h['amount'], h['status']) for h in history] == [
+            ('withdrawal', -100.0, 'completed'),
+            ('refund', 60.0, 'completed'),
+            ('withdrawal', -60.0, 'cancelled'),
+            ('deposit', 150.0, 'completed'),
+        ]
+        assert history[0]['balance_before'] == 150.0 and history[0]['balance_after'] == 50.0
+        assert reconcile(session) == {'wallets_checked': 1, 'mismatches': [], 'unbalanced_entries': [], 'repaired': 0}
+
+
+def test_tournament_prize_is_paid_once(sqlite_db):
+    _, SessionLocal, _ = sqlite_db(*TABLES)
+    wallet_id = _wallet(SessionLocal)
+    with SessionLocal() as session:
+        pay_tournament_prize(session, wallet_id, 7, Decimal("25.00"), now=T0)
+        assert pay_tournament_prize(session, wallet_id, 7, Decimal("25.00"), now=T0).replayed
+        session.commit()
+        entry = session.query(LedgerEntry).one()
+        assert entry.tournament_id == 7 and entry.entry_type == 'tournament_prize'
+    assert _balance(SessionLocal, wallet_id) == Decimal("25.00")
+
+
+def test_reconcile_reports_and_repairs_drift(sqlite_db):
+    _, SessionLocal, _ = sqlite_db(*TABLES)
+    wallet_id = _wallet(SessionLocal)
+    with SessionLocal() as session:
+        credit_deposit(session, wallet_id, "40.00", "pi_1", now=T0)
+        session.commit()
+
+    with SessionLocal() as session:
+        # Simulate a write that bypassed the ledger, and a half-written entry
+        session.get(PlayerWallet, wallet_id).balance = Decimal("99.00")
+        session.add(LedgerPosting(entry_id=1, account="external:stripe", amount=Decimal("1.00")))
+        session.commit()
+
+    with SessionLocal() as session:
+        report = reconcile(session)
+        assert report['mismatches'] == [{'wallet_id': wallet_id, 'balance': 99.0, 'posted': 40.0}]
+        assert report['unbalanced_entries'] == [1]
+        session.rollback()
+
+        reconcile(session, repair=True)
+        session.commit()
+    assert _balance(SessionLocal, wallet_id) == Decimal("40.00")
+
+
+def test_admins_pay_out_or_cancel_pending_withdrawals(sqlite_db, monkeypatch):
+    import shared.auth.auto_rbac_decorator as rbac
+    import shared.security.audit_logger as audit_logger
+
+    _, SessionLocal, _ = sqlite_db(*TABLES, 'admins', 'audit_logs')
+    for module in (admin_wallets, rbac, audit_logger):
+        monkeypatch.setattr(module, "SessionLocal", SessionLocal)
+    wallet_id = _wallet(SessionLocal)
+    with SessionLocal() as session:
+        session.add_all([
+            Admin(id=1, username="finance", email="finance@example.com", password_hash="x", is_super_admin=True),
+            Admin(id=2, username="ops", email="ops@example.com", password_hash="x", role="admin"),
+        ])
+        credit_deposit(session, wallet_id, "100.00", "pi_1", now=T0)
+        paid = hold_withdrawal(session, wallet_id, "30.00", now=T0)
+        kept = hold_withdrawal(session, wallet_id, "20.00", now=T0)
+        session.commit()
+
+    app = Flask(__name__)
+    app.register_blueprint(admin_wallets.admin_wallets_bp)
+    finance = {'Authorization': f"Bearer {create_admin_token(1, 'finance@example.com')}"}
+    ops = {'Authorization': f"Bearer {create_admin_token(2, 'ops@example.com')}"}
+    base = '/v1/admin/wallets/withdrawals'
+    with app.test_client() as client:
+        pending = client.get(base, headers=ops).get_json()
+        assert [(w['id'], w['player_id'], w['amount']) for w in pending['withdrawals']] == \
+            [(paid.entry_id, 1, 30.0), (kept.entry_id, 1, 20.0)]
+
+        # Moving money needs a super admin
+        assert client.post(f'{base}/{paid.entry_id}/settle', json={'payout_reference': 'po_1'},
+                           headers=ops).status_code == 403
+        assert client.post(f'{base}/{paid.entry_id}/settle', json={}, headers=finance).status_code == 400
+        settled = client.post(f'{base}/{paid.entry_id}/settle', json={'payout_reference': 'po_1'}, headers=finance)
+        assert settled.status_code == 200
+        again = client.post(f'{base}/{paid.entry_id}/settle', json={'payout_reference': 'po_1'}, headers=finance)
+        assert again.get_json()['settlement_id'] == settled.get_json()['settlement_id']
+        assert client.post(f'{base}/{paid.entry_id}/cancel', headers=finance).status_code == 409
+
+        cancelled = client.post(f'{base}/{kept.entry_id}/cancel', json={'reason': 'fraud check'}, headers=finance)
+        assert cancelled.get_json()['balance'] == 70.0
+        assert client.post(f'{base}/{kept.entry_id}/settle', json={'payout_reference': 'po_2'},
+                           headers=finance).status_code == 409
+        assert client.post(f'{base}/99999/cancel', headers=finance).status_code == 404
+        assert client.get(base, headers=ops).get_json() == {'withdrawals': [], 'total': 0, 'page': 1, 'page_size': 50}
+
+    with SessionLocal() as session:
+        assert pending_withdrawals(session) == ([], 0)
+        assert _balance(SessionLocal, wallet_id) == Decimal("70.00")
+        assert reconcile(session)['mismatches'] == []
+        assert sorted(log.action for log in session.query(AuditLog) if log.action.startswith('withdrawal')) == \
+            ['withdrawal_cancelled', 'withdrawal_settled', 'withdrawal_settled']